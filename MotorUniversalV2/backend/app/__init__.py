@@ -316,9 +316,13 @@ def create_app(config_name='development'):
         ensure_sqlite_schema(app)
         ensure_label_style_column(app)
         try:
-            from app.auto_migrate import check_and_create_support_chat_tables, check_and_create_bulk_upload_tables
+            from app.auto_migrate import (
+                check_and_create_support_chat_tables, check_and_create_bulk_upload_tables,
+                check_and_add_bulk_upload_job_columns,
+            )
             check_and_create_support_chat_tables()
             check_and_create_bulk_upload_tables()
+            check_and_add_bulk_upload_job_columns()
         except Exception as e:
             print(f"[AUTO-MIGRATE] Error verificando tablas: {e}")
 
@@ -446,6 +450,20 @@ def create_app(config_name='development'):
         except Exception as e:
             print(f"[AUTO-MIGRATE] Error verificando info_sheet_url en standards: {e}")
 
+        # scanned_files en conocer_upload_batches (progreso de la pasada 1)
+        try:
+            from app.auto_migrate import check_and_add_conocer_batch_scanned_column
+            check_and_add_conocer_batch_scanned_column()
+        except Exception as e:
+            print(f"[AUTO-MIGRATE] Error verificando scanned_files: {e}")
+
+        # Jobs de ZIP de certificados por grupo (descarga en segundo plano)
+        try:
+            from app.auto_migrate import check_and_create_certificate_zip_jobs_table
+            check_and_create_certificate_zip_jobs_table()
+        except Exception as e:
+            print(f"[AUTO-MIGRATE] Error verificando group_certificate_zip_jobs: {e}")
+
     # Arrancar worker de cola de verificación CURP (background thread)
     try:
         from app.services.curp_queue_worker import start_curp_worker
@@ -453,6 +471,19 @@ def create_app(config_name='development'):
     except Exception as e:
         print(f"[CURP-WORKER] Error arrancando worker: {e}")
 
+    # Flush periódico de last_seen (en testing se llama flush_last_seen a mano)
+    if not app.config.get('TESTING'):
+        try:
+            from app.services.last_seen_tracker import start_last_seen_flusher
+            start_last_seen_flusher(app)
+        except Exception as e:
+            print(f"[LAST-SEEN] Error arrancando flusher: {e}")
+        try:
+            from app.services.exam_progress_store import start_progress_flusher
+            start_progress_flusher(app)
+        except Exception as e:
+            print(f"[EXAM-PROGRESS] Error arrancando flusher: {e}")
+
     # Manejadores de errores
     register_error_handlers(app)
     
@@ -474,7 +505,8 @@ def create_app(config_name='development'):
             'Exercise': Exercise
         }
     
-    # Actualizar last_seen en cada request autenticado (lightweight)
+    # Registrar last_seen en cada request autenticado: se marca en Redis
+    # (throttle por usuario) y un flusher lo escribe en lote a la BD.
     @app.before_request
     def _update_last_seen():
         from flask import request as req
@@ -483,15 +515,11 @@ def create_app(config_name='development'):
             return
         try:
             from flask_jwt_extended import decode_token
-            from datetime import datetime
+            from app.services.last_seen_tracker import record_last_seen
             token_data = decode_token(auth_header.split(' ', 1)[1])
             user_id = token_data.get('sub')
             if user_id:
-                db.session.execute(
-                    db.text("UPDATE users SET last_seen = :now WHERE id = :uid"),
-                    {"now": datetime.utcnow(), "uid": user_id},
-                )
-                db.session.commit()
+                record_last_seen(user_id)
         except Exception:
             pass
 
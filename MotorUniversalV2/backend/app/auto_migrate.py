@@ -1374,6 +1374,147 @@ def check_and_add_standard_info_sheet_column():
         db.session.rollback()
 
 
+def check_and_add_conocer_batch_scanned_column():
+    """Verificar y agregar columna scanned_files a conocer_upload_batches (progreso de pasada 1)."""
+    print("🔍 Verificando columna scanned_files en conocer_upload_batches...")
+    try:
+        inspector = inspect(db.engine)
+        tables = inspector.get_table_names()
+        if 'conocer_upload_batches' not in tables:
+            print("  ⚠️  Tabla conocer_upload_batches no existe, saltando...")
+            return
+        columns = [col['name'] for col in inspector.get_columns('conocer_upload_batches')]
+        if 'scanned_files' in columns:
+            print("  ✓ Columna scanned_files ya existe")
+            return
+        db_type = get_db_type()
+        if db_type == 'mssql':
+            sql_col = "ALTER TABLE conocer_upload_batches ADD scanned_files INT NULL DEFAULT 0"
+        else:
+            sql_col = "ALTER TABLE conocer_upload_batches ADD COLUMN scanned_files INTEGER NULL DEFAULT 0"
+        db.session.execute(text(sql_col))
+        db.session.commit()
+        print("  ✓ Columna scanned_files agregada a conocer_upload_batches")
+    except Exception as e:
+        print(f"❌ Error agregando scanned_files: {e}")
+        db.session.rollback()
+
+
+def check_and_create_certificate_zip_jobs_table():
+    """Crea la tabla group_certificate_zip_jobs (ZIPs de certificados en segundo plano)."""
+    print("🔍 Verificando tabla group_certificate_zip_jobs...")
+    try:
+        from app.models.certificate_zip_job import GroupCertificateZipJob  # noqa: F401
+
+        inspector = inspect(db.engine)
+        if 'group_certificate_zip_jobs' in set(inspector.get_table_names()):
+            print("  ✓ Tabla group_certificate_zip_jobs ya existe")
+            return
+
+        db_type = get_db_type()
+        if db_type == 'mssql':
+            sql = """
+                CREATE TABLE group_certificate_zip_jobs (
+                    id INT IDENTITY(1,1) PRIMARY KEY,
+                    group_id INT NOT NULL,
+                    requested_by VARCHAR(36) NULL,
+                    certificate_types NVARCHAR(MAX) NULL,
+                    user_ids NVARCHAR(MAX) NULL,
+                    filter_key VARCHAR(64) NOT NULL,
+                    total_files INT NULL DEFAULT 0,
+                    processed_files INT NULL DEFAULT 0,
+                    files_added INT NULL DEFAULT 0,
+                    generated_files INT NULL DEFAULT 0,
+                    error_count INT NULL DEFAULT 0,
+                    errors NVARCHAR(MAX) NULL,
+                    blob_name NVARCHAR(500) NULL,
+                    zip_filename NVARCHAR(255) NULL,
+                    size_bytes BIGINT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    started_at DATETIME2 NULL,
+                    completed_at DATETIME2 NULL,
+                    error_message NVARCHAR(MAX) NULL,
+                    created_at DATETIME2 NOT NULL DEFAULT GETUTCDATE(),
+                    updated_at DATETIME2 NULL DEFAULT GETUTCDATE(),
+                    CONSTRAINT fk_gczj_group FOREIGN KEY (group_id)
+                        REFERENCES candidate_groups(id) ON DELETE CASCADE,
+                    CONSTRAINT fk_gczj_requester FOREIGN KEY (requested_by)
+                        REFERENCES users(id) ON DELETE NO ACTION
+                )
+            """
+        elif db_type == 'postgresql':
+            sql = """
+                CREATE TABLE group_certificate_zip_jobs (
+                    id SERIAL PRIMARY KEY,
+                    group_id INT NOT NULL REFERENCES candidate_groups(id) ON DELETE CASCADE,
+                    requested_by VARCHAR(36) NULL REFERENCES users(id),
+                    certificate_types TEXT NULL,
+                    user_ids TEXT NULL,
+                    filter_key VARCHAR(64) NOT NULL,
+                    total_files INT NULL DEFAULT 0,
+                    processed_files INT NULL DEFAULT 0,
+                    files_added INT NULL DEFAULT 0,
+                    generated_files INT NULL DEFAULT 0,
+                    error_count INT NULL DEFAULT 0,
+                    errors TEXT NULL,
+                    blob_name VARCHAR(500) NULL,
+                    zip_filename VARCHAR(255) NULL,
+                    size_bytes BIGINT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    started_at TIMESTAMP NULL,
+                    completed_at TIMESTAMP NULL,
+                    error_message TEXT NULL,
+                    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMP NULL DEFAULT NOW()
+                )
+            """
+        else:
+            # SQLite
+            sql = """
+                CREATE TABLE group_certificate_zip_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    group_id INTEGER NOT NULL,
+                    requested_by VARCHAR(36) NULL,
+                    certificate_types TEXT NULL,
+                    user_ids TEXT NULL,
+                    filter_key VARCHAR(64) NOT NULL,
+                    total_files INTEGER NULL DEFAULT 0,
+                    processed_files INTEGER NULL DEFAULT 0,
+                    files_added INTEGER NULL DEFAULT 0,
+                    generated_files INTEGER NULL DEFAULT 0,
+                    error_count INTEGER NULL DEFAULT 0,
+                    errors TEXT NULL,
+                    blob_name VARCHAR(500) NULL,
+                    zip_filename VARCHAR(255) NULL,
+                    size_bytes BIGINT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    started_at DATETIME NULL,
+                    completed_at DATETIME NULL,
+                    error_message TEXT NULL,
+                    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (group_id) REFERENCES candidate_groups(id) ON DELETE CASCADE
+                )
+            """
+        db.session.execute(text(sql))
+        db.session.commit()
+        print("  ✅ Tabla group_certificate_zip_jobs creada")
+        for idx_sql in [
+            "CREATE INDEX ix_gczj_group_filter ON group_certificate_zip_jobs (group_id, filter_key)",
+            "CREATE INDEX ix_gczj_status ON group_certificate_zip_jobs (status)",
+        ]:
+            try:
+                db.session.execute(text(idx_sql))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+    except Exception as e:
+        print(f"❌ Error creando group_certificate_zip_jobs: {e}")
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+
 def check_and_add_exam_default_config_columns():
     """Verificar y agregar columnas de configuración de asignación por defecto en exams"""
     print("🔍 Verificando columnas de config de asignación en exams...")
@@ -1631,6 +1772,52 @@ def check_and_create_bulk_upload_tables():
         db.session.rollback()
 
 
+def check_and_add_bulk_upload_job_columns():
+    """Agrega a bulk_upload_batches las columnas del procesamiento en segundo plano
+    (status, progreso y resultado). Las cargas previas quedan como 'completed'."""
+    print("🔍 Verificando columnas de job en bulk_upload_batches...")
+    try:
+        inspector = inspect(db.engine)
+        if 'bulk_upload_batches' not in inspector.get_table_names():
+            print("  ⚠️  Tabla bulk_upload_batches no existe, saltando...")
+            return
+        existing = {col['name'] for col in inspector.get_columns('bulk_upload_batches')}
+        db_type = get_db_type()
+        if db_type == 'mssql':
+            columns = [
+                ('status', "VARCHAR(20) NOT NULL DEFAULT 'completed'"),
+                ('total_rows', 'INT NULL DEFAULT 0'),
+                ('processed_rows', 'INT NULL DEFAULT 0'),
+                ('started_at', 'DATETIME2 NULL'),
+                ('completed_at', 'DATETIME2 NULL'),
+                ('error_message', 'NVARCHAR(MAX) NULL'),
+                ('result_data', 'NVARCHAR(MAX) NULL'),
+            ]
+            add = 'ALTER TABLE bulk_upload_batches ADD {} {}'
+        else:
+            columns = [
+                ('status', "VARCHAR(20) NOT NULL DEFAULT 'completed'"),
+                ('total_rows', 'INTEGER NULL DEFAULT 0'),
+                ('processed_rows', 'INTEGER NULL DEFAULT 0'),
+                ('started_at', 'TIMESTAMP NULL'),
+                ('completed_at', 'TIMESTAMP NULL'),
+                ('error_message', 'TEXT NULL'),
+                ('result_data', 'TEXT NULL'),
+            ]
+            add = 'ALTER TABLE bulk_upload_batches ADD COLUMN {} {}'
+        missing = [(name, ddl) for name, ddl in columns if name not in existing]
+        if not missing:
+            print("  ✓ Columnas de job ya existen")
+            return
+        for name, ddl in missing:
+            db.session.execute(text(add.format(name, ddl)))
+        db.session.commit()
+        print(f"  ✓ Columnas agregadas a bulk_upload_batches: {', '.join(n for n, _ in missing)}")
+    except Exception as e:
+        print(f"❌ Error agregando columnas de job a bulk_upload_batches: {e}")
+        db.session.rollback()
+
+
 def check_and_create_support_chat_tables():
     """Verificar y crear tablas del módulo de chat candidato-soporte."""
     print("🔍 Verificando tablas support chat...")
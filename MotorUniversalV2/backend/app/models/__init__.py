@@ -31,6 +31,7 @@ from app.models.student_progress import (
 )
 from app.models.conocer_certificate import ConocerCertificate
 from app.models.conocer_upload import ConocerUploadBatch, ConocerUploadLog
+from app.models.certificate_zip_job import GroupCertificateZipJob
 from app.models.competency_standard import CompetencyStandard, DeletionRequest
 from app.models.certificate_template import CertificateTemplate
 from app.models.brand import Brand
@@ -123,6 +124,7 @@ __all__ = [
     'ConocerCertificate',
     'ConocerUploadBatch',
     'ConocerUploadLog',
+    'GroupCertificateZipJob',
     'CompetencyStandard',
     'DeletionRequest',
     'CertificateTemplate',
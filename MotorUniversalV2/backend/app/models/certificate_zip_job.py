@@ -0,0 +1,94 @@
+"""
+Modelo para la generación en segundo plano de ZIPs de certificados por grupo.
+Cada job genera los PDFs faltantes, arma el ZIP y lo deja en blob storage.
+"""
+import json
+from datetime import datetime
+from app import db
+
+
+class GroupCertificateZipJob(db.Model):
+    """
+    Job de descarga masiva de certificados de un grupo.
+    (group_id, filter_key) identifica la solicitud: un re-request con el mismo
+    filtro reutiliza el job en curso o el ZIP ya terminado.
+    """
+
+    __tablename__ = 'group_certificate_zip_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('candidate_groups.id', ondelete='CASCADE'),
+                         nullable=False, index=True)
+    requested_by = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=True)
+
+    # Filtro solicitado
+    certificate_types = db.Column(db.Text)  # JSON: ['tier_basic', ...]
+    user_ids = db.Column(db.Text)  # JSON: lista de user_ids o null (todo el grupo)
+    filter_key = db.Column(db.String(64), nullable=False, index=True)  # sha256 del filtro normalizado
+
+    # Contadores de procesamiento
+    total_files = db.Column(db.Integer, default=0)  # Archivos candidatos a entrar al ZIP
+    processed_files = db.Column(db.Integer, default=0)  # Procesados hasta ahora
+    files_added = db.Column(db.Integer, default=0)  # Escritos en el ZIP
+    generated_files = db.Column(db.Integer, default=0)  # PDFs generados nuevos
+    error_count = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text)  # JSON: [{'user', 'type', 'error'}] (acotado)
+
+    # Archivo resultante
+    blob_name = db.Column(db.String(500))
+    zip_filename = db.Column(db.String(255))
+    size_bytes = db.Column(db.BigInteger)
+
+    # Estado del job
+    status = db.Column(db.String(20), default='queued', nullable=False, index=True)
+    # queued → processing → completed / failed
+
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GroupCertificateZipJob {self.id} group={self.group_id} {self.status}>'
+
+    @staticmethod
+    def _load_json(value, default):
+        if not value:
+            return default
+        try:
+            return json.loads(value)
+        except (TypeError, ValueError):
+            return default
+
+    @property
+    def progress_percentage(self):
+        """Porcentaje de progreso"""
+        if not self.total_files:
+            return 100.0 if self.status == 'completed' else 0
+        return round((self.processed_files or 0) / self.total_files * 100, 1)
+
+    def to_dict(self):
+        """Convertir a diccionario"""
+        return {
+            'id': self.id,
+            'group_id': self.group_id,
+            'requested_by': self.requested_by,
+            'certificate_types': self._load_json(self.certificate_types, []),
+            'user_ids': self._load_json(self.user_ids, None),
+            'status': self.status,
+            'total_files': self.total_files or 0,
+            'processed_files': self.processed_files or 0,
+            'files_added': self.files_added or 0,
+            'generated_files': self.generated_files or 0,
+            'error_count': self.error_count or 0,
+            'errors': self._load_json(self.errors, []),
+            'progress_percentage': self.progress_percentage,
+            'zip_filename': self.zip_filename,
+            'size_bytes': self.size_bytes,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -24,6 +24,7 @@ class ConocerUploadBatch(db.Model):
     # Contadores de procesamiento
     total_files = db.Column(db.Integer, default=0)  # Total archivos en el ZIP
     processed_files = db.Column(db.Integer, default=0)  # Procesados hasta ahora
+    scanned_files = db.Column(db.Integer, default=0)  # PDFs parseados en pasada 1
     matched_files = db.Column(db.Integer, default=0)  # Nuevos certificados creados
     replaced_files = db.Column(db.Integer, default=0)  # Certificados existentes reemplazados
     skipped_files = db.Column(db.Integer, default=0)  # Duplicados dentro del ZIP
@@ -57,6 +58,7 @@ class ConocerUploadBatch(db.Model):
             'filename': self.filename,
             'total_files': self.total_files,
             'processed_files': self.processed_files,
+            'scanned_files': self.scanned_files or 0,
             'matched_files': self.matched_files,
             'replaced_files': self.replaced_files,
             'skipped_files': self.skipped_files,
@@ -3,14 +3,16 @@ Modelos de verificación CURP
 
 - CurpRenapoCache: cache local de respuestas RENAPO (positivas y negativas)
   para reducir llamadas externas a gob.mx. Las positivas viven 30 días;
-  las negativas se renuevan rápido (1h) para permitir reintentos cuando
-  RENAPO está intermitente.
+  las negativas (RENAPO respondió que no existe) viven
+  CURP_NEGATIVE_CACHE_HOURS (default 24h). Los errores transitorios
+  (timeout, conexión, circuit breaker) NO se cachean.
 
 - CurpVerificationQueue: cola persistente de CURPs pendientes de verificar
   contra RENAPO. Sustituye los threads volátiles. Si RENAPO está caído,
   las entradas se reagendan cada 12h indefinidamente — NUNCA se delegan
   al candidato como `curp_required` por culpa del servicio externo.
 """
+import os
 from datetime import datetime, timedelta
 from app import db
 
@@ -43,7 +45,9 @@ class CurpRenapoCache(db.Model):
 
     # TTL configurable
     POSITIVE_TTL_DAYS = 30  # CURPs encontradas: poco probable que cambien
-    NEGATIVE_TTL_HOURS = 1  # CURPs rechazadas: TTL corto por intermitencia RENAPO
+    # CURPs que RENAPO reportó como inexistentes: solo se cachean respuestas
+    # definitivas, así que el TTL puede ser largo sin "envenenar" el cache.
+    NEGATIVE_TTL_HOURS = float(os.getenv('CURP_NEGATIVE_CACHE_HOURS', '24'))
 
     @staticmethod
     def calc_expiry(valid: bool) -> datetime:
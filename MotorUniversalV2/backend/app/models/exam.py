@@ -106,14 +106,6 @@ class Exam(db.Model):
             Category, Topic.category_id == Category.id
         ).filter(Category.exam_id == self.id).group_by(Question.type).all()
         
-        exam_questions = 0
-        simulator_questions = 0
-        for qtype, cnt in q_counts:
-            if qtype == 'simulator':
-                simulator_questions = cnt
-            else:
-                exam_questions += cnt
-        
         # Single query for exercises by type
         e_counts = db.session.query(
             Exercise.type,
@@ -124,29 +116,16 @@ class Exam(db.Model):
             Category, Topic.category_id == Category.id
         ).filter(Category.exam_id == self.id).group_by(Exercise.type).all()
         
-        exam_exercises = 0
-        simulator_exercises = 0
-        for etype, cnt in e_counts:
-            if etype == 'simulator':
-                simulator_exercises = cnt
-            else:
-                exam_exercises += cnt
-        
-        return {
-            'exam_questions_count': exam_questions,
-            'simulator_questions_count': simulator_questions,
-            'exam_exercises_count': exam_exercises,
-            'simulator_exercises_count': simulator_exercises,
-            'has_exam_content': (exam_questions + exam_exercises) > 0,
-            'has_simulator_content': (simulator_questions + simulator_exercises) > 0
-        }
+        return _mode_counts(q_counts, e_counts)
     
-    def to_dict(self, include_details=False):
-        """Convertir a diccionario"""
-        from app.models.topic import Topic
-        from app.models.category import Category
-        # Obtener las categorías como lista (lazy='dynamic' devuelve una query)
-        categories_list = self.categories.all()
+    def to_dict(self, include_details=False, _preloaded_stats=None):
+        """Convertir a diccionario
+        
+        _preloaded_stats: entrada de load_exam_stats() para este examen. Los
+        listados usan serialize_exams() para no repetir ~7 queries por examen.
+        """
+        stats = _preloaded_stats if _preloaded_stats is not None else self._load_stats()
+        categories_list = stats['categories']
         
         data = {
             'id': self.id,
@@ -178,51 +157,233 @@ class Exam(db.Model):
             'direct_sale_description': getattr(self, 'direct_sale_description', None),
             'info_sheet_url': getattr(self, 'info_sheet_url', None),
             'is_free_sample': bool(getattr(self, 'is_free_sample', False)),
-            'total_questions': self.get_total_questions(),
-            'total_exercises': self.get_total_exercises(),
+            'total_questions': stats['total_questions'],
+            'total_exercises': stats['total_exercises'],
             'total_categories': len(categories_list),
-            'total_topics': db.session.query(db.func.count(Topic.id)).join(Category, Topic.category_id == Category.id).filter(Category.exam_id == self.id).scalar() or 0,
+            'total_topics': stats['total_topics'],
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'categories': [{'id': cat.id, 'name': cat.name, 'percentage': cat.percentage} for cat in categories_list]  # Siempre incluir resumen de categorías
+            'categories': [{'id': cat['id'], 'name': cat['name'], 'percentage': cat['percentage']} for cat in categories_list]  # Siempre incluir resumen de categorías
         }
         
         # Agregar conteos por modo (exam/simulator)
-        mode_counts = self.get_mode_counts()
-        data.update(mode_counts)
+        data.update(stats['mode_counts'])
         
         # Incluir info del estándar de competencia si existe
-        if self.competency_standard:
-            data['competency_standard'] = {
-                'id': self.competency_standard.id,
-                'code': self.competency_standard.code,
-                'name': self.competency_standard.name
-            }
+        if stats['competency_standard']:
+            data['competency_standard'] = dict(stats['competency_standard'])
         
         # Incluir materiales de estudio vinculados
-        try:
-            if hasattr(self, 'linked_study_materials'):
-                linked_materials = []
-                for material in self.linked_study_materials:
-                    linked_materials.append({
-                        'id': material.id,
-                        'title': material.title,
-                        'description': material.description,
-                        'image_url': transform_to_cdn_url(material.image_url) if material.image_url else None
-                    })
-                data['linked_study_materials'] = linked_materials
-        except Exception:
-            # La tabla puede no existir aún
-            data['linked_study_materials'] = []
+        data['linked_study_materials'] = [dict(m) for m in stats['linked_study_materials']]
         
         # IDs de materiales vinculados (para uso rápido en asignación)
         data['linked_material_ids'] = [m['id'] for m in data.get('linked_study_materials', [])]
         
         if include_details:
             data['instructions'] = self.instructions
-            data['categories'] = [cat.to_dict(include_details=True) for cat in categories_list]
+            data['categories'] = [cat.to_dict(include_details=True) for cat in self.categories.all()]
         
         return data
     
+    def _load_stats(self):
+        """Conteos de un solo examen (mismo formato que load_exam_stats)."""
+        stats = load_exam_stats([self.id], competency_standards={self.id: self.competency_standard})
+        return stats[self.id]
+    
     def __repr__(self):
         return f'<Exam {self.name} v{self.version}>'
+
+
+# ============================================================
+# Conteos por lote para listados (GET /exams, /partners/exams/available,
+# /direct/catalog). Todas las queries agrupan por exam_id, así el número
+# de queries no depende del tamaño de la página.
+# ============================================================
+
+# Lotes de IDs por debajo del límite de 2100 parámetros de MSSQL
+EXAM_STATS_CHUNK = 1000
+
+
+def _chunked(ids, size=EXAM_STATS_CHUNK):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _mode_counts(question_counts, exercise_counts):
+    """Arma el dict de conteos por modo a partir de filas (type, count)."""
+    exam_questions = 0
+    simulator_questions = 0
+    for qtype, cnt in question_counts:
+        if qtype == 'simulator':
+            simulator_questions = cnt
+        else:
+            exam_questions += cnt
+    
+    exam_exercises = 0
+    simulator_exercises = 0
+    for etype, cnt in exercise_counts:
+        if etype == 'simulator':
+            simulator_exercises = cnt
+        else:
+            exam_exercises += cnt
+    
+    return {
+        'exam_questions_count': exam_questions,
+        'simulator_questions_count': simulator_questions,
+        'exam_exercises_count': exam_exercises,
+        'simulator_exercises_count': simulator_exercises,
+        'has_exam_content': (exam_questions + exam_exercises) > 0,
+        'has_simulator_content': (simulator_questions + simulator_exercises) > 0
+    }
+
+
+def load_exam_stats(exam_ids, competency_standards=None):
+    """
+    Calcula en lote lo que Exam.to_dict necesita de tablas relacionadas.
+    
+    Queries fijas por lote de IDs: categorías, temas, preguntas por tipo,
+    ejercicios por tipo, materiales vinculados y estándares de competencia.
+    
+    Args:
+        exam_ids: IDs de examen (se procesan en lotes de EXAM_STATS_CHUNK).
+        competency_standards: dict opcional exam_id -> CompetencyStandard ya
+            cargado (evita la query de estándares).
+    
+    Returns:
+        dict exam_id -> {
+            'categories': [{'id', 'name', 'percentage'}] (orden de Category.order),
+            'total_topics', 'total_questions', 'total_exercises',
+            'mode_counts': dict de get_mode_counts(),
+            'competency_standard': {'id', 'code', 'name'} | None,
+            'linked_study_materials': [{'id', 'title', 'description', 'image_url'}],
+        }
+    """
+    from app.models.category import Category
+    from app.models.topic import Topic
+    from app.models.question import Question
+    from app.models.exercise import Exercise
+    
+    exam_ids = list(dict.fromkeys(exam_ids))
+    stats = {
+        exam_id: {
+            'categories': [],
+            'total_topics': 0,
+            'total_questions': 0,
+            'total_exercises': 0,
+            'mode_counts': None,
+            'competency_standard': None,
+            'linked_study_materials': [],
+        }
+        for exam_id in exam_ids
+    }
+    if not exam_ids:
+        return stats
+    
+    question_rows = {exam_id: [] for exam_id in exam_ids}
+    exercise_rows = {exam_id: [] for exam_id in exam_ids}
+    standard_ids = {}
+    
+    for chunk in _chunked(exam_ids):
+        for cat_id, exam_id, name, percentage in db.session.query(
+            Category.id, Category.exam_id, Category.name, Category.percentage
+        ).filter(Category.exam_id.in_(chunk)).order_by(Category.exam_id, Category.order).all():
+            stats[exam_id]['categories'].append({'id': cat_id, 'name': name, 'percentage': percentage})
+        
+        for exam_id, cnt in db.session.query(
+            Category.exam_id, db.func.count(Topic.id)
+        ).join(
+            Topic, Topic.category_id == Category.id
+        ).filter(Category.exam_id.in_(chunk)).group_by(Category.exam_id).all():
+            stats[exam_id]['total_topics'] = cnt or 0
+        
+        for exam_id, qtype, cnt in db.session.query(
+            Category.exam_id, Question.type, db.func.count(Question.id)
+        ).join(
+            Topic, Topic.category_id == Category.id
+        ).join(
+            Question, Question.topic_id == Topic.id
+        ).filter(Category.exam_id.in_(chunk)).group_by(Category.exam_id, Question.type).all():
+            question_rows[exam_id].append((qtype, cnt))
+        
+        for exam_id, etype, cnt in db.session.query(
+            Category.exam_id, Exercise.type, db.func.count(Exercise.id)
+        ).join(
+            Topic, Topic.category_id == Category.id
+        ).join(
+            Exercise, Exercise.topic_id == Topic.id
+        ).filter(Category.exam_id.in_(chunk)).group_by(Category.exam_id, Exercise.type).all():
+            exercise_rows[exam_id].append((etype, cnt))
+        
+        # Materiales de estudio vinculados (muchos a muchos)
+        try:
+            from app.models.study_content import StudyMaterial, study_material_exams
+            for exam_id, mat_id, title, description, image_url in db.session.query(
+                study_material_exams.c.exam_id, StudyMaterial.id, StudyMaterial.title,
+                StudyMaterial.description, StudyMaterial.image_url
+            ).join(
+                StudyMaterial, StudyMaterial.id == study_material_exams.c.study_material_id
+            ).filter(
+                study_material_exams.c.exam_id.in_(chunk)
+            ).order_by(study_material_exams.c.exam_id, StudyMaterial.id).all():
+                stats[exam_id]['linked_study_materials'].append({
+                    'id': mat_id,
+                    'title': title,
+                    'description': description,
+                    'image_url': transform_to_cdn_url(image_url) if image_url else None
+                })
+        except Exception:
+            # La tabla puede no existir aún
+            for exam_id in chunk:
+                stats[exam_id]['linked_study_materials'] = []
+        
+        if competency_standards is None:
+            for exam_id, standard_id in db.session.query(
+                Exam.id, Exam.competency_standard_id
+            ).filter(Exam.id.in_(chunk), Exam.competency_standard_id.isnot(None)).all():
+                standard_ids[exam_id] = standard_id
+    
+    for exam_id in exam_ids:
+        mode_counts = _mode_counts(question_rows[exam_id], exercise_rows[exam_id])
+        stats[exam_id]['mode_counts'] = mode_counts
+        stats[exam_id]['total_questions'] = sum(cnt for _, cnt in question_rows[exam_id])
+        stats[exam_id]['total_exercises'] = sum(cnt for _, cnt in exercise_rows[exam_id])
+    
+    # Estándares de competencia
+    if competency_standards is None and standard_ids:
+        from app.models.competency_standard import CompetencyStandard
+        unique_ids = list(set(standard_ids.values()))
+        by_id = {}
+        for chunk in _chunked(unique_ids):
+            for cs in CompetencyStandard.query.filter(CompetencyStandard.id.in_(chunk)).all():
+                by_id[cs.id] = cs
+        competency_standards = {exam_id: by_id.get(sid) for exam_id, sid in standard_ids.items()}
+    for exam_id, cs in (competency_standards or {}).items():
+        if cs is not None and exam_id in stats:
+            stats[exam_id]['competency_standard'] = {'id': cs.id, 'code': cs.code, 'name': cs.name}
+    
+    return stats
+
+
+def serialize_exams(exams, include_details=False):
+    """
+    Exam.to_dict() para una lista de exámenes con conteos por lote.
+    
+    Si los exámenes se cargaron con joinedload(Exam.competency_standard) se
+    reutiliza esa relación; si no, los estándares se cargan en una sola query.
+    """
+    exams = list(exams)
+    if not exams:
+        return []
+    if all('competency_standard' in exam.__dict__ for exam in exams):
+        standards = {exam.id: exam.competency_standard for exam in exams}
+    else:
+        from app.models.competency_standard import CompetencyStandard
+        standard_ids = list({exam.competency_standard_id for exam in exams if exam.competency_standard_id})
+        by_id = {}
+        for chunk in _chunked(standard_ids):
+            for cs in CompetencyStandard.query.filter(CompetencyStandard.id.in_(chunk)).all():
+                by_id[cs.id] = cs
+        standards = {exam.id: by_id.get(exam.competency_standard_id) for exam in exams}
+    stats = load_exam_stats([exam.id for exam in exams], competency_standards=standards)
+    return [exam.to_dict(include_details=include_details, _preloaded_stats=stats[exam.id]) for exam in exams]
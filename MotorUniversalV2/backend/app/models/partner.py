@@ -1094,7 +1094,10 @@ class GroupExam(db.Model):
             data['group'] = self.group.to_dict()
         
         if include_members and self.assignment_type == 'selected':
-            data['assigned_members'] = [m.to_dict() for m in self.assigned_members.all()]
+            from sqlalchemy.orm import joinedload
+            data['assigned_members'] = [
+                m.to_dict() for m in self.assigned_members.options(joinedload(GroupExamMember.user)).all()
+            ]
             
         if include_materials and self.exam:
             # Obtener materiales de estudio asociados al examen
@@ -1712,6 +1715,15 @@ class BulkUploadBatch(db.Model):
     # Nombre del archivo original
     original_filename = db.Column(db.String(300))
 
+    # Procesamiento en segundo plano: queued → processing → completed / failed
+    status = db.Column(db.String(20), default='queued', nullable=False)
+    total_rows = db.Column(db.Integer, default=0)  # Usuarios a crear (denominador del progreso)
+    processed_rows = db.Column(db.Integer, default=0)  # Usuarios ya insertados o descartados
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    error_message = db.Column(db.Text)
+    result_data = db.Column(db.Text)  # JSON: respuesta final de la carga (sin contraseñas)
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     validation_email_sent_at = db.Column(db.DateTime, nullable=True)  # Marca cuando se envió email de fin de validación CURPs
@@ -1727,6 +1739,13 @@ class BulkUploadBatch(db.Model):
         db.Index('ix_bulk_upload_batches_created', 'created_at'),
     )
 
+    @property
+    def progress_percentage(self):
+        """Porcentaje de progreso de la creación de usuarios"""
+        if not self.total_rows:
+            return 100.0 if self.status == 'completed' else 0
+        return round((self.processed_rows or 0) / self.total_rows * 100, 1)
+
     def to_dict(self, include_members=False):
         data = {
             'id': self.id,
@@ -1748,6 +1767,13 @@ class BulkUploadBatch(db.Model):
             'emails_sent': self.emails_sent,
             'emails_failed': self.emails_failed,
             'original_filename': self.original_filename,
+            'status': self.status,
+            'total_rows': self.total_rows or 0,
+            'processed_rows': self.processed_rows or 0,
+            'progress_percentage': self.progress_percentage,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'error_message': self.error_message,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
@@ -592,14 +592,18 @@ def upload_batch():
         from azure.storage.blob import BlobServiceClient as _BSC, ContentSettings as _CS
         from app.models.conocer_upload import ConocerUploadBatch
         from app.services.conocer_batch_processor import process_batch_background
+        from app.utils.zip_spool import open_zip, source_size
         
-        file_content = file.read()
+        # Werkzeug ya guarda uploads grandes en un temporal: se valida y se
+        # sube desde el stream, sin cargar el ZIP completo en memoria.
+        file_stream = file.stream
+        file_size = source_size(file_stream)
         
-        if len(file_content) == 0:
+        if file_size == 0:
             return jsonify({'error': 'El archivo está vacío'}), 400
 
         # Límite de tamaño (DoS protection)
-        if len(file_content) > MAX_CONOCER_UPLOAD_BYTES:
+        if file_size > MAX_CONOCER_UPLOAD_BYTES:
             return jsonify({
                 'error': f'El archivo supera el límite máximo de {MAX_CONOCER_UPLOAD_BYTES // (1024*1024)} MB'
             }), 413
@@ -611,13 +615,14 @@ def upload_batch():
             original_filename = file.filename
             zip_buffer = io.BytesIO()
             with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf_wrap:
-                zf_wrap.writestr(original_filename, file_content)
+                zf_wrap.writestr(original_filename, file_stream.read())
             file_content = zip_buffer.getvalue()
             all_files = [original_filename]
         else:
-            # Validar que es un ZIP válido
+            # Validar que es un ZIP válido (lee solo el directorio central)
             try:
-                zf_test = zipfile.ZipFile(io.BytesIO(file_content), 'r')
+                file_stream.seek(0)
+                zf_test = open_zip(file_stream)
                 all_files = [
                     n for n in zf_test.namelist()
                     if not n.endswith('/') and not n.startswith('__MACOSX')
@@ -627,6 +632,8 @@ def upload_batch():
                     return jsonify({'error': 'El archivo ZIP está vacío'}), 400
             except zipfile.BadZipFile:
                 return jsonify({'error': 'El archivo no es un ZIP válido'}), 400
+            file_stream.seek(0)
+            file_content = file_stream
         
         # Subir ZIP a blob temporal (para PDF individual ya está envuelto en ZIP)
         conn_str = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
@@ -637,6 +644,7 @@ def upload_batch():
         blob_client = bsc.get_blob_client(container=container_name, blob=blob_name)
         blob_client.upload_blob(
             file_content,
+            length=None if is_pdf else file_size,
             overwrite=True,
             content_settings=_CS(content_type='application/zip')
         )
@@ -27,9 +27,10 @@ from datetime import datetime, timedelta
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from sqlalchemy import or_, func
+from sqlalchemy.orm import joinedload
 
 from app import db
-from app.models.exam import Exam
+from app.models.exam import Exam, load_exam_stats
 from app.models.user import User
 from app.models.partner import (
     Partner, Campus, CandidateGroup, GroupMember, GroupExam, GroupExamMember
@@ -191,8 +192,14 @@ def _ensure_group_exam(group, exam):
     return ge
 
 
-def _exam_card_dict(exam):
-    """Versión recortada del examen para el catálogo público."""
+def _exam_card_dict(exam, total_questions=None):
+    """Versión recortada del examen para el catálogo público.
+
+    total_questions: conteo ya calculado en lote (list_catalog); si no se
+    pasa se consulta para este examen.
+    """
+    if total_questions is None:
+        total_questions = exam.get_total_questions()
     return {
         'id': exam.id,
         'title': exam.name,
@@ -207,7 +214,7 @@ def _exam_card_dict(exam):
             or (getattr(exam.competency_standard, 'info_sheet_url', None) if getattr(exam, 'competency_standard', None) else None)
         ),
         'time_limit_minutes': getattr(exam, 'duration_minutes', None),
-        'total_questions': exam.get_total_questions() if hasattr(exam, 'get_total_questions') else None,
+        'total_questions': total_questions,
     }
 
 
@@ -225,8 +232,12 @@ def list_catalog():
     if q:
         pattern = f'%{q}%'
         query = query.filter(or_(Exam.name.ilike(pattern), Exam.description.ilike(pattern)))
-    exams = query.order_by(Exam.name.asc()).all()
-    return jsonify({'exams': [_exam_card_dict(e) for e in exams]})
+    exams = query.options(joinedload(Exam.competency_standard)).order_by(Exam.name.asc()).all()
+    stats = load_exam_stats(
+        [e.id for e in exams],
+        competency_standards={e.id: e.competency_standard for e in exams}
+    )
+    return jsonify({'exams': [_exam_card_dict(e, stats[e.id]['total_questions']) for e in exams]})
 
 
 @bp.route('/catalog/<int:exam_id>', methods=['GET'])
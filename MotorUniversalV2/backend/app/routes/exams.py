@@ -7,7 +7,7 @@ from werkzeug.exceptions import HTTPException
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app import db
 from app.models.user import User
-from app.models.exam import Exam
+from app.models.exam import Exam, serialize_exams
 from app.models.category import Category
 from app.models.topic import Topic
 from app.models.question import Question, QuestionType
@@ -15,6 +15,10 @@ from app.models.answer import Answer
 from app.models.exercise import Exercise, ExerciseStep, ExerciseAction
 from app.utils.rate_limit import rate_limit_exams, rate_limit_evaluation, rate_limit_pdf, rate_limit
 from app.utils.cache_utils import invalidate_on_exam_complete
+from app.utils.text_similarity import text_similarity, batch_text_similarity, SIMILARITY_THRESHOLD
+from app.services.answer_key_service import (
+    get_answer_key, invalidate_answer_key, invalidate_answer_key_for_topic,
+)
 
 bp = Blueprint('exams', __name__)
 
@@ -363,7 +367,7 @@ def get_exams():
     )
     
     return jsonify({
-        'exams': [exam.to_dict() for exam in pagination.items],
+        'exams': serialize_exams(pagination.items),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': pagination.page
@@ -949,6 +953,7 @@ def delete_exam(exam_id):
         db.session.expire_all()
         db.session.execute(text('DELETE FROM dbo.exams WHERE id = :exam_id'), {'exam_id': exam_id})
         db.session.commit()
+        invalidate_answer_key(exam_id)
         
         return jsonify({'message': 'Examen eliminado exitosamente'}), 200
         
@@ -1006,6 +1011,7 @@ def create_category(exam_id):
     
     db.session.add(category)
     db.session.commit()
+    invalidate_answer_key(exam_id)
     
     return jsonify({
         'message': 'Categoría creada exitosamente',
@@ -1060,6 +1066,7 @@ def delete_category(exam_id, category_id):
         # 7. Finalmente eliminar la categoría
         db.session.delete(category)
         db.session.commit()
+        invalidate_answer_key(exam_id)
         
         return jsonify({
             'message': 'Categoría y todo su contenido eliminado exitosamente'
@@ -1107,6 +1114,7 @@ def update_category(exam_id, category_id):
     category.updated_by = user_id
     
     db.session.commit()
+    invalidate_answer_key(exam_id)
     
     return jsonify({
         'message': 'Categoría actualizada exitosamente',
@@ -1154,6 +1162,7 @@ def create_topic(category_id):
     
     db.session.add(topic)
     db.session.commit()
+    invalidate_answer_key(category.exam_id)
     
     return jsonify({
         'message': 'Tema creado exitosamente',
@@ -1191,6 +1200,7 @@ def update_topic(topic_id):
     # Forzar flush y commit
     db.session.flush()
     db.session.commit()
+    invalidate_answer_key_for_topic(topic_id)
     
     # Refrescar el objeto desde la base de datos
     db.session.refresh(topic)
@@ -1215,6 +1225,7 @@ def delete_topic(topic_id):
     topic, _user, err = _verify_topic_access(topic_id, edit=True)
     if err:
         return err
+    exam_id = topic.category.exam_id
     
     try:
         # 1. Eliminar respuestas de las preguntas (sin importar tipo exam/simulator)
@@ -1236,6 +1247,7 @@ def delete_topic(topic_id):
         # 5. Finalmente eliminar el tema
         db.session.delete(topic)
         db.session.commit()
+        invalidate_answer_key(exam_id)
         
         return jsonify({
             'message': 'Tema y todo su contenido eliminado exitosamente'
@@ -1321,6 +1333,7 @@ def create_question(topic_id):
             db.session.add(answer)
     
     db.session.commit()
+    invalidate_answer_key_for_topic(topic_id)
     
     return jsonify({
         'message': 'Pregunta creada exitosamente',
@@ -1359,6 +1372,7 @@ def update_question(question_id):
     question.updated_by = user_id
     
     db.session.commit()
+    invalidate_answer_key_for_topic(question.topic_id)
     
     return jsonify({
         'message': 'Pregunta actualizada exitosamente',
@@ -1405,8 +1419,10 @@ def delete_question(question_id):
         answers_deleted = Answer.query.filter_by(question_id=question.id).delete()
         
         # 2. Eliminar la pregunta
+        topic_id = question.topic_id
         db.session.delete(question)
         db.session.commit()
+        invalidate_answer_key_for_topic(topic_id)
         
         return jsonify({
             'message': 'Pregunta eliminada exitosamente',
@@ -1481,6 +1497,7 @@ def create_answer(question_id):
         
         db.session.add(answer)
         db.session.commit()
+        invalidate_answer_key_for_topic(question.topic_id)
         
         return jsonify({
             'message': 'Respuesta creada exitosamente',
@@ -1518,6 +1535,7 @@ def update_answer(answer_id):
     answer.updated_by = user_id
     
     db.session.commit()
+    invalidate_answer_key_for_topic(answer.question.topic_id)
     
     return jsonify({
         'message': 'Respuesta actualizada exitosamente',
@@ -1534,8 +1552,10 @@ def delete_answer(answer_id):
     if err:
         return err
     
+    topic_id = answer.question.topic_id
     db.session.delete(answer)
     db.session.commit()
+    invalidate_answer_key_for_topic(topic_id)
     
     return jsonify({'message': 'Respuesta eliminada exitosamente'}), 200
 
@@ -1612,6 +1632,7 @@ def create_exercise(topic_id):
     
     db.session.add(exercise)
     db.session.commit()
+    invalidate_answer_key_for_topic(topic_id)
     
     return jsonify({
         'message': 'Ejercicio creado exitosamente',
@@ -1648,6 +1669,7 @@ def update_exercise(exercise_id):
     exercise.updated_at = datetime.utcnow()
     
     db.session.commit()
+    invalidate_answer_key_for_topic(exercise.topic_id)
     
     return jsonify({
         'message': 'Ejercicio actualizado exitosamente',
@@ -1725,8 +1747,10 @@ def delete_exercise(exercise_id):
     log(f"✓ {len(steps)} pasos eliminados")
     
     # 3. Finalmente eliminar el ejercicio
+    topic_id = exercise.topic_id
     db.session.delete(exercise)
     db.session.commit()
+    invalidate_answer_key_for_topic(topic_id)
     
     log(f"\n{'='*50}")
     log(f"✅ RESUMEN DE ELIMINACIÓN:")
@@ -1853,6 +1877,7 @@ def create_exercise_step(exercise_id):
     
     db.session.add(step)
     db.session.commit()
+    invalidate_answer_key_for_topic(exercise.topic_id)
     
     print(f"✓ Paso creado exitosamente: ID={step_id}, Número={next_number}")
     print(f"=== FIN CREAR PASO ===")
@@ -1927,6 +1952,7 @@ def update_step(step_id):
     
     step.updated_at = datetime.utcnow()
     db.session.commit()
+    invalidate_answer_key_for_topic(step.exercise.topic_id)
     
     print(f"✓ Paso actualizado exitosamente: ID={step_id}, step_number={step.step_number}")
     print(f"=== FIN ACTUALIZAR PASO ===")
@@ -1957,6 +1983,7 @@ def delete_step(step_id):
     
     # Guardar info del paso antes de eliminarlo
     exercise_id = step.exercise_id
+    topic_id = step.exercise.topic_id
     deleted_step_number = step.step_number
     print(f"Eliminando paso #{deleted_step_number} del ejercicio {exercise_id}")
     
@@ -1997,6 +2024,7 @@ def delete_step(step_id):
         print(f"  Paso {remaining_step.id}: #{old_number} → #{remaining_step.step_number}")
     
     db.session.commit()
+    invalidate_answer_key_for_topic(topic_id)
     print(f"✓ Renumeración completada")
     print(f"=== FIN ELIMINAR PASO ===")
     
@@ -2091,6 +2119,7 @@ def create_step_action(step_id):
     
     db.session.add(action)
     db.session.commit()
+    invalidate_answer_key_for_topic(step.exercise.topic_id)
     
     print(f"✓ Acción creada exitosamente: ID={action_id}, Tipo={action_type}, Número={next_number}")
     print(f"=== FIN CREAR ACCIÓN ===")
@@ -2182,6 +2211,7 @@ def update_action(action_id):
     
     action.updated_at = datetime.utcnow()
     db.session.commit()
+    invalidate_answer_key_for_topic(action.step.exercise.topic_id)
     
     print(f"✓ Acción actualizada exitosamente: ID={action_id}")
     print(f"=== FIN ACTUALIZAR ACCIÓN ===")
@@ -2208,8 +2238,10 @@ def delete_action(action_id):
         return err
     
     print(f"Eliminando acción tipo '{action.action_type}' del paso {action.step_id}")
+    topic_id = action.step.exercise.topic_id
     db.session.delete(action)
     db.session.commit()
+    invalidate_answer_key_for_topic(topic_id)
     
     print(f"✓ Acción eliminada exitosamente")
     print(f"=== FIN ELIMINAR ACCIÓN ===")
@@ -2647,45 +2679,38 @@ def options_unpublish_exam(exam_id):
 def calculate_text_similarity(user_answer: str, correct_answer: str) -> float:
     """
     Calcula la similitud entre dos textos usando distancia de Levenshtein normalizada
+    (motor O(min(n, m)) de app.utils.text_similarity)
     """
-    if not user_answer or not correct_answer:
-        return 0.0
-    
-    # Normalizar textos
-    s1 = user_answer.lower().strip()
-    s2 = correct_answer.lower().strip()
+    return text_similarity(user_answer, correct_answer, max_input=_MAX_LEVENSHTEIN_INPUT)
 
-    # M8: cap a inputs para evitar DoS O(n*m) con strings enormes
-    if len(s1) > _MAX_LEVENSHTEIN_INPUT:
-        s1 = s1[:_MAX_LEVENSHTEIN_INPUT]
-    if len(s2) > _MAX_LEVENSHTEIN_INPUT:
-        s2 = s2[:_MAX_LEVENSHTEIN_INPUT]
 
-    if s1 == s2:
-        return 1.0
-    
-    # Calcular distancia de Levenshtein
-    len1, len2 = len(s1), len(s2)
-    
-    # Crear matriz de distancias
-    dp = [[0] * (len2 + 1) for _ in range(len1 + 1)]
-    
-    for i in range(len1 + 1):
-        dp[i][0] = i
-    for j in range(len2 + 1):
-        dp[0][j] = j
-    
-    for i in range(1, len1 + 1):
-        for j in range(1, len2 + 1):
-            if s1[i-1] == s2[j-1]:
-                dp[i][j] = dp[i-1][j-1]
-            else:
-                dp[i][j] = 1 + min(dp[i-1][j], dp[i][j-1], dp[i-1][j-1])
-    
-    distance = dp[len1][len2]
-    max_len = max(len1, len2)
-    
-    return 1.0 - (distance / max_len) if max_len > 0 else 1.0
+def _similarity_pairs(exercise_data: dict, exercise_responses: dict):
+    """Pares (respuesta, clave) de las acciones textbox en modo 'similarity'.
+
+    Replica las reglas de evaluate_exercise para que evaluate_exam pueda
+    calificarlos todos en una sola llamada a batch_text_similarity.
+    """
+    pairs = []
+    for step in exercise_data.get('steps', []):
+        for action in step.get('actions', []):
+            if action.get('action_type') not in ['textbox', 'text_input']:
+                continue
+            if action.get('scoring_mode', 'exact') != 'similarity':
+                continue
+            correct_answer = action.get('correct_answer', '')
+            if not (correct_answer and str(correct_answer).strip() != '' and str(correct_answer).lower().strip() != 'wrong'):
+                continue
+            user_response = exercise_responses.get(f"{step.get('id')}_{action.get('id')}")
+            if user_response is None:
+                user_response = ''
+            pairs.append(_similarity_key(user_response, correct_answer, action.get('is_case_sensitive', False)))
+    return pairs
+
+
+def _similarity_key(user_response, correct_answer, is_case_sensitive):
+    if is_case_sensitive:
+        return (str(user_response), str(correct_answer))
+    return (str(user_response).lower(), str(correct_answer).lower())
 
 
 def evaluate_question(question_data: dict, user_answer: any) -> dict:
@@ -2848,13 +2873,15 @@ def evaluate_question(question_data: dict, user_answer: any) -> dict:
     return result
 
 
-def evaluate_exercise(exercise_data: dict, exercise_responses: dict) -> dict:
+def evaluate_exercise(exercise_data: dict, exercise_responses: dict, similarity_scores: dict = None) -> dict:
     """
     Evalúa las respuestas de un ejercicio
     
     Args:
         exercise_data: Diccionario con datos del ejercicio (incluye steps y actions)
         exercise_responses: Dict con respuestas del usuario {stepId_actionId: value}
+        similarity_scores: Opcional, puntajes precalculados por batch_text_similarity
+            {(respuesta, clave): similitud}
     
     Returns:
         dict con resultados de evaluación por paso y acción
@@ -2964,13 +2991,14 @@ def evaluate_exercise(exercise_data: dict, exercise_responses: dict) -> dict:
                     
                 elif scoring_mode == 'similarity':
                     # Comparación por similitud
-                    if is_case_sensitive:
-                        similarity = calculate_text_similarity(str(user_response), str(correct_answer))
+                    pair = _similarity_key(user_response, correct_answer, is_case_sensitive)
+                    if similarity_scores and pair in similarity_scores:
+                        similarity = similarity_scores[pair]
                     else:
-                        similarity = calculate_text_similarity(str(user_response).lower(), str(correct_answer).lower())
+                        similarity = calculate_text_similarity(*pair)
                     
                     # Consideramos correcto si la similitud es >= 80%
-                    action_result['is_correct'] = similarity >= 0.8
+                    action_result['is_correct'] = similarity >= SIMILARITY_THRESHOLD
                     action_result['score'] = similarity
                     action_result['similarity'] = round(similarity * 100, 1)
                 
@@ -3047,6 +3075,23 @@ def evaluate_exam(exam_id):
         question_results = []
         exercise_results = []
         
+        # Clave de respuestas del examen: todo el árbol calificable en un
+        # número fijo de queries, cacheado por generación (ver answer_key_service).
+        answer_key = get_answer_key(exam_id)
+        key_questions = answer_key['questions']
+        key_exercises = answer_key['exercises']
+        
+        # Todas las acciones textbox por similitud del envío en una sola llamada
+        similarity_pairs = []
+        for item in items:
+            if item.get('type') == 'exercise':
+                exercise_id = str(item.get('exercise_id') or item.get('id'))
+                if exercise_id in key_exercises:
+                    similarity_pairs.extend(_similarity_pairs(
+                        key_exercises[exercise_id], exercise_responses.get(exercise_id, {})
+                    ))
+        similarity_scores = batch_text_similarity(similarity_pairs, max_input=_MAX_LEVENSHTEIN_INPUT)
+        
         for item in items:
             if item.get('type') == 'question':
                 question_id = str(item.get('question_id') or item.get('id'))
@@ -3056,9 +3101,13 @@ def evaluate_exam(exam_id):
                 category_name = item.get('category_name', 'Sin categoría')
                 topic_name = item.get('topic_name', 'Sin tema')
                 
-                question = Question.query.get(question_id)
-                if question:
-                    question_data = question.to_dict(include_answers=True, include_correct=True)
+                question_data = key_questions.get(question_id)
+                if question_data is None:
+                    # Pregunta fuera del snapshot (p. ej. de otro examen): consulta puntual
+                    question = Question.query.get(question_id)
+                    if question:
+                        question_data = question.to_dict(include_answers=True, include_correct=True)
+                if question_data is not None:
                     result = evaluate_question(question_data, user_answer)
                     # Agregar categoría y tema al resultado
                     result['category_name'] = category_name
@@ -3089,15 +3138,17 @@ def evaluate_exam(exam_id):
                 category_name = item.get('category_name', 'Sin categoría')
                 topic_name = item.get('topic_name', 'Sin tema')
                 
-                # Obtener ejercicio de la BD con pasos y acciones
-                exercise = Exercise.query.get(exercise_id)
-                if exercise:
-                    exercise_data = exercise.to_dict(include_steps=True)
-                else:
-                    # Usar datos del item
-                    exercise_data = item
+                # Obtener ejercicio con pasos y acciones (snapshot → BD → item)
+                exercise_data = key_exercises.get(exercise_id)
+                if exercise_data is None:
+                    exercise = Exercise.query.get(exercise_id)
+                    if exercise:
+                        exercise_data = exercise.to_dict(include_steps=True)
+                    else:
+                        # Usar datos del item
+                        exercise_data = item
                 
-                result = evaluate_exercise(exercise_data, ex_responses)
+                result = evaluate_exercise(exercise_data, ex_responses, similarity_scores)
                 # Agregar categoría y tema al resultado
                 result['category_name'] = category_name
                 result['topic_name'] = topic_name
@@ -3122,13 +3173,8 @@ def evaluate_exam(exam_id):
         evaluation_breakdown = {}
         
         # Obtener porcentajes de categorías y temas del examen
-        category_percentages = {}
-        topic_percentages = {}
-        for category in exam.categories:
-            category_percentages[category.name] = category.percentage or 0
-            for topic in category.topics:
-                topic_key = f"{category.name}|{topic.name}"
-                topic_percentages[topic_key] = topic.percentage or 0
+        category_percentages = answer_key['category_percentages']
+        topic_percentages = answer_key['topic_percentages']
         
         print(f"  📊 Porcentajes de categorías: {category_percentages}")
         print(f"  📊 Porcentajes de temas: {topic_percentages}")
@@ -3273,7 +3319,10 @@ def check_exam_access(exam_id):
     """
     try:
         from app.models.result import Result
-        from app.models.partner import GroupExam, GroupMember, CandidateGroup, EcmRetake
+        from app.models.partner import EcmRetake
+        from app.services.candidate_access import (
+            certification_payment_statuses, certification_terms, get_group_exam_terms,
+        )
         
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
@@ -3284,9 +3333,11 @@ def check_exam_access(exam_id):
         if not group_exam_id:
             return jsonify({'error': 'Se requiere group_exam_id (geid)'}), 400
         
-        group_exam = GroupExam.query.get(group_exam_id)
-        if not group_exam:
+        # Asignación + grupo + plantel en una sola query
+        terms = get_group_exam_terms(group_exam_id)
+        if not terms:
             return jsonify({'error': 'Asignación de examen no encontrada'}), 404
+        group_exam, group, campus = terms
         
         if group_exam.exam_id != exam_id:
             return jsonify({'error': 'El examen no corresponde a la asignación'}), 400
@@ -3330,30 +3381,23 @@ def check_exam_access(exam_id):
         ).first() is not None
         
         # Calcular precio de retoma (group override → campus → 0)
-        group = CandidateGroup.query.get(group_exam.group_id)
         retake_cost = 0.0
         if group:
             if group.retake_cost_override is not None:
                 retake_cost = float(group.retake_cost_override)
-            elif group.campus_id:
-                from app.models.partner import Campus
-                campus = Campus.query.get(group.campus_id)
-                if campus and campus.retake_cost is not None:
-                    retake_cost = float(campus.retake_cost)
+            elif campus and campus.retake_cost is not None:
+                retake_cost = float(campus.retake_cost)
         
         # Determinar si se requiere PIN:
         # 1) PIN específico de la asignación (GroupExam.require_security_pin + security_pin)
         # 2) PIN diario del campus/grupo (Campus.require_exam_pin o CandidateGroup.require_exam_pin_override)
         pin_required = bool(group_exam.require_security_pin and group_exam.security_pin)
         if not pin_required:
-            from app.models.partner import Campus
             campus_pin = False
             if group and group.require_exam_pin_override is not None:
                 campus_pin = bool(group.require_exam_pin_override)
-            elif group and group.campus_id:
-                campus_obj = Campus.query.get(group.campus_id)
-                if campus_obj:
-                    campus_pin = bool(campus_obj.require_exam_pin)
+            elif group and campus:
+                campus_pin = bool(campus.require_exam_pin)
             pin_required = campus_pin
 
         # Determinar si requiere pago en línea
@@ -3364,35 +3408,21 @@ def check_exam_access(exam_id):
         payment_status = None
 
         if group:
-            from app.models.partner import Campus
-            from app.models.payment import Payment
-            campus_pay = Campus.query.get(group.campus_id) if group.campus_id else None
-            payments_enabled = group.enable_online_payments_override if group.enable_online_payments_override is not None else (campus_pay.enable_online_payments if campus_pay else False)
+            payments_enabled, cost = certification_terms(group, campus)
 
             if payments_enabled:
-                certification_cost = float(group.certification_cost_override or (campus_pay.certification_cost if campus_pay else 0) or 0)
+                certification_cost = cost
                 requires_payment = certification_cost > 0
 
                 if requires_payment:
-                    # Buscar pago aprobado de certificación
-                    approved_pay = Payment.query.filter_by(
-                        user_id=str(user_id),
-                        group_exam_id=group_exam_id,
-                        payment_type='certification',
-                        status='approved'
-                    ).first()
-                    is_paid = approved_pay is not None
-
-                    if not approved_pay:
-                        # Buscar pago pendiente
-                        pending_pay = Payment.query.filter(
-                            Payment.user_id == str(user_id),
-                            Payment.group_exam_id == group_exam_id,
-                            Payment.payment_type == 'certification',
-                            Payment.status.in_(['pending', 'processing'])
-                        ).first()
-                        if pending_pay:
-                            payment_status = pending_pay.status
+                    statuses = certification_payment_statuses(user_id, group_exam_id).get(group_exam_id, [])
+                    is_paid = 'approved' in statuses
+
+                    if not is_paid:
+                        # Pago pendiente
+                        payment_status = next(
+                            (st for st in statuses if st in ('pending', 'processing')), None
+                        )
 
                 # Retomas con pago
                 if attempts_exhausted and retake_cost > 0:
@@ -3550,7 +3580,9 @@ def save_exam_result(exam_id):
         # usamos el tiempo real transcurrido (no confiamos en el reloj del cliente).
         try:
             from app.models.exam_progress import ExamProgress as _EP
+            from app.services.exam_progress_store import flush_progress
             from datetime import datetime as _dt2
+            flush_progress(user_id, exam_id)  # el borrador pendiente en Redis llega a la BD
             _prog = _EP.query.filter_by(user_id=str(user_id), exam_id=exam_id).first()
             if _prog and _prog.started_at:
                 server_elapsed = int((_dt2.utcnow() - _prog.started_at).total_seconds())
@@ -3881,12 +3913,11 @@ def options_save_exam_result(exam_id):
 @jwt_required()
 def get_exam_progress(exam_id):
     """Devuelve el borrador de progreso del usuario para este examen (si existe)."""
-    from app.models.exam_progress import ExamProgress
+    from app.services.exam_progress_store import get_progress
     user_id = get_jwt_identity()
     from datetime import datetime as _dt
-    p = ExamProgress.query.filter_by(user_id=str(user_id), exam_id=exam_id).first()
     return jsonify({
-        'progress': p.to_dict() if p else None,
+        'progress': get_progress(user_id, exam_id),
         'server_now': _dt.utcnow().isoformat(),
     }), 200
 
@@ -3895,31 +3926,14 @@ def get_exam_progress(exam_id):
 @jwt_required()
 @rate_limit(limit=120, window=60, key_prefix='rl_exam_progress')
 def save_exam_progress(exam_id):
-    """Guarda/actualiza el borrador de progreso (uno por usuario+examen)."""
-    from app.models.exam_progress import ExamProgress
-    from datetime import datetime as _dt
-    import uuid as _uuid
+    """Guarda/actualiza el borrador de progreso (uno por usuario+examen).
+    Va primero a Redis; la BD se actualiza con debounce (ver exam_progress_store)."""
+    from app.services.exam_progress_store import save_progress
     user_id = get_jwt_identity()
     data = request.get_json(silent=True) or {}
-    attempt_id = data.get('attempt_id')
-    payload = data.get('data')
     try:
-        now = _dt.utcnow()
-        p = ExamProgress.query.filter_by(user_id=str(user_id), exam_id=exam_id).first()
-        if p:
-            p.attempt_id = attempt_id
-            p.data = payload
-            p.updated_at = now
-            if p.started_at is None:
-                p.started_at = now  # anclar inicio si no estaba
-        else:
-            p = ExamProgress(
-                id=str(_uuid.uuid4()), user_id=str(user_id), exam_id=exam_id,
-                attempt_id=attempt_id, data=payload, started_at=now, updated_at=now
-            )
-            db.session.add(p)
-        db.session.commit()
-        return jsonify({'message': 'ok'}), 200
+        saved = save_progress(user_id, exam_id, data.get('attempt_id'), data.get('data'))
+        return jsonify({'message': 'ok', 'version': saved['version']}), 200
     except Exception as e:
         db.session.rollback()
         return _internal_error(e, 'save_exam_progress')
@@ -3929,13 +3943,8 @@ def save_exam_progress(exam_id):
 @jwt_required()
 def delete_exam_progress(exam_id):
     """Elimina el borrador de progreso (al entregar el examen)."""
-    from app.models.exam_progress import ExamProgress
-    user_id = get_jwt_identity()
-    try:
-        ExamProgress.query.filter_by(user_id=str(user_id), exam_id=exam_id).delete()
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
+    from app.services.exam_progress_store import delete_progress
+    delete_progress(get_jwt_identity(), exam_id)
     return jsonify({'message': 'ok'}), 200
 
 
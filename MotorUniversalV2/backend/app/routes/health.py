@@ -2,6 +2,7 @@
 Rutas de health check
 """
 from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.exceptions import HTTPException
 from sqlalchemy import text
 from app import db
@@ -105,3 +106,24 @@ def server_time():
         'utc': now.isoformat() + 'Z',
         'timestamp': int((now - datetime(1970, 1, 1)).total_seconds()),
     }), 200
+
+
+@bp.route('/health/cache-stats', methods=['GET'])
+@jwt_required()
+def cache_stats():
+    """
+    Contadores del cache de respuestas de dos niveles (solo admin/developer).
+    Los valores son del worker que atiende el request.
+    """
+    import os
+    from app.models.user import User
+    from app.utils.cache_utils import get_cache_stats
+
+    user = User.query.get(get_jwt_identity())
+    if not user or user.role not in ['admin', 'developer']:
+        return jsonify({'error': 'Se requiere rol de administrador'}), 403
+
+    stats = get_cache_stats()
+    stats['pid'] = os.getpid()
+    stats['timestamp'] = datetime.utcnow().isoformat()
+    return jsonify(stats), 200
@@ -435,6 +435,19 @@ def _resolve_billing_coordinator_id(group, current_user):
     }), 403)
 
 
+def _ecm_already_assigned_detail(uid, eca, user_obj):
+    """Detalle de un candidato que ya tenía el ECM (se omite del cobro)."""
+    return {
+        'user_id': uid,
+        'user_name': user_obj.full_name if user_obj else uid,
+        'user_email': user_obj.email if user_obj else '',
+        'user_curp': user_obj.curp if user_obj else '',
+        'assignment_number': eca.assignment_number,
+        'assigned_at': eca.assigned_at.isoformat() if eca.assigned_at else None,
+        'original_group': eca.group_name,
+    }
+
+
 # ============== PARTNERS ==============
 
 @bp.route('', methods=['GET'])
@@ -6224,7 +6237,12 @@ def assign_exam_to_group(group_id):
         from app.models import GroupExam, GroupExamMaterial, Exam
         from app.models.partner import GroupExamMember
         from app.models.study_content import StudyMaterial
-        
+        from app.services.bulk_assignment_service import (
+            add_exam_members, assignment_unit_cost, assignment_validity_months,
+            create_ecm_assignments, debit_assignments, group_member_user_ids,
+            plan_ecm_assignments,
+        )
+
         group, error = _verify_group_access(group_id, g.current_user)
         if error:
             return error
@@ -6303,32 +6321,21 @@ def assign_exam_to_group(group_id):
                 
                 # Calcular vigencia para la reactivación
                 r_campus = Campus.query.get(group.campus_id)
-                if group.assignment_validity_months_override is not None:
-                    r_validity_months = group.assignment_validity_months_override
-                elif r_campus and r_campus.assignment_validity_months:
-                    r_validity_months = r_campus.assignment_validity_months
-                else:
-                    r_validity_months = 12
-                
+                r_validity_months = assignment_validity_months(group, r_campus)
+
                 from dateutil.relativedelta import relativedelta
                 r_assigned_at_now = datetime.utcnow()
                 existing.assigned_at = r_assigned_at_now
                 existing.validity_months = r_validity_months
                 existing.expires_at = r_assigned_at_now + relativedelta(months=r_validity_months)
                 existing.extended_months = 0  # Reset extensions on reactivation
-                
+
                 # Si es tipo 'selected', agregar miembros
                 if assignment_type == 'selected':
                     # Limpiar miembros anteriores
                     GroupExamMember.query.filter_by(group_exam_id=existing.id).delete()
-                    
-                    for user_id in member_ids:
-                        member = GroupExamMember(
-                            group_exam_id=existing.id,
-                            user_id=user_id
-                        )
-                        db.session.add(member)
-                
+                    add_exam_members(existing.id, member_ids, existing=set())
+
                 # Si se enviaron materiales personalizados, guardarlos
                 material_ids = data.get('material_ids')
                 if material_ids is not None:
@@ -6349,32 +6356,18 @@ def assign_exam_to_group(group_id):
                 r_ecm_id = exam.competency_standard_id
                 
                 if r_ecm_id:
-                    from app.models.partner import EcmCandidateAssignment
-                    
                     if assignment_type == 'selected':
                         r_target_ids = member_ids
                     else:
-                        r_target_ids = [m.user_id for m in group.members.all()]
-                    
-                    for uid in r_target_ids:
-                        existing_ecm = EcmCandidateAssignment.query.filter_by(
-                            user_id=uid,
-                            competency_standard_id=r_ecm_id
-                        ).first()
-                        
-                        if existing_ecm:
-                            user_obj = User.query.get(uid)
-                            r_already_assigned.append({
-                                'user_id': uid,
-                                'user_name': user_obj.full_name if user_obj else uid,
-                                'user_email': user_obj.email if user_obj else '',
-                                'user_curp': user_obj.curp if user_obj else '',
-                                'assignment_number': existing_ecm.assignment_number,
-                                'assigned_at': existing_ecm.assigned_at.isoformat() if existing_ecm.assigned_at else None,
-                                'original_group': existing_ecm.group_name,
-                            })
-                        else:
-                            r_new_ecm_user_ids.append(uid)
+                        r_target_ids = group_member_user_ids(group_id)
+
+                    # Diff de ECA existentes en una query (con datos del usuario)
+                    r_plan = plan_ecm_assignments(r_target_ids, r_ecm_id)
+                    r_already_assigned = [
+                        _ecm_already_assigned_detail(uid, eca, user_obj)
+                        for uid, eca, user_obj in r_plan.already_assigned
+                    ]
+                    r_new_ecm_user_ids = r_plan.new_user_ids
                 else:
                     # H4: Sin ECM, evitar doble-cobro en reactivaci\u00f3n.
                     # Si ya hubo un debit previo asociado a este group_exam
@@ -6392,22 +6385,16 @@ def assign_exam_to_group(group_id):
                     elif assignment_type == 'selected':
                         r_new_ecm_user_ids = member_ids
                     else:
-                        r_new_ecm_user_ids = [m.user_id for m in group.members.all()]
-                
+                        r_new_ecm_user_ids = group_member_user_ids(group_id)
+
                 # ========== VERIFICACIÓN Y DEDUCCIÓN DE SALDO (Reactivación) ==========
                 # Solo cobrar por candidatos que NO tienen ya el ECM asignado
                 # Admins y developers no requieren verificación de saldo
                 user_role = g.current_user.role if hasattr(g.current_user, 'role') else ''
                 is_admin_or_dev = user_role in ('admin', 'developer')
-                
-                campus = Campus.query.get(group.campus_id)
-                if group.certification_cost_override is not None:
-                    r_unit_cost = float(group.certification_cost_override)
-                elif campus and campus.certification_cost is not None:
-                    r_unit_cost = float(campus.certification_cost)
-                else:
-                    r_unit_cost = 0.0
-                
+
+                r_unit_cost = assignment_unit_cost(group, r_campus, require_custom_config=False)
+
                 r_billable_count = len(r_new_ecm_user_ids)
                 r_total_cost = r_unit_cost * r_billable_count
                 
@@ -6422,13 +6409,19 @@ def assign_exam_to_group(group_id):
                             'error': 'El plantel no tiene coordinador asignado para procesar el cobro',
                             'error_type': 'no_coordinator'
                         }), 400
-                    balance = CoordinatorBalance.query.filter_by(
-                        coordinator_id=coordinator_id,
-                        campus_id=group.campus_id
-                    ).with_for_update().first()
-                    current_bal = float(balance.current_balance) if balance else 0.0
-                    
-                    if current_bal < r_total_cost:
+                    exam_name = exam.name if exam else f'Examen #{exam_id}'
+                    skipped_note = f' ({len(r_already_assigned)} omitido(s) por ya tener ECM)' if r_already_assigned else ''
+                    notes = f'Reasignación de "{exam_name}" a grupo "{group.name}" - {r_billable_count} unidad(es) x ${r_unit_cost:,.2f}{skipped_note}'
+
+                    debited, current_bal = debit_assignments(
+                        coordinator_id, group.campus_id, r_total_cost,
+                        group_id=group_id,
+                        group_exam_id=existing.id,
+                        notes=notes,
+                        created_by_id=g.current_user.id,
+                        payment_source=_payment_source
+                    )
+                    if not debited:
                         db.session.rollback()
                         return jsonify({
                             'error': f'Saldo insuficiente para este plantel. Necesitas ${r_total_cost:,.2f} pero el saldo del coordinador es ${current_bal:,.2f}',
@@ -6439,45 +6432,22 @@ def assign_exam_to_group(group_id):
                             'already_assigned_count': len(r_already_assigned),
                             'billable_count': r_billable_count
                         }), 400
-                    
-                    exam_name = exam.name if exam else f'Examen #{exam_id}'
-                    skipped_note = f' ({len(r_already_assigned)} omitido(s) por ya tener ECM)' if r_already_assigned else ''
-                    notes = f'Reasignación de "{exam_name}" a grupo "{group.name}" - {r_billable_count} unidad(es) x ${r_unit_cost:,.2f}{skipped_note}'
-                    
-                    create_balance_transaction(
-                        coordinator_id=coordinator_id,
-                        campus_id=group.campus_id,
-                        transaction_type='debit',
-                        concept='asignacion_certificacion',
-                        amount=r_total_cost,
-                        group_id=group_id,
-                        reference_type='group_exam',
-                        reference_id=existing.id,
-                        notes=notes,
-                        created_by_id=g.current_user.id,
-                        payment_source=_payment_source
-                    )
-                
-                # Crear EcmCandidateAssignment para los nuevos
+
+                # Crear EcmCandidateAssignment para los nuevos (un solo INSERT executemany)
                 if r_ecm_id:
-                    for uid in r_new_ecm_user_ids:
-                        new_ecm = EcmCandidateAssignment(
-                            assignment_number=EcmCandidateAssignment.generate_assignment_number(),
-                            user_id=uid,
-                            competency_standard_id=r_ecm_id,
-                            exam_id=exam_id,
-                            campus_id=group.campus_id,
-                            group_id=group_id,
-                            group_name=group.name,
-                            group_exam_id=existing.id,
-                            assigned_by_id=g.current_user.id,
-                            assignment_source='selected' if assignment_type == 'selected' else 'bulk',
-                            validity_months=r_validity_months,
-                            assigned_at=r_assigned_at_now,
-                            expires_at=r_assigned_at_now + relativedelta(months=r_validity_months),
-                        )
-                        db.session.add(new_ecm)
-                
+                    create_ecm_assignments(
+                        r_new_ecm_user_ids,
+                        ecm_id=r_ecm_id,
+                        exam_id=exam.id,
+                        group=group,
+                        group_exam_id=existing.id,
+                        assigned_by_id=g.current_user.id,
+                        source='selected' if assignment_type == 'selected' else 'bulk',
+                        validity_months=r_validity_months,
+                        assigned_at=r_assigned_at_now,
+                        expires_at=existing.expires_at,
+                    )
+
                 db.session.commit()
                 
                 # Obtener materiales asociados
@@ -6512,13 +6482,8 @@ def assign_exam_to_group(group_id):
         
         # Calcular vigencia de la asignación
         campus = Campus.query.get(group.campus_id)
-        if group.assignment_validity_months_override is not None:
-            validity_months = group.assignment_validity_months_override
-        elif campus and campus.assignment_validity_months:
-            validity_months = campus.assignment_validity_months
-        else:
-            validity_months = 12
-        
+        validity_months = assignment_validity_months(group, campus)
+
         from dateutil.relativedelta import relativedelta
         assigned_at_now = datetime.utcnow()
         expires_at = assigned_at_now + relativedelta(months=validity_months)
@@ -6552,13 +6517,8 @@ def assign_exam_to_group(group_id):
         
         # Si es tipo 'selected', agregar miembros específicos
         if assignment_type == 'selected':
-            for user_id in member_ids:
-                member = GroupExamMember(
-                    group_exam_id=group_exam.id,
-                    user_id=user_id
-                )
-                db.session.add(member)
-        
+            add_exam_members(group_exam.id, member_ids, existing=set())
+
         # Si se enviaron materiales personalizados, guardarlos
         if material_ids is not None:
             for material_id in material_ids:
@@ -6574,53 +6534,34 @@ def assign_exam_to_group(group_id):
         new_assignments = []
         ecm_id = exam.competency_standard_id
         new_ecm_user_ids = []
-        
+        plan = None
+
         # Determinar lista de user_ids afectados
         if assignment_type == 'selected':
             target_user_ids = member_ids
         else:
-            target_user_ids = [m.user_id for m in group.members.all()]
-        
+            target_user_ids = group_member_user_ids(group_id)
+
         if ecm_id:
-            from app.models.partner import EcmCandidateAssignment
-            
-            for uid in target_user_ids:
-                existing_assignment = EcmCandidateAssignment.query.filter_by(
-                    user_id=uid,
-                    competency_standard_id=ecm_id
-                ).first()
-                
-                if existing_assignment:
-                    user_obj = User.query.get(uid)
-                    already_assigned.append({
-                        'user_id': uid,
-                        'user_name': user_obj.full_name if user_obj else uid,
-                        'user_email': user_obj.email if user_obj else '',
-                        'user_curp': user_obj.curp if user_obj else '',
-                        'assignment_number': existing_assignment.assignment_number,
-                        'assigned_at': existing_assignment.assigned_at.isoformat() if existing_assignment.assigned_at else None,
-                        'original_group': existing_assignment.group_name,
-                    })
-                else:
-                    new_ecm_user_ids.append(uid)
+            # Diff de ECA existentes en una query (con datos del usuario)
+            plan = plan_ecm_assignments(target_user_ids, ecm_id)
+            already_assigned = [
+                _ecm_already_assigned_detail(uid, eca, user_obj)
+                for uid, eca, user_obj in plan.already_assigned
+            ]
+            new_ecm_user_ids = plan.new_user_ids
         else:
             # Sin ECM, todos son "nuevos" para el cobro
             new_ecm_user_ids = target_user_ids
-        
+
         # ========== VERIFICACIÓN Y DEDUCCIÓN DE SALDO ==========
         # Solo cobrar por candidatos que NO tienen ya el ECM asignado
         # Admins y developers no requieren verificación de saldo
         user_role = g.current_user.role if hasattr(g.current_user, 'role') else ''
         is_admin_or_dev = user_role in ('admin', 'developer')
-        
-        campus = Campus.query.get(group.campus_id)
-        if group.certification_cost_override is not None and group.use_custom_config:
-            unit_cost = float(group.certification_cost_override)
-        elif campus and campus.certification_cost is not None:
-            unit_cost = float(campus.certification_cost)
-        else:
-            unit_cost = 0.0
-        
+
+        unit_cost = assignment_unit_cost(group, campus)
+
         billable_count = len(new_ecm_user_ids)
         total_cost = unit_cost * billable_count
         
@@ -6642,13 +6583,20 @@ def assign_exam_to_group(group_id):
                     'error_type': 'no_coordinator'
                 }), 400
 
-            balance = CoordinatorBalance.query.filter_by(
-                coordinator_id=coordinator_id,
-                campus_id=group.campus_id
-            ).with_for_update().first()
-            current_balance = float(balance.current_balance) if balance else 0.0
+            # Deducir saldo y crear transacción (un solo débito por el lote)
+            exam_name = exam.name if exam else f'Examen #{exam_id}'
+            skipped_note = f' ({len(already_assigned)} omitido(s) por ya tener ECM)' if already_assigned else ''
+            notes = f'Asignación de "{exam_name}" a grupo "{group.name}" - {billable_count} unidad(es) x ${unit_cost:,.2f}{skipped_note}'
 
-            if current_balance < total_cost:
+            debited, current_balance = debit_assignments(
+                coordinator_id, group.campus_id, total_cost,
+                group_id=group_id,
+                group_exam_id=group_exam.id,
+                notes=notes,
+                created_by_id=g.current_user.id,
+                payment_source=_payment_source
+            )
+            if not debited:
                 db.session.rollback()
                 return jsonify({
                     'error': f'Saldo insuficiente para este plantel. Necesitas ${total_cost:,.2f} pero el saldo del coordinador es ${current_balance:,.2f}',
@@ -6660,62 +6608,38 @@ def assign_exam_to_group(group_id):
                     'billable_count': billable_count
                 }), 400
 
-            # Deducir saldo y crear transacción
-            exam_name = exam.name if exam else f'Examen #{exam_id}'
-            skipped_note = f' ({len(already_assigned)} omitido(s) por ya tener ECM)' if already_assigned else ''
-            notes = f'Asignación de "{exam_name}" a grupo "{group.name}" - {billable_count} unidad(es) x ${unit_cost:,.2f}{skipped_note}'
-
-            create_balance_transaction(
-                coordinator_id=coordinator_id,
-                campus_id=group.campus_id,
-                transaction_type='debit',
-                concept='asignacion_certificacion',
-                amount=total_cost,
-                group_id=group_id,
-                reference_type='group_exam',
-                reference_id=group_exam.id,
-                notes=notes,
-                created_by_id=g.current_user.id,
-                payment_source=_payment_source
-            )
-        
-        # Crear EcmCandidateAssignment para los nuevos
+        # Crear EcmCandidateAssignment para los nuevos (un solo INSERT executemany)
         if ecm_id:
-            for uid in new_ecm_user_ids:
-                new_ecm = EcmCandidateAssignment(
-                    assignment_number=EcmCandidateAssignment.generate_assignment_number(),
-                    user_id=uid,
-                    competency_standard_id=ecm_id,
-                    exam_id=exam_id,
-                    campus_id=group.campus_id,
-                    group_id=group_id,
-                    group_name=group.name,
-                    group_exam_id=group_exam.id,
-                    assigned_by_id=g.current_user.id,
-                    assignment_source='selected' if assignment_type == 'selected' else 'bulk',
-                    validity_months=validity_months,
-                    assigned_at=assigned_at_now,
-                    expires_at=expires_at,
-                )
-                db.session.add(new_ecm)
-                new_assignments.append(new_ecm)
-        
-        db.session.commit()
-        
-        # Build detailed list of new ECM assignments
+            new_assignments = create_ecm_assignments(
+                new_ecm_user_ids,
+                ecm_id=ecm_id,
+                exam_id=exam.id,
+                group=group,
+                group_exam_id=group_exam.id,
+                assigned_by_id=g.current_user.id,
+                source='selected' if assignment_type == 'selected' else 'bulk',
+                validity_months=validity_months,
+                assigned_at=assigned_at_now,
+                expires_at=expires_at,
+            )
+
+        # Build detailed list of new ECM assignments (antes del commit: los
+        # usuarios del plan expiran al confirmar la transacción)
         new_assignments_detail = []
         for ecm_assign in new_assignments:
-            user_obj = User.query.get(ecm_assign.user_id)
+            user_obj = plan.users.get(ecm_assign['user_id'])
             new_assignments_detail.append({
-                'user_id': str(ecm_assign.user_id),
-                'user_name': user_obj.full_name if user_obj else str(ecm_assign.user_id),
+                'user_id': ecm_assign['user_id'],
+                'user_name': user_obj.full_name if user_obj else ecm_assign['user_id'],
                 'user_email': user_obj.email if user_obj else '',
                 'user_curp': user_obj.curp if user_obj else '',
-                'assignment_number': ecm_assign.assignment_number,
-                'assigned_at': ecm_assign.assigned_at.isoformat() if ecm_assign.assigned_at else None,
+                'assignment_number': ecm_assign['assignment_number'],
+                'assigned_at': ecm_assign['assigned_at'].isoformat(),
                 'exam_name': exam.name if exam else '',
                 'group_name': group.name,
             })
+
+        db.session.commit()
         
         # Obtener materiales asociados al examen
         materials = StudyMaterial.query.filter_by(exam_id=exam_id, is_published=True).all()
@@ -6919,51 +6843,34 @@ def add_members_to_exam(group_id, exam_id):
         if _err:
             return _err
         from app.models import GroupExam
-        from app.models.partner import GroupExamMember
-        
+        from app.services.bulk_assignment_service import (
+            add_exam_members, existing_exam_member_ids, group_member_user_ids,
+        )
+
         group_exam = GroupExam.query.filter_by(
             group_id=group_id,
             exam_id=exam_id,
             is_active=True
         ).first_or_404()
-        
+
         data = request.get_json()
         user_ids_to_add = data.get('user_ids', [])
-        
+
         if not user_ids_to_add:
             return jsonify({'error': 'Debes proporcionar user_ids a agregar'}), 400
-        
+
+        # Miembros actuales del examen en una sola query
+        existing_gem_user_ids = existing_exam_member_ids(group_exam.id)
+
         # Cambiar a 'selected' si era 'all'
         if group_exam.assignment_type == 'all':
             # Si era 'all', primero agregar todos los miembros actuales
-            group_members = GroupMember.query.filter_by(group_id=group_id).all()
-            for gm in group_members:
-                existing = GroupExamMember.query.filter_by(
-                    group_exam_id=group_exam.id,
-                    user_id=gm.user_id
-                ).first()
-                if not existing:
-                    member = GroupExamMember(
-                        group_exam_id=group_exam.id,
-                        user_id=gm.user_id
-                    )
-                    db.session.add(member)
+            add_exam_members(group_exam.id, group_member_user_ids(group_id),
+                             existing=existing_gem_user_ids)
             group_exam.assignment_type = 'selected'
-        
-        added = []
-        for user_id in user_ids_to_add:
-            existing = GroupExamMember.query.filter_by(
-                group_exam_id=group_exam.id,
-                user_id=user_id
-            ).first()
-            if not existing:
-                member = GroupExamMember(
-                    group_exam_id=group_exam.id,
-                    user_id=user_id
-                )
-                db.session.add(member)
-                added.append(user_id)
-        
+
+        added = add_exam_members(group_exam.id, user_ids_to_add, existing=existing_gem_user_ids)
+
         db.session.commit()
         
         return jsonify({
@@ -6997,7 +6904,11 @@ def add_assignments_to_exam(group_id, exam_id):
     """
     try:
         from app.models import GroupExam, Exam
-        from app.models.partner import GroupExamMember, EcmCandidateAssignment
+        from app.services.bulk_assignment_service import (
+            add_exam_members, assignment_unit_cost, assignment_validity_months,
+            create_ecm_assignments, debit_assignments, existing_exam_member_ids,
+            group_member_user_ids, plan_ecm_assignments,
+        )
         from dateutil.relativedelta import relativedelta
 
         group, error = _verify_group_access(group_id, g.current_user)
@@ -7036,67 +6947,33 @@ def add_assignments_to_exam(group_id, exam_id):
             _payment_source = None
 
         # Verificar que todos son miembros activos del grupo
-        group_member_ids = {m.user_id for m in GroupMember.query.filter_by(group_id=group_id, status='active').all()}
+        group_member_ids = set(group_member_user_ids(group_id, status='active'))
         invalid_ids = [uid for uid in user_ids if uid not in group_member_ids]
         if invalid_ids:
             return jsonify({'error': f'{len(invalid_ids)} usuario(s) no son miembros activos del grupo'}), 400
 
         ecm_id = exam.competency_standard_id
 
-        # Clasificar: ya asignados vs nuevos
-        already_assigned = []
-        already_exam_member = []
-        new_user_ids = []
-
-        for uid in user_ids:
-            # Verificar si ya es miembro del examen
-            existing_member = GroupExamMember.query.filter_by(
-                group_exam_id=group_exam.id,
-                user_id=uid
-            ).first()
-
-            if ecm_id:
-                existing_ecm = EcmCandidateAssignment.query.filter_by(
-                    user_id=uid,
-                    competency_standard_id=ecm_id
-                ).first()
-                if existing_ecm:
-                    user_obj = User.query.get(uid)
-                    already_assigned.append({
-                        'user_id': uid,
-                        'user_name': user_obj.full_name if user_obj else uid,
-                        'assignment_number': existing_ecm.assignment_number,
-                    })
-                    # Aún necesita ser GroupExamMember si no lo es
-                    if not existing_member:
-                        already_exam_member.append(uid)
-                    continue
-
-            if existing_member:
-                # Ya es miembro pero sin ECM assignment (raro, pero puede pasar)
-                new_user_ids.append(uid)
-            else:
-                new_user_ids.append(uid)
+        # Clasificar: ya asignados vs nuevos (diff de ECA en una query)
+        plan = plan_ecm_assignments(user_ids, ecm_id, load_users=bool(ecm_id))
+        already_assigned = [{
+            'user_id': uid,
+            'user_name': user_obj.full_name if user_obj else uid,
+            'assignment_number': eca.assignment_number,
+        } for uid, eca, user_obj in plan.already_assigned]
+        # Quienes ya tenían ECM también deben quedar como GroupExamMember
+        already_exam_member = [uid for uid, _, _ in plan.already_assigned]
+        new_user_ids = plan.new_user_ids
 
         # Calcular vigencia
         campus = Campus.query.get(group.campus_id)
-        if group.assignment_validity_months_override is not None:
-            validity_months = group.assignment_validity_months_override
-        elif campus and campus.assignment_validity_months:
-            validity_months = campus.assignment_validity_months
-        else:
-            validity_months = 12
+        validity_months = assignment_validity_months(group, campus)
 
         assigned_at_now = datetime.utcnow()
         expires_at = assigned_at_now + relativedelta(months=validity_months)
 
         # Calcular costo
-        if group.certification_cost_override is not None and group.use_custom_config:
-            unit_cost = float(group.certification_cost_override)
-        elif campus and campus.certification_cost is not None:
-            unit_cost = float(campus.certification_cost)
-        else:
-            unit_cost = 0.0
+        unit_cost = assignment_unit_cost(group, campus)
 
         billable_count = len(new_user_ids)
         total_cost = unit_cost * billable_count
@@ -7114,13 +6991,20 @@ def add_assignments_to_exam(group_id, exam_id):
                     'error': 'El plantel no tiene coordinador asignado para procesar el cobro',
                     'error_type': 'no_coordinator'
                 }), 400
-            balance = CoordinatorBalance.query.filter_by(
-                coordinator_id=coordinator_id,
-                campus_id=group.campus_id
-            ).with_for_update().first()
-            current_bal = float(balance.current_balance) if balance else 0.0
 
-            if current_bal < total_cost:
+            exam_name = exam.name if exam else f'Examen #{exam_id}'
+            skipped_note = f' ({len(already_assigned)} omitido(s) por ya tener ECM)' if already_assigned else ''
+            notes = f'Asignación adicional de "{exam_name}" en grupo "{group.name}" - {billable_count} unidad(es) x ${unit_cost:,.2f}{skipped_note}'
+
+            debited, current_bal = debit_assignments(
+                coordinator_id, group.campus_id, total_cost,
+                group_id=group_id,
+                group_exam_id=group_exam.id,
+                notes=notes,
+                created_by_id=g.current_user.id,
+                payment_source=_payment_source
+            )
+            if not debited:
                 return jsonify({
                     'error': f'Saldo insuficiente. Necesitas ${total_cost:,.2f} pero el saldo del coordinador es ${current_bal:,.2f}',
                     'error_type': 'insufficient_balance',
@@ -7132,97 +7016,48 @@ def add_assignments_to_exam(group_id, exam_id):
                     'unit_cost': unit_cost,
                 }), 400
 
-            exam_name = exam.name if exam else f'Examen #{exam_id}'
-            skipped_note = f' ({len(already_assigned)} omitido(s) por ya tener ECM)' if already_assigned else ''
-            notes = f'Asignación adicional de "{exam_name}" en grupo "{group.name}" - {billable_count} unidad(es) x ${unit_cost:,.2f}{skipped_note}'
-
-            create_balance_transaction(
-                coordinator_id=coordinator_id,
-                campus_id=group.campus_id,
-                transaction_type='debit',
-                concept='asignacion_certificacion',
-                amount=total_cost,
-                group_id=group_id,
-                reference_type='group_exam',
-                reference_id=group_exam.id,
-                notes=notes,
-                created_by_id=g.current_user.id,
-                payment_source=_payment_source
-            )
-
-        # Set de user_ids ya presentes como GroupExamMember (BD + sesión)
-        # para evitar duplicate-key en uq_gem_group_exam_user_v3 cuando se mezcla
+        # Set de user_ids ya presentes como GroupExamMember (una query) para
+        # evitar duplicate-key en uq_gem_group_exam_user_v3 cuando se mezcla
         # la migración 'all'→'selected' con nuevas asignaciones.
-        existing_gem_user_ids = {
-            m.user_id for m in GroupExamMember.query.filter_by(
-                group_exam_id=group_exam.id
-            ).all()
-        }
+        existing_gem_user_ids = existing_exam_member_ids(group_exam.id)
 
         # Si era 'all', migrar a 'selected' antes de agregar
         if group_exam.assignment_type == 'all':
-            existing_group_members = GroupMember.query.filter_by(group_id=group_id).all()
-            for gm in existing_group_members:
-                if gm.user_id not in existing_gem_user_ids:
-                    db.session.add(GroupExamMember(
-                        group_exam_id=group_exam.id,
-                        user_id=gm.user_id
-                    ))
-                    existing_gem_user_ids.add(gm.user_id)
+            add_exam_members(group_exam.id, group_member_user_ids(group_id),
+                             existing=existing_gem_user_ids)
             group_exam.assignment_type = 'selected'
 
-        # Crear GroupExamMember + EcmCandidateAssignment para nuevos
+        # Crear GroupExamMember + EcmCandidateAssignment para nuevos, y
+        # GroupExamMember para los que ya tenían ECM pero no eran miembros del examen
+        add_exam_members(group_exam.id, new_user_ids + already_exam_member,
+                         existing=existing_gem_user_ids)
         new_assignments = []
-        for uid in new_user_ids:
-            # GroupExamMember (verificando set en memoria, no la BD)
-            if uid not in existing_gem_user_ids:
-                db.session.add(GroupExamMember(
-                    group_exam_id=group_exam.id,
-                    user_id=uid
-                ))
-                existing_gem_user_ids.add(uid)
-
-            # EcmCandidateAssignment
-            if ecm_id:
-                new_ecm = EcmCandidateAssignment(
-                    assignment_number=EcmCandidateAssignment.generate_assignment_number(),
-                    user_id=uid,
-                    competency_standard_id=ecm_id,
-                    exam_id=exam_id,
-                    campus_id=group.campus_id,
-                    group_id=group_id,
-                    group_name=group.name,
-                    group_exam_id=group_exam.id,
-                    assigned_by_id=g.current_user.id,
-                    assignment_source='selected',
-                    validity_months=validity_months,
-                    assigned_at=assigned_at_now,
-                    expires_at=expires_at,
-                )
-                db.session.add(new_ecm)
-                new_assignments.append(new_ecm)
-
-        # También agregar como GroupExamMember a los que ya tenían ECM pero no eran miembros del examen
-        for uid in already_exam_member:
-            if uid not in existing_gem_user_ids:
-                db.session.add(GroupExamMember(
-                    group_exam_id=group_exam.id,
-                    user_id=uid
-                ))
-                existing_gem_user_ids.add(uid)
-
-        db.session.commit()
+        if ecm_id:
+            new_assignments = create_ecm_assignments(
+                new_user_ids,
+                ecm_id=ecm_id,
+                exam_id=exam.id,
+                group=group,
+                group_exam_id=group_exam.id,
+                assigned_by_id=g.current_user.id,
+                source='selected',
+                validity_months=validity_months,
+                assigned_at=assigned_at_now,
+                expires_at=expires_at,
+            )
 
-        # Construir respuesta
+        # Construir respuesta (antes del commit: los usuarios del plan expiran al confirmar)
         assigned_details = []
         for ecm_a in new_assignments:
-            user_obj = User.query.get(ecm_a.user_id)
+            user_obj = plan.users.get(ecm_a['user_id'])
             assigned_details.append({
-                'user_id': str(ecm_a.user_id),
-                'user_name': user_obj.full_name if user_obj else str(ecm_a.user_id),
-                'assignment_number': ecm_a.assignment_number,
+                'user_id': ecm_a['user_id'],
+                'user_name': user_obj.full_name if user_obj else ecm_a['user_id'],
+                'assignment_number': ecm_a['assignment_number'],
             })
 
+        db.session.commit()
+
         return jsonify({
             'message': f'{len(new_assignments)} asignación(es) creada(s) exitosamente',
             'assigned': assigned_details,
@@ -9496,7 +9331,6 @@ def get_available_exams():
         from app.models.competency_standard import CompetencyStandard
         from app.models.brand import Brand
         from app.models.partner import CampusCompetencyStandard
-        from sqlalchemy import text
         from sqlalchemy.orm import joinedload
         
         search = request.args.get('search', '')
@@ -9564,100 +9398,57 @@ def get_available_exams():
         )
         pagination = query.paginate(page=page, per_page=per_page, max_per_page=MAX_PER_PAGE_EXPORT, error_out=False)
         
-        exams_data = []
-        for exam in pagination.items:
-            # Contar materiales de estudio asociados (legacy exam_id)
-            materials_count = StudyMaterial.query.filter_by(exam_id=exam.id, is_published=True).count()
-            
-            # También contar materiales de la relación muchos a muchos
-            try:
-                result = db.session.execute(text('''
-                    SELECT COUNT(DISTINCT sme.study_material_id) 
-                    FROM study_material_exams sme
-                    JOIN study_contents sc ON sme.study_material_id = sc.id
-                    WHERE sme.exam_id = :exam_id AND sc.is_published = 1
-                '''), {'exam_id': exam.id})
-                linked_count = result.scalar() or 0
-                # Tomar el máximo de ambos (evitar duplicados si están en ambos)
-                materials_count = max(materials_count, linked_count)
-            except Exception:
-                pass
-            
-            # Obtener IDs de materiales vinculados al examen
-            linked_material_ids = []
+        # Conteos de la página completa con queries agrupadas por exam_id
+        from app.models.exam import load_exam_stats
+        from app.models.study_content import study_material_exams
+        page_exams = pagination.items
+        page_exam_ids = [exam.id for exam in page_exams]
+        exam_stats = load_exam_stats(
+            page_exam_ids,
+            competency_standards={exam.id: exam.competency_standard for exam in page_exams}
+        )
+        
+        # Materiales publicados: relación legacy (exam_id) y muchos a muchos
+        legacy_materials = {}
+        linked_materials = {}
+        if page_exam_ids:
+            for exam_id, material_id in db.session.query(
+                StudyMaterial.exam_id, StudyMaterial.id
+            ).filter(
+                StudyMaterial.exam_id.in_(page_exam_ids),
+                StudyMaterial.is_published == True
+            ).all():
+                legacy_materials.setdefault(exam_id, set()).add(material_id)
             try:
-                lm_result = db.session.execute(text('''
-                    SELECT DISTINCT sme.study_material_id 
-                    FROM study_material_exams sme
-                    JOIN study_contents sc ON sme.study_material_id = sc.id
-                    WHERE sme.exam_id = :exam_id AND sc.is_published = 1
-                '''), {'exam_id': exam.id})
-                linked_material_ids = [row[0] for row in lm_result.fetchall()]
-                
-                # También incluir materiales con relación legacy
-                legacy_ids = [m.id for m in StudyMaterial.query.filter_by(exam_id=exam.id, is_published=True).all()]
-                linked_material_ids = list(set(linked_material_ids + legacy_ids))
+                for exam_id, material_id in db.session.query(
+                    study_material_exams.c.exam_id, study_material_exams.c.study_material_id
+                ).join(
+                    StudyMaterial, StudyMaterial.id == study_material_exams.c.study_material_id
+                ).filter(
+                    study_material_exams.c.exam_id.in_(page_exam_ids),
+                    StudyMaterial.is_published == True
+                ).all():
+                    linked_materials.setdefault(exam_id, set()).add(material_id)
             except Exception:
                 pass
+        
+        exams_data = []
+        for exam in page_exams:
+            legacy_ids = legacy_materials.get(exam.id, set())
+            linked_ids = linked_materials.get(exam.id, set())
+            # Tomar el máximo de ambos (evitar duplicados si están en ambos)
+            materials_count = max(len(legacy_ids), len(linked_ids))
+            # IDs de materiales vinculados al examen (incluye relación legacy)
+            linked_material_ids = list(linked_ids | legacy_ids)
             
-            # Contar preguntas por tipo (exam vs simulator)
-            exam_questions = 0
-            simulator_questions = 0
-            try:
-                questions_result = db.session.execute(text('''
-                    SELECT q.type, COUNT(q.id) as cnt
-                    FROM questions q
-                    JOIN topics t ON q.topic_id = t.id
-                    JOIN categories c ON t.category_id = c.id
-                    WHERE c.exam_id = :exam_id
-                    GROUP BY q.type
-                '''), {'exam_id': exam.id})
-                for row in questions_result.fetchall():
-                    q_type = row[0] or 'exam'
-                    count = row[1] or 0
-                    if q_type == 'simulator':
-                        simulator_questions = count
-                    else:
-                        exam_questions = count
-            except HTTPException:
-                raise
-            except Exception as e:
-                try:
-                    from flask import current_app
-                    current_app.logger.debug(f"Error contando preguntas: {e}")
-                except Exception:
-                    pass
-            
-            # Contar ejercicios por tipo (exam vs simulator)
-            exam_exercises = 0
-            simulator_exercises = 0
-            try:
-                exercises_result = db.session.execute(text('''
-                    SELECT e.type, COUNT(e.id) as cnt
-                    FROM exercises e
-                    JOIN topics t ON e.topic_id = t.id
-                    JOIN categories c ON t.category_id = c.id
-                    WHERE c.exam_id = :exam_id
-                    GROUP BY e.type
-                '''), {'exam_id': exam.id})
-                for row in exercises_result.fetchall():
-                    e_type = row[0] or 'exam'
-                    count = row[1] or 0
-                    if e_type == 'simulator':
-                        simulator_exercises = count
-                    else:
-                        exam_exercises = count
-            except HTTPException:
-                raise
-            except Exception as e:
-                try:
-                    from flask import current_app
-                    current_app.logger.debug(f"Error contando ejercicios: {e}")
-                except Exception:
-                    pass
-            
-            total_questions = exam_questions + simulator_questions
-            total_exercises = exam_exercises + simulator_exercises
+            # Conteos de preguntas y ejercicios por tipo (exam vs simulator)
+            mode_counts = exam_stats[exam.id]['mode_counts']
+            exam_questions = mode_counts['exam_questions_count']
+            simulator_questions = mode_counts['simulator_questions_count']
+            exam_exercises = mode_counts['exam_exercises_count']
+            simulator_exercises = mode_counts['simulator_exercises_count']
+            total_questions = exam_stats[exam.id]['total_questions']
+            total_exercises = exam_stats[exam.id]['total_exercises']
             
             # Obtener datos ECM si existe
             ecm_code = None
@@ -12859,7 +12650,7 @@ def search_mi_plantel_candidates():
 def get_mis_examenes():
     """Obtener exámenes asignados al candidato basándose en sus grupos"""
     from app.models import Exam
-    from app.models.partner import GroupExam, GroupMember, GroupExamMember
+    from app.models.partner import GroupExam
     
     try:
         user_id = get_jwt_identity()
@@ -12892,77 +12683,13 @@ def get_mis_examenes():
             ).distinct().all()
             exam_ids = [e[0] for e in exam_ids]
         else:
-            # Para candidatos: obtener grupos donde es miembro activo
-            memberships = GroupMember.query.filter_by(
-                user_id=user_id,
-                status='active'
-            ).all()
-            
-            if not memberships:
-                return jsonify({'exams': [], 'total': 0, 'pages': 1, 'current_page': 1})
-            
-            # Filtrar solo grupos que existen y están activos
-            group_ids = []
-            for m in memberships:
-                group = CandidateGroup.query.filter_by(id=m.group_id, is_active=True).first()
-                if group:
-                    group_ids.append(m.group_id)
-            
-            if not group_ids:
-                return jsonify({'exams': [], 'total': 0, 'pages': 1, 'current_page': 1})
-            
-            # Obtener exámenes asignados a esos grupos
-            group_exams = GroupExam.query.filter(
-                GroupExam.group_id.in_(group_ids),
-                GroupExam.is_active == True
-            ).all()
-            
-            # Filtrar por asignación específica si es individual
-            exam_ids = set()
-            exam_group_context = {}  # exam_id -> {group_id, group_exam_id, assigned_at}
-            for ge in group_exams:
-                is_assigned = False
-                if ge.assignment_type == 'all' or ge.assignment_type is None:
-                    is_assigned = True
-                elif ge.assignment_type == 'selected':
-                    member_assignment = GroupExamMember.query.filter_by(
-                        group_exam_id=ge.id,
-                        user_id=user_id
-                    ).first()
-                    is_assigned = member_assignment is not None
-
-                if is_assigned:
-                    exam_ids.add(ge.exam_id)
-                    # Para exámenes duplicados: verificar si ya tiene pago aprobado
-                    # Si lo tiene, preferir esa asignación; si no, elegir la más reciente
-                    existing = exam_group_context.get(ge.exam_id)
-                    if existing is None:
-                        exam_group_context[ge.exam_id] = {
-                            'group_id': ge.group_id, 'group_exam_id': ge.id,
-                            'assigned_at': ge.assigned_at
-                        }
-                    else:
-                        # Preferir la asignación que ya tiene pago aprobado
-                        from app.models.payment import Payment as PaymentCheck
-                        existing_paid = PaymentCheck.query.filter_by(
-                            user_id=str(user_id),
-                            group_exam_id=existing['group_exam_id'],
-                            payment_type='certification', status='approved'
-                        ).first()
-                        if existing_paid:
-                            continue  # ya tenemos una pagada, mantenerla
-                        new_paid = PaymentCheck.query.filter_by(
-                            user_id=str(user_id),
-                            group_exam_id=ge.id,
-                            payment_type='certification', status='approved'
-                        ).first()
-                        if new_paid or (ge.assigned_at and (not existing['assigned_at'] or ge.assigned_at > existing['assigned_at'])):
-                            exam_group_context[ge.exam_id] = {
-                                'group_id': ge.group_id, 'group_exam_id': ge.id,
-                                'assigned_at': ge.assigned_at
-                            }
-            
-            exam_ids = list(exam_ids)
+            # Para candidatos: grupos activos, asignaciones y pagos en queries fijas
+            from app.services.candidate_access import resolve_candidate_access
+
+            access = resolve_candidate_access(user_id)
+            exam_ids = access.exam_ids
+            # exam_id -> asignación preferida (la pagada o la más reciente)
+            exam_group_context = access.preferred_by_exam
         
         if not exam_ids:
             return jsonify({'exams': [], 'total': 0, 'pages': 1, 'current_page': 1})
@@ -12994,48 +12721,24 @@ def get_mis_examenes():
                 }
         
         # Enriquecer con contexto de grupo y estado de aprobación
+        from app.models.exam import serialize_exams
         exams_data = []
-        for exam in exams:
-            d = exam.to_dict()
+        for exam, d in zip(exams, serialize_exams(exams)):
             ctx = exam_group_context.get(exam.id) if user.role == 'candidato' else None
             if ctx:
-                d['group_id'] = ctx['group_id']
-                d['group_exam_id'] = ctx['group_exam_id']
+                ge_obj = ctx.group_exam
+                d['group_id'] = ctx.group_id
+                d['group_exam_id'] = ctx.group_exam_id
                 # Agregar info de vigencia
-                ge_obj = GroupExam.query.get(ctx['group_exam_id'])
-                if ge_obj:
-                    d['validity_months'] = ge_obj.validity_months
-                    d['expires_at'] = ge_obj.effective_expires_at.isoformat() if ge_obj.effective_expires_at else None
-                    d['extended_months'] = ge_obj.extended_months or 0
-                    d['is_expired'] = ge_obj.is_expired
+                d['validity_months'] = ge_obj.validity_months
+                d['expires_at'] = ge_obj.effective_expires_at.isoformat() if ge_obj.effective_expires_at else None
+                d['extended_months'] = ge_obj.extended_months or 0
+                d['is_expired'] = ge_obj.is_expired
 
                 # Agregar info de pago en línea
-                grp = CandidateGroup.query.get(ctx['group_id'])
-                if grp:
-                    campus_obj = Campus.query.get(grp.campus_id) if grp.campus_id else None
-                    payments_on = grp.enable_online_payments_override if grp.enable_online_payments_override is not None else (campus_obj.enable_online_payments if campus_obj else False)
-                    cert_cost = float(grp.certification_cost_override or (campus_obj.certification_cost if campus_obj else 0) or 0)
-
-                    if payments_on and cert_cost > 0:
-                        d['requires_payment'] = True
-                        d['certification_cost'] = cert_cost
-                        # Buscar pago aprobado
-                        from app.models.payment import Payment
-                        approved_payment = Payment.query.filter_by(
-                            user_id=str(user_id),
-                            group_exam_id=ctx['group_exam_id'],
-                            payment_type='certification',
-                            status='approved'
-                        ).first()
-                        d['is_paid'] = approved_payment is not None
-                    else:
-                        d['requires_payment'] = False
-                        d['is_paid'] = True
-                        d['certification_cost'] = 0
-                else:
-                    d['requires_payment'] = False
-                    d['is_paid'] = True
-                    d['certification_cost'] = 0
+                d['requires_payment'] = ctx.requires_payment
+                d['is_paid'] = ctx.is_paid
+                d['certification_cost'] = ctx.certification_cost
 
             # Agregar estado de aprobación
             approval = approved_map.get(exam.id)
@@ -13181,7 +12884,7 @@ def get_purchase_details(group_exam_id):
 def get_mis_materiales():
     """Obtener materiales de estudio asignados al candidato basándose en sus grupos"""
     from app.models.study_content import StudyMaterial
-    from app.models.partner import GroupExam, GroupMember, GroupExamMaterial
+    from app.models.partner import GroupExam, GroupExamMaterial
     
     try:
         user_id = get_jwt_identity()
@@ -13223,71 +12926,11 @@ def get_mis_materiales():
                 for m in materials:
                     material_ids.add(m.study_material_id)
         else:
-            # Para candidatos: obtener grupos donde es miembro activo
-            memberships = GroupMember.query.filter_by(
-                user_id=user_id,
-                status='active'
-            ).all()
-            
-            if not memberships:
-                return jsonify({'materials': [], 'total': 0, 'pages': 1, 'current_page': 1})
-            
-            # Filtrar solo grupos que existen y están activos
-            group_ids = []
-            for m in memberships:
-                group = CandidateGroup.query.filter_by(id=m.group_id, is_active=True).first()
-                if group:
-                    group_ids.append(m.group_id)
-            
-            if not group_ids:
-                return jsonify({'materials': [], 'total': 0, 'pages': 1, 'current_page': 1})
-            
-            # Obtener exámenes asignados a esos grupos
-            group_exams = GroupExam.query.filter(
-                GroupExam.group_id.in_(group_ids),
-                GroupExam.is_active == True
-            ).all()
-            
-            # Obtener materiales de esos exámenes
-            material_ids = set()
-            for ge in group_exams:
-                # Verificar si el candidato tiene acceso al examen
-                has_access = False
-                if ge.assignment_type == 'all' or ge.assignment_type is None:
-                    has_access = True
-                elif ge.assignment_type == 'selected':
-                    from app.models.partner import GroupExamMember
-                    # La existencia del registro indica asignación
-                    member_assignment = GroupExamMember.query.filter_by(
-                        group_exam_id=ge.id,
-                        user_id=user_id
-                    ).first()
-                    has_access = member_assignment is not None
-                
-                if has_access:
-                    # Si el examen requiere pago, verificar que el candidato haya pagado
-                    grp = CandidateGroup.query.get(ge.group_id)
-                    if grp:
-                        campus_obj = Campus.query.get(grp.campus_id) if grp.campus_id else None
-                        payments_on = grp.enable_online_payments_override if grp.enable_online_payments_override is not None else (campus_obj.enable_online_payments if campus_obj else False)
-                        cert_cost = float(grp.certification_cost_override or (campus_obj.certification_cost if campus_obj else 0) or 0)
-                        if payments_on and cert_cost > 0:
-                            from app.models.payment import Payment as PaymentModel
-                            approved_payment = PaymentModel.query.filter_by(
-                                user_id=str(user_id),
-                                group_exam_id=ge.id,
-                                payment_type='certification',
-                                status='approved'
-                            ).first()
-                            if not approved_payment:
-                                continue  # No ha pagado, no mostrar materiales de este examen
-
-                    materials = GroupExamMaterial.query.filter_by(
-                        group_exam_id=ge.id,
-                        is_included=True
-                    ).all()
-                    for m in materials:
-                        material_ids.add(m.study_material_id)
+            # Para candidatos: materiales de asignaciones accesibles, omitiendo
+            # los de exámenes con pago de certificación pendiente
+            from app.services.candidate_access import resolve_candidate_access
+
+            material_ids = resolve_candidate_access(user_id).material_ids
         
         material_ids = list(material_ids)
         
@@ -13680,8 +13323,11 @@ def bulk_assign_exams_by_ecm(group_id):
     import io
     from openpyxl import load_workbook
     from app.models import GroupExam, Exam, User
-    from app.models.partner import GroupExamMember, EcmCandidateAssignment
     from app.models.competency_standard import CompetencyStandard
+    from app.services.bulk_assignment_service import (
+        add_exam_members, assignment_unit_cost, create_ecm_assignments, debit_assignments,
+        existing_exam_member_ids, group_member_user_ids, plan_ecm_assignments,
+    )
     
     try:
         group, error = _verify_group_access(group_id, g.current_user)
@@ -13786,9 +13432,11 @@ def bulk_assign_exams_by_ecm(group_id):
         # Obtener miembros del grupo con sus usuarios — SOLO candidatos y responsables de plantel
         group_members = {
             m.user_id: m.user
-            for m in group.members.filter_by(status='active').all()
+            for m in group.members.filter_by(status='active').options(joinedload(GroupMember.user)).all()
             if m.user and m.user.role in ('candidato', 'responsable')
         }
+        # Todos los miembros (cualquier estatus), solo para diagnosticar errores
+        all_member_ids = None
         
         # Índices para búsqueda rápida
         users_by_username = {u.username.lower(): uid for uid, u in group_members.items() if u.username}
@@ -13816,7 +13464,12 @@ def bulk_assign_exams_by_ecm(group_id):
             )
             db.session.add(group_exam)
             db.session.flush()
-        
+
+        # Miembros actuales del examen en una sola query (los nuevos se
+        # agregan al set para que filas repetidas se omitan)
+        existing_gem_user_ids = existing_exam_member_ids(group_exam.id) if group_exam else set()
+        to_assign = []
+
         for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
             # Leer identificadores
             def _cell(idx):
@@ -13891,8 +13544,9 @@ def bulk_assign_exams_by_ecm(group_id):
                         )
                     elif global_user.id not in group_members:
                         # Existe pero no es miembro activo del grupo (o no es candidato/responsable activo)
-                        is_member_any = any(m.user_id == global_user.id for m in group.members.all())
-                        if is_member_any:
+                        if all_member_ids is None:
+                            all_member_ids = set(group_member_user_ids(group_id))
+                        if global_user.id in all_member_ids:
                             error_msg = (
                                 f"El usuario \"{global_user.username}\" ({global_user.full_name or 'sin nombre'}) "
                                 f"pertenece al grupo pero no está activo. Reactívalo antes de asignarle exámenes."
@@ -13941,12 +13595,7 @@ def bulk_assign_exams_by_ecm(group_id):
             
             # Verificar si el usuario ya tiene este examen asignado
             if group_exam:
-                existing_member = GroupExamMember.query.filter_by(
-                    group_exam_id=group_exam.id,
-                    user_id=user_id
-                ).first()
-                
-                if existing_member:
+                if user_id in existing_gem_user_ids:
                     user_info = group_members.get(user_id)
                     results['skipped'].append({
                         'row': row_num,
@@ -13973,36 +13622,12 @@ def bulk_assign_exams_by_ecm(group_id):
                     })
                     continue
             
-            # Crear asignación de miembro (solo si no es dry_run)
+            # Registrar asignación de miembro (solo si no es dry_run); los
+            # INSERT se hacen por lote al final
             if not dry_run:
-                member = GroupExamMember(
-                    group_exam_id=group_exam.id,
-                    user_id=user_id
-                )
-                db.session.add(member)
-                
-                # Crear registro ECA con número de asignación
-                ecm_id = exam.competency_standard_id
-                if ecm_id:
-                    existing_ecm = EcmCandidateAssignment.query.filter_by(
-                        user_id=user_id,
-                        competency_standard_id=ecm_id
-                    ).first()
-                    if not existing_ecm:
-                        new_ecm = EcmCandidateAssignment(
-                            assignment_number=EcmCandidateAssignment.generate_assignment_number(),
-                            user_id=user_id,
-                            competency_standard_id=ecm_id,
-                            exam_id=exam.id,
-                            campus_id=group.campus_id,
-                            group_id=group_id,
-                            group_name=group.name,
-                            group_exam_id=group_exam.id,
-                            assigned_by_id=g.current_user.id,
-                            assignment_source='bulk_upload'
-                        )
-                        db.session.add(new_ecm)
-            
+                to_assign.append(user_id)
+                existing_gem_user_ids.add(user_id)
+
             user = group_members[user_id]
             results['assigned'].append({
                 'row': row_num,
@@ -14019,12 +13644,7 @@ def bulk_assign_exams_by_ecm(group_id):
             billable_count = len(results['assigned'])
             if billable_count > 0:
                 campus = Campus.query.get(group.campus_id)
-                if group.certification_cost_override is not None:
-                    unit_cost = float(group.certification_cost_override)
-                elif campus and campus.certification_cost is not None:
-                    unit_cost = float(campus.certification_cost)
-                else:
-                    unit_cost = 0.0
+                unit_cost = assignment_unit_cost(group, campus, require_custom_config=False)
 
                 total_cost = unit_cost * billable_count
                 user_role = g.current_user.role if hasattr(g.current_user, 'role') else ''
@@ -14041,13 +13661,17 @@ def bulk_assign_exams_by_ecm(group_id):
                             'error': 'El plantel no tiene coordinador asignado para procesar el cobro',
                             'error_type': 'no_coordinator'
                         }), 400
-                    balance = CoordinatorBalance.query.filter_by(
-                        coordinator_id=coordinator_id,
-                        campus_id=group.campus_id
-                    ).with_for_update().first()
-                    current_bal = float(balance.current_balance) if balance else 0.0
+                    exam_name = exam.name if exam else f'Examen #{exam_id}'
+                    notes = f'Asignación masiva (Excel) de "{exam_name}" en grupo "{group.name}" - {billable_count} unidad(es) x ${unit_cost:,.2f}'
 
-                    if current_bal < total_cost:
+                    debited, current_bal = debit_assignments(
+                        coordinator_id, group.campus_id, total_cost,
+                        group_id=group_id,
+                        group_exam_id=group_exam.id,
+                        notes=notes,
+                        created_by_id=g.current_user.id
+                    )
+                    if not debited:
                         db.session.rollback()
                         return jsonify({
                             'error': f'Saldo insuficiente. Necesitas ${total_cost:,.2f} pero el saldo del coordinador es ${current_bal:,.2f}',
@@ -14059,20 +13683,20 @@ def bulk_assign_exams_by_ecm(group_id):
                             'unit_cost': unit_cost,
                         }), 400
 
-                    exam_name = exam.name if exam else f'Examen #{exam_id}'
-                    notes = f'Asignación masiva (Excel) de "{exam_name}" en grupo "{group.name}" - {billable_count} unidad(es) x ${unit_cost:,.2f}'
-
-                    create_balance_transaction(
-                        coordinator_id=coordinator_id,
-                        campus_id=group.campus_id,
-                        transaction_type='debit',
-                        concept='asignacion_certificacion',
-                        amount=total_cost,
-                        group_id=group_id,
-                        reference_type='group_exam',
-                        reference_id=group_exam.id,
-                        notes=notes,
-                        created_by_id=g.current_user.id
+            # GroupExamMember + EcmCandidateAssignment por lote
+            if to_assign:
+                add_exam_members(group_exam.id, to_assign, existing=set())
+                ecm_id = exam.competency_standard_id
+                if ecm_id:
+                    plan = plan_ecm_assignments(to_assign, ecm_id, load_users=False)
+                    create_ecm_assignments(
+                        plan.new_user_ids,
+                        ecm_id=ecm_id,
+                        exam_id=exam.id,
+                        group=group,
+                        group_exam_id=group_exam.id,
+                        assigned_by_id=g.current_user.id,
+                        source='bulk_upload',
                     )
 
             db.session.commit()
@@ -14388,30 +14012,24 @@ def get_group_certificates_stats(group_id):
 @coordinator_required
 def download_group_certificates_zip(group_id):
     """
-    Descargar certificados del grupo en formato ZIP.
+    Descargar certificados del grupo en formato ZIP (síncrono).
     Genera los PDFs que no existan antes de crear el ZIP.
+    Para grupos grandes usar POST /groups/<id>/certificates/zip-jobs.
     
     Body:
     - certificate_types: Array de tipos a incluir ['tier_basic', 'tier_standard', 'tier_advanced']
     - user_ids: (opcional) Lista de user_ids específicos, o todo el grupo si no se especifica
     """
     try:
-        from app.models.result import Result
-        from app.models.conocer_certificate import ConocerCertificate
-        from app.models.exam import Exam
         from flask import current_app
-        from io import BytesIO
-        from zipfile import ZipFile
-        import requests
-        from datetime import datetime
-        from sqlalchemy import and_
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.colors import HexColor
-        from reportlab.pdfbase.pdfmetrics import stringWidth
-        import re
-        import os
+        from app.services.certificate_zip_service import (
+            apply_result_updates,
+            certificate_zip_filename,
+            collect_certificate_entries,
+            new_spool_path,
+            write_certificate_zip,
+        )
+        from app.utils.zip_spool import remove_spool
         
         group, error = _verify_group_access(group_id, g.current_user)
         if error:
@@ -14421,545 +14039,130 @@ def download_group_certificates_zip(group_id):
         certificate_types = data.get('certificate_types', ['tier_basic', 'tier_standard'])
         user_ids = data.get('user_ids', None)
         
-        # --- FUNCIONES DE GENERACIÓN DE PDF (módulo compartido) ---
-        from app.utils.pdf_generator import generate_evaluation_report_pdf, generate_certificate_pdf as generate_certificate_pdf_with_template
-        
-        def strip_html(text):
-            if not text:
-                return ''
-            return re.sub(r'<[^>]+>', '', str(text))
-        
-        def _old_generate_evaluation_report_pdf(result, exam, user):
-            """Genera el PDF del reporte de evaluación"""
-            buffer = BytesIO()
-            page_width, page_height = letter
-            margin = 50
-            
-            c = canvas.Canvas(buffer, pagesize=letter)
-            
-            primary_color = HexColor('#1e40af')
-            success_color = HexColor('#16a34a')
-            error_color = HexColor('#dc2626')
-            gray_color = HexColor('#6b7280')
-            
-            y = page_height - margin
-            
-            # ENCABEZADO
-            c.setFillColor(colors.black)
-            c.setFont('Helvetica-Bold', 16)
-            c.drawString(margin, y, 'Evaluaasi')
-            
-            c.setFillColor(gray_color)
-            c.setFont('Helvetica', 7)
-            c.drawRightString(page_width - margin, y, 'Sistema de Evaluación y Certificación')
-            c.drawRightString(page_width - margin, y - 12, datetime.now().strftime('%d/%m/%Y %H:%M'))
-            
-            y -= 45
-            c.setStrokeColor(primary_color)
-            c.setLineWidth(2)
-            c.line(margin, y, page_width - margin, y)
-            
-            y -= 30
-            
-            # TÍTULO
-            c.setFillColor(colors.black)
-            c.setFont('Helvetica-Bold', 14)
-            c.drawCentredString(page_width / 2, y, 'REPORTE DE EVALUACIÓN')
-            y -= 30
-            
-            # DATOS DEL ESTUDIANTE
-            c.setFillColor(primary_color)
-            c.setFont('Helvetica-Bold', 10)
-            c.drawString(margin, y, 'DATOS DEL ESTUDIANTE')
-            y -= 15
-            
-            c.setFillColor(colors.black)
-            name_parts = [user.name or '']
-            if hasattr(user, 'first_surname') and user.first_surname:
-                name_parts.append(user.first_surname)
-            if hasattr(user, 'second_surname') and user.second_surname:
-                name_parts.append(user.second_surname)
-            student_name = ' '.join(name_parts).strip() or user.email
-            
-            c.setFont('Helvetica-Bold', 9)
-            c.drawString(margin + 5, y, 'Nombre:')
-            c.setFont('Helvetica', 9)
-            c.drawString(margin + 50, y, student_name)
-            y -= 12
-            c.setFont('Helvetica-Bold', 9)
-            c.drawString(margin + 5, y, 'Correo:')
-            c.setFont('Helvetica', 9)
-            c.drawString(margin + 50, y, user.email)
-            y -= 20
-            
-            # DATOS DEL EXAMEN
-            c.setFillColor(primary_color)
-            c.setFont('Helvetica-Bold', 10)
-            c.drawString(margin, y, 'DATOS DEL EXAMEN')
-            y -= 15
-            
-            c.setFillColor(colors.black)
-            exam_name = strip_html(exam.name)[:60] if exam.name else 'Sin nombre'
-            c.setFont('Helvetica-Bold', 9)
-            c.drawString(margin + 5, y, 'Examen:')
-            c.setFont('Helvetica', 9)
-            c.drawString(margin + 55, y, exam_name)
-            y -= 12
-            
-            ecm_code = exam.version or 'N/A'
-            c.setFont('Helvetica-Bold', 9)
-            c.drawString(margin + 5, y, 'Código ECM:')
-            c.setFont('Helvetica', 9)
-            c.drawString(margin + 70, y, ecm_code)
-            y -= 12
-            
-            start_date = result.start_date.strftime('%d/%m/%Y %H:%M') if result.start_date else 'N/A'
-            c.setFont('Helvetica-Bold', 9)
-            c.drawString(margin + 5, y, 'Fecha:')
-            c.setFont('Helvetica', 9)
-            c.drawString(margin + 40, y, start_date)
-            y -= 25
-            
-            # RESULTADO
-            c.setFillColor(primary_color)
-            c.setFont('Helvetica-Bold', 10)
-            c.drawString(margin, y, 'RESULTADO DE LA EVALUACIÓN')
-            y -= 10
-            
-            box_height = 40
-            c.setStrokeColor(colors.black)
-            c.setLineWidth(0.5)
-            c.rect(margin, y - box_height, page_width - 2 * margin, box_height)
-            
-            passing_score = exam.passing_score or 70
-            is_passed = result.result == 1
-            percentage = result.score or 0
-            
-            c.setFillColor(colors.black)
-            c.setFont('Helvetica-Bold', 9)
-            c.drawString(margin + 10, y - 15, 'Calificación:')
-            c.setFont('Helvetica-Bold', 18)
-            c.drawString(margin + 70, y - 18, f'{percentage}%')
-            
-            c.setFont('Helvetica-Bold', 9)
-            c.drawString(margin + 10, y - 35, 'Resultado:')
-            
-            if is_passed:
-                c.setFillColor(success_color)
-                c.setFont('Helvetica-Bold', 12)
-                c.drawString(margin + 60, y - 37, 'APROBADO')
-            else:
-                c.setFillColor(error_color)
-                c.setFont('Helvetica-Bold', 12)
-                c.drawString(margin + 60, y - 37, 'NO APROBADO')
-            
-            c.setFillColor(colors.black)
-            c.setFont('Helvetica', 9)
-            c.drawRightString(page_width - margin - 10, y - 35, f'Puntaje mínimo requerido: {passing_score}%')
-            
-            y -= 60
-            
-            if result.certificate_code:
-                c.setFillColor(gray_color)
-                c.setFont('Helvetica', 8)
-                c.drawCentredString(page_width / 2, y, f'Código de verificación: {result.certificate_code}')
-            
-            c.save()
-            buffer.seek(0)
-            return buffer
-        
-        def _old_generate_certificate_pdf_with_template(result, exam, user):
-            """Genera el certificado PDF usando plantilla si existe"""
-            from pypdf import PdfReader, PdfWriter
-            import qrcode
-            from reportlab.lib.utils import ImageReader
-            
-            template_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'plantilla.pdf')
-            
-            if not os.path.exists(template_path):
-                # Solo generar reporte si no hay plantilla
-                return generate_evaluation_report_pdf(result, exam, user)
-            
-            try:
-                reader = PdfReader(template_path)
-                page = reader.pages[0]
-                width = float(page.mediabox.width)
-                height = float(page.mediabox.height)
-                
-                buffer_overlay = BytesIO()
-                c = canvas.Canvas(buffer_overlay, pagesize=(width, height))
-                c.setFillColor(HexColor('#1a365d'))
-                
-                # Configuración del área compartida para nombre y certificado
-                x_min = 85
-                x_max = 540
-                max_width = x_max - x_min
-                center_x = (x_min + x_max) / 2
-                
-                # Función para ajustar tamaño de fuente
-                def draw_fitted_text(canv, text, cx, y_pos, mw, font_name, max_font_size, min_font_size=8):
-                    font_sz = max_font_size
-                    while font_sz >= min_font_size:
-                        text_width = stringWidth(text, font_name, font_sz)
-                        if text_width <= mw:
-                            canv.setFont(font_name, font_sz)
-                            canv.drawCentredString(cx, y_pos, text)
-                            return font_sz
-                        font_sz -= 1
-                    canv.setFont(font_name, min_font_size)
-                    canv.drawCentredString(cx, y_pos, text)
-                    return min_font_size
-                
-                # Nombre del usuario (Title Case)
-                name_parts = [user.name or '']
-                if hasattr(user, 'first_surname') and user.first_surname:
-                    name_parts.append(user.first_surname)
-                if hasattr(user, 'second_surname') and user.second_surname:
-                    name_parts.append(user.second_surname)
-                student_name = ' '.join(name_parts).strip() or user.email
-                student_name = student_name.title()
-                
-                # NOMBRE en (center_x, 375), max 36pt - POSICIÓN CORRECTA
-                draw_fitted_text(c, student_name, center_x, 375, max_width, 'Helvetica-Bold', 36)
-                
-                # Nombre del certificado (MAYÚSCULAS)
-                cert_name = exam.name.upper() if exam.name else "CERTIFICADO DE COMPETENCIA"
-                cert_name = strip_html(cert_name)[:80]
-                
-                # CERTIFICADO en (center_x, 300), max 18pt - POSICIÓN CORRECTA
-                draw_fitted_text(c, cert_name, center_x, 300, max_width, 'Helvetica-Bold', 18)
-                
-                # === QR DE VERIFICACIÓN ===
-                verification_code = result.eduit_certificate_code
-                if verification_code:
-                    # URL de verificación
-                    base_url = 'https://app.evaluaasi.com' if os.environ.get('FLASK_ENV') == 'production' else 'https://dev.evaluaasi.com'
-                    verify_url = f"{base_url}/verify/{verification_code}"
-                    
-                    # Crear QR
-                    qr = qrcode.QRCode(
-                        version=1,
-                        error_correction=qrcode.constants.ERROR_CORRECT_M,
-                        box_size=3,
-                        border=1,
-                    )
-                    qr.add_data(verify_url)
-                    qr.make(fit=True)
-                    
-                    # Crear imagen QR con fondo transparente
-                    qr_img = qr.make_image(fill_color="black", back_color="white").convert('RGBA')
-                    
-                    # Hacer el fondo transparente
-                    data = qr_img.getdata()
-                    new_data = []
-                    for item in data:
-                        # Si es blanco, hacerlo transparente
-                        if item[0] > 240 and item[1] > 240 and item[2] > 240:
-                            new_data.append((255, 255, 255, 0))
-                        else:
-                            new_data.append(item)
-                    qr_img.putdata(new_data)
-                    
-                    # Guardar QR en buffer
-                    qr_buffer = BytesIO()
-                    qr_img.save(qr_buffer, format='PNG')
-                    qr_buffer.seek(0)
-                    
-                    # Dibujar QR en el PDF (esquina inferior izquierda)
-                    qr_image = ImageReader(qr_buffer)
-                    qr_size = 55
-                    qr_x = 25  # Lado izquierdo
-                    qr_y = 25
-                    c.drawImage(qr_image, qr_x, qr_y, width=qr_size, height=qr_size, mask='auto')
-                    
-                    # Código de verificación debajo del QR
-                    c.setFillColor(HexColor('#444444'))
-                    c.setFont('Helvetica-Bold', 7)
-                    c.drawCentredString(qr_x + qr_size/2, qr_y - 8, verification_code)
-                    c.setFont('Helvetica', 5)
-                    c.drawCentredString(qr_x + qr_size/2, qr_y - 15, 'Escanea para verificar')
-                
-                c.save()
-                buffer_overlay.seek(0)
-                
-                # Combinar con plantilla
-                reader2 = PdfReader(template_path)
-                page2 = reader2.pages[0]
-                overlay_reader = PdfReader(buffer_overlay)
-                page2.merge_page(overlay_reader.pages[0])
-                
-                writer = PdfWriter()
-                writer.add_page(page2)
-                
-                output_buffer = BytesIO()
-                writer.write(output_buffer)
-                output_buffer.seek(0)
-                
-                return output_buffer
-                
-            except HTTPException:
-                
-                raise
-                
-            except Exception as e:
-                current_app.logger.error(f"Error generando certificado con plantilla: {e}")
-                import traceback
-                current_app.logger.error(traceback.format_exc())
-                return generate_evaluation_report_pdf(result, exam, user)
-        
-        def upload_pdf_to_blob(buffer, filename):
-            """Sube el PDF a Azure Blob Storage"""
-            from azure.storage.blob import BlobServiceClient, ContentSettings
-            
-            connection_string = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
-            container_name = os.environ.get('AZURE_STORAGE_CONTAINER', 'evaluaasi-files')
-            
-            if not connection_string:
-                return None
-            
-            try:
-                blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-                container_client = blob_service_client.get_container_client(container_name)
-                
-                try:
-                    container_client.create_container()
-                except:
-                    pass
-                
-                blob_name = f"pdfs/{filename}"
-                blob_client = container_client.get_blob_client(blob_name)
-                
-                buffer.seek(0)
-                blob_client.upload_blob(
-                    buffer,
-                    overwrite=True,
-                    content_settings=ContentSettings(content_type='application/pdf')
-                )
-                
-                return blob_client.url
-            except HTTPException:
-                raise
-            except Exception as e:
-                current_app.logger.error(f"Error subiendo a blob: {e}")
-                return None
-        
-        # --- FIN FUNCIONES DE GENERACIÓN ---
-        
-        # Obtener miembros
-        if user_ids:
-            members = GroupMember.query.filter(
-                and_(
-                    GroupMember.group_id == group_id,
-                    GroupMember.user_id.in_(user_ids),
-                    GroupMember.status == 'active'
-                )
-            ).all()
-        else:
-            members = GroupMember.query.filter_by(group_id=group_id, status='active').all()
-        
-        member_user_ids = [m.user_id for m in members]
-        
-        if not member_user_ids:
+        entries, member_count = collect_certificate_entries(group_id, certificate_types, user_ids)
+        if not member_count:
             return jsonify({'error': 'No hay miembros en el grupo'}), 400
         
-        # Obtener resultados aprobados
-        results = Result.query.filter(
-            and_(
-                Result.user_id.in_(member_user_ids),
-                Result.status == 1,
-                Result.result == 1
-            )
-        ).all()
+        current_app.logger.info(f"Procesando {len(entries)} archivos para {len(certificate_types)} tipos de certificado")
         
-        # Pre-cargar exámenes
-        exam_ids = list(set(r.exam_id for r in results))
-        exams_dict = {e.id: e for e in Exam.query.filter(Exam.id.in_(exam_ids)).all()}
+        path = new_spool_path()
+        try:
+            stats = write_certificate_zip(current_app._get_current_object(), entries, path)
+            updates = stats.take_updates()
+            if updates:
+                apply_result_updates(updates)
+                db.session.commit()
+        except BaseException:
+            remove_spool(path)
+            raise
         
-        # Obtener certificados CONOCER
-        conocer_certs = []
-        if 'tier_advanced' in certificate_types:
-            conocer_certs = ConocerCertificate.query.filter(
-                and_(
-                    ConocerCertificate.user_id.in_(member_user_ids),
-                    ConocerCertificate.status == 'active'
-                )
-            ).all()
+        current_app.logger.info(f"ZIP creado: {stats.files_added} archivos, {stats.generated} generados nuevos")
         
-        # Crear ZIP en memoria
-        zip_buffer = BytesIO()
-        files_added = 0
-        generated = 0
-        errors = []
+        if stats.files_added == 0:
+            remove_spool(path)
+            return jsonify({
+                'error': 'No hay certificados disponibles para descargar',
+                'details': stats.errors
+            }), 400
         
-        # Mapa de usuarios
-        users_map = {}
-        for m in members:
-            if m.user:
-                users_map[m.user_id] = m.user
+        response = send_file(
+            path,
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name=certificate_zip_filename(group)
+        )
+        response.call_on_close(lambda: remove_spool(path))
+        return response
         
-        current_app.logger.info(f"Procesando {len(results)} resultados para {len(certificate_types)} tipos de certificado")
+    except HTTPException:
         
-        with ZipFile(zip_buffer, 'w') as zip_file:
-            # Procesar tier_basic (Reportes de evaluación)
-            if 'tier_basic' in certificate_types:
-                for r in results:
-                    user = users_map.get(r.user_id)
-                    if not user:
-                        continue
-                    
-                    exam = exams_dict.get(r.exam_id)
-                    if not exam:
-                        continue
-                    
-                    safe_name = ''.join(c for c in user.full_name if c.isalnum() or c in ' -_').strip().replace(' ', '_')
-                    exam_name = exam.name if exam else f'Examen_{r.exam_id}'
-                    safe_exam = ''.join(c for c in exam_name if c.isalnum() or c in ' -_').strip().replace(' ', '_')[:30]
-                    
-                    folder = f"Constancias/{safe_name}"
-                    filename = f"{folder}/{safe_exam}_Reporte_{r.certificate_code or r.id[:8]}.pdf"
-                    
-                    pdf_data = None
-                    
-                    if r.report_url:
-                        # Intentar descargar PDF existente
-                        try:
-                            response = requests.get(r.report_url, timeout=30)
-                            if response.status_code == 200:
-                                pdf_data = response.content
-                        except:
-                            pass
-                    
-                    if not pdf_data:
-                        # Generar PDF nuevo
-                        try:
-                            pdf_buffer = generate_evaluation_report_pdf(r, exam, user)
-                            pdf_data = pdf_buffer.getvalue()
-                            
-                            # Subir a blob y guardar URL
-                            blob_filename = f"report_{r.id}.pdf"
-                            blob_url = upload_pdf_to_blob(pdf_buffer, blob_filename)
-                            if blob_url:
-                                r.report_url = blob_url
-                                db.session.commit()
-                            
-                            generated += 1
-                        except HTTPException:
-                            raise
-                        except Exception as e:
-                            errors.append({'user': user.full_name, 'type': 'tier_basic', 'error': str(e)})
-                            continue
-                    
-                    if pdf_data:
-                        zip_file.writestr(filename, pdf_data)
-                        files_added += 1
-            
-            # Procesar tier_standard (Certificados Eduit)
-            if 'tier_standard' in certificate_types:
-                for r in results:
-                    user = users_map.get(r.user_id)
-                    if not user:
-                        continue
-                    
-                    exam = exams_dict.get(r.exam_id)
-                    if not exam:
-                        continue
-                    
-                    safe_name = ''.join(c for c in user.full_name if c.isalnum() or c in ' -_').strip().replace(' ', '_')
-                    exam_name = exam.name if exam else f'Examen_{r.exam_id}'
-                    safe_exam = ''.join(c for c in exam_name if c.isalnum() or c in ' -_').strip().replace(' ', '_')[:30]
-                    
-                    folder = f"Certificados_Eduit/{safe_name}"
-                    filename = f"{folder}/{safe_exam}_Certificado_{r.eduit_certificate_code or r.id[:8]}.pdf"
-                    
-                    pdf_data = None
-                    
-                    if r.certificate_url:
-                        try:
-                            response = requests.get(r.certificate_url, timeout=30)
-                            if response.status_code == 200:
-                                pdf_data = response.content
-                        except:
-                            pass
-                    
-                    if not pdf_data:
-                        # Generar certificado nuevo
-                        try:
-                            # Asegurar que tenga código de certificado
-                            if not r.eduit_certificate_code:
-                                import uuid
-                                r.eduit_certificate_code = f"EC{uuid.uuid4().hex[:10].upper()}"
-                            
-                            pdf_buffer = generate_certificate_pdf_with_template(r, exam, user)
-                            pdf_data = pdf_buffer.getvalue()
-                            
-                            # Subir a blob
-                            blob_filename = f"certificate_{r.id}.pdf"
-                            blob_url = upload_pdf_to_blob(pdf_buffer, blob_filename)
-                            if blob_url:
-                                r.certificate_url = blob_url
-                                db.session.commit()
-                            
-                            generated += 1
-                        except HTTPException:
-                            raise
-                        except Exception as e:
-                            errors.append({'user': user.full_name, 'type': 'tier_standard', 'error': str(e)})
-                            continue
-                    
-                    if pdf_data:
-                        zip_file.writestr(filename, pdf_data)
-                        files_added += 1
-            
-            # Procesar tier_advanced (CONOCER)
-            if 'tier_advanced' in certificate_types:
-                try:
-                    from app.services.conocer_blob_service import get_conocer_blob_service
-                    blob_service = get_conocer_blob_service()
-                    
-                    for cert in conocer_certs:
-                        user = users_map.get(cert.user_id)
-                        if not user:
-                            continue
-                        
-                        safe_name = ''.join(c for c in user.full_name if c.isalnum() or c in ' -_').strip().replace(' ', '_')
-                        folder = f"Certificados_CONOCER/{safe_name}"
-                        filename = f"{folder}/{cert.standard_code}_{cert.certificate_number}.pdf"
-                        
-                        try:
-                            content, _ = blob_service.download_certificate(cert.blob_name)
-                            if content:
-                                zip_file.writestr(filename, content)
-                                files_added += 1
-                        except HTTPException:
-                            raise
-                        except Exception as e:
-                            errors.append({'user': user.full_name, 'type': 'tier_advanced', 'error': str(e)})
-                except ImportError:
-                    pass
+        raise
         
-        current_app.logger.info(f"ZIP creado: {files_added} archivos, {generated} generados nuevos")
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return _db_error_response(e)
+
+
+@bp.route('/groups/<int:group_id>/certificates/zip-jobs', methods=['POST'])
+@jwt_required()
+@coordinator_required
+def create_group_certificates_zip_job(group_id):
+    """
+    Encolar la generación del ZIP de certificados del grupo en segundo plano.
+    Si ya existe un job en curso o un ZIP vigente con el mismo filtro, se reutiliza.
+    
+    Body:
+    - certificate_types: Array de tipos a incluir ['tier_basic', 'tier_standard', 'tier_advanced']
+    - user_ids: (opcional) Lista de user_ids específicos, o todo el grupo si no se especifica
+    - force: (opcional) true para regenerar aunque exista un ZIP vigente
+    """
+    try:
+        from flask import current_app
+        from app.services.certificate_zip_service import (
+            certificate_zip_job_payload,
+            enqueue_certificate_zip_job,
+            normalize_certificate_types,
+            process_certificate_zip_job_background,
+        )
         
-        if files_added == 0:
-            return jsonify({
-                'error': 'No hay certificados disponibles para descargar',
-                'details': errors
-            }), 400
+        group, error = _verify_group_access(group_id, g.current_user)
+        if error:
+            return error
         
-        # Preparar respuesta
-        zip_buffer.seek(0)
+        data = request.get_json() or {}
+        certificate_types = normalize_certificate_types(
+            data.get('certificate_types', ['tier_basic', 'tier_standard']))
+        if not certificate_types:
+            return jsonify({'error': 'certificate_types no contiene tipos válidos'}), 400
+        user_ids = data.get('user_ids') or None
+        if user_ids is not None and not isinstance(user_ids, list):
+            return jsonify({'error': 'user_ids debe ser una lista'}), 400
+        
+        job, created = enqueue_certificate_zip_job(
+            group_id, certificate_types, user_ids,
+            requested_by=g.current_user.id,
+            force=bool(data.get('force')),
+        )
+        if created:
+            process_certificate_zip_job_background(current_app._get_current_object(), job.id)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        zip_filename = f"Certificados_{group.name}_{timestamp}.zip"
+        return jsonify({
+            'job': certificate_zip_job_payload(job),
+            'reused': not created,
+        }), (200 if job.status == 'completed' else 202)
         
-        from flask import Response
-        return Response(
-            zip_buffer.getvalue(),
-            mimetype='application/zip',
-            headers={
-                'Content-Disposition': f'attachment; filename="{zip_filename}"',
-                'Content-Length': len(zip_buffer.getvalue())
-            }
-        )
+    except HTTPException:
+        
+        raise
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return _db_error_response(e)
+
+
+@bp.route('/groups/<int:group_id>/certificates/zip-jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@coordinator_required
+def get_group_certificates_zip_job(group_id, job_id):
+    """
+    Estado de un job de ZIP de certificados: progreso y, al terminar, la URL
+    SAS de descarga.
+    """
+    try:
+        from app.models.certificate_zip_job import GroupCertificateZipJob
+        from app.services.certificate_zip_service import certificate_zip_job_payload
+        
+        group, error = _verify_group_access(group_id, g.current_user)
+        if error:
+            return error
+        
+        job = GroupCertificateZipJob.query.filter_by(id=job_id, group_id=group_id).first()
+        if not job:
+            return jsonify({'error': 'Job no encontrado'}), 404
+        
+        return jsonify({'job': certificate_zip_job_payload(job)})
         
     except HTTPException:
         
@@ -15158,7 +14361,8 @@ def clear_group_certificates_urls(group_id):
 def get_group_analytics(group_id):
     """
     Dashboard analítico completo del grupo.
-    Agrega datos de miembros, exámenes, resultados, certificados, materiales y ECAs.
+    Agrega datos de miembros, exámenes, resultados, certificados, materiales y ECAs
+    con queries agregadas en SQL (ver app/services/group_analytics.py).
     
     Query params:
     - exam_id (int, optional): Filtrar resultados por examen específico
@@ -15167,353 +14371,18 @@ def get_group_analytics(group_id):
     - certification_status (str, optional): certified|in_progress|failed|pending
     """
     try:
-        from app.models.result import Result
-        from app.models.conocer_certificate import ConocerCertificate
-        from app.models.exam import Exam
-        from app.models.partner import EcmCandidateAssignment, GroupStudyMaterial, GroupStudyMaterialMember
-        from sqlalchemy import and_, func, case
-        from datetime import datetime, timedelta
-        from collections import defaultdict
+        from app.services.group_analytics import build_group_analytics
 
         group, error = _verify_group_access(group_id, g.current_user)
         if error:
             return error
 
-        # Parámetros de filtro
-        exam_id_filter = request.args.get('exam_id', type=int)
-        date_from = request.args.get('date_from')
-        date_to = request.args.get('date_to')
-
-        # ── 1. MIEMBROS ──
-        members = GroupMember.query.filter_by(group_id=group_id, status='active').all()
-        member_user_ids = [m.user_id for m in members]
-        total_members = len(members)
-
-        if total_members == 0:
-            return jsonify({
-                'group': {'id': group.id, 'name': group.name},
-                'members': {'total': 0, 'certified': 0, 'in_progress': 0, 'failed': 0, 'pending': 0, 'with_email': 0, 'with_curp': 0},
-                'exams': {'assigned': 0, 'details': []},
-                'results': {'total': 0, 'completed': 0, 'approved': 0, 'failed': 0, 'in_progress': 0, 'pass_rate': 0, 'avg_score': 0, 'avg_duration_minutes': 0, 'score_distribution': [], 'by_exam': [], 'by_date': []},
-                'certificates': {'tier_basic': {'ready': 0, 'pending': 0}, 'tier_standard': {'ready': 0, 'pending': 0}, 'tier_advanced': 0, 'digital_badge': 0},
-                'materials': {'assigned': 0, 'details': []},
-                'ecm': {'total_assignments': 0, 'unique_ecms': 0, 'details': []},
-            })
-
-        # Conteos de miembros por elegibilidad
-        from app.models.user import User
-        users = User.query.filter(User.id.in_(member_user_ids)).all()
-        users_map = {u.id: u for u in users}
-        with_email = sum(1 for u in users if u.email)
-        with_curp = sum(1 for u in users if u.curp)
-
-        # ── 2. EXÁMENES ASIGNADOS ──
-        group_exams = GroupExam.query.filter_by(group_id=group_id, is_active=True).all()
-        exam_ids = [ge.exam_id for ge in group_exams]
-        exams_map = {}
-        if exam_ids:
-            exams = Exam.query.filter(Exam.id.in_(exam_ids)).all()
-            exams_map = {e.id: e for e in exams}
-
-        exams_detail = []
-        for ge in group_exams:
-            exam = exams_map.get(ge.exam_id)
-            exams_detail.append({
-                'exam_id': ge.exam_id,
-                'exam_name': exam.name if exam else f'Examen #{ge.exam_id}',
-                'assigned_at': ge.assigned_at.isoformat() if ge.assigned_at else None,
-                'passing_score': ge.passing_score or 70,
-                'max_attempts': ge.max_attempts or 1,
-                'time_limit_minutes': ge.time_limit_minutes,
-                'assignment_type': ge.assignment_type,
-            })
-
-        # ── 3. RESULTADOS ──
-        results_query = Result.query.filter(
-            Result.user_id.in_(member_user_ids)
-        )
-        # Filtrar solo exámenes de este grupo si hay group_id en Result
-        if exam_id_filter:
-            results_query = results_query.filter(Result.exam_id == exam_id_filter)
-        if date_from:
-            try:
-                dt_from = datetime.strptime(date_from, '%Y-%m-%d')
-                results_query = results_query.filter(Result.end_date >= dt_from)
-            except ValueError:
-                pass
-        if date_to:
-            try:
-                dt_to = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
-                results_query = results_query.filter(Result.end_date < dt_to)
-            except ValueError:
-                pass
-
-        all_results = results_query.all()
-
-        # Filtrar por exámenes del grupo
-        group_exam_ids_set = set(exam_ids)
-        results = [r for r in all_results if r.exam_id in group_exam_ids_set]
-
-        completed_results = [r for r in results if r.status == 1]
-        approved = [r for r in completed_results if r.result == 1]
-        failed_results = [r for r in completed_results if r.result == 0]
-        in_progress = [r for r in results if r.status == 0]
-
-        scores = [r.score for r in completed_results if r.score is not None]
-        avg_score = round(sum(scores) / len(scores), 1) if scores else 0
-        pass_rate = round((len(approved) / len(completed_results)) * 100, 1) if completed_results else 0
-
-        durations = [r.duration_seconds for r in completed_results if r.duration_seconds and r.duration_seconds > 0]
-        avg_duration_min = round((sum(durations) / len(durations)) / 60, 1) if durations else 0
-
-        # Score distribution (bins: 0-10, 11-20, ..., 91-100)
-        score_bins = [0] * 10
-        for s in scores:
-            idx = min(s // 10, 9)  # 100 → bin 9
-            score_bins[idx] += 1
-        score_distribution = [
-            {'range': f'{i*10}-{i*10+9}' if i < 9 else '90-100', 'count': score_bins[i]}
-            for i in range(10)
-        ]
-
-        # Results by exam
-        by_exam = defaultdict(lambda: {'approved': 0, 'failed': 0, 'in_progress': 0, 'total_score': 0, 'count': 0})
-        for r in results:
-            key = r.exam_id
-            if r.status == 1 and r.result == 1:
-                by_exam[key]['approved'] += 1
-            elif r.status == 1 and r.result == 0:
-                by_exam[key]['failed'] += 1
-            elif r.status == 0:
-                by_exam[key]['in_progress'] += 1
-            if r.status == 1 and r.score is not None:
-                by_exam[key]['total_score'] += r.score
-                by_exam[key]['count'] += 1
-
-        results_by_exam = []
-        for eid, data in by_exam.items():
-            exam = exams_map.get(eid)
-            results_by_exam.append({
-                'exam_id': eid,
-                'exam_name': exam.name if exam else f'Examen #{eid}',
-                'approved': data['approved'],
-                'failed': data['failed'],
-                'in_progress': data['in_progress'],
-                'avg_score': round(data['total_score'] / data['count'], 1) if data['count'] > 0 else 0,
-                'pass_rate': round((data['approved'] / (data['approved'] + data['failed'])) * 100, 1) if (data['approved'] + data['failed']) > 0 else 0,
-            })
-
-        # Results by date (últimos 30 días o rango)
-        by_date = defaultdict(lambda: {'approved': 0, 'failed': 0, 'total': 0})
-        for r in completed_results:
-            if r.end_date:
-                day_key = r.end_date.strftime('%Y-%m-%d')
-                by_date[day_key]['total'] += 1
-                if r.result == 1:
-                    by_date[day_key]['approved'] += 1
-                else:
-                    by_date[day_key]['failed'] += 1
-
-        results_by_date = sorted([
-            {'date': k, 'approved': v['approved'], 'failed': v['failed'], 'total': v['total']}
-            for k, v in by_date.items()
-        ], key=lambda x: x['date'])
-
-        # Certification status per member
-        cert_status = {'certified': 0, 'in_progress': 0, 'failed': 0, 'pending': 0}
-        for uid in member_user_ids:
-            user_results = [r for r in results if r.user_id == uid and r.status == 1]
-            user_approved = [r for r in user_results if r.result == 1]
-            if user_approved:
-                cert_status['certified'] += 1
-            elif user_results:
-                # Has completed but none approved
-                cert_status['failed'] += 1
-            elif any(r.user_id == uid and r.status == 0 for r in results):
-                cert_status['in_progress'] += 1
-            else:
-                cert_status['pending'] += 1
-
-        # ── 4. CERTIFICADOS ──
-        tier_basic_ready = sum(1 for r in approved if r.report_url or r.certificate_code)
-        tier_basic_pending = sum(1 for r in approved if not r.report_url and not r.certificate_code)
-        tier_standard_ready = sum(1 for r in approved if r.certificate_url or r.eduit_certificate_code)
-        tier_standard_pending = sum(1 for r in approved if not r.certificate_url and not r.eduit_certificate_code)
-
-        conocer_certs = ConocerCertificate.query.filter(
-            and_(
-                ConocerCertificate.user_id.in_(member_user_ids),
-                ConocerCertificate.status == 'active'
-            )
-        ).all()
-
-        # ── 5. MATERIALES DE ESTUDIO ──
-        # Materiales directos del grupo
-        group_materials = GroupStudyMaterial.query.filter_by(group_id=group_id).all()
-        materials_detail = []
-        for gm in group_materials:
-            material = gm.study_material
-            assigned_members_count = GroupStudyMaterialMember.query.filter_by(
-                group_study_material_id=gm.id
-            ).count() if gm.assignment_type == 'selected' else total_members
-            materials_detail.append({
-                'id': gm.id,
-                'material_name': material.title if material else f'Material #{gm.study_material_id}',
-                'assigned_at': gm.assigned_at.isoformat() if gm.assigned_at else None,
-                'assigned_members': assigned_members_count,
-                'source': 'direct',
-            })
-        
-        # Materiales vinculados a exámenes del grupo (via GroupExamMaterial)
-        from app.models.partner import GroupExamMaterial
-        from app.models.study_content import StudyMaterial
-        seen_material_ids = set(gm.study_material_id for gm in group_materials)
-        for ge in group_exams:
-            # Custom materials del group_exam
-            custom_mats = GroupExamMaterial.query.filter_by(group_exam_id=ge.id, is_included=True).all()
-            if custom_mats:
-                mat_ids = [cm.study_material_id for cm in custom_mats if cm.study_material_id not in seen_material_ids]
-                if mat_ids:
-                    study_mats = StudyMaterial.query.filter(StudyMaterial.id.in_(mat_ids)).all()
-                    for sm in study_mats:
-                        seen_material_ids.add(sm.id)
-                        materials_detail.append({
-                            'id': f'exam-{ge.exam_id}-{sm.id}',
-                            'material_name': sm.title,
-                            'assigned_at': ge.assigned_at.isoformat() if ge.assigned_at else None,
-                            'assigned_members': total_members,
-                            'source': 'exam',
-                            'exam_name': exams_map.get(ge.exam_id, None) and exams_map[ge.exam_id].name or f'Examen #{ge.exam_id}',
-                        })
-            else:
-                # Sin personalizaciones: buscar materiales vinculados al examen
-                try:
-                    from sqlalchemy import text as sa_text
-                    linked = db.session.execute(sa_text('''
-                        SELECT sc.id, sc.title
-                        FROM study_contents sc
-                        INNER JOIN study_material_exams sme ON sc.id = sme.study_material_id
-                        WHERE sme.exam_id = :exam_id AND sc.is_published = 1
-                    '''), {'exam_id': ge.exam_id}).fetchall()
-                    for row in linked:
-                        if row[0] not in seen_material_ids:
-                            seen_material_ids.add(row[0])
-                            materials_detail.append({
-                                'id': f'exam-{ge.exam_id}-{row[0]}',
-                                'material_name': row[1],
-                                'assigned_at': ge.assigned_at.isoformat() if ge.assigned_at else None,
-                                'assigned_members': total_members,
-                                'source': 'exam',
-                                'exam_name': exams_map.get(ge.exam_id, None) and exams_map[ge.exam_id].name or f'Examen #{ge.exam_id}',
-                            })
-                except Exception:
-                    pass
-
-        # ── 6. ECAs ──
-        # Buscar ECAs por group_id O por combinación user_id + exam_ids del grupo
-        from sqlalchemy import or_
-        eca_filters = [EcmCandidateAssignment.user_id.in_(member_user_ids)]
-        if exam_ids:
-            ecas = EcmCandidateAssignment.query.filter(
-                and_(
-                    EcmCandidateAssignment.user_id.in_(member_user_ids),
-                    or_(
-                        EcmCandidateAssignment.group_id == group_id,
-                        EcmCandidateAssignment.exam_id.in_(exam_ids)
-                    )
-                )
-            ).all()
-        else:
-            ecas = EcmCandidateAssignment.query.filter(
-                and_(
-                    EcmCandidateAssignment.user_id.in_(member_user_ids),
-                    EcmCandidateAssignment.group_id == group_id
-                )
-            ).all()
-
-        ecm_summary = defaultdict(lambda: {'count': 0, 'ecm_name': '', 'ecm_code': '', 'logo_url': None})
-        for eca in ecas:
-            key = eca.competency_standard_id
-            ecm_summary[key]['count'] += 1
-            if eca.competency_standard:
-                ecm_summary[key]['ecm_name'] = eca.competency_standard.name
-                ecm_summary[key]['ecm_code'] = eca.competency_standard.code
-                ecm_summary[key]['logo_url'] = eca.competency_standard.logo_url
-
-        ecm_details = [
-            {'ecm_id': k, 'ecm_name': v['ecm_name'], 'ecm_code': v['ecm_code'], 'assignments': v['count'], 'logo_url': v['logo_url']}
-            for k, v in ecm_summary.items()
-        ]
-
-        # ── 7. TOP PERFORMERS ──
-        user_best_scores = defaultdict(lambda: {'score': 0, 'count': 0, 'total_score': 0})
-        for r in completed_results:
-            user_best_scores[r.user_id]['count'] += 1
-            user_best_scores[r.user_id]['total_score'] += (r.score or 0)
-            if (r.score or 0) > user_best_scores[r.user_id]['score']:
-                user_best_scores[r.user_id]['score'] = r.score or 0
-
-        top_performers = sorted([
-            {
-                'user_id': uid,
-                'full_name': users_map[uid].full_name if uid in users_map else 'Desconocido',
-                'best_score': data['score'],
-                'avg_score': round(data['total_score'] / data['count'], 1) if data['count'] > 0 else 0,
-                'exams_completed': data['count'],
-            }
-            for uid, data in user_best_scores.items()
-        ], key=lambda x: x['avg_score'], reverse=True)[:10]
-
-        return jsonify({
-            'group': {
-                'id': group.id,
-                'name': group.name,
-                'campus_name': group.campus.name if group.campus else None,
-                'partner_name': group.campus.partner.name if group.campus and group.campus.partner else None,
-            },
-            'members': {
-                'total': total_members,
-                'certified': cert_status['certified'],
-                'in_progress': cert_status['in_progress'],
-                'failed': cert_status['failed'],
-                'pending': cert_status['pending'],
-                'with_email': with_email,
-                'with_curp': with_curp,
-            },
-            'exams': {
-                'assigned': len(group_exams),
-                'details': exams_detail,
-            },
-            'results': {
-                'total': len(results),
-                'completed': len(completed_results),
-                'approved': len(approved),
-                'failed': len(failed_results),
-                'in_progress': len(in_progress),
-                'pass_rate': pass_rate,
-                'avg_score': avg_score,
-                'avg_duration_minutes': avg_duration_min,
-                'score_distribution': score_distribution,
-                'by_exam': results_by_exam,
-                'by_date': results_by_date,
-            },
-            'certificates': {
-                'tier_basic': {'ready': tier_basic_ready, 'pending': tier_basic_pending},
-                'tier_standard': {'ready': tier_standard_ready, 'pending': tier_standard_pending},
-                'tier_advanced': len(conocer_certs),
-                'digital_badge': len(approved),
-            },
-            'materials': {
-                'assigned': len(materials_detail),
-                'details': materials_detail,
-            },
-            'ecm': {
-                'total_assignments': len(ecas),
-                'unique_ecms': len(ecm_summary),
-                'details': ecm_details,
-            },
-            'top_performers': top_performers,
-        })
+        return jsonify(build_group_analytics(
+            group,
+            exam_id_filter=request.args.get('exam_id', type=int),
+            date_from=request.args.get('date_from'),
+            date_to=request.args.get('date_to'),
+        ))
 
     except HTTPException:
 
@@ -18774,11 +17643,16 @@ def export_mi_partner_certificates_excel():
 @jwt_required()
 @responsable_partner_required
 def download_mi_partner_certificates_zip():
-    """Descargar todos los certificados filtrados como ZIP organizado por candidato"""
-    from app.models import Result, Exam
+    """Descargar todos los certificados filtrados como ZIP organizado por candidato.
+
+    El ZIP se envía por streaming: los PDFs se descargan en un pool acotado y
+    se escriben al response conforme llegan (ver app/utils/zip_stream.py).
+    """
+    from flask import Response
+    from app.models import Result
     from app.models.conocer_certificate import ConocerCertificate
     from app.services.conocer_blob_service import get_conocer_blob_service
-    import zipfile
+    from app.utils.zip_stream import stream_zip
     import re
     import urllib.request
     import urllib.error
@@ -18798,160 +17672,116 @@ def download_mi_partner_certificates_zip():
             campus_query = campus_query.filter_by(state_name=state_filter)
         if campus_filter:
             campus_query = campus_query.filter_by(id=int(campus_filter))
-        campuses = campus_query.all()
-        campus_ids = [c.id for c in campuses]
-        campus_map = {c.id: c for c in campuses}
+        campus_ids = [c.id for c in campus_query.with_entities(Campus.id).all()]
         
-        # Obtener grupos y miembros
+        # Obtener grupos
         group_query = CandidateGroup.query.filter(CandidateGroup.campus_id.in_(campus_ids))
         if group_filter:
             group_query = group_query.filter_by(id=int(group_filter))
-        all_groups = group_query.all()
-        group_ids = [gr.id for gr in all_groups]
-        group_map = {gr.id: gr for gr in all_groups}
+        group_ids = [gr.id for gr in group_query.with_entities(CandidateGroup.id).all()] if campus_ids else []
         
-        member_rows = db.session.query(GroupMember.user_id, GroupMember.group_id).filter(
+        # Candidatos como subquery (evita listas IN de miles de parámetros)
+        candidates_q = db.session.query(GroupMember.user_id).filter(
             GroupMember.group_id.in_(group_ids), GroupMember.status == 'active'
-        ).all() if group_ids else []
-        
-        user_group_map = {}
-        for uid, gid in member_rows:
-            if uid not in user_group_map:
-                user_group_map[uid] = gid
-        candidate_ids = list(user_group_map.keys())
-        
-        if not candidate_ids:
+        )
+        if not group_ids or candidates_q.first() is None:
             return jsonify({'error': 'No se encontraron candidatos con los filtros seleccionados'}), 404
         
+        # Búsqueda común
+        if search:
+            candidates_q = db.session.query(User.id).filter(
+                User.id.in_(candidates_q),
+                db.or_(User.name.ilike(f'%{search}%'), User.first_surname.ilike(f'%{search}%'), User.curp.ilike(f'%{search}%'))
+            )
+        
         # Helper: limpiar nombre para filesystem
         def safe_name(name):
             name = re.sub(r'[<>:"/\\|?*]', '_', name or 'Sin_Nombre')
             return name.strip().replace('  ', ' ')[:80]
         
-        # Recolectar archivos para el ZIP: lista de (folder, filename, get_content_fn)
-        zip_entries = []
-        errors = []
-        
-        # Búsqueda común
-        search_uids = None
-        if search and candidate_ids:
-            matching = User.query.filter(
-                User.id.in_(candidate_ids),
-                db.or_(User.name.ilike(f'%{search}%'), User.first_surname.ilike(f'%{search}%'), User.curp.ilike(f'%{search}%'))
-            ).with_entities(User.id).all()
-            search_uids = [u[0] for u in matching]
+        # Carpeta por candidato, con todos los usuarios en una sola query
+        folders = {}
+        for uid, name, first_surname, second_surname, curp in db.session.query(
+            User.id, User.name, User.first_surname, User.second_surname, User.curp
+        ).filter(User.id.in_(candidates_q)).all():
+            full_name = ' '.join(p for p in (name, first_surname, second_surname) if p)
+            folder = safe_name(full_name or 'Sin_Nombre')
+            curp = (curp or '').strip()
+            folders[uid] = f"{folder}_{curp}" if curp else folder
         
-        # Cache de usuarios
-        user_cache = {}
-        def get_user(uid):
-            if uid not in user_cache:
-                user_cache[uid] = User.query.get(uid)
-            return user_cache[uid]
+        def make_folder(uid):
+            return folders.get(uid) or safe_name('Sin_Nombre')
         
-        def make_folder(u):
-            name = safe_name(u.full_name if u else 'Sin_Nombre')
-            curp = (getattr(u, 'curp', '') or '').strip()
-            return f"{name}_{curp}" if curp else name
+        # Recolectar archivos para el ZIP: lista de (ruta, (tipo, source))
+        zip_entries = []
         
         # --- Reportes de Evaluación ---
         if not cert_type_filter or cert_type_filter == 'reporte_evaluacion':
-            base_q = Result.query.filter(
-                Result.user_id.in_(candidate_ids), Result.status == 1, Result.result == 1,
+            rows = db.session.query(
+                Result.id, Result.user_id, Result.certificate_code, Result.report_url
+            ).filter(
+                Result.user_id.in_(candidates_q), Result.status == 1, Result.result == 1,
                 Result.report_url.isnot(None)
-            ) if candidate_ids else Result.query.filter(False)
-            if search_uids is not None:
-                base_q = base_q.filter(Result.user_id.in_(search_uids)) if search_uids else base_q.filter(False)
-            
-            for r in base_q.all():
-                u = get_user(r.user_id)
-                folder = make_folder(u)
-                code = r.certificate_code or str(r.id)
-                filename = f"Reporte_Evaluacion_{code}.pdf"
-                url = r.report_url
-                zip_entries.append((folder, filename, 'url', url))
+            ).all()
+            for rid, uid, certificate_code, report_url in rows:
+                code = certificate_code or str(rid)
+                zip_entries.append((f"{make_folder(uid)}/Reporte_Evaluacion_{code}.pdf", ('url', report_url)))
         
         # --- Certificados Eduit ---
         if not cert_type_filter or cert_type_filter == 'certificado_eduit':
-            base_q = Result.query.filter(
-                Result.user_id.in_(candidate_ids), Result.status == 1, Result.result == 1,
+            rows = db.session.query(
+                Result.id, Result.user_id, Result.eduit_certificate_code, Result.certificate_url
+            ).filter(
+                Result.user_id.in_(candidates_q), Result.status == 1, Result.result == 1,
                 Result.certificate_url.isnot(None)
-            ) if candidate_ids else Result.query.filter(False)
-            if search_uids is not None:
-                base_q = base_q.filter(Result.user_id.in_(search_uids)) if search_uids else base_q.filter(False)
-            
-            for r in base_q.all():
-                u = get_user(r.user_id)
-                folder = make_folder(u)
-                code = r.eduit_certificate_code or str(r.id)
-                filename = f"Certificado_Eduit_{code}.pdf"
-                url = r.certificate_url
-                zip_entries.append((folder, filename, 'url', url))
+            ).all()
+            for rid, uid, eduit_code, certificate_url in rows:
+                code = eduit_code or str(rid)
+                zip_entries.append((f"{make_folder(uid)}/Certificado_Eduit_{code}.pdf", ('url', certificate_url)))
         
         # --- Certificados CONOCER ---
         if not cert_type_filter or cert_type_filter == 'certificado_conocer':
-            conocer_q = ConocerCertificate.query.filter(
-                ConocerCertificate.user_id.in_(candidate_ids), ConocerCertificate.status == 'active'
-            ) if candidate_ids else ConocerCertificate.query.filter(False)
-            if search_uids is not None:
-                conocer_q = conocer_q.filter(ConocerCertificate.user_id.in_(search_uids)) if search_uids else conocer_q.filter(False)
-            
-            for cc in conocer_q.all():
-                if cc.blob_name:
-                    u = get_user(cc.user_id)
-                    folder = make_folder(u)
-                    code = cc.certificate_number or str(cc.id)
-                    std = cc.standard_code or ''
-                    filename = f"CONOCER_{std}_{code}.pdf"
-                    zip_entries.append((folder, filename, 'blob', cc.blob_name))
+            rows = db.session.query(
+                ConocerCertificate.id, ConocerCertificate.user_id, ConocerCertificate.certificate_number,
+                ConocerCertificate.standard_code, ConocerCertificate.blob_name
+            ).filter(
+                ConocerCertificate.user_id.in_(candidates_q), ConocerCertificate.status == 'active'
+            ).all()
+            for cid, uid, certificate_number, standard_code, blob_name in rows:
+                if blob_name:
+                    code = certificate_number or str(cid)
+                    filename = f"CONOCER_{standard_code or ''}_{code}.pdf"
+                    zip_entries.append((f"{make_folder(uid)}/{filename}", ('blob', blob_name)))
         
         if not zip_entries:
             return jsonify({'error': 'No se encontraron certificados descargables con los filtros seleccionados'}), 404
         
-        # Crear ZIP en memoria
-        zip_buffer = BytesIO()
-        blob_service = None
+        blob_service = get_conocer_blob_service() if any(src[0] == 'blob' for _, src in zip_entries) else None
         
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-            added_paths = set()
-            for folder, filename, source_type, source in zip_entries:
-                path = f"{folder}/{filename}"
-                # Evitar duplicados
-                if path in added_paths:
-                    continue
-                added_paths.add(path)
-                
-                try:
-                    if source_type == 'url':
-                        req = urllib.request.Request(source, headers={'User-Agent': 'Mozilla/5.0'})
-                        with urllib.request.urlopen(req, timeout=30) as resp:
-                            content = resp.read()
-                    elif source_type == 'blob':
-                        if blob_service is None:
-                            blob_service = get_conocer_blob_service()
-                        content, _ = blob_service.download_certificate(source)
-                    else:
-                        continue
-                    
-                    zf.writestr(path, content)
-                except HTTPException:
-                    raise
-                except Exception as e:
-                    errors.append(f"{path}: {str(e)[:100]}")
-                    continue
+        def fetch(source):
+            source_type, location = source
+            if source_type == 'url':
+                req = urllib.request.Request(location, headers={'User-Agent': 'Mozilla/5.0'})
+                with urllib.request.urlopen(req, timeout=30) as resp:
+                    return resp.read()
+            content, _ = blob_service.download_certificate(location)
+            return content
         
-        zip_buffer.seek(0)
+        total = len(zip_entries)
+        partner_id = partner.id
         
-        if errors:
-            from flask import current_app
-            current_app.logger.warning(f"ZIP download: {len(errors)} errores de {len(zip_entries)} archivos: {errors[:5]}")
+        def log_result(written, errors):
+            if errors:
+                print(f"[MI-PARTNER-ZIP] {len(errors)} errores de {total} archivos: {errors[:5]}")
+            print(f"[MI-PARTNER-ZIP] partner={partner_id}: {written}/{total} archivos enviados")
         
         filename = f"Certificados_{safe_name(partner.name)}_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
         
-        return send_file(
-            zip_buffer,
+        return Response(
+            stream_zip(zip_entries, fetch, on_finish=log_result),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name=filename,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+            direct_passthrough=True,
         )
     except HTTPException:
         raise
@@ -20064,8 +18894,12 @@ def get_report_filters():
         return _db_error_response(e)
 
 
-def _build_reports_query(user, params):
-    """Construye query de reportes con granularidad progresiva.
+_REPORT_CHUNK_USERS = 500          # usuarios por lote al generar filas de reporte
+_REPORT_XLSX_WIDTH_SAMPLE = 200    # filas usadas para calcular anchos de columna
+
+
+def _reports_scope(user, params):
+    """Resuelve categorías, filtros y scope de un reporte sin materializar filas.
 
     Categorías (cada una multiplica filas según nivel):
       - usuario:        base — 1 fila por usuario en scope
@@ -20077,12 +18911,10 @@ def _build_reports_query(user, params):
     Dependencias:
       resultado/certificacion → requiere estandar → requiere organizacion
 
-    Retorna (rows, total_count).
+    El scope de grupos y usuarios queda como subqueries SQL componibles
+    (`group_ids_q`, `user_query`): ni los ids de usuarios ni las filas se
+    cargan aquí. Retorna un dict de contexto o None si el scope está vacío.
     """
-    from app.models.exam import Exam
-    from app.models.brand import Brand
-    from app.models.partner import EcmCandidateAssignment
-
     is_resp = user.role == 'responsable'
 
     # ── Categorías activas ──
@@ -20103,7 +18935,8 @@ def _build_reports_query(user, params):
 
     coord_id = _get_coordinator_filter(user)
 
-    # ── Obtener user_ids en scope ──
+    group_ids_q = None
+    accessible_campus_ids = []
     if has_org:
         # --- Scope por grupos ---
         partner_id_filter = params.get('partner_id', type=int)
@@ -20116,38 +18949,23 @@ def _build_reports_query(user, params):
         )
 
         if not accessible_campus_ids:
-            return [], 0
+            return None
 
         group_filter = params.get('group_id', type=int)
         cycle_filter = params.get('school_cycle_id', type=int)
-        gq = CandidateGroup.query.filter(CandidateGroup.campus_id.in_(accessible_campus_ids))
+        group_ids_q = db.session.query(CandidateGroup.id).filter(
+            CandidateGroup.campus_id.in_(accessible_campus_ids)
+        )
         if coord_id:
-            gq = gq.filter(CandidateGroup.coordinator_id == coord_id)
+            group_ids_q = group_ids_q.filter(CandidateGroup.coordinator_id == coord_id)
         if group_filter:
-            gq = gq.filter(CandidateGroup.id == group_filter)
+            group_ids_q = group_ids_q.filter(CandidateGroup.id == group_filter)
         if cycle_filter:
-            gq = gq.filter(CandidateGroup.school_cycle_id == cycle_filter)
-        groups_list = gq.all()
-        group_ids = [gr.id for gr in groups_list]
-
-        if not group_ids:
-            return [], 0
-
-        member_rows = db.session.query(
-            GroupMember.user_id, GroupMember.group_id,
-            GroupMember.status, GroupMember.joined_at
-        ).filter(
-            GroupMember.group_id.in_(group_ids),
-        ).all()
+            group_ids_q = group_ids_q.filter(CandidateGroup.school_cycle_id == cycle_filter)
 
-        user_ids = list({m[0] for m in member_rows})
-        if not user_ids:
-            return [], 0
-
-        # user_id → [(group_id, status, joined_at)]
-        user_memberships = {}
-        for uid, gid, st, joined in member_rows:
-            user_memberships.setdefault(uid, []).append((gid, st, joined))
+        user_query = User.query.filter(User.id.in_(
+            db.session.query(GroupMember.user_id).filter(GroupMember.group_id.in_(group_ids_q))
+        ))
     else:
         # --- Solo usuarios: scope directo sin grupos ---
         # Estrategia: combinar (a) usuarios con User.campus_id directo y
@@ -20165,41 +18983,24 @@ def _build_reports_query(user, params):
             scope_campus_ids = None  # admin/developer: sin restricción
 
         if scope_campus_ids is None:
-            uq = User.query
+            user_query = User.query
         elif not scope_campus_ids:
-            uq = User.query.filter(db.literal(False))
+            return None
         else:
-            # (a) usuarios con campus_id directo dentro del scope
-            direct_q = User.query.filter(User.campus_id.in_(scope_campus_ids)).with_entities(User.id)
-            # (b) usuarios miembros de cualquier grupo de los campuses del scope
-            scope_group_ids = [
-                g_id for (g_id,) in db.session.query(CandidateGroup.id)
-                .filter(CandidateGroup.campus_id.in_(scope_campus_ids)).all()
-            ]
-            if scope_group_ids:
-                member_q = db.session.query(GroupMember.user_id).filter(
-                    GroupMember.group_id.in_(scope_group_ids),
-                    GroupMember.status.notin_(['curp_pending', 'curp_verifying']),
-                )
-                allowed_ids = {uid for (uid,) in direct_q.all()} | {uid for (uid,) in member_q.all()}
-            else:
-                allowed_ids = {uid for (uid,) in direct_q.all()}
-            if not allowed_ids:
-                return [], 0
-            uq = User.query.filter(User.id.in_(list(allowed_ids)))
-
-        uq = uq.filter(User.role.in_(['candidato', 'responsable']))
-        user_ids = [u.id for u in uq.with_entities(User.id).all()]
-        user_memberships = {}
-        group_ids = []
-        accessible_campus_ids = []
+            member_q = db.session.query(GroupMember.user_id).join(
+                CandidateGroup, CandidateGroup.id == GroupMember.group_id
+            ).filter(
+                CandidateGroup.campus_id.in_(scope_campus_ids),
+                GroupMember.status.notin_(['curp_pending', 'curp_verifying']),
+            )
+            user_query = User.query.filter(db.or_(
+                User.campus_id.in_(scope_campus_ids),
+                User.id.in_(member_q),
+            ))
 
-    if not user_ids:
-        return [], 0
+        user_query = user_query.filter(User.role.in_(['candidato', 'responsable']))
 
     # ── Filtros a nivel usuario ──
-    user_query = User.query.filter(User.id.in_(user_ids))
-
     role_filter = params.get('role')
     if role_filter:
         user_query = user_query.filter(User.role == role_filter)
@@ -20225,91 +19026,168 @@ def _build_reports_query(user, params):
     if curp_verified_filter is not None and curp_verified_filter != '':
         user_query = user_query.filter(User.curp_verified == (curp_verified_filter in ('1', 'true')))
 
-    users = user_query.order_by(User.first_surname, User.name).all()
-    users_map = {u.id: u for u in users}
-    filtered_user_ids = [u.id for u in users]
+    return {
+        'user': user,
+        'has_org': has_org,
+        'has_std': has_std,
+        'has_res': has_res,
+        'has_cert': has_cert,
+        'group_ids_q': group_ids_q,
+        'user_query': user_query,
+        'std_filter': params.get('standard_id', type=int),
+        'brand_filter': params.get('brand_id', type=int),
+        'result_filter': params.get('result'),
+        'result_mode': params.get('result_mode'),
+    }
 
-    if not filtered_user_ids:
-        return [], 0
 
-    # ── Precargar datos de organización ──
+def _report_result_conditions(ctx, ecm_model):
+    """Condiciones de Result para los intentos de una asignación ECM."""
+    conds = [
+        Result.user_id == ecm_model.user_id,
+        Result.exam_id == ecm_model.exam_id,
+        Result.status == 1,
+    ]
+    if ctx['result_mode'] == 'simulator':
+        conds.append(Result.mode == 'simulator')
+    elif ctx['result_mode'] == 'exam':
+        conds.append(db.or_(Result.mode == 'exam', Result.mode.is_(None)))
+    return conds
+
+
+def _count_report_rows(ctx):
+    """Total de filas del reporte calculado en SQL (sin construir filas).
+
+    Replica las reglas de _iter_report_rows: una fila por membresía sin ECM,
+    deduplicación por (usuario, examen, estándar) en nivel estándar y en
+    "Sin evaluar", y por id de resultado en nivel resultado.
+    """
+    from app.models.brand import Brand
+    from app.models.partner import EcmCandidateAssignment
+
+    def _count(q):
+        return db.session.query(db.func.count()).select_from(q.order_by(None).subquery()).scalar() or 0
+
+    user_ids_q = ctx['user_query'].with_entities(User.id).order_by(None)
+    if not ctx['has_org']:
+        return _count(user_ids_q)
+
+    members_q = db.session.query(GroupMember.user_id, GroupMember.group_id).filter(
+        GroupMember.user_id.in_(user_ids_q),
+        GroupMember.group_id.in_(ctx['group_ids_q']),
+    )
+    if not ctx['has_std']:
+        return _count(members_q)
+
+    Ecm = EcmCandidateAssignment
+    result_filter = ctx['result_filter']
+    total = 0
+
+    # Membresías sin ninguna asignación ECM → fila con estándar vacío
+    if not result_filter:
+        total += _count(members_q.filter(~db.exists().where(db.and_(
+            Ecm.user_id == GroupMember.user_id,
+            Ecm.group_id == GroupMember.group_id,
+        ))))
+
+    ecm_q = db.session.query(Ecm.user_id, Ecm.exam_id, Ecm.competency_standard_id).join(
+        GroupMember, db.and_(GroupMember.user_id == Ecm.user_id, GroupMember.group_id == Ecm.group_id)
+    ).filter(
+        GroupMember.user_id.in_(user_ids_q),
+        GroupMember.group_id.in_(ctx['group_ids_q']),
+    )
+    if ctx['std_filter'] or ctx['brand_filter']:
+        ecm_q = ecm_q.join(CompetencyStandard, CompetencyStandard.id == Ecm.competency_standard_id)
+    if ctx['std_filter']:
+        ecm_q = ecm_q.filter(CompetencyStandard.id == ctx['std_filter'])
+    if ctx['brand_filter']:
+        ecm_q = ecm_q.join(Brand, Brand.id == CompetencyStandard.brand_id).filter(Brand.id == ctx['brand_filter'])
+
+    if not ctx['has_res']:
+        return total + _count(ecm_q.distinct())
+
+    result_conds = _report_result_conditions(ctx, Ecm)
+    attempts_q = ecm_q.join(Result, db.and_(*result_conds)).with_entities(Result.id)
+    if result_filter == 'approved':
+        attempts_q = attempts_q.filter(Result.result == 1)
+    elif result_filter == 'rejected':
+        attempts_q = attempts_q.filter(Result.result == 0)
+    total += _count(attempts_q.distinct())
+
+    # Asignaciones sin intentos → fila "Sin evaluar"
+    if not result_filter:
+        total += _count(ecm_q.filter(~db.exists().where(db.and_(*result_conds))).distinct())
+    return total
+
+
+def _report_keyset_filter(key, inclusive):
+    """Condición (first_surname, name, id) > key para paginación keyset."""
+    first_surname, name, user_id = key
+    id_cond = User.id >= user_id if inclusive else User.id > user_id
+    return db.or_(
+        User.first_surname > first_surname,
+        db.and_(User.first_surname == first_surname, User.name > name),
+        db.and_(User.first_surname == first_surname, User.name == name, id_cond),
+    )
+
+
+def _encode_report_cursor(key, index):
+    import base64
+    import json as _json
+    raw = _json.dumps([key[0], key[1], key[2], index], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_report_cursor(value):
+    """Retorna ((first_surname, name, user_id), fila_en_usuario) o lanza ValueError."""
+    import base64
+    import json as _json
+    try:
+        first_surname, name, user_id, index = _json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    if not isinstance(index, int) or index < 0:
+        raise ValueError('Cursor inválido')
+    return (first_surname, name, user_id), index
+
+
+def _iter_report_rows(ctx, start=None):
+    """Genera las filas del reporte en orden (apellido, nombre, id) por lotes.
+
+    Carga `_REPORT_CHUNK_USERS` usuarios por query keyset y sólo las
+    membresías, asignaciones y resultados de ese lote, así que la memoria no
+    depende del tamaño del partner. Catálogos (grupos, planteles, estándares…)
+    se cargan bajo demanda y se reutilizan entre lotes.
+
+    Args:
+        start: (key, index) de _decode_report_cursor para reanudar.
+
+    Yields (key_usuario, índice_de_fila_en_usuario, row).
+    """
+    from app.models.exam import Exam
+    from app.models.brand import Brand
+    from app.models.partner import EcmCandidateAssignment
+
+    user = ctx['user']
+    has_org, has_std = ctx['has_org'], ctx['has_std']
+    has_res, has_cert = ctx['has_res'], ctx['has_cert']
+    std_filter = ctx['std_filter']
+    brand_filter = ctx['brand_filter']
+    result_filter = ctx['result_filter']
+
     all_groups = {}
     all_campuses = {}
     all_partners = {}
     all_cycles = {}
-    if has_org:
-        all_groups = {g.id: g for g in CandidateGroup.query.filter(CandidateGroup.id.in_(group_ids)).all()}
-        all_campuses = {c.id: c for c in Campus.query.filter(Campus.id.in_(accessible_campus_ids)).all()}
-        pid_set = {c.partner_id for c in all_campuses.values()}
-        all_partners = {p.id: p for p in Partner.query.filter(Partner.id.in_(pid_set)).all()} if pid_set else {}
-        cyc_ids = {g.school_cycle_id for g in all_groups.values() if g.school_cycle_id}
-        all_cycles = {c.id: c for c in SchoolCycle.query.filter(SchoolCycle.id.in_(cyc_ids)).all()} if cyc_ids else {}
-
-    # ── Precargar ECM assignments ──
-    ecm_map = {}          # user_id → {group_id → [assignment]}
     all_standards = {}
     all_exams = {}
     all_brands = {}
-    if has_std:
-        ecm_q = EcmCandidateAssignment.query.filter(
-            EcmCandidateAssignment.user_id.in_(filtered_user_ids),
-        )
-        if group_ids:
-            ecm_q = ecm_q.filter(EcmCandidateAssignment.group_id.in_(group_ids))
-        ecm_assignments = ecm_q.all()
-
-        for ea in ecm_assignments:
-            ecm_map.setdefault(ea.user_id, {}).setdefault(ea.group_id, []).append(ea)
-
-        std_ids = {ea.competency_standard_id for ea in ecm_assignments if ea.competency_standard_id}
-        all_standards = {s.id: s for s in CompetencyStandard.query.filter(CompetencyStandard.id.in_(std_ids)).all()} if std_ids else {}
-        exam_ids_set = {ea.exam_id for ea in ecm_assignments if ea.exam_id}
-        all_exams = {e.id: e for e in Exam.query.filter(Exam.id.in_(exam_ids_set)).all()} if exam_ids_set else {}
-        brand_ids_set = {s.brand_id for s in all_standards.values() if s.brand_id}
-        all_brands = {b.id: b for b in Brand.query.filter(Brand.id.in_(brand_ids_set)).all()} if brand_ids_set else {}
-
-    # ── Precargar resultados ──
-    results_map = {}      # (user_id, exam_id) → [Result] desc by date
-    result_opportunity_map = {}  # result_id -> numero de oportunidad (1,2,3...) por user+exam
-    best_results = {}     # (user_id, exam_id) → best Result
-    if has_res or has_cert:
-        results_q = Result.query.filter(
-            Result.user_id.in_(filtered_user_ids),
-            Result.status == 1,
-        )
-        # Filtro por modo (exam / simulator)
-        result_mode = params.get('result_mode')
-        if result_mode == 'simulator':
-            results_q = results_q.filter(Result.mode == 'simulator')
-        elif result_mode == 'exam':
-            results_q = results_q.filter(db.or_(Result.mode == 'exam', Result.mode.is_(None)))
-        results = results_q.order_by(Result.end_date.desc()).all()
-
-        for r in results:
-            key = (r.user_id, r.exam_id)
-            results_map.setdefault(key, []).append(r)
-            if key not in best_results:
-                best_results[key] = r
-            else:
-                existing = best_results[key]
-                if r.result == 1 and existing.result != 1:
-                    best_results[key] = r
-                elif r.result == existing.result and (r.score or 0) > (existing.score or 0):
-                    best_results[key] = r
-
-        # Numerar oportunidades en orden cronológico (intento 1 = más antiguo)
-        for _, attempts in results_map.items():
-            ordered_attempts = sorted(
-                attempts,
-                key=lambda rr: (rr.end_date or rr.start_date or rr.created_at, rr.created_at)
-            )
-            for idx, rr in enumerate(ordered_attempts, start=1):
-                result_opportunity_map[rr.id] = idx
 
-    # ── Filtros post-query ──
-    std_filter = params.get('standard_id', type=int)
-    brand_filter = params.get('brand_id', type=int)
-    result_filter = params.get('result')
+    def _load_missing(model, ids, store):
+        missing = {i for i in ids if i is not None and i not in store}
+        if missing:
+            for obj in model.query.filter(model.id.in_(missing)).all():
+                store[obj.id] = obj
 
     # ── Helpers para crear campos por categoría ──
     # Timezone de México para formateo de fechas de registro
@@ -20396,7 +19274,7 @@ def _build_reports_query(user, params):
             'assigned_at': ea.assigned_at.isoformat() if ea and ea.assigned_at else None,
         }
 
-    def _result_fields(res):
+    def _result_fields(res, opportunity_map):
         if not res:
             return {'score': None, 'result': 'Sin evaluar',
                     'result_date': None, 'duration_seconds': None,
@@ -20407,7 +19285,7 @@ def _build_reports_query(user, params):
             'result': 'Aprobado' if res.result == 1 else 'Reprobado',
             'result_date': res.end_date.isoformat() if res.end_date else None,
             'duration_seconds': res.duration_seconds,
-            'opportunity_number': result_opportunity_map.get(res.id),
+            'opportunity_number': opportunity_map.get(res.id),
         }
 
     def _cert_fields(res, ea):
@@ -20420,34 +19298,30 @@ def _build_reports_query(user, params):
 
     EMPTY_ORG  = _org_fields(None, None, None, None)
     EMPTY_STD  = _std_fields(None, None, None, None)
-    EMPTY_RES  = _result_fields(None)
+    EMPTY_RES  = _result_fields(None, {})
     EMPTY_CERT = _cert_fields(None, None)
 
-    # ── Construir filas según nivel de profundidad ──
-    # Deduplicación: evitar filas idénticas cuando un usuario está en
-    # múltiples grupos con el mismo examen/estándar/resultado.
-    _emitted_result_ids = set()   # result.id ya emitidos
-    _emitted_std_keys = set()     # (uid, exam_id, std_id) ya emitidos (depth 2)
-    rows = []
-    for uid in filtered_user_ids:
-        u = users_map[uid]
+    def _rows_for_user(u, memberships, ecm_map, results_map, best_results, opportunity_map):
+        """Filas de un usuario según nivel de profundidad."""
         base = _user_fields(u)
 
         # ─ Depth 0: solo usuario ─
         if not has_org:
-            rows.append(base)
-            continue
+            return [base]
 
-        memberships = user_memberships.get(uid, [])
+        # Deduplicación: evitar filas idénticas cuando un usuario está en
+        # múltiples grupos con el mismo examen/estándar/resultado.
+        _emitted_result_ids = set()   # result.id ya emitidos
+        _emitted_std_keys = set()     # (exam_id, std_id) ya emitidos (depth 2)
+        rows = []
         if not memberships:
             if result_filter:
-                continue  # Skip empty org rows when filtering by result
+                return rows  # Skip empty org rows when filtering by result
             row = {**base, **EMPTY_ORG}
             if has_std:  row.update(EMPTY_STD)
             if has_res:  row.update(EMPTY_RES)
             if has_cert: row.update(EMPTY_CERT)
-            rows.append(row)
-            continue
+            return [row]
 
         # ─ Depth 1+: iterar membresías ─
         for gid, m_status, m_joined in memberships:
@@ -20464,7 +19338,7 @@ def _build_reports_query(user, params):
                 continue
 
             # ECM assignments para este usuario en este grupo
-            user_group_ecms = ecm_map.get(uid, {}).get(gid, [])
+            user_group_ecms = ecm_map.get(gid, [])
             if not user_group_ecms:
                 if result_filter:
                     continue  # Skip empty std rows when filtering by result
@@ -20487,25 +19361,25 @@ def _build_reports_query(user, params):
                 std_data = _std_fields(ea, std, exam, brand)
 
                 if not has_res:
-                    # Depth 2: per assignment — dedup por (uid, exam, std)
-                    _sk = (uid, ea.exam_id, ea.competency_standard_id)
+                    # Depth 2: per assignment — dedup por (exam, std)
+                    _sk = (ea.exam_id, ea.competency_standard_id)
                     if _sk in _emitted_std_keys:
                         continue
                     _emitted_std_keys.add(_sk)
                     row = {**base, **org, **std_data}
                     if has_cert:
-                        best = best_results.get((uid, ea.exam_id))
+                        best = best_results.get(ea.exam_id)
                         row.update(_cert_fields(best, ea))
                     rows.append(row)
                     continue
 
                 # Depth 3: per result attempt
-                attempt_results = results_map.get((uid, ea.exam_id), [])
+                attempt_results = results_map.get(ea.exam_id, [])
                 if not attempt_results:
                     if result_filter:
                         continue  # Skip "Sin evaluar" when filtering by result
                     # Dedup: evitar filas "Sin evaluar" repetidas
-                    _sk = (uid, ea.exam_id, ea.competency_standard_id)
+                    _sk = (ea.exam_id, ea.competency_standard_id)
                     if _sk in _emitted_std_keys:
                         continue
                     _emitted_std_keys.add(_sk)
@@ -20523,12 +19397,110 @@ def _build_reports_query(user, params):
                     if result_filter == 'rejected' and res.result != 0:
                         continue
                     _emitted_result_ids.add(res.id)
-                    row = {**base, **org, **std_data, **_result_fields(res)}
+                    row = {**base, **org, **std_data, **_result_fields(res, opportunity_map)}
                     if has_cert:
                         row.update(_cert_fields(res, ea))
                     rows.append(row)
+        return rows
+
+    ordered_query = ctx['user_query'].order_by(User.first_surname, User.name, User.id)
+    skip_key, skip_rows = start if start else (None, 0)
+    last_key = skip_key
+    inclusive = start is not None
+
+    while True:
+        q = ordered_query
+        if last_key is not None:
+            q = q.filter(_report_keyset_filter(last_key, inclusive))
+        users = q.limit(_REPORT_CHUNK_USERS).all()
+        if not users:
+            return
+        inclusive = False
+        user_ids = [u.id for u in users]
+
+        # ── Membresías del lote ──
+        memberships_map = {}   # user_id → [(group_id, status, joined_at)]
+        if has_org:
+            member_rows = db.session.query(
+                GroupMember.user_id, GroupMember.group_id,
+                GroupMember.status, GroupMember.joined_at
+            ).filter(
+                GroupMember.user_id.in_(user_ids),
+                GroupMember.group_id.in_(ctx['group_ids_q']),
+            ).order_by(GroupMember.user_id, GroupMember.group_id).all()
+            for uid, gid, st, joined in member_rows:
+                memberships_map.setdefault(uid, []).append((gid, st, joined))
+
+            _load_missing(CandidateGroup, {m[1] for m in member_rows}, all_groups)
+            _load_missing(Campus, {gr.campus_id for gr in all_groups.values()}, all_campuses)
+            _load_missing(Partner, {c.partner_id for c in all_campuses.values()}, all_partners)
+            _load_missing(SchoolCycle, {gr.school_cycle_id for gr in all_groups.values()}, all_cycles)
+
+        # ── ECM assignments del lote ──
+        ecm_map = {}          # user_id → {group_id → [assignment]}
+        if has_std:
+            ecm_assignments = EcmCandidateAssignment.query.filter(
+                EcmCandidateAssignment.user_id.in_(user_ids),
+                EcmCandidateAssignment.group_id.in_(ctx['group_ids_q']),
+            ).order_by(EcmCandidateAssignment.id).all()
+            for ea in ecm_assignments:
+                ecm_map.setdefault(ea.user_id, {}).setdefault(ea.group_id, []).append(ea)
+
+            _load_missing(CompetencyStandard, {ea.competency_standard_id for ea in ecm_assignments}, all_standards)
+            _load_missing(Exam, {ea.exam_id for ea in ecm_assignments}, all_exams)
+            _load_missing(Brand, {s.brand_id for s in all_standards.values()}, all_brands)
+
+        # ── Resultados del lote ──
+        results_map = {}      # user_id → {exam_id → [Result] desc by date}
+        best_results = {}     # user_id → {exam_id → best Result}
+        opportunity_map = {}  # result_id -> numero de oportunidad (1,2,3...) por user+exam
+        if has_res or has_cert:
+            results_q = Result.query.filter(
+                Result.user_id.in_(user_ids),
+                Result.status == 1,
+            )
+            # Filtro por modo (exam / simulator)
+            if ctx['result_mode'] == 'simulator':
+                results_q = results_q.filter(Result.mode == 'simulator')
+            elif ctx['result_mode'] == 'exam':
+                results_q = results_q.filter(db.or_(Result.mode == 'exam', Result.mode.is_(None)))
+            results = results_q.order_by(Result.end_date.desc(), Result.id).all()
 
-    return rows, len(rows)
+            for r in results:
+                user_results = results_map.setdefault(r.user_id, {})
+                user_results.setdefault(r.exam_id, []).append(r)
+                user_best = best_results.setdefault(r.user_id, {})
+                existing = user_best.get(r.exam_id)
+                if existing is None:
+                    user_best[r.exam_id] = r
+                elif r.result == 1 and existing.result != 1:
+                    user_best[r.exam_id] = r
+                elif r.result == existing.result and (r.score or 0) > (existing.score or 0):
+                    user_best[r.exam_id] = r
+
+            # Numerar oportunidades en orden cronológico (intento 1 = más antiguo)
+            for user_results in results_map.values():
+                for attempts in user_results.values():
+                    ordered_attempts = sorted(
+                        attempts,
+                        key=lambda rr: (rr.end_date or rr.start_date or rr.created_at, rr.created_at)
+                    )
+                    for idx, rr in enumerate(ordered_attempts, start=1):
+                        opportunity_map[rr.id] = idx
+
+        for u in users:
+            key = (u.first_surname, u.name, u.id)
+            rows = _rows_for_user(
+                u, memberships_map.get(u.id, []), ecm_map.get(u.id, {}),
+                results_map.get(u.id, {}), best_results.get(u.id, {}), opportunity_map,
+            )
+            first = skip_rows if (skip_key is not None and u.id == skip_key[2]) else 0
+            for index in range(first, len(rows)):
+                yield key, index, rows[index]
+            last_key = key
+
+        if len(users) < _REPORT_CHUNK_USERS:
+            return
 
 
 @bp.route('/reports', methods=['GET'])
@@ -20536,18 +19508,42 @@ def _build_reports_query(user, params):
 @reports_access_required
 def get_reports():
     """Endpoint principal de reportes con filtros avanzados.
-    Accesible por coordinador y responsable."""
+    Accesible por coordinador y responsable.
+
+    Paginación keyset: la respuesta incluye `next_cursor`; enviarlo como
+    `cursor` devuelve la página siguiente sin recorrer las anteriores.
+    `page` se sigue aceptando (avanza por el generador hasta el offset).
+    El total se calcula con COUNT en SQL."""
     try:
         user = g.current_user
-        rows, total = _build_reports_query(user, request.args)
-
-        # Paginación
         page = request.args.get('page', 1, type=int)
         per_page = _clamp_per_page(request.args.get('per_page'), default=50)
         per_page = min(per_page, 200)
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_rows = rows[start:end]
+
+        start = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                start = _decode_report_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        ctx = _reports_scope(user, request.args)
+        page_rows = []
+        next_cursor = None
+        total = 0
+        if ctx is not None:
+            to_skip = 0 if start else max(page - 1, 0) * per_page
+            for key, index, row in _iter_report_rows(ctx, start=start):
+                if to_skip:
+                    to_skip -= 1
+                    continue
+                if len(page_rows) == per_page:
+                    next_cursor = _encode_report_cursor(key, index)
+                    break
+                page_rows.append(row)
+            total = _count_report_rows(ctx)
+
         total_pages = (total + per_page - 1) // per_page if total > 0 else 0
 
         return jsonify({
@@ -20556,6 +19552,7 @@ def get_reports():
             'page': page,
             'per_page': per_page,
             'pages': total_pages,
+            'next_cursor': next_cursor,
         })
 
     except HTTPException:
@@ -20571,10 +19568,24 @@ def get_reports():
 @reports_access_required
 def export_reports():
     """Exportar reportes a Excel con los mismos filtros.
-    Soporta parámetro 'columns' (comma-separated) para elegir qué columnas incluir."""
+    Soporta parámetro 'columns' (comma-separated) para elegir qué columnas incluir
+    y 'format=csv' para CSV.
+
+    Las filas se generan por lotes: CSV se transmite conforme se genera y
+    Excel se escribe en modo write-only a un archivo temporal que luego se
+    transmite por bloques, así la memoria no crece con el tamaño del reporte."""
     try:
+        import csv
+        import os
+        import tempfile
+        from io import StringIO
+        from flask import Response, stream_with_context
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+
         user = g.current_user
-        rows, total = _build_reports_query(user, request.args)
+        ctx = _reports_scope(user, request.args)
+        rows_iter = (row for _key, _index, row in _iter_report_rows(ctx)) if ctx is not None else iter(())
 
         # Mapa completo de columnas disponibles: key -> (header_label, row_extractor)
         gender_map = {'M': 'Masculino', 'F': 'Femenino', 'O': 'Otro'}
@@ -20658,50 +19669,103 @@ def export_reports():
         if not selected_keys:
             selected_keys = list(ALL_COLUMNS.keys())
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'Reporte'
-
         headers = [ALL_COLUMNS[k][0] for k in selected_keys]
         extractors = [ALL_COLUMNS[k][1] for k in selected_keys]
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        if request.args.get('format') == 'csv':
+            def generate_csv():
+                buffer = StringIO()
+                writer = csv.writer(buffer)
+                buffer.write('\ufeff')  # BOM para que Excel detecte UTF-8
+                writer.writerow(headers)
+                for row in rows_iter:
+                    writer.writerow(['' if v is None else v for v in (ex(row) for ex in extractors)])
+                    if buffer.tell() >= 64 * 1024:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue()
+
+            return Response(
+                stream_with_context(generate_csv()),
+                mimetype='text/csv; charset=utf-8',
+                headers={'Content-Disposition': f'attachment; filename=Reporte_{timestamp}.csv'},
+            )
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Reporte')
 
         header_font = Font(bold=True, color="FFFFFF", size=11)
         header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
         header_alignment = Alignment(horizontal="center", vertical="center")
         thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
 
-        for col, h in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=h)
+        # Auto-ajustar anchos con una muestra (write-only exige fijarlos antes de escribir)
+        sample = []
+        for row in rows_iter:
+            sample.append([ex(row) for ex in extractors])
+            if len(sample) >= _REPORT_XLSX_WIDTH_SAMPLE:
+                break
+        for col, h in enumerate(headers):
+            max_length = len(h)
+            for values in sample:
+                if values[col]:
+                    max_length = max(max_length, len(str(values[col])))
+            ws.column_dimensions[get_column_letter(col + 1)].width = min(max_length + 3, 40)
+
+        header_cells = []
+        for h in headers:
+            cell = WriteOnlyCell(ws, value=h)
             cell.font = header_font
             cell.fill = header_fill
             cell.alignment = header_alignment
             cell.border = thin_border
+            header_cells.append(cell)
+        ws.append(header_cells)
 
-        for i, row in enumerate(rows, 2):
-            for col, extractor in enumerate(extractors, 1):
-                cell = ws.cell(row=i, column=col, value=extractor(row))
+        def _bordered(values):
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
                 cell.border = thin_border
+                cells.append(cell)
+            return cells
+
+        for values in sample:
+            ws.append(_bordered(values))
+        for row in rows_iter:
+            ws.append(_bordered([ex(row) for ex in extractors]))
+
+        from app.utils.zip_spool import remove_spool
+        tmp = tempfile.NamedTemporaryFile(prefix='reporte_', suffix='.xlsx', delete=False)
+        tmp.close()
+
+        def stream_file(path):
+            with open(path, 'rb') as fh:
+                while True:
+                    chunk = fh.read(64 * 1024)
+                    if not chunk:
+                        break
+                    yield chunk
 
-        # Auto-ajustar anchos
-        for col in ws.columns:
-            max_length = 0
-            col_letter = col[0].column_letter
-            for cell in col:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            ws.column_dimensions[col_letter].width = min(max_length + 3, 40)
-
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        filename = f'Reporte_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename,
-        )
+        # El archivo se borra al cerrar la respuesta (también si el cliente se
+        # desconecta antes del primer chunk) o aquí mismo si algo falla antes.
+        try:
+            wb.save(tmp.name)
+            response = Response(
+                stream_file(tmp.name),
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                headers={
+                    'Content-Disposition': f'attachment; filename=Reporte_{timestamp}.xlsx',
+                    'Content-Length': str(os.path.getsize(tmp.name)),
+                },
+            )
+            response.call_on_close(lambda: remove_spool(tmp.name))
+        except BaseException:
+            remove_spool(tmp.name)
+            raise
+        return response
 
     except HTTPException:
         raise
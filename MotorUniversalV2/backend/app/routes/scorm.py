@@ -21,6 +21,7 @@ from app import db
 from app.models.user import User
 from app.models.study_content import StudyTopic
 from app.models.study_scorm import StudyScormAttempt, StudyScormPackage
+from app.services.material_structure_service import invalidate_topic_material
 from app.services.scorm_service import is_scorm_completed
 from app.utils.azure_storage import azure_storage
 
@@ -67,6 +68,32 @@ def init_upload():
     return jsonify(sas), 200
 
 
+def _extract_uploaded_package(blob_client, upload_id: str):
+    """Descarga el ZIP subido a un temporal (por chunks, sin readall) y
+    extrae/sube sus assets. Regresa (result, None) o (None, respuesta_error).
+    """
+    from app.services.scorm_service import SCORM_MAX_PACKAGE_BYTES, extract_and_upload
+    from app.utils.zip_spool import remove_spool, spool_blob_to_tempfile
+
+    try:
+        if not blob_client.exists():
+            return None, (jsonify({'error': 'El upload no se encontró en el blob'}), 404)
+        zip_path = spool_blob_to_tempfile(blob_client, prefix='scorm_', max_bytes=SCORM_MAX_PACKAGE_BYTES)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        return None, (jsonify({'error': f'No se pudo leer el ZIP: {e}'}), 400)
+
+    try:
+        return extract_and_upload(zip_path, package_uuid=upload_id), None
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    except Exception as e:
+        return None, (jsonify({'error': f'Error procesando paquete: {e}'}), 500)
+    finally:
+        remove_spool(zip_path)
+
+
 @scorm_bp.route('/packages/finalize', methods=['POST'])
 @jwt_required()
 @editor_required
@@ -75,8 +102,6 @@ def finalize_upload():
 
     Body: { upload_id: str, blob_name: str, title?: str, description?: str }
     """
-    from app.services.scorm_service import extract_and_upload
-
     user = _current_user()
     payload = request.get_json(silent=True) or {}
     upload_id = (payload.get('upload_id') or '').strip()
@@ -84,24 +109,13 @@ def finalize_upload():
     if not upload_id or not blob_name:
         return jsonify({'error': 'upload_id y blob_name son requeridos'}), 400
 
-    # Descargar el ZIP del blob temporal
+    # Descargar el ZIP del blob temporal a disco y extraer + subir
     blob_client = azure_storage.get_scorm_blob_client(blob_name)
     if not blob_client:
         return jsonify({'error': 'Storage no disponible'}), 500
-    try:
-        if not blob_client.exists():
-            return jsonify({'error': 'El upload no se encontró en el blob'}), 404
-        zip_bytes = blob_client.download_blob().readall()
-    except Exception as e:
-        return jsonify({'error': f'No se pudo leer el ZIP: {e}'}), 400
-
-    # Extraer + subir
-    try:
-        result = extract_and_upload(zip_bytes, package_uuid=upload_id)
-    except ValueError as e:
-        return jsonify({'error': str(e)}), 400
-    except Exception as e:
-        return jsonify({'error': f'Error procesando paquete: {e}'}), 500
+    result, error = _extract_uploaded_package(blob_client, upload_id)
+    if error:
+        return error
 
     # Borrar el ZIP temporal (el contenido ya está extraído)
     try:
@@ -146,8 +160,6 @@ def import_extract():
       size_bytes, file_count, tree: [...]
     }
     """
-    from app.services.scorm_service import extract_and_upload
-
     payload = request.get_json(silent=True) or {}
     upload_id = (payload.get('upload_id') or '').strip()
     blob_name = (payload.get('blob_name') or '').strip()
@@ -157,19 +169,9 @@ def import_extract():
     blob_client = azure_storage.get_scorm_blob_client(blob_name)
     if not blob_client:
         return jsonify({'error': 'Storage no disponible'}), 500
-    try:
-        if not blob_client.exists():
-            return jsonify({'error': 'El upload no se encontró en el blob'}), 404
-        zip_bytes = blob_client.download_blob().readall()
-    except Exception as e:
-        return jsonify({'error': f'No se pudo leer el ZIP: {e}'}), 400
-
-    try:
-        result = extract_and_upload(zip_bytes, package_uuid=upload_id)
-    except ValueError as e:
-        return jsonify({'error': str(e)}), 400
-    except Exception as e:
-        return jsonify({'error': f'Error procesando paquete: {e}'}), 500
+    result, error = _extract_uploaded_package(blob_client, upload_id)
+    if error:
+        return error
 
     # Borrar el ZIP temporal
     try:
@@ -209,10 +211,12 @@ def delete_package(package_id: int):
     if not pkg:
         return jsonify({'error': 'Paquete no encontrado'}), 404
     prefix = pkg.blob_prefix
+    topic_id = pkg.topic_id
     # Borrar attempts y registro primero
     StudyScormAttempt.query.filter_by(package_id=pkg.id).delete()
     db.session.delete(pkg)
     db.session.commit()
+    invalidate_topic_material(topic_id)
     # Luego borrar blobs
     try:
         azure_storage.delete_scorm_prefix(prefix)
@@ -237,8 +241,13 @@ def attach_to_topic(topic_id: int, package_id: int):
     if existing and existing.id != pkg.id:
         existing.topic_id = None
 
+    previous_topic_id = pkg.topic_id
     pkg.topic_id = topic_id
     db.session.commit()
+    # El manifiesto del material expone scorm_package por tema
+    invalidate_topic_material(topic_id)
+    if previous_topic_id and previous_topic_id != topic_id:
+        invalidate_topic_material(previous_topic_id)
     return jsonify(pkg.to_dict()), 200
 
 
@@ -251,6 +260,7 @@ def detach_from_topic(topic_id: int):
         return jsonify({'success': True, 'detached': False}), 200
     pkg.topic_id = None
     db.session.commit()
+    invalidate_topic_material(topic_id)
     return jsonify({'success': True, 'detached': True, 'package_id': pkg.id}), 200
 
 
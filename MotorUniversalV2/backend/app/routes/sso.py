@@ -41,6 +41,7 @@ from app.services.sso_service import (
     resolve_standards,
     SSO_TOKEN_TTL_MINUTES,
 )
+from app.services.sso_api_key_cache import invalidate_api_key_cache
 from app.utils.rate_limit import rate_limit, get_client_ip
 from app.models.activity_log import log_activity
 
@@ -424,6 +425,7 @@ def create_campus_api_key(campus_id: int):
         success=True,
     )
     db.session.commit()
+    invalidate_api_key_cache()
 
     info = _api_key_info(campus)
     info['api_key'] = raw_key  # secreto en claro
@@ -523,6 +525,7 @@ def revoke_campus_api_key(campus_id: int):
         success=True,
     )
     db.session.commit()
+    invalidate_api_key_cache()
     return jsonify({'message': 'API key revocada', 'campus_id': campus.id}), 200
 
 
@@ -586,6 +589,8 @@ def toggle_enable_sso_api(campus_id: int):
         success=True,
     )
     db.session.commit()
+    if not enabled:
+        invalidate_api_key_cache()
 
     info = _api_key_info(campus)
     if raw_key:
@@ -972,6 +977,7 @@ def rotate_api_key(key_id: int):
         success=True,
     )
     db.session.commit()
+    invalidate_api_key_cache()
     data = ak.to_dict(include_assignments=True)
     data['api_key'] = raw
     data['warning'] = 'Guarda esta API key. Después solo podrás revelarla mientras esté activa.'
@@ -1003,6 +1009,7 @@ def revoke_api_key(key_id: int):
         success=True,
     )
     db.session.commit()
+    invalidate_api_key_cache()
     return jsonify({'message': 'API key revocada', 'api_key_id': ak.id}), 200
 
 
@@ -1030,6 +1037,8 @@ def update_api_key(key_id: int):
         if mode in ('platform', 'api'):
             ak.assignment_mode = mode
     db.session.commit()
+    if 'is_active' in payload:
+        invalidate_api_key_cache()
     return jsonify(ak.to_dict(include_assignments=True)), 200
 
 
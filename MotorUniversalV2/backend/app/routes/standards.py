@@ -1148,6 +1148,7 @@ def upload_certificate_template(standard_id):
     import os as _os
     from app.models.certificate_template import CertificateTemplate
     from app.utils.azure_storage import azure_storage
+    from app.utils.pdf_asset_cache import invalidate_certificate_template
     
     current_user_id = get_jwt_identity()
     current_user = User.query.get(current_user_id)
@@ -1293,6 +1294,7 @@ def upload_certificate_template(standard_id):
             existing.updated_by = current_user_id
             existing.updated_at = datetime.utcnow()
             db.session.commit()
+            invalidate_certificate_template(standard_id)
             
             return jsonify({
                 'message': 'Plantilla reemplazada exitosamente',
@@ -1309,6 +1311,7 @@ def upload_certificate_template(standard_id):
             template.set_config(default_config)
             db.session.add(template)
             db.session.commit()
+            invalidate_certificate_template(standard_id)
             
             return jsonify({
                 'message': 'Plantilla subida exitosamente',
@@ -1334,6 +1337,7 @@ def update_certificate_template(standard_id):
     """
     import json
     from app.models.certificate_template import CertificateTemplate
+    from app.utils.pdf_asset_cache import invalidate_certificate_template
     
     current_user_id = get_jwt_identity()
     current_user = User.query.get(current_user_id)
@@ -1383,6 +1387,7 @@ def update_certificate_template(standard_id):
         template.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_certificate_template(standard_id)
         
         return jsonify({
             'message': 'Plantilla actualizada exitosamente',
@@ -1407,6 +1412,7 @@ def delete_certificate_template(standard_id):
     """
     from app.models.certificate_template import CertificateTemplate
     from app.utils.azure_storage import azure_storage
+    from app.utils.pdf_asset_cache import invalidate_certificate_template
     
     current_user_id = get_jwt_identity()
     current_user = User.query.get(current_user_id)
@@ -1431,6 +1437,7 @@ def delete_certificate_template(standard_id):
         
         db.session.delete(template)
         db.session.commit()
+        invalidate_certificate_template(standard_id)
         
         return jsonify({'message': 'Plantilla eliminada exitosamente'})
         
@@ -1455,7 +1462,7 @@ def preview_certificate_template(standard_id):
     from reportlab.pdfgen import canvas
     from reportlab.lib.colors import HexColor
     from reportlab.pdfbase.pdfmetrics import stringWidth
-    from pypdf import PdfReader, PdfWriter
+    from pypdf import PdfReader
     from app.models.certificate_template import CertificateTemplate
     import qrcode
     from reportlab.lib.utils import ImageReader
@@ -1477,17 +1484,15 @@ def preview_certificate_template(standard_id):
     try:
         config = template.get_config()
         
-        # Descargar plantilla de Azure
-        from app.utils.azure_storage import azure_storage
-        template_bytes = azure_storage.download_file(template.template_blob_url)
+        # Plantilla de Azure (parseada y cacheada por URL)
+        from app.utils.pdf_asset_cache import get_template_page
+        template_page = get_template_page(template.template_blob_url)
         
-        if not template_bytes:
+        if template_page is None:
             return jsonify({'error': 'No se pudo descargar la plantilla'}), 500
         
-        reader = PdfReader(BytesIO(template_bytes))
-        page = reader.pages[0]
-        width = float(page.mediabox.width)
-        height = float(page.mediabox.height)
+        width = template_page.width
+        height = template_page.height
         
         # Crear overlay
         buffer_overlay = BytesIO()
@@ -1559,12 +1564,8 @@ def preview_certificate_template(standard_id):
         buffer_overlay.seek(0)
         overlay = PdfReader(buffer_overlay)
         
-        reader2 = PdfReader(BytesIO(template_bytes))
-        page2 = reader2.pages[0]
-        page2.merge_page(overlay.pages[0])
-        
-        writer = PdfWriter()
-        writer.add_page(page2)
+        writer = template_page.new_writer()
+        writer.pages[0].merge_page(overlay.pages[0])
         
         buffer_final = BytesIO()
         writer.write(buffer_final)
@@ -5,7 +5,7 @@ Estructura: Material de Estudio → Sesiones → Temas → (4 elementos)
 import uuid
 import os
 from functools import wraps
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from werkzeug.exceptions import HTTPException
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import text
@@ -28,10 +28,32 @@ from app.models.student_progress import StudentContentProgress, StudentTopicProg
 from app.utils.azure_storage import azure_storage
 from app.utils.rate_limit import rate_limit_study_contents, rate_limit_upload
 from app.utils.cache_utils import invalidate_on_progress_update
+from app.services.material_structure_service import (
+    find_session, find_topic, get_material_manifest, invalidate_material_structure,
+)
 
 study_contents_bp = Blueprint('study_contents', __name__)
 
 
+@study_contents_bp.after_request
+def _invalidate_structure_on_edit(response):
+    """Toda edición exitosa bajo /<material_id>/... invalida el manifiesto y
+    la estructura cacheados del material (lecturas, progreso y export SCORM)."""
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400:
+        material_id = (request.view_args or {}).get('material_id')
+        if material_id is not None:
+            invalidate_material_structure(material_id)
+    return response
+
+
+def _material_manifest_or_404(material_id):
+    """Manifiesto cacheado del material (ver material_structure_service)."""
+    manifest = get_material_manifest(material_id)
+    if manifest is None:
+        abort(404)
+    return manifest
+
+
 def admin_or_editor_required(fn):
     """Decorador para verificar que el usuario sea admin, editor o editor_invitado"""
     @wraps(fn)
@@ -351,7 +373,10 @@ def get_material(material_id):
                 if creator and creator.role == 'editor_invitado':
                     return jsonify({'error': 'Material no encontrado'}), 404
         
-        return jsonify(material.to_dict(include_sessions=True)), 200
+        # El árbol de sesiones sale del manifiesto versionado (sin N+1)
+        data = material.to_dict()
+        data['sessions'] = _material_manifest_or_404(material_id)['sessions']
+        return jsonify(data), 200
     except HTTPException:
         raise
     except Exception as e:
@@ -1154,9 +1179,7 @@ def upload_reading_image():
 def get_sessions(material_id):
     """Obtener todas las sesiones de un material"""
     try:
-        material = StudyMaterial.query.get_or_404(material_id)
-        sessions = material.sessions.all()
-        return jsonify([s.to_dict(include_topics=True) for s in sessions]), 200
+        return jsonify(_material_manifest_or_404(material_id)['sessions']), 200
     except HTTPException:
         raise
     except Exception as e:
@@ -1204,8 +1227,10 @@ def create_session(material_id):
 def get_session(material_id, session_id):
     """Obtener una sesión por ID"""
     try:
-        session = StudySession.query.filter_by(id=session_id, material_id=material_id).first_or_404()
-        return jsonify(session.to_dict(include_topics=True)), 200
+        session = find_session(_material_manifest_or_404(material_id), session_id)
+        if session is None:
+            abort(404)
+        return jsonify(session), 200
     except HTTPException:
         raise
     except Exception as e:
@@ -1303,9 +1328,10 @@ def delete_session(material_id, session_id):
 def get_topics(material_id, session_id):
     """Obtener todos los temas de una sesión"""
     try:
-        session = StudySession.query.filter_by(id=session_id, material_id=material_id).first_or_404()
-        topics = session.topics.all()
-        return jsonify([t.to_dict(include_elements=True) for t in topics]), 200
+        session = find_session(_material_manifest_or_404(material_id), session_id)
+        if session is None:
+            abort(404)
+        return jsonify(session['topics']), 200
     except HTTPException:
         raise
     except Exception as e:
@@ -1376,8 +1402,10 @@ def create_topic(material_id, session_id):
 def get_topic(material_id, session_id, topic_id):
     """Obtener un tema por ID"""
     try:
-        topic = StudyTopic.query.filter_by(id=topic_id, session_id=session_id).first_or_404()
-        return jsonify(topic.to_dict(include_elements=True)), 200
+        topic = find_topic(_material_manifest_or_404(material_id), session_id, topic_id)
+        if topic is None:
+            abort(404)
+        return jsonify(topic), 200
     except HTTPException:
         raise
     except Exception as e:
@@ -2171,13 +2199,15 @@ def upload_downloadable(material_id, session_id, topic_id):
 def get_interactive(material_id, session_id, topic_id):
     """Obtener el ejercicio interactivo de un tema con todos sus pasos y acciones"""
     try:
-        topic = StudyTopic.query.filter_by(id=topic_id, session_id=session_id).first_or_404()
+        topic = find_topic(_material_manifest_or_404(material_id), session_id, topic_id)
+        if topic is None:
+            abort(404)
         
-        if not topic.interactive_exercise:
+        if not topic['interactive_exercise']:
             return jsonify({'error': 'El tema no tiene un ejercicio interactivo'}), 404
         
         return jsonify({
-            'interactive_exercise': topic.interactive_exercise.to_dict(include_steps=True)
+            'interactive_exercise': topic['interactive_exercise']
         }), 200
         
     except HTTPException:
@@ -3240,139 +3270,14 @@ def get_topic_progress(topic_id):
 def get_material_progress(material_id):
     """Obtener el progreso del estudiante en todo el material de estudio"""
     try:
+        from app.services.material_structure_service import build_material_progress
         user_id = get_jwt_identity()
-        
-        # Obtener el material
-        material = StudyMaterial.query.get_or_404(material_id)
-        
-        # Obtener todas las sesiones y temas
-        sessions_progress = []
-        total_contents = 0
-        completed_contents = 0
-        
-        # Diccionario para almacenar todos los contenidos completados del material
-        completed_content_ids = {
-            'reading': [],
-            'video': [],
-            'downloadable': [],
-            'interactive': []
-        }
-        
-        # Diccionario para almacenar scores de ejercicios interactivos
-        all_interactive_scores = {}
-        
-        # No usar order_by aquí porque ya está definido en la relación del modelo
-        for session in material.sessions.all():
-            session_data = {
-                'session_id': session.id,
-                'session_number': session.session_number,
-                'title': session.title,
-                'topics': []
-            }
-            
-            # No usar order_by aquí porque ya está definido en la relación del modelo
-            for topic in session.topics.all():
-                # Contar contenidos totales de este tema directamente de las tablas
-                topic_total = 0
-                topic_completed_count = 0
-                
-                # Contar lecturas
-                readings_count = StudyReading.query.filter_by(topic_id=topic.id).count()
-                topic_total += readings_count
-                
-                # Contar videos
-                videos_count = StudyVideo.query.filter_by(topic_id=topic.id).count()
-                topic_total += videos_count
-                
-                # Contar descargables
-                downloadables_count = StudyDownloadableExercise.query.filter_by(topic_id=topic.id).count()
-                topic_total += downloadables_count
-                
-                # Contar interactivos
-                interactives_count = StudyInteractiveExercise.query.filter_by(topic_id=topic.id).count()
-                topic_total += interactives_count
-                
-                total_contents += topic_total
-                
-                # Obtener contenidos completados de este tema
-                topic_completed = {
-                    'reading': [],
-                    'video': [],
-                    'downloadable': [],
-                    'interactive': []
-                }
-                
-                # Obtener todos los content progress completados para este tema
-                content_progresses = StudentContentProgress.query.filter_by(
-                    user_id=user_id,
-                    topic_id=topic.id,
-                    is_completed=True
-                ).all()
-                
-                # Diccionario para scores de este tema
-                topic_interactive_scores = {}
-                
-                for cp in content_progresses:
-                    if cp.content_type in topic_completed:
-                        topic_completed[cp.content_type].append(cp.content_id)
-                        completed_content_ids[cp.content_type].append(cp.content_id)
-                        topic_completed_count += 1
-                        # Guardar score de ejercicios interactivos completados
-                        if cp.content_type == 'interactive' and cp.score is not None:
-                            topic_interactive_scores[cp.content_id] = cp.score
-                            all_interactive_scores[cp.content_id] = cp.score
-                
-                # Obtener también scores de ejercicios interactivos no completados (calificación < 80%)
-                # para mostrar la mejor calificación al usuario incluso si no ha "aprobado"
-                incomplete_interactive_progresses = StudentContentProgress.query.filter_by(
-                    user_id=user_id,
-                    topic_id=topic.id,
-                    content_type='interactive',
-                    is_completed=False
-                ).filter(StudentContentProgress.score.isnot(None)).all()
-                
-                for cp in incomplete_interactive_progresses:
-                    # Solo agregar si no está ya en los completados
-                    if cp.content_id not in topic_interactive_scores:
-                        topic_interactive_scores[cp.content_id] = cp.score
-                        all_interactive_scores[cp.content_id] = cp.score
-                
-                completed_contents += topic_completed_count
-                
-                # Calcular porcentaje del tema
-                topic_percentage = (topic_completed_count / topic_total * 100) if topic_total > 0 else 0
-                
-                topic_data = {
-                    'topic_id': topic.id,
-                    'topic_number': topic.order,
-                    'title': topic.title,
-                    'progress': {
-                        'total_contents': topic_total,
-                        'completed_contents': topic_completed_count,
-                        'progress_percentage': topic_percentage,
-                        'is_completed': topic_completed_count == topic_total and topic_total > 0
-                    },
-                    'completed_contents': topic_completed,
-                    'interactive_scores': topic_interactive_scores
-                }
-                
-                session_data['topics'].append(topic_data)
-            
-            sessions_progress.append(session_data)
-        
-        # Calcular progreso general del material
-        overall_percentage = (completed_contents / total_contents * 100) if total_contents > 0 else 0
-        
-        return jsonify({
-            'material_id': material_id,
-            'title': material.title,
-            'total_contents': total_contents,
-            'completed_contents': completed_contents,
-            'progress_percentage': overall_percentage,
-            'sessions': sessions_progress,
-            'all_completed_contents': completed_content_ids,
-            'interactive_scores': all_interactive_scores
-        }), 200
+
+        # Estructura (sesiones/temas/conteos) cacheada + 1 query de progreso
+        progress = build_material_progress(material_id, user_id)
+        if progress is None:
+            abort(404)
+        return jsonify(progress), 200
         
     except HTTPException:
         
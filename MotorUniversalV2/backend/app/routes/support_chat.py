@@ -16,6 +16,7 @@ from app.models.support_chat import (
     SupportMessage,
     ChatMessageTemplate,
 )
+from app.services.last_seen_tracker import effective_last_seen
 
 
 bp = Blueprint("support_chat", __name__, url_prefix="/api/support/chat")
@@ -105,6 +106,7 @@ def _serialize_user_summary(user: User | None) -> dict | None:
     if not user:
         return None
 
+    last_seen = effective_last_seen(user)
     return {
         "id": user.id,
         "username": user.username,
@@ -113,7 +115,7 @@ def _serialize_user_summary(user: User | None) -> dict | None:
         "curp": user.curp,
         "phone": user.phone,
         "role": user.role,
-        "last_seen": user.last_seen.isoformat() if getattr(user, 'last_seen', None) else None,
+        "last_seen": last_seen.isoformat() if last_seen else None,
     }
 
 
@@ -15,6 +15,7 @@ from app.routes.partners import (
     _get_foreign_curp, _is_generic_foreign_curp,
 )
 from app.utils.rate_limit import rate_limit
+import os
 import uuid
 import re
 import logging
@@ -2884,6 +2885,9 @@ def get_available_coordinators():
 MAX_BULK_ROWS = 50000
 MAX_BULK_FILE_MB = 20
 BATCH_COMMIT_SIZE = 500
+# Una carga en queued/processing sin avance (updated_at) en este tiempo se
+# da por interrumpida (reinicio/deploy mató el thread) y se reporta failed.
+BULK_UPLOAD_STALE_MINUTES = int(os.getenv('BULK_UPLOAD_STALE_MINUTES', '30'))
 
 _COLUMN_MAPPING = {
     'email': ['email', 'correo', 'correo electronico', 'correo electrónico', 'e-mail'],
@@ -2986,8 +2990,10 @@ def _validate_rows(parsed_rows):
     + dígito verificador + entidad) síncronamente. Filas con CURP inválida
     NO se rechazan — quedan marcadas con r['_curp_invalid']=True para que
     el usuario se cree con perfil bloqueado (curp=None, curp_verified=False,
-    GroupMember.status='curp_required'). En modo RENAPO: solo valida longitud
-    (mantiene compatibilidad con el flujo legacy donde el worker valida después).
+    GroupMember.status='curp_required'). En modo RENAPO: una longitud
+    distinta de 18 rechaza la fila (flujo legacy); con 18 caracteres se aplica
+    el mismo pre-screen local (formato + dígito verificador) y las inválidas
+    se marcan igual, así no llegan a la cola ni consumen presupuesto RENAPO.
     """
     from app.services.curp_local_validator import is_renapo_enabled, validate_curp_local
     renapo_on = is_renapo_enabled()
@@ -3017,8 +3023,13 @@ def _validate_rows(parsed_rows):
                     r['_curp_invalid'] = True
                     r['_curp_error'] = local_err
             elif renapo_on and len(r['curp']) != 18 and not _is_generic_foreign_curp(r['curp']):
-                # Modo RENAPO legacy: solo longitud, formato lo valida el worker
+                # Modo RENAPO legacy: longitud inválida rechaza la fila
                 errs.append(f'CURP debe tener 18 caracteres (tiene {len(r["curp"])})')
+            elif renapo_on and not _is_generic_foreign_curp(r['curp']):
+                is_v_local, local_err, _ = validate_curp_local(r['curp'])
+                if not is_v_local:
+                    r['_curp_invalid'] = True
+                    r['_curp_error'] = local_err
         genero = None
         if r['genero_raw']:
             g = r['genero_raw'].upper()[0]
@@ -3866,25 +3877,31 @@ def preview_bulk_upload_candidates():
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 
-# ============== CARGA MASIVA DE CANDIDATOS (OPTIMIZADO) ==============
+# ============== CARGA MASIVA DE CANDIDATOS (EN SEGUNDO PLANO) ==============
 
 @bp.route('/candidates/bulk-upload', methods=['POST'])
 @jwt_required()
 @management_required
 def bulk_upload_candidates():
     """
-    Carga masiva de candidatos desde archivo Excel — versión batch-optimizada.
-    Soporta hasta 50,000 filas. Commits en lotes de 500.
+    Carga masiva de candidatos desde archivo Excel — en segundo plano.
+    Soporta hasta 50,000 filas.
+
+    La petición solo valida permisos, grupo y archivo, registra un
+    BulkUploadBatch en estado 'queued' y responde 202 con su id. El parseo,
+    la validación, el hash de contraseñas (pool de procesos), los inserts por
+    lotes, la asignación al grupo, el historial, la cola CURP y los emails
+    corren en un thread; el progreso y el resultado se consultan en
+    GET /bulk-history/<batch_id>/progress.
 
     Columnas: nombre, primer_apellido, segundo_apellido, genero (requeridas)
               email, curp (opcionales)
-    Form fields: group_id (opcional)
+    Form fields: group_id (opcional), include_existing_ids, skip_row_numbers
     """
     try:
-        import secrets
-        import string
+        from flask import current_app
+        from app.models.partner import BulkUploadBatch
 
-        CHUNK = 500
         current_user = g.current_user
         bulk_perm_err = _ensure_bulk_upload_allowed(current_user)
         if bulk_perm_err:
@@ -3902,747 +3919,797 @@ def bulk_upload_candidates():
         file = request.files['file']
         if not file.filename or not file.filename.lower().endswith(('.xlsx', '.xls')):
             return jsonify({'error': 'El archivo debe ser formato Excel (.xlsx o .xls)'}), 400
+        file_bytes = file.read()
+        if len(file_bytes) > MAX_BULK_FILE_MB * 1024 * 1024:
+            return jsonify({
+                'error': f'Archivo excede {MAX_BULK_FILE_MB}MB (tiene {len(file_bytes) / 1024 / 1024:.1f}MB)'
+            }), 400
 
-        # Parsear
-        parsed_rows, parse_error = _parse_bulk_candidates_excel(file)
-        if parse_error:
-            return jsonify({'error': parse_error}), 400
-        if not parsed_rows:
-            return jsonify({'error': 'El archivo no contiene datos'}), 400
+        batch_rec = BulkUploadBatch(
+            uploaded_by_id=current_user.id,
+            group_id=target_group.id if target_group else None,
+            group_name=target_group.name if target_group else None,
+            original_filename=file.filename,
+            status='queued',
+            **_bulk_batch_location(target_group),
+        )
+        db.session.add(batch_rec)
+        db.session.commit()
 
-        # Auto-asignar CURP genérico para planteles extranjeros
-        if target_group:
-            from app.models.partner import Campus as CampusModel
-            campus = CampusModel.query.get(target_group.campus_id)
-            if campus and campus.country and campus.country != 'México':
-                for r in parsed_rows:
-                    if not r['curp']:
-                        g_raw = (r.get('genero_raw') or '').upper()[:1]
-                        if g_raw == 'M':
-                            r['curp'] = FOREIGN_CURP_MALE
-                        else:
-                            r['curp'] = FOREIGN_CURP_FEMALE
+        options = {
+            'include_existing_ids': request.form.get('include_existing_ids', ''),
+            'skip_row_numbers': request.form.get('skip_row_numbers', ''),
+        }
+        _start_bulk_upload_job(current_app._get_current_object(), batch_rec.id, file_bytes, options)
 
-        # Validar
-        valid_rows, validation_errors = _validate_rows(parsed_rows)
+        return jsonify({
+            'message': 'Carga masiva en proceso',
+            'batch_id': batch_rec.id,
+            'status': batch_rec.status,
+            'batch': batch_rec.to_dict(),
+        }), 202
 
-        # Batch-fetch existentes
-        existing_by_email, existing_by_curp = _batch_fetch_existing(valid_rows)
+    except HTTPException:
 
-        # Clasificar
-        to_create, existing_assigned, skipped = _classify_valid_rows(
-            valid_rows, existing_by_email, existing_by_curp,
-            target_group.id if target_group else None
+        raise
+
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('user_management error')
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+def _bulk_batch_location(target_group):
+    """Snapshot de partner/plantel del grupo destino para el historial."""
+    from app.models.partner import Campus as CampusModel, Partner as PartnerModel
+
+    location = {
+        'partner_id': None,
+        'campus_id': None,
+        'partner_name': None,
+        'campus_name': None,
+        'country': None,
+        'state_name': None,
+    }
+    if not target_group:
+        return location
+    campus_obj = CampusModel.query.get(target_group.campus_id)
+    if campus_obj:
+        location.update(
+            campus_id=campus_obj.id,
+            campus_name=campus_obj.name,
+            country=campus_obj.country,
+            state_name=campus_obj.state_name,
         )
+        if campus_obj.partner_id:
+            location['partner_id'] = campus_obj.partner_id
+            partner_obj = PartnerModel.query.get(campus_obj.partner_id)
+            if partner_obj:
+                location['partner_name'] = partner_obj.name
+    return location
+
+
+def _start_bulk_upload_job(app, batch_id, file_bytes, options):
+    """Lanza el procesamiento de la carga en un thread separado."""
+    import threading
+
+    thread = threading.Thread(
+        target=_bulk_upload_job_worker,
+        args=(app, batch_id, file_bytes, options),
+        name=f'bulk-upload-{batch_id}',
+        daemon=True,
+    )
+    thread.start()
+    return thread
 
-        # Responsable: auto-incluir todos los usuarios existentes (asignación silenciosa)
-        if current_user.role == 'responsable' and target_group:
-            new_skipped = []
-            for s in skipped:
-                if s.get('is_existing_user') and s.get('user_id'):
-                    existing_assigned.append({
-                        'row': s['row'],
-                        'email': s.get('email', ''),
-                        'name': s.get('name', ''),
-                        'username': s.get('username', ''),
-                        'user_id': s['user_id'],
-                    })
-                else:
-                    new_skipped.append(s)
-            skipped = new_skipped
 
-        # Handle include_existing_ids — skipped users the admin opted to add to group
-        include_existing_ids_raw = request.form.get('include_existing_ids', '')
-        if include_existing_ids_raw and target_group:
-            import json as _json
+def _bulk_upload_job_worker(app, batch_id, file_bytes, options):
+    """Worker que ejecuta dentro del thread con contexto Flask."""
+    with app.app_context():
+        try:
+            _process_bulk_upload_job(app, batch_id, file_bytes, options)
+        except Exception as e:
+            logger.exception(f'[BULK-UPLOAD] Error inesperado en batch {batch_id}')
             try:
-                include_ids = _json.loads(include_existing_ids_raw)
-                if isinstance(include_ids, list):
-                    include_set = set(str(i) for i in include_ids)
-                    new_skipped = []
-                    for s in skipped:
-                        if s.get('is_existing_user') and str(s.get('user_id', '')) in include_set:
-                            existing_assigned.append({
-                                'row': s['row'],
-                                'email': s.get('email', ''),
-                                'name': s.get('name', ''),
-                                'username': s.get('username', ''),
-                                'user_id': s['user_id'],
-                            })
-                        else:
-                            new_skipped.append(s)
-                    skipped = new_skipped
-            except (ValueError, TypeError):
+                from app.models.partner import BulkUploadBatch
+                db.session.rollback()
+                batch = BulkUploadBatch.query.get(batch_id)
+                if batch:
+                    _fail_bulk_upload(batch, f'Error inesperado: {str(e)[:500]}')
+            except Exception:
                 pass
 
-        # Handle skip_row_numbers — name_match rows the admin chose NOT to create
-        skip_rows_raw = request.form.get('skip_row_numbers', '')
-        if skip_rows_raw:
-            import json as _json2
-            try:
-                skip_rows = _json2.loads(skip_rows_raw)
-                if isinstance(skip_rows, list):
-                    skip_set = set(int(r) for r in skip_rows)
-                    new_to_create = []
-                    for r in to_create:
-                        if r['row'] in skip_set:
-                            skipped.append({
-                                'row': r['row'],
-                                'email': r.get('email', ''),
-                                'reason': 'Omitido por coincidencia de nombre (decisión del usuario)',
-                            })
-                        else:
-                            new_to_create.append(r)
-                    to_create = new_to_create
-            except (ValueError, TypeError):
-                pass
 
-        # Generar usernames
-        username_map = _batch_generate_usernames(to_create) if to_create else {}
+def _fail_bulk_upload(batch, message):
+    batch.status = 'failed'
+    batch.error_message = message
+    batch.completed_at = datetime.utcnow()
+    db.session.commit()
+    logger.warning(f'[BULK-UPLOAD] Batch {batch.id} falló: {message}')
 
-        # Función para generar contraseña (excluye caracteres confusos: i, I, l, L, o, O, 0)
-        def _gen_pwd(length=10):
-            _CONFUSING = set('iIlLoO0')
-            upper = ''.join(c for c in string.ascii_uppercase if c not in _CONFUSING)
-            lower = ''.join(c for c in string.ascii_lowercase if c not in _CONFUSING)
-            digits = ''.join(c for c in string.digits if c not in _CONFUSING)
-            alpha = upper + lower + digits
-            pwd = [secrets.choice(upper), secrets.choice(lower), secrets.choice(digits)]
-            pwd += [secrets.choice(alpha) for _ in range(length - 3)]
-            secrets.SystemRandom().shuffle(pwd)
-            return ''.join(pwd)
-
-        # Crear usuarios en lotes con tolerancia a fallos.
-        # Estrategia (enfoque B):
-        #   1) Fast path: agregar BATCH_COMMIT_SIZE usuarios y hacer commit.
-        #   2) Si el commit falla por una fila duplicada/FK (que envenena la
-        #      transacción en MSSQL), rollback y reintentar cada usuario del
-        #      lote uno por uno con SAVEPOINT (begin_nested) para identificar
-        #      exactamente cuál(es) fallaron sin perder los válidos.
-        created = []
-        create_errors = []
-        curp_pending_user_ids = set()  # IDs de usuarios que necesitan verificación CURP
-
-        def _build_user_payload(r):
-            """Construye el dict de kwargs + password para un User sin agregarlo
-            todavía a la sesión. Devuelve (payload, password, username).
-
-            En modo local (CURP_RENAPO_ENABLED=false):
-              - Si la CURP pasó la validación local → curp_verified=True.
-              - Si la CURP falló (r['_curp_invalid']) → curp=None,
-                curp_verified=False. Más adelante, si hay grupo destino, el
-                GroupMember se crea con status='curp_required' para bloquear
-                el perfil del candidato hasta que entregue una CURP válida.
-            """
-            from app.services.curp_local_validator import is_renapo_enabled
-            _renapo_on_bulk = is_renapo_enabled()
-            _curp_was_invalid = bool(r.get('_curp_invalid'))
-            _curp_val = None if _curp_was_invalid else (r['curp'] or None)
-            _curp_pre_verified = bool(
-                (not _renapo_on_bulk) and _curp_val and not _curp_was_invalid
-            )
-            username = username_map[r['row']]
-            password = _gen_pwd()
-            _campus_id = None
-            _coord_id = None
-            if target_group:
-                _campus_id = target_group.campus_id
-                _coord_id = target_group.coordinator_id
-            else:
-                if _is_coordinator_role(current_user.role):
-                    _coord_id = _get_effective_coordinator_id(current_user)
-                if current_user.role == 'responsable' and current_user.campus_id:
-                    _campus_id = current_user.campus_id
-            payload = dict(
-                id=str(uuid.uuid4()),
-                email=r['email'] if r['email'] else None,
-                username=username,
-                name=r['nombre'].upper() if r['nombre'] else r['nombre'],
-                first_surname=r['primer_apellido'].upper() if r['primer_apellido'] else r['primer_apellido'],
-                second_surname=r['segundo_apellido'].upper() if r['segundo_apellido'] else None,
-                gender=r['genero'],
-                curp=_curp_val,
-                role='candidato',
-                coordinator_id=_coord_id,
-                campus_id=_campus_id,
-                is_active=True,
-                is_verified=False,
-            )
-            # Modo local: marcar verificado de una vez si pasó validación
-            if _curp_pre_verified:
-                payload['curp_verified'] = True
-                payload['curp_verified_at'] = datetime.utcnow()
-            elif _curp_was_invalid:
-                payload['curp_verified'] = False
-            return payload, password, username
-
-        def _instantiate_and_add(payload, password):
-            """Crea User, setea passwords y lo agrega a la sesión actual."""
-            u = User(**payload)
-            u.set_password(password)
-            u.encrypted_password = encrypt_password(password)
-            db.session.add(u)
-            return u
-
-        def _record_created(r, payload, password, username, uid):
-            _parts = [r['nombre'], r['primer_apellido']]
-            if r.get('segundo_apellido'):
-                _parts.append(r['segundo_apellido'])
-            created.append({
-                'row': r['row'],
-                'email': r['email'],
-                'name': f"{r['nombre']} {r['primer_apellido']}",
-                'full_name': ' '.join(_parts),
-                'username': username,
-                'password': password,
-                'curp': r.get('curp'),
-                'gender': r.get('genero'),
-                'user_id': uid,
-                'curp_invalid': bool(r.get('_curp_invalid')),
-                'curp_error': r.get('_curp_error'),
-            })
-            needs_curp_verify = bool(
-                target_group and r.get('curp') and r['curp'] not in GENERIC_FOREIGN_CURPS
-                and not r.get('_curp_invalid')
-            )
-            if needs_curp_verify:
-                curp_pending_user_ids.add(uid)
-
-        def _commit_batch(batch_rows):
-            """Intenta commit del lote (fast path). Si falla, rollback y
-            reintenta cada fila con SAVEPOINT (slow path).
-            batch_rows: lista [(r, payload, password, username), ...].
-            Modifica `created` y `create_errors` in-place.
-            """
-            if not batch_rows:
-                return
-            try:
-                db.session.commit()
-                # Fast path OK: todos los usuarios persistieron.
-                for r, payload, password, username in batch_rows:
-                    _record_created(r, payload, password, username, payload['id'])
-                return
-            except HTTPException:
-                raise
-            except Exception as batch_err:
-                import logging as _lg_b
-                _lg_b.getLogger(__name__).warning(
-                    f'[BULK-UPLOAD] Commit de lote falló ({len(batch_rows)} filas): '
-                    f'{str(batch_err)[:200]}. Reintentando individualmente con SAVEPOINT.'
-                )
-                try:
-                    db.session.rollback()
-                except Exception:
-                    pass
 
-                # Slow path: cada fila aislada con SAVEPOINT. Las válidas
-                # persisten; las inválidas van a errors con mensaje específico.
-                for r, payload, password, username in batch_rows:
-                    try:
-                        sp = db.session.begin_nested()
-                        try:
-                            u = _instantiate_and_add(payload, password)
-                            sp.commit()
-                            _record_created(r, payload, password, username, u.id)
-                        except Exception as ex_inner:
-                            try:
-                                sp.rollback()
-                            except Exception:
-                                pass
-                            create_errors.append({
-                                'row': r['row'],
-                                'email': r['email'] or '(vacío)',
-                                'error': str(ex_inner)[:300],
-                            })
-                    except Exception as ex_outer:
-                        create_errors.append({
-                            'row': r['row'],
-                            'email': r['email'] or '(vacío)',
-                            'error': f'savepoint failed: {str(ex_outer)[:200]}',
-                        })
+def _expire_stale_bulk_uploads(batches):
+    """Marca failed las cargas en curso sin avance en BULK_UPLOAD_STALE_MINUTES.
 
-                try:
-                    db.session.commit()
-                except Exception as commit_after_sp:
-                    try:
-                        db.session.rollback()
-                    except Exception:
-                        pass
-                    _lg_b.getLogger(__name__).error(
-                        f'[BULK-UPLOAD] Commit post-savepoints falló: {commit_after_sp}'
-                    )
+    El job corre en un thread daemon: si el proceso se reinicia el batch se
+    queda en queued/processing para siempre. El job hace commit (y toca
+    updated_at) al arrancar y en cada lote de inserts, así que un batch sin
+    cambios en ese tiempo ya no tiene quien lo avance.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=BULK_UPLOAD_STALE_MINUTES)
+    stale = [
+        b for b in batches
+        if b.status in ('queued', 'processing') and (b.updated_at or b.created_at) < cutoff
+    ]
+    for batch in stale:
+        batch.status = 'failed'
+        batch.error_message = (
+            f'La carga se interrumpió (sin avance en {BULK_UPLOAD_STALE_MINUTES} minutos). '
+            'Revisa el historial y vuelve a subir el archivo con las filas faltantes.'
+        )
+        batch.completed_at = datetime.utcnow()
+        logger.warning(f'[BULK-UPLOAD] Batch {batch.id} sin avance desde {batch.updated_at}, marcado failed')
+    if stale:
+        db.session.commit()
 
-        # ── Bucle principal ──
-        batch_rows = []  # [(r, payload, password, username), ...]
-        for r in to_create:
-            try:
-                payload, password, username = _build_user_payload(r)
-                _instantiate_and_add(payload, password)
-                batch_rows.append((r, payload, password, username))
-                if len(batch_rows) >= BATCH_COMMIT_SIZE:
-                    _commit_batch(batch_rows)
-                    batch_rows = []
-            except HTTPException:
-                raise
-            except Exception as e:
-                # Error al construir/agregar a la sesión (antes del commit).
-                # Procesamos lo acumulado para no perderlo y registramos esta fila.
-                if batch_rows:
-                    _commit_batch(batch_rows)
-                    batch_rows = []
-                create_errors.append({
-                    'row': r.get('row'),
-                    'email': r.get('email') or '(vacío)',
-                    'error': str(e)[:300],
-                })
 
-        # Commit remanente
-        if batch_rows:
-            _commit_batch(batch_rows)
-            batch_rows = []
+def _gen_bulk_password(length=10):
+    """Contraseña aleatoria (excluye caracteres confusos: i, I, l, L, o, O, 0)."""
+    import secrets
+    import string
 
-        batch_count = 0  # vestigial; evita romper código posterior
-        if False:  # bloque legado deshabilitado
-            try:
-                db.session.commit()
-            except HTTPException:
-                raise
-            except Exception as e:
-                db.session.rollback()
-                import logging
-                logging.getLogger(__name__).error(f'Error en commit final bulk: {e}')
-
-        # ======= RECONCILIACIÓN: filtrar created[] contra DB real =======
-        # Si un commit (intermedio o final) fue rolleado por error de unique/FK,
-        # los usuarios quedan en `created[]` aunque NO persistieron en DB. Esto
-        # provocaba que el historial reportara N creados pero el grupo solo
-        # tuviera M < N (issue reportado). Reconciliamos pidiendo a la DB qué
-        # usernames sí existen y movemos los faltantes a create_errors.
-        if created:
-            try:
-                _all_usernames = [c['username'] for c in created]
-                _persisted = set()
-                for _i in range(0, len(_all_usernames), CHUNK):
-                    _chunk = _all_usernames[_i:_i + CHUNK]
-                    _rows = User.query.filter(
-                        User.username.in_(_chunk)
-                    ).with_entities(User.username).all()
-                    _persisted.update(r.username for r in _rows)
-                if len(_persisted) != len(created):
-                    _orphans = [c for c in created if c['username'] not in _persisted]
-                    _kept = [c for c in created if c['username'] in _persisted]
-                    for _o in _orphans:
-                        create_errors.append({
-                            'row': _o.get('row'),
-                            'email': _o.get('email') or '(vacío)',
-                            'error': 'No se persistió por error de DB (commit rolleado)',
+    _CONFUSING = set('iIlLoO0')
+    upper = ''.join(c for c in string.ascii_uppercase if c not in _CONFUSING)
+    lower = ''.join(c for c in string.ascii_lowercase if c not in _CONFUSING)
+    digits = ''.join(c for c in string.digits if c not in _CONFUSING)
+    alpha = upper + lower + digits
+    pwd = [secrets.choice(upper), secrets.choice(lower), secrets.choice(digits)]
+    pwd += [secrets.choice(alpha) for _ in range(length - 3)]
+    secrets.SystemRandom().shuffle(pwd)
+    return ''.join(pwd)
+
+
+def _process_bulk_upload_job(app, batch_id, file_bytes, options):
+    """
+    Procesa una carga masiva en el thread actual (requiere app context).
+
+    Avanza BulkUploadBatch de 'queued' a 'processing' y termina en
+    'completed' (con result_data) o 'failed' (con error_message).
+    processed_rows/total_rows reflejan los usuarios ya insertados.
+    """
+    import io
+    import json
+    from itertools import islice
+    from sqlalchemy import insert
+    from app.models.partner import BulkUploadBatch, BulkUploadMember, CandidateGroup
+    from app.services.credential_hash_pool import iter_hashed_credentials
+
+    CHUNK = 500
+    batch_rec = BulkUploadBatch.query.get(batch_id)
+    if not batch_rec:
+        logger.warning(f'[BULK-UPLOAD] Batch {batch_id} no existe')
+        return
+    current_user = User.query.get(batch_rec.uploaded_by_id)
+    target_group = CandidateGroup.query.get(batch_rec.group_id) if batch_rec.group_id else None
+    if not current_user:
+        _fail_bulk_upload(batch_rec, 'El usuario que inició la carga ya no existe')
+        return
+    if batch_rec.group_id and not target_group:
+        _fail_bulk_upload(batch_rec, f'Grupo con ID {batch_rec.group_id} no encontrado')
+        return
+
+    batch_rec.status = 'processing'
+    batch_rec.started_at = datetime.utcnow()
+    db.session.commit()
+
+    # Parsear
+    parsed_rows, parse_error = _parse_bulk_candidates_excel(io.BytesIO(file_bytes))
+    if parse_error:
+        _fail_bulk_upload(batch_rec, parse_error)
+        return
+    if not parsed_rows:
+        _fail_bulk_upload(batch_rec, 'El archivo no contiene datos')
+        return
+
+    # Auto-asignar CURP genérico para planteles extranjeros
+    if target_group and batch_rec.country and batch_rec.country != 'México':
+        for r in parsed_rows:
+            if not r['curp']:
+                g_raw = (r.get('genero_raw') or '').upper()[:1]
+                if g_raw == 'M':
+                    r['curp'] = FOREIGN_CURP_MALE
+                else:
+                    r['curp'] = FOREIGN_CURP_FEMALE
+
+    # Validar
+    valid_rows, validation_errors = _validate_rows(parsed_rows)
+
+    # Batch-fetch existentes
+    existing_by_email, existing_by_curp = _batch_fetch_existing(valid_rows)
+
+    # Clasificar
+    to_create, existing_assigned, skipped = _classify_valid_rows(
+        valid_rows, existing_by_email, existing_by_curp,
+        target_group.id if target_group else None
+    )
+
+    # Responsable: auto-incluir todos los usuarios existentes (asignación silenciosa)
+    if current_user.role == 'responsable' and target_group:
+        new_skipped = []
+        for s in skipped:
+            if s.get('is_existing_user') and s.get('user_id'):
+                existing_assigned.append({
+                    'row': s['row'],
+                    'email': s.get('email', ''),
+                    'name': s.get('name', ''),
+                    'username': s.get('username', ''),
+                    'user_id': s['user_id'],
+                })
+            else:
+                new_skipped.append(s)
+        skipped = new_skipped
+
+    # Handle include_existing_ids — skipped users the admin opted to add to group
+    include_existing_ids_raw = options.get('include_existing_ids')
+    if include_existing_ids_raw and target_group:
+        try:
+            include_ids = json.loads(include_existing_ids_raw)
+            if isinstance(include_ids, list):
+                include_set = set(str(i) for i in include_ids)
+                new_skipped = []
+                for s in skipped:
+                    if s.get('is_existing_user') and str(s.get('user_id', '')) in include_set:
+                        existing_assigned.append({
+                            'row': s['row'],
+                            'email': s.get('email', ''),
+                            'name': s.get('name', ''),
+                            'username': s.get('username', ''),
+                            'user_id': s['user_id'],
                         })
-                    import logging as _lg_recon
-                    _lg_recon.getLogger(__name__).warning(
-                        f'[BULK-UPLOAD] Reconciliación: {len(_orphans)} usuarios reportados '
-                        f'como creados pero NO persistieron en DB (de {len(created)} esperados)'
-                    )
-                    created = _kept
-                    # También limpiar curp_pending_user_ids — los IDs ya no existen
-                    # (Las IDs eran UUID generados; al rollback no entraron a DB,
-                    # así que tampoco hay GroupMembers que asignar para ellos)
-            except Exception as _recon_err:
-                import logging as _lg_recon2
-                _lg_recon2.getLogger(__name__).error(
-                    f'[BULK-UPLOAD] Error en reconciliación: {_recon_err}'
-                )
+                    else:
+                        new_skipped.append(s)
+                skipped = new_skipped
+        except (ValueError, TypeError):
+            pass
 
-        # Asignar a grupo si aplica
-        group_assignment = None
-        if target_group and (created or existing_assigned):
-            from app.models.partner import GroupMember
-            assigned_new = 0
-            assigned_existing = 0
-            assignment_errors = []
-
-            # Batch-fetch membresías del grupo destino
-            all_assign_ids = []
-            if created:
-                cnames = [c['username'] for c in created]
-                for i in range(0, len(cnames), CHUNK):
-                    chunk = cnames[i:i + CHUNK]
-                    users = User.query.filter(User.username.in_(chunk)).with_entities(User.id, User.username).all()
-                    all_assign_ids.extend([(u.id, u.username) for u in users])
-            for ea in existing_assigned:
-                all_assign_ids.append((ea['user_id'], ea.get('username', '?')))
-
-            uid_list = [x[0] for x in all_assign_ids]
-            existing_members = set()
-            for i in range(0, len(uid_list), CHUNK):
-                chunk = uid_list[i:i + CHUNK]
-                members = GroupMember.query.filter(
-                    GroupMember.group_id == target_group.id,
-                    GroupMember.user_id.in_(chunk)
-                ).with_entities(GroupMember.user_id).all()
-                existing_members.update(m.user_id for m in members)
-
-            # Set de uids cuya CURP NO pasó validación local en _validate_rows.
-            # Esos GroupMembers se crean en 'curp_required' (perfil bloqueado).
-            invalid_curp_uids = {
-                c['user_id'] for c in created
-                if c.get('curp_invalid') and c.get('user_id')
-            }
+    # Handle skip_row_numbers — name_match rows the admin chose NOT to create
+    skip_rows_raw = options.get('skip_row_numbers')
+    if skip_rows_raw:
+        try:
+            skip_rows = json.loads(skip_rows_raw)
+            if isinstance(skip_rows, list):
+                skip_set = set(int(r) for r in skip_rows)
+                new_to_create = []
+                for r in to_create:
+                    if r['row'] in skip_set:
+                        skipped.append({
+                            'row': r['row'],
+                            'email': r.get('email', ''),
+                            'reason': 'Omitido por coincidencia de nombre (decisión del usuario)',
+                        })
+                    else:
+                        new_to_create.append(r)
+                to_create = new_to_create
+        except (ValueError, TypeError):
+            pass
 
-            batch_count = 0
-            for uid, uname in all_assign_ids:
-                if uid not in existing_members:
-                    try:
-                        # Política: el candidato siempre se ve en el grupo desde el
-                        # inicio. Si su CURP no se valida, el usuario será redirigido
-                        # a /mi-curp en su login. La cola de verificación corre en
-                        # background y solo cambia el status si RENAPO RECHAZA
-                        # definitivamente la CURP (curp_required) tras MAX intentos.
-                        # En modo LOCAL: si la CURP ya falló validación de formato,
-                        # entrar directamente como 'curp_required'.
-                        _gm_status = 'curp_required' if uid in invalid_curp_uids else 'active'
-                        db.session.add(GroupMember(group_id=target_group.id, user_id=uid, status=_gm_status))
-                        if uid in {ea['user_id'] for ea in existing_assigned}:
-                            assigned_existing += 1
-                        else:
-                            assigned_new += 1
-                        batch_count += 1
-                        if batch_count >= BATCH_COMMIT_SIZE:
-                            try:
-                                db.session.commit()
-                            except Exception as _gm_commit_err:
-                                import logging as _lg_gm
-                                _lg_gm.getLogger(__name__).error(
-                                    f'[BULK-UPLOAD] Error en commit intermedio GroupMember: {_gm_commit_err}'
-                                )
-                                try:
-                                    db.session.rollback()
-                                except Exception:
-                                    pass
-                                assignment_errors.append({
-                                    'username': '(batch)',
-                                    'error': f'Commit intermedio falló: {str(_gm_commit_err)[:200]}',
-                                })
-                            batch_count = 0
-                    except HTTPException:
-                        raise
-                    except Exception as e:
-                        assignment_errors.append({'username': uname, 'error': str(e)})
+    # Generar usernames
+    username_map = _batch_generate_usernames(to_create) if to_create else {}
+
+    created = []
+    create_errors = []
+    curp_pending_user_ids = set()  # IDs de usuarios que necesitan verificación CURP
+
+    from app.services.curp_local_validator import is_renapo_enabled
+    _renapo_on_bulk = is_renapo_enabled()
+
+    def _build_user_payload(r):
+        """Construye el dict de columnas + password para un User.
+        Devuelve (payload, password, username).
+
+        En modo local (CURP_RENAPO_ENABLED=false):
+          - Si la CURP pasó la validación local → curp_verified=True.
+          - Si la CURP falló (r['_curp_invalid']) → curp=None,
+            curp_verified=False. Más adelante, si hay grupo destino, el
+            GroupMember se crea con status='curp_required' para bloquear
+            el perfil del candidato hasta que entregue una CURP válida.
+        """
+        _curp_was_invalid = bool(r.get('_curp_invalid'))
+        _curp_val = None if _curp_was_invalid else (r['curp'] or None)
+        _curp_pre_verified = bool(
+            (not _renapo_on_bulk) and _curp_val and not _curp_was_invalid
+        )
+        username = username_map[r['row']]
+        password = _gen_bulk_password()
+        _campus_id = None
+        _coord_id = None
+        if target_group:
+            _campus_id = target_group.campus_id
+            _coord_id = target_group.coordinator_id
+        else:
+            if _is_coordinator_role(current_user.role):
+                _coord_id = _get_effective_coordinator_id(current_user)
+            if current_user.role == 'responsable' and current_user.campus_id:
+                _campus_id = current_user.campus_id
+        payload = dict(
+            id=str(uuid.uuid4()),
+            email=r['email'] if r['email'] else None,
+            username=username,
+            name=r['nombre'].upper() if r['nombre'] else r['nombre'],
+            first_surname=r['primer_apellido'].upper() if r['primer_apellido'] else r['primer_apellido'],
+            second_surname=r['segundo_apellido'].upper() if r['segundo_apellido'] else None,
+            gender=r['genero'],
+            curp=_curp_val,
+            role='candidato',
+            coordinator_id=_coord_id,
+            campus_id=_campus_id,
+            is_active=True,
+            is_verified=False,
+            curp_verified=False,
+            curp_verified_at=None,
+        )
+        # Modo local: marcar verificado de una vez si pasó validación
+        if _curp_pre_verified:
+            payload['curp_verified'] = True
+            payload['curp_verified_at'] = datetime.utcnow()
+        return payload, password, username
+
+    def _record_created(r, payload, password, username):
+        uid = payload['id']
+        _parts = [r['nombre'], r['primer_apellido']]
+        if r.get('segundo_apellido'):
+            _parts.append(r['segundo_apellido'])
+        created.append({
+            'row': r['row'],
+            'email': r['email'],
+            'name': f"{r['nombre']} {r['primer_apellido']}",
+            'full_name': ' '.join(_parts),
+            'username': username,
+            'password': password,
+            'curp': r.get('curp'),
+            'gender': r.get('genero'),
+            'user_id': uid,
+            'curp_invalid': bool(r.get('_curp_invalid')),
+            'curp_error': r.get('_curp_error'),
+        })
+        needs_curp_verify = bool(
+            target_group and r.get('curp') and r['curp'] not in GENERIC_FOREIGN_CURPS
+            and not r.get('_curp_invalid')
+        )
+        if needs_curp_verify:
+            curp_pending_user_ids.add(uid)
+
+    def _insert_chunk(chunk_rows):
+        """Inserta el lote con un solo INSERT multi-fila (fast path). Si falla
+        (fila duplicada/FK, que envenena la transacción en MSSQL), rollback y
+        reintenta cada fila con SAVEPOINT para aislar las inválidas sin perder
+        las válidas. Los hashes ya vienen en el payload.
+        chunk_rows: lista [(r, payload, password, username), ...].
+        """
+        try:
+            # INSERT Core sobre la tabla: todas las filas tienen las mismas columnas
+            # (incluidos los None), así sale un solo executemany por lote.
+            db.session.execute(insert(User.__table__), [payload for _, payload, _, _ in chunk_rows])
+            db.session.commit()
+            for r, payload, password, username in chunk_rows:
+                _record_created(r, payload, password, username)
+            return
+        except Exception as batch_err:
+            logger.warning(
+                f'[BULK-UPLOAD] Insert de lote falló ({len(chunk_rows)} filas): '
+                f'{str(batch_err)[:200]}. Reintentando individualmente con SAVEPOINT.'
+            )
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
 
-            if batch_count > 0:
+        for r, payload, password, username in chunk_rows:
+            try:
+                sp = db.session.begin_nested()
                 try:
-                    db.session.commit()
-                except Exception as _gm_final_err:
-                    import logging as _lg_gm2
-                    _lg_gm2.getLogger(__name__).error(
-                        f'[BULK-UPLOAD] Error en commit final GroupMember: {_gm_final_err}'
-                    )
+                    db.session.add(User(**payload))
+                    sp.commit()
+                    _record_created(r, payload, password, username)
+                except Exception as ex_inner:
                     try:
-                        db.session.rollback()
+                        sp.rollback()
                     except Exception:
                         pass
-                    assignment_errors.append({
-                        'username': '(commit final)',
-                        'error': f'Commit final falló: {str(_gm_final_err)[:200]}',
+                    create_errors.append({
+                        'row': r['row'],
+                        'email': r['email'] or '(vacío)',
+                        'error': str(ex_inner)[:300],
                     })
+            except Exception as ex_outer:
+                create_errors.append({
+                    'row': r['row'],
+                    'email': r['email'] or '(vacío)',
+                    'error': f'savepoint failed: {str(ex_outer)[:200]}',
+                })
 
-            # Reconciliar: contar GroupMembers reales en DB vs los que esperábamos crear
-            try:
-                _real_count = GroupMember.query.filter(
-                    GroupMember.group_id == target_group.id,
-                    GroupMember.user_id.in_([x[0] for x in all_assign_ids])
-                ).count()
-                _expected = len(all_assign_ids)
-                if _real_count != _expected:
-                    import logging as _lg_recon_gm
-                    _lg_recon_gm.getLogger(__name__).warning(
-                        f'[BULK-UPLOAD] Reconciliación GroupMember: esperados {_expected}, '
-                        f'reales en DB {_real_count} (grupo {target_group.id})'
-                    )
-                    # Ajustar contadores reportados al usuario
-                    _diff = _expected - _real_count
-                    if _diff > 0:
-                        # Restar prioritariamente de assigned_new (los recién creados)
-                        _restar_new = min(_diff, assigned_new)
-                        assigned_new -= _restar_new
-                        assigned_existing -= (_diff - _restar_new)
-                        if assigned_existing < 0:
-                            assigned_existing = 0
-                        assignment_errors.append({
-                            'username': '(reconciliación)',
-                            'error': f'{_diff} GroupMember(s) no persistieron en DB',
-                        })
-            except Exception as _recon_gm_err:
-                import logging as _lg_recon_gm2
-                _lg_recon_gm2.getLogger(__name__).error(
-                    f'[BULK-UPLOAD] Error reconciliando GroupMember: {_recon_gm_err}'
-                )
-
-            group_assignment = {
-                'group_id': target_group.id,
-                'group_name': target_group.name,
-                'assigned': assigned_new + assigned_existing,
-                'assigned_new': assigned_new,
-                'assigned_existing': assigned_existing,
-                'errors': assignment_errors,
-            }
-
-        # Combinar errores
-        all_errors = validation_errors + create_errors
-
-        # ======= GUARDAR REGISTRO DE CARGA MASIVA EN HISTORIAL =======
-        # IMPORTANTE: se guarda ANTES del envío de emails para garantizar que siempre
-        # quede registro aunque el envío de emails tarde o falle.
-        batch_record_id = None
         try:
-            from app.models.partner import BulkUploadBatch, BulkUploadMember, Campus as CampusModel
-
-            # Obtener info del campus/partner/grupo para snapshot
-            _partner_name = None
-            _campus_name = None
-            _country = None
-            _state_name = None
-            _partner_id = None
-            _campus_id = None
-
-            if target_group:
-                campus_obj = CampusModel.query.get(target_group.campus_id)
-                if campus_obj:
-                    _campus_id = campus_obj.id
-                    _campus_name = campus_obj.name
-                    _country = campus_obj.country
-                    _state_name = campus_obj.state_name
-                    if campus_obj.partner_id:
-                        _partner_id = campus_obj.partner_id
-                        from app.models.partner import Partner as PartnerModel
-                        partner_obj = PartnerModel.query.get(campus_obj.partner_id)
-                        if partner_obj:
-                            _partner_name = partner_obj.name
-
-            original_filename = file.filename if hasattr(file, 'filename') else None
-
-            batch_rec = BulkUploadBatch(
-                uploaded_by_id=current_user.id,
-                partner_id=_partner_id,
-                campus_id=_campus_id,
-                group_id=target_group.id if target_group else None,
-                partner_name=_partner_name,
-                campus_name=_campus_name,
-                group_name=target_group.name if target_group else None,
-                country=_country,
-                state_name=_state_name,
-                total_processed=len(parsed_rows),
-                total_created=len(created),
-                total_existing_assigned=len(existing_assigned),
-                total_errors=len(all_errors),
-                total_skipped=len(skipped),
-                emails_sent=0,      # Se actualiza en segundo plano tras el envío async
-                emails_failed=0,
-                original_filename=original_filename,
-            )
-            db.session.add(batch_rec)
-            db.session.flush()  # get batch_rec.id
-
-            # Build username->user_id map from created users
-            created_user_ids = {}
-            if created:
-                cnames = [c['username'] for c in created]
-                for i in range(0, len(cnames), CHUNK):
-                    chunk = cnames[i:i + CHUNK]
-                    users = User.query.filter(User.username.in_(chunk)).with_entities(User.id, User.username).all()
-                    for u in users:
-                        created_user_ids[u.username] = u.id
-
-            # Save created members
-            for c in created:
-                db.session.add(BulkUploadMember(
-                    batch_id=batch_rec.id,
-                    user_id=created_user_ids.get(c['username']),
-                    row_number=c.get('row'),
-                    email=c.get('email'),
-                    full_name=c.get('full_name', c.get('name', '')),
-                    username=c.get('username'),
-                    curp=c.get('curp'),
-                    gender=c.get('gender'),
-                    status='created',
-                    error_message=(
-                        f'CURP rechazada por validación local: {c.get("curp_error")}. '
-                        f'Perfil bloqueado hasta entregar CURP correcta.'
-                        if c.get('curp_invalid') else None
-                    ),
-                ))
-
-            # Save existing_assigned members
-            for ea in existing_assigned:
-                db.session.add(BulkUploadMember(
-                    batch_id=batch_rec.id,
-                    user_id=ea.get('user_id'),
-                    row_number=ea.get('row'),
-                    email=ea.get('email'),
-                    full_name=ea.get('name', ''),
-                    username=ea.get('username'),
-                    status='existing_assigned',
-                ))
-
-            # Save errors
-            for err in all_errors:
-                db.session.add(BulkUploadMember(
-                    batch_id=batch_rec.id,
-                    row_number=err.get('row'),
-                    email=err.get('email'),
-                    full_name=err.get('nombre', err.get('name', '')),
-                    status='error',
-                    error_message=(err.get('error') or '')[:500],
-                ))
-
-            # Save skipped
-            for s in skipped:
-                db.session.add(BulkUploadMember(
-                    batch_id=batch_rec.id,
-                    user_id=s.get('user_id'),
-                    row_number=s.get('row'),
-                    email=s.get('email'),
-                    full_name=s.get('name', ''),
-                    username=s.get('username'),
-                    status='skipped',
-                    error_message=(s.get('reason') or '')[:500],
-                ))
-
             db.session.commit()
-            batch_record_id = batch_rec.id
-        except Exception as batch_err:
-            import logging
-            logging.getLogger(__name__).error(f'Error saving bulk upload history: {batch_err}')
+        except Exception as commit_after_sp:
             try:
                 db.session.rollback()
             except Exception:
                 pass
+            logger.error(f'[BULK-UPLOAD] Commit post-savepoints falló: {commit_after_sp}')
 
-        # ======= ENVÍO DE EMAILS DE BIENVENIDA (EN SEGUNDO PLANO) =======
-        # Se ejecuta en un thread independiente para evitar timeouts en cargas grandes.
-        # Los contadores emails_sent/emails_failed se actualizan en el batch record
-        # una vez que el thread termina.
-        emails_sent = 0
-        emails_failed = 0
-        if created:
-            import threading
-            from flask import current_app as _cur_app
-            _email_app = _cur_app._get_current_object()
-            _emails_payload = [
-                {'username': c['username'], 'email': c.get('email'), 'password': c['password']}
-                for c in created if c.get('email')
-            ]
+    # ── Preparar filas a crear ──
+    prepared = []  # [(r, payload, password, username), ...]
+    for r in to_create:
+        try:
+            prepared.append((r, *_build_user_payload(r)))
+        except Exception as e:
+            create_errors.append({
+                'row': r.get('row'),
+                'email': r.get('email') or '(vacío)',
+                'error': str(e)[:300],
+            })
 
-            def _send_welcome_emails_bg(app_obj, payload, b_id):
-                import logging as _log
-                _logger = _log.getLogger(__name__)
-                sent = 0
-                failed = 0
-                with app_obj.app_context():
-                    try:
-                        from app.services.email_service import send_welcome_email
-                        usernames = [p['username'] for p in payload]
-                        users_map = {}
-                        for i in range(0, len(usernames), 500):
-                            chunk_u = User.query.filter(
-                                User.username.in_(usernames[i:i + 500])
-                            ).all()
-                            for u in chunk_u:
-                                users_map[u.username] = u
-                        for p in payload:
-                            if p['email'] and p['username'] in users_map:
-                                try:
-                                    send_welcome_email(users_map[p['username']], p['password'])
-                                    sent += 1
-                                except Exception:
-                                    failed += 1
-                    except Exception as _e:
-                        _logger.error(f'Error enviando welcome emails bulk (bg): {_e}')
-                    # Actualizar contadores en el batch record
-                    if b_id:
+    batch_rec.total_rows = len(prepared)
+    batch_rec.processed_rows = 0
+    db.session.commit()
+
+    # ── Hash + inserts por lotes ──
+    # Los hashes Argon2 se calculan en el pool de procesos con concurrencia
+    # acotada; cada lote toma los siguientes BATCH_COMMIT_SIZE resultados, así
+    # el pool trabaja sobre el siguiente lote mientras este se inserta.
+    credentials = iter_hashed_credentials(password for _, _, password, _ in prepared)
+    try:
+        for start in range(0, len(prepared), BATCH_COMMIT_SIZE):
+            chunk_rows = prepared[start:start + BATCH_COMMIT_SIZE]
+            for (_, payload, _, _), (password_hash, encrypted) in zip(
+                    chunk_rows, islice(credentials, len(chunk_rows))):
+                payload['password_hash'] = password_hash
+                payload['encrypted_password'] = encrypted
+            _insert_chunk(chunk_rows)
+            batch_rec.processed_rows = start + len(chunk_rows)
+            db.session.commit()
+    finally:
+        credentials.close()  # libera el pool aunque un lote falle
+
+    # ======= RECONCILIACIÓN: filtrar created[] contra DB real =======
+    # Si un commit fue rolleado por error de unique/FK, los usuarios quedan en
+    # `created[]` aunque NO persistieron en DB. Reconciliamos pidiendo a la DB
+    # qué usernames sí existen y movemos los faltantes a create_errors.
+    if created:
+        try:
+            _all_usernames = [c['username'] for c in created]
+            _persisted = set()
+            for _i in range(0, len(_all_usernames), CHUNK):
+                _chunk = _all_usernames[_i:_i + CHUNK]
+                _rows = User.query.filter(
+                    User.username.in_(_chunk)
+                ).with_entities(User.username).all()
+                _persisted.update(r.username for r in _rows)
+            if len(_persisted) != len(created):
+                _orphans = [c for c in created if c['username'] not in _persisted]
+                _kept = [c for c in created if c['username'] in _persisted]
+                for _o in _orphans:
+                    create_errors.append({
+                        'row': _o.get('row'),
+                        'email': _o.get('email') or '(vacío)',
+                        'error': 'No se persistió por error de DB (commit rolleado)',
+                    })
+                logger.warning(
+                    f'[BULK-UPLOAD] Reconciliación: {len(_orphans)} usuarios reportados '
+                    f'como creados pero NO persistieron en DB (de {len(created)} esperados)'
+                )
+                created = _kept
+        except Exception as _recon_err:
+            logger.error(f'[BULK-UPLOAD] Error en reconciliación: {_recon_err}')
+
+    # Asignar a grupo si aplica
+    group_assignment = None
+    if target_group and (created or existing_assigned):
+        from app.models.partner import GroupMember
+        assigned_new = 0
+        assigned_existing = 0
+        assignment_errors = []
+
+        # Los ids de los creados se generaron aquí; los reconciliados existen
+        all_assign_ids = [(c['user_id'], c['username']) for c in created]
+        for ea in existing_assigned:
+            all_assign_ids.append((ea['user_id'], ea.get('username', '?')))
+        existing_assigned_ids = {ea['user_id'] for ea in existing_assigned}
+
+        uid_list = [x[0] for x in all_assign_ids]
+        existing_members = set()
+        for i in range(0, len(uid_list), CHUNK):
+            chunk = uid_list[i:i + CHUNK]
+            members = GroupMember.query.filter(
+                GroupMember.group_id == target_group.id,
+                GroupMember.user_id.in_(chunk)
+            ).with_entities(GroupMember.user_id).all()
+            existing_members.update(m.user_id for m in members)
+
+        # Set de uids cuya CURP NO pasó validación local en _validate_rows.
+        # Esos GroupMembers se crean en 'curp_required' (perfil bloqueado).
+        invalid_curp_uids = {
+            c['user_id'] for c in created
+            if c.get('curp_invalid') and c.get('user_id')
+        }
+
+        batch_count = 0
+        for uid, uname in all_assign_ids:
+            if uid not in existing_members:
+                try:
+                    # Política: el candidato siempre se ve en el grupo desde el
+                    # inicio. Si su CURP no se valida, el usuario será redirigido
+                    # a /mi-curp en su login. La cola de verificación corre en
+                    # background y solo cambia el status si RENAPO RECHAZA
+                    # definitivamente la CURP (curp_required) tras MAX intentos.
+                    # Si la CURP ya falló la validación local (formato o
+                    # dígito verificador, en ambos modos), entrar
+                    # directamente como 'curp_required'.
+                    _gm_status = 'curp_required' if uid in invalid_curp_uids else 'active'
+                    db.session.add(GroupMember(group_id=target_group.id, user_id=uid, status=_gm_status))
+                    if uid in existing_assigned_ids:
+                        assigned_existing += 1
+                    else:
+                        assigned_new += 1
+                    batch_count += 1
+                    if batch_count >= BATCH_COMMIT_SIZE:
                         try:
-                            from app.models.partner import BulkUploadBatch as _BUB
-                            _batch = _BUB.query.get(b_id)
-                            if _batch:
-                                _batch.emails_sent = sent
-                                _batch.emails_failed = failed
-                                db.session.commit()
-                        except Exception as _ue:
-                            _logger.error(f'Error actualizando email counts en batch {b_id}: {_ue}')
+                            db.session.commit()
+                        except Exception as _gm_commit_err:
+                            logger.error(
+                                f'[BULK-UPLOAD] Error en commit intermedio GroupMember: {_gm_commit_err}'
+                            )
                             try:
                                 db.session.rollback()
                             except Exception:
                                 pass
+                            assignment_errors.append({
+                                'username': '(batch)',
+                                'error': f'Commit intermedio falló: {str(_gm_commit_err)[:200]}',
+                            })
+                        batch_count = 0
+                except Exception as e:
+                    assignment_errors.append({'username': uname, 'error': str(e)})
+
+        if batch_count > 0:
+            try:
+                db.session.commit()
+            except Exception as _gm_final_err:
+                logger.error(f'[BULK-UPLOAD] Error en commit final GroupMember: {_gm_final_err}')
+                try:
+                    db.session.rollback()
+                except Exception:
+                    pass
+                assignment_errors.append({
+                    'username': '(commit final)',
+                    'error': f'Commit final falló: {str(_gm_final_err)[:200]}',
+                })
 
-            threading.Thread(
-                target=_send_welcome_emails_bg,
-                args=(_email_app, _emails_payload, batch_record_id),
-                daemon=True,
-            ).start()
+        # Reconciliar: contar GroupMembers reales en DB vs los que esperábamos crear
+        try:
+            _real_count = 0
+            for i in range(0, len(uid_list), CHUNK):
+                _real_count += GroupMember.query.filter(
+                    GroupMember.group_id == target_group.id,
+                    GroupMember.user_id.in_(uid_list[i:i + CHUNK])
+                ).count()
+            _expected = len(all_assign_ids)
+            if _real_count != _expected:
+                logger.warning(
+                    f'[BULK-UPLOAD] Reconciliación GroupMember: esperados {_expected}, '
+                    f'reales en DB {_real_count} (grupo {target_group.id})'
+                )
+                # Ajustar contadores reportados al usuario
+                _diff = _expected - _real_count
+                if _diff > 0:
+                    # Restar prioritariamente de assigned_new (los recién creados)
+                    _restar_new = min(_diff, assigned_new)
+                    assigned_new -= _restar_new
+                    assigned_existing -= (_diff - _restar_new)
+                    if assigned_existing < 0:
+                        assigned_existing = 0
+                    assignment_errors.append({
+                        'username': '(reconciliación)',
+                        'error': f'{_diff} GroupMember(s) no persistieron en DB',
+                    })
+        except Exception as _recon_gm_err:
+            logger.error(f'[BULK-UPLOAD] Error reconciliando GroupMember: {_recon_gm_err}')
 
-        response_data = {
-            'message': f'Proceso completado: {len(created)} creados, {len(existing_assigned)} existentes asignados',
-            'summary': {
-                'total_processed': len(parsed_rows),
-                'created': len(created),
-                'existing_assigned': len(existing_assigned),
-                'errors': len(all_errors),
-                'skipped': len(skipped),
-                'emails_sent': emails_sent,
-                'emails_failed': emails_failed,
-            },
-            'details': {
-                'created': created,
-                'existing_assigned': existing_assigned,
-                'errors': all_errors,
-                'skipped': skipped,
-                'total_processed': len(parsed_rows),
-            },
+        group_assignment = {
+            'group_id': target_group.id,
+            'group_name': target_group.name,
+            'assigned': assigned_new + assigned_existing,
+            'assigned_new': assigned_new,
+            'assigned_existing': assigned_existing,
+            'errors': assignment_errors,
         }
-        if group_assignment:
-            response_data['group_assignment'] = group_assignment
-        if batch_record_id:
-            response_data['batch_id'] = batch_record_id
-
-        # ======= ENCOLAR VERIFICACIÓN CURP =======
-        # En vez de threads volátiles, encolar en curp_verification_queue.
-        # Un worker en background (services/curp_queue_worker.py) procesa
-        # con cache + circuit-breaker + reintentos persistentes.
-        # NOTA: en modo LOCAL (CURP_RENAPO_ENABLED=false) NO encolamos —
-        # ya marcamos curp_verified=True en _build_user_payload tras la
-        # validación local en _validate_rows.
-        from app.services.curp_local_validator import is_renapo_enabled as _renapo_on_bulk_q
-        if _renapo_on_bulk_q():
-            curp_users_to_verify = [
-                c for c in created
-                if c.get('curp') and c['curp'] not in GENERIC_FOREIGN_CURPS
-            ]
-            if curp_users_to_verify and batch_record_id:
-                try:
-                    from app.services.curp_queue_worker import enqueue_curp_verification
-                    import logging as _lg_curp
-                    _logger_curp = _lg_curp.getLogger(__name__)
-                    enqueued = 0
-                    for c in curp_users_to_verify:
-                        uid = c.get('user_id') or c.get('id')
-                        curp_val = c.get('curp')
-                        if uid and curp_val:
-                            if enqueue_curp_verification(uid, curp_val, source='bulk', batch_id=batch_record_id):
-                                enqueued += 1
-                    _logger_curp.info(f'[BULK-CURP] {enqueued} CURPs encoladas para validación (batch {batch_record_id})')
-                except Exception as enq_err:
-                    import logging as _lg_curp_err
-                    _lg_curp_err.getLogger(__name__).error(f'[BULK-CURP] Error encolando verificaciones: {enq_err}')
-
-        return jsonify(response_data), 200
 
-    except HTTPException:
+    # Combinar errores
+    all_errors = validation_errors + create_errors
 
-        raise
+    # ======= GUARDAR MIEMBROS EN EL HISTORIAL =======
+    # Se guarda ANTES del envío de emails para garantizar que siempre quede
+    # registro aunque el envío de emails tarde o falle.
+    try:
+        # Save created members
+        for c in created:
+            db.session.add(BulkUploadMember(
+                batch_id=batch_rec.id,
+                user_id=c['user_id'],
+                row_number=c.get('row'),
+                email=c.get('email'),
+                full_name=c.get('full_name', c.get('name', '')),
+                username=c.get('username'),
+                curp=c.get('curp'),
+                gender=c.get('gender'),
+                status='created',
+                error_message=(
+                    f'CURP rechazada por validación local: {c.get("curp_error")}. '
+                    f'Perfil bloqueado hasta entregar CURP correcta.'
+                    if c.get('curp_invalid') else None
+                ),
+            ))
 
-    except Exception as e:
-        db.session.rollback()
-        logger.exception('user_management error')
-        return jsonify({'error': 'Error interno del servidor'}), 500
+        # Save existing_assigned members
+        for ea in existing_assigned:
+            db.session.add(BulkUploadMember(
+                batch_id=batch_rec.id,
+                user_id=ea.get('user_id'),
+                row_number=ea.get('row'),
+                email=ea.get('email'),
+                full_name=ea.get('name', ''),
+                username=ea.get('username'),
+                status='existing_assigned',
+            ))
+
+        # Save errors
+        for err in all_errors:
+            db.session.add(BulkUploadMember(
+                batch_id=batch_rec.id,
+                row_number=err.get('row'),
+                email=err.get('email'),
+                full_name=err.get('nombre', err.get('name', '')),
+                status='error',
+                error_message=(err.get('error') or '')[:500],
+            ))
+
+        # Save skipped
+        for s in skipped:
+            db.session.add(BulkUploadMember(
+                batch_id=batch_rec.id,
+                user_id=s.get('user_id'),
+                row_number=s.get('row'),
+                email=s.get('email'),
+                full_name=s.get('name', ''),
+                username=s.get('username'),
+                status='skipped',
+                error_message=(s.get('reason') or '')[:500],
+            ))
+
+        db.session.commit()
+    except Exception as batch_err:
+        logger.error(f'Error saving bulk upload history: {batch_err}')
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+
+    response_data = {
+        'message': f'Proceso completado: {len(created)} creados, {len(existing_assigned)} existentes asignados',
+        'summary': {
+            'total_processed': len(parsed_rows),
+            'created': len(created),
+            'existing_assigned': len(existing_assigned),
+            'errors': len(all_errors),
+            'skipped': len(skipped),
+            'emails_sent': 0,   # Se actualiza en el batch tras el envío
+            'emails_failed': 0,
+        },
+        'details': {
+            'created': created,
+            'existing_assigned': existing_assigned,
+            'errors': all_errors,
+            'skipped': skipped,
+            'total_processed': len(parsed_rows),
+        },
+        'batch_id': batch_rec.id,
+    }
+    if group_assignment:
+        response_data['group_assignment'] = group_assignment
+
+    # El resultado se guarda sin contraseñas: el endpoint de progreso las
+    # recupera de User.encrypted_password al leerlo.
+    stored = dict(response_data, details=dict(
+        response_data['details'],
+        created=[{k: v for k, v in c.items() if k != 'password'} for c in created],
+    ))
+    batch_rec.total_processed = len(parsed_rows)
+    batch_rec.total_created = len(created)
+    batch_rec.total_existing_assigned = len(existing_assigned)
+    batch_rec.total_errors = len(all_errors)
+    batch_rec.total_skipped = len(skipped)
+    batch_rec.result_data = json.dumps(stored, default=str)
+    batch_rec.status = 'completed'
+    batch_rec.completed_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(
+        f'[BULK-UPLOAD] Batch {batch_rec.id} completado: {len(created)} creados, '
+        f'{len(existing_assigned)} existentes, {len(all_errors)} errores'
+    )
+
+    # ======= ENCOLAR VERIFICACIÓN CURP =======
+    # En vez de threads volátiles, encolar en curp_verification_queue.
+    # Un worker en background (services/curp_queue_worker.py) procesa
+    # con cache + circuit-breaker + reintentos persistentes.
+    # NOTA: en modo LOCAL (CURP_RENAPO_ENABLED=false) NO encolamos —
+    # ya marcamos curp_verified=True en _build_user_payload tras la
+    # validación local en _validate_rows.
+    if _renapo_on_bulk:
+        # Las CURPs que no pasaron el pre-screen local ya quedaron en
+        # curp_required; las cacheadas las resuelve el worker sin RENAPO.
+        curp_users_to_verify = [
+            c for c in created
+            if c.get('curp') and c['curp'] not in GENERIC_FOREIGN_CURPS
+            and not c.get('curp_invalid')
+        ]
+        if curp_users_to_verify:
+            try:
+                from app.services.curp_queue_worker import enqueue_curp_verification
+                enqueued = 0
+                for c in curp_users_to_verify:
+                    if enqueue_curp_verification(c['user_id'], c['curp'], source='bulk', batch_id=batch_rec.id):
+                        enqueued += 1
+                logger.info(f'[BULK-CURP] {enqueued} CURPs encoladas para validación (batch {batch_rec.id})')
+            except Exception as enq_err:
+                logger.error(f'[BULK-CURP] Error encolando verificaciones: {enq_err}')
+
+    # ======= ENVÍO DE EMAILS DE BIENVENIDA =======
+    # Ya estamos fuera del request: se envían en este mismo thread después de
+    # marcar el batch como completado, y los contadores se actualizan al final.
+    emails_payload = [
+        {'username': c['username'], 'email': c.get('email'), 'password': c['password']}
+        for c in created if c.get('email')
+    ]
+    if emails_payload:
+        _send_bulk_welcome_emails(emails_payload, batch_rec.id)
+
+
+def _send_bulk_welcome_emails(payload, batch_id):
+    """Envía los emails de bienvenida de una carga y guarda los contadores
+    emails_sent/emails_failed en el batch (requiere app context)."""
+    from app.models.partner import BulkUploadBatch
+
+    sent = 0
+    failed = 0
+    try:
+        from app.services.email_service import send_welcome_email
+        usernames = [p['username'] for p in payload]
+        users_map = {}
+        for i in range(0, len(usernames), 500):
+            for u in User.query.filter(User.username.in_(usernames[i:i + 500])).all():
+                users_map[u.username] = u
+        for p in payload:
+            if p['email'] and p['username'] in users_map:
+                try:
+                    send_welcome_email(users_map[p['username']], p['password'])
+                    sent += 1
+                except Exception:
+                    failed += 1
+    except Exception as _e:
+        logger.error(f'Error enviando welcome emails bulk (bg): {_e}')
+
+    try:
+        _batch = BulkUploadBatch.query.get(batch_id)
+        if _batch:
+            _batch.emails_sent = sent
+            _batch.emails_failed = failed
+            db.session.commit()
+    except Exception as _ue:
+        logger.error(f'Error actualizando email counts en batch {batch_id}: {_ue}')
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
 
 
 @bp.route('/candidates/bulk-upload/template', methods=['GET'])
@@ -5066,6 +5133,7 @@ def list_bulk_upload_history():
 
         query = query.order_by(BulkUploadBatch.created_at.desc())
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        _expire_stale_bulk_uploads(pagination.items)
 
         return jsonify({
             'batches': [b.to_dict() for b in pagination.items],
@@ -5198,6 +5266,66 @@ def get_bulk_curp_progress(batch_id):
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 
+@bp.route('/bulk-history/<int:batch_id>/progress', methods=['GET'])
+@jwt_required()
+@management_required
+@rate_limit(limit=600, window=60, key_prefix='rl_um_bulk_prog')
+def get_bulk_upload_progress(batch_id):
+    """Progreso del procesamiento en segundo plano de una carga masiva.
+
+    Devuelve el batch (status, processed_rows/total_rows, error_message).
+    Un batch en curso sin avance en BULK_UPLOAD_STALE_MINUTES se reporta
+    como failed (el thread que lo procesaba ya no existe).
+    Al completarse incluye `result` con el mismo formato que respondía la
+    carga síncrona; las contraseñas de los creados se desencriptan de
+    User.encrypted_password porque result_data no las guarda.
+    """
+    try:
+        import json
+        from app.models.partner import BulkUploadBatch
+        from app.models.user import decrypt_password
+
+        current_user = g.current_user
+        bulk_perm_err = _ensure_bulk_upload_allowed(current_user)
+        if bulk_perm_err:
+            return bulk_perm_err
+        batch = BulkUploadBatch.query.get_or_404(batch_id)
+
+        # Tenant scope idéntico al detail endpoint.
+        if _is_coordinator_role(current_user.role):
+            eff_id = _get_effective_coordinator_id(current_user)
+            if batch.uploaded_by_id != eff_id:
+                return jsonify({'error': 'No tienes acceso a este registro'}), 403
+        elif current_user.role in ('responsable', 'responsable_partner', 'responsable_estatal', 'soporte'):
+            if batch.uploaded_by_id != current_user.id:
+                return jsonify({'error': 'No tienes acceso a este registro'}), 403
+
+        _expire_stale_bulk_uploads([batch])
+        data = batch.to_dict()
+        if batch.status == 'completed' and batch.result_data:
+            result = json.loads(batch.result_data)
+            created = result.get('details', {}).get('created', [])
+            user_ids = [c['user_id'] for c in created if c.get('user_id')]
+            encrypted = {}
+            for i in range(0, len(user_ids), 500):
+                rows = User.query.filter(
+                    User.id.in_(user_ids[i:i + 500])
+                ).with_entities(User.id, User.encrypted_password).all()
+                encrypted.update((r.id, r.encrypted_password) for r in rows)
+            for c in created:
+                c['password'] = decrypt_password(encrypted.get(c.get('user_id')))
+            result['summary']['emails_sent'] = batch.emails_sent or 0
+            result['summary']['emails_failed'] = batch.emails_failed or 0
+            data['result'] = result
+
+        return jsonify(data), 200
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception('user_management error get_bulk_upload_progress')
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
 @bp.route('/bulk-history/<int:batch_id>/export', methods=['GET'])
 @jwt_required()
 @management_required
@@ -5819,6 +5947,27 @@ def curp_queue_dashboard():
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 
+@bp.route('/curp-queue/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+@rate_limit(limit=600, window=60, key_prefix='rl_um_curp_metrics')
+def curp_queue_metrics():
+    """Métricas compactas del worker CURP para monitoreo/alertas.
+
+    - depth: filas listas, agendadas a futuro y en proceso
+    - throughput: terminadas en 15 min / 1 h y ritmo por minuto
+    - eta_seconds: tiempo estimado para vaciar lo listo
+    - budget: token bucket global de RENAPO (tasa, burst, tokens)
+    - workers: réplicas con lease activo y concurrencia de este proceso
+    """
+    try:
+        from app.services.curp_queue_worker import get_queue_metrics
+        return jsonify(get_queue_metrics()), 200
+    except Exception:
+        logger.exception('curp_queue_metrics error')
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
 @bp.route('/curp-queue/<int:queue_id>/release', methods=['POST'])
 @jwt_required()
 @admin_required
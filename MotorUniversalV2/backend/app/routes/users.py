@@ -6,12 +6,12 @@ from datetime import datetime
 from flask import Blueprint, request, jsonify
 from werkzeug.exceptions import HTTPException
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db, cache
+from app import db
 from app.models.user import User
 from app.models.exam import Exam
 from app.models.voucher import Voucher
 from app.models.result import Result
-from app.utils.cache_utils import make_cache_key_with_user
+from app.utils.cache_utils import cached_with_user
 from app.utils.cdn_helper import transform_to_cdn_url
 
 bp = Blueprint('users', __name__)
@@ -295,7 +295,7 @@ def update_document_options(user_id):
 
 @bp.route('/me/dashboard', methods=['GET'])
 @jwt_required()
-@cache.cached(timeout=60, make_cache_key=make_cache_key_with_user)  # Cache por usuario, 60 segundos
+@cached_with_user(timeout=60)  # Cache por usuario (proceso + Redis), 60 segundos
 def get_dashboard():
     """
     Obtener datos del dashboard del usuario actual
@@ -322,79 +322,17 @@ def get_dashboard():
         # Para admin/coordinator/editor: todos los publicados
         assigned_exam_ids = None  # None = sin filtro (todos los publicados)
         assigned_material_ids = None
-        exam_materials_map = {}  # exam_id -> set of material_ids (solo candidatos)
+        exam_materials_map = {}  # exam_id -> lista de material_ids (solo candidatos)
         
         if current_user.role == 'candidato':
-            from app.models.partner import GroupExam, GroupMember, GroupExamMember, GroupExamMaterial, CandidateGroup, Campus
-            
-            memberships = GroupMember.query.filter_by(
-                user_id=str(user_id),
-                status='active'
-            ).all()
-            
-            group_ids = []
-            for m in memberships:
-                group = CandidateGroup.query.filter_by(id=m.group_id, is_active=True).first()
-                if group:
-                    group_ids.append(m.group_id)
-            
-            assigned_exam_ids = set()
-            assigned_material_ids = set()
-            
-            if group_ids:
-                group_exams = GroupExam.query.filter(
-                    GroupExam.group_id.in_(group_ids),
-                    GroupExam.is_active == True
-                ).all()
-                
-                for ge in group_exams:
-                    has_access = False
-                    if ge.assignment_type == 'all' or ge.assignment_type is None:
-                        has_access = True
-                    elif ge.assignment_type == 'selected':
-                        member_assignment = GroupExamMember.query.filter_by(
-                            group_exam_id=ge.id,
-                            user_id=str(user_id)
-                        ).first()
-                        has_access = member_assignment is not None
-                    
-                    if has_access:
-                        assigned_exam_ids.add(ge.exam_id)
-                        if ge.exam_id not in exam_materials_map:
-                            exam_materials_map[ge.exam_id] = set()
-
-                        # Si el examen requiere pago, verificar que el candidato haya pagado
-                        # antes de incluir los materiales
-                        skip_materials = False
-                        grp = CandidateGroup.query.get(ge.group_id)
-                        if grp:
-                            campus_obj = Campus.query.get(grp.campus_id) if grp.campus_id else None
-                            payments_on = grp.enable_online_payments_override if grp.enable_online_payments_override is not None else (campus_obj.enable_online_payments if campus_obj else False)
-                            cert_cost = float(grp.certification_cost_override or (campus_obj.certification_cost if campus_obj else 0) or 0)
-                            if payments_on and cert_cost > 0:
-                                from app.models.payment import Payment as PaymentCheck2
-                                approved_payment = PaymentCheck2.query.filter_by(
-                                    user_id=str(user_id),
-                                    group_exam_id=ge.id,
-                                    payment_type='certification',
-                                    status='approved'
-                                ).first()
-                                if not approved_payment:
-                                    skip_materials = True
-
-                        if not skip_materials:
-                            # Materiales asociados al examen grupal
-                            gem_list = GroupExamMaterial.query.filter_by(
-                                group_exam_id=ge.id,
-                                is_included=True
-                            ).all()
-                            for gem in gem_list:
-                                assigned_material_ids.add(gem.study_material_id)
-                                exam_materials_map[ge.exam_id].add(gem.study_material_id)
+            # Grupos activos, asignaciones 'all'/'selected' y pagos de
+            # certificación resueltos con un número fijo de queries
+            from app.services.candidate_access import resolve_candidate_access
 
-            assigned_exam_ids = list(assigned_exam_ids)
-            assigned_material_ids = list(assigned_material_ids)
-            exam_materials_map = {k: list(v) for k, v in exam_materials_map.items()}
+            access = resolve_candidate_access(user_id)
+            assigned_exam_ids = access.exam_ids
+            assigned_material_ids = access.material_ids
+            exam_materials_map = access.exam_materials_map
         
         # ========== OPTIMIZACIÓN: Query única para exámenes con conteo de categorías ==========
         # Usamos subquery para contar categorías en lugar de lazy loading
@@ -846,7 +784,7 @@ def get_dashboard():
 
 @bp.route('/me/editor-dashboard', methods=['GET'])
 @jwt_required()
-@cache.cached(timeout=120, make_cache_key=make_cache_key_with_user)  # Cache por usuario, 2 minutos
+@cached_with_user(timeout=120)  # Cache por usuario (proceso + Redis), 2 minutos
 def get_editor_dashboard():
     """
     Dashboard para usuarios tipo editor con métricas de creación
@@ -0,0 +1,292 @@
+"""
+Snapshot de clave de respuestas por examen (answer key).
+
+POST /api/exams/<id>/evaluate calificaba cada item con `Question.query.get()`
++ carga lazy de `answers`, o `Exercise.query.get()` + `to_dict(include_steps=True)`
+(un query por paso). Con 60 items eran >100 round trips por envío.
+
+Este servicio carga TODO el árbol calificable de un examen (categorías,
+temas, preguntas, respuestas, ejercicios, pasos y acciones) en 7 queries
+set-based y lo guarda en dos niveles:
+
+  1. Cache en proceso (LRU acotado) — cero round trips en hit.
+  2. Redis vía `flask_caching.cache` — compartido entre workers/réplicas.
+
+Versionado por generación:
+  - `answer_key_gen:<exam_id>` guarda un token de generación en Redis.
+  - El snapshot se guarda como `answer_key:<exam_id>:<gen>`.
+  - Las rutas CRUD de pregunta/respuesta/ejercicio/paso/acción/tema/categoría
+    llaman `invalidate_answer_key(exam_id)`, que rota la generación. Los
+    snapshots viejos quedan huérfanos y expiran solos (no se escanea el
+    keyspace). Un build concurrente con una edición se guarda bajo la
+    generación anterior, así que nunca "resucita" datos viejos.
+  - Si Redis no está disponible, el cache local expira a los
+    `_LOCAL_TTL_NO_REDIS` segundos para acotar la inconsistencia entre workers.
+
+Los dicts del snapshot tienen exactamente las llaves que consumen
+`evaluate_question` / `evaluate_exercise` en `app/routes/exams.py`. Son de
+solo lectura: se comparten entre requests y threads.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from app import db, cache
+
+
+_REDIS_TTL = 6 * 3600          # segundos de vida del snapshot en Redis
+_LOCAL_MAX_EXAMS = 64          # exámenes distintos en el LRU de proceso
+_LOCAL_TTL = 600               # tope de vida local aun con Redis disponible
+_LOCAL_TTL_NO_REDIS = 30       # sin Redis no hay generación compartida
+
+_local_lock = threading.Lock()
+_local_cache = OrderedDict()   # exam_id -> (generation, loaded_at, snapshot)
+
+# Campos de ExerciseAction que usa evaluate_exercise
+_ACTION_FIELDS = (
+    'id', 'action_number', 'action_type', 'correct_answer',
+    'scoring_mode', 'is_case_sensitive', 'error_message',
+)
+
+
+def _gen_key(exam_id) -> str:
+    return f"answer_key_gen:{exam_id}"
+
+
+def _snapshot_key(exam_id, generation) -> str:
+    return f"answer_key:{exam_id}:{generation or 0}"
+
+
+def _read_generation(exam_id):
+    """Lee el token de generación de Redis. Retorna (generation, redis_ok)."""
+    try:
+        return cache.get(_gen_key(exam_id)), True
+    except Exception as e:
+        print(f"[ANSWER-KEY] Warning: no se pudo leer generación de {exam_id}: {e}")
+        return None, False
+
+
+def build_answer_key(exam_id: int) -> dict:
+    """Construye el snapshot de un examen con un número fijo de queries.
+
+    Los joins contra `categories.exam_id` evitan listas `IN` gigantes
+    (límite de 2100 parámetros en MSSQL) en exámenes con muchos reactivos.
+    """
+    from app.models.category import Category
+    from app.models.topic import Topic
+    from app.models.question import Question
+    from app.models.answer import Answer
+    from app.models.exercise import Exercise, ExerciseStep, ExerciseAction
+
+    categories = (
+        db.session.query(Category.id, Category.name, Category.percentage)
+        .filter(Category.exam_id == exam_id)
+        .order_by(Category.order)
+        .all()
+    )
+    topics = (
+        db.session.query(Topic.id, Topic.category_id, Topic.name, Topic.percentage)
+        .join(Category, Topic.category_id == Category.id)
+        .filter(Category.exam_id == exam_id)
+        .order_by(Category.order, Topic.order)
+        .all()
+    )
+
+    category_percentages = {}
+    category_names = {}
+    for c in categories:
+        category_percentages[c.name] = c.percentage or 0
+        category_names[c.id] = c.name
+    topic_percentages = {}
+    for t in topics:
+        cat_name = category_names.get(t.category_id)
+        if cat_name is not None:
+            topic_percentages[f"{cat_name}|{t.name}"] = t.percentage or 0
+
+    # ── Preguntas + respuestas ──
+    questions = (
+        Question.query
+        .join(Topic, Question.topic_id == Topic.id)
+        .join(Category, Topic.category_id == Category.id)
+        .filter(Category.exam_id == exam_id)
+        .all()
+    )
+    question_map = {}
+    for q in questions:
+        question_map[str(q.id)] = {
+            'id': q.id,
+            'question_type': q.question_type.to_dict() if q.question_type else None,
+            'question_text': q.question_text,
+            'answers': [],
+        }
+
+    answers = (
+        Answer.query
+        .join(Question, Answer.question_id == Question.id)
+        .join(Topic, Question.topic_id == Topic.id)
+        .join(Category, Topic.category_id == Category.id)
+        .filter(Category.exam_id == exam_id)
+        .order_by(Answer.question_id, Answer.answer_number)
+        .all()
+    )
+    for a in answers:
+        q_data = question_map.get(str(a.question_id))
+        if q_data is not None:
+            q_data['answers'].append(a.to_dict(include_correct=True))
+
+    # ── Ejercicios + pasos + acciones ──
+    exercises = (
+        db.session.query(Exercise.id, Exercise.title)
+        .join(Topic, Exercise.topic_id == Topic.id)
+        .join(Category, Topic.category_id == Category.id)
+        .filter(Category.exam_id == exam_id)
+        .all()
+    )
+    exercise_map = {
+        str(e.id): {'id': e.id, 'title': e.title or '', 'steps': []}
+        for e in exercises
+    }
+
+    steps = (
+        db.session.query(ExerciseStep.id, ExerciseStep.exercise_id,
+                         ExerciseStep.step_number, ExerciseStep.title)
+        .join(Exercise, ExerciseStep.exercise_id == Exercise.id)
+        .join(Topic, Exercise.topic_id == Topic.id)
+        .join(Category, Topic.category_id == Category.id)
+        .filter(Category.exam_id == exam_id)
+        .order_by(ExerciseStep.exercise_id, ExerciseStep.step_number)
+        .all()
+    )
+    step_map = {}
+    for s in steps:
+        step_data = {
+            'id': s.id,
+            'step_number': s.step_number,
+            'title': s.title,
+            'actions': [],
+        }
+        step_map[str(s.id)] = step_data
+        ex_data = exercise_map.get(str(s.exercise_id))
+        if ex_data is not None:
+            ex_data['steps'].append(step_data)
+
+    action_columns = [getattr(ExerciseAction, f) for f in _ACTION_FIELDS]
+    actions = (
+        db.session.query(ExerciseAction.step_id, *action_columns)
+        .join(ExerciseStep, ExerciseAction.step_id == ExerciseStep.id)
+        .join(Exercise, ExerciseStep.exercise_id == Exercise.id)
+        .join(Topic, Exercise.topic_id == Topic.id)
+        .join(Category, Topic.category_id == Category.id)
+        .filter(Category.exam_id == exam_id)
+        .order_by(ExerciseAction.step_id, ExerciseAction.action_number)
+        .all()
+    )
+    for row in actions:
+        step_data = step_map.get(str(row.step_id))
+        if step_data is not None:
+            step_data['actions'].append({f: getattr(row, f) for f in _ACTION_FIELDS})
+
+    return {
+        'exam_id': exam_id,
+        'built_at': time.time(),
+        'category_percentages': category_percentages,
+        'topic_percentages': topic_percentages,
+        'questions': question_map,
+        'exercises': exercise_map,
+    }
+
+
+def _local_get(exam_id, generation, redis_ok):
+    ttl = _LOCAL_TTL if redis_ok else _LOCAL_TTL_NO_REDIS
+    with _local_lock:
+        entry = _local_cache.get(exam_id)
+        if entry is None:
+            return None
+        entry_gen, loaded_at, snapshot = entry
+        if entry_gen != generation or (time.time() - loaded_at) > ttl:
+            _local_cache.pop(exam_id, None)
+            return None
+        _local_cache.move_to_end(exam_id)
+        return snapshot
+
+
+def _local_put(exam_id, generation, snapshot):
+    with _local_lock:
+        _local_cache[exam_id] = (generation, time.time(), snapshot)
+        _local_cache.move_to_end(exam_id)
+        while len(_local_cache) > _LOCAL_MAX_EXAMS:
+            _local_cache.popitem(last=False)
+
+
+def get_answer_key(exam_id: int) -> dict:
+    """Retorna el snapshot de clave de respuestas del examen.
+
+    Hit local: 1 GET a Redis (generación). Hit en Redis: 2 GETs.
+    Miss: 7 queries set-based + SET en Redis.
+    """
+    generation, redis_ok = _read_generation(exam_id)
+
+    snapshot = _local_get(exam_id, generation, redis_ok)
+    if snapshot is not None:
+        return snapshot
+
+    if redis_ok:
+        try:
+            snapshot = cache.get(_snapshot_key(exam_id, generation))
+        except Exception as e:
+            print(f"[ANSWER-KEY] Warning: cache.get falló para examen {exam_id}: {e}")
+            snapshot = None
+        if snapshot is not None:
+            _local_put(exam_id, generation, snapshot)
+            return snapshot
+
+    snapshot = build_answer_key(exam_id)
+    _local_put(exam_id, generation, snapshot)
+    if redis_ok:
+        try:
+            cache.set(_snapshot_key(exam_id, generation), snapshot, timeout=_REDIS_TTL)
+        except Exception as e:
+            print(f"[ANSWER-KEY] Warning: cache.set falló para examen {exam_id}: {e}")
+    return snapshot
+
+
+def invalidate_answer_key(exam_id: Optional[int]) -> None:
+    """Rota la generación del examen para que todos los workers reconstruyan.
+
+    Llamar DESPUÉS del commit de cualquier cambio en el contenido calificable.
+    """
+    if exam_id is None:
+        return
+    with _local_lock:
+        _local_cache.pop(exam_id, None)
+    try:
+        cache.set(_gen_key(exam_id), uuid.uuid4().hex, timeout=0)
+    except Exception as e:
+        print(f"[ANSWER-KEY] Warning: no se pudo invalidar examen {exam_id}: {e}")
+
+
+def invalidate_answer_key_for_topic(topic_id: Optional[int]) -> None:
+    """Resuelve el examen dueño del tema (1 query) e invalida su snapshot."""
+    if topic_id is None:
+        return
+    from app.models.category import Category
+    from app.models.topic import Topic
+    try:
+        exam_id = (
+            db.session.query(Category.exam_id)
+            .join(Topic, Topic.category_id == Category.id)
+            .filter(Topic.id == topic_id)
+            .scalar()
+        )
+    except Exception as e:
+        print(f"[ANSWER-KEY] Warning: no se pudo resolver examen del tema {topic_id}: {e}")
+        return
+    invalidate_answer_key(exam_id)
+
+
+def clear_local_answer_keys() -> None:
+    """Vacía el cache en proceso (tests / mantenimiento)."""
+    with _local_lock:
+        _local_cache.clear()
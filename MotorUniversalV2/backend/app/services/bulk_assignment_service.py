@@ -0,0 +1,344 @@
+"""
+Asignación masiva de exámenes a candidatos (GroupExamMember +
+EcmCandidateAssignment) con operaciones por conjunto.
+
+Antes cada endpoint recorría los candidatos uno por uno: un
+`EcmCandidateAssignment.query...first()`, un `User.query.get()` y un
+`generate_assignment_number()` por fila, así que asignar un ECM a un grupo
+de 2,000 miembros hacía miles de round-trips dentro de una sola
+transacción. Aquí el trabajo es proporcional al número de chunks:
+
+  1. plan_ecm_assignments: diff de los ECA existentes (con los datos del
+     usuario para la respuesta) en una query por chunk.
+  2. generate_assignment_numbers: números únicos para todo el lote,
+     validando colisiones con una query IN por chunk.
+  3. create_ecm_assignments / add_exam_members: INSERT con executemany.
+  4. debit_assignments: un solo débito al saldo del coordinador.
+
+Lo comparten assign_exam_to_group, add_members_to_exam,
+add_assignments_to_exam, bulk_assign_exams_by_ecm (routes/partners.py) y
+sso_service.apply_standard_assignments.
+
+Los chunks respetan el límite de 2100 parámetros por sentencia de SQL Server.
+"""
+import secrets
+import string
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app import db
+
+ASSIGNMENT_CHUNK = 1000
+
+_NUMBER_CHARS = string.ascii_uppercase + string.digits
+_NUMBER_LENGTH = 14
+
+
+def _chunked(items: List, size: int = ASSIGNMENT_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _unique(values: Iterable) -> List:
+    """Quita duplicados conservando el orden (ignora vacíos)."""
+    seen = set()
+    result = []
+    for value in values:
+        if value is None or value in seen:
+            continue
+        seen.add(value)
+        result.append(value)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Configuración de cobro y vigencia
+# ---------------------------------------------------------------------------
+
+def assignment_unit_cost(group, campus, require_custom_config: bool = True) -> float:
+    """
+    Costo unitario de certificación (override del grupo → plantel).
+
+    `require_custom_config=False` conserva la regla de reactivación y
+    bulk-assign, donde el override del grupo aplica aunque el grupo no
+    tenga `use_custom_config`.
+    """
+    if group.certification_cost_override is not None and (
+        group.use_custom_config or not require_custom_config
+    ):
+        return float(group.certification_cost_override)
+    if campus and campus.certification_cost is not None:
+        return float(campus.certification_cost)
+    return 0.0
+
+
+def assignment_validity_months(group, campus) -> int:
+    """Meses de vigencia de una asignación (override del grupo → plantel → 12)."""
+    if group.assignment_validity_months_override is not None:
+        return group.assignment_validity_months_override
+    if campus and campus.assignment_validity_months:
+        return campus.assignment_validity_months
+    return 12
+
+
+# ---------------------------------------------------------------------------
+# Números de asignación
+# ---------------------------------------------------------------------------
+
+def generate_assignment_numbers(count: int) -> List[str]:
+    """
+    Genera `count` números de asignación únicos de 14 caracteres.
+
+    Mismo formato que EcmCandidateAssignment.generate_assignment_number(),
+    pero las colisiones se revisan con una query IN por chunk en lugar de
+    una query por número.
+    """
+    from app.models.partner import EcmCandidateAssignment
+
+    numbers: List[str] = []
+    taken: Set[str] = set()
+    while len(numbers) < count:
+        candidates = []
+        while len(candidates) < count - len(numbers):
+            number = ''.join(secrets.choice(_NUMBER_CHARS) for _ in range(_NUMBER_LENGTH))
+            if number not in taken:
+                taken.add(number)
+                candidates.append(number)
+        existing = set()
+        for chunk in _chunked(candidates):
+            existing.update(
+                number for (number,) in db.session.query(
+                    EcmCandidateAssignment.assignment_number
+                ).filter(EcmCandidateAssignment.assignment_number.in_(chunk)).all()
+            )
+        numbers.extend(number for number in candidates if number not in existing)
+    return numbers
+
+
+# ---------------------------------------------------------------------------
+# Diff de asignaciones ECM
+# ---------------------------------------------------------------------------
+
+def find_ecm_assignments(user_ids: Iterable[str], ecm_ids: Iterable[int]) -> Dict[Tuple[str, int], object]:
+    """
+    ECA existentes por (user_id, competency_standard_id). Si un candidato
+    tiene varias para el mismo ECM se toma la primera creada.
+    """
+    from app.models.partner import EcmCandidateAssignment
+
+    user_ids = _unique(str(uid) for uid in user_ids)
+    ecm_ids = _unique(ecm_ids)
+    found: Dict[Tuple[str, int], object] = {}
+    if not user_ids or not ecm_ids:
+        return found
+    for chunk in _chunked(user_ids, ASSIGNMENT_CHUNK - len(ecm_ids)):
+        rows = EcmCandidateAssignment.query.filter(
+            EcmCandidateAssignment.user_id.in_(chunk),
+            EcmCandidateAssignment.competency_standard_id.in_(ecm_ids),
+        ).order_by(EcmCandidateAssignment.id).all()
+        for eca in rows:
+            found.setdefault((eca.user_id, eca.competency_standard_id), eca)
+    return found
+
+
+class EcmAssignmentPlan:
+    """Resultado de plan_ecm_assignments()."""
+
+    def __init__(self, ecm_id: Optional[int], user_ids: List[str]):
+        self.ecm_id = ecm_id
+        self.user_ids = user_ids
+        self.users: Dict[str, object] = {}
+        self.existing: Dict[str, object] = {}
+
+    @property
+    def new_user_ids(self) -> List[str]:
+        """Candidatos sin el ECM (los que se cobran y reciben número)."""
+        return [uid for uid in self.user_ids if uid not in self.existing]
+
+    @property
+    def already_assigned(self) -> List[Tuple[str, object, object]]:
+        """(user_id, eca, user) de quienes ya tenían el ECM, en orden de entrada."""
+        return [(uid, self.existing[uid], self.users.get(uid))
+                for uid in self.user_ids if uid in self.existing]
+
+
+def plan_ecm_assignments(user_ids: Iterable[str], ecm_id: Optional[int],
+                         load_users: bool = True) -> EcmAssignmentPlan:
+    """
+    Separa a los candidatos en ya asignados / nuevos para un ECM.
+
+    Con `load_users=True` también carga los User de todos los candidatos
+    (para armar las respuestas) en la misma query. Sin ECM todos son nuevos
+    y no se consulta la BD salvo para los usuarios.
+    """
+    from app.models.partner import EcmCandidateAssignment
+    from app.models.user import User
+
+    plan = EcmAssignmentPlan(ecm_id, _unique(str(uid) for uid in user_ids))
+    if not plan.user_ids or (not ecm_id and not load_users):
+        return plan
+
+    if not load_users:
+        plan.existing = {uid: eca for (uid, _), eca in
+                         find_ecm_assignments(plan.user_ids, [ecm_id]).items()}
+        return plan
+
+    for chunk in _chunked(plan.user_ids):
+        if ecm_id:
+            rows = db.session.query(User, EcmCandidateAssignment).outerjoin(
+                EcmCandidateAssignment, db.and_(
+                    EcmCandidateAssignment.user_id == User.id,
+                    EcmCandidateAssignment.competency_standard_id == ecm_id,
+                )
+            ).filter(User.id.in_(chunk)).order_by(EcmCandidateAssignment.id).all()
+        else:
+            rows = [(user, None) for user in User.query.filter(User.id.in_(chunk)).all()]
+        for user, eca in rows:
+            plan.users[user.id] = user
+            if eca is not None:
+                plan.existing.setdefault(user.id, eca)
+    return plan
+
+
+def create_ecm_assignments(user_ids: Iterable[str], *, ecm_id: int, exam_id: int, group,
+                           group_exam_id: int, assigned_by_id: Optional[str], source: str,
+                           validity_months: Optional[int] = None,
+                           assigned_at: Optional[datetime] = None,
+                           expires_at: Optional[datetime] = None) -> List[dict]:
+    """
+    Inserta un EcmCandidateAssignment por candidato con executemany.
+
+    Returns:
+        Las filas insertadas (dicts con user_id, assignment_number,
+        assigned_at, ...) en el orden recibido.
+    """
+    from app.models.partner import EcmCandidateAssignment
+
+    user_ids = _unique(str(uid) for uid in user_ids)
+    if not user_ids:
+        return []
+    assigned_at = assigned_at or datetime.utcnow()
+    numbers = generate_assignment_numbers(len(user_ids))
+    rows = [{
+        'assignment_number': number,
+        'user_id': uid,
+        'competency_standard_id': ecm_id,
+        'exam_id': exam_id,
+        'campus_id': group.campus_id,
+        'group_id': group.id,
+        'group_name': group.name,
+        'group_exam_id': group_exam_id,
+        'assigned_by_id': assigned_by_id,
+        'assignment_source': source,
+        'validity_months': validity_months,
+        'assigned_at': assigned_at,
+        'expires_at': expires_at,
+    } for uid, number in zip(user_ids, numbers)]
+
+    db.session.flush()
+    for chunk in _chunked(rows):
+        db.session.execute(EcmCandidateAssignment.__table__.insert(), chunk)
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Miembros de la asignación (GroupExamMember)
+# ---------------------------------------------------------------------------
+
+def group_member_user_ids(group_id: int, status: Optional[str] = None) -> List[str]:
+    """user_ids de los miembros del grupo (solo la columna, sin cargar modelos)."""
+    from app.models.partner import GroupMember
+
+    query = db.session.query(GroupMember.user_id).filter(GroupMember.group_id == group_id)
+    if status:
+        query = query.filter(GroupMember.status == status)
+    return [uid for (uid,) in query.order_by(GroupMember.id).all()]
+
+
+def existing_exam_member_ids(group_exam_id: int, user_ids: Optional[Iterable[str]] = None) -> Set[str]:
+    """user_ids que ya son GroupExamMember de la asignación (todos o entre `user_ids`)."""
+    from app.models.partner import GroupExamMember
+
+    query = db.session.query(GroupExamMember.user_id).filter(
+        GroupExamMember.group_exam_id == group_exam_id
+    )
+    if user_ids is None:
+        return {uid for (uid,) in query.all()}
+    found: Set[str] = set()
+    for chunk in _chunked(_unique(str(uid) for uid in user_ids)):
+        found.update(uid for (uid,) in query.filter(GroupExamMember.user_id.in_(chunk)).all())
+    return found
+
+
+def add_exam_members(group_exam_id: int, user_ids: Iterable[str],
+                     existing: Optional[Set[str]] = None) -> List[str]:
+    """
+    Agrega como GroupExamMember a quienes aún no lo son (INSERT executemany).
+
+    `existing` evita la query de existencia cuando el caller ya la tiene
+    (p. ej. una asignación recién creada: `set()`); se actualiza en sitio
+    con los agregados.
+
+    Returns:
+        user_ids agregados, en el orden recibido.
+    """
+    from app.models.partner import GroupExamMember
+
+    user_ids = _unique(str(uid) for uid in user_ids)
+    if existing is None:
+        existing = existing_exam_member_ids(group_exam_id, user_ids)
+    added = [uid for uid in user_ids if uid not in existing]
+    if not added:
+        return added
+
+    now = datetime.utcnow()
+    db.session.flush()
+    for chunk in _chunked(added):
+        db.session.execute(GroupExamMember.__table__.insert(), [
+            {'group_exam_id': group_exam_id, 'user_id': uid, 'assigned_at': now}
+            for uid in chunk
+        ])
+    existing.update(added)
+    return added
+
+
+# ---------------------------------------------------------------------------
+# Cobro
+# ---------------------------------------------------------------------------
+
+def debit_assignments(coordinator_id: str, campus_id: int, total_cost: float, *,
+                      group_id: int, group_exam_id: int, notes: str,
+                      created_by_id: Optional[str], payment_source: Optional[str] = None
+                      ) -> Tuple[bool, float]:
+    """
+    Bloquea el saldo del coordinador en el plantel y, si alcanza, registra
+    un solo débito por todo el lote.
+
+    Returns:
+        (debitado, saldo_disponible_antes_del_debito). Si el saldo no
+        alcanza no se modifica nada y el caller arma la respuesta 400.
+    """
+    from app.models.balance import CoordinatorBalance, create_balance_transaction
+
+    balance = CoordinatorBalance.query.filter_by(
+        coordinator_id=coordinator_id,
+        campus_id=campus_id
+    ).with_for_update().first()
+    available = float(balance.current_balance) if balance else 0.0
+    if available < total_cost:
+        return False, available
+
+    create_balance_transaction(
+        coordinator_id=coordinator_id,
+        campus_id=campus_id,
+        transaction_type='debit',
+        concept='asignacion_certificacion',
+        amount=total_cost,
+        group_id=group_id,
+        reference_type='group_exam',
+        reference_id=group_exam_id,
+        notes=notes,
+        created_by_id=created_by_id,
+        payment_source=payment_source
+    )
+    return True, available
@@ -0,0 +1,254 @@
+"""
+Resolución de acceso del candidato a exámenes y materiales de estudio.
+
+Un candidato tiene acceso a una asignación (GroupExam) cuando:
+  - tiene membresía activa en el grupo,
+  - el grupo y la asignación están activos, y
+  - la asignación es para todo el grupo ('all' / NULL) o lo incluye
+    explícitamente (GroupExamMember cuando assignment_type='selected').
+
+Los materiales de una asignación se liberan solo si el examen no requiere
+pago en línea o si el candidato ya tiene aprobado el pago de certificación.
+
+Todo se resuelve con un número fijo de queries, sin importar cuántos grupos
+o asignaciones tenga el candidato:
+  1. Asignaciones accesibles con la configuración de pago de grupo/plantel.
+  2. Pagos de certificación del candidato.
+  3. Materiales incluidos de las asignaciones liberadas.
+
+Lo usan /users/me/dashboard, /partners/mis-examenes, /partners/mis-materiales
+y /exams/<id>/check-access.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, or_
+
+from app import db
+
+
+def certification_terms(group, campus) -> Tuple[bool, float]:
+    """
+    Configuración de pago en línea efectiva (override del grupo → plantel).
+
+    Acepta los modelos o cualquier objeto con los mismos atributos.
+
+    Returns:
+        (pagos_en_linea_habilitados, costo_de_certificacion)
+    """
+    if group is None:
+        return False, 0.0
+    if group.enable_online_payments_override is not None:
+        payments_on = bool(group.enable_online_payments_override)
+    else:
+        payments_on = bool(campus.enable_online_payments) if campus else False
+    cert_cost = float(group.certification_cost_override
+                      or (campus.certification_cost if campus else 0) or 0)
+    return payments_on, cert_cost
+
+
+class _Terms:
+    """Atributos de grupo/plantel leídos como columnas en la query 1."""
+
+    __slots__ = ('enable_online_payments_override', 'certification_cost_override',
+                 'enable_online_payments', 'certification_cost')
+
+    def __init__(self, **values):
+        for key, value in values.items():
+            setattr(self, key, value)
+
+
+class ExamAssignmentAccess:
+    """Una asignación (GroupExam) accesible para el candidato."""
+
+    __slots__ = ('group_exam', 'requires_payment', 'certification_cost',
+                 'has_approved_payment', 'material_ids')
+
+    def __init__(self, group_exam, requires_payment: bool, certification_cost: float,
+                 has_approved_payment: bool):
+        self.group_exam = group_exam
+        self.requires_payment = requires_payment
+        self.certification_cost = certification_cost
+        self.has_approved_payment = has_approved_payment
+        self.material_ids: List[int] = []
+
+    @property
+    def group_exam_id(self) -> int:
+        return self.group_exam.id
+
+    @property
+    def group_id(self) -> int:
+        return self.group_exam.group_id
+
+    @property
+    def exam_id(self) -> int:
+        return self.group_exam.exam_id
+
+    @property
+    def is_paid(self) -> bool:
+        """True si no requiere pago o si ya tiene el pago aprobado."""
+        return not self.requires_payment or self.has_approved_payment
+
+    @property
+    def materials_unlocked(self) -> bool:
+        return self.is_paid
+
+
+class CandidateAccess:
+    """Resultado de resolve_candidate_access()."""
+
+    def __init__(self, assignments: List[ExamAssignmentAccess]):
+        self.assignments = assignments
+
+        self.exam_ids: List[int] = []
+        self.material_ids: List[int] = []
+        # exam_id -> material_ids liberados (lista vacía si el examen está pendiente de pago)
+        self.exam_materials_map: Dict[int, List[int]] = {}
+        # exam_id -> asignación preferida cuando el examen llega por varios grupos
+        self.preferred_by_exam: Dict[int, ExamAssignmentAccess] = {}
+
+        seen_materials = set()
+        for access in assignments:
+            exam_materials = self.exam_materials_map.get(access.exam_id)
+            if exam_materials is None:
+                exam_materials = self.exam_materials_map[access.exam_id] = []
+                self.exam_ids.append(access.exam_id)
+            for material_id in access.material_ids:
+                if material_id not in exam_materials:
+                    exam_materials.append(material_id)
+                if material_id not in seen_materials:
+                    seen_materials.add(material_id)
+                    self.material_ids.append(material_id)
+
+            current = self.preferred_by_exam.get(access.exam_id)
+            if current is None or self._prefer(access, current):
+                self.preferred_by_exam[access.exam_id] = access
+
+    @staticmethod
+    def _prefer(candidate: ExamAssignmentAccess, current: ExamAssignmentAccess) -> bool:
+        """Para exámenes duplicados se conserva la asignación ya pagada; si no,
+        gana la pagada o la asignada más recientemente."""
+        if current.has_approved_payment:
+            return False
+        if candidate.has_approved_payment:
+            return True
+        new_at = candidate.group_exam.assigned_at
+        old_at = current.group_exam.assigned_at
+        return bool(new_at and (not old_at or new_at > old_at))
+
+
+def certification_payment_statuses(user_id, group_exam_id: Optional[int] = None) -> Dict[int, List[str]]:
+    """
+    Estados de los pagos de certificación del candidato por group_exam_id,
+    en orden de creación. Una sola query.
+    """
+    from app.models.payment import Payment
+
+    query = db.session.query(Payment.group_exam_id, Payment.status).filter(
+        Payment.user_id == str(user_id),
+        Payment.payment_type == 'certification',
+    )
+    if group_exam_id is not None:
+        query = query.filter(Payment.group_exam_id == group_exam_id)
+    else:
+        query = query.filter(Payment.group_exam_id.isnot(None))
+
+    statuses: Dict[int, List[str]] = {}
+    for ge_id, status in query.order_by(Payment.id).all():
+        statuses.setdefault(ge_id, []).append(status)
+    return statuses
+
+
+def resolve_candidate_access(user_id) -> CandidateAccess:
+    """
+    Calcula exámenes, materiales y estado de pago accesibles para el candidato.
+
+    Las asignaciones quedan ordenadas por GroupExam.id (orden de creación).
+    """
+    from app.models.partner import (
+        Campus, CandidateGroup, GroupExam, GroupExamMaterial, GroupExamMember, GroupMember,
+    )
+
+    user_id = str(user_id)
+
+    is_member = exists().where(and_(
+        GroupMember.group_id == GroupExam.group_id,
+        GroupMember.user_id == user_id,
+        GroupMember.status == 'active',
+    ))
+    is_selected = exists().where(and_(
+        GroupExamMember.group_exam_id == GroupExam.id,
+        GroupExamMember.user_id == user_id,
+    ))
+
+    # 1. Asignaciones accesibles + configuración de pago (grupo → plantel)
+    rows = db.session.query(
+        GroupExam,
+        CandidateGroup.enable_online_payments_override,
+        CandidateGroup.certification_cost_override,
+        Campus.enable_online_payments,
+        Campus.certification_cost,
+    ).join(
+        CandidateGroup, CandidateGroup.id == GroupExam.group_id
+    ).outerjoin(
+        Campus, Campus.id == CandidateGroup.campus_id
+    ).filter(
+        GroupExam.is_active == True,
+        CandidateGroup.is_active == True,
+        is_member,
+        or_(
+            GroupExam.assignment_type.is_(None),
+            GroupExam.assignment_type == 'all',
+            and_(GroupExam.assignment_type == 'selected', is_selected),
+        ),
+    ).order_by(GroupExam.id).all()
+
+    if not rows:
+        return CandidateAccess([])
+
+    # 2. Pagos de certificación aprobados
+    paid_ids = {
+        ge_id for ge_id, statuses in certification_payment_statuses(user_id).items()
+        if 'approved' in statuses
+    }
+
+    assignments = []
+    for ge, grp_on, grp_cost, campus_on, campus_cost in rows:
+        group = _Terms(enable_online_payments_override=grp_on, certification_cost_override=grp_cost)
+        campus = _Terms(enable_online_payments=campus_on, certification_cost=campus_cost)
+        payments_on, cert_cost = certification_terms(group, campus)
+        requires = payments_on and cert_cost > 0
+        assignments.append(ExamAssignmentAccess(
+            ge, requires, cert_cost if requires else 0.0, ge.id in paid_ids
+        ))
+
+    # 3. Materiales de las asignaciones liberadas
+    unlocked = {a.group_exam_id: a for a in assignments if a.materials_unlocked}
+    if unlocked:
+        material_rows = db.session.query(
+            GroupExamMaterial.group_exam_id, GroupExamMaterial.study_material_id
+        ).filter(
+            GroupExamMaterial.group_exam_id.in_(list(unlocked)),
+            GroupExamMaterial.is_included == True,
+        ).order_by(GroupExamMaterial.id).all()
+        for ge_id, material_id in material_rows:
+            unlocked[ge_id].material_ids.append(material_id)
+
+    return CandidateAccess(assignments)
+
+
+def get_group_exam_terms(group_exam_id: int):
+    """
+    Asignación con su grupo y plantel en una sola query.
+
+    Returns:
+        (group_exam, group, campus) o None si la asignación no existe.
+        group/campus pueden ser None.
+    """
+    from app.models.partner import Campus, CandidateGroup, GroupExam
+
+    row = db.session.query(GroupExam, CandidateGroup, Campus).outerjoin(
+        CandidateGroup, CandidateGroup.id == GroupExam.group_id
+    ).outerjoin(
+        Campus, Campus.id == CandidateGroup.campus_id
+    ).filter(GroupExam.id == group_exam_id).first()
+    return tuple(row) if row else None
@@ -0,0 +1,508 @@
+"""
+Generación de ZIPs de certificados de un grupo (constancias de evaluación,
+certificados Eduit y certificados CONOCER).
+
+Lo usan el job en segundo plano (POST /groups/<id>/certificates/zip-jobs) y
+la descarga directa (POST /groups/<id>/certificates/download).
+
+- Las entradas del ZIP se arman con queries fijas (miembros, resultados
+  aprobados, exámenes, certificados CONOCER) y se copian a snapshots planos
+  para que los workers no toquen objetos de la sesión del thread principal.
+- Un pool acotado (BlobUploader) descarga los PDFs existentes o genera y sube
+  los faltantes en paralelo; cada worker abre su propio app context porque
+  generate_certificate_pdf consulta plantillas y logos en BD.
+- Los PDFs se escriben al ZIP en cuanto terminan, sobre un archivo en disco
+  (ZIP_SPOOL_DIR), no en un BytesIO.
+- La BD se escribe solo desde el thread que llama: las URLs nuevas
+  (report_url / certificate_url / eduit_certificate_code) se aplican por lote.
+- Jobs idempotentes: (group_id, filter_key) reutiliza el job en curso o el
+  ZIP terminado mientras esté vigente.
+
+Configuración por entorno:
+  CERT_ZIP_WORKERS         threads de descarga/render (default 4)
+  CERT_ZIP_PROGRESS_EVERY  cada cuántos archivos se publica progreso (default 20)
+  CERT_ZIP_REUSE_HOURS     vigencia de un ZIP terminado para reutilizarlo (default 24)
+  CERT_ZIP_STALE_MINUTES   un job sin avance en este tiempo ya no se reutiliza (default 30)
+  CERT_ZIP_SAS_MINUTES     vigencia de la URL de descarga (default 60)
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.utils.blob_uploader import BlobUploader
+from app.utils.zip_spool import SPOOL_DIR, remove_spool
+
+CERT_ZIP_WORKERS = int(os.getenv('CERT_ZIP_WORKERS', '4'))
+CERT_ZIP_PROGRESS_EVERY = int(os.getenv('CERT_ZIP_PROGRESS_EVERY', '20'))
+CERT_ZIP_REUSE_HOURS = int(os.getenv('CERT_ZIP_REUSE_HOURS', '24'))
+CERT_ZIP_STALE_MINUTES = int(os.getenv('CERT_ZIP_STALE_MINUTES', '30'))
+CERT_ZIP_SAS_MINUTES = int(os.getenv('CERT_ZIP_SAS_MINUTES', '60'))
+
+CERTIFICATE_TYPES = ('tier_basic', 'tier_standard', 'tier_advanced')
+
+# Tamaño estimado por PDF para el presupuesto de trabajos en vuelo del pool
+_ESTIMATED_PDF_BYTES = 256 * 1024
+
+# Errores guardados en el job (el contador sí es exacto)
+_MAX_STORED_ERRORS = 200
+
+_RESULT_FIELDS = ('id', 'user_id', 'exam_id', 'group_id', 'answers_data', 'certificate_code',
+                  'eduit_certificate_code', 'result', 'score', 'start_date')
+_EXAM_FIELDS = ('id', 'name', 'version', 'passing_score', 'competency_standard_id')
+_USER_FIELDS = ('id', 'name', 'first_surname', 'second_surname', 'email')
+
+
+def _snapshot(obj, fields) -> SimpleNamespace:
+    return SimpleNamespace(**{f: getattr(obj, f, None) for f in fields})
+
+
+def _safe_name(value: str) -> str:
+    return ''.join(c for c in (value or '') if c.isalnum() or c in ' -_').strip().replace(' ', '_')
+
+
+class CertificateZipEntry:
+    """Un archivo del ZIP: qué tipo es, dónde va y de dónde sale el PDF."""
+
+    __slots__ = ('kind', 'arcname', 'user_label', 'stored_url', 'blob_name', 'result', 'exam', 'user')
+
+    def __init__(self, kind: str, arcname: str, user_label: str, stored_url: Optional[str] = None,
+                 blob_name: Optional[str] = None, result=None, exam=None, user=None):
+        self.kind = kind
+        self.arcname = arcname
+        self.user_label = user_label
+        self.stored_url = stored_url
+        self.blob_name = blob_name
+        self.result = result
+        self.exam = exam
+        self.user = user
+
+
+class CertificateZipStats:
+    """Contadores de armado del ZIP y cambios pendientes para `results`."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.processed = 0
+        self.files_added = 0
+        self.generated = 0
+        self.errors: List[dict] = []
+        self.error_count = 0
+        self.pending_updates: Dict[str, dict] = {}
+
+    def add_error(self, entry: CertificateZipEntry, error):
+        self.error_count += 1
+        if len(self.errors) < _MAX_STORED_ERRORS:
+            self.errors.append({'user': entry.user_label, 'type': entry.kind, 'error': str(error)})
+
+    def take_updates(self) -> Dict[str, dict]:
+        updates, self.pending_updates = self.pending_updates, {}
+        return updates
+
+
+# ---------------------------------------------------------------------------
+# Entradas del ZIP
+# ---------------------------------------------------------------------------
+
+def normalize_certificate_types(certificate_types) -> List[str]:
+    """Tipos válidos en el orden canónico; lista vacía si no hay ninguno."""
+    requested = set(certificate_types or [])
+    return [t for t in CERTIFICATE_TYPES if t in requested]
+
+
+def collect_certificate_entries(group_id: int, certificate_types, user_ids=None
+                                ) -> Tuple[List[CertificateZipEntry], int]:
+    """
+    Arma las entradas del ZIP para los miembros activos del grupo.
+
+    Returns:
+        (entradas, número de miembros considerados)
+    """
+    from sqlalchemy.orm import joinedload
+    from app import db
+    from app.models.partner import GroupMember
+    from app.models.result import Result
+    from app.models.exam import Exam
+    from app.models.conocer_certificate import ConocerCertificate
+
+    member_filter = [GroupMember.group_id == group_id, GroupMember.status == 'active']
+    if user_ids:
+        member_filter.append(GroupMember.user_id.in_(user_ids))
+    members = GroupMember.query.options(joinedload(GroupMember.user)).filter(*member_filter).all()
+    users_map = {m.user_id: m.user for m in members if m.user}
+    if not members:
+        return [], 0
+
+    member_ids = db.session.query(GroupMember.user_id).filter(*member_filter)
+    entries: List[CertificateZipEntry] = []
+
+    if 'tier_basic' in certificate_types or 'tier_standard' in certificate_types:
+        results = Result.query.filter(
+            Result.user_id.in_(member_ids),
+            Result.status == 1,
+            Result.result == 1
+        ).all()
+        exam_ids = list({r.exam_id for r in results})
+        exams = {e.id: _snapshot(e, _EXAM_FIELDS)
+                 for e in Exam.query.filter(Exam.id.in_(exam_ids)).all()} if exam_ids else {}
+        user_snaps = {uid: _snapshot(u, _USER_FIELDS) for uid, u in users_map.items()}
+
+        for kind, folder, label, url_attr, code_attr in (
+            ('tier_basic', 'Constancias', 'Reporte', 'report_url', 'certificate_code'),
+            ('tier_standard', 'Certificados_Eduit', 'Certificado', 'certificate_url', 'eduit_certificate_code'),
+        ):
+            if kind not in certificate_types:
+                continue
+            for r in results:
+                user = users_map.get(r.user_id)
+                exam = exams.get(r.exam_id)
+                if not user or not exam:
+                    continue
+                safe_exam = _safe_name(exam.name or f'Examen_{r.exam_id}')[:30]
+                code = getattr(r, code_attr) or r.id[:8]
+                entries.append(CertificateZipEntry(
+                    kind=kind,
+                    arcname=f"{folder}/{_safe_name(user.full_name)}/{safe_exam}_{label}_{code}.pdf",
+                    user_label=user.full_name,
+                    stored_url=getattr(r, url_attr),
+                    result=_snapshot(r, _RESULT_FIELDS),
+                    exam=exam,
+                    user=user_snaps[r.user_id],
+                ))
+
+    if 'tier_advanced' in certificate_types:
+        certs = ConocerCertificate.query.filter(
+            ConocerCertificate.user_id.in_(member_ids),
+            ConocerCertificate.status == 'active'
+        ).all()
+        for cert in certs:
+            user = users_map.get(cert.user_id)
+            if not user:
+                continue
+            entries.append(CertificateZipEntry(
+                kind='tier_advanced',
+                arcname=f"Certificados_CONOCER/{_safe_name(user.full_name)}/"
+                        f"{cert.standard_code}_{cert.certificate_number}.pdf",
+                user_label=user.full_name,
+                blob_name=cert.blob_name,
+            ))
+
+    return entries, len(members)
+
+
+# ---------------------------------------------------------------------------
+# Workers (sin escrituras a BD)
+# ---------------------------------------------------------------------------
+
+def _download_existing(url: str) -> Optional[bytes]:
+    """PDF ya generado; None si no se pudo descargar (se regenera)."""
+    import requests
+    try:
+        response = requests.get(url, timeout=30)
+        if response.status_code == 200:
+            return response.content
+    except Exception:
+        pass
+    return None
+
+
+def _upload_pdf(data: bytes, filename: str) -> Optional[str]:
+    from app.utils.azure_storage import azure_storage
+    return azure_storage.upload_bytes(data, f"pdfs/{filename}", content_type='application/pdf')
+
+
+def _produce_entry(app, entry: CertificateZipEntry) -> dict:
+    """
+    Obtiene el PDF de una entrada. Regresa {'data', 'generated', 'updates'};
+    `updates` son los campos de `results` que el caller debe persistir.
+    """
+    if entry.kind == 'tier_advanced':
+        from app.services.conocer_blob_service import get_conocer_blob_service
+        content, _ = get_conocer_blob_service().download_certificate(entry.blob_name)
+        return {'data': content, 'generated': False, 'updates': None}
+
+    if entry.stored_url:
+        data = _download_existing(entry.stored_url)
+        if data:
+            return {'data': data, 'generated': False, 'updates': None}
+
+    from app.utils import pdf_generator
+    updates = {}
+    with app.app_context():
+        if entry.kind == 'tier_basic':
+            buffer = pdf_generator.generate_evaluation_report_pdf(entry.result, entry.exam, entry.user)
+            data = buffer.getvalue()
+            url = _upload_pdf(data, f"report_{entry.result.id}.pdf")
+            if url:
+                updates['report_url'] = url
+        else:
+            if not entry.result.eduit_certificate_code:
+                entry.result.eduit_certificate_code = f"EC{uuid.uuid4().hex[:10].upper()}"
+                updates['eduit_certificate_code'] = entry.result.eduit_certificate_code
+            buffer = pdf_generator.generate_certificate_pdf(entry.result, entry.exam, entry.user)
+            data = buffer.getvalue()
+            url = _upload_pdf(data, f"certificate_{entry.result.id}.pdf")
+            if url:
+                updates['certificate_url'] = url
+    return {'data': data, 'generated': True, 'updates': updates or None}
+
+
+def write_certificate_zip(app, entries: List[CertificateZipEntry], path: str,
+                          on_progress: Optional[Callable[[CertificateZipStats], None]] = None,
+                          workers: Optional[int] = None) -> CertificateZipStats:
+    """
+    Escribe el ZIP en `path` con los PDFs de `entries`, generando en paralelo
+    los que falten. `on_progress(stats)` se llama en el thread que llama cada
+    CERT_ZIP_PROGRESS_EVERY archivos y al final.
+    """
+    from zipfile import ZipFile
+
+    stats = CertificateZipStats(len(entries))
+    workers = max(1, workers or CERT_ZIP_WORKERS)
+
+    def consume(outcome):
+        entry = entries[outcome.key]
+        stats.processed += 1
+        if not outcome.ok:
+            stats.add_error(entry, outcome.error)
+        else:
+            produced = outcome.value
+            if produced['data']:
+                zip_file.writestr(entry.arcname, produced['data'])
+                stats.files_added += 1
+            if produced['generated']:
+                stats.generated += 1
+            if produced['updates']:
+                stats.pending_updates.setdefault(entry.result.id, {}).update(produced['updates'])
+        if on_progress and stats.processed % CERT_ZIP_PROGRESS_EVERY == 0:
+            on_progress(stats)
+
+    with ZipFile(path, 'w') as zip_file:
+        with BlobUploader(max_workers=workers, retries=1,
+                          max_inflight_bytes=_ESTIMATED_PDF_BYTES * workers * 2,
+                          name='cert-zip') as pool:
+            for index, entry in enumerate(entries):
+                pool.submit(index, _produce_entry, app, entry, size=_ESTIMATED_PDF_BYTES)
+                for outcome in pool.poll():
+                    consume(outcome)
+            for outcome in pool.drain():
+                consume(outcome)
+
+    if on_progress:
+        on_progress(stats)
+    return stats
+
+
+def apply_result_updates(updates: Dict[str, dict]):
+    """Aplica a `results` los campos generados por los workers (sin commit)."""
+    if not updates:
+        return
+    from app.models.result import Result
+    ids = list(updates)
+    for start in range(0, len(ids), 1000):
+        for result in Result.query.filter(Result.id.in_(ids[start:start + 1000])).all():
+            for field, value in updates[result.id].items():
+                setattr(result, field, value)
+
+
+def certificate_zip_filename(group) -> str:
+    """Nombre de descarga del ZIP; el nombre del grupo se limpia porque va
+    en el header Content-Disposition del blob y del SAS."""
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', group.name or 'Grupo').strip()[:80]
+    return f"Certificados_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+
+
+def new_spool_path() -> str:
+    fd, path = tempfile.mkstemp(prefix='certzip_', suffix='.zip', dir=SPOOL_DIR)
+    os.close(fd)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Jobs
+# ---------------------------------------------------------------------------
+
+def certificate_filter_key(certificate_types, user_ids=None) -> str:
+    """Huella del filtro: mismo grupo + mismo filtro = mismo ZIP."""
+    payload = json.dumps({
+        'types': normalize_certificate_types(certificate_types),
+        'user_ids': sorted({str(u) for u in user_ids}) if user_ids else None,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def find_reusable_job(group_id: int, filter_key: str):
+    """Job en curso (con avance reciente) o terminado y vigente para el filtro."""
+    from sqlalchemy import and_, or_
+    from app.models.certificate_zip_job import GroupCertificateZipJob
+
+    now = datetime.utcnow()
+    return GroupCertificateZipJob.query.filter(
+        GroupCertificateZipJob.group_id == group_id,
+        GroupCertificateZipJob.filter_key == filter_key,
+        or_(
+            and_(GroupCertificateZipJob.status.in_(('queued', 'processing')),
+                 GroupCertificateZipJob.updated_at >= now - timedelta(minutes=CERT_ZIP_STALE_MINUTES)),
+            and_(GroupCertificateZipJob.status == 'completed',
+                 GroupCertificateZipJob.completed_at >= now - timedelta(hours=CERT_ZIP_REUSE_HOURS)),
+        )
+    ).order_by(GroupCertificateZipJob.id.desc()).first()
+
+
+def enqueue_certificate_zip_job(group_id: int, certificate_types, user_ids=None,
+                                requested_by: Optional[str] = None, force: bool = False):
+    """
+    Crea el job o reutiliza uno equivalente.
+
+    Returns:
+        (job, created)
+    """
+    from app import db
+    from app.models.certificate_zip_job import GroupCertificateZipJob
+
+    types = normalize_certificate_types(certificate_types)
+    filter_key = certificate_filter_key(types, user_ids)
+    if not force:
+        existing = find_reusable_job(group_id, filter_key)
+        if existing:
+            return existing, False
+
+    job = GroupCertificateZipJob(
+        group_id=group_id,
+        requested_by=requested_by,
+        certificate_types=json.dumps(types),
+        user_ids=json.dumps(sorted({str(u) for u in user_ids})) if user_ids else None,
+        filter_key=filter_key,
+        status='queued',
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job, True
+
+
+def certificate_zip_job_payload(job) -> dict:
+    """to_dict() del job más la URL SAS de descarga si ya terminó."""
+    data = job.to_dict()
+    data['download_url'] = None
+    if job.status == 'completed' and job.blob_name:
+        from app.utils.azure_storage import azure_storage
+        data['download_url'] = azure_storage.generate_certificate_zip_sas_url(
+            job.blob_name, ttl_minutes=CERT_ZIP_SAS_MINUTES, download_name=job.zip_filename)
+        data['download_expires_in_minutes'] = CERT_ZIP_SAS_MINUTES
+    return data
+
+
+def process_certificate_zip_job_background(app, job_id: int):
+    """
+    Lanza el procesamiento del job en un thread separado.
+    """
+    thread = threading.Thread(
+        target=_process_job_worker,
+        args=(app, job_id),
+        name=f'cert-zip-{job_id}',
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _process_job_worker(app, job_id: int):
+    """Worker que ejecuta dentro del thread con contexto Flask."""
+    with app.app_context():
+        try:
+            process_certificate_zip_job(app, job_id)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            try:
+                from app import db
+                from app.models.certificate_zip_job import GroupCertificateZipJob
+                db.session.rollback()
+                job = GroupCertificateZipJob.query.get(job_id)
+                if job:
+                    job.status = 'failed'
+                    job.error_message = f'Error inesperado: {str(e)[:500]}'
+                    job.completed_at = datetime.utcnow()
+                    db.session.commit()
+            except Exception:
+                pass
+
+
+def _fail_job(job, message: str):
+    from app import db
+    job.status = 'failed'
+    job.error_message = message
+    job.completed_at = datetime.utcnow()
+    db.session.commit()
+    print(f"[CERT-ZIP] Job {job.id} falló: {message}")
+
+
+def process_certificate_zip_job(app, job_id: int):
+    """Procesa un job en el thread actual (requiere app context)."""
+    from app import db
+    from app.models.certificate_zip_job import GroupCertificateZipJob
+    from app.models.partner import CandidateGroup
+    from app.utils.azure_storage import azure_storage
+
+    job = GroupCertificateZipJob.query.get(job_id)
+    if not job or job.status != 'queued':
+        return
+    job.status = 'processing'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    group = CandidateGroup.query.get(job.group_id)
+    if not group:
+        _fail_job(job, 'Grupo no encontrado')
+        return
+
+    certificate_types = json.loads(job.certificate_types or '[]')
+    user_ids = json.loads(job.user_ids) if job.user_ids else None
+    entries, member_count = collect_certificate_entries(group.id, certificate_types, user_ids)
+    if not member_count:
+        _fail_job(job, 'No hay miembros en el grupo')
+        return
+
+    job.total_files = len(entries)
+    db.session.commit()
+    print(f"[CERT-ZIP] Job {job.id}: {len(entries)} archivos para el grupo {group.id}")
+
+    def publish(stats: CertificateZipStats):
+        apply_result_updates(stats.take_updates())
+        job.processed_files = stats.processed
+        job.files_added = stats.files_added
+        job.generated_files = stats.generated
+        job.error_count = stats.error_count
+        db.session.commit()
+
+    path = new_spool_path()
+    try:
+        stats = write_certificate_zip(app, entries, path, on_progress=publish)
+        job.errors = json.dumps(stats.errors) if stats.errors else None
+        if stats.files_added == 0:
+            _fail_job(job, 'No hay certificados disponibles para descargar')
+            return
+
+        zip_filename = certificate_zip_filename(group)
+        blob_name = f"group_{group.id}/job_{job.id}_{uuid.uuid4().hex[:8]}.zip"
+        size_bytes = os.path.getsize(path)
+        if not azure_storage.upload_certificate_zip(path, blob_name, zip_filename):
+            _fail_job(job, 'No se pudo subir el ZIP a blob storage')
+            return
+    finally:
+        remove_spool(path)
+
+    job.blob_name = blob_name
+    job.zip_filename = zip_filename
+    job.size_bytes = size_bytes
+    job.status = 'completed'
+    job.completed_at = datetime.utcnow()
+    db.session.commit()
+    print(f"[CERT-ZIP] Job {job.id} completado: {stats.files_added} archivos, "
+          f"{stats.generated} generados, {stats.error_count} errores")
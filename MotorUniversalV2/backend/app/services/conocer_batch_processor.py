@@ -3,7 +3,9 @@ Servicio de procesamiento en segundo plano para carga masiva de certificados CON
 Procesa un ZIP de PDFs: parsea cada uno, hace matching, sube blobs y crea registros.
 
 Optimizado para batches grandes (cientos/miles de PDFs):
-- Pasada 1 solo guarda metadata ligera (no retiene pdf_bytes en RAM)
+- El ZIP se descarga a un archivo temporal, no a memoria
+- Pasada 1 parsea en un pool de procesos acotado (conocer_parse_pool) y solo
+  guarda metadata ligera (no retiene pdf_bytes en RAM)
 - Pasada 2 re-lee cada PDF del ZIP bajo demanda
 - Lookups de BD en batch (no N+1 queries)
 - Commits en lotes para evitar transacciones gigantes
@@ -11,12 +13,12 @@ Optimizado para batches grandes (cientos/miles de PDFs):
 
 Flujo:
 1. Recibe batch_id de un ConocerUploadBatch con status='queued'
-2. Descarga el ZIP del blob temporal
-3. Pasada 1: Escanea todos los PDFs, extrae CURP+ECM, deduplica (queda el último)
+2. Descarga el ZIP del blob temporal a disco
+3. Pasada 1: Escanea todos los PDFs en paralelo, extrae CURP+ECM, deduplica
+   (queda el último); publica progreso en batch.scanned_files
 4. Pasada 2: Por cada PDF ganador, re-lee del ZIP, hace matching y sube blob
 5. Actualiza contadores y marca batch como completed/failed
 """
-import io
 import os
 import time
 import uuid
@@ -25,11 +27,17 @@ import threading
 from datetime import datetime
 from typing import Dict, Tuple, Optional, Set
 
-from app.services.conocer_pdf_parser import parse_conocer_pdf, parse_issue_date
+from app.services.conocer_pdf_parser import parse_issue_date
+from app.services.conocer_parse_pool import iter_parsed_entries
+from app.utils.blob_uploader import BlobUploader
+from app.utils.zip_spool import remove_spool, spool_blob_to_tempfile
 
 # Cuántos logs de failure insertar antes de hacer commit (evita transacciones enormes)
 FAILURE_COMMIT_BATCH_SIZE = 50
 
+# Cada cuántos PDFs escaneados (pasada 1) se publica progreso y se revisa cancelación
+SCAN_PROGRESS_EVERY = 25
+
 
 def _is_unsafe_zip_entry(entry_name: str) -> bool:
     """Detecta path traversal en una entrada de ZIP.
@@ -93,12 +101,7 @@ def _process_batch_worker(app, batch_id: int):
 def _process_batch(batch_id: int):
     """Lógica principal de procesamiento de un batch."""
     from app import db
-    from app.models import User
-    from app.models.conocer_certificate import ConocerCertificate
-    from app.models.conocer_upload import ConocerUploadBatch, ConocerUploadLog
-    from app.models.competency_standard import CompetencyStandard
-    from app.models.partner import EcmCandidateAssignment
-    from app.services.conocer_blob_service import get_conocer_blob_service
+    from app.models.conocer_upload import ConocerUploadBatch
 
     batch = ConocerUploadBatch.query.get(batch_id)
     if not batch or batch.status != 'queued':
@@ -111,7 +114,8 @@ def _process_batch(batch_id: int):
 
     print(f"[CONOCER-BATCH] Iniciando procesamiento del batch {batch_id}: {batch.filename}")
 
-    # === Descargar ZIP del blob temporal ===
+    # === Descargar ZIP del blob temporal a disco (por chunks) ===
+    # Los workers de la pasada 1 abren el ZIP por ruta; nunca se retiene en RAM.
     try:
         from azure.storage.blob import BlobServiceClient as _BSC
         conn_str = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
@@ -119,14 +123,7 @@ def _process_batch(batch_id: int):
 
         bsc = _BSC.from_connection_string(conn_str)
         blob_client = bsc.get_blob_client(container=container_name, blob=batch.blob_name)
-        zip_bytes = blob_client.download_blob().readall()
-
-        if not zip_bytes:
-            batch.status = 'failed'
-            batch.error_message = 'No se pudo descargar el archivo ZIP del almacenamiento'
-            batch.completed_at = datetime.utcnow()
-            db.session.commit()
-            return
+        zip_path = spool_blob_to_tempfile(blob_client, prefix=f'conocer_batch_{batch_id}_')
     except Exception as e:
         batch.status = 'failed'
         batch.error_message = f'Error al descargar ZIP: {str(e)[:500]}'
@@ -134,10 +131,34 @@ def _process_batch(batch_id: int):
         db.session.commit()
         return
 
-    # === Abrir ZIP en memoria ===
     try:
-        zip_buffer = io.BytesIO(zip_bytes)
-        zf = zipfile.ZipFile(zip_buffer, 'r')
+        if not os.path.getsize(zip_path):
+            batch.status = 'failed'
+            batch.error_message = 'No se pudo descargar el archivo ZIP del almacenamiento'
+            batch.completed_at = datetime.utcnow()
+            db.session.commit()
+            return
+
+        _process_zip_file(batch, zip_path)
+    finally:
+        remove_spool(zip_path)
+
+
+def _process_zip_file(batch, zip_path: str):
+    """Pasadas 1 y 2 sobre el ZIP ya descargado en `zip_path`."""
+    from app import db
+    from app.models import User
+    from app.models.conocer_certificate import ConocerCertificate
+    from app.models.conocer_upload import ConocerUploadLog
+    from app.models.competency_standard import CompetencyStandard
+    from app.models.partner import EcmCandidateAssignment
+    from app.services.conocer_blob_service import get_conocer_blob_service
+
+    batch_id = batch.id
+
+    # === Abrir ZIP desde disco ===
+    try:
+        zf = zipfile.ZipFile(zip_path, 'r')
     except zipfile.BadZipFile:
         batch.status = 'failed'
         batch.error_message = 'El archivo no es un ZIP válido'
@@ -145,9 +166,6 @@ def _process_batch(batch_id: int):
         db.session.commit()
         return
 
-    # Liberar referencia al zip_bytes crudo (el ZipFile trabaja sobre zip_buffer)
-    del zip_bytes
-
     # Filtrar PDFs (incluye subdirectorios, excluye __MACOSX, ocultos y rutas inseguras)
     pdf_entries = sorted(set(
         entry for entry in zf.namelist()
@@ -203,24 +221,34 @@ def _process_batch(batch_id: int):
     # Dict: (curp, ecm_code) → {entry_name, filename, parsed}  (sin pdf_bytes)
     seen: Dict[Tuple[str, str], dict] = {}
     pending_failures = []
+    batch.scanned_files = 0
+    db.session.commit()
 
-    for idx, entry_name in enumerate(pdf_entries):
+    # El parseo corre en un pool de procesos (ver conocer_parse_pool); los
+    # resultados llegan en el orden de pdf_entries.
+    parsed_entries = iter_parsed_entries(zip_path, pdf_entries)
+    for idx, (entry_name, parsed) in enumerate(parsed_entries, 1):
         short_name = entry_name.split('/')[-1]
-        try:
-            pdf_bytes_single = zf.read(entry_name)
-        except Exception as e:
+
+        if idx % SCAN_PROGRESS_EVERY == 0:
+            batch.scanned_files = idx
+            db.session.commit()
+            db.session.refresh(batch)
+            if batch.status == 'cancelled':
+                print(f"[CONOCER-BATCH] Batch {batch_id} cancelado durante pasada 1 — abortando")
+                parsed_entries.close()  # termina el pool
+                zf.close()
+                return
+
+        if parsed.get('read_error'):
             pending_failures.append({
                 'filename': short_name, 'status': 'error',
                 'discard_reason': 'parse_error',
-                'discard_detail': f'Error al leer del ZIP: {str(e)[:200]}',
+                'discard_detail': f'Error al leer del ZIP: {parsed["read_error"]}',
                 'parsed': {}
             })
             continue
 
-        parsed = parse_conocer_pdf(pdf_bytes_single)
-        # Liberar PDF bytes inmediatamente (se re-leerá en pasada 2)
-        del pdf_bytes_single
-
         if parsed.get('parse_error'):
             pending_failures.append({
                 'filename': short_name, 'status': 'discarded',
@@ -273,9 +301,12 @@ def _process_batch(batch_id: int):
             pending_failures = []
 
     # Flush remaining failures
+    batch.scanned_files = len(pdf_entries)
     if pending_failures:
         _flush_failures(db, batch, batch_id, pending_failures)
         pending_failures = []
+    else:
+        db.session.commit()
 
     print(f"[CONOCER-BATCH] Pasada 1 completa: {len(seen)} únicos")
 
@@ -351,213 +382,139 @@ def _process_batch(batch_id: int):
         zf.close()
         return
 
-    # Procesar cada PDF único — re-leyendo del ZIP bajo demanda
+    # Procesar cada PDF único — re-leyendo del ZIP bajo demanda.
+    # Las subidas corren en BlobUploader (concurrencia y bytes en vuelo
+    # acotados); los registros en BD se hacen en este thread conforme terminan.
     processed_in_pass2 = 0
-    for (curp, ecm_code), entry_data in seen.items():
-        # Chequeo de cancelación cooperativa: si el coordinador/admin canceló
-        # el batch mientras se procesaba, abortamos el loop preservando el
-        # estado 'cancelled' — NO sobrescribimos a 'completed' al final.
-        db.session.refresh(batch)
-        if batch.status == 'cancelled':
-            print(f"[CONOCER-BATCH] Batch {batch_id} cancelado durante pasada 2 — abortando")
-            zf.close()
-            return
-        start_time = time.time()
-        filename = entry_data['filename']
-        parsed = entry_data['parsed']
-
-        log_data = {
-            'batch_id': batch_id,
-            'filename': _truncate(filename, 500),
-            'extracted_curp': _truncate(parsed.get('curp'), 18),
-            'extracted_ecm_code': _truncate(parsed.get('ecm_code'), 20),
-            'extracted_name': _truncate(parsed.get('name'), 255),
-            'extracted_folio': _truncate(parsed.get('folio'), 50),
-            'extracted_ecm_name': _truncate(parsed.get('ecm_name'), 500),
-            'extracted_issue_date': _truncate(parsed.get('issue_date'), 100),
-            'extracted_certifying_entity': _truncate(parsed.get('certifying_entity'), 255),
-        }
-
-        uploaded_blob_name = None
-
-        try:
-            # Buscar usuario por CURP (from pre-loaded map)
-            user = users_by_curp.get(curp.upper())
-            if not user:
-                _add_discard_log(db, batch, log_data, 'curp_not_found',
-                                 f'La CURP {curp} no existe en el sistema',
-                                 start_time)
-                continue
-
-            # Buscar estándar (from pre-loaded map)
-            standard = standards_by_code.get(ecm_code.upper())
-            if not standard:
-                _add_discard_log(db, batch, log_data, 'ecm_not_found',
-                                 f'El estándar {ecm_code} no existe en el sistema',
-                                 start_time, matched_user_id=user.id)
-                continue
-
-            # Verificar asignación ECM (from pre-loaded set)
-            has_assignment = (user.id, standard.id) in assignment_set
-
-            # Verificar certificado existente (from pre-loaded map)
-            existing_cert = existing_certs_map.get((user.id, ecm_code.upper()))
-
-            if not has_assignment and not existing_cert:
-                _add_discard_log(db, batch, log_data, 'no_assignment',
-                                 f'El usuario con CURP {curp} no tiene asignación activa para {ecm_code}',
-                                 start_time, matched_user_id=user.id)
-                continue
-
-            # Re-leer PDF del ZIP (no guardamos bytes en pasada 1)
+    cancelled = False
+
+    def _record(results):
+        nonlocal processed_in_pass2
+        for res in results:
+            if cancelled and not res.ok:
+                continue  # subida cancelada antes de empezar: no hay nada que registrar
+            if _record_certificate_upload(db, batch, res, blob_svc, existing_certs_map):
+                processed_in_pass2 += 1
+                if processed_in_pass2 % 25 == 0:
+                    print(f"[CONOCER-BATCH] Progreso: {processed_in_pass2}/{len(seen)}")
+
+    with BlobUploader(name=f'conocer-upload-{batch_id}') as uploader:
+        for (curp, ecm_code), entry_data in seen.items():
+            # Chequeo de cancelación cooperativa: si el coordinador/admin canceló
+            # el batch mientras se procesaba, abortamos el loop preservando el
+            # estado 'cancelled' — NO sobrescribimos a 'completed' al final.
+            db.session.refresh(batch)
+            if batch.status == 'cancelled':
+                print(f"[CONOCER-BATCH] Batch {batch_id} cancelado durante pasada 2 — abortando")
+                cancelled = True
+                uploader.cancel()
+                break
+            start_time = time.time()
+            filename = entry_data['filename']
+            parsed = entry_data['parsed']
+
+            log_data = {
+                'batch_id': batch_id,
+                'filename': _truncate(filename, 500),
+                'extracted_curp': _truncate(parsed.get('curp'), 18),
+                'extracted_ecm_code': _truncate(parsed.get('ecm_code'), 20),
+                'extracted_name': _truncate(parsed.get('name'), 255),
+                'extracted_folio': _truncate(parsed.get('folio'), 50),
+                'extracted_ecm_name': _truncate(parsed.get('ecm_name'), 500),
+                'extracted_issue_date': _truncate(parsed.get('issue_date'), 100),
+                'extracted_certifying_entity': _truncate(parsed.get('certifying_entity'), 255),
+            }
+
+            user = None
             try:
-                pdf_content = zf.read(entry_data['entry_name'])
-            except Exception as e:
-                _add_discard_log(db, batch, log_data, 'parse_error',
-                                 f'Error al re-leer PDF del ZIP: {str(e)[:200]}',
-                                 start_time, matched_user_id=user.id)
-                continue
-
-            issue_date = parse_issue_date(parsed.get('issue_date'))
-            if not issue_date:
-                issue_date = datetime.utcnow().date()
-
-            # parsed['folio'] siempre se asigna a None cuando no se encuentra,
-            # así que dict.get(key, default) NO devuelve el default — hay que
-            # usar `or` para caer al placeholder cuando es None/vacío.
-            # Usamos uuid4 (no timestamp) para evitar colisiones cuando varios
-            # PDFs sin folio se procesan en la misma fracción de segundo.
-            folio = parsed.get('folio') or f'BATCH{batch_id}_{uuid.uuid4().hex[:8]}'
-
-            # === SUBIR PDF A BLOB STORAGE ===
-            uploaded_blob_name, file_hash, file_size = blob_svc.upload_certificate(
-                file_content=pdf_content,
-                user_id=user.id,
-                certificate_number=folio,
-                standard_code=ecm_code.upper(),
-                metadata={
-                    'curp': curp,
-                    'standard_name': standard.name,
-                    'batch_id': str(batch_id),
-                    'original_filename': filename
+                # Buscar usuario por CURP (from pre-loaded map)
+                user = users_by_curp.get(curp.upper())
+                if not user:
+                    _add_discard_log(db, batch, log_data, 'curp_not_found',
+                                     f'La CURP {curp} no existe en el sistema',
+                                     start_time)
+                    continue
+
+                # Buscar estándar (from pre-loaded map)
+                standard = standards_by_code.get(ecm_code.upper())
+                if not standard:
+                    _add_discard_log(db, batch, log_data, 'ecm_not_found',
+                                     f'El estándar {ecm_code} no existe en el sistema',
+                                     start_time, matched_user_id=user.id)
+                    continue
+
+                # Verificar asignación ECM (from pre-loaded set)
+                has_assignment = (user.id, standard.id) in assignment_set
+
+                # Verificar certificado existente (from pre-loaded map)
+                existing_cert = existing_certs_map.get((user.id, ecm_code.upper()))
+
+                if not has_assignment and not existing_cert:
+                    _add_discard_log(db, batch, log_data, 'no_assignment',
+                                     f'El usuario con CURP {curp} no tiene asignación activa para {ecm_code}',
+                                     start_time, matched_user_id=user.id)
+                    continue
+
+                # Re-leer PDF del ZIP (no guardamos bytes en pasada 1)
+                try:
+                    pdf_content = zf.read(entry_data['entry_name'])
+                except Exception as e:
+                    _add_discard_log(db, batch, log_data, 'parse_error',
+                                     f'Error al re-leer PDF del ZIP: {str(e)[:200]}',
+                                     start_time, matched_user_id=user.id)
+                    continue
+
+                issue_date = parse_issue_date(parsed.get('issue_date'))
+                if not issue_date:
+                    issue_date = datetime.utcnow().date()
+
+                # parsed['folio'] siempre se asigna a None cuando no se encuentra,
+                # así que dict.get(key, default) NO devuelve el default — hay que
+                # usar `or` para caer al placeholder cuando es None/vacío.
+                # Usamos uuid4 (no timestamp) para evitar colisiones cuando varios
+                # PDFs sin folio se procesan en la misma fracción de segundo.
+                folio = parsed.get('folio') or f'BATCH{batch_id}_{uuid.uuid4().hex[:8]}'
+
+                # === SUBIR PDF A BLOB STORAGE (en segundo plano) ===
+                # submit() bloquea si hay demasiados bytes en vuelo (backpressure)
+                upload_ctx = {
+                    'batch_id': batch_id, 'log_data': log_data, 'start_time': start_time,
+                    'user': user, 'standard': standard, 'existing_cert': existing_cert,
+                    'curp': curp, 'ecm_code': ecm_code, 'parsed': parsed,
+                    'issue_date': issue_date, 'folio': folio, 'filename': filename,
                 }
-            )
-            del pdf_content  # Liberar memoria
-
-            if existing_cert:
-                # === REEMPLAZAR certificado existente ===
-                previous_hash = existing_cert.file_hash
-                existing_cert.blob_name = uploaded_blob_name
-                existing_cert.file_hash = file_hash
-                existing_cert.file_size = file_size
-                existing_cert.blob_tier = 'Cool'
-                existing_cert.updated_at = datetime.utcnow()
-                existing_cert.archived_at = None
-
-                if parsed.get('folio') and parsed['folio'] != existing_cert.certificate_number:
-                    folio_exists = ConocerCertificate.query.filter(
-                        ConocerCertificate.certificate_number == parsed['folio'],
-                        ConocerCertificate.id != existing_cert.id
-                    ).first()
-                    if not folio_exists:
-                        existing_cert.certificate_number = parsed['folio']
-
-                if issue_date:
-                    existing_cert.issue_date = issue_date
-                if parsed.get('ecm_name'):
-                    existing_cert.standard_name = parsed['ecm_name']
-                elif standard.name:
-                    existing_cert.standard_name = standard.name
-                if parsed.get('certifying_entity'):
-                    existing_cert.evaluation_center_name = parsed['certifying_entity']
-
-                db.session.flush()
-
-                log = ConocerUploadLog(
-                    **log_data, status='replaced', matched_user_id=user.id,
-                    certificate_id=existing_cert.id,
-                    replaced_previous_hash=previous_hash,
-                    processing_time_ms=int((time.time() - start_time) * 1000)
-                )
-                db.session.add(log)
-                batch.replaced_files = (batch.replaced_files or 0) + 1
-
-                _update_eca_tramite_status(user.id, standard.id, 'entregado')
-
-            else:
-                # === CREAR nuevo certificado ===
-                certificate = ConocerCertificate(
+                uploader.submit(
+                    upload_ctx, blob_svc.upload_certificate,
+                    size=len(pdf_content),
+                    file_content=pdf_content,
                     user_id=user.id,
                     certificate_number=folio,
-                    curp=curp.upper(),
                     standard_code=ecm_code.upper(),
-                    standard_name=parsed.get('ecm_name') or standard.name,
-                    evaluation_center_name=parsed.get('certifying_entity'),
-                    issue_date=issue_date,
-                    blob_name=uploaded_blob_name,
-                    blob_container='conocer-certificates',
-                    blob_tier='Cool',
-                    file_size=file_size,
-                    file_hash=file_hash,
-                    status='active',
-                    metadata_json={
-                        'batch_id': batch_id,
-                        'original_filename': filename,
-                        'extracted_name': parsed.get('name'),
+                    metadata={
+                        'curp': curp,
+                        'standard_name': standard.name,
+                        'batch_id': str(batch_id),
+                        'original_filename': filename
                     }
                 )
-                db.session.add(certificate)
-                db.session.flush()
-
-                # Actualizar cache para posibles duplicados futuros en el mismo batch
-                existing_certs_map[(user.id, ecm_code.upper())] = certificate
+                del pdf_content  # El uploader conserva la única referencia
 
-                log = ConocerUploadLog(
-                    **log_data, status='matched', matched_user_id=user.id,
-                    certificate_id=certificate.id,
-                    processing_time_ms=int((time.time() - start_time) * 1000)
-                )
-                db.session.add(log)
-                batch.matched_files = (batch.matched_files or 0) + 1
-
-                _update_eca_tramite_status(user.id, standard.id, 'entregado')
+            except Exception as e:
+                db.session.rollback()
+                import traceback
+                traceback.print_exc()
+                _add_error_log(db, batch, log_data, e, start_time,
+                               matched_user_id=user.id if user else None)
 
-            batch.processed_files = (batch.processed_files or 0) + 1
-            db.session.commit()
-            processed_in_pass2 += 1
+            _record(uploader.poll())
 
-            if processed_in_pass2 % 25 == 0:
-                print(f"[CONOCER-BATCH] Progreso: {processed_in_pass2}/{len(seen)}")
+        # Esperar subidas en vuelo y registrar las que terminaron (también
+        # si se canceló: esos blobs ya existen y deben quedar en la BD)
+        _record(uploader.drain())
 
-        except Exception as e:
-            db.session.rollback()
-            import traceback
-            traceback.print_exc()
-
-            # Limpiar blob huérfano si se subió antes del error
-            if uploaded_blob_name:
-                try:
-                    blob_svc.delete_certificate(uploaded_blob_name)
-                except Exception:
-                    pass
-
-            try:
-                log = ConocerUploadLog(
-                    **log_data, status='error', discard_reason='processing_error',
-                    discard_detail=f'Error al procesar: {str(e)[:300]}',
-                    matched_user_id=user.id if 'user' in dir() and user else None,
-                    processing_time_ms=int((time.time() - start_time) * 1000)
-                )
-                db.session.add(log)
-                batch.error_files = (batch.error_files or 0) + 1
-                batch.processed_files = (batch.processed_files or 0) + 1
-                db.session.commit()
-            except Exception:
-                # Si ni siquiera podemos loguear el error, seguir con el siguiente
-                try:
-                    db.session.rollback()
-                except Exception:
-                    pass
+    if cancelled:
+        zf.close()
+        return
 
     # === Finalizar batch ===
     zf.close()
@@ -593,6 +550,159 @@ def _process_batch(batch_id: int):
     )
 
 
+def _record_certificate_upload(db, batch, result, blob_svc, existing_certs_map) -> bool:
+    """
+    Registra en BD el resultado de una subida de la pasada 2 (crea o
+    reemplaza el certificado y su log). Corre en el thread del batch.
+
+    Returns:
+        True si el certificado quedó registrado.
+    """
+    from app.models.conocer_certificate import ConocerCertificate
+    from app.models.conocer_upload import ConocerUploadLog
+
+    ctx = result.key
+    batch_id = ctx['batch_id']
+    log_data = ctx['log_data']
+    start_time = ctx['start_time']
+    user = ctx['user']
+    standard = ctx['standard']
+    existing_cert = ctx['existing_cert']
+    curp = ctx['curp']
+    ecm_code = ctx['ecm_code']
+    parsed = ctx['parsed']
+    issue_date = ctx['issue_date']
+    folio = ctx['folio']
+    filename = ctx['filename']
+
+    if not result.ok:
+        print(f"[CONOCER-BATCH] Falló subida de {filename} tras {result.attempts} intento(s): {result.error}")
+        _add_error_log(db, batch, log_data, result.error, start_time, matched_user_id=user.id)
+        return False
+
+    uploaded_blob_name, file_hash, file_size = result.value
+
+    try:
+        if existing_cert:
+            # === REEMPLAZAR certificado existente ===
+            previous_hash = existing_cert.file_hash
+            existing_cert.blob_name = uploaded_blob_name
+            existing_cert.file_hash = file_hash
+            existing_cert.file_size = file_size
+            existing_cert.blob_tier = 'Cool'
+            existing_cert.updated_at = datetime.utcnow()
+            existing_cert.archived_at = None
+
+            if parsed.get('folio') and parsed['folio'] != existing_cert.certificate_number:
+                folio_exists = ConocerCertificate.query.filter(
+                    ConocerCertificate.certificate_number == parsed['folio'],
+                    ConocerCertificate.id != existing_cert.id
+                ).first()
+                if not folio_exists:
+                    existing_cert.certificate_number = parsed['folio']
+
+            if issue_date:
+                existing_cert.issue_date = issue_date
+            if parsed.get('ecm_name'):
+                existing_cert.standard_name = parsed['ecm_name']
+            elif standard.name:
+                existing_cert.standard_name = standard.name
+            if parsed.get('certifying_entity'):
+                existing_cert.evaluation_center_name = parsed['certifying_entity']
+
+            db.session.flush()
+
+            log = ConocerUploadLog(
+                **log_data, status='replaced', matched_user_id=user.id,
+                certificate_id=existing_cert.id,
+                replaced_previous_hash=previous_hash,
+                processing_time_ms=int((time.time() - start_time) * 1000)
+            )
+            db.session.add(log)
+            batch.replaced_files = (batch.replaced_files or 0) + 1
+
+            _update_eca_tramite_status(user.id, standard.id, 'entregado')
+
+        else:
+            # === CREAR nuevo certificado ===
+            certificate = ConocerCertificate(
+                user_id=user.id,
+                certificate_number=folio,
+                curp=curp.upper(),
+                standard_code=ecm_code.upper(),
+                standard_name=parsed.get('ecm_name') or standard.name,
+                evaluation_center_name=parsed.get('certifying_entity'),
+                issue_date=issue_date,
+                blob_name=uploaded_blob_name,
+                blob_container='conocer-certificates',
+                blob_tier='Cool',
+                file_size=file_size,
+                file_hash=file_hash,
+                status='active',
+                metadata_json={
+                    'batch_id': batch_id,
+                    'original_filename': filename,
+                    'extracted_name': parsed.get('name'),
+                }
+            )
+            db.session.add(certificate)
+            db.session.flush()
+
+            # Actualizar cache para posibles duplicados futuros en el mismo batch
+            existing_certs_map[(user.id, ecm_code.upper())] = certificate
+
+            log = ConocerUploadLog(
+                **log_data, status='matched', matched_user_id=user.id,
+                certificate_id=certificate.id,
+                processing_time_ms=int((time.time() - start_time) * 1000)
+            )
+            db.session.add(log)
+            batch.matched_files = (batch.matched_files or 0) + 1
+
+            _update_eca_tramite_status(user.id, standard.id, 'entregado')
+
+        batch.processed_files = (batch.processed_files or 0) + 1
+        db.session.commit()
+        return True
+
+    except Exception as e:
+        db.session.rollback()
+        import traceback
+        traceback.print_exc()
+
+        # Limpiar blob huérfano (se subió pero no quedó registrado)
+        try:
+            blob_svc.delete_certificate(uploaded_blob_name)
+        except Exception:
+            pass
+
+        _add_error_log(db, batch, log_data, e, start_time, matched_user_id=user.id)
+        return False
+
+
+def _add_error_log(db, batch, log_data, error, start_time, matched_user_id=None):
+    """Helper para registrar un error técnico de la pasada 2 y hacer commit."""
+    from app.models.conocer_upload import ConocerUploadLog
+
+    try:
+        log = ConocerUploadLog(
+            **log_data, status='error', discard_reason='processing_error',
+            discard_detail=f'Error al procesar: {str(error)[:300]}',
+            matched_user_id=matched_user_id,
+            processing_time_ms=int((time.time() - start_time) * 1000)
+        )
+        db.session.add(log)
+        batch.error_files = (batch.error_files or 0) + 1
+        batch.processed_files = (batch.processed_files or 0) + 1
+        db.session.commit()
+    except Exception:
+        # Si ni siquiera podemos loguear el error, seguir con el siguiente
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+
+
 def _flush_failures(db, batch, batch_id, failures):
     """Insertar un lote de failures y hacer commit."""
     from app.models.conocer_upload import ConocerUploadLog
@@ -0,0 +1,251 @@
+"""
+Pool de procesos para la pasada 1 de la carga masiva CONOCER.
+
+Cada worker abre el ZIP (ya en disco) por ruta, lee UNA entrada por nombre,
+extrae el texto de la página 1 con PyMuPDF y regresa solo el dict de
+metadata parseada. Los bytes del PDF nunca cruzan entre procesos.
+
+- Concurrencia acotada: a lo más workers*2 tareas en vuelo, así la memoria
+  queda en ~workers PDFs abiertos a la vez sin importar el tamaño del ZIP.
+- Timeout por tarea aplicado por el pool: si un PDF cuelga a MuPDF se
+  termina el pool completo, se recrea y se reenvían las tareas pendientes.
+- Resultados en el mismo orden de entrada (la deduplicación "queda el
+  último" del batch processor depende de ese orden).
+- maxtasksperchild recicla workers para acotar fugas de memoria de MuPDF.
+
+Configuración por entorno:
+  CONOCER_PARSE_WORKERS  número de procesos (default: núcleos, máx 8;
+                         1 = parseo en el mismo proceso, sin pool)
+  CONOCER_MAX_PDF_MB     tamaño máximo descomprimido por PDF (default 50)
+"""
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from app.services.conocer_pdf_parser import (
+    PDF_PARSE_TIMEOUT, empty_parse_result, extract_first_page_text, parse_conocer_text,
+)
+
+MAX_PARSE_WORKERS = 8
+MAX_TASKS_PER_CHILD = 500
+POOL_STARTUP_TIMEOUT = 120  # segundos para que arranque el pool (spawn + imports)
+MAX_PDF_BYTES = int(os.getenv('CONOCER_MAX_PDF_MB', '50')) * 1024 * 1024
+
+# ZipFile abierto por proceso worker (se reutiliza entre tareas del mismo ZIP)
+_worker_zip: Dict[str, Any] = {'path': None, 'zf': None}
+
+
+def get_parse_workers() -> int:
+    """Número de procesos del pool según entorno y núcleos disponibles."""
+    env = os.getenv('CONOCER_PARSE_WORKERS')
+    if env:
+        try:
+            return max(1, int(env))
+        except ValueError:
+            pass
+    return max(1, min(os.cpu_count() or 1, MAX_PARSE_WORKERS))
+
+
+def _error_result(message: str) -> Dict[str, Any]:
+    result = empty_parse_result()
+    result['parse_error'] = message
+    return result
+
+
+def _open_worker_zip(zip_path: str) -> zipfile.ZipFile:
+    if _worker_zip['path'] != zip_path:
+        if _worker_zip['zf'] is not None:
+            try:
+                _worker_zip['zf'].close()
+            except Exception:
+                pass
+        _worker_zip['zf'] = zipfile.ZipFile(zip_path, 'r')
+        _worker_zip['path'] = zip_path
+    return _worker_zip['zf']
+
+
+def parse_zip_entry(zip_path: str, entry_name: str) -> Dict[str, Any]:
+    """
+    Tarea del worker: lee una entrada del ZIP y la parsea.
+
+    Returns:
+        Dict de parse_conocer_text. Si la entrada no se pudo leer, incluye
+        'read_error' con el mensaje (el batch lo registra como 'error').
+    """
+    try:
+        zf = _open_worker_zip(zip_path)
+        info = zf.getinfo(entry_name)
+        if info.file_size > MAX_PDF_BYTES:
+            return _error_result(
+                f'El PDF excede el tamaño máximo ({MAX_PDF_BYTES // (1024 * 1024)} MB)'
+            )
+        pdf_bytes = zf.read(entry_name)
+    except Exception as e:
+        result = empty_parse_result()
+        result['read_error'] = str(e)[:200]
+        return result
+
+    text, error = extract_first_page_text(pdf_bytes)
+    del pdf_bytes
+    if error:
+        return _error_result(error)
+    return parse_conocer_text(text)
+
+
+def _timeout_result(timeout: float) -> Dict[str, Any]:
+    return _error_result(f'Timeout al extraer texto del PDF ({int(timeout)}s)')
+
+
+def _iter_inline(zip_path: str, entry_names: Iterable[str],
+                 task: Callable[[str, str], Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Parseo en el mismo proceso (1 worker o pool no disponible)."""
+    from app.services.conocer_pdf_parser import parse_conocer_pdf
+
+    if task is not parse_zip_entry:
+        for name in entry_names:
+            yield name, task(zip_path, name)
+        return
+
+    # parse_conocer_pdf aplica su propio timeout con thread
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        for name in entry_names:
+            try:
+                if zf.getinfo(name).file_size > MAX_PDF_BYTES:
+                    yield name, _error_result(
+                        f'El PDF excede el tamaño máximo ({MAX_PDF_BYTES // (1024 * 1024)} MB)'
+                    )
+                    continue
+                pdf_bytes = zf.read(name)
+            except Exception as e:
+                result = empty_parse_result()
+                result['read_error'] = str(e)[:200]
+                yield name, result
+                continue
+            parsed = parse_conocer_pdf(pdf_bytes)
+            del pdf_bytes
+            yield name, parsed
+
+
+def _init_worker():
+    """Precarga PyMuPDF al arrancar el worker (fuera del timeout por tarea)."""
+    try:
+        import fitz  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _new_pool(workers: int):
+    """Crea el pool y espera a que al menos un worker responda, para que el
+    arranque (spawn + imports) no cuente contra el timeout del primer PDF."""
+    ctx = multiprocessing.get_context('spawn')
+    pool = ctx.Pool(processes=workers, initializer=_init_worker,
+                    maxtasksperchild=MAX_TASKS_PER_CHILD)
+    try:
+        pool.apply_async(_worker_ready).get(timeout=POOL_STARTUP_TIMEOUT)
+    except Exception:
+        _shutdown_pool(pool)
+        raise
+    return pool
+
+
+def _chain(first: Iterable[str], rest: Iterator[str]) -> Iterator[str]:
+    yield from first
+    yield from rest
+
+
+def _shutdown_pool(pool):
+    try:
+        pool.terminate()
+        pool.join()
+    except Exception:
+        pass
+
+
+def iter_parsed_entries(zip_path: str, entry_names: Iterable[str],
+                        workers: Optional[int] = None,
+                        timeout: float = PDF_PARSE_TIMEOUT,
+                        task: Callable[[str, str], Dict[str, Any]] = parse_zip_entry
+                        ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Parsea las entradas del ZIP en paralelo y produce (entry_name, parsed)
+    en el mismo orden de `entry_names`.
+
+    El timeout cuenta desde que la tarea queda al frente de la cola; al
+    vencer se termina el pool (matando el PDF colgado), se marca esa entrada
+    con parse_error de timeout y las pendientes se reenvían a un pool nuevo.
+
+    Args:
+        workers: procesos del pool; None = get_parse_workers().
+        task: función top-level (zip_path, entry_name) -> dict. Parametrizable
+            para pruebas; debe ser importable desde el proceso hijo.
+    """
+    workers = workers or get_parse_workers()
+    if workers <= 1:
+        yield from _iter_inline(zip_path, entry_names, task)
+        return
+
+    try:
+        pool = _new_pool(workers)
+    except Exception as e:
+        print(f"[CONOCER-PARSE] No se pudo crear el pool ({e}); parseo en proceso")
+        yield from _iter_inline(zip_path, entry_names, task)
+        return
+
+    window = workers * 2
+    names = iter(entry_names)
+    # Cada elemento: [entry_name, AsyncResult, inicio_como_cabeza | None]
+    pending = deque()
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                name = next(names, None)
+                if name is None:
+                    exhausted = True
+                    break
+                pending.append([name, pool.apply_async(task, (zip_path, name)), None])
+
+            if not pending:
+                break
+
+            head = pending[0]
+            if head[2] is None:
+                head[2] = time.monotonic()
+            remaining = timeout - (time.monotonic() - head[2])
+
+            try:
+                parsed = head[1].get(timeout=max(remaining, 0))
+            except multiprocessing.TimeoutError:
+                print(f"[CONOCER-PARSE] Timeout en {head[0]}; reiniciando pool")
+                parsed = _timeout_result(timeout)
+                _shutdown_pool(pool)
+                pending.popleft()
+                try:
+                    pool = _new_pool(workers)
+                except Exception as e:
+                    print(f"[CONOCER-PARSE] No se pudo recrear el pool ({e}); parseo en proceso")
+                    yield head[0], parsed
+                    rest = [item[0] for item in pending]
+                    pending.clear()
+                    yield from _iter_inline(zip_path, _chain(rest, names), task)
+                    return
+                for item in pending:
+                    item[1] = pool.apply_async(task, (zip_path, item[0]))
+                    item[2] = None
+                yield head[0], parsed
+                continue
+            except Exception as e:
+                parsed = _error_result(f'Error al procesar PDF: {str(e)[:200]}')
+
+            pending.popleft()
+            yield head[0], parsed
+    finally:
+        _shutdown_pool(pool)
@@ -5,7 +5,7 @@ usando PyMuPDF (fitz) con patrones regex del formato oficial CONOCER.
 """
 import re
 import threading
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 # Timeout para extracción de texto (segundos)
 PDF_PARSE_TIMEOUT = 30
@@ -19,26 +19,9 @@ def _normalize_ecm_code(code: str) -> str:
     return code
 
 
-def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
-    """
-    Parsear un PDF de certificado CONOCER y extraer datos clave.
-    
-    El formato oficial CONOCER contiene texto estructurado con:
-    - Nombre del certificado después de "Hace constar que"
-    - CURP después de "Clave Única de Registro de Población:"
-    - Código ECM en "con clave: ECM####"
-    - Folio con formato "D-XXXXXXXXXX"
-    - Fecha de emisión "a {día} de {mes} de {año}"
-    - Entidad certificadora después de "evaluado por"
-    
-    Args:
-        pdf_bytes: Contenido del PDF en bytes
-        
-    Returns:
-        Dict con campos extraídos. Los campos no encontrados son None.
-        Siempre incluye 'parse_error' (None si no hubo error).
-    """
-    result = {
+def empty_parse_result() -> Dict[str, Any]:
+    """Dict de resultado con todos los campos en None."""
+    return {
         'curp': None,
         'ecm_code': None,
         'name': None,
@@ -48,48 +31,46 @@ def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
         'certifying_entity': None,
         'parse_error': None,
     }
-    
+
+
+def extract_first_page_text(pdf_bytes: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Extrae el texto de la página 1 con PyMuPDF, sin timeout propio.
+    Lo usan parse_conocer_pdf (con thread + timeout) y el pool de procesos
+    de la carga masiva (el pool aplica el timeout).
+
+    Returns:
+        (texto, None) o (None, mensaje_de_error)
+    """
     try:
         import fitz  # PyMuPDF
     except ImportError:
-        result['parse_error'] = 'PyMuPDF (fitz) no está instalado'
+        return None, 'PyMuPDF (fitz) no está instalado'
+
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            if doc.page_count == 0:
+                return None, 'El PDF no tiene páginas'
+            return doc[0].get_text(), None
+        finally:
+            doc.close()
+    except Exception as e:
+        return None, f'Error al procesar PDF: {str(e)[:200]}'
+
+
+def parse_conocer_text(text: Optional[str]) -> Dict[str, Any]:
+    """
+    Extrae los campos del certificado a partir del texto de la página 1.
+    Ver parse_conocer_pdf para el formato esperado.
+    """
+    result = empty_parse_result()
+
+    if not text or len(text.strip()) < 50:
+        result['parse_error'] = 'El PDF no contiene texto extraíble'
         return result
-    
+
     try:
-        # Usar thread con timeout para evitar cuelgues en PDFs problemáticos
-        text_holder = {}
-        error_holder = {}
-        
-        def _extract():
-            try:
-                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-                if doc.page_count == 0:
-                    error_holder['msg'] = 'El PDF no tiene páginas'
-                    doc.close()
-                    return
-                text_holder['text'] = doc[0].get_text()
-                doc.close()
-            except Exception as e:
-                error_holder['msg'] = f'Error al procesar PDF: {str(e)[:200]}'
-        
-        t = threading.Thread(target=_extract, daemon=True)
-        t.start()
-        t.join(timeout=PDF_PARSE_TIMEOUT)
-        
-        if t.is_alive():
-            result['parse_error'] = f'Timeout al extraer texto del PDF ({PDF_PARSE_TIMEOUT}s)'
-            return result
-        
-        if 'msg' in error_holder:
-            result['parse_error'] = error_holder['msg']
-            return result
-        
-        text = text_holder.get('text', '')
-        
-        if not text or len(text.strip()) < 50:
-            result['parse_error'] = 'El PDF no contiene texto extraíble'
-            return result
-        
         # === CURP ===
         # Patrón: 18 caracteres alfanuméricos después de "Registro de Población:"
         curp_match = re.search(
@@ -104,7 +85,7 @@ def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
             curp_fallback = re.search(r'\b([A-Z]{4}\d{6}[HM][A-Z]{5}[A-Z0-9]\d)\b', text)
             if curp_fallback:
                 result['curp'] = curp_fallback.group(1).upper()
-        
+    
         # === ECM Code ===
         # Patrón: "con clave: EC(M)####" - CONOCER oficial usa EC####, BD usa ECM####
         ecm_match = re.search(r'(?:con clave|clave)\s*:?\s*(ECM?\d{4})', text, re.IGNORECASE)
@@ -115,7 +96,7 @@ def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
             ecm_fallback = re.search(r'\b(ECM?\d{4})\b', text)
             if ecm_fallback:
                 result['ecm_code'] = _normalize_ecm_code(ecm_fallback.group(1))
-        
+    
         # === Folio CONOCER ===
         # Patrón: "D-" seguido de 10 dígitos
         folio_match = re.search(r'(D-\d{10})', text)
@@ -126,7 +107,7 @@ def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
             folio_fallback = re.search(r'(D-\d{7,})', text)
             if folio_fallback:
                 result['folio'] = folio_fallback.group(1)
-        
+    
         # === Nombre ===
         # Patrón: texto después de "Hace constar que" (suele estar en la siguiente línea)
         name_match = re.search(
@@ -141,7 +122,7 @@ def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
             name = re.sub(r'[^A-ZÁÉÍÓÚÑa-záéíóúñ\s]+$', '', name)
             if len(name) >= 3:
                 result['name'] = name.strip()
-        
+    
         # === ECM Name (nombre del estándar) ===
         # Patrón: texto después de "competente en" 
         ecm_name_match = re.search(
@@ -153,7 +134,7 @@ def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
             ecm_name = ecm_name_match.group(1).strip()
             if len(ecm_name) >= 2:
                 result['ecm_name'] = ecm_name
-        
+    
         # === Fecha de emisión ===
         # Patrón: "a {día} de {mes} de {año}"
         date_match = re.search(
@@ -166,7 +147,7 @@ def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
             month_text = date_match.group(2).lower()
             year = date_match.group(3)
             result['issue_date'] = f"{day} de {month_text} de {year}"
-        
+    
         # === Entidad certificadora ===
         # Patrón: texto después de "evaluado por" o "evaluada por"
         entity_match = re.search(
@@ -178,11 +159,57 @@ def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
             entity = entity_match.group(1).strip()
             if len(entity) >= 3:
                 result['certifying_entity'] = entity
+
+    except Exception as e:
+        result['parse_error'] = f'Error al procesar PDF: {str(e)[:200]}'
+
+    return result
+
+
+def parse_conocer_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
+    """
+    Parsear un PDF de certificado CONOCER y extraer datos clave.
+    
+    El formato oficial CONOCER contiene texto estructurado con:
+    - Nombre del certificado después de "Hace constar que"
+    - CURP después de "Clave Única de Registro de Población:"
+    - Código ECM en "con clave: ECM####"
+    - Folio con formato "D-XXXXXXXXXX"
+    - Fecha de emisión "a {día} de {mes} de {año}"
+    - Entidad certificadora después de "evaluado por"
+    
+    Args:
+        pdf_bytes: Contenido del PDF en bytes
+        
+    Returns:
+        Dict con campos extraídos. Los campos no encontrados son None.
+        Siempre incluye 'parse_error' (None si no hubo error).
+    """
+    result = empty_parse_result()
+    
+    try:
+        # Usar thread con timeout para evitar cuelgues en PDFs problemáticos
+        holder = {}
         
+        def _extract():
+            holder['text'], holder['error'] = extract_first_page_text(pdf_bytes)
+        
+        t = threading.Thread(target=_extract, daemon=True)
+        t.start()
+        t.join(timeout=PDF_PARSE_TIMEOUT)
+        
+        if t.is_alive():
+            result['parse_error'] = f'Timeout al extraer texto del PDF ({PDF_PARSE_TIMEOUT}s)'
+            return result
+        
+        if holder.get('error'):
+            result['parse_error'] = holder['error']
+            return result
     except Exception as e:
         result['parse_error'] = f'Error al procesar PDF: {str(e)[:200]}'
+        return result
     
-    return result
+    return parse_conocer_text(holder.get('text'))
 
 
 def parse_issue_date(date_text: str):
@@ -0,0 +1,148 @@
+"""
+Pool de procesos para generar credenciales en la carga masiva de candidatos.
+
+Cada contraseña requiere un hash Argon2 (`ph` de app.models.user: 64 MiB,
+time_cost=3) y una copia Fernet reversible. En serie son ~100 ms por fila,
+minutos para cargas de decenas de miles, así que se reparten en procesos:
+
+- Tareas de `HASH_TASK_SIZE` contraseñas para amortizar el IPC.
+- Concurrencia acotada: a lo más workers*2 tareas en vuelo, así la memoria
+  de Argon2 queda en ~workers * memory_cost sin importar el tamaño del
+  archivo, y el consumidor (inserts por lote) marca el ritmo.
+- Resultados en el mismo orden de entrada: el i-ésimo par corresponde a la
+  i-ésima contraseña.
+- Sin pool (1 worker o el pool no arrancó) se calcula en el mismo proceso.
+
+Los workers heredan SECRET_KEY del entorno, de la que sale la clave Fernet
+(ver `_get_encryption_key`).
+
+Configuración por entorno:
+  BULK_HASH_WORKERS  número de procesos (default: núcleos, máx 4;
+                     1 = en el mismo proceso, sin pool)
+"""
+import multiprocessing
+import os
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+MAX_HASH_WORKERS = 4
+HASH_TASK_SIZE = 25
+MAX_TASKS_PER_CHILD = 200
+POOL_STARTUP_TIMEOUT = 120  # segundos para que arranque el pool (spawn + imports)
+
+Credential = Tuple[str, str]  # (password_hash, encrypted_password)
+
+
+def get_hash_workers() -> int:
+    """Número de procesos del pool según entorno y núcleos disponibles."""
+    env = os.getenv('BULK_HASH_WORKERS')
+    if env:
+        try:
+            return max(1, int(env))
+        except ValueError:
+            pass
+    return max(1, min(os.cpu_count() or 1, MAX_HASH_WORKERS))
+
+
+def hash_credentials(passwords: List[str]) -> List[Credential]:
+    """
+    Tarea del worker: hash Argon2 + copia encriptada de cada contraseña.
+    Mismo resultado que `User.set_password`.
+    """
+    from app.models.user import encrypt_password, ph
+
+    result = []
+    for password in passwords:
+        encrypted = encrypt_password(password)
+        if not encrypted:
+            raise ValueError('No se pudo encriptar la contraseña. Verifica SECRET_KEY.')
+        result.append((ph.hash(password), encrypted))
+    return result
+
+
+def _chunks(passwords: Iterable[str]) -> Iterator[List[str]]:
+    chunk = []
+    for password in passwords:
+        chunk.append(password)
+        if len(chunk) >= HASH_TASK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_inline(chunks: Iterator[List[str]]) -> Iterator[Credential]:
+    for chunk in chunks:
+        yield from hash_credentials(chunk)
+
+
+def _init_worker():
+    """Precarga argon2/cryptography al arrancar el worker."""
+    try:
+        from app.models.user import ph  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _new_pool(workers: int):
+    ctx = multiprocessing.get_context('spawn')
+    pool = ctx.Pool(processes=workers, initializer=_init_worker,
+                    maxtasksperchild=MAX_TASKS_PER_CHILD)
+    try:
+        pool.apply_async(_worker_ready).get(timeout=POOL_STARTUP_TIMEOUT)
+    except Exception:
+        _shutdown_pool(pool)
+        raise
+    return pool
+
+
+def _shutdown_pool(pool):
+    try:
+        pool.terminate()
+        pool.join()
+    except Exception:
+        pass
+
+
+def iter_hashed_credentials(passwords: Iterable[str],
+                            workers: Optional[int] = None) -> Iterator[Credential]:
+    """
+    Produce (password_hash, encrypted_password) por cada contraseña, en el
+    mismo orden de `passwords`. Un error en un worker se propaga al consumidor.
+
+    Args:
+        workers: procesos del pool; None = get_hash_workers().
+    """
+    workers = workers or get_hash_workers()
+    chunks = _chunks(passwords)
+    if workers <= 1:
+        yield from _iter_inline(chunks)
+        return
+
+    try:
+        pool = _new_pool(workers)
+    except Exception as e:
+        print(f"[BULK-HASH] No se pudo crear el pool ({e}); hash en proceso")
+        yield from _iter_inline(chunks)
+        return
+
+    window = workers * 2
+    pending = deque()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending.append(pool.apply_async(hash_credentials, (chunk,)))
+            if not pending:
+                break
+            yield from pending.popleft().get()
+    finally:
+        _shutdown_pool(pool)
@@ -0,0 +1,97 @@
+"""
+Pre-screen de CURPs antes de consultar RENAPO.
+
+Etapa común para la validación en lote, la carga masiva y el worker de la
+cola: decide, sin red, todo lo que se puede decidir localmente y deja
+solo las CURPs realmente desconocidas para RENAPO (que consumen
+presupuesto del bucket global y una página del pool Playwright).
+
+  1. Vacías y genéricas de extranjero.
+  2. Formato, entidad federativa y dígito verificador
+     (renapo_service.validate_curp_format). Son reglas deterministas: no
+     se cachean, recalcularlas es más barato que leerlas.
+  3. Entradas frescas de `curp_renapo_cache` — positivas (30 días) y
+     negativas definitivas ("no encontrada", CURP_NEGATIVE_CACHE_HOURS) —
+     en una query IN por cada 1000 CURPs.
+
+Uso:
+    screen = prescreen_curps(curps)
+    for curp in screen.unknown:        # únicas, en orden de aparición
+        ...consultar RENAPO...
+    screen.get(curp)                   # RenapoValidationResult o None
+"""
+import logging
+from typing import Iterable, Optional
+
+from app.services.renapo_service import (
+    RenapoValidationResult,
+    _read_curp_cache_many,
+    is_generic_foreign_curp,
+    validate_curp_format,
+)
+
+logger = logging.getLogger(__name__)
+
+SOURCE_LOCAL = 'local'
+SOURCE_CACHE = 'cache'
+
+
+class CurpPrescreen:
+    """Resultado del pre-screen de un lote de CURPs (normalizadas)."""
+
+    def __init__(self):
+        self.resolved = {}   # curp -> RenapoValidationResult
+        self.sources = {}    # curp -> SOURCE_LOCAL | SOURCE_CACHE
+        self.unknown = []    # CURPs que sí requieren RENAPO
+
+    def get(self, curp: str) -> Optional[RenapoValidationResult]:
+        return self.resolved.get((curp or '').upper().strip())
+
+    def needs_renapo(self, curp: str) -> bool:
+        return (curp or '').upper().strip() not in self.resolved
+
+    def stats(self) -> dict:
+        local = sum(1 for s in self.sources.values() if s == SOURCE_LOCAL)
+        return {
+            'local': local,
+            'cache': len(self.sources) - local,
+            'unknown': len(self.unknown),
+        }
+
+
+def prescreen_curps(curps: Iterable[str], use_cache: bool = True) -> CurpPrescreen:
+    """Resuelve localmente todo lo posible de `curps` (duplicados se
+    evalúan una sola vez). Con `use_cache=False` solo aplica las reglas
+    locales."""
+    screen = CurpPrescreen()
+    candidates = []
+    seen = set()
+    for raw in curps:
+        curp = (raw or '').upper().strip()
+        if curp in seen:
+            continue
+        seen.add(curp)
+        if not curp:
+            result = RenapoValidationResult(curp='', valid=False, error='CURP vacía')
+        elif is_generic_foreign_curp(curp):
+            result = RenapoValidationResult(curp=curp, valid=True, error='CURP genérico extranjero')
+        else:
+            fmt_ok, fmt_err = validate_curp_format(curp)
+            if fmt_ok:
+                candidates.append(curp)
+                continue
+            result = RenapoValidationResult(curp=curp, valid=False, error=fmt_err)
+        screen.resolved[curp] = result
+        screen.sources[curp] = SOURCE_LOCAL
+
+    cached = _read_curp_cache_many(candidates) if (use_cache and candidates) else {}
+    for curp in candidates:
+        if curp in cached:
+            screen.resolved[curp] = cached[curp]
+            screen.sources[curp] = SOURCE_CACHE
+        else:
+            screen.unknown.append(curp)
+
+    if screen.resolved:
+        logger.debug(f"[CURP-PRESCREEN] {screen.stats()}")
+    return screen
@@ -2,11 +2,19 @@
 Worker que procesa la cola `curp_verification_queue`.
 
 Diseño:
-- Corre como background thread arrancado al inicializar la app.
+- Corre como background thread arrancado al inicializar la app (uno por
+  proceso; puede haber varias réplicas).
 - Cada N segundos consulta la cola por filas con status='pending'
-  y next_retry_at <= now(), las "claima" con UPDATE atómico
-  (locked_at, locked_by) para evitar que dos workers tomen la misma fila.
-- Por cada fila intenta validar contra RENAPO (con cache).
+  y next_retry_at <= now(), las "claima" con un lease (locked_at,
+  locked_by) estilo SKIP LOCKED para que dos réplicas nunca tomen la
+  misma fila ni se bloqueen entre sí. Si el batch sale lleno no espera.
+- Por cada fila intenta validar contra RENAPO (cache primero). Cada
+  consulta real toma un token del bucket global en Redis
+  (renapo_rate_budget): la tasa total contra gob.mx es la misma sin
+  importar cuántas réplicas haya.
+- La concurrencia por proceso se ajusta con la latencia de RENAPO
+  (AdaptiveConcurrency): sube si responde rápido, baja a la mitad si
+  está lento o con circuito abierto.
 - Política frente al circuit breaker:
     * Si está abierto (RENAPO caído): incrementa circuit_open_retries,
       reagenda next_retry_at = now + 12h, NO escala a curp_required.
@@ -67,15 +75,62 @@ def start_curp_worker(app):
     logger.info(f"[CURP-WORKER] Arrancado worker {worker_id}")
 
 
+# Configuración del worker (por entorno). El ritmo contra RENAPO lo pone el
+# token bucket global (renapo_rate_budget), no un sleep por réplica.
+POLL_INTERVAL_SECONDS = int(os.getenv('CURP_WORKER_POLL_SECONDS', '60'))
+BATCH_SIZE = int(os.getenv('CURP_WORKER_BATCH_SIZE', '4'))
+MIN_CONCURRENCY = max(1, int(os.getenv('CURP_WORKER_MIN_CONCURRENCY', '1')))
+MAX_CONCURRENCY = max(MIN_CONCURRENCY, int(os.getenv('CURP_WORKER_MAX_CONCURRENCY', '3')))
+SLOW_SITE_PAUSE_SECONDS = 600        # 10 min de pausa si RENAPO va lento a concurrencia mínima
+STALE_LOCK_SWEEP_SECONDS = 300       # liberar locks zombi cada 5 min
+DAILY_RETRY_INTERVAL_SECONDS = 24 * 3600  # cron diario re-encolado + giveup
+LEASE_MINUTES = 10                   # una fila 'processing' con lock más viejo se puede re-claimar
+
+
+class AdaptiveConcurrency:
+    """Concurrencia del worker con AIMD sobre la latencia de RENAPO.
+
+    - RENAPO lento (is_renapo_slow) o circuito abierto → se reduce a la mitad.
+    - Un batch completo con mediana de latencia < la mitad del umbral de
+      lentitud → +1, hasta `maximum`.
+    La tasa total sigue acotada por el token bucket; esto solo decide
+    cuántas consultas lentas puede tener en vuelo este proceso.
+    """
+
+    def __init__(self, minimum: int = None, maximum: int = None):
+        self.minimum = minimum or MIN_CONCURRENCY
+        self.maximum = max(self.minimum, maximum or MAX_CONCURRENCY)
+        self.limit = self.minimum
+        self._lock = threading.Lock()
+
+    def adjust(self, slow: bool, circuit_open: bool = False, latency: float = None,
+               fast_threshold: float = None) -> int:
+        with self._lock:
+            if slow or circuit_open:
+                self.limit = max(self.minimum, self.limit // 2)
+            elif latency is not None and fast_threshold and latency < fast_threshold:
+                self.limit = min(self.maximum, self.limit + 1)
+            return self.limit
+
+    def observe_renapo(self) -> int:
+        """Ajusta con el estado actual de renapo_service."""
+        from app.services import renapo_service as rs
+        return self.adjust(
+            slow=rs.is_renapo_slow(),
+            circuit_open=rs.is_renapo_circuit_open(),
+            latency=rs.recent_renapo_latency(),
+            fast_threshold=rs._LATENCY_SLOW_THRESHOLD / 2,
+        )
+
+
+# Estado del worker de este proceso (para /curp-queue/metrics)
+_controller = None
+
+
 def _run_loop(app, worker_id: str):
     """Loop principal del worker."""
-    # Pacing gentil para no saturar gob.mx/curp (sitio sensible a carga).
-    POLL_INTERVAL_SECONDS = 60           # antes 30
-    BATCH_SIZE = 2                       # antes 5
-    INTER_QUERY_SLEEP = 5.0              # antes 1.5 — más respiro entre CURPs
-    SLOW_SITE_PAUSE_SECONDS = 600        # 10 min de pausa si RENAPO va lento
-    STALE_LOCK_SWEEP_SECONDS = 300       # liberar locks zombi cada 5 min
-    DAILY_RETRY_INTERVAL_SECONDS = 24 * 3600  # cron diario re-encolado + giveup
+    global _controller
+    controller = _controller = AdaptiveConcurrency()
 
     # Esperar 15s al arrancar para no competir con migraciones/startup
     time.sleep(15)
@@ -103,6 +158,7 @@ def _run_loop(app, worker_id: str):
     last_daily_retry = time.time()  # ya hicimos backfill, próxima en 24h
 
     while True:
+        claimed = []
         try:
             # Sweep periódico de stale locks (5 min)
             if time.time() - last_stale_sweep >= STALE_LOCK_SWEEP_SECONDS:
@@ -126,90 +182,182 @@ def _run_loop(app, worker_id: str):
                     logger.error(f"[CURP-WORKER] daily cron error: {cron_err}")
                 last_daily_retry = time.time()
 
+            # Concurrencia adaptativa: si RENAPO viene lento se baja a la
+            # mitad; ya en el mínimo y aún lento, pausa (evita death-spiral).
+            try:
+                from app.services.renapo_service import is_renapo_slow
+                concurrency = controller.observe_renapo()
+                if is_renapo_slow() and concurrency <= controller.minimum:
+                    logger.warning(
+                        f"[CURP-WORKER] RENAPO lento detectado, pausa {SLOW_SITE_PAUSE_SECONDS}s"
+                    )
+                    time.sleep(SLOW_SITE_PAUSE_SECONDS)
+                    continue
+            except Exception as _slow_err:
+                logger.debug(f"[CURP-WORKER] slow-check falló: {_slow_err}")
+
             with app.app_context():
-                # Pausa adaptativa: si RENAPO viene respondiendo lento,
-                # esperar antes de tomar más carga (evita death-spiral).
+                claimed = _claim_pending_rows(worker_id, max(BATCH_SIZE, controller.limit))
+            if claimed:
+                logger.info(
+                    f"[CURP-WORKER] {worker_id} procesando {len(claimed)} filas "
+                    f"(concurrencia {controller.limit})"
+                )
+                process_claimed_rows(app, claimed, worker_id, controller.limit)
+                # Verificar si terminaron batches y mandar emails
                 try:
-                    from app.services.renapo_service import is_renapo_slow
-                    if is_renapo_slow():
-                        logger.warning(
-                            f"[CURP-WORKER] RENAPO lento detectado, pausa {SLOW_SITE_PAUSE_SECONDS}s"
-                        )
-                        time.sleep(SLOW_SITE_PAUSE_SECONDS)
-                        continue
-                except Exception as _slow_err:
-                    logger.debug(f"[CURP-WORKER] slow-check falló: {_slow_err}")
-
-                claimed = _claim_pending_rows(worker_id, BATCH_SIZE)
-                if claimed:
-                    logger.info(f"[CURP-WORKER] {worker_id} procesando {len(claimed)} filas")
-                    for q_id in claimed:
-                        try:
-                            _process_queue_row(q_id, worker_id)
-                        except Exception as row_err:
-                            logger.error(f"[CURP-WORKER] error procesando fila {q_id}: {row_err}")
-                            _release_row_with_error(q_id, str(row_err))
-                        time.sleep(INTER_QUERY_SLEEP)
-                    # Verificar si terminaron batches y mandar emails
-                    try:
+                    with app.app_context():
                         _notify_completed_batches(worker_id)
-                    except Exception as notif_err:
-                        logger.error(f"[CURP-WORKER] error notificando batches: {notif_err}")
+                except Exception as notif_err:
+                    logger.error(f"[CURP-WORKER] error notificando batches: {notif_err}")
         except Exception as e:
             logger.error(f"[CURP-WORKER] loop error: {e}")
 
-        time.sleep(POLL_INTERVAL_SECONDS)
+        # Si el batch salió lleno hay más trabajo listo: seguir sin esperar
+        # (el token bucket pone el ritmo). Si no, poll normal.
+        if len(claimed) < max(BATCH_SIZE, controller.limit):
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def _process_one(app, q_id, worker_id: str, screen=None):
+    with app.app_context():
+        try:
+            _process_queue_row(q_id, worker_id, screen)
+        except Exception as row_err:
+            logger.error(f"[CURP-WORKER] error procesando fila {q_id}: {row_err}")
+            try:
+                from app import db
+                db.session.rollback()
+            except Exception:
+                pass
+            _release_row_with_error(q_id, str(row_err))
+
+
+def process_claimed_rows(app, q_ids, worker_id: str, concurrency: int = 1):
+    """Procesa filas ya reclamadas con hasta `concurrency` threads.
+    Cada thread abre su propio app context (sesión de BD propia).
+
+    Antes de despachar, el pre-screen del lote (curp_prescreen) resuelve en
+    una query las CURPs ya cacheadas. Si una CURP desconocida se repite en
+    el lote, solo su primera fila va a RENAPO; las demás se procesan
+    después y la toman del cache recién escrito."""
+    screen, first, repeated = _prescreen_claimed(app, q_ids)
+    _dispatch_rows(app, first, worker_id, concurrency, screen)
+    _dispatch_rows(app, repeated, worker_id, concurrency, None)
+
+
+def _dispatch_rows(app, q_ids, worker_id: str, concurrency: int, screen):
+    if concurrency <= 1 or len(q_ids) <= 1:
+        for q_id in q_ids:
+            _process_one(app, q_id, worker_id, screen)
+        return
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(q_ids)),
+                            thread_name_prefix=f'curp-row-{worker_id}') as pool:
+        list(pool.map(lambda q_id: _process_one(app, q_id, worker_id, screen), q_ids))
+
+
+def _prescreen_claimed(app, q_ids):
+    """Pre-screen de las CURPs de las filas reclamadas.
+    Retorna (screen, primeras, repetidas); screen=None si falló (cada fila
+    consulta el cache por su cuenta, como antes)."""
+    if not q_ids:
+        return None, [], []
+    with app.app_context():
+        try:
+            from app import db
+            from app.models.curp_verification import CurpVerificationQueue
+            from app.services.curp_prescreen import prescreen_curps
+            curps = dict(db.session.query(CurpVerificationQueue.id, CurpVerificationQueue.curp).filter(
+                CurpVerificationQueue.id.in_(q_ids)
+            ).all())
+            screen = prescreen_curps(curps.values())
+        except Exception as e:
+            logger.warning(f"[CURP-WORKER] pre-screen falló, se consulta fila por fila: {e}")
+            return None, list(q_ids), []
+    first, repeated, seen = [], [], set()
+    for q_id in q_ids:
+        curp = (curps.get(q_id) or '').upper().strip()
+        if screen.needs_renapo(curp) and curp in seen:
+            repeated.append(q_id)
+        else:
+            seen.add(curp)
+            first.append(q_id)
+    return screen, first, repeated
 
 
 def _claim_pending_rows(worker_id: str, limit: int):
-    """Reclama (UPDATE atómico) hasta `limit` filas listas para procesar.
-    Retorna la lista de IDs reclamadas."""
+    """Reclama hasta `limit` filas listas para procesar con un lease
+    (status='processing', locked_at, locked_by). Retorna los IDs reclamados.
+
+    MSSQL: un solo UPDATE sobre un CTE con UPDLOCK/READPAST (equivalente a
+    SKIP LOCKED): réplicas concurrentes se saltan las filas que otra está
+    reclamando en vez de esperar o tomar las mismas.
+    PostgreSQL: FOR UPDATE SKIP LOCKED. Otros (SQLite): UPDATE condicional
+    por lote y lectura del lease.
+    """
     from app import db
     from sqlalchemy import text
+    now = datetime.utcnow()
+    params = {
+        'lim': int(limit), 'now': now, 'wid': worker_id[:80],
+        'stale': now - timedelta(minutes=LEASE_MINUTES),
+    }
+    ready = """
+        status = 'pending'
+        AND (locked_at IS NULL OR locked_at < :stale)
+        AND next_retry_at <= :now
+    """
     try:
-        # MSSQL: usar OUTPUT inserted.id; PostgreSQL/SQLite: subquery.
-        # Para máxima compatibilidad usamos approach de dos pasos protegido por
-        # WHERE locked_at IS NULL AND status='pending' AND next_retry_at <= now.
-        now = datetime.utcnow()
-        # Paso 1: identificar candidatas
-        candidate_ids = db.session.execute(
-            text("""
-                SELECT TOP (:lim) id FROM curp_verification_queue
-                WHERE status = 'pending'
-                  AND (locked_at IS NULL OR locked_at < :stale)
-                  AND next_retry_at <= :now
-                ORDER BY next_retry_at ASC
-            """) if _is_mssql() else text("""
+        dialect = db.engine.dialect.name
+        if dialect == 'mssql':
+            rows = db.session.execute(text(f"""
+                WITH claim AS (
+                    SELECT TOP (:lim) id, status, locked_at, locked_by
+                    FROM curp_verification_queue WITH (UPDLOCK, READPAST, ROWLOCK)
+                    WHERE {ready}
+                    ORDER BY next_retry_at ASC
+                )
+                UPDATE claim
+                   SET status = 'processing', locked_at = :now, locked_by = :wid
+                OUTPUT inserted.id
+            """), params).fetchall()
+            claimed = [r[0] for r in rows]
+        elif dialect == 'postgresql':
+            rows = db.session.execute(text(f"""
+                UPDATE curp_verification_queue
+                   SET status = 'processing', locked_at = :now, locked_by = :wid
+                 WHERE id IN (
+                    SELECT id FROM curp_verification_queue
+                    WHERE {ready}
+                    ORDER BY next_retry_at ASC
+                    LIMIT :lim
+                    FOR UPDATE SKIP LOCKED
+                 )
+                RETURNING id
+            """), params).fetchall()
+            claimed = [r[0] for r in rows]
+        else:
+            ids = [r[0] for r in db.session.execute(text(f"""
                 SELECT id FROM curp_verification_queue
-                WHERE status = 'pending'
-                  AND (locked_at IS NULL OR locked_at < :stale)
-                  AND next_retry_at <= :now
+                WHERE {ready}
                 ORDER BY next_retry_at ASC
                 LIMIT :lim
-            """),
-            {'lim': limit, 'now': now, 'stale': now - timedelta(minutes=10)}
-        ).fetchall()
-        ids = [row[0] for row in candidate_ids]
-        if not ids:
-            return []
-
-        # Paso 2: claim atómico (solo las que sigan libres)
-        claimed = []
-        for q_id in ids:
-            res = db.session.execute(
-                text("""
-                    UPDATE curp_verification_queue
-                       SET locked_at = :now,
-                           locked_by = :wid,
-                           status = 'processing'
-                     WHERE id = :id
-                       AND status = 'pending'
-                       AND (locked_at IS NULL OR locked_at < :stale)
-                """),
-                {'now': now, 'wid': worker_id[:80], 'id': q_id, 'stale': now - timedelta(minutes=10)}
-            )
-            if res.rowcount == 1:
-                claimed.append(q_id)
+            """), params).fetchall()]
+            if not ids:
+                return []
+            id_params = {f'id{i}': q_id for i, q_id in enumerate(ids)}
+            in_clause = ', '.join(f':{k}' for k in id_params)
+            db.session.execute(text(f"""
+                UPDATE curp_verification_queue
+                   SET status = 'processing', locked_at = :now, locked_by = :wid
+                 WHERE id IN ({in_clause}) AND {ready}
+            """), {**params, **id_params})
+            claimed = [r[0] for r in db.session.execute(text(f"""
+                SELECT id FROM curp_verification_queue
+                WHERE id IN ({in_clause}) AND status = 'processing'
+                  AND locked_by = :wid AND locked_at = :now
+            """), {**params, **id_params}).fetchall()]
         db.session.commit()
         return claimed
     except Exception as e:
@@ -252,14 +400,6 @@ def _release_stale_locks():
             pass
 
 
-def _is_mssql():
-    from app import db
-    try:
-        return 'mssql' in str(db.engine.url).lower() or 'pymssql' in str(db.engine.url).lower()
-    except Exception:
-        return False
-
-
 def _release_row_with_error(q_id, err_msg):
     from app import db
     from app.models.curp_verification import CurpVerificationQueue, QUEUE_PENDING
@@ -279,8 +419,9 @@ def _release_row_with_error(q_id, err_msg):
             pass
 
 
-def _process_queue_row(q_id, worker_id: str):
-    """Procesa una fila reclamada de la cola."""
+def _process_queue_row(q_id, worker_id: str, screen=None):
+    """Procesa una fila reclamada de la cola. `screen` es el pre-screen del
+    lote (curp_prescreen.CurpPrescreen); sin él se consulta el cache aquí."""
     from app import db
     from app.models.curp_verification import (
         CurpVerificationQueue, QUEUE_DONE, QUEUE_REJECTED, QUEUE_FAILED, QUEUE_PENDING
@@ -288,7 +429,7 @@ def _process_queue_row(q_id, worker_id: str):
     from app.models.user import User
     from app.models.partner import GroupMember, BulkUploadMember
     from app.services.renapo_service import (
-        validate_curp_renapo, apply_renapo_to_user, validate_curp_format,
+        validate_curp_renapo, validate_curp_format,
         is_renapo_circuit_open, is_generic_foreign_curp,
     )
 
@@ -352,6 +493,25 @@ def _process_queue_row(q_id, worker_id: str):
         db.session.commit()
         return
 
+    # Pre-screen / cache primero (positivos 30d, negativos definitivos
+    # CURP_NEGATIVE_CACHE_HOURS): un hit no consume presupuesto ni depende
+    # de que RENAPO esté arriba.
+    if screen is not None:
+        cached = screen.get(row.curp)
+    else:
+        cached = validate_curp_renapo(row.curp, use_cache=True, cache_only=True)
+        if cached.error == 'cache_miss':
+            cached = None
+    # Un negativo cacheado solo cuenta como la primera ronda: el TTL negativo
+    # (24 h) supera todo el horizonte de reintentos (~7.75 h), así que los
+    # reintentos deben ir a RENAPO o una sola respuesta agotaría las
+    # MAX_RENAPO_ATTEMPTS_BEFORE_DELEGATE rondas reales.
+    if cached is not None and not cached.valid and (row.attempts or 0) > 0:
+        cached = None
+    if cached is not None:
+        _apply_renapo_result(row, user, cached)
+        return
+
     # Si circuit breaker abierto: NO consultar, reagendar 12h
     if is_renapo_circuit_open():
         row.circuit_open_retries = (row.circuit_open_retries or 0) + 1
@@ -367,15 +527,43 @@ def _process_queue_row(q_id, worker_id: str):
                     f"{row.next_retry_at.isoformat()} (intento circuit #{row.circuit_open_retries})")
         return
 
-    # Consultar RENAPO (con cache). El servicio cachea positivos 30d, negativos 1h.
-    # Envolvemos en sub-thread con timeout duro para evitar que un Playwright
-    # colgado bloquee al worker completo (cubre el caso visto en DEV donde
-    # 5 filas quedaron en 'processing' >13h sin avance).
+    # CURP desconocida: toma token del bucket global y consulta RENAPO.
+    from app.services.renapo_rate_budget import get_renapo_bucket
+    if not get_renapo_bucket().acquire():
+        # Sin presupuesto (otras réplicas lo están usando): devolver la
+        # fila sin consumir intento; el siguiente poll la retoma.
+        row.next_retry_at = datetime.utcnow()
+        row.status = QUEUE_PENDING
+        row.locked_at = None
+        row.locked_by = None
+        db.session.commit()
+        return
+    result = _query_renapo_with_timeout(row, q_id, validate_curp_renapo)
+    if result is None:
+        return
+
+    _apply_renapo_result(row, user, result)
+
+
+def _query_renapo_with_timeout(row, q_id, validate_curp_renapo):
+    """Consulta RENAPO (sin cache) en un sub-thread con timeout duro.
+
+    Evita que un Playwright colgado bloquee al worker completo (cubre el
+    caso visto en DEV donde 5 filas quedaron en 'processing' >13h sin
+    avance). Retorna None si hubo timeout (la fila ya quedó liberada).
+    """
+    from flask import current_app
+    from app import db
+    from app.models.curp_verification import QUEUE_PENDING
     _renapo_holder = {'result': None, 'err': None}
+    curp = row.curp
+    app = current_app._get_current_object()
 
     def _run_renapo():
         try:
-            _renapo_holder['result'] = validate_curp_renapo(row.curp, use_cache=True)
+            # App context propio para que el servicio pueda escribir el cache
+            with app.app_context():
+                _renapo_holder['result'] = validate_curp_renapo(curp, use_cache=False)
         except Exception as _e:
             _renapo_holder['err'] = _e
 
@@ -392,10 +580,20 @@ def _process_queue_row(q_id, worker_id: str):
         row.locked_at = None
         row.locked_by = None
         db.session.commit()
-        return
+        return None
     if _renapo_holder['err']:
         raise _renapo_holder['err']
-    result = _renapo_holder['result']
+    return _renapo_holder['result']
+
+
+def _apply_renapo_result(row, user, result):
+    """Aplica la respuesta de RENAPO (o del cache) a la fila y al usuario."""
+    from app import db
+    from app.models.curp_verification import (
+        CurpVerificationQueue, QUEUE_DONE, QUEUE_REJECTED, QUEUE_PENDING
+    )
+    from app.models.partner import GroupMember, BulkUploadMember
+    from app.services.renapo_service import apply_renapo_to_user
 
     # Distinguir "circuit-open" devuelto por el servicio (NO consume reintento)
     if (result.error or '').lower().startswith('servicio renapo temporalmente no disponible'):
@@ -888,3 +1086,69 @@ def _mark_giveup_expired_users() -> int:
         except Exception:
             pass
         return 0
+
+
+# ---------------------------------------------------------------------------
+# Métricas de la cola (GET /api/user-management/curp-queue/metrics)
+# ---------------------------------------------------------------------------
+
+def get_queue_metrics() -> dict:
+    """Profundidad de la cola, throughput reciente, ETA y presupuesto RENAPO."""
+    from app import db
+    from app.models.curp_verification import (
+        CurpVerificationQueue, QUEUE_PENDING, QUEUE_PROCESSING,
+        QUEUE_DONE, QUEUE_REJECTED, QUEUE_FAILED,
+    )
+    from app.services.renapo_rate_budget import get_renapo_bucket
+    from sqlalchemy import func, case
+
+    now = datetime.utcnow()
+    Q = CurpVerificationQueue
+    finished = Q.status.in_([QUEUE_DONE, QUEUE_REJECTED, QUEUE_FAILED])
+    depth = db.session.query(
+        func.sum(case(((Q.status == QUEUE_PENDING) & (Q.next_retry_at <= now), 1), else_=0)),
+        func.sum(case(((Q.status == QUEUE_PENDING) & (Q.next_retry_at > now), 1), else_=0)),
+        func.sum(case((Q.status == QUEUE_PROCESSING, 1), else_=0)),
+        func.sum(case((finished & (Q.finished_at >= now - timedelta(minutes=15)), 1), else_=0)),
+        func.sum(case((finished & (Q.finished_at >= now - timedelta(hours=1)), 1), else_=0)),
+    ).filter(
+        (Q.status.in_([QUEUE_PENDING, QUEUE_PROCESSING])) | (Q.finished_at >= now - timedelta(hours=1))
+    ).one()
+    ready, scheduled, processing, last_15m, last_hour = (int(v or 0) for v in depth)
+
+    workers = [w[0] for w in db.session.query(Q.locked_by).filter(
+        Q.status == QUEUE_PROCESSING,
+        Q.locked_by.isnot(None),
+        Q.locked_at >= now - timedelta(minutes=LEASE_MINUTES),
+    ).distinct().all()]
+
+    bucket = get_renapo_bucket()
+    budget = bucket.state()
+    per_minute = last_15m / 15.0
+    # ETA al ritmo observado; sin historial reciente, al ritmo del presupuesto
+    # global (los hits de cache no consumen tokens, así que es una cota alta).
+    rate = per_minute or bucket.rate_per_minute
+    backlog = ready + processing
+    eta_seconds = int(backlog / rate * 60) if backlog and rate else 0
+
+    return {
+        'server_time': now.isoformat(),
+        'depth': {
+            'ready': ready,
+            'scheduled': scheduled,
+            'processing': processing,
+        },
+        'throughput': {
+            'last_15m': last_15m,
+            'last_hour': last_hour,
+            'per_minute': round(per_minute, 2),
+        },
+        'eta_seconds': eta_seconds,
+        'budget': budget,
+        'workers': {
+            'active': workers,
+            'local_concurrency': _controller.limit if _controller else None,
+            'max_concurrency': MAX_CONCURRENCY,
+            'batch_size': BATCH_SIZE,
+        },
+    }
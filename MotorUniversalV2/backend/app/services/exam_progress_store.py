@@ -0,0 +1,423 @@
+"""
+Autosave de examen con write-behind (Redis → exam_progress).
+
+Antes cada autosave (hasta 120/min por candidato) hacía SELECT + UPDATE del
+blob JSON completo + commit. Ahora el borrador vive primero en Redis y la
+tabla `exam_progress` se actualiza de forma diferida:
+
+- save_progress: un MULTI/EXEC sobre el hash `exam_progress:{user}:{exam}`
+  (attempt_id, data, started_at, updated_at, version) y lo marca sucio.
+  `version` es un contador por borrador que se regresa al cliente.
+- Debounce: el primer guardado después de PROGRESS_DEBOUNCE_SECONDS desde
+  la última escritura a BD la hace en el mismo request; los guardados
+  intermedios solo tocan Redis (se coalescen).
+- Flush periódico (start_progress_flusher) cada PROGRESS_FLUSH_SECONDS de
+  todos los borradores sucios, y flush explícito en save_exam_result.
+- get_progress lee de Redis y compara su updated_at con el de la fila (una
+  columna por índice único); el blob de la BD solo se lee si no hay
+  borrador en Redis o el de la BD es más nuevo.
+
+Garantías de durabilidad:
+  1. Un guardado confirmado (200) está en Redis; se pierde solo si se
+     pierde Redis (según su persistencia AOF/RDB).
+  2. La BD nunca va más atrás que max(PROGRESS_DEBOUNCE_SECONDS,
+     PROGRESS_FLUSH_SECONDS) del último guardado, y el debounce en el
+     request la mantiene aunque el flusher no esté corriendo.
+  3. Al entregar (save_exam_result) el borrador se escribe a la BD antes
+     de calcular el tiempo autoritativo.
+  4. Si Redis no responde el guardado se escribe directo en la BD (como
+     antes) y se reintenta Redis a los _REDIS_RETRY_SECONDS.
+  5. Borrar el borrador lo quita de ambos niveles; un flush concurrente no
+     lo revive.
+  6. La BD nunca retrocede: el UPDATE es condicional a que la fila sea más
+     vieja que el borrador (updated_at), así que un flusher lento o un
+     borrador de Redis que quedó atrás de una escritura directa (punto 4)
+     no pisa una versión más nueva. get_progress descarta el borrador de
+     Redis si la BD es más reciente.
+
+Configuración por entorno:
+  PROGRESS_DEBOUNCE_SECONDS  máximo atraso de la BD por borrador (default 20)
+  PROGRESS_FLUSH_SECONDS     intervalo del flusher (default 10)
+  PROGRESS_TTL_SECONDS       vida del borrador en Redis (default 86400)
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_DEBOUNCE_SECONDS = float(os.getenv('PROGRESS_DEBOUNCE_SECONDS', '20'))
+PROGRESS_FLUSH_SECONDS = float(os.getenv('PROGRESS_FLUSH_SECONDS', '10'))
+PROGRESS_TTL_SECONDS = int(os.getenv('PROGRESS_TTL_SECONDS', '86400'))
+
+_DIRTY_KEY = 'exam_progress:dirty'
+_REDIS_RETRY_SECONDS = 30
+_FLUSH_BATCH = 200
+
+# DATETIME de MSSQL redondea a 1/300 s: la misma escritura puede quedar
+# hasta ~1.7 ms "después" del updated_at del borrador en Redis.
+_DB_TIME_RESOLUTION = timedelta(milliseconds=2)
+
+# KEYS[1] = hash del borrador; ARGV = versión escrita, flushed_at.
+# Sube flushed_version solo hacia adelante (dos flushers pueden terminar en
+# desorden). Regresa 0 si el hash ya no existe (borrado concurrente).
+_MARK_FLUSHED_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+local current = tonumber(redis.call('HGET', KEYS[1], 'flushed_version') or '0')
+if tonumber(ARGV[1]) > current then
+  redis.call('HSET', KEYS[1], 'flushed_version', ARGV[1], 'flushed_at', ARGV[2])
+end
+return 1
+"""
+
+_redis = None
+_redis_retry_at = 0.0
+
+
+def _redis_client():
+    global _redis
+    if time.monotonic() < _redis_retry_at:
+        raise RuntimeError('Redis en espera de reintento')
+    if _redis is None:
+        from app.utils.rate_limit import _get_redis_client
+        _redis = _get_redis_client()
+        if _redis is None:
+            raise RuntimeError('Redis no disponible')
+    return _redis
+
+
+def _redis_failed(err):
+    global _redis_retry_at
+    if _redis_retry_at <= time.monotonic():
+        logger.warning(f"[EXAM-PROGRESS] Redis no disponible, escritura directa a BD: {err}")
+        _redis_retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+
+
+def _key(user_id, exam_id) -> str:
+    return f"exam_progress:{user_id}:{exam_id}"
+
+
+def _member(user_id, exam_id) -> str:
+    return f"{user_id}:{exam_id}"
+
+
+def _decode(raw: dict) -> dict:
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in (raw or {}).items()
+    }
+
+
+def _parse_dt(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _entry_to_dict(entry: dict) -> dict:
+    """Hash de Redis → mismo formato que ExamProgress.to_dict (+ version)."""
+    return {
+        'attempt_id': entry.get('attempt_id') or None,
+        'data': json.loads(entry['data']) if entry.get('data') else None,
+        'started_at': entry.get('started_at') or None,
+        'updated_at': entry.get('updated_at') or None,
+        'version': int(entry.get('version') or 0),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Escritura a BD
+# ---------------------------------------------------------------------------
+
+def _write_rows(drafts: dict) -> set:
+    """Upsert de borradores en exam_progress y commit.
+    drafts: {(user_id, exam_id): {'attempt_id', 'data', 'started_at', 'updated_at'}}
+
+    El UPDATE solo aplica si la fila es más vieja que el borrador, así que
+    escritores concurrentes (flushers de cada réplica, debounce del request,
+    escritura directa sin Redis) nunca dejan la BD en una versión anterior.
+    Retorna las llaves (user_id, exam_id) que se escribieron."""
+    from sqlalchemy import case, or_, update
+    from app import db
+    from app.models.exam_progress import ExamProgress
+    if not drafts:
+        return set()
+    existing = set()
+    user_ids = sorted({uid for uid, _ in drafts})
+    for start in range(0, len(user_ids), 1000):
+        chunk = user_ids[start:start + 1000]
+        existing.update(
+            (row.user_id, row.exam_id) for row in
+            ExamProgress.query.filter(ExamProgress.user_id.in_(chunk))
+            .with_entities(ExamProgress.user_id, ExamProgress.exam_id)
+        )
+    written = set()
+    for (user_id, exam_id), draft in drafts.items():
+        started_at = draft.get('started_at') or draft['updated_at']
+        if (user_id, exam_id) not in existing:
+            db.session.add(ExamProgress(
+                id=str(uuid.uuid4()), user_id=user_id, exam_id=exam_id,
+                attempt_id=draft.get('attempt_id'), data=draft.get('data'),
+                started_at=started_at, updated_at=draft['updated_at'],
+            ))
+            written.add((user_id, exam_id))
+            continue
+        result = db.session.execute(
+            update(ExamProgress)
+            .where(
+                ExamProgress.user_id == user_id,
+                ExamProgress.exam_id == exam_id,
+                or_(ExamProgress.updated_at.is_(None), ExamProgress.updated_at < draft['updated_at']),
+            )
+            .values(
+                attempt_id=draft.get('attempt_id'),
+                data=draft.get('data'),
+                updated_at=draft['updated_at'],
+                # el ancla más antigua gana
+                started_at=case(
+                    (or_(ExamProgress.started_at.is_(None), ExamProgress.started_at > started_at), started_at),
+                    else_=ExamProgress.started_at,
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            written.add((user_id, exam_id))
+    db.session.commit()
+    return written
+
+
+def _flush_members(members) -> int:
+    """Reclama (SREM + HGETALL atómicos) y escribe los borradores indicados.
+    Un guardado posterior al reclamo vuelve a marcarlo sucio."""
+    from app import db
+    members = list(members)
+    if not members:
+        return 0
+    client = _redis_client()
+    pipe = client.pipeline(transaction=True)
+    for member in members:
+        user_id, exam_id = member.rsplit(':', 1)
+        pipe.srem(_DIRTY_KEY, member)
+        pipe.hgetall(_key(user_id, exam_id))
+    replies = pipe.execute()
+    drafts, versions = {}, {}
+    for i, member in enumerate(members):
+        if not replies[2 * i]:
+            continue  # no estaba sucio o lo reclamó otro flusher
+        entry = _decode(replies[2 * i + 1])
+        if not entry:
+            continue
+        version = int(entry.get('version') or 0)
+        if int(entry.get('flushed_version') or 0) >= version:
+            continue
+        user_id, exam_id = member.rsplit(':', 1)
+        drafts[(user_id, int(exam_id))] = {
+            'attempt_id': entry.get('attempt_id') or None,
+            'data': json.loads(entry['data']) if entry.get('data') else None,
+            'started_at': _parse_dt(entry.get('started_at')),
+            'updated_at': _parse_dt(entry.get('updated_at')) or datetime.utcnow(),
+        }
+        versions[(user_id, int(exam_id))] = version
+    if not drafts:
+        return 0
+    try:
+        written = _write_rows(drafts)
+    except Exception:
+        db.session.rollback()
+        client.sadd(_DIRTY_KEY, *[_member(u, e) for u, e in drafts])
+        raise
+
+    # Los que no se escribieron ya tenían en la BD algo más nuevo: también
+    # cuentan como flusheados.
+    now = repr(time.time())
+    mark = client.register_script(_MARK_FLUSHED_LUA)
+    keys = list(drafts)
+    pipe = client.pipeline(transaction=True)
+    for user_id, exam_id in keys:
+        mark(keys=[_key(user_id, exam_id)], args=[versions[(user_id, exam_id)], now], client=pipe)
+    replies = pipe.execute()
+    # Borrado concurrente: el hash ya no existía → no revivir la fila
+    vanished = [k for i, k in enumerate(keys) if not replies[i]]
+    if vanished:
+        _delete_rows(vanished)
+    return len(written)
+
+
+def _delete_rows(pairs):
+    from app import db
+    from app.models.exam_progress import ExamProgress
+    for user_id, exam_id in pairs:
+        ExamProgress.query.filter_by(user_id=str(user_id), exam_id=exam_id).delete()
+    db.session.commit()
+
+
+# ---------------------------------------------------------------------------
+# API pública
+# ---------------------------------------------------------------------------
+
+def save_progress(user_id, exam_id: int, attempt_id, data) -> dict:
+    """Guarda el borrador. Retorna {'version', 'persisted'} (persisted=True
+    si en este request se escribió la BD)."""
+    user_id = str(user_id)
+    now = datetime.utcnow()
+    try:
+        client = _redis_client()
+        key = _key(user_id, exam_id)
+        pipe = client.pipeline(transaction=True)
+        pipe.hincrby(key, 'version', 1)
+        pipe.hset(key, mapping={
+            'attempt_id': attempt_id or '',
+            'data': json.dumps(data),
+            'updated_at': now.isoformat(),
+        })
+        pipe.hsetnx(key, 'started_at', now.isoformat())
+        pipe.expire(key, PROGRESS_TTL_SECONDS)
+        pipe.sadd(_DIRTY_KEY, _member(user_id, exam_id))
+        pipe.hget(key, 'flushed_at')
+        version, _, _, _, _, flushed_at = pipe.execute()
+    except Exception as e:
+        _redis_failed(e)
+        _write_rows({(user_id, exam_id): {
+            'attempt_id': attempt_id, 'data': data, 'started_at': None, 'updated_at': now,
+        }})
+        return {'version': None, 'persisted': True}
+
+    version = int(version)
+    if version == 1:
+        _seed_started_at(client, user_id, exam_id)
+    if flushed_at is not None and time.time() - float(flushed_at) < PROGRESS_DEBOUNCE_SECONDS:
+        return {'version': version, 'persisted': False}
+    try:
+        persisted = _flush_members([_member(user_id, exam_id)]) > 0
+    except Exception as e:
+        # Sigue en Redis y marcado sucio: lo reintenta el flusher
+        logger.warning(f"[EXAM-PROGRESS] flush inmediato falló user={user_id} exam={exam_id}: {e}")
+        persisted = False
+    return {'version': version, 'persisted': persisted}
+
+
+def _seed_started_at(client, user_id, exam_id):
+    """Borrador nuevo en Redis: conservar el started_at de la BD (p. ej.
+    tras reiniciar Redis) para no perder el ancla del tiempo del intento."""
+    from app.models.exam_progress import ExamProgress
+    try:
+        row = ExamProgress.query.filter_by(user_id=user_id, exam_id=exam_id).first()
+        if row is not None and row.started_at is not None:
+            client.hset(_key(user_id, exam_id), 'started_at', row.started_at.isoformat())
+    except Exception as e:
+        logger.warning(f"[EXAM-PROGRESS] no se pudo leer started_at user={user_id} exam={exam_id}: {e}")
+
+
+def get_progress(user_id, exam_id: int) -> Optional[dict]:
+    """Borrador del usuario (Redis primero, BD si no hay)."""
+    from app.models.exam_progress import ExamProgress
+    user_id = str(user_id)
+    entry = None
+    try:
+        client = _redis_client()
+        entry = _decode(client.hgetall(_key(user_id, exam_id)))
+    except Exception as e:
+        _redis_failed(e)
+    if entry:
+        # Un guardado directo a BD durante una caída de Redis deja atrás el
+        # borrador de Redis: se descarta para que ni la lectura ni el
+        # siguiente flush lo usen.
+        db_updated = ExamProgress.query.filter_by(user_id=user_id, exam_id=exam_id).with_entities(
+            ExamProgress.updated_at).scalar()
+        redis_updated = _parse_dt(entry.get('updated_at'))
+        if db_updated is None or redis_updated is None or db_updated <= redis_updated + _DB_TIME_RESOLUTION:
+            return _entry_to_dict(entry)
+        try:
+            pipe = client.pipeline(transaction=True)
+            pipe.delete(_key(user_id, exam_id))
+            pipe.srem(_DIRTY_KEY, _member(user_id, exam_id))
+            pipe.execute()
+        except Exception as e:
+            _redis_failed(e)
+    row = ExamProgress.query.filter_by(user_id=user_id, exam_id=exam_id).first()
+    return row.to_dict() if row else None
+
+
+def flush_progress(user_id, exam_id: int) -> bool:
+    """Escribe ya el borrador pendiente (si hay). True si escribió."""
+    try:
+        return _flush_members([_member(str(user_id), exam_id)]) > 0
+    except Exception as e:
+        _redis_failed(e)
+        return False
+
+
+def delete_progress(user_id, exam_id: int):
+    """Elimina el borrador de Redis y de la BD."""
+    from app import db
+    user_id = str(user_id)
+    try:
+        pipe = _redis_client().pipeline(transaction=True)
+        pipe.delete(_key(user_id, exam_id))
+        pipe.srem(_DIRTY_KEY, _member(user_id, exam_id))
+        pipe.execute()
+    except Exception as e:
+        _redis_failed(e)
+    try:
+        _delete_rows([(user_id, exam_id)])
+    except Exception:
+        db.session.rollback()
+
+
+def flush_dirty_progress() -> int:
+    """Escribe todos los borradores sucios (en lotes). Requiere app context."""
+    try:
+        client = _redis_client()
+        members = [m.decode() if isinstance(m, bytes) else m for m in client.smembers(_DIRTY_KEY)]
+    except Exception as e:
+        _redis_failed(e)
+        return 0
+    written = 0
+    for start in range(0, len(members), _FLUSH_BATCH):
+        written += _flush_members(members[start:start + _FLUSH_BATCH])
+    return written
+
+
+_flusher_started = False
+_flusher_lock = threading.Lock()
+
+
+def start_progress_flusher(app):
+    """Arranca el thread de flush periódico. Idempotente por proceso."""
+    global _flusher_started
+    with _flusher_lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+
+    def _run():
+        while True:
+            time.sleep(PROGRESS_FLUSH_SECONDS)
+            try:
+                with app.app_context():
+                    flush_dirty_progress()
+            except Exception as e:
+                logger.error(f"[EXAM-PROGRESS] error en flusher: {e}")
+
+    def _final_flush():
+        try:
+            with app.app_context():
+                flush_dirty_progress()
+        except Exception:
+            pass
+
+    threading.Thread(target=_run, daemon=True, name='exam-progress-flusher').start()
+    atexit.register(_final_flush)
+    logger.info(f"[EXAM-PROGRESS] flusher arrancado (cada {PROGRESS_FLUSH_SECONDS:g}s)")
@@ -0,0 +1,374 @@
+"""
+Analítica de grupo agregada en SQL (dashboard GET /groups/<id>/analytics).
+
+Antes se cargaban todos los Result de los miembros como objetos ORM, se
+filtraban en Python y se recorría la lista completa por cada miembro
+(O(miembros × resultados)), más un COUNT por material y una query por
+group-exam. Ahora cada sección es una query agregada (GROUP BY) acotada por
+la subquery de miembros activos (sin listas IN de user_ids, que en MSSQL
+topan con el límite de 2100 parámetros) y Python solo arma el JSON. El
+número de queries es fijo, sin importar si el grupo tiene 50 o 5,000
+miembros.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, case, func, or_, select
+
+from app import db
+
+
+def _member_ids(group_id: int):
+    """Subquery con los user_id de los miembros activos del grupo."""
+    from app.models.partner import GroupMember
+    return select(GroupMember.user_id).where(
+        GroupMember.group_id == group_id, GroupMember.status == 'active'
+    )
+
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def _present(column):
+    return and_(column.isnot(None), column != '')
+
+
+def _day(column):
+    """Fecha (sin hora) de un DateTime; SQLite no tiene CAST AS DATE."""
+    if db.engine.dialect.name == 'sqlite':
+        return func.date(column)
+    return func.cast(column, db.Date)
+
+
+def _parse_date(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def _results_filters(group_id: int, exam_ids, exam_id_filter=None, date_from=None, date_to=None):
+    from app.models.result import Result
+    filters = [Result.user_id.in_(_member_ids(group_id)), Result.exam_id.in_(exam_ids)]
+    if exam_id_filter:
+        filters.append(Result.exam_id == exam_id_filter)
+    dt_from = _parse_date(date_from)
+    if dt_from:
+        filters.append(Result.end_date >= dt_from)
+    dt_to = _parse_date(date_to)
+    if dt_to:
+        filters.append(Result.end_date < dt_to + timedelta(days=1))
+    return filters
+
+
+def _round_avg(total, count, scale=1):
+    return round((total or 0) / count / scale, 1) if count else 0
+
+
+def empty_group_analytics(group) -> dict:
+    return {
+        'group': {'id': group.id, 'name': group.name},
+        'members': {'total': 0, 'certified': 0, 'in_progress': 0, 'failed': 0, 'pending': 0, 'with_email': 0, 'with_curp': 0},
+        'exams': {'assigned': 0, 'details': []},
+        'results': {'total': 0, 'completed': 0, 'approved': 0, 'failed': 0, 'in_progress': 0, 'pass_rate': 0, 'avg_score': 0, 'avg_duration_minutes': 0, 'score_distribution': [], 'by_exam': [], 'by_date': []},
+        'certificates': {'tier_basic': {'ready': 0, 'pending': 0}, 'tier_standard': {'ready': 0, 'pending': 0}, 'tier_advanced': 0, 'digital_badge': 0},
+        'materials': {'assigned': 0, 'details': []},
+        'ecm': {'total_assignments': 0, 'unique_ecms': 0, 'details': []},
+    }
+
+
+def build_group_analytics(group, exam_id_filter=None, date_from=None, date_to=None) -> dict:
+    """Payload completo del dashboard analítico del grupo."""
+    from app.models.result import Result
+    from app.models.user import User
+    from app.models.exam import Exam
+    from app.models.partner import GroupExam, GroupMember
+    from app.models.conocer_certificate import ConocerCertificate
+
+    group_id = group.id
+    members = _member_ids(group_id)
+
+    # ── 1. MIEMBROS ──
+    member_row = db.session.query(
+        func.count(GroupMember.id),
+        _count_if(_present(User.email)),
+        _count_if(_present(User.curp)),
+    ).outerjoin(User, User.id == GroupMember.user_id).filter(
+        GroupMember.group_id == group_id, GroupMember.status == 'active'
+    ).one()
+    total_members = int(member_row[0] or 0)
+    if total_members == 0:
+        return empty_group_analytics(group)
+
+    # ── 2. EXÁMENES ASIGNADOS ──
+    group_exams = GroupExam.query.filter_by(group_id=group_id, is_active=True).all()
+    exam_ids = [ge.exam_id for ge in group_exams]
+    exam_names = {}
+    if exam_ids:
+        exam_names = dict(db.session.query(Exam.id, Exam.name).filter(Exam.id.in_(exam_ids)).all())
+
+    def exam_name(eid):
+        return exam_names.get(eid) or f'Examen #{eid}'
+
+    exams_detail = [{
+        'exam_id': ge.exam_id,
+        'exam_name': exam_name(ge.exam_id),
+        'assigned_at': ge.assigned_at.isoformat() if ge.assigned_at else None,
+        'passing_score': ge.passing_score or 70,
+        'max_attempts': ge.max_attempts or 1,
+        'time_limit_minutes': ge.time_limit_minutes,
+        'assignment_type': ge.assignment_type,
+    } for ge in group_exams]
+
+    # ── 3. RESULTADOS ──
+    filters = _results_filters(group_id, exam_ids, exam_id_filter, date_from, date_to)
+    completed = Result.status == 1
+    is_approved = and_(completed, Result.result == 1)
+    is_failed = and_(completed, Result.result == 0)
+    in_progress = Result.status == 0
+    timed = and_(completed, Result.duration_seconds > 0)
+
+    totals = db.session.query(
+        func.count(Result.id),
+        _count_if(completed),
+        _count_if(is_approved),
+        _count_if(is_failed),
+        _count_if(in_progress),
+        func.sum(case((completed, Result.score), else_=0)),
+        _count_if(and_(completed, Result.score.isnot(None))),
+        func.sum(case((timed, Result.duration_seconds), else_=0)),
+        _count_if(timed),
+        # Certificados por nivel (sobre los aprobados)
+        _count_if(and_(is_approved, or_(_present(Result.report_url), _present(Result.certificate_code)))),
+        _count_if(and_(is_approved, or_(_present(Result.certificate_url), _present(Result.eduit_certificate_code)))),
+    ).filter(*filters).one()
+    (total, completed_n, approved_n, failed_n, in_progress_n, score_sum, score_n,
+     duration_sum, duration_n, basic_ready, standard_ready) = [int(v or 0) for v in totals]
+
+    # Histograma de calificaciones (0-9, 10-19, ..., 90-100)
+    score_bin = case((Result.score >= 90, 9), else_=Result.score // 10)
+    score_bins = [0] * 10
+    for bucket, count in db.session.query(score_bin, func.count(Result.id)).filter(
+        *filters, completed, Result.score.isnot(None)
+    ).group_by(score_bin).all():
+        score_bins[max(int(bucket), 0)] += int(count)
+    score_distribution = [
+        {'range': f'{i*10}-{i*10+9}' if i < 9 else '90-100', 'count': score_bins[i]}
+        for i in range(10)
+    ]
+
+    results_by_exam = []
+    for eid, approved_e, failed_e, in_progress_e, score_sum_e, score_n_e in db.session.query(
+        Result.exam_id,
+        _count_if(is_approved),
+        _count_if(is_failed),
+        _count_if(in_progress),
+        func.sum(case((completed, Result.score), else_=0)),
+        _count_if(and_(completed, Result.score.isnot(None))),
+    ).filter(*filters).group_by(Result.exam_id).all():
+        approved_e, failed_e = int(approved_e or 0), int(failed_e or 0)
+        results_by_exam.append({
+            'exam_id': eid,
+            'exam_name': exam_name(eid),
+            'approved': approved_e,
+            'failed': failed_e,
+            'in_progress': int(in_progress_e or 0),
+            'avg_score': _round_avg(score_sum_e, int(score_n_e or 0)),
+            'pass_rate': round(approved_e / (approved_e + failed_e) * 100, 1) if (approved_e + failed_e) else 0,
+        })
+
+    day = _day(Result.end_date)
+    results_by_date = [
+        {'date': str(d), 'approved': int(a or 0), 'failed': int(t) - int(a or 0), 'total': int(t)}
+        for d, a, t in db.session.query(day, _count_if(Result.result == 1), func.count(Result.id)).filter(
+            *filters, completed, Result.end_date.isnot(None)
+        ).group_by(day).order_by(day).all()
+    ]
+
+    # Estado de certificación por miembro: una fila por usuario con resultados
+    per_user = db.session.query(
+        Result.user_id.label('user_id'),
+        func.max(case((is_approved, 1), else_=0)).label('has_approved'),
+        func.max(case((completed, 1), else_=0)).label('has_completed'),
+        func.max(case((in_progress, 1), else_=0)).label('has_in_progress'),
+    ).filter(*filters).group_by(Result.user_id).subquery()
+    status_row = db.session.query(
+        _count_if(per_user.c.has_approved == 1),
+        _count_if(and_(per_user.c.has_approved == 0, per_user.c.has_completed == 1)),
+        _count_if(and_(per_user.c.has_completed == 0, per_user.c.has_in_progress == 1)),
+    ).one()
+    certified, failed_members, in_progress_members = [int(v or 0) for v in status_row]
+    pending_members = max(total_members - certified - failed_members - in_progress_members, 0)
+
+    # ── 4. CERTIFICADOS ──
+    tier_advanced = db.session.query(func.count(ConocerCertificate.id)).filter(
+        ConocerCertificate.user_id.in_(members), ConocerCertificate.status == 'active'
+    ).scalar() or 0
+
+    # ── 5. MATERIALES / 6. ECAs ──
+    materials_detail = _materials_detail(group_id, group_exams, total_members, exam_name)
+    ecm_details, total_assignments = _ecm_details(group_id, exam_ids, members)
+
+    # ── 7. TOP PERFORMERS ──
+    score_or_zero = func.coalesce(Result.score, 0)
+    avg_expr = func.sum(score_or_zero) * 1.0 / func.count(Result.id)
+    top_rows = db.session.query(
+        Result.user_id, func.max(score_or_zero), func.sum(score_or_zero), func.count(Result.id),
+    ).filter(*filters, completed).group_by(Result.user_id).order_by(avg_expr.desc()).limit(10).all()
+    names = {}
+    if top_rows:
+        for user in User.query.filter(User.id.in_([r[0] for r in top_rows])).all():
+            names[user.id] = user.full_name
+    top_performers = [{
+        'user_id': uid,
+        'full_name': names.get(uid, 'Desconocido'),
+        'best_score': int(best or 0),
+        'avg_score': _round_avg(score_total, int(count)),
+        'exams_completed': int(count),
+    } for uid, best, score_total, count in top_rows]
+
+    return {
+        'group': {
+            'id': group.id,
+            'name': group.name,
+            'campus_name': group.campus.name if group.campus else None,
+            'partner_name': group.campus.partner.name if group.campus and group.campus.partner else None,
+        },
+        'members': {
+            'total': total_members,
+            'certified': certified,
+            'in_progress': in_progress_members,
+            'failed': failed_members,
+            'pending': pending_members,
+            'with_email': int(member_row[1] or 0),
+            'with_curp': int(member_row[2] or 0),
+        },
+        'exams': {
+            'assigned': len(group_exams),
+            'details': exams_detail,
+        },
+        'results': {
+            'total': total,
+            'completed': completed_n,
+            'approved': approved_n,
+            'failed': failed_n,
+            'in_progress': in_progress_n,
+            'pass_rate': round(approved_n / completed_n * 100, 1) if completed_n else 0,
+            'avg_score': _round_avg(score_sum, score_n),
+            'avg_duration_minutes': _round_avg(duration_sum, duration_n, scale=60),
+            'score_distribution': score_distribution,
+            'by_exam': results_by_exam,
+            'by_date': results_by_date,
+        },
+        'certificates': {
+            'tier_basic': {'ready': basic_ready, 'pending': approved_n - basic_ready},
+            'tier_standard': {'ready': standard_ready, 'pending': approved_n - standard_ready},
+            'tier_advanced': int(tier_advanced),
+            'digital_badge': approved_n,
+        },
+        'materials': {
+            'assigned': len(materials_detail),
+            'details': materials_detail,
+        },
+        'ecm': {
+            'total_assignments': total_assignments,
+            'unique_ecms': len(ecm_details),
+            'details': ecm_details,
+        },
+        'top_performers': top_performers,
+    }
+
+
+def _materials_detail(group_id, group_exams, total_members, exam_name) -> list:
+    """Materiales directos del grupo y vinculados a sus exámenes (3 queries)."""
+    from app.models.partner import GroupStudyMaterial, GroupStudyMaterialMember, GroupExamMaterial
+    from app.models.study_content import StudyMaterial, study_material_exams
+
+    direct = db.session.query(GroupStudyMaterial, StudyMaterial.title).outerjoin(
+        StudyMaterial, StudyMaterial.id == GroupStudyMaterial.study_material_id
+    ).filter(GroupStudyMaterial.group_id == group_id).order_by(GroupStudyMaterial.id).all()
+    selected_ids = [gm.id for gm, _ in direct if gm.assignment_type == 'selected']
+    selected_counts = {}
+    if selected_ids:
+        selected_counts = dict(db.session.query(
+            GroupStudyMaterialMember.group_study_material_id, func.count(GroupStudyMaterialMember.id)
+        ).filter(GroupStudyMaterialMember.group_study_material_id.in_(selected_ids)).group_by(
+            GroupStudyMaterialMember.group_study_material_id
+        ).all())
+
+    details = [{
+        'id': gm.id,
+        'material_name': title or f'Material #{gm.study_material_id}',
+        'assigned_at': gm.assigned_at.isoformat() if gm.assigned_at else None,
+        'assigned_members': int(selected_counts.get(gm.id, 0)) if gm.assignment_type == 'selected' else total_members,
+        'source': 'direct',
+    } for gm, title in direct]
+    if not group_exams:
+        return details
+
+    # Materiales personalizados por group-exam; sin personalización se usan
+    # los materiales publicados vinculados al examen
+    custom = defaultdict(list)
+    for ge_id, mat_id, title in db.session.query(
+        GroupExamMaterial.group_exam_id, StudyMaterial.id, StudyMaterial.title
+    ).join(StudyMaterial, StudyMaterial.id == GroupExamMaterial.study_material_id).filter(
+        GroupExamMaterial.group_exam_id.in_([ge.id for ge in group_exams]),
+        GroupExamMaterial.is_included == True,  # noqa: E712
+    ).order_by(StudyMaterial.id).all():
+        custom[ge_id].append((mat_id, title))
+    linked = defaultdict(list)
+    try:
+        for exam_id, mat_id, title in db.session.query(
+            study_material_exams.c.exam_id, StudyMaterial.id, StudyMaterial.title
+        ).join(StudyMaterial, StudyMaterial.id == study_material_exams.c.study_material_id).filter(
+            study_material_exams.c.exam_id.in_({ge.exam_id for ge in group_exams}),
+            StudyMaterial.is_published == True,  # noqa: E712
+        ).order_by(StudyMaterial.id).all():
+            linked[exam_id].append((mat_id, title))
+    except Exception:
+        db.session.rollback()
+
+    seen = {gm.study_material_id for gm, _ in direct}
+    for ge in group_exams:
+        for mat_id, title in (custom[ge.id] if ge.id in custom else linked.get(ge.exam_id, [])):
+            if mat_id in seen:
+                continue
+            seen.add(mat_id)
+            details.append({
+                'id': f'exam-{ge.exam_id}-{mat_id}',
+                'material_name': title,
+                'assigned_at': ge.assigned_at.isoformat() if ge.assigned_at else None,
+                'assigned_members': total_members,
+                'source': 'exam',
+                'exam_name': exam_name(ge.exam_id),
+            })
+    return details
+
+
+def _ecm_details(group_id, exam_ids, members):
+    """ECAs de los miembros (por grupo o por examen del grupo) agrupadas por ECM."""
+    from app.models.partner import EcmCandidateAssignment
+    from app.models.competency_standard import CompetencyStandard
+
+    scope = EcmCandidateAssignment.group_id == group_id
+    if exam_ids:
+        scope = or_(scope, EcmCandidateAssignment.exam_id.in_(exam_ids))
+    rows = db.session.query(
+        EcmCandidateAssignment.competency_standard_id,
+        CompetencyStandard.name, CompetencyStandard.code, CompetencyStandard.logo_url,
+        func.count(EcmCandidateAssignment.id),
+    ).outerjoin(
+        CompetencyStandard, CompetencyStandard.id == EcmCandidateAssignment.competency_standard_id
+    ).filter(EcmCandidateAssignment.user_id.in_(members), scope).group_by(
+        EcmCandidateAssignment.competency_standard_id,
+        CompetencyStandard.name, CompetencyStandard.code, CompetencyStandard.logo_url,
+    ).all()
+    details = [
+        {'ecm_id': ecm_id, 'ecm_name': name or '', 'ecm_code': code or '', 'assignments': int(count), 'logo_url': logo}
+        for ecm_id, name, code, logo, count in rows
+    ]
+    return details, sum(d['assignments'] for d in details)
@@ -0,0 +1,204 @@
+"""
+Registro diferido de users.last_seen.
+
+Antes cada request autenticado hacía `UPDATE users SET last_seen` + commit:
+durante un examen cada guardado de progreso, ítem y poll escribía en la
+tabla más consultada. Ahora:
+
+- record_last_seen(user_id) marca al usuario como mucho una vez cada
+  LAST_SEEN_THROTTLE_SECONDS por proceso, en un hash de Redis compartido
+  entre réplicas (o en un buffer en proceso si Redis no responde; se
+  reintenta Redis a los _REDIS_RETRY_SECONDS).
+- Un thread (start_last_seen_flusher) vacía el hash cada
+  LAST_SEEN_FLUSH_SECONDS (HGETALL + DEL en MULTI/EXEC) y escribe todo en
+  un solo UPDATE por lote (executemany) que nunca retrocede la fecha.
+- Los lectores usan effective_last_seen() para ver el valor pendiente aún
+  no escrito (casi tiempo real).
+
+Configuración por entorno:
+  LAST_SEEN_THROTTLE_SECONDS  mínimo entre marcas del mismo usuario (default 30)
+  LAST_SEEN_FLUSH_SECONDS     intervalo del flush a la BD (default 15)
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_THROTTLE_SECONDS = float(os.getenv('LAST_SEEN_THROTTLE_SECONDS', '30'))
+LAST_SEEN_FLUSH_SECONDS = float(os.getenv('LAST_SEEN_FLUSH_SECONDS', '15'))
+
+_PENDING_KEY = 'last_seen:pending'
+_REDIS_RETRY_SECONDS = 30
+_UPDATE_CHUNK = 500
+
+_lock = threading.Lock()
+_recorded_at = {}   # user_id -> time.monotonic() de la última marca (throttle)
+_pending = {}       # user_id -> epoch (buffer local cuando Redis no responde)
+_redis = None
+_redis_retry_at = 0.0
+
+
+def _redis_client():
+    global _redis
+    if _redis is None:
+        from app.utils.rate_limit import _get_redis_client
+        _redis = _get_redis_client()
+        if _redis is None:
+            raise RuntimeError('Redis no disponible')
+    return _redis
+
+
+def _redis_failed(err):
+    global _redis_retry_at
+    if _redis_retry_at <= time.monotonic():
+        logger.warning(f"[LAST-SEEN] Redis no disponible, buffer en proceso: {err}")
+    _redis_retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+
+
+def record_last_seen(user_id: str, now: Optional[float] = None) -> bool:
+    """Marca actividad del usuario. Retorna True si se registró (False si
+    cayó dentro del throttle)."""
+    if not user_id:
+        return False
+    user_id = str(user_id)
+    mono = time.monotonic()
+    with _lock:
+        last = _recorded_at.get(user_id)
+        if last is not None and mono - last < LAST_SEEN_THROTTLE_SECONDS:
+            return False
+        _recorded_at[user_id] = mono
+        if len(_recorded_at) > 50000:
+            cutoff = mono - LAST_SEEN_THROTTLE_SECONDS
+            for uid in [u for u, t in _recorded_at.items() if t < cutoff]:
+                del _recorded_at[uid]
+    epoch = time.time() if now is None else now
+    if time.monotonic() >= _redis_retry_at:
+        try:
+            _redis_client().hset(_PENDING_KEY, user_id, repr(epoch))
+            return True
+        except Exception as e:
+            _redis_failed(e)
+    with _lock:
+        _pending[user_id] = max(epoch, _pending.get(user_id, 0.0))
+    return True
+
+
+def _drain() -> dict:
+    """Saca todas las marcas pendientes (Redis + buffer local)."""
+    drained = {}
+    if time.monotonic() >= _redis_retry_at:
+        try:
+            pipe = _redis_client().pipeline(transaction=True)
+            pipe.hgetall(_PENDING_KEY)
+            pipe.delete(_PENDING_KEY)
+            raw, _ = pipe.execute()
+            for uid, epoch in (raw or {}).items():
+                uid = uid.decode() if isinstance(uid, bytes) else uid
+                drained[uid] = float(epoch)
+        except Exception as e:
+            _redis_failed(e)
+    with _lock:
+        local = dict(_pending)
+        _pending.clear()
+    for uid, epoch in local.items():
+        drained[uid] = max(epoch, drained.get(uid, 0.0))
+    return drained
+
+
+def flush_last_seen() -> int:
+    """Escribe las marcas pendientes en users.last_seen. Requiere app
+    context. Retorna cuántos usuarios se enviaron."""
+    from app import db
+    pending = _drain()
+    if not pending:
+        return 0
+    rows = [{'uid': uid, 'ts': datetime.utcfromtimestamp(epoch)} for uid, epoch in pending.items()]
+    statement = db.text(
+        "UPDATE users SET last_seen = :ts "
+        "WHERE id = :uid AND (last_seen IS NULL OR last_seen < :ts)"
+    )
+    try:
+        for start in range(0, len(rows), _UPDATE_CHUNK):
+            db.session.execute(statement, rows[start:start + _UPDATE_CHUNK])
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"[LAST-SEEN] flush falló ({len(rows)} usuarios): {e}")
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+        # Regresar al buffer local para el siguiente flush
+        with _lock:
+            for uid, epoch in pending.items():
+                _pending[uid] = max(epoch, _pending.get(uid, 0.0))
+        return 0
+    return len(rows)
+
+
+def pending_last_seen(user_ids: Iterable[str]) -> dict:
+    """Marcas aún no escritas para `user_ids` -> {user_id: datetime}."""
+    ids = [str(u) for u in user_ids if u]
+    found = {}
+    if not ids:
+        return found
+    if time.monotonic() >= _redis_retry_at:
+        try:
+            for uid, epoch in zip(ids, _redis_client().hmget(_PENDING_KEY, ids)):
+                if epoch is not None:
+                    found[uid] = float(epoch)
+        except Exception as e:
+            _redis_failed(e)
+    with _lock:
+        for uid in ids:
+            if uid in _pending:
+                found[uid] = max(_pending[uid], found.get(uid, 0.0))
+    return {uid: datetime.utcfromtimestamp(epoch) for uid, epoch in found.items()}
+
+
+def effective_last_seen(user) -> Optional[datetime]:
+    """last_seen del usuario considerando la marca pendiente de flush."""
+    if user is None:
+        return None
+    stored = getattr(user, 'last_seen', None)
+    pending = pending_last_seen([user.id]).get(str(user.id))
+    if pending and (stored is None or pending > stored):
+        return pending
+    return stored
+
+
+_flusher_started = False
+_flusher_lock = threading.Lock()
+
+
+def start_last_seen_flusher(app):
+    """Arranca el thread de flush. Idempotente por proceso."""
+    global _flusher_started
+    with _flusher_lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+
+    def _run():
+        while True:
+            time.sleep(LAST_SEEN_FLUSH_SECONDS)
+            try:
+                with app.app_context():
+                    flush_last_seen()
+            except Exception as e:
+                logger.error(f"[LAST-SEEN] error en flusher: {e}")
+
+    def _final_flush():
+        try:
+            with app.app_context():
+                flush_last_seen()
+        except Exception:
+            pass
+
+    threading.Thread(target=_run, daemon=True, name='last-seen-flusher').start()
+    atexit.register(_final_flush)
+    logger.info(f"[LAST-SEEN] flusher arrancado (cada {LAST_SEEN_FLUSH_SECONDS:g}s)")
@@ -0,0 +1,527 @@
+"""
+Manifiesto versionado de un material de estudio (material → sesiones →
+temas → contenidos) y la estructura de conteos que se deriva de él.
+
+Las rutas de lectura de `/api/study-contents/<id>/...` reconstruían el árbol
+con las relaciones `lazy='dynamic'` en cada request (`material.to_dict(
+include_sessions=True)` emite un COUNT por sesión y por paso, y una query por
+cada lectura/video/descargable/interactivo/paso/acción), el endpoint de
+progreso hacía 4 COUNT + 2 queries por tema y `build_scorm_zip` volvía a
+recorrer el mismo grafo para exportar.
+
+Ahora el árbol se serializa una sola vez por versión del material con
+queries por tabla acotadas por subconsultas del material (sin N+1 ni listas
+IN que rebasen el límite de parámetros de MSSQL): ids, orden, tipos de
+contenido y URLs ya transformadas con `transform_to_cdn_url`. El formato de
+cada nodo es el mismo que el `to_dict` del modelo correspondiente.
+
+  * `get_material_manifest(id)` — manifiesto completo (lecturas de
+    candidato y exportación SCORM).
+  * `get_material_structure(id)` — proyección ligera (títulos, orden y
+    conteos por tema) para el endpoint de progreso, que se consulta en
+    polling y no necesita traer de Redis el contenido de las lecturas.
+
+Ambos se guardan en dos niveles, igual que el snapshot de clave de
+respuestas (answer_key_service):
+
+  1. Cache en proceso (LRU acotado) — cero round trips en hit.
+  2. Redis vía `flask_caching.cache` — compartido entre workers/réplicas.
+
+Versionado por generación: `material_structure_gen:<id>` guarda un token y
+los valores viven en `material_manifest:<id>:<gen>` y
+`material_structure:<id>:<gen>`. Toda edición exitosa en las rutas
+`/api/study-contents/<material_id>/...` llama
+`invalidate_material_structure(material_id)` (hook after_request del
+blueprint) y las rutas de paquetes SCORM llaman
+`invalidate_topic_material(topic_id)`; ambas rotan la generación. Sin Redis
+el cache local expira a los `_LOCAL_TTL_NO_REDIS` segundos.
+
+Los valores cacheados son compartidos: quien los lea no debe mutarlos.
+
+El progreso del usuario (que sí cambia en cada visita) es una sola query
+sobre student_content_progress acotada por el material.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from sqlalchemy import and_, or_, select
+
+from app import db, cache
+
+
+_REDIS_TTL = 6 * 3600          # segundos de vida del manifiesto/estructura en Redis
+_LOCAL_MAX_MATERIALS = 128     # estructuras distintas en el LRU de proceso
+_LOCAL_MAX_MANIFESTS = 32      # manifiestos (incluyen el HTML de las lecturas)
+_LOCAL_TTL = 600               # tope de vida local aun con Redis disponible
+_LOCAL_TTL_NO_REDIS = 30       # sin Redis no hay generación compartida
+
+_local_lock = threading.Lock()
+_local_cache = OrderedDict()      # material_id -> (generation, loaded_at, structure)
+_local_manifests = OrderedDict()  # material_id -> (generation, loaded_at, manifest)
+
+CONTENT_TYPES = ('reading', 'video', 'downloadable', 'interactive')
+
+# Clave del manifiesto por tipo de contenido de progreso
+_CONTENT_KEYS = {
+    'reading': 'reading',
+    'video': 'video',
+    'downloadable': 'downloadable_exercise',
+    'interactive': 'interactive_exercise',
+}
+
+
+def _gen_key(material_id) -> str:
+    return f"material_structure_gen:{material_id}"
+
+
+def _structure_key(material_id, generation) -> str:
+    return f"material_structure:{material_id}:{generation or 0}"
+
+
+def _manifest_key(material_id, generation) -> str:
+    return f"material_manifest:{material_id}:{generation or 0}"
+
+
+def _read_generation(material_id):
+    """Lee el token de generación de Redis. Retorna (generation, redis_ok)."""
+    try:
+        return cache.get(_gen_key(material_id)), True
+    except Exception as e:
+        print(f"[MATERIAL-STRUCTURE] Warning: no se pudo leer generación de {material_id}: {e}")
+        return None, False
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _session_entry(session, topics: list) -> dict:
+    """Equivalente a `StudySession.to_dict(include_topics=True)`."""
+    return {
+        'id': session.id,
+        'material_id': session.material_id,
+        'session_number': session.session_number,
+        'title': session.title,
+        'description': session.description,
+        'total_topics': len(topics),
+        'created_at': _iso(session.created_at),
+        'updated_at': _iso(session.updated_at),
+        'topics': topics,
+    }
+
+
+def _topic_entry(topic, reading, video, downloadable, interactive, scorm_package) -> dict:
+    """Equivalente a `StudyTopic.to_dict(include_elements=True)`."""
+    return {
+        'id': topic.id,
+        'session_id': topic.session_id,
+        'title': topic.title,
+        'description': topic.description,
+        'order': topic.order,
+        'estimated_time_minutes': topic.estimated_time_minutes,
+        'allow_reading': topic.allow_reading if topic.allow_reading is not None else True,
+        'allow_video': topic.allow_video if topic.allow_video is not None else True,
+        'allow_downloadable': topic.allow_downloadable if topic.allow_downloadable is not None else True,
+        'allow_interactive': topic.allow_interactive if topic.allow_interactive is not None else True,
+        'allow_scorm': topic.allow_scorm if topic.allow_scorm is not None else True,
+        'has_reading': reading is not None,
+        'has_video': video is not None,
+        'has_downloadable': downloadable is not None,
+        'has_interactive': interactive is not None,
+        'has_scorm': scorm_package is not None,
+        'created_at': _iso(topic.created_at),
+        'updated_at': _iso(topic.updated_at),
+        'reading': reading,
+        'video': video,
+        'downloadable_exercise': downloadable,
+        'interactive_exercise': interactive,
+        'scorm_package': scorm_package,
+    }
+
+
+def _interactive_entry(exercise, steps: list) -> dict:
+    """Equivalente a `StudyInteractiveExercise.to_dict(include_steps=True)`."""
+    from app.models.study_content import normalize_html_spaces
+    return {
+        'id': exercise.id,
+        'topic_id': exercise.topic_id,
+        'title': normalize_html_spaces(exercise.title) if exercise.title else '',
+        'description': normalize_html_spaces(exercise.description) if exercise.description else '',
+        'is_active': exercise.is_active,
+        'is_complete': not exercise.is_active if exercise.is_active is not None else False,
+        'total_steps': len(steps),
+        'created_by': exercise.created_by,
+        'created_at': _iso(exercise.created_at),
+        'updated_by': exercise.updated_by,
+        'updated_at': _iso(exercise.updated_at),
+        'steps': steps,
+    }
+
+
+def _step_entry(step, actions: list) -> dict:
+    """Equivalente a `StudyInteractiveExerciseStep.to_dict(include_actions=True)`."""
+    from app.models.study_content import normalize_html_spaces, transform_to_cdn_url
+    return {
+        'id': step.id,
+        'exercise_id': step.exercise_id,
+        'step_number': step.step_number,
+        'title': normalize_html_spaces(step.title) if step.title else step.title,
+        'description': normalize_html_spaces(step.description) if step.description else step.description,
+        'image_url': transform_to_cdn_url(step.image_url),
+        'image_width': step.image_width,
+        'image_height': step.image_height,
+        'total_actions': len(actions),
+        'created_at': _iso(step.created_at),
+        'updated_at': _iso(step.updated_at),
+        'actions': actions,
+    }
+
+
+def build_material_manifest(material_id: int) -> Optional[dict]:
+    """Serializa el árbol completo del material con una query por tabla
+    (material, sesiones, temas, 4 tipos de contenido, pasos, acciones y
+    paquetes SCORM). None si el material no existe."""
+    from app.models.study_content import (
+        StudyMaterial, StudySession, StudyTopic, StudyReading, StudyVideo,
+        StudyDownloadableExercise, StudyInteractiveExercise,
+        StudyInteractiveExerciseStep, StudyInteractiveExerciseAction,
+    )
+    from app.models.study_scorm import StudyScormPackage
+
+    material = (
+        db.session.query(StudyMaterial.title, StudyMaterial.description)
+        .filter(StudyMaterial.id == material_id)
+        .first()
+    )
+    if material is None:
+        return None
+
+    session_ids = select(StudySession.id).where(StudySession.material_id == material_id)
+    topic_ids = select(StudyTopic.id).where(StudyTopic.session_id.in_(session_ids))
+    exercise_ids = select(StudyInteractiveExercise.id).where(StudyInteractiveExercise.topic_id.in_(topic_ids))
+    step_ids = select(StudyInteractiveExerciseStep.id).where(StudyInteractiveExerciseStep.exercise_id.in_(exercise_ids))
+
+    sessions = (
+        StudySession.query.filter(StudySession.material_id == material_id)
+        .order_by(StudySession.session_number, StudySession.id)
+        .all()
+    )
+    topics = (
+        StudyTopic.query.filter(StudyTopic.session_id.in_(session_ids))
+        .order_by(StudyTopic.order, StudyTopic.id)
+        .all()
+    )
+
+    def _by_topic(model):
+        return {row.topic_id: row.to_dict() for row in model.query.filter(model.topic_id.in_(topic_ids))}
+
+    readings = _by_topic(StudyReading)
+    videos = _by_topic(StudyVideo)
+    downloadables = _by_topic(StudyDownloadableExercise)
+    try:
+        scorm_packages = _by_topic(StudyScormPackage)
+    except Exception as e:
+        # Tabla de SCORM aún no migrada: mismo criterio que StudyTopic.to_dict
+        print(f"[MATERIAL-STRUCTURE] Warning: paquetes SCORM no disponibles para material {material_id}: {e}")
+        scorm_packages = {}
+
+    actions_by_step = {}
+    for action in (
+        StudyInteractiveExerciseAction.query.filter(StudyInteractiveExerciseAction.step_id.in_(step_ids))
+        .order_by(StudyInteractiveExerciseAction.action_number, StudyInteractiveExerciseAction.id)
+    ):
+        actions_by_step.setdefault(action.step_id, []).append(action.to_dict())
+    steps_by_exercise = {}
+    for step in (
+        StudyInteractiveExerciseStep.query.filter(StudyInteractiveExerciseStep.exercise_id.in_(exercise_ids))
+        .order_by(StudyInteractiveExerciseStep.step_number, StudyInteractiveExerciseStep.id)
+    ):
+        steps_by_exercise.setdefault(step.exercise_id, []).append(
+            _step_entry(step, actions_by_step.get(step.id, [])))
+    interactives = {
+        exercise.topic_id: _interactive_entry(exercise, steps_by_exercise.get(exercise.id, []))
+        for exercise in StudyInteractiveExercise.query.filter(StudyInteractiveExercise.topic_id.in_(topic_ids))
+    }
+
+    topics_by_session = {}
+    for topic in topics:
+        topics_by_session.setdefault(topic.session_id, []).append(_topic_entry(
+            topic,
+            readings.get(topic.id), videos.get(topic.id), downloadables.get(topic.id),
+            interactives.get(topic.id), scorm_packages.get(topic.id),
+        ))
+
+    return {
+        'material_id': material_id,
+        'title': material.title,
+        'description': material.description,
+        'sessions': [_session_entry(s, topics_by_session.get(s.id, [])) for s in sessions],
+    }
+
+
+def build_material_structure(material_id: int) -> Optional[dict]:
+    """Proyecta el manifiesto a la estructura de progreso (títulos, orden y
+    conteos por tema). None si el material no existe."""
+    manifest = get_material_manifest(material_id)
+    if manifest is None:
+        return None
+
+    sessions = []
+    total_contents = 0
+    for session in manifest['sessions']:
+        topics = []
+        for topic in session['topics']:
+            counts = {t: int(topic[key] is not None) for t, key in _CONTENT_KEYS.items()}
+            topic_total = sum(counts.values())
+            total_contents += topic_total
+            topics.append({
+                'topic_id': topic['id'],
+                'topic_number': topic['order'],
+                'title': topic['title'],
+                'total_contents': topic_total,
+                'counts': counts,
+            })
+        sessions.append({
+            'session_id': session['id'],
+            'session_number': session['session_number'],
+            'title': session['title'],
+            'topics': topics,
+        })
+
+    return {
+        'material_id': material_id,
+        'title': manifest['title'],
+        'total_contents': total_contents,
+        'sessions': sessions,
+    }
+
+
+def _local_get(store, material_id, generation, redis_ok):
+    ttl = _LOCAL_TTL if redis_ok else _LOCAL_TTL_NO_REDIS
+    with _local_lock:
+        entry = store.get(material_id)
+        if entry is None:
+            return None
+        entry_gen, loaded_at, value = entry
+        if entry_gen != generation or (time.time() - loaded_at) > ttl:
+            store.pop(material_id, None)
+            return None
+        store.move_to_end(material_id)
+        return value
+
+
+def _local_put(store, max_items, material_id, generation, value):
+    with _local_lock:
+        store[material_id] = (generation, time.time(), value)
+        store.move_to_end(material_id)
+        while len(store) > max_items:
+            store.popitem(last=False)
+
+
+def _get_cached(material_id, store, max_items, key_fn, builder: Callable[[], Optional[dict]]):
+    """Lectura en dos niveles (proceso → Redis → builder) bajo la generación
+    actual del material."""
+    generation, redis_ok = _read_generation(material_id)
+
+    value = _local_get(store, material_id, generation, redis_ok)
+    if value is not None:
+        return value
+
+    if redis_ok:
+        try:
+            value = cache.get(key_fn(material_id, generation))
+        except Exception as e:
+            print(f"[MATERIAL-STRUCTURE] Warning: cache.get falló para material {material_id}: {e}")
+            value = None
+        if value is not None:
+            _local_put(store, max_items, material_id, generation, value)
+            return value
+
+    value = builder()
+    if value is None:
+        return None
+    _local_put(store, max_items, material_id, generation, value)
+    if redis_ok:
+        try:
+            cache.set(key_fn(material_id, generation), value, timeout=_REDIS_TTL)
+        except Exception as e:
+            print(f"[MATERIAL-STRUCTURE] Warning: cache.set falló para material {material_id}: {e}")
+    return value
+
+
+def get_material_manifest(material_id: int) -> Optional[dict]:
+    """Retorna el manifiesto del material (de solo lectura), None si no existe.
+
+    Hit local: 1 GET a Redis (generación). Hit en Redis: 2 GETs.
+    Miss: una query por tabla + SET en Redis.
+    """
+    return _get_cached(material_id, _local_manifests, _LOCAL_MAX_MANIFESTS, _manifest_key,
+                       lambda: build_material_manifest(material_id))
+
+
+def get_material_structure(material_id: int) -> Optional[dict]:
+    """Retorna la estructura del material (de solo lectura), None si no existe.
+
+    Hit local: 1 GET a Redis (generación). Hit en Redis: 2 GETs.
+    Miss: se proyecta desde el manifiesto (que a su vez puede venir de cache).
+    """
+    return _get_cached(material_id, _local_cache, _LOCAL_MAX_MATERIALS, _structure_key,
+                       lambda: build_material_structure(material_id))
+
+
+def find_session(manifest: dict, session_id: int) -> Optional[dict]:
+    """Sesión del manifiesto por id, o None."""
+    for session in manifest['sessions']:
+        if session['id'] == session_id:
+            return session
+    return None
+
+
+def find_topic(manifest: dict, session_id: int, topic_id: int) -> Optional[dict]:
+    """Tema del manifiesto dentro de la sesión indicada, o None."""
+    session = find_session(manifest, session_id)
+    if session is None:
+        return None
+    for topic in session['topics']:
+        if topic['id'] == topic_id:
+            return topic
+    return None
+
+
+def invalidate_material_structure(material_id: Optional[int]) -> None:
+    """Rota la generación del material para que todos los workers
+    reconstruyan manifiesto y estructura.
+
+    Llamar DESPUÉS del commit de cualquier cambio en sesiones, temas o contenidos.
+    """
+    if material_id is None:
+        return
+    with _local_lock:
+        _local_cache.pop(material_id, None)
+        _local_manifests.pop(material_id, None)
+    try:
+        cache.set(_gen_key(material_id), uuid.uuid4().hex, timeout=0)
+    except Exception as e:
+        print(f"[MATERIAL-STRUCTURE] Warning: no se pudo invalidar material {material_id}: {e}")
+
+
+def invalidate_topic_material(topic_id: Optional[int]) -> None:
+    """Invalida el material al que pertenece el tema (rutas que solo
+    conocen el topic_id, p. ej. vincular paquetes SCORM)."""
+    from app.models.study_content import StudySession, StudyTopic
+
+    if topic_id is None:
+        return
+    material_id = (
+        db.session.query(StudySession.material_id)
+        .join(StudyTopic, StudyTopic.session_id == StudySession.id)
+        .filter(StudyTopic.id == topic_id)
+        .scalar()
+    )
+    invalidate_material_structure(material_id)
+
+
+def clear_local_material_structures() -> None:
+    """Vacía el cache en proceso (tests / mantenimiento)."""
+    with _local_lock:
+        _local_cache.clear()
+        _local_manifests.clear()
+
+
+def build_material_progress(material_id: int, user_id: str) -> Optional[dict]:
+    """Árbol de progreso del usuario en el material: estructura cacheada +
+    una query de student_content_progress. None si el material no existe."""
+    from app.models.study_content import StudySession, StudyTopic
+    from app.models.student_progress import StudentContentProgress
+
+    structure = get_material_structure(material_id)
+    if structure is None:
+        return None
+
+    progress_rows = (
+        db.session.query(
+            StudentContentProgress.topic_id, StudentContentProgress.content_type,
+            StudentContentProgress.content_id, StudentContentProgress.is_completed,
+            StudentContentProgress.score,
+        )
+        .join(StudyTopic, StudyTopic.id == StudentContentProgress.topic_id)
+        .join(StudySession, StudySession.id == StudyTopic.session_id)
+        .filter(
+            StudySession.material_id == material_id,
+            StudentContentProgress.user_id == user_id,
+            or_(
+                StudentContentProgress.is_completed == True,  # noqa: E712
+                and_(StudentContentProgress.content_type == 'interactive',
+                        StudentContentProgress.score.isnot(None)),
+            ),
+        )
+        .order_by(StudentContentProgress.id)
+        .all()
+    )
+
+    completed_by_topic = {}
+    scores_by_topic = {}
+    # Primero los completados; luego la mejor calificación de interactivos
+    # aún no aprobados (< 80%) si el tema no tiene ya un score completado
+    for topic_id, content_type, content_id, is_completed, score in progress_rows:
+        if not is_completed or content_type not in CONTENT_TYPES:
+            continue
+        completed_by_topic.setdefault(topic_id, {t: [] for t in CONTENT_TYPES})[content_type].append(content_id)
+        if content_type == 'interactive' and score is not None:
+            scores_by_topic.setdefault(topic_id, {})[content_id] = score
+    for topic_id, content_type, content_id, is_completed, score in progress_rows:
+        if is_completed or content_type != 'interactive' or score is None:
+            continue
+        topic_scores = scores_by_topic.setdefault(topic_id, {})
+        if content_id not in topic_scores:
+            topic_scores[content_id] = score
+
+    completed_content_ids = {t: [] for t in CONTENT_TYPES}
+    all_interactive_scores = {}
+    completed_contents = 0
+    sessions_progress = []
+    for session in structure['sessions']:
+        topics = []
+        for topic in session['topics']:
+            topic_completed = completed_by_topic.get(topic['topic_id'], {t: [] for t in CONTENT_TYPES})
+            topic_scores = scores_by_topic.get(topic['topic_id'], {})
+            topic_completed_count = sum(len(ids) for ids in topic_completed.values())
+            topic_total = topic['total_contents']
+            for content_type, ids in topic_completed.items():
+                completed_content_ids[content_type].extend(ids)
+            all_interactive_scores.update(topic_scores)
+            completed_contents += topic_completed_count
+            topics.append({
+                'topic_id': topic['topic_id'],
+                'topic_number': topic['topic_number'],
+                'title': topic['title'],
+                'progress': {
+                    'total_contents': topic_total,
+                    'completed_contents': topic_completed_count,
+                    'progress_percentage': (topic_completed_count / topic_total * 100) if topic_total > 0 else 0,
+                    'is_completed': topic_completed_count == topic_total and topic_total > 0,
+                },
+                'completed_contents': topic_completed,
+                'interactive_scores': topic_scores,
+            })
+        sessions_progress.append({
+            'session_id': session['session_id'],
+            'session_number': session['session_number'],
+            'title': session['title'],
+            'topics': topics,
+        })
+
+    total_contents = structure['total_contents']
+    return {
+        'material_id': material_id,
+        'title': structure['title'],
+        'total_contents': total_contents,
+        'completed_contents': completed_contents,
+        'progress_percentage': (completed_contents / total_contents * 100) if total_contents > 0 else 0,
+        'sessions': sessions_progress,
+        'all_completed_contents': completed_content_ids,
+        'interactive_scores': all_interactive_scores,
+    }
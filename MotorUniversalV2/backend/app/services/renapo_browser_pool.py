@@ -0,0 +1,223 @@
+"""
+Pool de contextos/páginas Playwright para consultar RENAPO.
+
+Antes cada consulta abría un contexto nuevo (cookies vacías → el challenge
+de bot-protection de ~25 s otra vez) y corría en un event loop nuevo, así
+que el browser "compartido" vivía en loops distintos. Ahora:
+
+- Un solo event loop dedicado en un thread daemon (`run_on_renapo_loop`):
+  todos los objetos Playwright se crean y se usan ahí.
+- Hasta RENAPO_POOL_SIZE contextos tibios; cada uno conserva las cookies
+  del challenge, así que a partir de la segunda consulta la página carga
+  sin esperar. El tamaño del pool es también el tope de consultas
+  simultáneas.
+- Health check al tomar un slot: página abierta, browser conectado, menos
+  de RENAPO_POOL_MAX_USES usos y menos de RENAPO_POOL_MAX_AGE segundos.
+  Un slot que falló se descarta y se crea otro en el siguiente uso.
+
+Configuración por entorno:
+  RENAPO_POOL_SIZE      contextos simultáneos (default 2)
+  RENAPO_POOL_MAX_USES  consultas por contexto antes de reciclarlo (default 25)
+  RENAPO_POOL_MAX_AGE   segundos de vida de un contexto (default 900)
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+RENAPO_POOL_SIZE = max(1, int(os.getenv('RENAPO_POOL_SIZE', '2')))
+RENAPO_POOL_MAX_USES = int(os.getenv('RENAPO_POOL_MAX_USES', '25'))
+RENAPO_POOL_MAX_AGE = int(os.getenv('RENAPO_POOL_MAX_AGE', '900'))
+
+_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+               '(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36')
+
+
+# ---------------------------------------------------------------------------
+# Event loop dedicado
+# ---------------------------------------------------------------------------
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, daemon=True, name='renapo-loop')
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def submit_to_renapo_loop(coro):
+    """Agenda `coro` en el loop de RENAPO. Retorna un concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def run_on_renapo_loop(coro, timeout: Optional[float] = None):
+    """Ejecuta `coro` en el loop de RENAPO y espera el resultado."""
+    future = submit_to_renapo_loop(coro)
+    try:
+        return future.result(timeout=timeout)
+    except Exception:
+        future.cancel()
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Pool
+# ---------------------------------------------------------------------------
+
+class _Slot:
+    __slots__ = ('context', 'page', 'uses', 'created_at', 'healthy')
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.healthy = True
+
+
+class RenapoPagePool:
+    """
+    Páginas tibias con concurrencia acotada. Todos los métodos corren en el
+    loop de RENAPO.
+
+        async with pool.page() as slot:
+            await slot.page.goto(...)
+            ...
+            slot.healthy = False   # opcional: forzar reciclado
+    """
+
+    def __init__(self, size: int = None, max_uses: int = None, max_age: float = None,
+                 browser_factory: Callable[[bool], Awaitable] = None):
+        self.size = max(1, size or RENAPO_POOL_SIZE)
+        self.max_uses = max_uses or RENAPO_POOL_MAX_USES
+        self.max_age = max_age or RENAPO_POOL_MAX_AGE
+        self._browser_factory = browser_factory or _default_browser
+        self._idle = []
+        self._sem = None
+        self._in_use = 0
+        self.created = 0
+        self.recycled = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.size)
+        return self._sem
+
+    def _is_healthy(self, slot: _Slot) -> bool:
+        if not slot.healthy or slot.uses >= self.max_uses:
+            return False
+        if time.monotonic() - slot.created_at >= self.max_age:
+            return False
+        try:
+            if slot.page.is_closed():
+                return False
+            browser = slot.context.browser
+            return browser is None or browser.is_connected()
+        except Exception:
+            return False
+
+    async def _new_slot(self) -> _Slot:
+        browser = await self._browser_factory(False)
+        context = await browser.new_context(user_agent=_USER_AGENT)
+        page = await context.new_page()
+        # Anti-detección: remover propiedad webdriver
+        await page.add_init_script('Object.defineProperty(navigator, "webdriver", {get: () => undefined})')
+        self.created += 1
+        return _Slot(context, page)
+
+    async def _discard(self, slot: _Slot):
+        self.recycled += 1
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    async def acquire(self) -> _Slot:
+        await self._semaphore().acquire()
+        try:
+            slot = None
+            while self._idle and slot is None:
+                candidate = self._idle.pop()
+                if self._is_healthy(candidate):
+                    slot = candidate
+                else:
+                    await self._discard(candidate)
+            if slot is None:
+                slot = await self._new_slot()
+        except BaseException:
+            self._semaphore().release()
+            raise
+        slot.uses += 1
+        self._in_use += 1
+        return slot
+
+    async def release(self, slot: _Slot):
+        self._in_use -= 1
+        try:
+            if self._is_healthy(slot):
+                self._idle.append(slot)
+            else:
+                await self._discard(slot)
+        finally:
+            self._semaphore().release()
+
+    @asynccontextmanager
+    async def page(self):
+        slot = await self.acquire()
+        try:
+            yield slot
+        except BaseException:
+            slot.healthy = False
+            raise
+        finally:
+            await self.release(slot)
+
+    async def reset(self, restart_browser: bool = False):
+        """Descarta los slots ociosos (y reinicia el browser si se pide)."""
+        idle, self._idle = self._idle, []
+        for slot in idle:
+            await self._discard(slot)
+        if restart_browser:
+            await self._browser_factory(True)
+
+    async def close(self):
+        await self.reset()
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'idle': len(self._idle),
+            'in_use': self._in_use,
+            'created': self.created,
+            'recycled': self.recycled,
+        }
+
+
+async def _default_browser(restart: bool):
+    from app.services import renapo_service
+    if restart:
+        return await renapo_service._restart_browser()
+    return await renapo_service._ensure_browser()
+
+
+_pool = None
+
+
+def get_renapo_pool() -> RenapoPagePool:
+    """Pool global (singleton por proceso; se usa solo desde el loop de RENAPO)."""
+    global _pool
+    if _pool is None:
+        _pool = RenapoPagePool()
+    return _pool
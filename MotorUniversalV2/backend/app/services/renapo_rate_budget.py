@@ -0,0 +1,186 @@
+"""
+Presupuesto global de consultas a RENAPO (token bucket compartido).
+
+Antes cada réplica del worker se auto-limitaba con un `time.sleep(5)` entre
+CURPs: agregar réplicas multiplicaba la carga sobre gob.mx/curp sin ningún
+control. Ahora todas las réplicas sacan tokens del mismo bucket en Redis:
+
+- Un script Lua hace refill + consumo en una sola operación atómica y usa
+  el reloj del servidor Redis (TIME), así no importa el desfase de relojes
+  entre réplicas.
+- Solo se consume un token cuando de verdad se va a la red (no en hits de
+  cache, CURPs genéricas o formato inválido).
+- Si Redis no responde se usa un bucket en proceso con la misma tasa y se
+  reintenta Redis a los _REDIS_RETRY_SECONDS.
+
+Configuración por entorno:
+  RENAPO_RATE_PER_MINUTE  consultas por minuto entre TODAS las réplicas (default 12)
+  RENAPO_RATE_BURST       tokens acumulables (default 2)
+  RENAPO_BUDGET_MAX_WAIT  segundos máximos esperando un token (default 60)
+"""
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RENAPO_RATE_PER_MINUTE = float(os.getenv('RENAPO_RATE_PER_MINUTE', '12'))
+RENAPO_RATE_BURST = int(os.getenv('RENAPO_RATE_BURST', '2'))
+RENAPO_BUDGET_MAX_WAIT = float(os.getenv('RENAPO_BUDGET_MAX_WAIT', '60'))
+
+_BUCKET_KEY = 'renapo:token_bucket'
+_REDIS_RETRY_SECONDS = 30
+
+# KEYS[1] = bucket; ARGV = tasa (tokens/s), burst, tokens pedidos.
+# Regresa {concedido (1/0), espera sugerida, tokens restantes} como strings
+# (Redis trunca los números de Lua a enteros).
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+  tokens = burst
+  ts = now
+end
+if now > ts then
+  tokens = math.min(burst, tokens + (now - ts) * rate)
+  ts = now
+end
+local granted = 0
+local wait = 0
+if tokens >= requested then
+  tokens = tokens - requested
+  granted = 1
+else
+  wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return {granted, tostring(wait), tostring(tokens)}
+"""
+
+
+class _LocalBucket:
+    """Mismo algoritmo que el script Lua, en proceso (fallback sin Redis)."""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, requested: int = 1) -> Tuple[bool, float, float]:
+        with self._lock:
+            now = time.monotonic()
+            if now > self.ts:
+                self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+            if self.tokens >= requested:
+                self.tokens -= requested
+                return True, 0.0, self.tokens
+            return False, (requested - self.tokens) / self.rate, self.tokens
+
+
+class TokenBucket:
+    """
+    Token bucket compartido entre réplicas vía Redis.
+
+        bucket = get_renapo_bucket()
+        if bucket.acquire(max_wait=60):
+            ...consultar RENAPO...
+    """
+
+    def __init__(self, key: str = _BUCKET_KEY, rate_per_minute: float = None,
+                 burst: int = None, redis_client=None):
+        self.key = key
+        self.rate_per_minute = max(0.1, rate_per_minute or RENAPO_RATE_PER_MINUTE)
+        self.burst = max(1, burst or RENAPO_RATE_BURST)
+        self._redis = redis_client
+        self._script = None
+        self._redis_retry_at = 0.0
+        self._local = _LocalBucket(self.rate_per_minute / 60.0, self.burst)
+        self.backend = 'redis'
+
+    @property
+    def rate_per_second(self) -> float:
+        return self.rate_per_minute / 60.0
+
+    def _redis_script(self):
+        if self._redis is None:
+            from app.utils.rate_limit import _get_redis_client
+            self._redis = _get_redis_client()
+            if self._redis is None:
+                raise RuntimeError('Redis no disponible')
+        if self._script is None:
+            self._script = self._redis.register_script(_TOKEN_BUCKET_LUA)
+        return self._script
+
+    def try_acquire(self, requested: int = 1) -> Tuple[bool, float]:
+        """Un intento sin bloquear. Retorna (concedido, segundos sugeridos de espera)."""
+        if time.monotonic() >= self._redis_retry_at:
+            try:
+                granted, wait, _ = self._redis_script()(
+                    keys=[self.key], args=[self.rate_per_second, self.burst, requested]
+                )
+                self.backend = 'redis'
+                return int(granted) == 1, float(wait)
+            except Exception as e:
+                if self.backend == 'redis':
+                    logger.warning(f"[RENAPO-BUDGET] Redis no disponible, bucket local: {e}")
+                self.backend = 'local'
+                self._redis_retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+        granted, wait, _ = self._local.take(requested)
+        return granted, wait
+
+    def acquire(self, max_wait: Optional[float] = None, requested: int = 1) -> bool:
+        """Espera hasta obtener el token o hasta `max_wait` segundos."""
+        max_wait = RENAPO_BUDGET_MAX_WAIT if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            granted, wait = self.try_acquire(requested)
+            if granted:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(max(wait, 0.01), remaining))
+
+    def state(self) -> dict:
+        """Tokens disponibles y configuración (para métricas)."""
+        tokens = None
+        if self.backend == 'redis':
+            try:
+                raw = self._redis.hget(self.key, 'tokens') if self._redis is not None else None
+                tokens = float(raw) if raw is not None else float(self.burst)
+            except Exception:
+                tokens = None
+        else:
+            tokens = round(self._local.tokens, 2)
+        return {
+            'backend': self.backend,
+            'rate_per_minute': self.rate_per_minute,
+            'burst': self.burst,
+            'tokens': tokens,
+        }
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_renapo_bucket() -> TokenBucket:
+    """Bucket global de RENAPO (singleton por proceso, estado en Redis)."""
+    global _bucket
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None:
+                _bucket = TokenBucket()
+    return _bucket
@@ -6,6 +6,7 @@ por lo que se necesita un browser real para resolverlos.
 """
 import asyncio
 import json
+import os
 import re
 import logging
 import random
@@ -21,8 +22,9 @@ _browser_lock = threading.Lock()
 _playwright_instance = None
 _browser_instance = None
 
-RENAPO_URL = 'https://www.gob.mx/curp/'
-RENAPO_API_URL = 'https://www.gob.mx/v1/renapoCURP/consulta'
+RENAPO_URL = os.getenv('RENAPO_URL', 'https://www.gob.mx/curp/')
+RENAPO_API_URL = os.getenv('RENAPO_API_URL', 'https://www.gob.mx/v1/renapoCURP/consulta')
+RENAPO_CALL_TIMEOUT = 180  # segundos máximos de una consulta completa (con reintentos)
 CHALLENGE_MAX_WAIT = 60  # segundos máximos para resolver el challenge
 CHALLENGE_POLL_INTERVAL = 3  # segundos entre checks del challenge
 
@@ -70,6 +72,16 @@ def is_renapo_slow() -> bool:
         recent = _recent_latencies[-_LATENCY_SLOW_COUNT:]
         return all(l >= _LATENCY_SLOW_THRESHOLD for l in recent)
 
+
+def recent_renapo_latency() -> Optional[float]:
+    """Mediana de las últimas latencias exitosas (None sin datos).
+    Usado por el worker para subir o bajar su concurrencia."""
+    with _latency_lock:
+        if not _recent_latencies:
+            return None
+        ordered = sorted(_recent_latencies)
+        return ordered[len(ordered) // 2]
+
 # ── Validación de formato CURP ──
 # Entidades federativas válidas (2 letras)
 _VALID_STATES = {
@@ -291,82 +303,83 @@ async def _wait_for_challenge(page, timeout: int = CHALLENGE_MAX_WAIT) -> bool:
     return False
 
 
+async def _buscar_en_pagina(page, curp: str, attempt: int) -> dict:
+    """Busca una CURP en una página del pool y regresa el JSON del API
+    interceptado ({} si no llegó)."""
+    api_response_data = {}
+
+    async def capture_response(response):
+        """Intercepta la respuesta del API de RENAPO"""
+        if RENAPO_API_URL in response.url:
+            try:
+                body = await response.text()
+                data = json.loads(body)
+                api_response_data.update(data)
+                logger.info(f"RENAPO API response codigo={data.get('codigo')}")
+            except Exception as e:
+                logger.warning(f"Error parseando respuesta RENAPO API: {e}")
+
+    page.on('response', capture_response)
+    try:
+        # Navegar a la página de consulta. En un contexto tibio el challenge
+        # ya está resuelto (cookies) y la página queda lista de inmediato.
+        await page.goto(RENAPO_URL, wait_until='domcontentloaded', timeout=30000)
+        if not await _wait_for_challenge(page):
+            raise Exception("Timeout esperando challenge de bot-protection")
+
+        # Llenar CURP y buscar
+        textbox = page.get_by_role("textbox", name="Clave Única de Registro de")
+        await textbox.click(timeout=10000)
+        await textbox.fill(curp)
+
+        logger.info(f"RENAPO: Buscando CURP {curp} (intento {attempt}/{MAX_RETRIES})")
+        await page.get_by_role("button", name=" Buscar").click()
+
+        # Esperar a que llegue la respuesta API (max 30s)
+        for _ in range(120):
+            if api_response_data:
+                break
+            await asyncio.sleep(0.25)
+    finally:
+        page.remove_listener('response', capture_response)
+    return api_response_data
+
+
 async def _consultar_renapo_async(curp: str) -> RenapoValidationResult:
     """Consulta una CURP en RENAPO vía Playwright.
     
     Flujo:
-    1. Navega a gob.mx/curp
-    2. Espera que se resuelva el challenge de bot-protection (~25s primera vez)
+    1. Toma una página tibia del pool (renapo_browser_pool)
+    2. Navega a gob.mx/curp; el challenge de bot-protection (~25s) solo se
+       espera la primera vez por contexto
     3. Llena CURP y hace clic en Buscar
     4. Intercepta la respuesta JSON del API para obtener datos estructurados
-    5. Si no se puede interceptar, extrae datos del HTML
+
+    Debe correr en el loop de RENAPO (run_on_renapo_loop).
     """
+    from app.services.renapo_browser_pool import get_renapo_pool
+
     curp = curp.upper().strip()
 
     if is_generic_foreign_curp(curp):
         return RenapoValidationResult(curp=curp, valid=True,
                                        error='CURP genérico extranjero — no requiere validación')
 
+    pool = get_renapo_pool()
     consecutive_errors = 0  # fallos seguidos en ESTA llamada (para browser restart)
 
     for attempt in range(1, MAX_RETRIES + 1):
-        context = None
         _attempt_start = _time.time()
         try:
             # Reiniciar browser si hubo muchos fallos seguidos
             if consecutive_errors >= _BROWSER_RESTART_AFTER:
-                browser = await _restart_browser()
+                await pool.reset(restart_browser=True)
                 consecutive_errors = 0
-            else:
-                browser = await _ensure_browser()
-
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
-            )
-            page = await context.new_page()
-
-            # Anti-detección: remover propiedad webdriver
-            await page.add_init_script('Object.defineProperty(navigator, "webdriver", {get: () => undefined})')
-
-            # Variable para capturar la respuesta API
-            api_response_data = {}
-
-            async def capture_response(response):
-                """Intercepta la respuesta del API de RENAPO"""
-                if RENAPO_API_URL in response.url:
-                    try:
-                        body = await response.text()
-                        data = json.loads(body)
-                        api_response_data.update(data)
-                        logger.info(f"RENAPO API response codigo={data.get('codigo')}")
-                    except Exception as e:
-                        logger.warning(f"Error parseando respuesta RENAPO API: {e}")
 
-            page.on('response', capture_response)
-
-            # Navegar a la página de consulta
-            await page.goto(RENAPO_URL, wait_until='domcontentloaded', timeout=30000)
-
-            # Esperar que se resuelva el challenge de bot-protection
-            if not await _wait_for_challenge(page):
-                raise Exception("Timeout esperando challenge de bot-protection")
-
-            # Llenar CURP y buscar
-            textbox = page.get_by_role("textbox", name="Clave Única de Registro de")
-            await textbox.click(timeout=10000)
-            await textbox.fill(curp)
-
-            logger.info(f"RENAPO: Buscando CURP {curp} (intento {attempt}/{MAX_RETRIES})")
-            await page.get_by_role("button", name=" Buscar").click()
-
-            # Esperar a que llegue la respuesta API (max 30s)
-            for _ in range(30):
-                await asyncio.sleep(1)
-                if api_response_data:
-                    break
-
-            await context.close()
-            context = None
+            async with pool.page() as slot:
+                api_response_data = await _buscar_en_pagina(slot.page, curp, attempt)
+                if not api_response_data:
+                    slot.healthy = False  # reciclar el contexto
 
             # Procesar respuesta API interceptada
             if api_response_data:
@@ -393,12 +406,6 @@ async def _consultar_renapo_async(curp: str) -> RenapoValidationResult:
             consecutive_errors += 1
             _record_renapo_failure()
             logger.error(f"RENAPO error (intento {attempt}/{MAX_RETRIES}) para CURP {curp}: {e}")
-            if context:
-                try:
-                    await context.close()
-                except Exception:
-                    pass
-                context = None
             if attempt < MAX_RETRIES:
                 delay = _calc_retry_delay(attempt)
                 logger.info(f"CURP {curp}: Reintentando en {delay:.1f}s")
@@ -410,6 +417,13 @@ async def _consultar_renapo_async(curp: str) -> RenapoValidationResult:
             )
 
 
+# Códigos con los que RENAPO responde "la CURP no existe". Solo estos (o un
+# mensaje explícito de no encontrada) son negativos definitivos; el resto de
+# códigos != '01' son fallas del servicio.
+_RENAPO_NOT_FOUND_CODES = frozenset({'02'})
+_RENAPO_NOT_FOUND_MSG = re.compile(r'no\s+(se\s+)?(encontr|exist|localiz)', re.IGNORECASE)
+
+
 def _parse_renapo_response(curp: str, data: dict) -> RenapoValidationResult:
     """Parsea la respuesta JSON del API de RENAPO.
     
@@ -433,9 +447,16 @@ def _parse_renapo_response(curp: str, data: dict) -> RenapoValidationResult:
 
     if codigo != '01':
         logger.warning(f"RENAPO CURP {curp}: codigo={codigo} mensaje={mensaje[:100]}")
+        if codigo in _RENAPO_NOT_FOUND_CODES or _RENAPO_NOT_FOUND_MSG.search(mensaje or ''):
+            return RenapoValidationResult(
+                curp=curp, valid=False,
+                error=f'CURP no encontrada en RENAPO: {mensaje[:150]}'
+            )
+        # Cualquier otro código es un error del servicio (mantenimiento,
+        # captcha, sesión): no dice nada de la CURP y no se cachea.
         return RenapoValidationResult(
             curp=curp, valid=False,
-            error=f'CURP no encontrada en RENAPO: {mensaje[:150]}'
+            error=f'RENAPO respondió con error (codigo={codigo}): {mensaje[:150]}'
         )
 
     registros = data.get('registros', [])
@@ -483,7 +504,8 @@ def validate_curp_renapo(curp: str, use_cache: bool = True, cache_only: bool = F
 
     Si `use_cache=True` (default) se sirve desde `curp_renapo_cache`
     cuando hay entrada fresca. Las respuestas positivas se cachean 30 días,
-    las negativas 1h (por intermitencia de RENAPO).
+    las negativas definitivas CURP_NEGATIVE_CACHE_HOURS; los errores
+    transitorios no se cachean (ver _is_cacheable_result).
 
     Si `cache_only=True` y no hay entrada en cache, retorna un resultado
     `valid=False` con `error='cache_miss'` SIN llamar a RENAPO. Útil para
@@ -498,11 +520,11 @@ def validate_curp_renapo(curp: str, use_cache: bool = True, cache_only: bool = F
         return RenapoValidationResult(curp=curp, valid=True,
                                        error='CURP genérico extranjero — no requiere validación')
 
-    # Validar formato básico antes de consultar RENAPO
-    curp_pattern = re.compile(r'^[A-Z]{4}[0-9]{6}[HM][A-Z]{5}[A-Z0-9][0-9]$')
-    if not curp_pattern.match(curp):
-        return RenapoValidationResult(curp=curp, valid=False,
-                                       error='Formato de CURP inválido')
+    # Formato, entidad y dígito verificador locales: una CURP que no pasa
+    # nunca va a existir en RENAPO, no gastar una consulta en ella.
+    fmt_ok, fmt_err = validate_curp_format(curp)
+    if not fmt_ok:
+        return RenapoValidationResult(curp=curp, valid=False, error=fmt_err)
 
     # ── Cache lookup ──
     if use_cache:
@@ -528,10 +550,9 @@ def validate_curp_renapo(curp: str, use_cache: bool = True, cache_only: bool = F
         )
 
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(_consultar_renapo_async(curp))
-        # Persistir en cache (positivos 30d, negativos 1h)
+        from app.services.renapo_browser_pool import run_on_renapo_loop
+        result = run_on_renapo_loop(_consultar_renapo_async(curp), timeout=RENAPO_CALL_TIMEOUT)
+        # Persistir en cache (solo respuestas definitivas)
         try:
             _write_curp_cache(result)
         except Exception as wcache_err:
@@ -542,11 +563,6 @@ def validate_curp_renapo(curp: str, use_cache: bool = True, cache_only: bool = F
         logger.error(f"Error en validate_curp_renapo para {curp}: {e}")
         return RenapoValidationResult(curp=curp, valid=False,
                                        error=f'Error interno: {str(e)[:100]}')
-    finally:
-        try:
-            loop.close()
-        except Exception:
-            pass
 
 
 def is_renapo_circuit_open() -> bool:
@@ -600,8 +616,21 @@ def _read_curp_cache(curp: str):
         return None
 
 
+_DEFINITIVE_NEGATIVE_PREFIXES = ('curp no encontrada en renapo', 'renapo respondió sin registros')
+
+
+def _is_cacheable_result(result: 'RenapoValidationResult') -> bool:
+    """True si el resultado es una respuesta real de RENAPO (positiva o
+    "no existe"). Timeouts, errores de conexión/internos y circuit breaker
+    son del servicio, no de la CURP: cachearlos como negativos bloquearía
+    CURPs válidas durante todo el TTL."""
+    if result.valid:
+        return True
+    return (result.error or '').lower().startswith(_DEFINITIVE_NEGATIVE_PREFIXES)
+
+
 def _write_curp_cache(result: 'RenapoValidationResult'):
-    """Persiste un resultado RENAPO en el cache."""
+    """Persiste un resultado RENAPO en el cache (solo respuestas definitivas)."""
     try:
         from app.models.curp_verification import CurpRenapoCache
         from app import db
@@ -610,6 +639,8 @@ def _write_curp_cache(result: 'RenapoValidationResult'):
             return
         if is_generic_foreign_curp(result.curp):
             return  # no se cachean genéricas
+        if not _is_cacheable_result(result):
+            return
         payload = None
         if result.valid:
             payload = _json.dumps({
@@ -644,40 +675,162 @@ def _write_curp_cache(result: 'RenapoValidationResult'):
             pass
 
 
+def _read_curp_cache_many(curps) -> dict:
+    """Entradas frescas de `curp_renapo_cache` para varias CURPs en una
+    query por cada 1000 (límite de parámetros de MSSQL).
+    Retorna {curp: RenapoValidationResult}."""
+    from app.models.curp_verification import CurpRenapoCache
+    from app import db
+    import json as _json
+    found = {}
+    pending = sorted(set(curps))
+    now = datetime.utcnow()
+    try:
+        for start in range(0, len(pending), 1000):
+            chunk = pending[start:start + 1000]
+            entries = CurpRenapoCache.query.filter(
+                CurpRenapoCache.curp.in_(chunk),
+                CurpRenapoCache.expires_at > now,
+            ).all()
+            for entry in entries:
+                entry.hits = (entry.hits or 0) + 1
+                if entry.valid:
+                    try:
+                        payload = _json.loads(entry.payload_json) if entry.payload_json else {}
+                    except Exception:
+                        payload = {}
+                    found[entry.curp] = RenapoValidationResult(
+                        curp=entry.curp, valid=True,
+                        name=payload.get('name'),
+                        first_surname=payload.get('first_surname'),
+                        second_surname=payload.get('second_surname'),
+                        gender=payload.get('gender'),
+                    )
+                else:
+                    found[entry.curp] = RenapoValidationResult(
+                        curp=entry.curp, valid=False,
+                        error=entry.error_message or 'no encontrada (cache)',
+                    )
+        db.session.commit()
+    except Exception as e:
+        logger.warning(f"[RENAPO-CACHE] _read_curp_cache_many error: {e}")
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+    return found
+
+
+def _pacing_delay() -> float:
+    """Pausa antes de la siguiente consulta del batch según el circuit
+    breaker: 0 mientras RENAPO responde bien, backoff con los fallos seguidos."""
+    with _circuit_lock:
+        failures = _consecutive_failures
+    if failures <= 0:
+        return 0.0
+    return _calc_retry_delay(min(failures, 5))
+
+
+async def _validate_batch_item_async(curp: str, slots: asyncio.Semaphore,
+                                     deadline: float) -> RenapoValidationResult:
+    """Consulta de una CURP del batch (corre en el loop de RENAPO). El
+    circuito y la pausa se revisan al obtener turno, no al encolar. Cada
+    consulta toma un token del presupuesto global (renapo_rate_budget),
+    igual que el worker de la cola; `deadline` (time.monotonic) acota la
+    espera de todo el batch."""
+    from app.services.renapo_rate_budget import get_renapo_bucket
+    async with slots:
+        if _check_circuit_breaker():
+            return RenapoValidationResult(
+                curp=curp, valid=False,
+                error='Servicio RENAPO temporalmente no disponible (circuit breaker)'
+            )
+        # acquire() bloquea con time.sleep: esperar fuera del loop.
+        max_wait = max(0.0, deadline - _time.monotonic())
+        if not await asyncio.to_thread(get_renapo_bucket().acquire, max_wait):
+            # NO se cachea: es límite de tasa propio, no respuesta de RENAPO.
+            return RenapoValidationResult(
+                curp=curp, valid=False,
+                error='Presupuesto de consultas RENAPO agotado, intenta más tarde'
+            )
+        delay = _pacing_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            return await _consultar_renapo_async(curp)
+        except Exception as e:
+            _record_renapo_failure()
+            logger.error(f"Error en validate_curps_batch para {curp}: {e}")
+            return RenapoValidationResult(curp=curp, valid=False,
+                                           error=f'Error interno: {str(e)[:100]}')
+
+
 def validate_curps_batch(curps: list, progress_callback=None) -> list:
-    """Valida un lote de CURPs contra RENAPO secuencialmente.
+    """Valida un lote de CURPs contra RENAPO.
+
+    1. Pre-screen (curp_prescreen.prescreen_curps): vacías, genéricas de
+       extranjero, formato/dígito verificador inválido y las que tienen
+       entrada fresca en `curp_renapo_cache` (una query por cada 1000) se
+       resuelven sin red.
+    2. El resto se consulta en paralelo en el pool de páginas Playwright
+       (concurrencia = RENAPO_POOL_SIZE), una vez aunque se repita. No hay
+       sleep fijo: la pausa la decide el circuit breaker (_pacing_delay) y
+       con el circuito abierto las restantes regresan "temporalmente no
+       disponible" sin consultar. Cada consulta gasta un token del bucket
+       global; las que no lo obtienen en RENAPO_BUDGET_MAX_WAIT segundos
+       regresan "presupuesto agotado" (no se cachean).
     
     Args:
         curps: Lista de strings CURP.
-        progress_callback: Función opcional llamada con (index, total, result) después de cada validación.
+        progress_callback: Función opcional llamada con (completadas, total, result)
+            conforme termina cada validación (en el thread que llama).
     
     Returns:
-        Lista de RenapoValidationResult.
+        Lista de RenapoValidationResult en el mismo orden que `curps`.
     """
-    import time
-    results = []
-    total = len(curps)
-
-    for i, curp in enumerate(curps):
-        curp = (curp or '').upper().strip()
-
-        # Saltar vacíos y genéricos
-        if not curp:
-            result = RenapoValidationResult(curp='', valid=False, error='CURP vacía')
-        elif is_generic_foreign_curp(curp):
-            result = RenapoValidationResult(curp=curp, valid=True,
-                                             error='CURP genérico extranjero')
-        else:
-            result = validate_curp_renapo(curp)
-
-        results.append(result)
-
+    from concurrent.futures import as_completed
+    from app.services.curp_prescreen import prescreen_curps
+    from app.services.renapo_browser_pool import get_renapo_pool, submit_to_renapo_loop
+
+    normalized = [(c or '').upper().strip() for c in curps]
+    total = len(normalized)
+    results = [None] * total
+    done = 0
+
+    def finish(index, result):
+        nonlocal done
+        results[index] = result
+        done += 1
         if progress_callback:
-            progress_callback(i + 1, total, result)
-
-        # Pausa entre consultas para no saturar RENAPO (rate limiting)
-        if i < total - 1 and not is_generic_foreign_curp(curp) and curp:
-            time.sleep(2)
+            progress_callback(done, total, result)
+
+    screen = prescreen_curps(normalized)
+    lookup = {}
+    for i, curp in enumerate(normalized):
+        resolved = screen.get(curp)
+        if resolved is not None:
+            finish(i, resolved)
+        else:
+            lookup.setdefault(curp, []).append(i)
+
+    from app.services.renapo_rate_budget import RENAPO_BUDGET_MAX_WAIT
+    slots = asyncio.Semaphore(get_renapo_pool().size)
+    deadline = _time.monotonic() + RENAPO_BUDGET_MAX_WAIT
+    futures = {submit_to_renapo_loop(_validate_batch_item_async(curp, slots, deadline)): curp
+               for curp in lookup}
+    for future in as_completed(futures):
+        curp = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            result = RenapoValidationResult(curp=curp, valid=False,
+                                             error=f'Error interno: {str(e)[:100]}')
+        try:
+            _write_curp_cache(result)
+        except Exception as wcache_err:
+            logger.warning(f"[RENAPO-CACHE] error escribiendo cache para {curp}: {wcache_err}")
+        for i in lookup[curp]:
+            finish(i, result)
 
     return results
 
@@ -8,21 +8,24 @@ Funcionalidad:
 - Política de seguridad: rechazar paths fuera del prefijo, tamaños extremos, archivos
   con extensiones potencialmente peligrosas.
 """
-import io
 import mimetypes
 import os
 import re
 import uuid
 import zipfile
-from typing import Optional, Tuple
+from typing import BinaryIO, Optional, Tuple, Union
 from xml.etree import ElementTree as ET
 
 from app.utils.azure_storage import AzureStorageService
+from app.utils.blob_uploader import BlobUploader
+from app.utils.zip_spool import iter_zip_entries, open_zip, read_zip_entry, source_size
 
 
 # Configuración (puede sobreescribirse por env)
 SCORM_MAX_PACKAGE_BYTES = int(os.getenv('SCORM_MAX_PACKAGE_BYTES', str(2 * 1024 * 1024 * 1024)))  # 2 GB default
 SCORM_MAX_FILE_COUNT = int(os.getenv('SCORM_MAX_FILE_COUNT', '10000'))
+SCORM_UPLOAD_WORKERS = int(os.getenv('SCORM_UPLOAD_WORKERS', '8'))
+SCORM_UPLOAD_MAX_INFLIGHT_BYTES = int(os.getenv('SCORM_UPLOAD_MAX_INFLIGHT_MB', '32')) * 1024 * 1024
 
 # Extensiones que NO se suben (binarios ejecutables, scripts servidor, etc.)
 SCORM_BLOCKED_EXTENSIONS = {
@@ -280,17 +283,31 @@ def parse_manifest_tree(manifest_bytes: bytes) -> dict:
     }
 
 
+def _upload_scorm_asset(storage, data: bytes, blob_path: str, content_type: str) -> str:
+    """upload_scorm_asset regresa None si falla; se convierte en excepción
+    para que BlobUploader reintente."""
+    url = storage.upload_scorm_asset(data, blob_path, content_type)
+    if not url:
+        raise IOError(f"Falló subida de {blob_path}")
+    return url
+
+
 def extract_and_upload(
-    zip_bytes: bytes,
+    zip_source: Union[str, bytes, BinaryIO],
     package_uuid: Optional[str] = None,
 ) -> dict:
-    """Extrae el zip en memoria y sube cada archivo al blob.
+    """Extrae el zip y sube cada archivo al blob.
+
+    `zip_source` puede ser la ruta a un ZIP en disco (ver utils.zip_spool),
+    un file-like o bytes. Las entradas se leen de a una, así que con ruta o
+    file-like la memoria queda acotada por el archivo más grande del paquete.
 
     Returns dict: {prefix, base_url, manifest_path, entry_point, version, title, size_bytes, file_count}.
     """
-    if not zip_bytes:
+    package_size = source_size(zip_source)
+    if not package_size:
         raise ValueError("Paquete vacío")
-    if len(zip_bytes) > SCORM_MAX_PACKAGE_BYTES:
+    if package_size > SCORM_MAX_PACKAGE_BYTES:
         raise ValueError(f"Paquete excede {SCORM_MAX_PACKAGE_BYTES // (1024*1024)} MB")
 
     package_uuid = package_uuid or uuid.uuid4().hex
@@ -300,7 +317,7 @@ def extract_and_upload(
     storage._ensure_scorm_container()
 
     try:
-        zf = zipfile.ZipFile(io.BytesIO(zip_bytes), 'r')
+        zf = open_zip(zip_source)
     except zipfile.BadZipFile as e:
         raise ValueError(f"Archivo no es un ZIP válido: {e}")
 
@@ -338,47 +355,65 @@ def extract_and_upload(
     except Exception:
         tree_info = {'version': version, 'title': title, 'default_entry_point': entry_point, 'tree': []}
 
-    # 2) Subir archivos
+    # 2) Subir archivos (concurrente, con presupuesto de bytes en vuelo)
     file_count = 0
     total_bytes = 0
     rejected = []
+    failed = []
+    uploader = BlobUploader(max_workers=SCORM_UPLOAD_WORKERS,
+                            max_inflight_bytes=SCORM_UPLOAD_MAX_INFLIGHT_BYTES,
+                            name='scorm-upload')
+
+    def _collect(results):
+        nonlocal file_count
+        for res in results:
+            if res.ok:
+                file_count += 1
+            else:
+                failed.append(res.key)
 
-    for info in zf.infolist():
-        if info.is_dir():
-            continue
-        member = info.filename
-        if not _is_safe_member_name(member):
-            rejected.append(member)
-            continue
-        if _ext_is_blocked(member):
-            rejected.append(member)
-            continue
+    with uploader:
+        for info in iter_zip_entries(zf):
+            member = info.filename
+            if not _is_safe_member_name(member):
+                rejected.append(member)
+                continue
+            if _ext_is_blocked(member):
+                rejected.append(member)
+                continue
 
-        normalized = _normalize_member_name(member)
-        # Quitar root_dir si aplica
-        if root_dir and normalized.startswith(root_dir):
-            relative = normalized[len(root_dir):]
-        else:
-            relative = normalized
+            normalized = _normalize_member_name(member)
+            # Quitar root_dir si aplica
+            if root_dir and normalized.startswith(root_dir):
+                relative = normalized[len(root_dir):]
+            else:
+                relative = normalized
 
-        if not relative or relative.endswith('/'):
-            continue
+            if not relative or relative.endswith('/'):
+                continue
+
+            # Validar con el tamaño declarado ANTES de descomprimir
+            if total_bytes + info.file_size > SCORM_MAX_PACKAGE_BYTES:
+                raise ValueError("Paquete descomprimido excede el límite máximo")
+            try:
+                data = read_zip_entry(zf, info)
+            except Exception as e:
+                raise ValueError(f"No se pudo leer {member}: {e}")
+
+            total_bytes += len(data)
+
+            ct = guess_content_type(relative)
+            blob_path = f"{prefix}/{relative}"
+            uploader.submit(relative, _upload_scorm_asset, storage, data, blob_path, ct, size=len(data))
+            del data
+            _collect(uploader.poll())
+            if failed:
+                break
 
-        try:
-            data = zf.read(info)
-        except Exception as e:
-            raise ValueError(f"No se pudo leer {member}: {e}")
-
-        total_bytes += len(data)
-        if total_bytes > SCORM_MAX_PACKAGE_BYTES:
-            raise ValueError("Paquete descomprimido excede el límite máximo")
-
-        ct = guess_content_type(relative)
-        blob_path = f"{prefix}/{relative}"
-        url = storage.upload_scorm_asset(data, blob_path, ct)
-        if not url:
-            raise ValueError(f"Falló subida de {relative}")
-        file_count += 1
+        _collect(uploader.drain())
+    zf.close()
+    if failed:
+        raise ValueError(f"Falló subida de {sorted(failed)[0]}")
 
     base_url = storage.scorm_base_url(prefix)
     return {
@@ -0,0 +1,204 @@
+"""
+Cache de API keys SSO ya verificadas para POST /api/sso/generar_token.
+
+Resolver una API key cuesta una query por prefijo, un `ph.verify` Argon2 por
+candidato (decenas de ms de CPU), el mismo recorrido sobre las columnas
+legacy de `campuses` y un `Campus.query.get`. Los LMS de los partners llaman
+a /generar_token en cada login de alumno, así que la misma key se verifica
+miles de veces con el mismo resultado.
+
+Tras una verificación exitosa se guarda
+
+    fingerprint → {campus_id, key_id, key_hash}
+
+donde `fingerprint` es un HMAC-SHA256 de la key con llave del servidor
+(`api_key_fingerprint`), `key_id` es None para keys legacy y `key_hash` es
+un digest del hash Argon2 vigente. En hit no hay Argon2: se cargan la fila
+de la key y el plantel en una sola query (el caller las necesita de todos
+modos) y se comprueba que la key siga activa y que su hash no haya cambiado.
+Si algo no coincide, la entrada se descarta y se verifica por el camino
+lento, así que una key rotada o revocada nunca se acepta desde el cache
+aunque la invalidación se pierda.
+
+Dos niveles, igual que material_structure_service:
+
+  1. Cache en proceso (LRU acotado, TTL corto).
+  2. Redis vía `flask_caching.cache` — compartido entre workers/réplicas.
+
+Las rutas que rotan, revocan o desactivan keys llaman
+`invalidate_api_key_cache()` después del commit; rota el token de
+generación `sso_apikey_gen` y con él todas las entradas. Sin Redis el cache
+local expira a los `_LOCAL_TTL_NO_REDIS` segundos.
+
+Solo se cachean verificaciones exitosas; las keys inválidas siempre pagan
+Argon2 (el endpoint ya tiene rate limit).
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from app import db, cache
+
+
+_REDIS_TTL = 300            # segundos de vida de una entrada en Redis
+_LOCAL_MAX_KEYS = 1024      # fingerprints distintos en el LRU de proceso
+_LOCAL_TTL = 60             # tope de vida local aun con Redis disponible
+_LOCAL_TTL_NO_REDIS = 15    # sin Redis no hay generación compartida
+
+_GEN_KEY = 'sso_apikey_gen'
+
+_local_lock = threading.Lock()
+_local_cache = OrderedDict()  # fingerprint -> (generation, loaded_at, entry)
+
+
+def _entry_key(fingerprint: str, generation) -> str:
+    return f"sso_apikey:{generation or 0}:{fingerprint}"
+
+
+def _read_generation():
+    """Lee el token de generación de Redis. Retorna (generation, redis_ok)."""
+    try:
+        return cache.get(_GEN_KEY), True
+    except Exception as e:
+        print(f"[SSO-KEY-CACHE] Warning: no se pudo leer generación: {e}")
+        return None, False
+
+
+def _hash_digest(api_key_hash: Optional[str]) -> Optional[str]:
+    if not api_key_hash:
+        return None
+    return hashlib.sha256(api_key_hash.encode('utf-8')).hexdigest()[:32]
+
+
+def _local_get(fingerprint, generation, redis_ok):
+    ttl = _LOCAL_TTL if redis_ok else _LOCAL_TTL_NO_REDIS
+    with _local_lock:
+        item = _local_cache.get(fingerprint)
+        if item is None:
+            return None
+        entry_gen, loaded_at, entry = item
+        if entry_gen != generation or (time.time() - loaded_at) > ttl:
+            _local_cache.pop(fingerprint, None)
+            return None
+        _local_cache.move_to_end(fingerprint)
+        return entry
+
+
+def _local_put(fingerprint, generation, entry):
+    with _local_lock:
+        _local_cache[fingerprint] = (generation, time.time(), entry)
+        _local_cache.move_to_end(fingerprint)
+        while len(_local_cache) > _LOCAL_MAX_KEYS:
+            _local_cache.popitem(last=False)
+
+
+def _load_verified(entry: dict):
+    """Carga (campus, api_key_row) de una entrada y confirma que sigue
+    vigente. Retorna None si la key cambió, se desactivó o ya no existe."""
+    from app.models.partner import Campus
+    from app.models.campus_api_key import CampusApiKey
+
+    if entry.get('key_id') is None:
+        campus = db.session.get(Campus, entry['campus_id'])
+        if (campus is None or not campus.api_key_active
+                or _hash_digest(campus.api_key_hash) != entry['key_hash']):
+            return None
+        return campus, None
+
+    row = (
+        db.session.query(CampusApiKey, Campus)
+        .join(Campus, Campus.id == CampusApiKey.campus_id)
+        .filter(CampusApiKey.id == entry['key_id'])
+        .first()
+    )
+    if row is None:
+        return None
+    api_key, campus = row
+    if (not api_key.is_active or api_key.campus_id != entry['campus_id']
+            or _hash_digest(api_key.api_key_hash) != entry['key_hash']):
+        return None
+    return campus, api_key
+
+
+def get_verified_api_key(fingerprint: str):
+    """Resuelve una key ya verificada sin Argon2.
+
+    Retorna (campus, api_key_row) si hay entrada vigente, o None (miss o
+    entrada obsoleta; el caller debe verificar por el camino lento).
+    """
+    generation, redis_ok = _read_generation()
+
+    entry = _local_get(fingerprint, generation, redis_ok)
+    if entry is None and redis_ok:
+        try:
+            entry = cache.get(_entry_key(fingerprint, generation))
+        except Exception as e:
+            print(f"[SSO-KEY-CACHE] Warning: cache.get falló: {e}")
+            entry = None
+        if entry is not None:
+            _local_put(fingerprint, generation, entry)
+    if entry is None:
+        return None
+
+    resolved = _load_verified(entry)
+    if resolved is None:
+        forget_api_key(fingerprint)
+    return resolved
+
+
+def remember_api_key(fingerprint: str, campus, api_key_row) -> None:
+    """Guarda una verificación exitosa bajo la generación actual."""
+    if api_key_row is not None:
+        entry = {
+            'campus_id': api_key_row.campus_id,
+            'key_id': api_key_row.id,
+            'key_hash': _hash_digest(api_key_row.api_key_hash),
+        }
+    else:
+        entry = {
+            'campus_id': campus.id,
+            'key_id': None,
+            'key_hash': _hash_digest(campus.api_key_hash),
+        }
+    generation, redis_ok = _read_generation()
+    _local_put(fingerprint, generation, entry)
+    if redis_ok:
+        try:
+            cache.set(_entry_key(fingerprint, generation), entry, timeout=_REDIS_TTL)
+        except Exception as e:
+            print(f"[SSO-KEY-CACHE] Warning: cache.set falló: {e}")
+
+
+def forget_api_key(fingerprint: str) -> None:
+    """Descarta la entrada de un fingerprint (local y Redis)."""
+    generation, redis_ok = _read_generation()
+    with _local_lock:
+        _local_cache.pop(fingerprint, None)
+    if redis_ok:
+        try:
+            cache.delete(_entry_key(fingerprint, generation))
+        except Exception as e:
+            print(f"[SSO-KEY-CACHE] Warning: cache.delete falló: {e}")
+
+
+def invalidate_api_key_cache() -> None:
+    """Invalida todas las keys verificadas en todos los workers.
+
+    Llamar DESPUÉS del commit al rotar, revocar o desactivar una API key
+    (multi-key o legacy) o el módulo SSO de un plantel.
+    """
+    with _local_lock:
+        _local_cache.clear()
+    try:
+        cache.set(_GEN_KEY, uuid.uuid4().hex, timeout=0)
+    except Exception as e:
+        print(f"[SSO-KEY-CACHE] Warning: no se pudo rotar la generación: {e}")
+
+
+def clear_local_api_key_cache() -> None:
+    """Vacía el cache en proceso (tests / mantenimiento)."""
+    with _local_lock:
+        _local_cache.clear()
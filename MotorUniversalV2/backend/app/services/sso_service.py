@@ -35,6 +35,8 @@ from app.models.partner import GroupExam, GroupExamMaterial, GroupExamMember
 from app.models.campus_api_key import CampusApiKey, CampusApiKeyAssignment
 from app.models.sso_token import SsoToken
 from app.models.activity_log import log_activity
+from app.services.sso_api_key_cache import get_verified_api_key, remember_api_key
+from app.utils.sso_crypto import api_key_fingerprint
 
 
 SSO_TOKEN_TTL_MINUTES = 5
@@ -335,9 +337,27 @@ def find_campus_by_api_key(raw_key: str) -> Optional[Campus]:
 def find_campus_and_api_key(raw_key: str) -> tuple[Optional[Campus], Optional[CampusApiKey]]:
     """Igual que find_campus_by_api_key, pero devuelve también la fila
     `CampusApiKey` (o None si vino de la columna legacy del plantel).
+
+    Las keys ya verificadas se resuelven desde sso_api_key_cache sin Argon2;
+    la verificación completa solo corre en miss.
     """
     if not raw_key or not raw_key.startswith('evk_') or len(raw_key) < 16:
         return None, None
+
+    fingerprint = api_key_fingerprint(raw_key)
+    cached = get_verified_api_key(fingerprint)
+    if cached is not None:
+        return cached
+
+    campus, api_key = _verify_campus_api_key(raw_key)
+    if campus is not None:
+        remember_api_key(fingerprint, campus, api_key)
+    return campus, api_key
+
+
+def _verify_campus_api_key(raw_key: str) -> tuple[Optional[Campus], Optional[CampusApiKey]]:
+    """Verificación completa (Argon2) contra la tabla multi-key y, como
+    fallback, contra las columnas legacy del plantel."""
     prefix = raw_key[:12]
 
     # 1) Nueva tabla multi-key
@@ -377,6 +397,7 @@ def _mark_pending_billing(
     group: CandidateGroup,
     group_exam: GroupExam,
     group_exam_member: 'GroupExamMember',
+    assigned_ecm_ids: Optional[set] = None,
 ) -> bool:
     """Marca una asignación SSO como pendiente de cobro (cobro diferido).
 
@@ -394,6 +415,10 @@ def _mark_pending_billing(
         no se marca (no se cobrará nada).
       - Coordinador resoluble (campus → partner). Si no, no se marca.
 
+    `assigned_ecm_ids` (opcional) son los ECM que el candidato ya tiene,
+    precargados por el caller con una sola query; se actualiza en sitio al
+    crear el EcmCandidateAssignment. Si es None se consulta aquí.
+
     Devuelve True si se marcó (cobro pendiente), False si quedó libre.
     """
     from flask import current_app
@@ -436,10 +461,13 @@ def _mark_pending_billing(
         exam_name = exam.name if exam else f'exam_{group_exam.exam_id}'
         ecm_id = getattr(exam, 'competency_standard_id', None) if exam else None
         if ecm_id:
-            existing_ecm = EcmCandidateAssignment.query.filter_by(
-                user_id=user.id,
-                competency_standard_id=ecm_id,
-            ).first()
+            if assigned_ecm_ids is not None:
+                existing_ecm = ecm_id in assigned_ecm_ids
+            else:
+                existing_ecm = EcmCandidateAssignment.query.filter_by(
+                    user_id=user.id,
+                    competency_standard_id=ecm_id,
+                ).first()
             if existing_ecm:
                 return False  # ya tenía ECM, no se cobrará
 
@@ -466,6 +494,8 @@ def _mark_pending_billing(
                     validity_months=validity_months,
                     expires_at=expires_at,
                 ))
+                if assigned_ecm_ids is not None:
+                    assigned_ecm_ids.add(ecm_id)
             except Exception as e:
                 current_app.logger.error(
                     f"[SSO BILLING] Error creando EcmCandidateAssignment: {e}"
@@ -911,16 +941,36 @@ def apply_standard_assignments(
     if not resolved_standards:
         return materialized
 
+    from app.services.bulk_assignment_service import find_ecm_assignments
+
     campus = group.campus if group.campus else Campus.query.get(group.campus_id)
     default_validity = (campus.assignment_validity_months if campus else None) or 12
     created_by_id = api_key.created_by_id if api_key is not None else None
 
+    # Estado actual en queries fijas (no una por estándar): asignaciones del
+    # grupo para estos exámenes, membresías del candidato y ECM que ya tiene.
+    exam_ids = [exam.id for _, exam in resolved_standards]
+    group_exams: dict = {}
+    for existing_ge in (
+        GroupExam.query
+        .filter(GroupExam.group_id == group.id, GroupExam.exam_id.in_(exam_ids))
+        .order_by(GroupExam.id)
+        .all()
+    ):
+        group_exams.setdefault(existing_ge.exam_id, existing_ge)
+    member_ge_ids: set = set()
+    if group_exams:
+        member_ge_ids = {
+            ge_id for (ge_id,) in db.session.query(GroupExamMember.group_exam_id).filter(
+                GroupExamMember.user_id == user.id,
+                GroupExamMember.group_exam_id.in_([ge.id for ge in group_exams.values()]),
+            ).all()
+        }
+    ecm_ids = [exam.competency_standard_id for _, exam in resolved_standards if exam.competency_standard_id]
+    assigned_ecm_ids = {ecm_id for (_, ecm_id) in find_ecm_assignments([user.id], ecm_ids)}
+
     for std, exam in resolved_standards:
-        ge: Optional[GroupExam] = (
-            GroupExam.query
-            .filter_by(group_id=group.id, exam_id=exam.id)
-            .first()
-        )
+        ge: Optional[GroupExam] = group_exams.get(exam.id)
 
         if ge is None:
             now = datetime.utcnow()
@@ -956,6 +1006,7 @@ def apply_standard_assignments(
             )
             db.session.add(ge)
             db.session.flush()
+            group_exams[exam.id] = ge  # el mismo examen puede repetirse en la llamada
             log_activity(
                 user=None,
                 action_type='sso_apikey_standard_materialized',
@@ -972,17 +1023,16 @@ def apply_standard_assignments(
             )
 
         # Ledger por candidato + cobro diferido
-        existing_gem = GroupExamMember.query.filter_by(
-            group_exam_id=ge.id, user_id=user.id
-        ).first()
-        if existing_gem is None:
+        if ge.id not in member_ge_ids:
             try:
                 new_gem = GroupExamMember(group_exam_id=ge.id, user_id=user.id)
                 db.session.add(new_gem)
                 db.session.flush()
+                member_ge_ids.add(ge.id)
                 if api_key is not None:
                     try:
-                        _mark_pending_billing(api_key, user, group, ge, new_gem)
+                        _mark_pending_billing(api_key, user, group, ge, new_gem,
+                                              assigned_ecm_ids=assigned_ecm_ids)
                     except Exception as e:
                         from flask import current_app
                         current_app.logger.error(
@@ -14,6 +14,11 @@ Cada topic se renderiza como un único SCO HTML que muestra:
     - Ejercicio interactivo (render estático de pasos y acciones)
     - SCORM anidado (iframe al launch_url del paquete original)
 
+El árbol se lee del manifiesto versionado del material
+(`material_structure_service.get_material_manifest`), el mismo que sirven
+las rutas de lectura del candidato: los nodos son dicts con el formato de
+`to_dict` y las URLs ya pasaron por el CDN.
+
 Salida: BytesIO con el ZIP listo para descargar.
 """
 from __future__ import annotations
@@ -24,13 +29,9 @@ import json
 import re
 import zipfile
 from datetime import datetime, timezone
-from typing import Iterable
 
-from app.models.study_content import (
-    StudyMaterial,
-    StudySession,
-    StudyTopic,
-)
+from app.models.study_content import StudyMaterial
+from app.services.material_structure_service import get_material_manifest
 
 
 # ── Helpers de slug/escape ──────────────────────────────────────────────
@@ -148,11 +149,11 @@ _SCORM_API_JS = r"""
 
 # ── Renderers ───────────────────────────────────────────────────────────
 
-def _render_reading_section(reading) -> str:
+def _render_reading_section(reading: dict | None) -> str:
     if not reading:
         return ''
-    title = _esc(reading.title or 'Lectura')
-    raw = reading.content or ''
+    title = _esc(reading['title'] or 'Lectura')
+    raw = reading['content'] or ''
     # El cliente renderiza markdown con marked.js (CDN). Lo embebemos como
     # texto plano dentro de un <script type="text/markdown"> para que no se
     # interprete como HTML hasta que marked() lo convierta.
@@ -198,13 +199,13 @@ def _vimeo_clean_embed(url: str) -> str | None:
     return f'https://player.vimeo.com/video/{vid}?{_VIMEO_CLEAN_PARAMS}'
 
 
-def _render_video_section(video) -> str:
+def _render_video_section(video: dict | None) -> str:
     if not video:
         return ''
-    title = _esc(video.title or 'Video')
-    url = video.video_url or ''
-    vtype = (video.video_type or '').lower()
-    transcript = video.description if hasattr(video, 'description') else None
+    title = _esc(video['title'] or 'Video')
+    url = video['video_url'] or ''
+    vtype = (video['video_type'] or '').lower()
+    transcript = video.get('description')
     # Heurística: si la URL contiene youtube/vimeo o el tipo es 'embed', usar iframe.
     is_embed = (
         'youtube.com' in url
@@ -241,36 +242,36 @@ def _render_video_section(video) -> str:
     )
 
 
-def _render_downloadable_section(dl) -> str:
+def _render_downloadable_section(dl: dict | None) -> str:
     if not dl:
         return ''
-    title = _esc(dl.title or 'Material descargable')
-    fname = _esc(dl.file_name or 'archivo')
+    title = _esc(dl['title'] or 'Material descargable')
+    fname = _esc(dl['file_name'] or 'archivo')
     return (
         f'<div class="section"><h2><span class="pill">Descargable</span>{title}</h2>'
         f'<div class="download-card"><div style="flex:1"><strong>{fname}</strong>'
-        f'<div style="font-size:13px;color:#64748b">{_esc(dl.file_type or "")}</div></div>'
-        f'<a href="{_esc(dl.file_url)}" target="_blank" rel="noopener">Descargar</a></div></div>'
+        f'<div style="font-size:13px;color:#64748b">{_esc(dl["file_type"] or "")}</div></div>'
+        f'<a href="{_esc(dl["file_url"])}" target="_blank" rel="noopener">Descargar</a></div></div>'
     )
 
 
-def _render_interactive_section(ex) -> str:
+def _render_interactive_section(ex: dict | None) -> str:
     if not ex:
         return ''
-    title = _esc(ex.title or 'Ejercicio interactivo')
-    desc = _esc(ex.description or '')
-    steps = ex.steps.all() if hasattr(ex, 'steps') and ex.steps else []
+    title = _esc(ex['title'] or 'Ejercicio interactivo')
+    desc = _esc(ex['description'] or '')
+    steps = ex.get('steps') or []
     if not steps:
         body = '<div class="empty">Este ejercicio no tiene pasos registrados.</div>'
     else:
         items = []
         for st in steps:
-            actions = st.actions.all() if hasattr(st, 'actions') and st.actions else []
+            actions = st.get('actions') or []
             actions_html = ''
             if actions:
                 rows = ''.join(
-                    f'<tr><td>{_esc(a.action_number)}</td><td>{_esc(a.action_type)}</td>'
-                    f'<td>{_esc(a.label or "")}</td><td>{_esc(a.correct_answer or "")}</td></tr>'
+                    f'<tr><td>{_esc(a["action_number"])}</td><td>{_esc(a["action_type"])}</td>'
+                    f'<td>{_esc(a["label"] or "")}</td><td>{_esc(a["correct_answer"] or "")}</td></tr>'
                     for a in actions
                 )
                 actions_html = (
@@ -279,13 +280,13 @@ def _render_interactive_section(ex) -> str:
                     f'</tr></thead><tbody>{rows}</tbody></table>'
                 )
             img_html = (
-                f'<img class="step-image" src="{_esc(st.image_url)}" alt="">'
-                if getattr(st, 'image_url', None) else ''
+                f'<img class="step-image" src="{_esc(st["image_url"])}" alt="">'
+                if st.get('image_url') else ''
             )
             items.append(
                 '<li class="step-item">'
-                f'<h3>{_esc(st.title or f"Paso {st.step_number}")}</h3>'
-                f'<p>{_esc(st.description or "")}</p>'
+                f'<h3>{_esc(st["title"] or "Paso " + str(st["step_number"]))}</h3>'
+                f'<p>{_esc(st["description"] or "")}</p>'
                 f'{img_html}{actions_html}</li>'
             )
         body = '<ol class="steps-list">' + ''.join(items) + '</ol>'
@@ -296,13 +297,13 @@ def _render_interactive_section(ex) -> str:
     )
 
 
-def _render_scorm_embed_section(pkg) -> str:
+def _render_scorm_embed_section(pkg: dict | None) -> str:
     if not pkg:
         return ''
-    title = _esc(pkg.title or 'Paquete SCORM')
+    title = _esc(pkg['title'] or 'Paquete SCORM')
     return (
         f'<div class="section"><h2><span class="pill">SCORM embebido</span>{title}</h2>'
-        f'<iframe class="scorm-embed" src="{_esc(pkg.launch_url)}" '
+        f'<iframe class="scorm-embed" src="{_esc(pkg["launch_url"])}" '
         'sandbox="allow-scripts allow-same-origin allow-forms allow-popups"></iframe>'
         '<p style="font-size:12px;color:#94a3b8;margin-top:8px">Este SCO embebe un paquete SCORM externo.</p></div>'
     )
@@ -310,30 +311,30 @@ def _render_scorm_embed_section(pkg) -> str:
 
 def _render_topic_html(
     material: StudyMaterial,
-    session: StudySession,
-    topic: StudyTopic,
+    session: dict,
+    topic: dict,
     prev_href: str | None,
     next_href: str | None,
 ) -> str:
     sections: list[str] = []
     try:
-        sections.append(_render_reading_section(topic.reading))
+        sections.append(_render_reading_section(topic['reading']))
     except Exception:
         pass
     try:
-        sections.append(_render_video_section(topic.video))
+        sections.append(_render_video_section(topic['video']))
     except Exception:
         pass
     try:
-        sections.append(_render_downloadable_section(topic.downloadable_exercise))
+        sections.append(_render_downloadable_section(topic['downloadable_exercise']))
     except Exception:
         pass
     try:
-        sections.append(_render_interactive_section(topic.interactive_exercise))
+        sections.append(_render_interactive_section(topic['interactive_exercise']))
     except Exception:
         pass
     try:
-        sections.append(_render_scorm_embed_section(topic.scorm_package))
+        sections.append(_render_scorm_embed_section(topic['scorm_package']))
     except Exception:
         pass
     sections = [s for s in sections if s]
@@ -353,11 +354,11 @@ def _render_topic_html(
 
     crumbs = (
         f'<div class="crumbs">{_esc(material.title)} › '
-        f'Sesión {_esc(session.session_number)}: {_esc(session.title)}</div>'
+        f'Sesión {_esc(session["session_number"])}: {_esc(session["title"])}</div>'
     )
 
-    title_full = _esc(topic.title or 'Tema')
-    desc = _esc(topic.description or '')
+    title_full = _esc(topic['title'] or 'Tema')
+    desc = _esc(topic['description'] or '')
     desc_html = f'<p>{desc}</p>' if desc else ''
     return f"""<!doctype html>
 <html lang="es">
@@ -495,7 +496,10 @@ def build_scorm_zip(material: StudyMaterial) -> tuple[io.BytesIO, int]:
 
     Returns (BytesIO posicionado en 0, file_count).
     """
-    sessions: Iterable[StudySession] = material.sessions.all()
+    manifest = get_material_manifest(material.id)
+    if manifest is None:
+        raise ValueError(f'Material {material.id} no encontrado')
+    sessions: list[dict] = manifest['sessions']
 
     # Precalcular payload de jerarquía con hrefs únicos.
     sessions_payload: list[dict] = []
@@ -511,12 +515,11 @@ def build_scorm_zip(material: StudyMaterial) -> tuple[io.BytesIO, int]:
         return candidate
 
     for sess in sessions:
-        sess_dir = _unique_dir(f"sesion_{sess.session_number}_{_slug(sess.title)}")
+        sess_dir = _unique_dir(f"sesion_{sess['session_number']}_{_slug(sess['title'])}")
         topics_payload: list[dict] = []
         topic_used: set[str] = set()
-        topics = sess.topics.all()
-        for topic in topics:
-            t_base = f"tema_{topic.order}_{_slug(topic.title)}"
+        for topic in sess['topics']:
+            t_base = f"tema_{topic['order']}_{_slug(topic['title'])}"
             candidate = t_base
             i = 2
             while candidate in topic_used:
@@ -526,17 +529,17 @@ def build_scorm_zip(material: StudyMaterial) -> tuple[io.BytesIO, int]:
             topic_filename = f"{candidate}.html"
             topics_payload.append({
                 'topic': topic,
-                'title': topic.title or f'Tema {topic.order}',
-                'item_id': f'ITEM-T-{topic.id}',
-                'res_id': f'RES-T-{topic.id}',
+                'title': topic['title'] or f'Tema {topic["order"]}',
+                'item_id': f'ITEM-T-{topic["id"]}',
+                'res_id': f'RES-T-{topic["id"]}',
                 'href': f'{sess_dir}/{topic_filename}',
                 'filename': topic_filename,
             })
         sessions_payload.append({
             'session': sess,
-            'number': sess.session_number,
-            'title': sess.title or f'Sesión {sess.session_number}',
-            'item_id': f'ITEM-S-{sess.id}',
+            'number': sess['session_number'],
+            'title': sess['title'] or f'Sesión {sess["session_number"]}',
+            'item_id': f'ITEM-S-{sess["id"]}',
             'dir': sess_dir,
             'topics': topics_payload,
         })
@@ -9,7 +9,8 @@ from datetime import datetime, timedelta, timezone
 import os
 import uuid
 import re
-from urllib.parse import urlparse, parse_qs
+import unicodedata
+from urllib.parse import urlparse, parse_qs, quote
 from werkzeug.utils import secure_filename
 
 # Configuración de SAS tokens
@@ -29,6 +30,14 @@ if not VIDEO_ACCOUNT_KEY:
             VIDEO_ACCOUNT_NAME = _name_match.group(1)
 
 
+def attachment_disposition(filename: str) -> str:
+    """Content-Disposition de descarga válido para cualquier nombre: respaldo
+    ASCII en `filename` y el nombre completo en `filename*` (RFC 5987)."""
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    ascii_name = re.sub(r'[^\w .()\-]', '_', ascii_name) or 'descarga'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
 class AzureStorageService:
     """Servicio para subir archivos a Azure Blob Storage"""
     
@@ -849,6 +858,69 @@ class AzureStorageService:
             return ''
         return f"https://{account_name}.blob.core.windows.net/{self.SCORM_CONTAINER}/{prefix.rstrip('/')}"
 
+    # ──────────────────────────────────────────────────────────────
+    # ZIPs de certificados (contenedor privado, descarga por SAS)
+    # ──────────────────────────────────────────────────────────────
+    CERT_ZIP_CONTAINER = os.getenv('AZURE_CERT_ZIP_CONTAINER', 'certificate-zips')
+
+    def _ensure_cert_zip_container(self):
+        """Garantiza que el contenedor de ZIPs exista (privado: solo SAS)."""
+        if not self.blob_service_client:
+            return False
+        try:
+            container = self.blob_service_client.get_container_client(self.CERT_ZIP_CONTAINER)
+            if not container.exists():
+                self.blob_service_client.create_container(self.CERT_ZIP_CONTAINER)
+            return True
+        except AzureError as e:
+            print(f"Error ensuring certificate ZIP container: {e}")
+            return False
+
+    def upload_certificate_zip(self, file_path: str, blob_name: str, download_name: str):
+        """Sube un ZIP desde disco por streaming (sin cargarlo en memoria).
+
+        Returns: blob_name o None si falla.
+        """
+        if not self._ensure_cert_zip_container():
+            return None
+        try:
+            client = self.blob_service_client.get_blob_client(
+                container=self.CERT_ZIP_CONTAINER,
+                blob=blob_name,
+            )
+            with open(file_path, 'rb') as fh:
+                client.upload_blob(
+                    fh,
+                    length=os.path.getsize(file_path),
+                    overwrite=True,
+                    max_concurrency=4,
+                    content_settings=ContentSettings(
+                        content_type='application/zip',
+                        content_disposition=attachment_disposition(download_name),
+                    ),
+                )
+            return blob_name
+        except AzureError as e:
+            print(f"Error uploading certificate ZIP {blob_name}: {e}")
+            return None
+
+    def generate_certificate_zip_sas_url(self, blob_name: str, ttl_minutes: int = 60,
+                                         download_name: str = None):
+        """URL de descarga (SAS de solo lectura) de un ZIP de certificados."""
+        account_name, account_key = self._get_main_account_credentials()
+        if not (account_name and account_key and blob_name):
+            return None
+        sas = generate_blob_sas(
+            account_name=account_name,
+            container_name=self.CERT_ZIP_CONTAINER,
+            blob_name=blob_name,
+            account_key=account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.now(timezone.utc) + timedelta(minutes=ttl_minutes),
+            content_disposition=(attachment_disposition(download_name) if download_name else None),
+        )
+        return f"https://{account_name}.blob.core.windows.net/{self.CERT_ZIP_CONTAINER}/{blob_name}?{sas}"
+
     def upload_bytes(self, data, blob_name, content_type='application/octet-stream'):
         """
         Subir bytes crudos a Azure Blob Storage con blob_name explícito.
@@ -0,0 +1,188 @@
+"""
+Subidas concurrentes a blob storage con concurrencia y memoria acotadas.
+
+Lo usan la pasada 2 de la carga masiva CONOCER (ConocerBlobService) y la
+extracción de paquetes SCORM (AzureStorageService.upload_scorm_asset).
+
+- Pool de threads de tamaño fijo (las subidas son I/O; el SDK de Azure
+  libera el GIL mientras espera la red).
+- Backpressure por bytes en vuelo: submit() bloquea mientras los datos
+  pendientes superen el presupuesto, así la memoria no crece con el
+  tamaño del lote. Siempre se admite al menos una subida.
+- Reintentos con backoff exponencial para errores transitorios. ValueError
+  y TypeError se consideran errores de validación y no se reintentan.
+- Un resultado por archivo (BlobUploadResult), en orden de finalización;
+  el caller decide qué hacer con los fallidos (la BD se toca solo desde el
+  thread que llama, nunca desde los workers).
+
+La función de subida es cualquier callable, así que en pruebas se puede
+usar un stand-in en memoria o Azurite.
+
+Configuración por entorno:
+  BLOB_UPLOAD_WORKERS          threads de subida (default 8)
+  BLOB_UPLOAD_RETRIES          reintentos por archivo (default 2)
+  BLOB_UPLOAD_MAX_INFLIGHT_MB  presupuesto de bytes en vuelo (default 64)
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional
+
+BLOB_UPLOAD_WORKERS = int(os.getenv('BLOB_UPLOAD_WORKERS', '8'))
+BLOB_UPLOAD_RETRIES = int(os.getenv('BLOB_UPLOAD_RETRIES', '2'))
+BLOB_UPLOAD_MAX_INFLIGHT_BYTES = int(os.getenv('BLOB_UPLOAD_MAX_INFLIGHT_MB', '64')) * 1024 * 1024
+
+
+def _default_is_retryable(error: BaseException) -> bool:
+    return not isinstance(error, (ValueError, TypeError))
+
+
+class BlobUploadResult:
+    """Resultado de una subida: `value` es lo que regresó la función."""
+
+    __slots__ = ('key', 'ok', 'value', 'error', 'attempts', 'seconds')
+
+    def __init__(self, key, ok: bool, value=None, error: Optional[BaseException] = None,
+                 attempts: int = 1, seconds: float = 0.0):
+        self.key = key
+        self.ok = ok
+        self.value = value
+        self.error = error
+        self.attempts = attempts
+        self.seconds = seconds
+
+    def __repr__(self):
+        state = 'ok' if self.ok else f'error={self.error!r}'
+        return f'<BlobUploadResult {self.key!r} {state} attempts={self.attempts}>'
+
+
+class BlobUploader:
+    """
+    Uploader con concurrencia acotada.
+
+        with BlobUploader() as uploader:
+            for item in items:
+                uploader.submit(item.id, storage.upload, data, size=len(data))
+                for result in uploader.poll():
+                    ...
+            for result in uploader.drain():
+                ...
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 max_inflight_bytes: Optional[int] = None,
+                 retries: Optional[int] = None,
+                 backoff: float = 0.5,
+                 is_retryable: Callable[[BaseException], bool] = _default_is_retryable,
+                 name: str = 'blob-upload'):
+        self.max_workers = max(1, max_workers or BLOB_UPLOAD_WORKERS)
+        self.max_inflight_bytes = max_inflight_bytes or BLOB_UPLOAD_MAX_INFLIGHT_BYTES
+        self.retries = BLOB_UPLOAD_RETRIES if retries is None else max(0, retries)
+        self.backoff = backoff
+        self.is_retryable = is_retryable
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._done: 'queue.Queue[BlobUploadResult]' = queue.Queue()
+        self._cond = threading.Condition()
+        self._inflight_bytes = 0
+        self._inflight_count = 0
+        self._cancelled = False
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def submit(self, key: Any, fn: Callable[..., Any], *args, size: int = 0, **kwargs):
+        """
+        Encola una subida. Bloquea mientras los bytes en vuelo más `size`
+        excedan el presupuesto (salvo que no haya nada en vuelo).
+        """
+        size = max(0, int(size or 0))
+        with self._cond:
+            while (self._inflight_count > 0
+                   and self._inflight_bytes + size > self.max_inflight_bytes):
+                self._cond.wait()
+            self._inflight_bytes += size
+            self._inflight_count += 1
+        self._executor.submit(self._run, key, size, fn, args, kwargs)
+
+    def poll(self) -> List[BlobUploadResult]:
+        """Resultados ya terminados, sin bloquear."""
+        results = []
+        while True:
+            try:
+                results.append(self._done.get_nowait())
+            except queue.Empty:
+                return results
+
+    def take(self) -> Optional[BlobUploadResult]:
+        """Espera el siguiente resultado; None si no hay nada pendiente."""
+        with self._cond:
+            if self._inflight_count == 0 and self._done.empty():
+                return None
+        return self._done.get()
+
+    def drain(self) -> Iterator[BlobUploadResult]:
+        """Espera y produce todos los resultados pendientes."""
+        while True:
+            with self._cond:
+                if self._inflight_count == 0 and self._done.empty():
+                    return
+            yield self._done.get()
+
+    @property
+    def inflight(self) -> int:
+        with self._cond:
+            return self._inflight_count
+
+    def cancel(self):
+        """Las subidas que aún no empiezan terminan con error sin ejecutarse."""
+        self._cancelled = True
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _run(self, key, size, fn, args, kwargs):
+        start = time.time()
+        attempts = 0
+        result = None
+        try:
+            while True:
+                if self._cancelled:
+                    result = BlobUploadResult(key, False, error=RuntimeError('Subida cancelada'),
+                                              attempts=attempts, seconds=time.time() - start)
+                    break
+                attempts += 1
+                try:
+                    value = fn(*args, **kwargs)
+                    result = BlobUploadResult(key, True, value=value, attempts=attempts,
+                                              seconds=time.time() - start)
+                    break
+                except Exception as e:
+                    if attempts > self.retries or not self.is_retryable(e):
+                        result = BlobUploadResult(key, False, error=e, attempts=attempts,
+                                                  seconds=time.time() - start)
+                        break
+                    time.sleep(self.backoff * (2 ** (attempts - 1)))
+        finally:
+            # Soltar referencias a los datos antes de liberar el presupuesto
+            args = kwargs = None
+            # Publicar y descontar juntos: drain() revisa ambos bajo el lock
+            with self._cond:
+                self._done.put(result)
+                self._inflight_bytes -= size
+                self._inflight_count -= 1
+                self._cond.notify_all()
@@ -1,26 +1,146 @@
 """
 Utilidades de Cache para escalabilidad
+
+Invalidación por tags con contador de generación
+------------------------------------------------
+Las llaves de cache ya no se borran buscándolas con `KEYS patrón*` (O(keyspace)
+y bloquea Redis para todos los workers). Cada respuesta cacheada se asocia a
+tags de recurso derivados de la ruta y del usuario:
+
+    user:<id>                  respuestas por usuario (dashboards, analytics)
+    exams / exam:<id>          /api/exams[/<id>...]
+    exam_results               /api/exams/results...
+    standards / standard:<id>  /api/competency-standards, /api/standards
+    study_contents / material:<id>   /api/study-contents[/<id>...]
+    groups / group:<id>        /api/partners/groups[/<id>...]
+
+Cada tag tiene un contador `tag_gen:<tag>` en el backend de cache y la llave
+de la respuesta incluye los contadores vigentes de sus tags (1 MGET por
+request). Invalidar un tag es un INCR: O(1) sin importar cuántas respuestas
+dependan de él; las entradas viejas quedan huérfanas y expiran por TTL.
+
+Cache de dos niveles (cached_with_user)
+---------------------------------------
+  1. LRU en proceso acotado con TTL corto (`_LOCAL_TTL`): un hit no toca
+     Redis. Las generaciones de tags también se recuerdan `_LOCAL_TTL`
+     segundos, así que una invalidación hecha en otro worker tarda a lo más
+     eso en verse (en el mismo proceso es inmediata).
+  2. Redis: la respuesta se guarda en un sobre con `fresh_until` y vive
+     `timeout + stale_ttl` segundos.
+
+Al vencer `fresh_until` un solo request (lock `SET NX` en Redis:
+single-flight entre workers) recalcula mientras los demás siguen
+recibiendo la versión anterior (stale-while-revalidate). En un miss sin
+versión anterior, los requests concurrentes esperan hasta `_FLIGHT_WAIT`
+segundos el resultado del que está recalculando.
+
+Contadores por endpoint (hits locales/Redis, stale, misses, tiempo de
+recálculo) en get_cache_stats(); expuestos en GET /api/health/cache-stats.
 """
+from collections import OrderedDict
 from functools import wraps
 from flask import request
 from app import cache
 import hashlib
 import json
+import pickle
+import threading
+import time
 
 
-def make_cache_key(*args, **kwargs):
+_TAG_GEN_PREFIX = 'tag_gen:'
+_FLIGHT_PREFIX = 'flight:'
+
+_LOCAL_MAX_ENTRIES = 512       # respuestas en el LRU de proceso
+_LOCAL_MAX_TAGS = 4096         # generaciones de tags recordadas en proceso
+_LOCAL_TTL = 5                 # segundos de vida en el nivel local
+_FLIGHT_TTL = 30               # vida máxima del lock de recálculo
+_FLIGHT_WAIT = 3.0             # espera máxima por el recálculo de otro request
+_FLIGHT_POLL = 0.05
+
+_local_lock = threading.Lock()
+_local_cache = OrderedDict()   # cache_key -> (expires_at, payload pickled)
+_local_generations = {}        # tag -> (expires_at, generation)
+
+_stats_lock = threading.Lock()
+_stats = {}                    # endpoint -> contadores
+
+# (prefijo de ruta, tag de colección, prefijo de tag por id). Gana el primero.
+_PATH_TAGS = (
+    ('/api/exams/results', 'exam_results', None),
+    ('/api/exams', 'exams', 'exam'),
+    ('/api/competency-standards', 'standards', 'standard'),
+    ('/api/standards', 'standards', 'standard'),
+    ('/api/study-contents', 'study_contents', 'material'),
+    ('/api/partners/groups', 'groups', 'group'),
+)
+
+
+def tags_for_path(path, user_id=None):
     """
-    Genera una clave de cache única basada en la ruta y parámetros de la request
+    Tags de invalidación de una respuesta según su ruta y usuario
     """
-    path = request.path
+    tags = []
+    if user_id is not None:
+        tags.append(f"user:{user_id}")
+    for prefix, collection_tag, item_prefix in _PATH_TAGS:
+        if path == prefix or path.startswith(prefix + '/'):
+            tags.append(collection_tag)
+            ident = path[len(prefix):].strip('/').split('/', 1)[0]
+            if item_prefix and ident.isdigit():
+                tags.append(f"{item_prefix}:{ident}")
+            break
+    return tags
+
+
+def _generation_suffix(tags):
+    """
+    Sufijo con la generación vigente de cada tag (un solo MGET para los
+    que no estén recordados en proceso).
+    Si el backend falla la excepción se propaga: los decoradores ejecutan
+    la vista sin cache (fail-open).
+    """
+    if not tags:
+        return 'g'
+    now = time.time()
+    generations = {}
+    missing = []
+    with _local_lock:
+        for tag in tags:
+            entry = _local_generations.get(tag)
+            if entry is not None and entry[0] > now:
+                generations[tag] = entry[1]
+            else:
+                missing.append(tag)
+
+    if missing:
+        values = cache.cache.get_many(*[_TAG_GEN_PREFIX + tag for tag in missing])
+        with _local_lock:
+            if len(_local_generations) >= _LOCAL_MAX_TAGS:
+                _local_generations.clear()
+            for tag, value in zip(missing, values):
+                generations[tag] = value or 0
+                _local_generations[tag] = (now + _LOCAL_TTL, value or 0)
+
+    return 'g' + '.'.join(str(generations[tag]) for tag in tags)
+
+
+def _args_hash():
     args_as_sorted_tuple = tuple(sorted(request.args.items()))
-    
+
     # Crear hash de los argumentos para keys más cortas
-    args_hash = hashlib.md5(
+    return hashlib.md5(
         json.dumps(args_as_sorted_tuple, sort_keys=True).encode()
     ).hexdigest()[:12]
-    
-    return f"{path}:{args_hash}"
+
+
+def make_cache_key(*args, **kwargs):
+    """
+    Genera una clave de cache única basada en la ruta y parámetros de la request
+    """
+    path = request.path
+    suffix = _generation_suffix(tags_for_path(path))
+    return f"{path}:{_args_hash()}:{suffix}"
 
 
 def make_cache_key_with_user(*args, **kwargs):
@@ -35,91 +155,251 @@ def make_cache_key_with_user(*args, **kwargs):
         user_id = 'anon'
     
     path = request.path
-    args_as_sorted_tuple = tuple(sorted(request.args.items()))
-    
-    args_hash = hashlib.md5(
-        json.dumps(args_as_sorted_tuple, sort_keys=True).encode()
-    ).hexdigest()[:12]
-    
-    return f"{path}:{user_id}:{args_hash}"
+    suffix = _generation_suffix(tags_for_path(path, user_id))
+    return f"{path}:{user_id}:{_args_hash()}:{suffix}"
+
+
+def _record(endpoint, counter, amount=1):
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, {
+            'local_hits': 0, 'redis_hits': 0, 'stale_served': 0,
+            'coalesced': 0, 'misses': 0, 'errors': 0,
+            'rebuild_seconds_total': 0.0, 'rebuild_seconds_max': 0.0,
+        })
+        stats[counter] += amount
+        if counter == 'rebuild_seconds_total':
+            stats['rebuild_seconds_max'] = max(stats['rebuild_seconds_max'], amount)
+
+
+def _local_get(cache_key, now):
+    with _local_lock:
+        entry = _local_cache.get(cache_key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            _local_cache.pop(cache_key, None)
+            return None
+        _local_cache.move_to_end(cache_key)
+        return entry[1]
+
+
+def _local_put(cache_key, envelope, now):
+    # No más allá de la frescura de la respuesta: lo stale sólo vive en Redis
+    expires_at = min(now + _LOCAL_TTL, envelope['fresh_until'])
+    if expires_at <= now:
+        return
+    with _local_lock:
+        _local_cache[cache_key] = (expires_at, envelope['payload'])
+        _local_cache.move_to_end(cache_key)
+        while len(_local_cache) > _LOCAL_MAX_ENTRIES:
+            _local_cache.popitem(last=False)
+
+
+def _remote_get(cache_key):
+    try:
+        envelope = cache.get(cache_key)
+    except Exception as e:
+        # Fail-open: error de Redis/cache no debe romper la API.
+        print(f"[CACHE] Warning: cache.get failed for {cache_key}: {e}")
+        return None
+    if not isinstance(envelope, dict) or 'payload' not in envelope:
+        return None
+    return envelope
 
 
-def cached_with_user(timeout=300):
+def _acquire_flight(cache_key):
+    """Lock de recálculo entre workers. Sin Redis cada request recalcula."""
+    try:
+        return bool(cache.add(_FLIGHT_PREFIX + cache_key, 1, timeout=_FLIGHT_TTL))
+    except Exception:
+        return True
+
+
+def _release_flight(cache_key):
+    try:
+        cache.delete(_FLIGHT_PREFIX + cache_key)
+    except Exception:
+        pass
+
+
+def _wait_for_flight(cache_key):
+    """Espera a que otro request termine de recalcular la llave."""
+    deadline = time.time() + _FLIGHT_WAIT
+    while time.time() < deadline:
+        time.sleep(_FLIGHT_POLL)
+        payload = _local_get(cache_key, time.time())
+        if payload is not None:
+            return payload
+        envelope = _remote_get(cache_key)
+        if envelope is not None:
+            return envelope['payload']
+    return None
+
+
+def _is_cacheable(response):
+    """No cachear errores (4xx/5xx)."""
+    status = getattr(response, 'status_code', 200)
+    if isinstance(response, tuple) and len(response) > 1 and isinstance(response[1], int):
+        status = response[1]
+    return status < 400
+
+
+def cached_with_user(timeout=300, stale_ttl=None):
     """
-    Decorador para cachear respuestas incluyendo el usuario en la clave
+    Decorador para cachear respuestas incluyendo el usuario en la clave.
+    Dos niveles (proceso + Redis), single-flight y stale-while-revalidate.
+
+    Args:
+        timeout: segundos que la respuesta se considera fresca.
+        stale_ttl: segundos extra en los que se sirve la versión vencida
+            mientras un solo request la recalcula (default: timeout).
     """
+    stale_ttl = timeout if stale_ttl is None else stale_ttl
+
     def decorator(f):
+        endpoint = f.__name__
+
+        def rebuild(cache_key, args, kwargs):
+            _record(endpoint, 'misses')
+            start = time.perf_counter()
+            response = f(*args, **kwargs)
+            _record(endpoint, 'rebuild_seconds_total', time.perf_counter() - start)
+
+            if not _is_cacheable(response):
+                return response
+            try:
+                now = time.time()
+                envelope = {'payload': pickle.dumps(response), 'fresh_until': now + timeout}
+                _local_put(cache_key, envelope, now)
+                # Intentar guardar en cache sin afectar la respuesta al usuario.
+                cache.set(cache_key, envelope, timeout=timeout + stale_ttl)
+            except Exception as e:
+                print(f"[CACHE] Warning: cache.set failed for {cache_key}: {e}")
+            return response
+
         @wraps(f)
         def decorated_function(*args, **kwargs):
             try:
                 cache_key = make_cache_key_with_user()
             except Exception as e:
                 # Fail-open: si no se puede construir la llave, no bloquear el endpoint.
-                print(f"[CACHE] Warning: could not build cache key for {f.__name__}: {e}")
+                print(f"[CACHE] Warning: could not build cache key for {endpoint}: {e}")
+                _record(endpoint, 'errors')
                 return f(*args, **kwargs)
 
-            try:
-                # Intentar obtener del cache
-                cached_response = cache.get(cache_key)
-                if cached_response is not None:
-                    return cached_response
-            except Exception as e:
-                # Fail-open: error de Redis/cache no debe romper la API.
-                print(f"[CACHE] Warning: cache.get failed for {cache_key}: {e}")
-
-            # Ejecutar la función
-            response = f(*args, **kwargs)
+            payload = _local_get(cache_key, time.time())
+            if payload is not None:
+                _record(endpoint, 'local_hits')
+                return pickle.loads(payload)
+
+            envelope = _remote_get(cache_key)
+            if envelope is not None:
+                now = time.time()
+                if envelope['fresh_until'] > now:
+                    _local_put(cache_key, envelope, now)
+                    _record(endpoint, 'redis_hits')
+                    return pickle.loads(envelope['payload'])
+                if not _acquire_flight(cache_key):
+                    # Otro request ya recalcula: servir la versión anterior
+                    _record(endpoint, 'stale_served')
+                    return pickle.loads(envelope['payload'])
+            elif not _acquire_flight(cache_key):
+                payload = _wait_for_flight(cache_key)
+                if payload is not None:
+                    _record(endpoint, 'coalesced')
+                    return pickle.loads(payload)
+                # El otro request tardó demasiado: recalcular sin lock
+                return rebuild(cache_key, args, kwargs)
 
             try:
-                # Intentar guardar en cache sin afectar la respuesta al usuario.
-                cache.set(cache_key, response, timeout=timeout)
-            except Exception as e:
-                print(f"[CACHE] Warning: cache.set failed for {cache_key}: {e}")
+                return rebuild(cache_key, args, kwargs)
+            finally:
+                _release_flight(cache_key)
 
-            return response
         return decorated_function
     return decorator
 
 
+def get_cache_stats():
+    """
+    Contadores del cache de dos niveles de ESTE proceso, por endpoint
+    """
+    with _stats_lock:
+        endpoints = {name: dict(values) for name, values in _stats.items()}
+    for values in endpoints.values():
+        hits = values['local_hits'] + values['redis_hits'] + values['stale_served'] + values['coalesced']
+        total = hits + values['misses']
+        values['hit_ratio'] = round(hits / total, 4) if total else None
+        values['rebuild_ms_avg'] = (
+            round(values['rebuild_seconds_total'] * 1000 / values['misses'], 2)
+            if values['misses'] else None
+        )
+    with _local_lock:
+        local_entries = len(_local_cache)
+        local_tags = len(_local_generations)
+    return {
+        'endpoints': endpoints,
+        'local_entries': local_entries,
+        'local_max_entries': _LOCAL_MAX_ENTRIES,
+        'local_ttl_seconds': _LOCAL_TTL,
+        'local_tag_generations': local_tags,
+    }
+
+
+def clear_local_cache():
+    """Vacía el nivel en proceso y los contadores (tests / mantenimiento)."""
+    with _local_lock:
+        _local_cache.clear()
+        _local_generations.clear()
+    with _stats_lock:
+        _stats.clear()
+
+
+def invalidate_tags(*tags):
+    """
+    Invalida todas las respuestas asociadas a los tags incrementando su
+    generación. O(número de tags), nunca recorre el keyspace.
+    Retorna cuántos tags se invalidaron.
+    """
+    invalidated = 0
+    for tag in dict.fromkeys(t for t in tags if t):
+        with _local_lock:
+            _local_generations.pop(tag, None)
+        try:
+            cache.cache.inc(_TAG_GEN_PREFIX + tag)
+            invalidated += 1
+        except Exception as e:
+            # Si Redis no está disponible, las entradas expiran por TTL
+            print(f"[CACHE] Warning: Could not invalidate tag {tag}: {e}")
+    return invalidated
+
+
 def invalidate_cache_pattern(pattern):
     """
-    Invalida todas las claves de cache que coincidan con un patrón
-    Útil cuando se modifica un recurso
+    Invalida el cache de una ruta (prefijo) vía sus tags de recurso.
+    Se conserva por compatibilidad; preferir invalidate_tags().
     """
-    try:
-        # Obtener cliente Redis del cache
-        redis_client = cache.cache._read_clients[0]
-        
-        # Buscar claves que coincidan con el patrón
-        keys = redis_client.keys(f"flask_cache_{pattern}*")
-        
-        if keys:
-            redis_client.delete(*keys)
-            return len(keys)
-        return 0
-    except Exception as e:
-        # Si Redis no está disponible, ignorar silenciosamente
-        print(f"Warning: Could not invalidate cache pattern {pattern}: {e}")
+    tags = tags_for_path(pattern.rstrip('*'))
+    if not tags:
+        print(f"[CACHE] Warning: pattern sin tags conocidos, no se invalida: {pattern}")
         return 0
+    # /api/exams/5 invalida sólo exam:5; /api/exams invalida la colección
+    return invalidate_tags(tags[-1])
 
 
 def invalidate_exams_cache():
     """Invalida todo el cache relacionado con exámenes"""
-    return invalidate_cache_pattern("/api/exams")
+    return invalidate_tags('exams', 'exam_results')
 
 
 def invalidate_standards_cache():
     """Invalida todo el cache relacionado con estándares"""
-    # Limpiar por patrón de ruta y también por prefijo de función
-    count = invalidate_cache_pattern("/api/competency-standards")
-    count += invalidate_cache_pattern("standards_list")
-    count += invalidate_cache_pattern("view//competency-standards")
-    return count
+    return invalidate_tags('standards')
 
 
 def invalidate_study_contents_cache():
     """Invalida todo el cache relacionado con materiales de estudio"""
-    return invalidate_cache_pattern("/api/study-contents")
+    return invalidate_tags('study_contents')
 
 
 # Cache keys para recursos específicos
@@ -138,32 +418,15 @@ def get_user_dashboard_cache_key(user_id):
 def invalidate_user_dashboard(user_id):
     """
     Invalida el cache del dashboard de un usuario específico
+    (y el resto de respuestas cacheadas por usuario: tag user:<id>)
     Llamar después de:
     - Completar un examen
     - Actualizar progreso de materiales
     - Cambiar datos del usuario
     """
-    try:
-        redis_client = cache.cache._read_clients[0]
-        
-        # Patrón para encontrar todas las claves del dashboard de este usuario
-        patterns = [
-            f"flask_cache_/api/users/me/dashboard:{user_id}:*",
-            f"flask_cache_/api/users/me/editor-dashboard:{user_id}:*"
-        ]
-        
-        deleted = 0
-        for pattern in patterns:
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
-                deleted += len(keys)
-        
-        print(f"[CACHE] Invalidado dashboard de usuario {user_id}: {deleted} claves")
-        return deleted
-    except Exception as e:
-        print(f"[CACHE] Warning: Could not invalidate user dashboard: {e}")
-        return 0
+    invalidated = invalidate_tags(f"user:{user_id}")
+    print(f"[CACHE] Invalidado dashboard de usuario {user_id}: {invalidated} tags")
+    return invalidated
 
 
 def invalidate_exam_results(user_id, exam_id=None):
@@ -171,23 +434,10 @@ def invalidate_exam_results(user_id, exam_id=None):
     Invalida cache de resultados de exámenes para un usuario
     Opcionalmente filtrar por exam_id específico
     """
-    try:
-        redis_client = cache.cache._read_clients[0]
-        
-        # Invalidar dashboard del usuario (contiene resultados)
-        invalidate_user_dashboard(user_id)
-        
-        # Si hay exam_id específico, invalidar cache de ese examen
-        if exam_id:
-            pattern = f"flask_cache_/api/exams/{exam_id}*"
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
-        
-        return True
-    except Exception as e:
-        print(f"[CACHE] Warning: Could not invalidate exam results: {e}")
-        return False
+    tags = [f"user:{user_id}"]
+    if exam_id:
+        tags.append(f"exam:{exam_id}")
+    return invalidate_tags(*tags) == len(tags)
 
 
 def invalidate_on_exam_complete(user_id, exam_id, competency_standard_id=None):
@@ -197,49 +447,20 @@ def invalidate_on_exam_complete(user_id, exam_id, competency_standard_id=None):
     - Invalida resultados relacionados
     - Invalida cache de certificados
     """
-    try:
-        invalidate_user_dashboard(user_id)
-        
-        redis_client = cache.cache._read_clients[0]
-        
-        # Invalidar patterns relacionados
-        patterns = [
-            f"flask_cache_/api/exams/{exam_id}/results*",
-            f"flask_cache_/api/exams/results/*"  # Resultados de exámenes
-        ]
-        
-        if competency_standard_id:
-            patterns.append(f"flask_cache_/api/competency-standards/{competency_standard_id}*")
-        
-        deleted = 0
-        for pattern in patterns:
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
-                deleted += len(keys)
-        
-        print(f"[CACHE] Invalidado cache al completar examen: {deleted} claves")
-        return deleted
-    except Exception as e:
-        print(f"[CACHE] Warning: Could not invalidate on exam complete: {e}")
-        return 0
+    tags = [f"user:{user_id}", f"exam:{exam_id}", 'exam_results']
+    if competency_standard_id:
+        tags.append(f"standard:{competency_standard_id}")
+
+    invalidated = invalidate_tags(*tags)
+    print(f"[CACHE] Invalidado cache al completar examen: {invalidated} tags")
+    return invalidated
 
 
 def invalidate_on_progress_update(user_id, material_id=None):
     """
     Invalidación cuando se actualiza el progreso de estudio de un usuario
     """
-    try:
-        invalidate_user_dashboard(user_id)
-        
-        if material_id:
-            redis_client = cache.cache._read_clients[0]
-            pattern = f"flask_cache_/api/study-contents/{material_id}*"
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
-        
-        return True
-    except Exception as e:
-        print(f"[CACHE] Warning: Could not invalidate progress: {e}")
-        return False
+    tags = [f"user:{user_id}"]
+    if material_id:
+        tags.append(f"material:{material_id}")
+    return invalidate_tags(*tags) == len(tags)
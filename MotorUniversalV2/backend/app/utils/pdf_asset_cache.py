@@ -0,0 +1,274 @@
+"""
+Cache en proceso de insumos para generar PDFs de certificados y reportes.
+
+generate_certificate_pdf buscaba la CertificateTemplate del ECM, descargaba
+el PDF de plantilla de blob y lo parseaba dos veces por certificado; el
+reporte de evaluación re-decodificaba logo.png en cada llamada. En un lote
+de 500 certificados del mismo ECM eran 500 descargas y 1000 parseos
+idénticos. Aquí se guardan, en un LRU acotado por entradas y por bytes:
+
+  - ('cert_template', standard_id, generación) → config + URL de la
+    plantilla (o None si el ECM no tiene plantilla).
+  - ('pdf', url o ruta) → página de plantilla ya parseada (TemplatePage).
+    Las URLs de plantilla son inmutables (cada subida genera un blob nuevo).
+  - ('img', url o ruta) → ImageReader ya decodificado (logo Evaluaasi,
+    logos de plantel/partner). Una descarga fallida se recuerda poco tiempo
+    para no esperar el timeout en cada certificado.
+
+Invalidación: las rutas de plantilla (POST/PUT/DELETE en standards.py)
+llaman invalidate_certificate_template(standard_id) después del commit; se
+rota la generación en Redis (igual que answer_key_service) para que los
+demás workers también recarguen. Sin Redis la config local expira a los
+_TTL_NO_REDIS segundos.
+
+Los objetos cacheados se comparten entre threads: la página de plantilla
+solo se lee bajo su lock (TemplatePage.new_writer clona la página a un
+PdfWriter nuevo) y los ImageReader se "calientan" al cargarse para que
+reportlab no vuelva a escribir sus atributos lazy.
+
+Configuración por entorno:
+  PDF_ASSET_CACHE_MAX_ENTRIES  entradas máximas (default 128)
+  PDF_ASSET_CACHE_MAX_MB       bytes máximos estimados (default 64)
+  PDF_ASSET_CACHE_TTL          vida máxima de una entrada en segundos (default 600)
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Callable, Optional, Tuple
+
+PDF_ASSET_CACHE_MAX_ENTRIES = int(os.getenv('PDF_ASSET_CACHE_MAX_ENTRIES', '128'))
+PDF_ASSET_CACHE_MAX_BYTES = int(os.getenv('PDF_ASSET_CACHE_MAX_MB', '64')) * 1024 * 1024
+PDF_ASSET_CACHE_TTL = int(os.getenv('PDF_ASSET_CACHE_TTL', '600'))
+
+_TTL_NO_REDIS = 30        # sin Redis no hay generación compartida entre workers
+_TTL_FAILED_FETCH = 60    # logos que no se pudieron descargar
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (loaded_at, ttl, size, value)
+_total_bytes = 0
+_loading_locks = {}       # key -> Lock (una sola carga por llave a la vez)
+
+_MISSING = object()
+
+
+class TemplatePage:
+    """Primera página de una plantilla PDF, parseada una sola vez."""
+
+    __slots__ = ('page', 'width', 'height', '_lock')
+
+    def __init__(self, data: bytes = None, path: str = None):
+        from pypdf import PdfReader
+        reader = PdfReader(BytesIO(data) if data is not None else path)
+        self.page = reader.pages[0]
+        self.width = float(self.page.mediabox.width)
+        self.height = float(self.page.mediabox.height)
+        self._lock = threading.Lock()
+
+    def new_writer(self):
+        """PdfWriter con una copia de la página, lista para merge_page()."""
+        from pypdf import PdfWriter
+        writer = PdfWriter()
+        with self._lock:
+            writer.add_page(self.page)
+        return writer
+
+
+# ---------------------------------------------------------------------------
+# LRU
+# ---------------------------------------------------------------------------
+
+def _evict_locked():
+    global _total_bytes
+    while _entries and (len(_entries) > PDF_ASSET_CACHE_MAX_ENTRIES
+                        or _total_bytes > PDF_ASSET_CACHE_MAX_BYTES):
+        _, (_, _, size, _) = _entries.popitem(last=False)
+        _total_bytes -= size
+
+
+def _lookup(key):
+    global _total_bytes
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return _MISSING
+        loaded_at, ttl, size, value = entry
+        if time.time() - loaded_at > ttl:
+            _entries.pop(key, None)
+            _total_bytes -= size
+            return _MISSING
+        _entries.move_to_end(key)
+        return value
+
+
+def _store(key, value, size: int, ttl: int):
+    global _total_bytes
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _total_bytes -= old[2]
+        _entries[key] = (time.time(), ttl, size, value)
+        _total_bytes += size
+        _evict_locked()
+
+
+def _get_or_load(key, loader: Callable[[], Tuple[Any, int, int]]):
+    """
+    Valor cacheado de `key`. `loader()` regresa (valor, tamaño, ttl); si
+    ttl es 0 el valor no se guarda.
+    """
+    value = _lookup(key)
+    if value is not _MISSING:
+        return value
+    with _lock:
+        key_lock = _loading_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        value = _lookup(key)
+        if value is _MISSING:
+            value, size, ttl = loader()
+            if ttl:
+                _store(key, value, size, ttl)
+    with _lock:
+        _loading_locks.pop(key, None)
+    return value
+
+
+def clear_pdf_asset_cache():
+    """Vacía el cache local (pruebas / mantenimiento)."""
+    global _total_bytes
+    with _lock:
+        _entries.clear()
+        _total_bytes = 0
+
+
+# ---------------------------------------------------------------------------
+# Plantillas
+# ---------------------------------------------------------------------------
+
+def _gen_key(standard_id) -> str:
+    return f"cert_template_gen:{standard_id}"
+
+
+def _read_generation(standard_id):
+    """Token de generación en Redis. Retorna (generation, redis_ok)."""
+    try:
+        from app import cache
+        return cache.get(_gen_key(standard_id)), True
+    except Exception as e:
+        print(f"[PDF-CACHE] Warning: no se pudo leer generación de plantilla {standard_id}: {e}")
+        return None, False
+
+
+def get_certificate_template(standard_id: int) -> Optional[dict]:
+    """
+    Config y URL de la plantilla del ECM: {'id', 'template_blob_url', 'config'}
+    o None si no tiene plantilla. Requiere app context en un miss.
+    """
+    generation, redis_ok = _read_generation(standard_id)
+
+    def load():
+        from app.models.certificate_template import CertificateTemplate
+        template = CertificateTemplate.query.filter_by(competency_standard_id=standard_id).first()
+        value = None
+        if template:
+            value = {
+                'id': template.id,
+                'template_blob_url': template.template_blob_url,
+                'config': template.get_config(),
+            }
+        return value, 2048, (PDF_ASSET_CACHE_TTL if redis_ok else _TTL_NO_REDIS)
+
+    return _get_or_load(('cert_template', standard_id, generation), load)
+
+
+def get_template_page(blob_url: str) -> Optional[TemplatePage]:
+    """Plantilla de blob parseada; None si no se pudo descargar (no se cachea)."""
+    def load():
+        from app.utils.azure_storage import azure_storage
+        data = azure_storage.download_file(blob_url)
+        if not data:
+            return None, 0, 0
+        return TemplatePage(data=data), len(data), PDF_ASSET_CACHE_TTL
+
+    return _get_or_load(('pdf', blob_url), load)
+
+
+def get_static_template_page(path: str) -> Optional[TemplatePage]:
+    """Plantilla local (static/plantilla.pdf); la llave incluye el mtime."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _get_or_load(
+        ('pdf', path, stat.st_mtime),
+        lambda: (TemplatePage(path=path), stat.st_size, PDF_ASSET_CACHE_TTL),
+    )
+
+
+def invalidate_certificate_template(standard_id: Optional[int]) -> None:
+    """Llamar DESPUÉS del commit al crear, reemplazar, editar o borrar una plantilla."""
+    if standard_id is None:
+        return
+    global _total_bytes
+    with _lock:
+        for key in [k for k in _entries if k[0] == 'cert_template' and k[1] == standard_id]:
+            _total_bytes -= _entries.pop(key)[2]
+    try:
+        from app import cache
+        cache.set(_gen_key(standard_id), uuid.uuid4().hex, timeout=0)
+    except Exception as e:
+        print(f"[PDF-CACHE] Warning: no se pudo rotar generación de plantilla {standard_id}: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Imágenes
+# ---------------------------------------------------------------------------
+
+def _decode_image(data: bytes):
+    """ImageReader listo para compartirse entre threads."""
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+    reader = ImageReader(BytesIO(data))
+    # Forzar la decodificación lazy (RGB + canal alfa) una sola vez
+    warm = canvas.Canvas(BytesIO())
+    warm.drawImage(reader, 0, 0, width=10, height=10, mask='auto')
+    warm.save()
+    return reader
+
+
+def get_static_image(path: str):
+    """ImageReader de un archivo local (p. ej. static/logo.png) o None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    def load():
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        try:
+            return _decode_image(data), len(data) * 4, PDF_ASSET_CACHE_TTL
+        except Exception:
+            return None, 0, _TTL_FAILED_FETCH
+
+    return _get_or_load(('img', path, stat.st_mtime), load)
+
+
+def get_remote_image(url: str, timeout: int = 10):
+    """ImageReader de un logo remoto o None si no se pudo obtener."""
+    if not url:
+        return None
+
+    def load():
+        import requests
+        try:
+            response = requests.get(url, timeout=timeout)
+            if response.status_code == 200:
+                return _decode_image(response.content), len(response.content) * 4, PDF_ASSET_CACHE_TTL
+        except Exception:
+            pass
+        return None, 0, _TTL_FAILED_FETCH
+
+    return _get_or_load(('img', url), load)
@@ -16,6 +16,14 @@ from reportlab.pdfgen import canvas
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.utils import ImageReader
 
+from app.utils.pdf_asset_cache import (
+    get_certificate_template,
+    get_remote_image,
+    get_static_image,
+    get_static_template_page,
+    get_template_page,
+)
+
 # Directorio static
 STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
 
@@ -79,10 +87,9 @@ def generate_evaluation_report_pdf(result, exam, user, timezone='America/Mexico_
     y = page_height - margin
 
     # === ENCABEZADO CON LOGO ===
-    logo_path = os.path.join(STATIC_DIR, 'logo.png')
-    if os.path.exists(logo_path):
+    logo = get_static_image(os.path.join(STATIC_DIR, 'logo.png'))
+    if logo is not None:
         try:
-            logo = ImageReader(logo_path)
             c.drawImage(logo, margin, y - 30, width=40, height=40,
                         preserveAspectRatio=True, mask='auto')
             c.setFillColor(colors.black)
@@ -438,41 +445,33 @@ def generate_certificate_pdf(result, exam, user):
     Soporta plantillas personalizadas por ECM.
     Retorna un BytesIO con el PDF listo.
     """
-    from pypdf import PdfReader, PdfWriter
+    from pypdf import PdfReader
 
-    # === Buscar plantilla personalizada por ECM ===
+    # === Buscar plantilla personalizada por ECM (config y PDF cacheados) ===
     custom_template = None
-    custom_template_bytes = None
+    template_page = None
     if getattr(exam, 'competency_standard_id', None):
         try:
-            from app.models.certificate_template import CertificateTemplate
-            custom_template = CertificateTemplate.query.filter_by(
-                competency_standard_id=exam.competency_standard_id
-            ).first()
-
+            custom_template = get_certificate_template(exam.competency_standard_id)
             if custom_template:
                 try:
-                    from app.utils.azure_storage import azure_storage as az_storage
-                    custom_template_bytes = az_storage.download_file(custom_template.template_blob_url)
+                    template_page = get_template_page(custom_template['template_blob_url'])
                 except Exception:
+                    template_page = None
+                if template_page is None:
                     custom_template = None
-                    custom_template_bytes = None
         except Exception:
             custom_template = None
 
     # Cargar plantilla PDF
-    if custom_template_bytes:
-        reader = PdfReader(BytesIO(custom_template_bytes))
-    else:
-        template_path = os.path.join(STATIC_DIR, 'plantilla.pdf')
-        if not os.path.exists(template_path):
+    if template_page is None:
+        template_page = get_static_template_page(os.path.join(STATIC_DIR, 'plantilla.pdf'))
+        if template_page is None:
             # Fallback: generar reporte de evaluación en vez de error
             return generate_evaluation_report_pdf(result, exam, user)
-        reader = PdfReader(template_path)
 
-    page = reader.pages[0]
-    width = float(page.mediabox.width)
-    height = float(page.mediabox.height)
+    width = template_page.width
+    height = template_page.height
 
     buffer_overlay = BytesIO()
     c = canvas.Canvas(buffer_overlay, pagesize=(width, height))
@@ -480,7 +479,7 @@ def generate_certificate_pdf(result, exam, user):
 
     # === Configuración de posiciones ===
     if custom_template:
-        tmpl_config = custom_template.get_config()
+        tmpl_config = custom_template['config']
         name_cfg = tmpl_config['name_field']
         cert_cfg = tmpl_config['cert_name_field']
         qr_cfg = tmpl_config['qr_field']
@@ -566,7 +565,6 @@ def generate_certificate_pdf(result, exam, user):
     try:
         if getattr(result, 'group_id', None):
             from app.models.partner import CandidateGroup, Campus, Partner
-            import requests as req_lib
             group = CandidateGroup.query.get(result.group_id)
             if group and group.campus_id:
                 campus = Campus.query.get(group.campus_id)
@@ -574,10 +572,8 @@ def generate_certificate_pdf(result, exam, user):
                     # Logo del campus/plantel (posición izquierda)
                     if getattr(campus, 'logo_url', None) and campus.logo_url:
                         try:
-                            logo_resp = req_lib.get(campus.logo_url, timeout=10)
-                            if logo_resp.status_code == 200:
-                                logo_bytes = BytesIO(logo_resp.content)
-                                campus_logo = ImageReader(logo_bytes)
+                            campus_logo = get_remote_image(campus.logo_url)
+                            if campus_logo is not None:
                                 logo_w = 180
                                 logo_h = 180
                                 c.drawImage(campus_logo, 760, 1058,
@@ -591,10 +587,8 @@ def generate_certificate_pdf(result, exam, user):
                         partner = Partner.query.get(campus.partner_id)
                         if partner and partner.logo_url:
                             try:
-                                logo_resp = req_lib.get(partner.logo_url, timeout=10)
-                                if logo_resp.status_code == 200:
-                                    logo_bytes = BytesIO(logo_resp.content)
-                                    partner_logo = ImageReader(logo_bytes)
+                                partner_logo = get_remote_image(partner.logo_url)
+                                if partner_logo is not None:
                                     logo_w = 120
                                     logo_h = 120
                                     c.drawImage(partner_logo, 920, 1115,
@@ -611,15 +605,8 @@ def generate_certificate_pdf(result, exam, user):
     buffer_overlay.seek(0)
     overlay = PdfReader(buffer_overlay)
 
-    if custom_template_bytes:
-        reader2 = PdfReader(BytesIO(custom_template_bytes))
-    else:
-        reader2 = PdfReader(template_path)
-    page2 = reader2.pages[0]
-    page2.merge_page(overlay.pages[0])
-
-    writer = PdfWriter()
-    writer.add_page(page2)
+    writer = template_page.new_writer()
+    writer.pages[0].merge_page(overlay.pages[0])
 
     buffer_final = BytesIO()
     writer.write(buffer_final)
@@ -1,10 +1,25 @@
 """
 Rate Limiting utilities para proteger endpoints sensibles
+
+Los contadores viven en Redis y cada request hace UNA operación atómica:
+  - Límites por ventana: script Lua de ventana deslizante (dos ventanas
+    fijas ponderadas) que lee, decide e incrementa en el servidor. El
+    get + set anterior costaba dos round trips con pickle y dejaba pasar
+    ráfagas concurrentes (varios leen el mismo valor antes de escribir).
+  - Intentos fallidos de login: INCR + EXPIRE en un pipeline MULTI/EXEC.
+Si Redis no responde se usa el mismo algoritmo en proceso (límites por
+réplica) y se reintenta Redis a los _REDIS_RETRY_SECONDS.
+
+Las respuestas llevan X-RateLimit-Limit / -Remaining / -Reset y, en 429,
+Retry-After.
 """
 from functools import wraps
-from flask import request, jsonify
+from typing import NamedTuple
+from flask import current_app, request, jsonify, make_response
 from app import cache
+import math
 import os
+import threading
 import time
 
 # Variable global para deshabilitar rate limiting temporalmente
@@ -12,6 +27,17 @@ import time
 RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('true', '1')
 
 
+def _rate_limit_enabled() -> bool:
+    """Env var global + config de la app (TestingConfig lo apaga: antes los
+    tests pasaban porque sin Redis el limiter dejaba pasar todo)."""
+    if not RATE_LIMIT_ENABLED:
+        return False
+    try:
+        return bool(current_app.config.get('RATE_LIMIT_ENABLED', True))
+    except RuntimeError:
+        return True
+
+
 def get_client_ip():
     """Obtener IP del cliente, considerando proxies"""
     if request.headers.get('X-Forwarded-For'):
@@ -21,27 +47,253 @@ def get_client_ip():
     return request.remote_addr or 'unknown'
 
 
+# ============= BACKEND ATÓMICO (Redis + fallback en proceso) =============
+
+_REDIS_RETRY_SECONDS = 30
+
+# KEYS[1] = ventana actual, KEYS[2] = ventana anterior;
+# ARGV = límite, ventana (ms), ms transcurridos de la ventana actual.
+# Regresa {permitido (1/0), conteo actual, conteo anterior}.
+_SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local elapsed_ms = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * (window_ms - elapsed_ms) / window_ms + current + 1 > limit then
+  return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+  redis.call('PEXPIRE', KEYS[1], window_ms * 2)
+end
+return {1, current, previous}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int  # segundos hasta que vuelva a haber cupo (o fin de la ventana)
+
+
+def _window_result(allowed, current, previous, limit, window, elapsed) -> RateLimitResult:
+    """Calcula remaining/reset a partir de los conteos de las dos ventanas."""
+    weight = (window - elapsed) / window
+    remaining = max(0, int(limit - (previous * weight + current)))
+    if allowed or current >= limit or previous <= 0:
+        reset = window - elapsed
+    else:
+        # Momento en que el peso de la ventana anterior deja pasar 1 más
+        free_at = window * (1 - (limit - 1 - current) / previous)
+        reset = max(free_at - elapsed, 0)
+    return RateLimitResult(bool(allowed), limit, remaining, max(1, math.ceil(reset)))
+
+
+class _LocalCounters:
+    """Mismos algoritmos en proceso (fallback sin Redis)."""
+
+    def __init__(self):
+        self._windows = {}   # key -> [inicio ventana, actual, anterior]
+        self._counters = {}  # key -> [conteo, expira]
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+    def _sweep(self, now):
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+        # Las ventanas no guardan su duración; se descartan las de >1h sin uso
+        self._windows = {k: v for k, v in self._windows.items() if now - v[0] < 3600}
+
+    def hit(self, key, limit, window, now):
+        start = (now // window) * window
+        with self._lock:
+            self._sweep(now)
+            state = self._windows.get(key)
+            if state is None or state[0] < start - window:
+                state = [start, 0, 0]
+            elif state[0] < start:
+                state = [start, 0, state[1]]
+            self._windows[key] = state
+            elapsed = now - start
+            if state[2] * (window - elapsed) / window + state[1] + 1 > limit:
+                return False, state[1], state[2]
+            state[1] += 1
+            return True, state[1], state[2]
+
+    def incr(self, key, ttl, now):
+        with self._lock:
+            self._sweep(now)
+            entry = self._counters.get(key)
+            if entry is None or entry[1] <= now:
+                entry = [0, 0]
+            entry[0] += 1
+            entry[1] = now + ttl
+            self._counters[key] = entry
+            return entry[0]
+
+    def get(self, key, now):
+        entry = self._counters.get(key)
+        return entry[0] if entry and entry[1] > now else 0
+
+    def delete(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class RateLimiter:
+    """
+    Contadores atómicos para rate limiting.
+
+        result = get_rate_limiter().hit('rl:endpoint:ip', limit=10, window=60)
+        if not result.allowed:
+            ...429...
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+        self._script = None
+        self._redis_retry_at = 0.0
+        self._local = _LocalCounters()
+        self.backend = 'redis'
+
+    def _client(self):
+        if self._redis is None:
+            self._redis = _get_redis_client()
+            if self._redis is None:
+                raise RuntimeError('Redis no disponible')
+        return self._redis
+
+    def _use_redis(self) -> bool:
+        return time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, err):
+        if self.backend == 'redis':
+            print(f"⚠️ Rate limit: Redis no disponible, contadores en proceso: {err}")
+        self.backend = 'local'
+        self._redis_retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+
+    def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        """Registra un request y decide si pasa (ventana deslizante)."""
+        now = time.time()
+        start = int(now // window) * window
+        elapsed = now - start
+        if self._use_redis():
+            try:
+                if self._script is None:
+                    self._script = self._client().register_script(_SLIDING_WINDOW_LUA)
+                prefix = _get_cache_prefix()
+                allowed, current, previous = self._script(
+                    keys=[f"{prefix}{key}:{start}", f"{prefix}{key}:{start - window}"],
+                    args=[limit, int(window * 1000), int(elapsed * 1000)],
+                )
+                self.backend = 'redis'
+                return _window_result(int(allowed) == 1, int(current), int(previous),
+                                      limit, window, elapsed)
+            except Exception as e:
+                self._redis_failed(e)
+        allowed, current, previous = self._local.hit(key, limit, window, now)
+        return _window_result(allowed, current, previous, limit, window, elapsed)
+
+    def incr(self, key: str, ttl: int) -> int:
+        """INCR + EXPIRE atómico sobre la misma key que usa Flask-Caching
+        (cache.get la lee como entero). Retorna el nuevo conteo."""
+        if self._use_redis():
+            try:
+                full_key = f"{_get_cache_prefix()}{key}"
+                client = self._client()
+                try:
+                    pipe = client.pipeline(transaction=True)
+                    pipe.incr(full_key)
+                    pipe.expire(full_key, ttl)
+                    count = pipe.execute()[0]
+                except Exception as e:
+                    if 'not an integer' not in str(e):
+                        raise
+                    # Valor previo guardado con cache.set (pickle): migrarlo
+                    count = int(cache.get(key) or 0) + 1
+                    client.set(full_key, count, ex=ttl)
+                self.backend = 'redis'
+                return int(count)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._local.incr(key, ttl, time.time())
+
+    def get_count(self, key: str) -> int:
+        if self._use_redis():
+            try:
+                return int(cache.get(key) or 0)
+            except Exception as e:
+                self._redis_failed(e)
+        return self._local.get(key, time.time())
+
+    def delete(self, key: str):
+        self._local.delete(key)
+        try:
+            cache.delete(key)
+        except Exception:
+            pass
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Limiter global (singleton por proceso, estado en Redis)."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+def _set_rate_limit_headers(response, result: RateLimitResult):
+    response.headers['X-RateLimit-Limit'] = str(result.limit)
+    response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+    response.headers['X-RateLimit-Reset'] = str(result.reset)
+    return response
+
+
+def _limited_call(f, args, kwargs, cache_key, limit, window, message):
+    """Aplica el límite a `cache_key` y ejecuta la vista. Si el limiter
+    falla por completo, la request pasa (fail-open)."""
+    try:
+        result = get_rate_limiter().hit(cache_key, limit, window)
+    except Exception as e:
+        print(f"Rate limit warning: {e}")
+        return f(*args, **kwargs)
+    if not result.allowed:
+        response = jsonify({
+            'error': 'Too Many Requests',
+            'message': message,
+            'retry_after': result.reset,
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(result.reset)
+        return _set_rate_limit_headers(response, result)
+    return _set_rate_limit_headers(make_response(f(*args, **kwargs)), result)
+
+
 # ============= BLOQUEO DE CUENTA POR INTENTOS FALLIDOS =============
 
 def get_failed_login_count(username: str) -> int:
     """Obtener el número de intentos fallidos para un usuario"""
     try:
-        cache_key = f"failed_login:{username.lower()}"
-        count = cache.get(cache_key)
-        return count if count else 0
+        return get_rate_limiter().get_count(f"failed_login:{username.lower()}")
     except Exception:
         return 0
 
 
 def increment_failed_login(username: str) -> int:
-    """Incrementar contador de intentos fallidos. Retorna el nuevo conteo."""
+    """Incrementar contador de intentos fallidos (atómico). Retorna el nuevo conteo."""
     try:
-        cache_key = f"failed_login:{username.lower()}"
-        current = cache.get(cache_key) or 0
-        new_count = current + 1
         # Mantener el contador por 30 minutos
-        cache.set(cache_key, new_count, timeout=1800)
-        return new_count
+        return get_rate_limiter().incr(f"failed_login:{username.lower()}", 1800)
     except Exception:
         return 0
 
@@ -49,8 +301,7 @@ def increment_failed_login(username: str) -> int:
 def reset_failed_login(username: str):
     """Resetear contador de intentos fallidos después de login exitoso"""
     try:
-        cache_key = f"failed_login:{username.lower()}"
-        cache.delete(cache_key)
+        get_rate_limiter().delete(f"failed_login:{username.lower()}")
     except Exception:
         pass
 
@@ -94,9 +345,8 @@ def unlock_account(username: str):
     """Desbloquear cuenta manualmente y resetear intentos fallidos"""
     try:
         lock_key = f"account_locked:{username.lower()}"
-        fail_key = f"failed_login:{username.lower()}"
         cache.delete(lock_key)
-        cache.delete(fail_key)
+        reset_failed_login(username)
         print(f"🔓 Cuenta desbloqueada manualmente: {username}")
         return True
     except Exception as e:
@@ -269,7 +519,7 @@ def get_all_failed_attempts() -> list:
             
             failed_accounts.append({
                 'username': username,
-                'failed_attempts': count,
+                'failed_attempts': int(count),
                 'is_locked': is_locked,
                 'remaining_seconds': remaining,
             })
@@ -301,7 +551,7 @@ def rate_limit(limit=10, window=60, key_prefix='rl'):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             # Bypass global: si rate limiting está deshabilitado, pasar directo
-            if not RATE_LIMIT_ENABLED:
+            if not _rate_limit_enabled():
                 return f(*args, **kwargs)
             
             client_ip = get_client_ip()
@@ -309,42 +559,10 @@ def rate_limit(limit=10, window=60, key_prefix='rl'):
             
             # Crear clave única para este cliente y endpoint
             cache_key = f"{key_prefix}:{endpoint}:{client_ip}"
-            
-            try:
-                # Obtener contador actual
-                current = cache.get(cache_key)
-                
-                if current is None:
-                    # Primera request - inicializar contador
-                    cache.set(cache_key, 1, timeout=window)
-                    current = 1
-                elif current >= limit:
-                    # Límite excedido
-                    return jsonify({
-                        'error': 'Too Many Requests',
-                        'message': f'Límite de {limit} requests por {window} segundos excedido. Intenta más tarde.',
-                        'retry_after': window
-                    }), 429
-                else:
-                    # Incrementar contador
-                    cache.set(cache_key, current + 1, timeout=window)
-                    current += 1
-                
-                # Agregar headers de rate limit a la respuesta
-                response = f(*args, **kwargs)
-                
-                # Si la respuesta es una tupla (jsonify, status_code)
-                if isinstance(response, tuple):
-                    resp_data, status_code = response[0], response[1] if len(response) > 1 else 200
-                    # No podemos modificar headers fácilmente aquí, pero lo dejamos para el middleware
-                    return response
-                
-                return response
-                
-            except Exception as e:
-                # Si Redis no está disponible, permitir la request
-                print(f"Rate limit warning: {e}")
-                return f(*args, **kwargs)
+            return _limited_call(
+                f, args, kwargs, cache_key, limit, window,
+                f'Límite de {limit} requests por {window} segundos excedido. Intenta más tarde.',
+            )
         
         return decorated_function
     return decorator
@@ -431,7 +649,7 @@ def rate_limit_by_user(limit=200, window=60):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             # Bypass global: si rate limiting está deshabilitado, pasar directo
-            if not RATE_LIMIT_ENABLED:
+            if not _rate_limit_enabled():
                 return f(*args, **kwargs)
             
             from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
@@ -439,32 +657,20 @@ def rate_limit_by_user(limit=200, window=60):
             try:
                 verify_jwt_in_request(optional=True)
                 user_id = get_jwt_identity()
-                
-                if not user_id:
-                    # Si no hay usuario, usar IP
-                    client_ip = get_client_ip()
-                    cache_key = f"rl_user:ip:{client_ip}"
-                else:
-                    cache_key = f"rl_user:{user_id}"
-                
-                current = cache.get(cache_key)
-                
-                if current is None:
-                    cache.set(cache_key, 1, timeout=window)
-                elif current >= limit:
-                    return jsonify({
-                        'error': 'Too Many Requests',
-                        'message': f'Límite de {limit} requests por minuto excedido.',
-                        'retry_after': window
-                    }), 429
-                else:
-                    cache.set(cache_key, current + 1, timeout=window)
-                
-                return f(*args, **kwargs)
-                
             except Exception as e:
                 print(f"Rate limit by user warning: {e}")
                 return f(*args, **kwargs)
+
+            if not user_id:
+                # Si no hay usuario, usar IP
+                client_ip = get_client_ip()
+                cache_key = f"rl_user:ip:{client_ip}"
+            else:
+                cache_key = f"rl_user:{user_id}"
+            return _limited_call(
+                f, args, kwargs, cache_key, limit, window,
+                f'Límite de {limit} requests por minuto excedido.',
+            )
         
         return decorated_function
     return decorator
@@ -482,14 +688,14 @@ def rate_limit_by_role(limits=None, default=60, window=60, key_prefix='rl_role')
 
     Notas:
     - admin/developer reciben un múltiplo del límite máximo (~unlimited en la práctica).
-    - Si Redis falla, la request pasa (fail-open) para no romper el flujo.
+    - Si Redis falla se aplican contadores en proceso (por réplica).
     """
     limits = limits or {}
 
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if not RATE_LIMIT_ENABLED:
+            if not _rate_limit_enabled():
                 return f(*args, **kwargs)
 
             from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
@@ -498,45 +704,32 @@ def rate_limit_by_role(limits=None, default=60, window=60, key_prefix='rl_role')
             try:
                 verify_jwt_in_request(optional=True)
                 user_id = get_jwt_identity()
-
-                role = None
-                if user_id:
-                    try:
-                        from app.models.user import User
-                        u = User.query.get(user_id)
-                        role = u.role if u else None
-                    except Exception:
-                        role = None
-
-                # admin/developer prácticamente ilimitados
-                if role in ('admin', 'developer'):
-                    return f(*args, **kwargs)
-
-                effective_limit = limits.get(role, default)
-                endpoint = _req.endpoint or 'unknown'
-                principal = user_id or get_client_ip()
-                cache_key = f"{key_prefix}:{endpoint}:{role or 'anon'}:{principal}"
-
-                current = cache.get(cache_key)
-                if current is None:
-                    cache.set(cache_key, 1, timeout=window)
-                elif current >= effective_limit:
-                    return jsonify({
-                        'error': 'Too Many Requests',
-                        'message': (
-                            f'Límite de {effective_limit} requests por {window}s excedido '
-                            f'para tu rol. Intenta más tarde.'
-                        ),
-                        'retry_after': window
-                    }), 429
-                else:
-                    cache.set(cache_key, current + 1, timeout=window)
-
-                return f(*args, **kwargs)
-
             except Exception as e:
                 print(f"Rate limit by role warning: {e}")
                 return f(*args, **kwargs)
 
+            role = None
+            if user_id:
+                try:
+                    from app.models.user import User
+                    u = User.query.get(user_id)
+                    role = u.role if u else None
+                except Exception:
+                    role = None
+
+            # admin/developer prácticamente ilimitados
+            if role in ('admin', 'developer'):
+                return f(*args, **kwargs)
+
+            effective_limit = limits.get(role, default)
+            endpoint = _req.endpoint or 'unknown'
+            principal = user_id or get_client_ip()
+            cache_key = f"{key_prefix}:{endpoint}:{role or 'anon'}:{principal}"
+            return _limited_call(
+                f, args, kwargs, cache_key, effective_limit, window,
+                f'Límite de {effective_limit} requests por {window}s excedido '
+                f'para tu rol. Intenta más tarde.',
+            )
+
         return decorated_function
     return decorator
@@ -13,6 +13,7 @@ from __future__ import annotations
 
 import base64
 import hashlib
+import hmac
 import os
 from typing import Optional
 
@@ -22,6 +23,7 @@ from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 
 _FERNET: Optional[Fernet] = None
+_FINGERPRINT_KEY: Optional[bytes] = None
 
 
 def _derive_key_from_secret(secret: str) -> bytes:
@@ -82,3 +84,29 @@ def decrypt_api_key(token: str) -> Optional[str]:
 def sha256_hex(s: str) -> str:
     """SHA-256 hex (helper general)."""
     return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+
+def _get_fingerprint_key() -> bytes:
+    global _FINGERPRINT_KEY
+    if _FINGERPRINT_KEY is not None:
+        return _FINGERPRINT_KEY
+    secret = (
+        os.environ.get('SSO_KEY_ENC')
+        or os.environ.get('SECRET_KEY')
+        or 'dev-fallback-secret-do-not-use-in-prod'
+    )
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=b'evaluaasi-sso-api-key-v1',
+        info=b'fingerprint',
+    )
+    _FINGERPRINT_KEY = hkdf.derive(secret.encode('utf-8'))
+    return _FINGERPRINT_KEY
+
+
+def api_key_fingerprint(raw_key: str) -> str:
+    """HMAC-SHA256 (hex) de una API key en claro, con llave derivada del
+    secreto del servidor. Sirve como clave de cache: no permite recuperar ni
+    probar la API key sin el secreto."""
+    return hmac.new(_get_fingerprint_key(), raw_key.encode('utf-8'), hashlib.sha256).hexdigest()
@@ -0,0 +1,196 @@
+"""
+Similitud de texto (Levenshtein normalizado) para calificar textbox de ejercicios
+
+Reemplaza la matriz (n+1)x(m+1) de listas Python por motores de memoria
+O(min(n, m)):
+
+  - 'myers'     Bit-paralelo de Myers/Hyyrö. Usa enteros de Python como
+                vectores de bits de longitud arbitraria: O(n) operaciones
+                sobre ints de ceil(m/64) palabras. Motor por defecto.
+  - 'two_row'   Programación dinámica clásica con dos filas. Referencia.
+  - 'rapidfuzz' Implementación en C de `rapidfuzz` (opcional, solo si el
+                paquete está instalado).
+
+El motor se elige con la variable de entorno TEXT_SIMILARITY_ENGINE
+(default: myers). Todos producen exactamente la misma distancia, así que el
+puntaje es idéntico al de la implementación anterior.
+
+`text_similarity(..., min_score=x)` corta en cuanto la distancia ya no
+puede quedar por debajo del máximo permitido y regresa 0.0: útil cuando solo
+interesa aprobado/no aprobado. La calificación de exámenes usa el puntaje
+exacto (sin `min_score`) porque el score parcial se guarda en el resultado.
+"""
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MAX_INPUT_LENGTH = 500          # M8: cap a inputs para evitar DoS con strings enormes
+SIMILARITY_THRESHOLD = 0.8      # ≥80% se considera correcto
+
+
+def _levenshtein_two_rows(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """Distancia de Levenshtein con dos filas de tamaño min(n, m) + 1."""
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    len2 = len(s2)
+    if len2 == 0:
+        return len(s1)
+
+    previous = list(range(len2 + 1))
+    for i, c1 in enumerate(s1, 1):
+        current = [i] + [0] * len2
+        row_min = i
+        for j, c2 in enumerate(s2, 1):
+            if c1 == c2:
+                value = previous[j - 1]
+            else:
+                value = 1 + min(previous[j], current[j - 1], previous[j - 1])
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        # Los valores de una fila nunca bajan del mínimo de la anterior
+        if max_distance is not None and row_min > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[len2]
+
+
+def _levenshtein_myers(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """Distancia de Levenshtein bit-paralela (Myers 1999 / Hyyrö 2001).
+
+    El patrón es la cadena más corta; cada carácter del texto avanza una
+    columna de la matriz DP en O(1) operaciones sobre enteros.
+    """
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+    m = len(s1)
+    n = len(s2)
+    if m == 0:
+        return n
+
+    peq = {}
+    for i, c in enumerate(s1):
+        peq[c] = peq.get(c, 0) | (1 << i)
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = full
+    mv = 0
+    score = m
+
+    for j, c in enumerate(s2, 1):
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # Cota inferior de la distancia final: cada columna restante baja ≤1
+        if max_distance is not None and score - (n - j) > max_distance:
+            return max_distance + 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv & full
+    return score
+
+
+_ENGINES: Dict[str, Callable[..., int]] = {
+    'myers': _levenshtein_myers,
+    'two_row': _levenshtein_two_rows,
+}
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rf_levenshtein
+
+    def _levenshtein_rapidfuzz(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+        # rapidfuzz regresa score_cutoff + 1 cuando se excede la cota
+        return _rf_levenshtein.distance(s1, s2, score_cutoff=max_distance)
+
+    _ENGINES['rapidfuzz'] = _levenshtein_rapidfuzz
+except ImportError:
+    pass
+
+
+def get_engine(name: Optional[str] = None) -> Callable[..., int]:
+    """Motor de distancia por nombre; cae a 'myers' si no existe."""
+    name = (name or os.getenv('TEXT_SIMILARITY_ENGINE', 'myers')).lower()
+    return _ENGINES.get(name, _levenshtein_myers)
+
+
+def available_engines() -> List[str]:
+    return sorted(_ENGINES)
+
+
+def _normalize(text: str, max_input: int) -> str:
+    s = text.lower().strip()
+    if len(s) > max_input:
+        s = s[:max_input]
+    return s
+
+
+def _similarity(user_answer: str, correct_answer: str, min_score: Optional[float],
+                distance_fn: Callable[..., int], max_input: int) -> float:
+    if not user_answer or not correct_answer:
+        return 0.0
+
+    s1 = _normalize(user_answer, max_input)
+    s2 = _normalize(correct_answer, max_input)
+    if s1 == s2:
+        return 1.0
+
+    max_len = max(len(s1), len(s2))
+    if max_len == 0:
+        return 1.0
+
+    max_distance = None
+    if min_score is not None:
+        # d <= (1 - min_score) * max_len; +1 de holgura contra redondeo flotante
+        max_distance = int((1.0 - min_score) * max_len) + 1
+        if abs(len(s1) - len(s2)) > max_distance:
+            return 0.0
+
+    distance = distance_fn(s1, s2, max_distance)
+    if max_distance is not None and distance > max_distance:
+        return 0.0
+
+    similarity = 1.0 - (distance / max_len)
+    if min_score is not None and similarity < min_score:
+        return 0.0
+    return similarity
+
+
+def text_similarity(user_answer: str, correct_answer: str,
+                    min_score: Optional[float] = None,
+                    engine: Optional[str] = None,
+                    max_input: int = MAX_INPUT_LENGTH) -> float:
+    """Similitud 1 - distancia/max_len entre dos textos (0.0 a 1.0).
+
+    Normaliza igual que la implementación original: minúsculas, strip y
+    truncado a `max_input` caracteres.
+
+    Args:
+        min_score: si se indica, corta en cuanto el puntaje no puede
+            alcanzarlo y regresa 0.0 en ese caso.
+        engine: nombre del motor (ver módulo); default por entorno.
+    """
+    return _similarity(user_answer, correct_answer, min_score, get_engine(engine), max_input)
+
+
+def batch_text_similarity(pairs: Iterable[Tuple[str, str]],
+                          min_score: Optional[float] = None,
+                          engine: Optional[str] = None,
+                          max_input: int = MAX_INPUT_LENGTH) -> Dict[Tuple[str, str], float]:
+    """Califica muchos pares en una llamada.
+
+    Pares repetidos (misma respuesta y misma clave) se calculan una sola vez.
+    Retorna {(user_answer, correct_answer): similitud}.
+    """
+    distance_fn = get_engine(engine)
+    scores: Dict[Tuple[str, str], float] = {}
+    for pair in pairs:
+        if pair not in scores:
+            scores[pair] = _similarity(pair[0], pair[1], min_score, distance_fn, max_input)
+    return scores
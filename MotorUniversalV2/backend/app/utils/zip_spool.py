@@ -0,0 +1,121 @@
+"""
+Ingesta de ZIPs grandes desde blob storage sin cargarlos en memoria.
+
+El blob se descarga por chunks a un archivo temporal y se abre con
+`zipfile` sobre el archivo; las entradas se leen una por una bajo demanda.
+El pico de memoria queda acotado por la entrada más grande, no por el ZIP
+completo (un lote CONOCER puede pesar varios GB).
+
+Lo usan la carga masiva CONOCER (conocer_batch_processor) y la extracción
+de paquetes SCORM (scorm_service / routes/scorm.py).
+
+Configuración por entorno:
+  ZIP_SPOOL_DIR  directorio para los temporales (default: tempfile.gettempdir())
+"""
+import io
+import os
+import tempfile
+import zipfile
+from typing import BinaryIO, Callable, Iterator, Optional, Union
+
+SPOOL_DIR = os.getenv('ZIP_SPOOL_DIR') or None
+
+
+def spool_blob_to_file(blob_client, path: str, max_bytes: Optional[int] = None) -> int:
+    """
+    Descarga un blob a `path` por chunks.
+
+    Args:
+        blob_client: azure.storage.blob.BlobClient
+        max_bytes: si se indica, aborta con ValueError al excederlo (se
+            revisa el tamaño declarado y también lo realmente recibido).
+
+    Returns:
+        Bytes escritos.
+    """
+    downloader = blob_client.download_blob()
+    declared = getattr(downloader, 'size', None)
+    if max_bytes is not None and declared is not None and declared > max_bytes:
+        raise ValueError(f"El archivo excede {max_bytes // (1024 * 1024)} MB")
+
+    written = 0
+    with open(path, 'wb') as fh:
+        for chunk in downloader.chunks():
+            written += len(chunk)
+            if max_bytes is not None and written > max_bytes:
+                raise ValueError(f"El archivo excede {max_bytes // (1024 * 1024)} MB")
+            fh.write(chunk)
+    return written
+
+
+def spool_blob_to_tempfile(blob_client, prefix: str = 'spool_', suffix: str = '.zip',
+                           max_bytes: Optional[int] = None) -> str:
+    """
+    Descarga el blob a un archivo temporal y regresa su ruta. Si la descarga
+    falla el temporal se borra antes de propagar la excepción; si no, el
+    caller lo borra con remove_spool() al terminar.
+    """
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=SPOOL_DIR)
+    os.close(fd)
+    try:
+        spool_blob_to_file(blob_client, path, max_bytes=max_bytes)
+    except BaseException:
+        remove_spool(path)
+        raise
+    return path
+
+
+def remove_spool(path: Optional[str]):
+    """Borra un temporal de spool; ignora si ya no existe."""
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def open_zip(source: Union[str, bytes, BinaryIO]) -> zipfile.ZipFile:
+    """
+    Abre un ZIP desde una ruta, un file-like o bytes (compatibilidad).
+    Con ruta o file-like el contenido se lee del disco bajo demanda.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return zipfile.ZipFile(source, 'r')
+
+
+def source_size(source: Union[str, bytes, BinaryIO]) -> int:
+    """Tamaño en bytes de lo que acepta open_zip."""
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    pos = source.tell()
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(pos)
+    return size
+
+
+def iter_zip_entries(zf: zipfile.ZipFile,
+                     predicate: Optional[Callable[[zipfile.ZipInfo], bool]] = None
+                     ) -> Iterator[zipfile.ZipInfo]:
+    """Entradas (sin directorios) en el orden del ZIP, filtradas por `predicate`."""
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        if predicate is None or predicate(info):
+            yield info
+
+
+def read_zip_entry(zf: zipfile.ZipFile, entry: Union[str, zipfile.ZipInfo],
+                   max_bytes: Optional[int] = None) -> bytes:
+    """
+    Lee UNA entrada completa. Con `max_bytes`, rechaza (ValueError) antes
+    de descomprimir si el tamaño declarado lo excede.
+    """
+    info = entry if isinstance(entry, zipfile.ZipInfo) else zf.getinfo(entry)
+    if max_bytes is not None and info.file_size > max_bytes:
+        raise ValueError(f"{info.filename} excede {max_bytes // (1024 * 1024)} MB")
+    return zf.read(info)
@@ -0,0 +1,119 @@
+"""
+ZIPs enviados por streaming al cliente.
+
+El ZIP se escribe sobre un sink no-seekable (zipfile usa data descriptors)
+y cada entrada se entrega al response en cuanto se escribe; nunca se arma
+el archivo completo en memoria ni en disco.
+
+Los contenidos se descargan en un pool acotado (BlobUploader) y se escriben
+en orden de llegada. A lo más `window` archivos están en vuelo o esperando
+ser escritos, así que la memoria queda acotada por window × tamaño de un
+PDF aunque el cliente descargue lento, y el tiempo total depende del I/O en
+paralelo, no del número de archivos.
+
+Lo usa GET /partners/mi-partner/certificates/download-zip.
+
+Configuración por entorno:
+  ZIP_STREAM_WORKERS  descargas concurrentes (default 8)
+  ZIP_STREAM_WINDOW   archivos en vuelo o pendientes de escribir (default 16)
+"""
+import io
+import os
+import zipfile
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from app.utils.blob_uploader import BlobUploader
+
+ZIP_STREAM_WORKERS = int(os.getenv('ZIP_STREAM_WORKERS', '8'))
+ZIP_STREAM_WINDOW = int(os.getenv('ZIP_STREAM_WINDOW', '16'))
+
+
+class _StreamSink(io.RawIOBase):
+    """Destino no-seekable: acumula lo que escribe zipfile hasta take()."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Sequence[Tuple[str, Any]],
+               fetch: Callable[[Any], bytes],
+               on_finish: Optional[Callable[[int, List[str]], None]] = None,
+               workers: Optional[int] = None,
+               window: Optional[int] = None,
+               compression: int = zipfile.ZIP_STORED) -> Iterator[bytes]:
+    """
+    Generador de bytes del ZIP.
+
+    Args:
+        entries: (ruta dentro del ZIP, source); las rutas repetidas se omiten.
+        fetch: fetch(source) -> bytes; corre en los threads del pool, así que
+            no debe tocar la BD ni el contexto de request.
+        on_finish: on_finish(archivos_escritos, errores) al terminar.
+        compression: ZIP_STORED por default (los PDFs ya vienen comprimidos).
+    """
+    workers = max(1, workers or ZIP_STREAM_WORKERS)
+    window = max(workers, window or ZIP_STREAM_WINDOW)
+
+    seen = set()
+    unique = []
+    for arcname, source in entries:
+        if arcname in seen:
+            continue
+        seen.add(arcname)
+        unique.append((arcname, source))
+
+    sink = _StreamSink()
+    errors: List[str] = []
+    written = 0
+
+    with BlobUploader(max_workers=workers, retries=1, name='zip-stream') as pool:
+        with zipfile.ZipFile(sink, 'w', compression, allowZip64=True) as zf:
+
+            def write(outcome):
+                nonlocal written
+                arcname = unique[outcome.key][0]
+                if not outcome.ok:
+                    errors.append(f"{arcname}: {str(outcome.error)[:100]}")
+                    return
+                if outcome.value:
+                    zf.writestr(arcname, outcome.value)
+                    written += 1
+
+            outstanding = 0
+            for index, (_, source) in enumerate(unique):
+                if outstanding >= window:
+                    write(pool.take())
+                    outstanding -= 1
+                    chunk = sink.take()
+                    if chunk:
+                        yield chunk
+                pool.submit(index, fetch, source)
+                outstanding += 1
+
+            while outstanding:
+                write(pool.take())
+                outstanding -= 1
+                chunk = sink.take()
+                if chunk:
+                    yield chunk
+
+        # Directorio central
+        chunk = sink.take()
+        if chunk:
+            yield chunk
+
+    if on_finish:
+        on_finish(written, errors)
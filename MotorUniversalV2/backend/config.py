@@ -127,6 +127,7 @@ class TestingConfig(Config):
     SQLALCHEMY_ENGINE_OPTIONS = {}  # SQLite no soporta pool_size/max_overflow
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=60)
     WTF_CSRF_ENABLED = False
+    RATE_LIMIT_ENABLED = False  # los tests que lo prueban lo activan explícitamente
 
 
 # Mapeo de configuraciones
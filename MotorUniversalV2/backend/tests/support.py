@@ -0,0 +1,211 @@
+"""
+Helpers compartidos por los tests del backend.
+
+  - QueryCounter: registra las sentencias SQL que llegan al engine.
+  - FakeRedis / NoRedis: stand-ins de Redis para los servicios con dos
+    niveles (Redis + fallback local).
+
+USO (pytest agrega tests/ al sys.path por conftest.py):
+    from support import QueryCounter, FakeRedis, NoRedis
+"""
+import threading
+
+
+class QueryCounter:
+    """Context manager que registra cada sentencia ejecutada en `engine`.
+
+        with QueryCounter(db.engine) as counter:
+            ...
+        counter.statements            # SQL en orden
+        counter.matching('UPDATE USERS', executemany=True)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.executemany = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.executemany.append(executemany)
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+        return False
+
+    def matching(self, *prefixes, executemany=None):
+        """Sentencias que empiezan con alguno de `prefixes` (sin importar
+        mayúsculas); `executemany=True/False` filtra además por lote."""
+        prefixes = tuple(p.upper() for p in prefixes)
+        return [
+            statement for statement, many in zip(self.statements, self.executemany)
+            if statement.lstrip().upper().startswith(prefixes)
+            and (executemany is None or bool(many) == executemany)
+        ]
+
+
+class NoRedis:
+    """Redis caído: cualquier comando lanza ConnectionError."""
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        raise ConnectionError('redis caído')
+
+
+class FakeRedis:
+    """Strings, hashes y sets en memoria con la semántica de redis-py (bytes).
+
+    `calls` cuenta viajes al servidor: cada comando directo, cada
+    `pipeline().execute()` y cada llamada a un script. Los scripts Lua se
+    emulan con handlers de Python registrados por el test:
+
+        redis.on_script('flushed_version', lambda redis, keys, args: ...)
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.sets = {}
+        self.calls = 0
+        self._scripts = []
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _b(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _run(self, name, args, kwargs):
+        return getattr(self, f'_cmd_{name}')(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not hasattr(type(self), f'_cmd_{name}'):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            with self._lock:
+                self.calls += 1
+                return self._run(name, args, kwargs)
+        return command
+
+    # -- scripts --------------------------------------------------------
+
+    def on_script(self, marker, handler):
+        """Emula los scripts cuyo texto contiene `marker` con
+        handler(redis, keys, args)."""
+        self._scripts.append((marker, handler))
+
+    def register_script(self, script):
+        handler = next((h for marker, h in self._scripts if marker in script), None)
+        assert handler is not None, 'script sin emulación en FakeRedis'
+
+        def run(keys=(), args=(), client=None):
+            if client is not None and client is not self:
+                return client.ops.append(('_script', (handler, keys, args), {}))
+            with self._lock:
+                self.calls += 1
+                return handler(self, keys, args)
+        return run
+
+    def _cmd__script(self, handler, keys, args):
+        return handler(self, keys, args)
+
+    # -- pipeline -------------------------------------------------------
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipe:
+            def __init__(self):
+                self.ops = []
+
+            def __getattr__(self, name):
+                if name.startswith('_'):
+                    raise AttributeError(name)
+                return lambda *a, **kw: self.ops.append((name, a, kw))
+
+            def execute(self):
+                with redis._lock:
+                    redis.calls += 1
+                    return [redis._run(name, a, kw) for name, a, kw in self.ops]
+        return _Pipe()
+
+    # -- strings --------------------------------------------------------
+
+    def _cmd_get(self, key):
+        return self.values.get(key)
+
+    def _cmd_set(self, key, value):
+        self.values[key] = self._b(value)
+        return True
+
+    def _cmd_incr(self, key):
+        value = int(self.values.get(key, b'0')) + 1
+        self.values[key] = self._b(value)
+        return value
+
+    def _cmd_expire(self, key, ttl):
+        return True
+
+    def _cmd_exists(self, key):
+        return int(key in self.values or key in self.hashes or key in self.sets)
+
+    def _cmd_delete(self, *keys):
+        return sum(
+            any(store.pop(k, None) is not None for store in (self.values, self.hashes, self.sets))
+            for k in keys
+        )
+
+    # -- hashes ---------------------------------------------------------
+
+    def _cmd_hset(self, key, field=None, value=None, mapping=None):
+        data = self.hashes.setdefault(key, {})
+        for f, v in (mapping or {field: value}).items():
+            data[self._b(f)] = self._b(v)
+        return 1
+
+    def _cmd_hsetnx(self, key, field, value):
+        data = self.hashes.setdefault(key, {})
+        if self._b(field) in data:
+            return 0
+        data[self._b(field)] = self._b(value)
+        return 1
+
+    def _cmd_hincrby(self, key, field, amount):
+        data = self.hashes.setdefault(key, {})
+        value = int(data.get(self._b(field), b'0')) + amount
+        data[self._b(field)] = self._b(value)
+        return value
+
+    def _cmd_hget(self, key, field):
+        return self.hashes.get(key, {}).get(self._b(field))
+
+    def _cmd_hmget(self, key, fields):
+        data = self.hashes.get(key, {})
+        return [data.get(self._b(f)) for f in fields]
+
+    def _cmd_hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    # -- sets -----------------------------------------------------------
+
+    def _cmd_sadd(self, key, *members):
+        current = self.sets.setdefault(key, set())
+        added = {self._b(m) for m in members} - current
+        current.update(added)
+        return len(added)
+
+    def _cmd_srem(self, key, *members):
+        current = self.sets.get(key, set())
+        removed = {self._b(m) for m in members} & current
+        current.difference_update(removed)
+        return len(removed)
+
+    def _cmd_smembers(self, key):
+        return set(self.sets.get(key, set()))
@@ -0,0 +1,238 @@
+"""
+Tests del snapshot de clave de respuestas (answer_key_service):
+  - build_answer_key carga el árbol completo con un número fijo de queries.
+  - POST /api/exams/<id>/evaluate califica igual que la ruta por item
+    (Question.to_dict / Exercise.to_dict) sin queries por item.
+  - Las rutas CRUD invalidan el snapshot (cambio de respuesta correcta).
+
+USO:
+  cd backend && python -m pytest tests/test_answer_key_cache.py -v
+"""
+import sys
+import os
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-answer-key'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+@pytest.fixture(scope='module')
+def admin(app_and_db):
+    app, db = app_and_db
+    from app.models.user import User
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        user = User(
+            id=str(uuid.uuid4()),
+            email=f'adm_{uuid.uuid4().hex[:6]}@evaluaasi.com',
+            username=f'adm_{uuid.uuid4().hex[:6]}',
+            name='Admin',
+            first_surname='Prueba',
+            role='admin',
+        )
+        user.set_password('test1234')
+        db.session.add(user)
+        db.session.commit()
+        return create_access_token(identity=user.id), user.id
+
+
+@pytest.fixture(scope='module')
+def exam_tree(app_and_db, admin):
+    """Examen con 2 temas, 6 preguntas (4 respuestas c/u) y 2 ejercicios."""
+    app, db = app_and_db
+    _token, user_id = admin
+    from app.models.exam import Exam
+    from app.models.category import Category
+    from app.models.topic import Topic
+    from app.models.question import Question, QuestionType
+    from app.models.answer import Answer
+    from app.models.exercise import Exercise, ExerciseStep, ExerciseAction
+    with app.app_context():
+        mc = QuestionType.query.filter_by(name='multiple_choice').first()
+        if not mc:
+            mc = QuestionType(name='multiple_choice', description='Opción múltiple')
+            db.session.add(mc)
+            db.session.flush()
+
+        exam = Exam(name='Examen Answer Key', version='1.0', stage_id=1,
+                    passing_score=70, created_by=user_id)
+        db.session.add(exam)
+        db.session.flush()
+        cat = Category(exam_id=exam.id, name='Cat A', percentage=100, created_by=user_id)
+        db.session.add(cat)
+        db.session.flush()
+
+        question_ids, correct_ids, exercise_ids = [], {}, []
+        for t_idx in range(2):
+            topic = Topic(category_id=cat.id, name=f'Tema {t_idx}', percentage=50,
+                          order=t_idx, created_by=user_id)
+            db.session.add(topic)
+            db.session.flush()
+            for q_idx in range(3):
+                q = Question(topic_id=topic.id, question_type_id=mc.id,
+                             question_number=q_idx + 1, question_text=f'P{t_idx}-{q_idx}',
+                             created_by=user_id)
+                db.session.add(q)
+                db.session.flush()
+                for a_idx in range(4):
+                    a = Answer(question_id=q.id, answer_number=a_idx + 1,
+                               answer_text=f'R{a_idx}', is_correct=(a_idx == 1),
+                               created_by=user_id)
+                    db.session.add(a)
+                    db.session.flush()
+                    if a_idx == 1:
+                        correct_ids[q.id] = a.id
+                question_ids.append(q.id)
+
+            ex = Exercise(id=str(uuid.uuid4()), topic_id=topic.id, exercise_number=1,
+                          title=f'Ejercicio {t_idx}', created_by=user_id)
+            db.session.add(ex)
+            db.session.flush()
+            step = ExerciseStep(id=str(uuid.uuid4()), exercise_id=ex.id, step_number=1, title='Paso 1')
+            db.session.add(step)
+            db.session.flush()
+            db.session.add(ExerciseAction(
+                id=str(uuid.uuid4()), step_id=step.id, action_number=1, action_type='button',
+                position_x=0, position_y=0, width=10, height=5, correct_answer='correct'))
+            db.session.add(ExerciseAction(
+                id=str(uuid.uuid4()), step_id=step.id, action_number=2, action_type='textbox',
+                position_x=0, position_y=0, width=10, height=5, correct_answer='Hola Mundo',
+                scoring_mode='similarity'))
+            exercise_ids.append(ex.id)
+        db.session.commit()
+        return exam.id, question_ids, correct_ids, exercise_ids
+
+
+def _auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _count_queries(db):
+    from sqlalchemy import event
+    counter = {'n': 0}
+
+    def _before(*_args, **_kwargs):
+        counter['n'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', _before)
+    return counter, lambda: event.remove(db.engine, 'before_cursor_execute', _before)
+
+
+class TestBuildAnswerKey:
+
+    def test_fixed_number_of_queries(self, app_and_db, exam_tree):
+        app, db = app_and_db
+        exam_id, question_ids, _correct, exercise_ids = exam_tree
+        from app.services.answer_key_service import build_answer_key
+        with app.app_context():
+            counter, stop = _count_queries(db)
+            try:
+                key = build_answer_key(exam_id)
+            finally:
+                stop()
+            assert counter['n'] == 7
+            assert set(key['questions']) == {str(q) for q in question_ids}
+            assert set(key['exercises']) == {str(e) for e in exercise_ids}
+            assert key['category_percentages'] == {'Cat A': 100}
+            assert key['topic_percentages'] == {'Cat A|Tema 0': 50, 'Cat A|Tema 1': 50}
+
+    def test_snapshot_matches_orm_serialization(self, app_and_db, exam_tree):
+        app, _ = app_and_db
+        exam_id, question_ids, _correct, exercise_ids = exam_tree
+        from app.services.answer_key_service import build_answer_key
+        from app.models.question import Question
+        from app.models.exercise import Exercise
+        with app.app_context():
+            key = build_answer_key(exam_id)
+            for qid in question_ids:
+                orm = Question.query.get(qid).to_dict(include_answers=True, include_correct=True)
+                snap = key['questions'][str(qid)]
+                assert snap['answers'] == orm['answers']
+                assert snap['question_type'] == orm['question_type']
+            for eid in exercise_ids:
+                orm = Exercise.query.get(eid).to_dict(include_steps=True)
+                snap = key['exercises'][str(eid)]
+                assert [s['id'] for s in snap['steps']] == [s['id'] for s in orm['steps']]
+                for s_snap, s_orm in zip(snap['steps'], orm['steps']):
+                    for a_snap, a_orm in zip(s_snap['actions'], s_orm['actions']):
+                        for field, value in a_snap.items():
+                            assert a_orm[field] == value
+
+
+class TestEvaluateWithAnswerKey:
+
+    def _payload(self, question_ids, correct_ids, exercise_ids, exercise_tree):
+        answers = {qid: correct_ids[qid] for qid in question_ids[:4]}
+        items = [{'type': 'question', 'question_id': qid, 'category_name': 'Cat A',
+                  'topic_name': 'Tema 0'} for qid in question_ids]
+        items += [{'type': 'exercise', 'exercise_id': eid, 'category_name': 'Cat A',
+                   'topic_name': 'Tema 1'} for eid in exercise_ids]
+        exercise_responses = {}
+        for eid in exercise_ids:
+            step = exercise_tree[str(eid)]['steps'][0]
+            exercise_responses[eid] = {
+                f"{step['id']}_{a['id']}": (True if a['action_type'] == 'button' else 'hola mundo!')
+                for a in step['actions']
+            }
+        return {'answers': answers, 'exerciseResponses': exercise_responses, 'items': items}
+
+    def test_evaluate_no_per_item_queries(self, app_and_db, admin, exam_tree):
+        app, db = app_and_db
+        token, _ = admin
+        exam_id, question_ids, correct_ids, exercise_ids = exam_tree
+        from app.services.answer_key_service import get_answer_key, clear_local_answer_keys
+        with app.app_context():
+            clear_local_answer_keys()
+            payload = self._payload(question_ids, correct_ids, exercise_ids,
+                                    get_answer_key(exam_id)['exercises'])
+        with app.test_client() as client:
+            client.post(f'/api/exams/{exam_id}/evaluate', json=payload, headers=_auth(token))
+            with app.app_context():
+                counter, stop = _count_queries(db)
+            try:
+                resp = client.post(f'/api/exams/{exam_id}/evaluate', json=payload, headers=_auth(token))
+            finally:
+                stop()
+        assert resp.status_code == 200, resp.get_json()
+        summary = resp.get_json()['results']['summary']
+        assert summary['correct_questions'] == 4
+        assert summary['correct_exercises'] == 2
+        # Con snapshot en cache: sólo queries fijas (usuario JWT, examen), ninguna por item
+        assert counter['n'] <= 3
+
+    def test_answer_update_invalidates_snapshot(self, app_and_db, admin, exam_tree):
+        app, _ = app_and_db
+        token, _ = admin
+        exam_id, question_ids, correct_ids, exercise_ids = exam_tree
+        from app.models.answer import Answer
+        from app.services.answer_key_service import get_answer_key
+        qid = question_ids[0]
+        with app.app_context():
+            get_answer_key(exam_id)  # calentar cache
+            wrong = Answer.query.filter_by(question_id=qid, is_correct=False).first()
+            wrong_id = wrong.id
+        with app.test_client() as client:
+            r1 = client.put(f'/api/exams/answers/{correct_ids[qid]}', json={'is_correct': False},
+                            headers=_auth(token))
+            r2 = client.put(f'/api/exams/answers/{wrong_id}', json={'is_correct': True},
+                            headers=_auth(token))
+            assert r1.status_code == 200 and r2.status_code == 200
+        with app.app_context():
+            snap = get_answer_key(exam_id)['questions'][str(qid)]
+            correct = [a['id'] for a in snap['answers'] if a['is_correct']]
+            assert correct == [wrong_id]
@@ -0,0 +1,177 @@
+"""
+Tests del uploader concurrente (app/utils/blob_uploader.py) contra un
+stand-in de blob storage en memoria, y de su uso en SCORM.
+
+Cubre:
+  1. Un resultado por archivo; la concurrencia no pasa de max_workers.
+  2. Reintentos: errores transitorios se reintentan, ValueError no.
+  3. Backpressure: los bytes en vuelo nunca exceden el presupuesto.
+  4. cancel(): lo que no empezó termina con error sin ejecutarse.
+  5. extract_and_upload reporta la subida fallida después de reintentar.
+
+USO:
+  cd backend && python -m pytest tests/test_blob_uploader.py -v
+"""
+import os
+import sys
+import threading
+import time
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils.blob_uploader import BlobUploader  # noqa: E402
+from app.services import scorm_service  # noqa: E402
+
+
+class InMemoryBlobStore:
+    """Stand-in de un contenedor: guarda blobs y mide concurrencia."""
+
+    def __init__(self, delay=0.0, fail_first=None):
+        self.blobs = {}
+        self.delay = delay
+        self.fail_first = dict(fail_first or {})  # nombre -> fallos antes de aceptar
+        self.calls = {}
+        self.active = 0
+        self.max_active = 0
+        self.active_bytes = 0
+        self.max_active_bytes = 0
+        self._lock = threading.Lock()
+
+    def upload(self, name, data):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.active += 1
+            self.active_bytes += len(data)
+            self.max_active = max(self.max_active, self.active)
+            self.max_active_bytes = max(self.max_active_bytes, self.active_bytes)
+            fail = self.fail_first.get(name, 0) >= self.calls[name]
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise ConnectionError(f'timeout subiendo {name}')
+            self.blobs[name] = bytes(data)
+            return f'https://blob/{name}'
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.active_bytes -= len(data)
+
+
+def test_one_result_per_file_and_bounded_concurrency():
+    store = InMemoryBlobStore(delay=0.02)
+    results = []
+    with BlobUploader(max_workers=3, backoff=0) as uploader:
+        for i in range(20):
+            data = bytes([i]) * 100
+            uploader.submit(f'f{i}', store.upload, f'f{i}', data, size=len(data))
+            results.extend(uploader.poll())
+        results.extend(uploader.drain())
+
+    assert sorted(r.key for r in results) == sorted(f'f{i}' for i in range(20))
+    assert all(r.ok and r.attempts == 1 for r in results)
+    assert len(store.blobs) == 20
+    assert store.max_active <= 3
+    assert store.blobs['f7'] == bytes([7]) * 100
+
+
+def test_transient_errors_retried_validation_errors_not():
+    store = InMemoryBlobStore(fail_first={'flaky': 2, 'down': 99})
+
+    def validate_then_upload(name, data):
+        if not data:
+            raise ValueError('El archivo está vacío')
+        return store.upload(name, data)
+
+    with BlobUploader(max_workers=2, retries=2, backoff=0) as uploader:
+        uploader.submit('flaky', validate_then_upload, 'flaky', b'x')
+        uploader.submit('down', validate_then_upload, 'down', b'x')
+        uploader.submit('empty', validate_then_upload, 'empty', b'')
+        results = {r.key: r for r in uploader.drain()}
+
+    assert results['flaky'].ok and results['flaky'].attempts == 3
+    assert not results['down'].ok and results['down'].attempts == 3
+    assert isinstance(results['down'].error, ConnectionError)
+    assert not results['empty'].ok and results['empty'].attempts == 1
+    assert isinstance(results['empty'].error, ValueError)
+    assert 'down' not in store.blobs
+
+
+def test_backpressure_limits_inflight_bytes():
+    store = InMemoryBlobStore(delay=0.01)
+    budget = 1000
+    with BlobUploader(max_workers=8, max_inflight_bytes=budget, backoff=0) as uploader:
+        for i in range(30):
+            data = b'x' * 300
+            uploader.submit(i, store.upload, f'b{i}', data, size=len(data))
+        results = list(uploader.drain())
+
+    assert len(results) == 30
+    assert store.max_active_bytes <= budget
+    # 300 B por archivo y 1000 B de presupuesto: a lo más 3 en vuelo
+    assert store.max_active <= 3
+
+
+def test_oversized_item_still_admitted_alone():
+    store = InMemoryBlobStore()
+    with BlobUploader(max_workers=2, max_inflight_bytes=10, backoff=0) as uploader:
+        uploader.submit('big', store.upload, 'big', b'x' * 100, size=100)
+        [result] = list(uploader.drain())
+    assert result.ok
+
+
+def test_cancel_skips_pending_uploads():
+    gate = threading.Event()
+    store = InMemoryBlobStore()
+
+    def slow(name, data):
+        gate.wait(5)
+        return store.upload(name, data)
+
+    uploader = BlobUploader(max_workers=1, backoff=0)
+    for i in range(5):
+        uploader.submit(i, slow, f'c{i}', b'x')
+    uploader.cancel()
+    gate.set()
+    results = list(uploader.drain())
+    uploader.close()
+
+    assert len(results) == 5
+    assert sum(r.ok for r in results) <= 1
+    assert len(store.blobs) <= 1
+
+
+def test_scorm_reports_failed_asset_after_retries(tmp_path, monkeypatch):
+    store = InMemoryBlobStore(fail_first={'p/b.js': 99, 'p/a.html': 1})
+
+    class _Storage:
+        def _ensure_scorm_container(self):
+            return True
+
+        def upload_scorm_asset(self, data, blob_path, content_type):
+            try:
+                return store.upload(blob_path, data)
+            except ConnectionError:
+                return None  # como AzureStorageService: None si falla
+
+        def scorm_base_url(self, prefix):
+            return f'https://blob/{prefix}/'
+
+    monkeypatch.setattr(scorm_service, 'AzureStorageService', _Storage)
+    monkeypatch.setattr('app.utils.blob_uploader.BLOB_UPLOAD_RETRIES', 2)
+
+    path = str(tmp_path / 'pkg.zip')
+    manifest = (b'<manifest xmlns="http://www.imsproject.org/xsd/imscp_rootv1p1p2">'
+                b'<organizations/><resources><resource identifier="r" href="a.html"/></resources></manifest>')
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('imsmanifest.xml', manifest)
+        zf.writestr('a.html', b'<html/>')
+        zf.writestr('b.js', b'1')
+
+    with pytest.raises(ValueError, match='b.js'):
+        scorm_service.extract_and_upload(path, package_uuid='p')
+    # a.html falló una vez y se reintentó; b.js agotó los reintentos
+    assert store.calls['p/a.html'] == 2
+    assert store.calls['p/b.js'] == 3
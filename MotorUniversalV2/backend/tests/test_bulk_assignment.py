@@ -0,0 +1,384 @@
+"""
+Tests del motor de asignación masiva (app/services/bulk_assignment_service.py)
+y de los endpoints que lo usan:
+  - POST /partners/groups/<gid>/exams: diff de ECA existentes, un solo
+    débito, números de asignación únicos y número de queries que no crece
+    con el tamaño del grupo.
+  - Saldo insuficiente: no se crea nada.
+  - /exams/<eid>/assignments/add y /exams/<eid>/members/add: migración
+    'all' → 'selected' sin duplicados.
+  - /exams/bulk-assign (Excel): filas repetidas, candidatos con ECM previo
+    y un solo débito.
+  - generate_assignment_numbers evita colisiones con números existentes.
+  - sso_service.apply_standard_assignments: ledger y cobro diferido solo
+    para ECM nuevos; un examen repetido en la llamada crea un solo GroupExam.
+
+USO:
+  cd backend && python -m pytest tests/test_bulk_assignment.py -v
+"""
+import io
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+UNIT_COST = 100
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-bulk-assignment'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _user(db, role, **extra):
+    from app.models.user import User
+    suffix = uuid.uuid4().hex[:8]
+    user = User(
+        id=str(uuid.uuid4()),
+        email=f'{role}_{suffix}@evaluaasi.com',
+        username=f'{role}_{suffix}',
+        name='Usuario',
+        first_surname=suffix,
+        role=role,
+        **extra,
+    )
+    user.set_password('test1234')
+    db.session.add(user)
+    return user
+
+
+@pytest.fixture(scope='module')
+def setup(app_and_db):
+    """Coordinador con saldo, plantel con costo y un ECM con examen publicado."""
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models import Partner, Campus
+    from app.models.balance import CoordinatorBalance
+    from app.models.exam import Exam
+    from app.models.competency_standard import CompetencyStandard
+    with app.app_context():
+        admin = _user(db, 'admin')
+        coord = _user(db, 'coordinator')
+        db.session.flush()
+        partner = Partner(name='Partner Masivo', coordinator_id=coord.id)
+        db.session.add(partner)
+        db.session.flush()
+        campus = Campus(partner_id=partner.id, name='Plantel Masivo', code=f'BLK{uuid.uuid4().hex[:6]}',
+                        coordinator_id=coord.id, certification_cost=UNIT_COST)
+        db.session.add(campus)
+        db.session.flush()
+        standards, exams = [], []
+        for i in range(3):
+            std = CompetencyStandard(code=f'EC{uuid.uuid4().hex[:5].upper()}', name=f'Estándar {i}',
+                                     created_by=admin.id)
+            db.session.add(std)
+            db.session.flush()
+            exam = Exam(name=f'Examen masivo {i}', version='1.0', stage_id=1, created_by=admin.id,
+                        is_published=True, competency_standard_id=std.id)
+            db.session.add(exam)
+            db.session.flush()
+            standards.append(std)
+            exams.append(exam)
+        db.session.add(CoordinatorBalance(coordinator_id=coord.id, campus_id=campus.id,
+                                          current_balance=1_000_000))
+        db.session.commit()
+        return {
+            'admin_id': admin.id,
+            'coord_id': coord.id,
+            'campus_id': campus.id,
+            'standard_ids': [s.id for s in standards],
+            'standard_codes': [s.code for s in standards],
+            'exam_ids': [e.id for e in exams],
+            'headers': {'Authorization': f'Bearer {create_access_token(identity=coord.id)}'},
+        }
+
+
+def _group(app, db, setup, size, prior_ecm_for=0, exam_index=0, name='Grupo'):
+    """Grupo con `size` candidatos; los primeros `prior_ecm_for` ya tienen el ECM."""
+    from app.models import CandidateGroup, GroupMember
+    from app.models.partner import EcmCandidateAssignment
+    with app.app_context():
+        group = CandidateGroup(campus_id=setup['campus_id'], coordinator_id=setup['coord_id'], name=name)
+        db.session.add(group)
+        db.session.flush()
+        users = [_user(db, 'candidato') for _ in range(size)]
+        db.session.flush()
+        for user in users:
+            db.session.add(GroupMember(group_id=group.id, user_id=user.id))
+        for user in users[:prior_ecm_for]:
+            db.session.add(EcmCandidateAssignment(
+                assignment_number=EcmCandidateAssignment.generate_assignment_number(),
+                user_id=user.id, competency_standard_id=setup['standard_ids'][exam_index],
+                exam_id=setup['exam_ids'][exam_index], group_name='Grupo anterior',
+            ))
+        db.session.commit()
+        return group.id, [u.id for u in users]
+
+
+def _debits(group_id):
+    from app.models.balance import BalanceTransaction
+    return BalanceTransaction.query.filter_by(group_id=group_id, transaction_type='debit').all()
+
+
+def test_assign_exam_to_group_diffs_and_debits_once(app_and_db, setup):
+    app, db = app_and_db
+    from app.models.partner import EcmCandidateAssignment, GroupExam
+    group_id, user_ids = _group(app, db, setup, 40, prior_ecm_for=5)
+    client = app.test_client()
+    with app.app_context():
+        with QueryCounter(db.engine) as counter:
+            resp = client.post(f'/api/partners/groups/{group_id}/exams', headers=setup['headers'],
+                               json={'exam_id': setup['exam_ids'][0], 'assignment_type': 'all'})
+    assert resp.status_code == 201, resp.get_json()
+    data = resp.get_json()
+    assert data['already_assigned_count'] == 5
+    assert {a['user_id'] for a in data['already_assigned']} == set(user_ids[:5])
+    assert all(a['original_group'] == 'Grupo anterior' for a in data['already_assigned'])
+    assert data['new_ecm_assignments_count'] == 35
+    assert data['billing'] == {'unit_cost': UNIT_COST, 'billable_count': 35,
+                               'total_cost': 35 * UNIT_COST, 'skipped_count': 5}
+    details = {d['user_id']: d for d in data['new_assignments']}
+    assert set(details) == set(user_ids[5:])
+    assert all(d['user_email'].endswith('@evaluaasi.com') for d in details.values())
+    # Sin una query por candidato
+    assert len(counter.statements) < 40, len(counter.statements)
+
+    with app.app_context():
+        ge = GroupExam.query.filter_by(group_id=group_id, exam_id=setup['exam_ids'][0]).one()
+        ecas = EcmCandidateAssignment.query.filter(EcmCandidateAssignment.user_id.in_(user_ids)).all()
+        assert len(ecas) == 40
+        new = [e for e in ecas if e.group_exam_id == ge.id]
+        assert len(new) == 35
+        assert {e.assignment_number for e in new} == {d['assignment_number'] for d in details.values()}
+        assert all(len(e.assignment_number) == 14 and e.assignment_source == 'bulk' for e in new)
+        assert all(e.expires_at == ge.expires_at and e.validity_months == ge.validity_months for e in new)
+        assert all(e.tramite_status == 'pendiente' and e.extended_months == 0 for e in new)
+        debits = _debits(group_id)
+        assert len(debits) == 1 and float(debits[0].amount) == 35 * UNIT_COST
+        assert debits[0].reference_id == ge.id
+
+
+def test_assign_query_count_independent_of_group_size(app_and_db, setup):
+    app, db = app_and_db
+    client = app.test_client()
+    counts = []
+    for size in (3, 30):
+        group_id, _ = _group(app, db, setup, size, prior_ecm_for=1, exam_index=1, name=f'Tamaño {size}')
+        with app.app_context():
+            with QueryCounter(db.engine) as counter:
+                resp = client.post(f'/api/partners/groups/{group_id}/exams', headers=setup['headers'],
+                                   json={'exam_id': setup['exam_ids'][1], 'assignment_type': 'all'})
+            assert resp.status_code == 201, resp.get_json()
+            counts.append(len(counter.statements))
+    assert counts[0] == counts[1], counts
+
+
+def test_insufficient_balance_creates_nothing(app_and_db, setup):
+    app, db = app_and_db
+    from app.models.balance import CoordinatorBalance
+    from app.models.partner import EcmCandidateAssignment, GroupExam
+    group_id, user_ids = _group(app, db, setup, 4, name='Sin saldo')
+    with app.app_context():
+        balance = CoordinatorBalance.query.filter_by(coordinator_id=setup['coord_id'],
+                                                     campus_id=setup['campus_id']).one()
+        original = balance.current_balance
+        balance.current_balance = UNIT_COST * 2
+        db.session.commit()
+    try:
+        resp = app.test_client().post(f'/api/partners/groups/{group_id}/exams', headers=setup['headers'],
+                                      json={'exam_id': setup['exam_ids'][2], 'assignment_type': 'selected',
+                                            'member_ids': user_ids})
+        assert resp.status_code == 400
+        assert resp.get_json()['error_type'] == 'insufficient_balance'
+        assert resp.get_json()['billable_count'] == 4
+        with app.app_context():
+            assert GroupExam.query.filter_by(group_id=group_id).count() == 0
+            assert EcmCandidateAssignment.query.filter(
+                EcmCandidateAssignment.user_id.in_(user_ids)).count() == 0
+            assert _debits(group_id) == []
+    finally:
+        with app.app_context():
+            balance = CoordinatorBalance.query.filter_by(coordinator_id=setup['coord_id'],
+                                                         campus_id=setup['campus_id']).one()
+            balance.current_balance = original
+            db.session.commit()
+
+
+def test_add_assignments_and_members_migrate_all_to_selected(app_and_db, setup):
+    app, db = app_and_db
+    from app.models import GroupMember
+    from app.models.partner import EcmCandidateAssignment, GroupExam, GroupExamMember
+    group_id, user_ids = _group(app, db, setup, 6, name='Adicionales')
+    client = app.test_client()
+    with app.app_context():
+        # Asignación 'all' sin ECA para nadie; dos candidatos llegan después al grupo
+        ge = GroupExam(group_id=group_id, exam_id=setup['exam_ids'][2], assignment_type='all')
+        db.session.add(ge)
+        late = [_user(db, 'candidato') for _ in range(2)]
+        db.session.flush()
+        for user in late:
+            db.session.add(GroupMember(group_id=group_id, user_id=user.id))
+        db.session.add(EcmCandidateAssignment(
+            assignment_number=EcmCandidateAssignment.generate_assignment_number(),
+            user_id=late[1].id, competency_standard_id=setup['standard_ids'][2],
+            exam_id=setup['exam_ids'][2], group_name='Otro grupo'))
+        db.session.commit()
+        ge_id, late_ids = ge.id, [u.id for u in late]
+
+    resp = client.post(f"/api/partners/groups/{group_id}/exams/{setup['exam_ids'][2]}/assignments/add",
+                       headers=setup['headers'], json={'user_ids': late_ids + [late_ids[0]]})
+    assert resp.status_code == 200, resp.get_json()
+    data = resp.get_json()
+    assert data['assigned_count'] == 1 and data['assigned'][0]['user_id'] == late_ids[0]
+    assert data['already_assigned_count'] == 1
+    assert data['already_assigned'][0]['user_id'] == late_ids[1]
+    assert data['total_cost'] == UNIT_COST
+
+    with app.app_context():
+        ge = GroupExam.query.get(ge_id)
+        assert ge.assignment_type == 'selected'
+        members = [m.user_id for m in GroupExamMember.query.filter_by(group_exam_id=ge_id).all()]
+        assert sorted(members) == sorted(user_ids + late_ids)
+        assert len(_debits(group_id)) == 1
+
+    # members/add: solo agrega a quien falta
+    with app.app_context():
+        extra = _user(db, 'candidato')
+        db.session.add(GroupMember(group_id=group_id, user_id=extra.id))
+        db.session.commit()
+        extra_id = extra.id
+    resp = client.post(f"/api/partners/groups/{group_id}/exams/{setup['exam_ids'][2]}/members/add",
+                       headers=setup['headers'], json={'user_ids': [extra_id, user_ids[0]]})
+    assert resp.status_code == 200, resp.get_json()
+    assert resp.get_json()['added'] == [extra_id]
+    with app.app_context():
+        assert GroupExamMember.query.filter_by(group_exam_id=ge_id).count() == len(user_ids) + 3
+
+
+def test_bulk_assign_excel_batches_rows(app_and_db, setup):
+    app, db = app_and_db
+    from openpyxl import Workbook
+    from app.models.partner import EcmCandidateAssignment, GroupExam, GroupExamMember
+    from app.models.user import User
+    group_id, user_ids = _group(app, db, setup, 8, prior_ecm_for=2, exam_index=0, name='Excel')
+    with app.app_context():
+        emails = [User.query.get(uid).email for uid in user_ids]
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Correo'])
+    for email in emails + [emails[3], 'nadie@evaluaasi.com']:
+        ws.append([email])
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+
+    resp = app.test_client().post(
+        f'/api/partners/groups/{group_id}/exams/bulk-assign', headers=setup['headers'],
+        data={'file': (buf, 'asignacion.xlsx'), 'ecm_code': setup['standard_codes'][0]},
+        content_type='multipart/form-data')
+    assert resp.status_code == 200, resp.get_json()
+    summary = resp.get_json()['summary']
+    assert summary == {'total_processed': 10, 'assigned': 8, 'skipped': 1, 'errors': 1}
+    assert resp.get_json()['results']['skipped'][0]['user_id'] == user_ids[3]
+
+    with app.app_context():
+        ge = GroupExam.query.filter_by(group_id=group_id, exam_id=setup['exam_ids'][0]).one()
+        assert GroupExamMember.query.filter_by(group_exam_id=ge.id).count() == 8
+        new = EcmCandidateAssignment.query.filter_by(group_exam_id=ge.id).all()
+        assert sorted(e.user_id for e in new) == sorted(user_ids[2:])
+        assert all(e.assignment_source == 'bulk_upload' for e in new)
+        debits = _debits(group_id)
+        # bulk-assign cobra todas las filas asignadas (regla existente)
+        assert len(debits) == 1 and float(debits[0].amount) == 8 * UNIT_COST
+
+
+def test_generate_assignment_numbers_skips_collisions(app_and_db, setup, monkeypatch):
+    app, db = app_and_db
+    from app.services import bulk_assignment_service as svc
+    from app.models.partner import EcmCandidateAssignment
+    group_id, user_ids = _group(app, db, setup, 1, name='Colisión')
+    with app.app_context():
+        db.session.add(EcmCandidateAssignment(
+            assignment_number='A' * 14, user_id=user_ids[0],
+            competency_standard_id=setup['standard_ids'][1], exam_id=setup['exam_ids'][1]))
+        db.session.commit()
+
+        sequence = iter('A' * 14 + 'A' * 14 + 'B' * 14 + 'C' * 14 + 'D' * 14)
+        monkeypatch.setattr(svc.secrets, 'choice', lambda chars: next(sequence))
+        # El primer lote trae 'AAA…' (existe) y 'AAA…' repetido; se regenera uno
+        assert sorted(svc.generate_assignment_numbers(2)) == ['B' * 14, 'C' * 14]
+
+
+def test_apply_standard_assignments_batches_lookups(app_and_db, setup):
+    app, db = app_and_db
+    from app.models import CandidateGroup, GroupMember
+    from app.models.campus_api_key import CampusApiKey
+    from app.models.partner import EcmCandidateAssignment, GroupExam, GroupExamMember
+    from app.models.user import User
+    from app.services.sso_service import apply_standard_assignments
+    group_id, user_ids = _group(app, db, setup, 1, prior_ecm_for=1, exam_index=0, name='SSO')
+    with app.app_context():
+        group = CandidateGroup.query.get(group_id)
+        user = User.query.get(user_ids[0])
+        # Ya existe la asignación del estándar 1 (sin el candidato)
+        db.session.add(GroupExam(group_id=group_id, exam_id=setup['exam_ids'][1], assignment_type='selected'))
+        api_key = CampusApiKey(campus_id=setup['campus_id'], name='Llave lote',
+                               api_key_hash='x', api_key_encrypted='x', api_key_prefix='blk',
+                               created_by_id=setup['coord_id'])
+        db.session.add(api_key)
+        db.session.commit()
+
+        from app.models.competency_standard import CompetencyStandard
+        from app.models.exam import Exam
+        resolved = [(CompetencyStandard.query.get(sid), Exam.query.get(eid))
+                    for sid, eid in zip(setup['standard_ids'][:2], setup['exam_ids'][:2])]
+        materialized = apply_standard_assignments(api_key, user, group, resolved)
+        assert [ge.exam_id for ge in materialized] == setup['exam_ids'][:2]
+
+        gems = {m.group_exam.exam_id: m for m in GroupExamMember.query.filter_by(user_id=user.id).all()}
+        assert set(gems) == set(setup['exam_ids'][:2])
+        # Estándar 0: ya tenía ECM → libre; estándar 1: nuevo → pendiente + ECA histórica
+        assert gems[setup['exam_ids'][0]].pending_billing is False
+        assert gems[setup['exam_ids'][1]].pending_billing is True
+        assert EcmCandidateAssignment.query.filter_by(
+            user_id=user.id, competency_standard_id=setup['standard_ids'][1]).count() == 1
+        assert GroupExam.query.filter_by(group_id=group_id).count() == 2
+
+        # Repetir no duplica nada
+        apply_standard_assignments(api_key, user, group, resolved)
+        assert GroupExamMember.query.filter_by(user_id=user.id).count() == 2
+        assert GroupMember.query.filter_by(group_id=group_id).count() == 1
+
+
+def test_apply_standard_assignments_repeated_exam_creates_one_group_exam(app_and_db, setup):
+    app, db = app_and_db
+    from app.models import CandidateGroup
+    from app.models.partner import GroupExam, GroupExamMember
+    from app.models.user import User
+    from app.models.competency_standard import CompetencyStandard
+    from app.models.exam import Exam
+    from app.services.sso_service import apply_standard_assignments
+    group_id, user_ids = _group(app, db, setup, 1, name='SSO repetido')
+    with app.app_context():
+        group = CandidateGroup.query.get(group_id)
+        user = User.query.get(user_ids[0])
+        pair = (CompetencyStandard.query.get(setup['standard_ids'][2]), Exam.query.get(setup['exam_ids'][2]))
+        materialized = apply_standard_assignments(None, user, group, [pair, pair])
+        assert materialized[0].id == materialized[1].id
+        assert GroupExam.query.filter_by(group_id=group_id).count() == 1
+        assert GroupExamMember.query.filter_by(user_id=user.id).count() == 1
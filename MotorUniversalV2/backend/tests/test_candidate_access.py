@@ -0,0 +1,308 @@
+"""
+Tests de la resolución de acceso del candidato (app/services/candidate_access.py)
+y de los endpoints que la usan:
+  - Mismos exámenes / materiales / gating de pago que el recorrido anterior
+    grupo por grupo (membresía inactiva, grupo inactivo, asignación
+    'selected' con y sin el candidato, asignación inactiva, material no
+    incluido, override de pagos del grupo).
+  - Número de queries fijo sin importar cuántos grupos tenga el candidato.
+  - /partners/mis-examenes elige la asignación pagada / más reciente para
+    exámenes duplicados; /partners/mis-materiales omite los de exámenes con
+    pago pendiente; /exams/<id>/check-access reporta el pago pendiente.
+
+USO:
+  cd backend && python -m pytest tests/test_candidate_access.py -v
+"""
+import sys
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-candidate-access'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _user(db, role):
+    from app.models.user import User
+    suffix = uuid.uuid4().hex[:8]
+    user = User(
+        id=str(uuid.uuid4()),
+        email=f'{role}_{suffix}@evaluaasi.com',
+        username=f'{role}_{suffix}',
+        name='Usuario',
+        first_surname='Prueba',
+        role=role,
+    )
+    user.set_password('test1234')
+    db.session.add(user)
+    return user
+
+
+def _legacy_access(user_id):
+    """Recorrido anterior del dashboard (una query por grupo / asignación)."""
+    from app.models.partner import (
+        Campus, CandidateGroup, GroupExam, GroupExamMaterial, GroupExamMember, GroupMember,
+    )
+    from app.models.payment import Payment
+
+    group_ids = []
+    for m in GroupMember.query.filter_by(user_id=str(user_id), status='active').all():
+        if CandidateGroup.query.filter_by(id=m.group_id, is_active=True).first():
+            group_ids.append(m.group_id)
+
+    exam_ids, material_ids, exam_materials = set(), set(), {}
+    if not group_ids:
+        return exam_ids, material_ids, exam_materials
+    for ge in GroupExam.query.filter(GroupExam.group_id.in_(group_ids), GroupExam.is_active == True).all():
+        if ge.assignment_type in ('all', None):
+            has_access = True
+        elif ge.assignment_type == 'selected':
+            has_access = GroupExamMember.query.filter_by(
+                group_exam_id=ge.id, user_id=str(user_id)).first() is not None
+        else:
+            has_access = False
+        if not has_access:
+            continue
+        exam_ids.add(ge.exam_id)
+        exam_materials.setdefault(ge.exam_id, set())
+        grp = CandidateGroup.query.get(ge.group_id)
+        campus = Campus.query.get(grp.campus_id) if grp.campus_id else None
+        payments_on = grp.enable_online_payments_override if grp.enable_online_payments_override is not None \
+            else (campus.enable_online_payments if campus else False)
+        cert_cost = float(grp.certification_cost_override or (campus.certification_cost if campus else 0) or 0)
+        if payments_on and cert_cost > 0 and not Payment.query.filter_by(
+                user_id=str(user_id), group_exam_id=ge.id,
+                payment_type='certification', status='approved').first():
+            continue
+        for gem in GroupExamMaterial.query.filter_by(group_exam_id=ge.id, is_included=True).all():
+            material_ids.add(gem.study_material_id)
+            exam_materials[ge.exam_id].add(gem.study_material_id)
+    return exam_ids, material_ids, exam_materials
+
+
+@pytest.fixture(scope='module')
+def access_data(app_and_db):
+    """Candidato en 5 grupos con todas las combinaciones de acceso y pago."""
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models import Partner, Campus, CandidateGroup, GroupMember
+    from app.models.exam import Exam
+    from app.models.partner import GroupExam, GroupExamMember, GroupExamMaterial
+    from app.models.payment import Payment
+    from app.models.study_content import StudyMaterial
+    with app.app_context():
+        admin = _user(db, 'admin')
+        cand = _user(db, 'candidato')
+        other = _user(db, 'candidato')
+        db.session.flush()
+        partner = Partner(name='Partner Acceso')
+        db.session.add(partner)
+        db.session.flush()
+        paid_campus = Campus(partner_id=partner.id, name='Plantel con pago', code=f'ACC{uuid.uuid4().hex[:6]}',
+                             enable_online_payments=True, certification_cost=500, retake_cost=150)
+        free_campus = Campus(partner_id=partner.id, name='Plantel sin pago', code=f'ACC{uuid.uuid4().hex[:6]}',
+                             enable_online_payments=False, certification_cost=0)
+        db.session.add_all([paid_campus, free_campus])
+        db.session.flush()
+
+        groups = {
+            'paid': CandidateGroup(campus_id=paid_campus.id, name='Con pago'),
+            'free': CandidateGroup(campus_id=free_campus.id, name='Sin pago'),
+            'override': CandidateGroup(campus_id=paid_campus.id, name='Override',
+                                       enable_online_payments_override=False),
+            'inactive_group': CandidateGroup(campus_id=free_campus.id, name='Inactivo', is_active=False),
+            'inactive_member': CandidateGroup(campus_id=free_campus.id, name='Baja'),
+        }
+        db.session.add_all(groups.values())
+        db.session.flush()
+        for key, grp in groups.items():
+            db.session.add(GroupMember(group_id=grp.id, user_id=cand.id,
+                                       status='inactive' if key == 'inactive_member' else 'active'))
+
+        exams = [Exam(name=f'Examen {i}', version='1.0', stage_id=1, created_by=admin.id,
+                      is_published=True) for i in range(7)]
+        db.session.add_all(exams)
+        mats = [StudyMaterial(title=f'Material {i}', is_published=True, created_by=admin.id)
+                for i in range(7)]
+        db.session.add_all(mats)
+        db.session.flush()
+
+        base = datetime(2026, 1, 1)
+
+        def assign(group_key, exam, days=0, **kwargs):
+            ge = GroupExam(group_id=groups[group_key].id, exam_id=exam.id,
+                           assigned_at=base + timedelta(days=days), **kwargs)
+            db.session.add(ge)
+            db.session.flush()
+            return ge
+
+        ge = {
+            # Requiere pago, sin pago aprobado (solo pendiente) → materiales bloqueados
+            'unpaid': assign('paid', exams[0]),
+            # 'selected' con el candidato y pago aprobado → materiales liberados
+            'paid_selected': assign('paid', exams[1], assignment_type='selected'),
+            # Mismo examen 0 por otro grupo sin pago, asignado después
+            'dup_free': assign('free', exams[0], days=10),
+            # 'selected' sin el candidato → sin acceso
+            'not_selected': assign('free', exams[2], assignment_type='selected'),
+            # Asignación inactiva → sin acceso
+            'inactive_ge': assign('free', exams[3], is_active=False),
+            'inactive_group': assign('inactive_group', exams[4]),
+            'inactive_member': assign('inactive_member', exams[5]),
+            # Override del grupo desactiva pagos del plantel
+            'override': assign('override', exams[6]),
+        }
+        db.session.add(GroupExamMember(group_exam_id=ge['paid_selected'].id, user_id=cand.id))
+        db.session.add(GroupExamMember(group_exam_id=ge['not_selected'].id, user_id=other.id))
+
+        for key, mat, included in [
+            ('unpaid', mats[0], True), ('paid_selected', mats[1], True),
+            ('dup_free', mats[2], True), ('dup_free', mats[1], True),
+            ('not_selected', mats[3], True), ('inactive_ge', mats[4], True),
+            ('inactive_group', mats[5], True), ('override', mats[6], True),
+            ('override', mats[0], False),
+        ]:
+            db.session.add(GroupExamMaterial(group_exam_id=ge[key].id,
+                                             study_material_id=mat.id, is_included=included))
+
+        def pay(key, status):
+            db.session.add(Payment(user_id=cand.id, campus_id=paid_campus.id, group_exam_id=ge[key].id,
+                                   payment_type='certification', status=status,
+                                   units=1, unit_price=500, total_amount=500))
+        pay('paid_selected', 'approved')
+        pay('unpaid', 'rejected')
+        pay('unpaid', 'pending')
+        db.session.commit()
+        return {
+            'cand_id': cand.id,
+            'token': create_access_token(identity=cand.id),
+            'ge': {k: v.id for k, v in ge.items()},
+            'exams': [e.id for e in exams],
+            'mats': [m.id for m in mats],
+        }
+
+
+def test_matches_legacy_per_group_resolution(app_and_db, access_data):
+    app, _ = app_and_db
+    from app.services.candidate_access import resolve_candidate_access
+    with app.app_context():
+        access = resolve_candidate_access(access_data['cand_id'])
+        exam_ids, material_ids, exam_materials = _legacy_access(access_data['cand_id'])
+
+    exams, mats = access_data['exams'], access_data['mats']
+    assert set(access.exam_ids) == exam_ids == {exams[0], exams[1], exams[6]}
+    assert set(access.material_ids) == material_ids == {mats[1], mats[2], mats[6]}
+    assert {k: set(v) for k, v in access.exam_materials_map.items()} == exam_materials
+    assert len(access.exam_ids) == len(set(access.exam_ids))
+    assert len(access.material_ids) == len(set(access.material_ids))
+
+    by_ge = {a.group_exam_id: a for a in access.assignments}
+    ge = access_data['ge']
+    assert set(by_ge) == {ge['unpaid'], ge['paid_selected'], ge['dup_free'], ge['override']}
+    assert by_ge[ge['unpaid']].requires_payment and not by_ge[ge['unpaid']].is_paid
+    assert by_ge[ge['paid_selected']].is_paid and by_ge[ge['paid_selected']].certification_cost == 500.0
+    assert not by_ge[ge['override']].requires_payment and by_ge[ge['override']].is_paid
+    assert access.preferred_by_exam[exams[0]].group_exam_id == ge['dup_free']
+
+
+def test_query_count_is_fixed(app_and_db, access_data):
+    app, db = app_and_db
+    from sqlalchemy import event
+    from app.services.candidate_access import resolve_candidate_access
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        db.session.expire_all()
+        event.listen(db.engine, 'before_cursor_execute', _count)
+        try:
+            resolve_candidate_access(access_data['cand_id'])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _count)
+    assert len(statements) <= 3, statements
+
+
+def test_no_memberships_returns_empty(app_and_db, access_data):
+    app, _ = app_and_db
+    from app.services.candidate_access import resolve_candidate_access
+    with app.app_context():
+        access = resolve_candidate_access(str(uuid.uuid4()))
+    assert access.assignments == [] and access.exam_ids == [] and access.material_ids == []
+
+
+def test_mis_examenes_uses_preferred_assignment(app_and_db, access_data):
+    app, _ = app_and_db
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {access_data['token']}"}
+    resp = client.get('/api/partners/mis-examenes', headers=headers)
+    assert resp.status_code == 200, resp.get_json()
+    by_exam = {e['id']: e for e in resp.get_json()['exams']}
+    exams, ge = access_data['exams'], access_data['ge']
+
+    assert set(by_exam) == {exams[0], exams[1], exams[6]}
+    assert by_exam[exams[0]]['group_exam_id'] == ge['dup_free']
+    assert by_exam[exams[0]]['requires_payment'] is False
+    assert by_exam[exams[1]]['requires_payment'] is True
+    assert by_exam[exams[1]]['is_paid'] is True
+    assert by_exam[exams[1]]['certification_cost'] == 500.0
+
+
+def test_mis_materiales_skips_unpaid_exam_materials(app_and_db, access_data):
+    app, _ = app_and_db
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {access_data['token']}"}
+    resp = client.get('/api/partners/mis-materiales', headers=headers)
+    assert resp.status_code == 200, resp.get_json()
+    mats = access_data['mats']
+    assert {m['id'] for m in resp.get_json()['materials']} == {mats[1], mats[2], mats[6]}
+
+
+def test_check_access_reports_pending_payment(app_and_db, access_data):
+    app, _ = app_and_db
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {access_data['token']}"}
+    exams, ge = access_data['exams'], access_data['ge']
+
+    body = client.get(f"/api/exams/{exams[0]}/check-access?geid={ge['unpaid']}", headers=headers).get_json()
+    assert body['requires_payment'] is True
+    assert body['is_paid'] is False
+    assert body['payment_status'] == 'pending'
+    assert body['certification_cost'] == 500.0
+    assert body['retake_cost'] == 150.0
+    assert body['can_take'] is False
+
+    body = client.get(f"/api/exams/{exams[1]}/check-access?geid={ge['paid_selected']}", headers=headers).get_json()
+    assert body['is_paid'] is True and body['can_take'] is True
+
+    body = client.get(f"/api/exams/{exams[6]}/check-access?geid={ge['override']}", headers=headers).get_json()
+    assert body['requires_payment'] is False and body['certification_cost'] == 0.0
+
+
+def test_dashboard_lists_accessible_exams_and_materials(app_and_db, access_data):
+    app, _ = app_and_db
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {access_data['token']}"}
+    resp = client.get('/api/users/me/dashboard', headers=headers)
+    assert resp.status_code == 200, resp.get_json()
+    data = resp.get_json()
+    exams, mats = access_data['exams'], access_data['mats']
+    assert {e['id'] for e in data['exams']} == {exams[0], exams[1], exams[6]}
+    assert {m['id'] for m in data['materials']} == {mats[1], mats[2], mats[6]}
+    assert set(data['exam_materials_map'][str(exams[0])]) == {mats[1], mats[2]}
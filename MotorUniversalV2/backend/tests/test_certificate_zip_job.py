@@ -0,0 +1,318 @@
+"""
+Tests de la generación de ZIPs de certificados por grupo
+(app/services/certificate_zip_service.py):
+  - El job genera en paralelo los PDFs faltantes, reutiliza los existentes,
+    persiste report_url / certificate_url / eduit_certificate_code y deja el
+    ZIP en blob storage.
+  - POST /groups/<id>/certificates/zip-jobs es idempotente: mismo grupo y
+    filtro reutilizan el job en curso o el ZIP terminado; `force` regenera.
+  - GET /groups/<id>/certificates/zip-jobs/<job_id> reporta progreso y la
+    URL SAS de descarga.
+  - Errores de render se reportan sin detener el job; la descarga síncrona
+    (/certificates/download) usa el mismo pipeline.
+  - El nombre de descarga es seguro para Content-Disposition (comillas,
+    diagonales y no-latin-1).
+
+Los renderers, la subida a blob y la SAS se sustituyen por stand-ins; el job
+se procesa en el thread del test (sqlite en memoria no se comparte entre
+threads).
+
+USO:
+  cd backend && python -m pytest tests/test_certificate_zip_job.py -v
+"""
+import io
+import os
+import shutil
+import sys
+import threading
+import uuid
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-certificate-zip'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _user(db, role):
+    from app.models.user import User
+    suffix = uuid.uuid4().hex[:8]
+    user = User(id=str(uuid.uuid4()), email=f'{role}_{suffix}@evaluaasi.com',
+                username=f'{role}_{suffix}', name='Usuario', first_surname=suffix, role=role)
+    user.set_password('test1234')
+    db.session.add(user)
+    return user
+
+
+@pytest.fixture(scope='module')
+def setup(app_and_db):
+    """Coordinador, plantel y examen publicado."""
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models import Partner, Campus
+    from app.models.exam import Exam
+    with app.app_context():
+        admin = _user(db, 'admin')
+        coord = _user(db, 'coordinator')
+        db.session.flush()
+        partner = Partner(name='Partner ZIP', coordinator_id=coord.id)
+        db.session.add(partner)
+        db.session.flush()
+        campus = Campus(partner_id=partner.id, name='Plantel ZIP', code=f'ZIP{uuid.uuid4().hex[:6]}',
+                        coordinator_id=coord.id)
+        db.session.add(campus)
+        db.session.flush()
+        exam = Exam(name='Examen ZIP', version='EC0001', stage_id=1, created_by=admin.id, is_published=True)
+        db.session.add(exam)
+        db.session.commit()
+        return {
+            'coord_id': coord.id,
+            'campus_id': campus.id,
+            'exam_id': exam.id,
+            'headers': {'Authorization': f'Bearer {create_access_token(identity=coord.id)}'},
+        }
+
+
+def _group(app, db, setup, size, with_report_url=0, failed=0):
+    """Grupo con `size` candidatos aprobados (+ `failed` reprobados)."""
+    from app.models import CandidateGroup, GroupMember
+    from app.models.result import Result
+    with app.app_context():
+        group = CandidateGroup(campus_id=setup['campus_id'], coordinator_id=setup['coord_id'],
+                               name=f'Grupo ZIP {uuid.uuid4().hex[:4]}')
+        db.session.add(group)
+        db.session.flush()
+        result_ids = []
+        for i in range(size + failed):
+            user = _user(db, 'candidato')
+            db.session.flush()
+            db.session.add(GroupMember(group_id=group.id, user_id=user.id))
+            result = Result(id=str(uuid.uuid4()), user_id=user.id, exam_id=setup['exam_id'],
+                            group_id=group.id, score=90 if i < size else 40, status=1,
+                            result=1 if i < size else 0,
+                            certificate_code=f'ZC{uuid.uuid4().hex[:10].upper()}')
+            if i < with_report_url:
+                result.report_url = f'https://blob.example/pdfs/report_{result.id}.pdf'
+            db.session.add(result)
+            result_ids.append(result.id)
+        db.session.commit()
+        return group.id, result_ids
+
+
+@pytest.fixture()
+def stubs(monkeypatch, tmp_path):
+    """Renderers, subida de PDFs, subida del ZIP y SAS en memoria."""
+    from app.services import certificate_zip_service as svc
+    from app.utils import pdf_generator
+    from app.utils.azure_storage import azure_storage
+
+    state = {'threads': set(), 'uploaded_pdfs': [], 'archives': {}, 'fail_users': set()}
+    lock = threading.Lock()
+
+    def fake_render(kind):
+        def render(result, exam, user):
+            with lock:
+                state['threads'].add(threading.current_thread().name)
+            if user.email in state['fail_users']:
+                raise RuntimeError('plantilla corrupta')
+            return io.BytesIO(f'%PDF {kind} {result.id} {result.eduit_certificate_code}'.encode())
+        return render
+
+    def fake_upload_pdf(data, filename):
+        with lock:
+            state['uploaded_pdfs'].append(filename)
+        return f'https://blob.example/pdfs/{filename}'
+
+    def fake_upload_zip(path, blob_name, download_name):
+        target = tmp_path / blob_name.replace('/', '_')
+        shutil.copy(path, target)
+        state['archives'][blob_name] = str(target)
+        return blob_name
+
+    monkeypatch.setattr(pdf_generator, 'generate_evaluation_report_pdf', fake_render('report'))
+    monkeypatch.setattr(pdf_generator, 'generate_certificate_pdf', fake_render('certificate'))
+    monkeypatch.setattr(svc, '_upload_pdf', fake_upload_pdf)
+    monkeypatch.setattr(svc, '_download_existing', lambda url: b'%PDF existing ' + url.encode())
+    monkeypatch.setattr(azure_storage, 'upload_certificate_zip', fake_upload_zip)
+    monkeypatch.setattr(azure_storage, 'generate_certificate_zip_sas_url',
+                        lambda blob_name, ttl_minutes=60, download_name=None:
+                        f'https://blob.example/certificate-zips/{blob_name}?sig=test')
+    return state
+
+
+def test_job_generates_missing_pdfs_and_uploads_zip(app_and_db, setup, stubs):
+    app, db = app_and_db
+    from app.services import certificate_zip_service as svc
+    from app.models.result import Result
+    group_id, result_ids = _group(app, db, setup, size=6, with_report_url=2, failed=1)
+
+    with app.app_context():
+        job, created = svc.enqueue_certificate_zip_job(
+            group_id, ['tier_standard', 'tier_basic'], requested_by=setup['coord_id'])
+        assert created and job.status == 'queued'
+        svc.process_certificate_zip_job(app, job.id)
+
+        db.session.refresh(job)
+        assert job.status == 'completed', job.error_message
+        assert job.total_files == 12
+        assert job.processed_files == 12
+        assert job.files_added == 12
+        # 4 reportes + 6 certificados generados; 2 reportes ya existían
+        assert job.generated_files == 10
+        assert job.error_count == 0
+        assert job.progress_percentage == 100.0
+
+        results = {r.id: r for r in Result.query.filter(Result.id.in_(result_ids)).all()}
+        approved = result_ids[:6]
+        for rid in approved:
+            assert results[rid].report_url and results[rid].certificate_url
+            assert results[rid].eduit_certificate_code.startswith('EC')
+        assert results[result_ids[0]].report_url.endswith(f'report_{result_ids[0]}.pdf')
+        assert results[result_ids[6]].certificate_url is None  # reprobado
+
+        with zipfile.ZipFile(stubs['archives'][job.blob_name]) as zf:
+            names = zf.namelist()
+            assert len(names) == 12
+            assert sum(n.startswith('Constancias/') for n in names) == 6
+            assert sum(n.startswith('Certificados_Eduit/') for n in names) == 6
+            existing = [n for n in names if f'{results[result_ids[0]].certificate_code}' in n]
+            assert zf.read(existing[0]).startswith(b'%PDF existing')
+            # El código EC asignado por el worker va dentro del certificado
+            cert = next(n for n in names if n.startswith('Certificados_Eduit/')
+                        and results[result_ids[1]].user.first_surname in n)
+            assert results[result_ids[1]].eduit_certificate_code.encode() in zf.read(cert)
+
+    assert len(stubs['uploaded_pdfs']) == 10
+    assert all(name.startswith('cert-zip') for name in stubs['threads'])
+
+
+def test_zip_job_endpoints_are_idempotent(app_and_db, setup, stubs, monkeypatch):
+    app, db = app_and_db
+    from app.services import certificate_zip_service as svc
+    group_id, _ = _group(app, db, setup, size=3)
+    started = []
+    monkeypatch.setattr(svc, 'process_certificate_zip_job_background',
+                        lambda app_obj, job_id: started.append(job_id))
+    client = app.test_client()
+    url = f'/api/partners/groups/{group_id}/certificates/zip-jobs'
+    body = {'certificate_types': ['tier_basic'], 'user_ids': None}
+
+    first = client.post(url, json=body, headers=setup['headers'])
+    assert first.status_code == 202, first.get_json()
+    job_id = first.get_json()['job']['id']
+    assert first.get_json()['reused'] is False
+    assert started == [job_id]
+
+    again = client.post(url, json=body, headers=setup['headers'])
+    assert again.status_code == 202
+    assert again.get_json()['job']['id'] == job_id
+    assert again.get_json()['reused'] is True
+    assert started == [job_id]
+
+    status = client.get(f'{url}/{job_id}', headers=setup['headers'])
+    assert status.status_code == 200
+    assert status.get_json()['job']['status'] == 'queued'
+    assert status.get_json()['job']['download_url'] is None
+
+    with app.app_context():
+        svc.process_certificate_zip_job(app, job_id)
+
+    status = client.get(f'{url}/{job_id}', headers=setup['headers']).get_json()['job']
+    assert status['status'] == 'completed'
+    assert status['files_added'] == 3
+    assert status['download_url'].startswith('https://blob.example/certificate-zips/group_')
+
+    # Mismo filtro: se reutiliza el ZIP terminado
+    reused = client.post(url, json=body, headers=setup['headers'])
+    assert reused.status_code == 200
+    assert reused.get_json()['reused'] is True
+    assert reused.get_json()['job']['download_url'] == status['download_url']
+    assert started == [job_id]
+
+    # Otro filtro o force=True crean un job nuevo
+    other = client.post(url, json={'certificate_types': ['tier_basic', 'tier_standard']},
+                        headers=setup['headers'])
+    forced = client.post(url, json={**body, 'force': True}, headers=setup['headers'])
+    assert other.get_json()['job']['id'] != job_id
+    assert forced.get_json()['job']['id'] not in (job_id, other.get_json()['job']['id'])
+    assert len(started) == 3
+
+    invalid = client.post(url, json={'certificate_types': ['tier_x']}, headers=setup['headers'])
+    assert invalid.status_code == 400
+    missing = client.get(f'{url}/999999', headers=setup['headers'])
+    assert missing.status_code == 404
+
+
+def test_filter_key_ignores_order(app_and_db):
+    from app.services.certificate_zip_service import certificate_filter_key
+    assert certificate_filter_key(['tier_standard', 'tier_basic'], ['b', 'a']) == \
+        certificate_filter_key(['tier_basic', 'tier_standard', 'tier_basic'], ['a', 'b'])
+    assert certificate_filter_key(['tier_basic']) != certificate_filter_key(['tier_basic'], ['a'])
+
+
+def test_download_name_is_header_safe():
+    from types import SimpleNamespace
+    from app.services.certificate_zip_service import certificate_zip_filename
+    from app.utils.azure_storage import attachment_disposition
+    name = certificate_zip_filename(SimpleNamespace(name='Grupo "Añil" 3/B'))
+    assert name.startswith('Certificados_Grupo _Añil_ 3_B_') and name.endswith('.zip')
+    header = attachment_disposition(name)
+    header.encode('latin-1')  # no lanza: el header es ASCII
+    assert header.startswith('attachment; filename="Certificados_Grupo _Anil_ 3_B_')
+    assert "filename*=UTF-8''Certificados_Grupo%20_A%C3%B1il_%203_B_" in header
+
+
+def test_render_errors_are_reported_and_empty_zip_fails(app_and_db, setup, stubs):
+    app, db = app_and_db
+    from app.services import certificate_zip_service as svc
+    from app.models import GroupMember
+    group_id, _ = _group(app, db, setup, size=3)
+
+    with app.app_context():
+        emails = [m.user.email for m in GroupMember.query.filter_by(group_id=group_id).all()]
+        stubs['fail_users'].add(emails[0])
+        job, _ = svc.enqueue_certificate_zip_job(group_id, ['tier_basic'])
+        svc.process_certificate_zip_job(app, job.id)
+        db.session.refresh(job)
+        assert job.status == 'completed'
+        assert job.files_added == 2
+        assert job.error_count == 1
+        assert job.to_dict()['errors'][0]['type'] == 'tier_basic'
+        assert 'plantilla corrupta' in job.to_dict()['errors'][0]['error']
+
+        # Ningún certificado se puede generar: el job falla sin subir nada
+        stubs['fail_users'].update(emails)
+        job, _ = svc.enqueue_certificate_zip_job(group_id, ['tier_standard'])
+        svc.process_certificate_zip_job(app, job.id)
+        db.session.refresh(job)
+        assert job.status == 'failed'
+        assert job.error_message == 'No hay certificados disponibles para descargar'
+        assert job.blob_name is None
+
+
+def test_sync_download_uses_shared_pipeline(app_and_db, setup, stubs):
+    app, db = app_and_db
+    group_id, _ = _group(app, db, setup, size=2)
+    client = app.test_client()
+    resp = client.post(f'/api/partners/groups/{group_id}/certificates/download',
+                       json={'certificate_types': ['tier_basic', 'tier_standard']},
+                       headers=setup['headers'])
+    assert resp.status_code == 200, resp.get_data(as_text=True)[:300]
+    assert resp.mimetype == 'application/zip'
+    assert 'Certificados_' in resp.headers['Content-Disposition']
+    with zipfile.ZipFile(io.BytesIO(resp.get_data())) as zf:
+        assert len(zf.namelist()) == 4
+    resp.close()
@@ -0,0 +1,129 @@
+"""
+Tests del pool de parseo de la pasada 1 CONOCER (app/services/conocer_parse_pool.py).
+
+Cubre:
+  1. El pool produce exactamente lo mismo que parse_conocer_pdf, en el
+     orden de entrada (la deduplicación "queda el último" depende de él).
+  2. PDFs corruptos / sin texto se reportan como parse_error sin tumbar el pool.
+  3. Un PDF que cuelga vence por timeout y las demás entradas se procesan.
+  4. Modo en proceso (1 worker) equivalente al pool.
+
+USO:
+  cd backend && python -m pytest tests/test_conocer_parse_pool.py -v
+"""
+import os
+import sys
+import time
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fitz = pytest.importorskip('fitz')
+
+from app.services.conocer_pdf_parser import parse_conocer_pdf  # noqa: E402
+from app.services.conocer_parse_pool import (  # noqa: E402
+    iter_parsed_entries, parse_zip_entry,
+)
+
+
+def _certificate_pdf(curp, ecm, name):
+    doc = fitz.open()
+    page = doc.new_page()
+    lines = [
+        'El Consejo Nacional de Normalizacion y Certificacion',
+        'Hace constar que',
+        name,
+        'es competente en',
+        'Impartición de cursos de formación del capital humano',
+        f'con clave: {ecm}',
+        f'Clave Unica de Registro de Poblacion: {curp}',
+        'Folio D-0000012345',
+        'evaluado por Entidad Certificadora de Prueba',
+        'Ciudad de México, a 2 de enero de 2026',
+    ]
+    y = 72
+    for line in lines:
+        page.insert_text((72, y), line, fontsize=10)
+        y += 18
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture(scope='module')
+def sample_zip(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('conocer') / 'batch.zip')
+    entries = {}
+    for i in range(12):
+        curp = f'GOPJ9001{i:02d}HDFRRN0{i % 10}'
+        entries[f'certs/{i:03d}.pdf'] = _certificate_pdf(curp, f'EC0{217 + i % 3}', f'JUAN PEREZ {i}')
+    entries['certs/corrupto.pdf'] = b'%PDF-1.4 esto no es un pdf'
+    empty = fitz.open()
+    empty.new_page()
+    entries['certs/vacio.pdf'] = empty.tobytes()
+    empty.close()
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, data in entries.items():
+            zf.writestr(name, data)
+    return path, entries
+
+
+def _slow_task(zip_path, entry_name):
+    """Tarea de prueba: 'cuelga' en la entrada marcada."""
+    if 'colgado' in entry_name:
+        time.sleep(30)
+    return parse_zip_entry(zip_path, entry_name)
+
+
+def test_pool_matches_serial_parser_in_order(sample_zip):
+    path, entries = sample_zip
+    names = sorted(entries)
+    results = list(iter_parsed_entries(path, names, workers=2))
+
+    assert [name for name, _ in results] == names
+    for name, parsed in results:
+        assert parsed == parse_conocer_pdf(entries[name]), name
+
+    by_name = dict(results)
+    assert by_name['certs/000.pdf']['curp'] == 'GOPJ900100HDFRRN00'
+    assert by_name['certs/000.pdf']['ecm_code'] == 'ECM0217'
+    assert by_name['certs/corrupto.pdf']['parse_error']
+    assert by_name['certs/vacio.pdf']['parse_error'] == 'El PDF no contiene texto extraíble'
+
+
+def test_inline_mode_matches_pool(sample_zip):
+    path, entries = sample_zip
+    names = sorted(entries)
+    assert list(iter_parsed_entries(path, names, workers=1)) == \
+        list(iter_parsed_entries(path, names, workers=2))
+
+
+def test_missing_entry_reports_read_error(sample_zip):
+    path, _ = sample_zip
+    [(name, parsed)] = list(iter_parsed_entries(path, ['no/existe.pdf'], workers=2))
+    assert name == 'no/existe.pdf'
+    assert parsed['read_error']
+
+
+def test_hung_pdf_times_out_and_rest_continue(sample_zip, tmp_path):
+    path, entries = sample_zip
+    hung_zip = str(tmp_path / 'hung.zip')
+    with zipfile.ZipFile(hung_zip, 'w') as zf:
+        zf.writestr('a.pdf', entries['certs/000.pdf'])
+        zf.writestr('colgado.pdf', entries['certs/001.pdf'])
+        zf.writestr('b.pdf', entries['certs/002.pdf'])
+        zf.writestr('c.pdf', entries['certs/003.pdf'])
+
+    start = time.monotonic()
+    results = dict(iter_parsed_entries(
+        hung_zip, ['a.pdf', 'colgado.pdf', 'b.pdf', 'c.pdf'],
+        workers=2, timeout=5, task=_slow_task,
+    ))
+    assert time.monotonic() - start < 25
+
+    assert results['colgado.pdf']['parse_error'].startswith('Timeout')
+    for name in ('a.pdf', 'b.pdf', 'c.pdf'):
+        assert results[name]['parse_error'] is None
+        assert results[name]['curp']
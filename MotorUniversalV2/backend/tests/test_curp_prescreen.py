@@ -0,0 +1,305 @@
+"""
+Tests del pre-screen de CURPs (app/services/curp_prescreen.py):
+  - Formato y dígito verificador se deciden localmente; las CURPs con
+    entrada fresca en curp_renapo_cache (positiva o negativa) se resuelven
+    en una sola query y solo las desconocidas quedan para RENAPO.
+  - El cache negativo guarda solo respuestas definitivas de RENAPO
+    ("no encontrada"), no timeouts, errores de conexión ni códigos de error
+    del servicio.
+  - El worker de la cola no gasta presupuesto en CURPs cacheadas (aunque el
+    circuito esté abierto) y consulta una sola vez una CURP repetida; los
+    reintentos de un negativo sí van a RENAPO.
+  - La carga masiva con RENAPO activo marca las CURPs con dígito
+    verificador incorrecto en vez de encolarlas.
+
+USO:
+  cd backend && python -m pytest tests/test_curp_prescreen.py -v
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-curp-prescreen'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _curp(seq: int) -> str:
+    """CURP con formato y dígito verificador válidos."""
+    from app.services.renapo_service import _calcular_digito_verificador
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    base = f"RU{letters[seq // 26 % 26]}{letters[seq % 26]}8{seq % 10}0303HJCRRN0"
+    return base + str(_calcular_digito_verificador(base))
+
+
+def _bad_checksum(curp: str) -> str:
+    return curp[:17] + str((int(curp[17]) + 1) % 10)
+
+
+def _cache(db, curp, valid, error=None, expires_at=None):
+    from app.models.curp_verification import CurpRenapoCache
+    db.session.add(CurpRenapoCache(
+        curp=curp, valid=valid, error_message=error,
+        payload_json='{"name": "LUIS", "first_surname": "RUIZ"}' if valid else None,
+        expires_at=expires_at or CurpRenapoCache.calc_expiry(valid),
+    ))
+    db.session.commit()
+
+
+@pytest.fixture()
+def renapo(monkeypatch):
+    """Stand-in de la consulta Playwright: registra las CURPs consultadas."""
+    from app.services import renapo_rate_budget
+    from app.services import renapo_service as rs
+    state = {'calls': [], 'registry': {}}
+
+    async def consultar(curp):
+        state['calls'].append(curp)
+        await asyncio.sleep(0)
+        rs._record_renapo_success()
+        if curp in state['registry']:
+            return rs.RenapoValidationResult(curp=curp, valid=True, name=state['registry'][curp],
+                                             first_surname='RUIZ')
+        return rs.RenapoValidationResult(curp=curp, valid=False, error='CURP no encontrada en RENAPO: sin datos')
+
+    class UnlimitedBucket:
+        def acquire(self, max_wait=None, requested=1):
+            return True
+
+    monkeypatch.setattr(rs, '_consultar_renapo_async', consultar)
+    monkeypatch.setattr(renapo_rate_budget, '_bucket', UnlimitedBucket())
+    monkeypatch.setattr(rs, '_consecutive_failures', 0)
+    monkeypatch.setattr(rs, '_circuit_opened_at', 0.0)
+    return state
+
+
+def test_prescreen_resolves_locally_and_in_one_query(app_and_db):
+    app, db = app_and_db
+    from app.services.curp_prescreen import prescreen_curps, SOURCE_CACHE, SOURCE_LOCAL
+    positive, negative, expired, unknown = _curp(1), _curp(2), _curp(3), _curp(4)
+    with app.app_context():
+        _cache(db, positive, True)
+        _cache(db, negative, False, error='CURP no encontrada en RENAPO')
+        _cache(db, expired, True, expires_at=datetime.utcnow() - timedelta(minutes=1))
+
+        curps = [positive, negative, expired, unknown, unknown.lower(), _bad_checksum(unknown),
+                 'XEXX010101HNEXXXA4', '', 'NO-ES-CURP', positive]
+        with QueryCounter(db.engine) as counter:
+            screen = prescreen_curps(curps)
+        cache_selects = [s for s in counter.statements
+                         if s.lstrip().upper().startswith('SELECT') and 'curp_renapo_cache' in s]
+        assert len(cache_selects) == 1
+
+        assert screen.unknown == [expired, unknown]
+        assert screen.get(positive).valid and screen.get(positive).name == 'LUIS'
+        assert not screen.get(negative).valid
+        assert screen.sources[positive] == screen.sources[negative] == SOURCE_CACHE
+        bad = screen.get(_bad_checksum(unknown))
+        assert not bad.valid and 'Dígito verificador' in bad.error
+        assert screen.sources[_bad_checksum(unknown)] == SOURCE_LOCAL
+        assert screen.get('xexx010101hnexxxa4').valid
+        assert screen.get('').error == 'CURP vacía'
+        assert screen.stats() == {'local': 4, 'cache': 2, 'unknown': 2}
+        assert screen.needs_renapo(unknown) and not screen.needs_renapo(positive)
+
+        local_only = prescreen_curps([positive, unknown], use_cache=False)
+        assert local_only.unknown == [positive, unknown]
+
+
+def test_negative_cache_keeps_only_definitive_answers(app_and_db):
+    app, db = app_and_db
+    from app.models.curp_verification import CurpRenapoCache
+    from app.services.renapo_service import RenapoValidationResult, _write_curp_cache
+    not_found, timeout, down = _curp(10), _curp(11), _curp(12)
+    with app.app_context():
+        _write_curp_cache(RenapoValidationResult(curp=not_found, valid=False,
+                                                 error='CURP no encontrada en RENAPO: no existe'))
+        _write_curp_cache(RenapoValidationResult(
+            curp=timeout, valid=False, error='No se recibió respuesta del API de RENAPO tras 2 intentos'))
+        _write_curp_cache(RenapoValidationResult(
+            curp=down, valid=False, error='Servicio RENAPO temporalmente no disponible (circuit breaker)'))
+        entries = {e.curp: e for e in CurpRenapoCache.query.filter(
+            CurpRenapoCache.curp.in_([not_found, timeout, down]))}
+        assert list(entries) == [not_found]
+        ttl = entries[not_found].expires_at - entries[not_found].cached_at
+        assert abs(ttl - timedelta(hours=CurpRenapoCache.NEGATIVE_TTL_HOURS)) < timedelta(minutes=1)
+
+
+def test_only_not_found_codes_are_definitive(app_and_db):
+    app, _ = app_and_db
+    from app.models.curp_verification import CurpRenapoCache
+    from app.services.renapo_service import _parse_renapo_response, _write_curp_cache
+    missing, failing = _curp(13), _curp(14)
+    not_found = _parse_renapo_response(missing, {'codigo': '02', 'mensaje': 'La CURP no se encuentra'})
+    upstream = _parse_renapo_response(failing, {'codigo': '05', 'mensaje': 'Servicio en mantenimiento'})
+    assert not_found.error.startswith('CURP no encontrada en RENAPO')
+    assert not upstream.valid and upstream.error.startswith('RENAPO respondió con error (codigo=05)')
+    with app.app_context():
+        _write_curp_cache(not_found)
+        _write_curp_cache(upstream)
+        cached = [e.curp for e in CurpRenapoCache.query.filter(CurpRenapoCache.curp.in_([missing, failing]))]
+    assert cached == [missing]
+
+
+def test_checksum_failures_never_reach_renapo(app_and_db, renapo):
+    app, _ = app_and_db
+    from app.services.renapo_service import validate_curp_renapo, validate_curps_batch
+    bad = _bad_checksum(_curp(20))
+    with app.app_context():
+        single = validate_curp_renapo(bad)
+        batch = validate_curps_batch([bad, bad, _curp(21)])
+    assert not single.valid and 'Dígito verificador' in single.error
+    assert not batch[0].valid and not batch[1].valid
+    assert renapo['calls'] == [_curp(21)]
+
+
+def test_worker_skips_budget_for_known_curps(app_and_db, renapo, monkeypatch):
+    app, db = app_and_db
+    from app.models.user import User
+    from app.models.curp_verification import CurpVerificationQueue
+    from app.services import renapo_rate_budget
+    from app.services import renapo_service as rs
+    from app.services.curp_queue_worker import (
+        _claim_pending_rows, _prescreen_claimed, process_claimed_rows,
+    )
+
+    granted = []
+
+    class CountingBucket:
+        def acquire(self, max_wait=None, requested=1):
+            granted.append(1)
+            return True
+
+    monkeypatch.setattr(renapo_rate_budget, '_bucket', CountingBucket())
+    cached_ok, cached_no, repeated = _curp(30), _curp(31), _curp(32)
+    renapo['registry'][repeated] = 'ANA'
+    with app.app_context():
+        CurpVerificationQueue.query.delete()
+        db.session.commit()
+        _cache(db, cached_ok, True)
+        _cache(db, cached_no, False, error='CURP no encontrada en RENAPO')
+        ids = {}
+        for curp in (cached_ok, cached_no, repeated, repeated, repeated):
+            suffix = uuid.uuid4().hex[:8]
+            user = User(id=str(uuid.uuid4()), email=f'ps_{suffix}@evaluaasi.com', username=f'ps_{suffix}',
+                        name='Candidato', first_surname='Prescreen', role='candidato', curp=curp)
+            user.set_password('test1234')
+            db.session.add(user)
+            db.session.flush()
+            row = CurpVerificationQueue(user_id=user.id, curp=curp, source='bulk',
+                                        next_retry_at=datetime.utcnow() - timedelta(seconds=1))
+            db.session.add(row)
+            db.session.flush()
+            ids.setdefault(curp, []).append(row.id)
+        db.session.commit()
+        claimed = _claim_pending_rows('replica-p', 10)
+    assert len(claimed) == 5
+    screen, first, repeated_rows = _prescreen_claimed(app, claimed)
+    assert screen.unknown == [repeated]
+    assert sorted(repeated_rows) == sorted(ids[repeated][1:])
+    assert len(first) == 3
+
+    # Con el circuito abierto, las cacheadas se resuelven igual
+    monkeypatch.setattr(rs, '_consecutive_failures', rs._CIRCUIT_THRESHOLD)
+    monkeypatch.setattr(rs, '_circuit_opened_at', time.time())
+    known = ids[cached_ok] + ids[cached_no]
+    process_claimed_rows(app, [q for q in claimed if q in known], 'replica-p')
+    assert renapo['calls'] == [] and granted == []
+
+    monkeypatch.setattr(rs, '_consecutive_failures', 0)
+    monkeypatch.setattr(rs, '_circuit_opened_at', 0.0)
+    process_claimed_rows(app, [q for q in claimed if q not in known], 'replica-p')
+    assert renapo['calls'] == [repeated]
+    assert len(granted) == 1
+
+    with app.app_context():
+        rows = {r.id: r for r in CurpVerificationQueue.query.filter(CurpVerificationQueue.id.in_(claimed))}
+        assert rows[ids[cached_ok][0]].status == 'done'
+        assert rows[ids[cached_no][0]].status == 'pending' and rows[ids[cached_no][0]].attempts == 1
+        assert {rows[q].status for q in ids[repeated]} == {'done'}
+        assert User.query.get(rows[ids[repeated][2]].user_id).name == 'ANA'
+
+
+def test_worker_retries_bypass_negative_cache(app_and_db, renapo, monkeypatch):
+    app, db = app_and_db
+    from app.models.user import User
+    from app.models.curp_verification import CurpVerificationQueue
+    from app.services import renapo_rate_budget
+    from app.services.curp_queue_worker import _claim_pending_rows, process_claimed_rows
+
+    granted = []
+
+    class CountingBucket:
+        def acquire(self, max_wait=None, requested=1):
+            granted.append(1)
+            return True
+
+    monkeypatch.setattr(renapo_rate_budget, '_bucket', CountingBucket())
+    first_round, retry = _curp(33), _curp(34)
+    with app.app_context():
+        CurpVerificationQueue.query.delete()
+        db.session.commit()
+        ids = {}
+        for curp, attempts in ((first_round, 0), (retry, 1)):
+            _cache(db, curp, False, error='CURP no encontrada en RENAPO')
+            suffix = uuid.uuid4().hex[:8]
+            user = User(id=str(uuid.uuid4()), email=f'rt_{suffix}@evaluaasi.com', username=f'rt_{suffix}',
+                        name='Candidato', first_surname='Reintento', role='candidato', curp=curp)
+            user.set_password('test1234')
+            db.session.add(user)
+            db.session.flush()
+            row = CurpVerificationQueue(user_id=user.id, curp=curp, source='bulk', attempts=attempts,
+                                        next_retry_at=datetime.utcnow() - timedelta(seconds=1))
+            db.session.add(row)
+            db.session.flush()
+            ids[curp] = row.id
+        db.session.commit()
+        claimed = _claim_pending_rows('replica-r', 10)
+    assert sorted(claimed) == sorted(ids.values())
+
+    # La primera ronda se resuelve del cache; el reintento va a RENAPO
+    process_claimed_rows(app, claimed, 'replica-r')
+    assert renapo['calls'] == [retry] and len(granted) == 1
+
+    with app.app_context():
+        rows = {r.curp: r for r in CurpVerificationQueue.query.filter(CurpVerificationQueue.id.in_(claimed))}
+        assert rows[first_round].status == 'pending' and rows[first_round].attempts == 1
+        assert rows[retry].status == 'pending' and rows[retry].attempts == 2
+
+
+def test_bulk_rows_with_bad_checksum_are_flagged_in_renapo_mode(app_and_db, monkeypatch):
+    app, _ = app_and_db
+    from app.routes.user_management import _validate_rows
+    monkeypatch.setenv('CURP_RENAPO_ENABLED', 'true')
+
+    def row(n, curp):
+        return {'row': n, 'nombre': 'Ana', 'primer_apellido': 'Ruiz', 'segundo_apellido': 'Paz',
+                'genero_raw': 'F', 'email': '', 'curp': curp}
+
+    with app.app_context():
+        valid, errors = _validate_rows([
+            row(1, _curp(40)), row(2, _bad_checksum(_curp(41))),
+            row(3, 'XEXX010101MNEXXXA8'), row(4, 'CORTA'),
+        ])
+    assert [e['row'] for e in errors] == [4]
+    flags = {r['row']: r['_curp_invalid'] for r in valid}
+    assert flags == {1: False, 2: True, 3: False}
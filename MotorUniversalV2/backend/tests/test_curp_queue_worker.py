@@ -0,0 +1,273 @@
+"""
+Tests del worker de la cola CURP (app/services/curp_queue_worker.py) y del
+presupuesto global de RENAPO (app/services/renapo_rate_budget.py):
+  - El token bucket pacea a todos los threads con la misma tasa y cae a un
+    bucket local cuando Redis no responde.
+  - Dos workers que reclaman al mismo tiempo obtienen leases disjuntos.
+  - Solo las CURPs que no están en cache consumen token y van a la red;
+    la respuesta se aplica igual que antes (done / reintento).
+  - La concurrencia sube con RENAPO rápido y baja a la mitad si se pone lento.
+  - GET /api/user-management/curp-queue/metrics reporta profundidad,
+    throughput y ETA.
+
+RENAPO se sustituye por un stand-in local (LocalRenapo) que reemplaza la
+consulta con Playwright y registra latencias como la real.
+
+USO:
+  cd backend && python -m pytest tests/test_curp_queue_worker.py -v
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import NoRedis  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-curp-queue-worker'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _curp(seq: int) -> str:
+    """CURP con formato y dígito verificador válidos."""
+    from app.services.renapo_service import _calcular_digito_verificador
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    base = f"PE{letters[seq // 26 % 26]}{letters[seq % 26]}9{seq % 10}0101HDFRRN0"
+    return base + str(_calcular_digito_verificador(base))
+
+
+class LocalRenapo:
+    """Stand-in de gob.mx/curp: responde desde un registro en memoria."""
+
+    def __init__(self, latency: float = 0.0):
+        self.registry = {}
+        self.latency = latency
+        self.calls = []
+
+    async def consultar(self, curp):
+        from app.services import renapo_service as rs
+        start = time.time()
+        self.calls.append(curp)
+        await asyncio.sleep(self.latency)
+        rs._record_renapo_success()
+        rs._record_renapo_latency(time.time() - start)
+        person = self.registry.get(curp)
+        if person:
+            return rs.RenapoValidationResult(curp=curp, valid=True, name=person[0],
+                                             first_surname=person[1], gender='H')
+        return rs.RenapoValidationResult(curp=curp, valid=False, error='CURP no encontrada en RENAPO')
+
+
+@pytest.fixture()
+def renapo(monkeypatch):
+    from app.services import renapo_service as rs
+    standin = LocalRenapo()
+    monkeypatch.setattr(rs, '_consultar_renapo_async', standin.consultar)
+    monkeypatch.setattr(rs, '_recent_latencies', [])
+    monkeypatch.setattr(rs, '_consecutive_failures', 0)
+    monkeypatch.setattr(rs, '_circuit_opened_at', 0.0)
+    return standin
+
+
+@pytest.fixture()
+def bucket(monkeypatch):
+    """Bucket generoso sin Redis que cuenta los tokens concedidos."""
+    from app.services import renapo_rate_budget
+    from app.services.renapo_rate_budget import TokenBucket
+    granted = []
+
+    class CountingBucket(TokenBucket):
+        def acquire(self, max_wait=None, requested=1):
+            ok = super().acquire(max_wait=max_wait, requested=requested)
+            if ok:
+                granted.append(1)
+            return ok
+
+    instance = CountingBucket(key='test:bucket', rate_per_minute=6000, burst=100, redis_client=NoRedis())
+    instance.granted = granted
+    monkeypatch.setattr(renapo_rate_budget, '_bucket', instance)
+    return instance
+
+
+def _enqueue(app, db, curps, batch_tag=None):
+    from app.models.user import User
+    from app.models.curp_verification import CurpVerificationQueue
+    with app.app_context():
+        ids = []
+        for curp in curps:
+            suffix = uuid.uuid4().hex[:8]
+            user = User(id=str(uuid.uuid4()), email=f'cq_{suffix}@evaluaasi.com', username=f'cq_{suffix}',
+                        name='Candidato', first_surname='Cola', role='candidato', curp=curp)
+            user.set_password('test1234')
+            db.session.add(user)
+            db.session.flush()
+            row = CurpVerificationQueue(user_id=user.id, curp=curp, source='bulk',
+                                        next_retry_at=datetime.utcnow() - timedelta(seconds=1))
+            db.session.add(row)
+            db.session.flush()
+            ids.append(row.id)
+        db.session.commit()
+        return ids
+
+
+def _clear_queue(app, db):
+    from app.models.curp_verification import CurpVerificationQueue
+    with app.app_context():
+        CurpVerificationQueue.query.delete()
+        db.session.commit()
+
+
+def test_local_bucket_paces_all_threads():
+    from app.services.renapo_rate_budget import TokenBucket
+    bucket = TokenBucket(key='test:pace', rate_per_minute=1200, burst=1, redis_client=NoRedis())
+    assert bucket.try_acquire() == (True, 0.0)
+    granted, wait = bucket.try_acquire()
+    assert not granted and 0 < wait <= 0.05
+    assert bucket.backend == 'local'
+
+    stamps = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(2):
+            assert bucket.acquire(max_wait=5)
+            with lock:
+                stamps.append(time.monotonic())
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 8 tokens a 20/s sin burst disponible: al menos ~0.35 s en total
+    assert len(stamps) == 8
+    assert max(stamps) - start >= 0.3
+    assert not bucket.acquire(max_wait=0)
+    assert bucket.state()['backend'] == 'local'
+
+
+def test_claims_are_disjoint(app_and_db):
+    app, db = app_and_db
+    from app.models.curp_verification import CurpVerificationQueue
+    from app.services.curp_queue_worker import _claim_pending_rows
+    _clear_queue(app, db)
+    ids = _enqueue(app, db, [_curp(i) for i in range(6)])
+    with app.app_context():
+        first = _claim_pending_rows('replica-a', 4)
+        second = _claim_pending_rows('replica-b', 4)
+        third = _claim_pending_rows('replica-c', 4)
+        assert len(first) == 4 and len(second) == 2 and third == []
+        assert set(first) | set(second) == set(ids)
+        rows = CurpVerificationQueue.query.filter(CurpVerificationQueue.id.in_(ids)).all()
+        assert {r.status for r in rows} == {'processing'}
+        assert {r.locked_by for r in rows if r.id in second} == {'replica-b'}
+
+
+def test_only_cache_misses_consume_budget(app_and_db, renapo, bucket):
+    app, db = app_and_db
+    from app.models.curp_verification import CurpVerificationQueue, CurpRenapoCache
+    from app.models.user import User
+    from app.services.curp_queue_worker import _claim_pending_rows, process_claimed_rows
+    _clear_queue(app, db)
+    cached, valid, unknown = _curp(100), _curp(101), _curp(102)
+    renapo.registry[valid] = ('JUAN', 'PEREZ')
+    with app.app_context():
+        db.session.add(CurpRenapoCache(curp=cached, valid=True, payload_json='{"name": "ANA", "first_surname": "RUIZ"}',
+                                       expires_at=CurpRenapoCache.calc_expiry(True)))
+        db.session.commit()
+    ids = _enqueue(app, db, [cached, valid, unknown])
+    with app.app_context():
+        claimed = _claim_pending_rows('replica-a', 10)
+    process_claimed_rows(app, claimed, 'replica-a', concurrency=1)
+
+    assert sorted(renapo.calls) == sorted([valid, unknown])
+    assert len(bucket.granted) == 2
+    with app.app_context():
+        rows = {r.curp: r for r in CurpVerificationQueue.query.filter(CurpVerificationQueue.id.in_(ids))}
+        assert rows[cached].status == 'done'
+        assert rows[valid].status == 'done'
+        assert rows[unknown].status == 'pending' and rows[unknown].attempts == 1
+        assert rows[unknown].locked_by is None
+        assert User.query.get(rows[valid].user_id).curp_verified
+        assert User.query.get(rows[cached].user_id).name == 'ANA'
+
+
+def test_rows_return_to_queue_without_budget(app_and_db, renapo, monkeypatch):
+    app, db = app_and_db
+    from app.models.curp_verification import CurpVerificationQueue
+    from app.services import renapo_rate_budget
+    from app.services.curp_queue_worker import _claim_pending_rows, process_claimed_rows
+    from app.services.renapo_rate_budget import TokenBucket
+    _clear_queue(app, db)
+    empty = TokenBucket(key='test:empty', rate_per_minute=0.1, burst=1, redis_client=NoRedis())
+    assert empty.acquire(max_wait=0)
+    monkeypatch.setattr(renapo_rate_budget, 'RENAPO_BUDGET_MAX_WAIT', 0)
+    monkeypatch.setattr(renapo_rate_budget, '_bucket', empty)
+    ids = _enqueue(app, db, [_curp(200)])
+    with app.app_context():
+        process_claimed_rows(app, _claim_pending_rows('replica-a', 5), 'replica-a')
+        row = CurpVerificationQueue.query.get(ids[0])
+        assert row.status == 'pending' and row.attempts == 0 and row.locked_by is None
+    assert renapo.calls == []
+
+
+def test_adaptive_concurrency():
+    from app.services.curp_queue_worker import AdaptiveConcurrency
+    controller = AdaptiveConcurrency(minimum=1, maximum=4)
+    for expected in (2, 3, 4, 4):
+        assert controller.adjust(slow=False, latency=2.0, fast_threshold=10.0) == expected
+    assert controller.adjust(slow=False, latency=15.0, fast_threshold=10.0) == 4
+    assert controller.adjust(slow=True) == 2
+    assert controller.adjust(slow=False, circuit_open=True) == 1
+    assert controller.adjust(slow=True) == 1
+
+
+def test_metrics_endpoint(app_and_db, bucket):
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    from app.models.curp_verification import CurpVerificationQueue
+    from app.services.curp_queue_worker import _claim_pending_rows
+    _clear_queue(app, db)
+    ids = _enqueue(app, db, [_curp(300 + i) for i in range(5)])
+    with app.app_context():
+        _claim_pending_rows('replica-m', 1)
+        later = CurpVerificationQueue.query.get(ids[-1])
+        later.next_retry_at = datetime.utcnow() + timedelta(hours=1)
+        done = CurpVerificationQueue.query.get(ids[-2])
+        done.status, done.finished_at = 'done', datetime.utcnow()
+        admin = User(id=str(uuid.uuid4()), email=f'adm_{uuid.uuid4().hex[:6]}@evaluaasi.com',
+                     username=f'adm_{uuid.uuid4().hex[:6]}', name='Admin', first_surname='Cola', role='admin')
+        admin.set_password('test1234')
+        db.session.add(admin)
+        db.session.commit()
+        token = create_access_token(identity=admin.id)
+
+    resp = app.test_client().get('/api/user-management/curp-queue/metrics',
+                                 headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 200, resp.get_json()
+    data = resp.get_json()
+    assert data['depth'] == {'ready': 2, 'scheduled': 1, 'processing': 1}
+    assert data['throughput']['last_15m'] == 1
+    assert data['workers']['active'] == ['replica-m']
+    assert data['budget']['rate_per_minute'] == 6000
+    # 3 filas pendientes de terminar a 1/15 por minuto
+    assert data['eta_seconds'] == int(3 / (1 / 15.0) * 60)
@@ -0,0 +1,262 @@
+"""
+Tests del autosave write-behind (app/services/exam_progress_store.py):
+  - Los guardados frecuentes van a Redis con versión creciente y se
+    coalescen: la BD se escribe una vez por ventana de debounce y el flush
+    periódico escribe solo la última versión.
+  - GET /progress se sirve desde Redis (ve la última versión sin flush).
+  - Garantías de durabilidad: la BD nunca atrasa más que el debounce, al
+    entregar (save_exam_result) se hace flush antes de leer started_at, el
+    ancla started_at sobrevive a perder Redis, sin Redis se escribe directo
+    en la BD y un borrado no se revive por un flush concurrente.
+  - La BD nunca retrocede: ni un borrador viejo de Redis tras una caída
+    (escritura directa a BD) ni flushers que terminan en desorden.
+
+USO:
+  cd backend && python -m pytest tests/test_exam_progress_store.py -v
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter, FakeRedis, NoRedis  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-exam-progress'
+    try:
+        from app import create_app, db as flask_db
+        from app.models.exam_progress import ExamProgress  # noqa: F401 (registrar tabla)
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _mark_flushed(redis, keys, args):
+    """Emulación en Python de _MARK_FLUSHED_LUA."""
+    data = redis.hashes.get(keys[0])
+    if data is None:
+        return 0
+    if int(args[0]) > int(data.get(b'flushed_version', b'0')):
+        data[b'flushed_version'] = redis._b(args[0])
+        data[b'flushed_at'] = redis._b(args[1])
+    return 1
+
+
+@pytest.fixture()
+def store(monkeypatch):
+    from app.services import exam_progress_store as eps
+    redis = FakeRedis()
+    redis.on_script('flushed_version', _mark_flushed)
+    monkeypatch.setattr(eps, '_redis', redis)
+    monkeypatch.setattr(eps, '_redis_retry_at', 0.0)
+    monkeypatch.setattr(eps, 'PROGRESS_DEBOUNCE_SECONDS', 20)
+    return eps
+
+
+@pytest.fixture()
+def clock(store, monkeypatch):
+    state = {'now': 1_000_000.0}
+    monkeypatch.setattr(store, 'time', SimpleNamespace(
+        time=lambda: state['now'], monotonic=time.monotonic, sleep=time.sleep))
+    return state
+
+
+def _row(db, user_id, exam_id):
+    from app.models.exam_progress import ExamProgress
+    db.session.expire_all()
+    return ExamProgress.query.filter_by(user_id=user_id, exam_id=exam_id).first()
+
+
+def test_saves_coalesce_and_reads_hit_fast_tier(app_and_db, store, clock):
+    app, db = app_and_db
+    user_id = str(uuid.uuid4())
+    with app.app_context():
+        with QueryCounter(db.engine) as counter:
+            results = [store.save_progress(user_id, 7, 'att-1', {'answers': {'q1': i}}) for i in range(10)]
+        assert [r['version'] for r in results] == list(range(1, 11))
+        assert [r['persisted'] for r in results] == [True] + [False] * 9
+        assert len(counter.matching('INSERT INTO exam_progress', 'UPDATE exam_progress')) == 1
+
+        # La BD tiene la primera versión; la lectura ve la última desde Redis
+        assert _row(db, user_id, 7).data == {'answers': {'q1': 0}}
+        with QueryCounter(db.engine) as counter:
+            progress = store.get_progress(user_id, 7)
+        # Solo se compara updated_at de la fila; el blob sale de Redis
+        assert len(counter.statements) == 1 and 'data' not in counter.statements[0].split('FROM')[0]
+        assert progress['version'] == 10 and progress['data'] == {'answers': {'q1': 9}}
+        assert progress['attempt_id'] == 'att-1' and progress['started_at']
+
+        assert store.flush_dirty_progress() == 1
+        assert _row(db, user_id, 7).data == {'answers': {'q1': 9}}
+        assert store.flush_dirty_progress() == 0
+
+
+def test_db_lag_is_bounded_by_debounce(app_and_db, store, clock):
+    app, db = app_and_db
+    user_id = str(uuid.uuid4())
+    with app.app_context():
+        store.save_progress(user_id, 8, 'att-2', {'step': 0})
+        for step in range(1, 6):
+            clock['now'] += 5
+            saved = store.save_progress(user_id, 8, 'att-2', {'step': step})
+            # a los 20 s desde la última escritura el guardado va a la BD
+            assert saved['persisted'] == (step == 4)
+        assert _row(db, user_id, 8).data == {'step': 4}
+
+        # Si se pierde Redis, se pierde como mucho lo posterior al último debounce
+        store._redis.hashes.clear()
+        store._redis.sets.clear()
+        assert store.get_progress(user_id, 8)['data'] == {'step': 4}
+
+
+def test_submit_flushes_and_started_at_survives_redis_loss(app_and_db, store, clock):
+    app, db = app_and_db
+    user_id = str(uuid.uuid4())
+    with app.app_context():
+        store.save_progress(user_id, 9, 'att-3', {'n': 1})
+        anchored = _row(db, user_id, 9).started_at
+        row = _row(db, user_id, 9)
+        row.started_at = anchored - timedelta(minutes=30)
+        db.session.commit()
+
+        store._redis.hashes.clear()  # Redis reiniciado a media evaluación
+        store.save_progress(user_id, 9, 'att-3', {'n': 2})
+        store.save_progress(user_id, 9, 'att-3', {'n': 3})
+        started = datetime.fromisoformat(store.get_progress(user_id, 9)['started_at'])
+        assert started == anchored - timedelta(minutes=30)
+
+        assert store.flush_progress(user_id, 9)
+        row = _row(db, user_id, 9)
+        assert row.data == {'n': 3} and row.started_at == anchored - timedelta(minutes=30)
+        assert not store.flush_progress(user_id, 9)  # ya estaba escrito
+
+
+def test_without_redis_writes_through(app_and_db, store, monkeypatch):
+    app, db = app_and_db
+    monkeypatch.setattr(store, '_redis', NoRedis())
+    user_id = str(uuid.uuid4())
+    with app.app_context():
+        first = store.save_progress(user_id, 10, 'att-4', {'a': 1})
+        second = store.save_progress(user_id, 10, 'att-4', {'a': 2})
+        assert first == second == {'version': None, 'persisted': True}
+        assert _row(db, user_id, 10).data == {'a': 2}
+        assert store.get_progress(user_id, 10)['data'] == {'a': 2}
+        store.delete_progress(user_id, 10)
+        assert _row(db, user_id, 10) is None
+
+
+def test_redis_recovery_does_not_roll_back_direct_writes(app_and_db, store, monkeypatch):
+    app, db = app_and_db
+    user_id = str(uuid.uuid4())
+    fake = store._redis
+    with app.app_context():
+        store.save_progress(user_id, 13, 'att-7', {'q': 1})
+        store.save_progress(user_id, 13, 'att-7', {'q': 2})  # solo en Redis (debounce)
+
+        time.sleep(0.01)  # más que la resolución de DATETIME entre guardados
+        monkeypatch.setattr(store, '_redis', NoRedis())
+        assert store.save_progress(user_id, 13, 'att-7', {'q': 3})['persisted']
+        monkeypatch.setattr(store, '_redis', fake)  # Redis vuelve con {'q': 2} sucio
+        monkeypatch.setattr(store, '_redis_retry_at', 0.0)
+
+        assert store.flush_dirty_progress() == 0
+        assert _row(db, user_id, 13).data == {'q': 3}
+        assert store.get_progress(user_id, 13)['data'] == {'q': 3}
+        assert store._key(user_id, 13) not in fake.hashes
+
+        # El siguiente guardado vuelve a Redis y sí avanza la BD
+        store.save_progress(user_id, 13, 'att-7', {'q': 4})
+        store.flush_progress(user_id, 13)
+        assert _row(db, user_id, 13).data == {'q': 4}
+
+
+def test_out_of_order_flushers_never_roll_back(app_and_db, store, monkeypatch):
+    app, db = app_and_db
+    user_id = str(uuid.uuid4())
+    with app.app_context():
+        store.save_progress(user_id, 14, 'att-8', {'v': 1})
+        store.save_progress(user_id, 14, 'att-8', {'v': 2})  # sucio, flushed_version=1
+
+        real_write = store._write_rows
+        state = {'raced': False}
+
+        def slow_flusher(drafts):
+            # El flusher A ya reclamó v2; mientras escribe llega v3 y otro
+            # flusher (B) la escribe y la marca antes que A.
+            if not state['raced']:
+                state['raced'] = True
+                store.save_progress(user_id, 14, 'att-8', {'v': 3})
+                assert store.flush_dirty_progress() == 1
+            return real_write(drafts)
+
+        monkeypatch.setattr(store, '_write_rows', slow_flusher)
+        assert store.flush_dirty_progress() == 0  # A no escribió nada
+        assert _row(db, user_id, 14).data == {'v': 3}
+        entry = store._redis.hashes[store._key(user_id, 14)]
+        assert entry[b'version'] == entry[b'flushed_version'] == b'3'
+
+        # Un miembro que ya no está sucio (SREM=0) no se vuelve a escribir
+        monkeypatch.setattr(store, '_write_rows', real_write)
+        assert store._flush_members([store._member(user_id, 14)]) == 0
+
+
+def test_delete_is_not_resurrected_by_concurrent_flush(app_and_db, store, monkeypatch):
+    app, db = app_and_db
+    user_id = str(uuid.uuid4())
+    with app.app_context():
+        store.save_progress(user_id, 11, 'att-5', {'k': 1})
+        store.save_progress(user_id, 11, 'att-5', {'k': 2})
+
+        real_write = store._write_rows
+
+        def write_then_candidate_submits(drafts):
+            written = real_write(drafts)
+            store.delete_progress(user_id, 11)  # DELETE llega entre el upsert y la marca
+            return written
+
+        monkeypatch.setattr(store, '_write_rows', write_then_candidate_submits)
+        store.flush_dirty_progress()
+        assert _row(db, user_id, 11) is None
+        assert store.get_progress(user_id, 11) is None
+        assert not store._redis.smembers(store._DIRTY_KEY)
+
+
+def test_progress_endpoints_use_store(app_and_db, store, clock):
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    with app.app_context():
+        suffix = uuid.uuid4().hex[:8]
+        user = User(id=str(uuid.uuid4()), email=f'ep_{suffix}@evaluaasi.com', username=f'ep_{suffix}',
+                    name='Candidato', first_surname='Autosave', role='candidato')
+        user.set_password('test1234')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+        user_id = user.id
+
+    client = app.test_client()
+    for i in range(3):
+        put = client.put('/api/exams/12/progress', json={'attempt_id': 'att-6', 'data': {'i': i}}, headers=headers)
+        assert put.status_code == 200 and put.get_json()['version'] == i + 1
+    body = client.get('/api/exams/12/progress', headers=headers).get_json()
+    assert body['progress']['data'] == {'i': 2} and body['progress']['version'] == 3
+    assert json.loads(store._redis.hashes[store._key(user_id, 12)][b'data']) == {'i': 2}
+
+    assert client.delete('/api/exams/12/progress', headers=headers).status_code == 200
+    assert client.get('/api/exams/12/progress', headers=headers).get_json()['progress'] is None
+    with app.app_context():
+        assert _row(db, user_id, 12) is None
@@ -0,0 +1,208 @@
+"""
+Tests del serializador por lote de exámenes (app/models/exam.py:
+load_exam_stats / serialize_exams):
+  - Mismos conteos que los métodos por examen (get_total_questions,
+    get_total_exercises, get_mode_counts, temas, categorías, materiales
+    vinculados y estándar de competencia).
+  - El número de queries no crece con el tamaño de la página.
+  - GET /api/exams, /api/partners/exams/available y /api/direct/catalog
+    regresan los conteos por lote.
+
+USO:
+  cd backend && python -m pytest tests/test_exam_serializer.py -v
+"""
+import sys
+import os
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-exam-serializer'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+@pytest.fixture(scope='module')
+def exam_data(app_and_db):
+    """6 exámenes: variedad de categorías, temas, preguntas exam/simulator,
+    ejercicios, materiales vinculados, estándar de competencia y uno vacío."""
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    from app.models.exam import Exam
+    from app.models.category import Category
+    from app.models.topic import Topic
+    from app.models.question import Question, QuestionType
+    from app.models.exercise import Exercise
+    from app.models.competency_standard import CompetencyStandard
+    from app.models.study_content import StudyMaterial
+    with app.app_context():
+        admin = User(id=str(uuid.uuid4()), email=f'adm_{uuid.uuid4().hex[:6]}@evaluaasi.com',
+                     username=f'adm_{uuid.uuid4().hex[:6]}', name='Admin',
+                     first_surname='Prueba', role='admin')
+        admin.set_password('test1234')
+        db.session.add(admin)
+        db.session.flush()
+        mc = QuestionType.query.filter_by(name='multiple_choice').first()
+        if not mc:
+            mc = QuestionType(name='multiple_choice', description='Opción múltiple')
+            db.session.add(mc)
+            db.session.flush()
+        standard = CompetencyStandard(code=f'EC{uuid.uuid4().hex[:5]}', name='Estándar lote',
+                                      created_by=admin.id)
+        db.session.add(standard)
+        db.session.flush()
+
+        exam_ids = []
+        for i in range(6):
+            exam = Exam(name=f'Examen lote {i}', version='1.0', stage_id=1, created_by=admin.id,
+                        is_published=True, is_public_catalog=(i % 2 == 0),
+                        competency_standard_id=standard.id if i % 3 == 0 else None)
+            db.session.add(exam)
+            db.session.flush()
+            exam_ids.append(exam.id)
+            if i == 5:
+                continue  # examen sin contenido
+            for c in range(1 + i % 3):
+                cat = Category(exam_id=exam.id, name=f'Cat {c}', percentage=100 // (1 + i % 3),
+                               order=2 - c, created_by=admin.id)
+                db.session.add(cat)
+                db.session.flush()
+                for t in range(1 + (i + c) % 2):
+                    topic = Topic(category_id=cat.id, name=f'Tema {t}', percentage=50,
+                                  order=t, created_by=admin.id)
+                    db.session.add(topic)
+                    db.session.flush()
+                    for q in range(i + 1):
+                        db.session.add(Question(
+                            topic_id=topic.id, question_type_id=mc.id, question_number=q + 1,
+                            question_text=f'P{q}', created_by=admin.id,
+                            type='simulator' if q % 3 == 2 else 'exam'))
+                    for e in range(i % 3):
+                        db.session.add(Exercise(
+                            id=str(uuid.uuid4()), topic_id=topic.id, exercise_number=e + 1,
+                            title=f'Ejercicio {e}', created_by=admin.id,
+                            type='simulator' if e == 1 else 'exam'))
+        for m in range(3):
+            material = StudyMaterial(title=f'Material {m}', is_published=(m != 2), created_by=admin.id)
+            db.session.add(material)
+            db.session.flush()
+            material.exams.append(Exam.query.get(exam_ids[m % 2]))
+        db.session.commit()
+        return {'exam_ids': exam_ids, 'token': create_access_token(identity=admin.id)}
+
+
+def _legacy_counts(exam):
+    """Conteos calculados con los métodos por examen."""
+    from app import db
+    from app.models.category import Category
+    from app.models.topic import Topic
+    categories = exam.categories.all()
+    data = {
+        'total_questions': exam.get_total_questions(),
+        'total_exercises': exam.get_total_exercises(),
+        'total_categories': len(categories),
+        'total_topics': db.session.query(db.func.count(Topic.id)).join(
+            Category, Topic.category_id == Category.id).filter(Category.exam_id == exam.id).scalar() or 0,
+        'categories': [{'id': c.id, 'name': c.name, 'percentage': c.percentage} for c in categories],
+        'linked_material_ids': sorted(m.id for m in exam.linked_study_materials),
+    }
+    data.update(exam.get_mode_counts())
+    if exam.competency_standard:
+        cs = exam.competency_standard
+        data['competency_standard'] = {'id': cs.id, 'code': cs.code, 'name': cs.name}
+    return data
+
+
+def test_serialize_exams_matches_per_exam_counts(app_and_db, exam_data):
+    app, _ = app_and_db
+    from app.models.exam import Exam, serialize_exams
+    with app.app_context():
+        exams = Exam.query.filter(Exam.id.in_(exam_data['exam_ids'])).order_by(Exam.id).all()
+        batch = serialize_exams(exams)
+        for exam, data in zip(exams, batch):
+            legacy = _legacy_counts(exam)
+            for key, value in legacy.items():
+                if key == 'linked_material_ids':
+                    assert sorted(data[key]) == value, (exam.id, key)
+                else:
+                    assert data[key] == value, (exam.id, key)
+            assert ('competency_standard' in data) == ('competency_standard' in legacy)
+            assert data == exam.to_dict()
+
+    by_id = {d['id']: d for d in batch}
+    first, empty = by_id[exam_data['exam_ids'][0]], by_id[exam_data['exam_ids'][5]]
+    assert [c['name'] for c in by_id[exam_data['exam_ids'][2]]['categories']] == ['Cat 2', 'Cat 1', 'Cat 0']
+    assert {m['title'] for m in first['linked_study_materials']} == {'Material 0', 'Material 2'}
+    assert empty['total_questions'] == 0 and empty['categories'] == []
+    assert empty['has_exam_content'] is False
+
+
+def test_query_count_independent_of_page_size(app_and_db, exam_data):
+    app, db = app_and_db
+    from app.models.exam import Exam, serialize_exams
+    with app.app_context():
+        counts = []
+        for size in (1, 6):
+            exams = Exam.query.filter(Exam.id.in_(exam_data['exam_ids'][:size])).all()
+            with QueryCounter(db.engine) as counter:
+                serialize_exams(exams)
+            counts.append(len(counter.statements))
+    assert counts[0] == counts[1]
+    assert counts[1] <= 6, counts
+
+
+def test_get_exams_endpoint_uses_batch_counts(app_and_db, exam_data):
+    app, _ = app_and_db
+    client = app.test_client()
+    resp = client.get('/api/exams?per_page=100', headers={'Authorization': f"Bearer {exam_data['token']}"})
+    assert resp.status_code == 200, resp.get_json()
+    by_id = {e['id']: e for e in resp.get_json()['exams']}
+    from app.models.exam import Exam
+    with app.app_context():
+        for exam_id in exam_data['exam_ids']:
+            legacy = _legacy_counts(Exam.query.get(exam_id))
+            assert by_id[exam_id]['total_questions'] == legacy['total_questions']
+            assert by_id[exam_id]['simulator_questions_count'] == legacy['simulator_questions_count']
+            assert by_id[exam_id]['total_topics'] == legacy['total_topics']
+
+
+def test_available_exams_and_catalog_counts(app_and_db, exam_data):
+    app, _ = app_and_db
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {exam_data['token']}"}
+    from app.models.exam import Exam
+    with app.app_context():
+        legacy = {eid: _legacy_counts(Exam.query.get(eid)) for eid in exam_data['exam_ids']}
+
+    resp = client.get('/api/partners/exams/available?per_page=100&filter_by_campus_ecm=false', headers=headers)
+    assert resp.status_code == 200, resp.get_json()
+    available = {e['id']: e for e in resp.get_json()['exams']}
+    for exam_id in exam_data['exam_ids']:
+        row = available[exam_id]
+        assert row['total_questions'] == legacy[exam_id]['total_questions']
+        assert row['exam_exercises_count'] == legacy[exam_id]['exam_exercises_count']
+        assert row['simulator_exercises_count'] == legacy[exam_id]['simulator_exercises_count']
+    # Material 2 no está publicado: solo cuenta Material 0
+    assert available[exam_data['exam_ids'][0]]['study_materials_count'] == 1
+    assert available[exam_data['exam_ids'][1]]['study_materials_count'] == 1
+
+    resp = client.get('/api/direct/catalog')
+    assert resp.status_code == 200
+    catalog = {e['id']: e for e in resp.get_json()['exams']}
+    for exam_id in exam_data['exam_ids'][::2]:
+        assert catalog[exam_id]['total_questions'] == legacy[exam_id]['total_questions']
@@ -0,0 +1,298 @@
+"""
+Tests de la analítica de grupo agregada en SQL (app/services/group_analytics.py,
+GET /api/partners/groups/<id>/analytics):
+  - Histograma, tasas por examen, serie diaria, estado de certificación por
+    miembro y top performers coinciden con el cálculo en Python sobre las
+    filas crudas (incluye filtros por examen y por fecha).
+  - Materiales directos/seleccionados/por examen y ECAs sin queries por
+    material ni por group-exam.
+  - El número de queries no depende del tamaño del grupo.
+
+USO:
+  cd backend && python -m pytest tests/test_group_analytics.py -v
+"""
+import os
+import sys
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-group-analytics'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _user(db, role, **kwargs):
+    from app.models.user import User
+    suffix = uuid.uuid4().hex[:10]
+    user = User(id=str(uuid.uuid4()), email=kwargs.pop('email', f'{role}_{suffix}@evaluaasi.com'),
+                username=f'{role}_{suffix}', name=kwargs.pop('name', 'Usuario'),
+                first_surname='Analítica', role=role, password_hash='x', **kwargs)
+    db.session.add(user)
+    return user
+
+
+@pytest.fixture(scope='module')
+def catalog(app_and_db):
+    """Admin, 3 exámenes (2 con ECM), materiales publicados y no publicados."""
+    app, db = app_and_db
+    from app.models import Partner, Campus
+    from app.models.brand import Brand
+    from app.models.competency_standard import CompetencyStandard
+    from app.models.exam import Exam
+    from app.models.study_content import StudyMaterial
+    with app.app_context():
+        admin = _user(db, 'admin')
+        partner = Partner(name='Partner Analítica')
+        db.session.add(partner)
+        db.session.flush()
+        campus = Campus(partner_id=partner.id, name='Plantel Analítica', code=f'GA{uuid.uuid4().hex[:6]}',
+                        state_name='Jalisco', city='Guadalajara')
+        brand = Brand(name=f'Marca {uuid.uuid4().hex[:4]}')
+        db.session.add_all([campus, brand])
+        db.session.flush()
+        standards = [CompetencyStandard(code=f'EC{uuid.uuid4().hex[:5]}', name=f'Estándar {i}',
+                                        brand_id=brand.id, created_by=admin.id) for i in range(2)]
+        db.session.add_all(standards)
+        db.session.flush()
+        exams = [Exam(name=f'Examen analítica {i}', version='1.0', stage_id=1, created_by=admin.id,
+                      competency_standard_id=standards[i].id if i < 2 else None) for i in range(3)]
+        materials = [StudyMaterial(title=f'Material {i}', is_published=(i != 3), created_by=admin.id)
+                     for i in range(5)]
+        db.session.add_all(exams + materials)
+        db.session.flush()
+        exams[1].linked_study_materials.append(materials[2])
+        exams[1].linked_study_materials.append(materials[3])  # no publicado
+        db.session.commit()
+        return {
+            'admin_id': admin.id, 'campus_id': campus.id,
+            'exam_ids': [e.id for e in exams], 'standard_ids': [s.id for s in standards],
+            'material_ids': [m.id for m in materials],
+        }
+
+
+def _make_group(db, catalog, n_members):
+    """Grupo con n miembros activos (+1 inactivo) y resultados variados."""
+    from app.models import CandidateGroup, GroupMember
+    from app.models.partner import (
+        EcmCandidateAssignment, GroupExam, GroupExamMaterial, GroupStudyMaterial, GroupStudyMaterialMember,
+    )
+    from app.models.result import Result
+    exam_a, exam_b, exam_c = catalog['exam_ids']
+    mats = catalog['material_ids']
+    group = CandidateGroup(campus_id=catalog['campus_id'], name=f'G-{uuid.uuid4().hex[:5]}')
+    db.session.add(group)
+    db.session.flush()
+    ge_a = GroupExam(group_id=group.id, exam_id=exam_a, assignment_type='all', passing_score=80)
+    ge_b = GroupExam(group_id=group.id, exam_id=exam_b, assignment_type='all')
+    ge_c = GroupExam(group_id=group.id, exam_id=exam_c, assignment_type='all', is_active=False)
+    direct_all = GroupStudyMaterial(group_id=group.id, study_material_id=mats[0], assignment_type='all')
+    direct_sel = GroupStudyMaterial(group_id=group.id, study_material_id=mats[1], assignment_type='selected')
+    db.session.add_all([ge_a, ge_b, ge_c, direct_all, direct_sel])
+    db.session.flush()
+    db.session.add(GroupExamMaterial(group_exam_id=ge_a.id, study_material_id=mats[4], is_included=True))
+    db.session.add(GroupExamMaterial(group_exam_id=ge_a.id, study_material_id=mats[0], is_included=True))
+
+    base = datetime(2026, 4, 1, 9, 0, 0)
+    n_assign = 0
+    users = [_user(db, 'candidato', name=f'Cand{i:04d}', curp=f'CURP{i:014d}' if i % 3 else None,
+                   email=None if i % 4 == 0 else f'ga_{uuid.uuid4().hex[:12]}@evaluaasi.com')
+             for i in range(n_members + 1)]
+    db.session.flush()
+    for i, user in enumerate(users):
+        db.session.add(GroupMember(group_id=group.id, user_id=user.id,
+                                   status='inactive' if i == n_members else 'active'))
+        if i % 2 == 0:
+            db.session.add(GroupStudyMaterialMember(group_study_material_id=direct_sel.id, user_id=user.id))
+        for k in range(i % 3):
+            n_assign += 1
+            db.session.add(EcmCandidateAssignment(
+                assignment_number=f'G{uuid.uuid4().hex[:13]}', user_id=user.id,
+                competency_standard_id=catalog['standard_ids'][k], exam_id=catalog['exam_ids'][k],
+                group_id=group.id if k == 0 else None, assignment_source='bulk'))
+        for attempt in range(i % 5):
+            exam_id = (exam_a, exam_b, exam_c)[(i + attempt) % 3]
+            status = 0 if attempt == 3 else 1
+            score = (i * 7 + attempt * 31) % 101
+            db.session.add(Result(
+                id=str(uuid.uuid4()), user_id=user.id, exam_id=exam_id, score=score, status=status,
+                result=1 if score >= 70 else 0,
+                duration_seconds=(600 + i * 13) if attempt != 1 else 0,
+                certificate_code=f'ZC{uuid.uuid4().hex[:10]}' if score >= 90 else None,
+                start_date=base + timedelta(days=(i + attempt) % 6),
+                end_date=base + timedelta(days=(i + attempt) % 6, hours=1) if status else None))
+    db.session.commit()
+    return group.id
+
+
+def _reference(db, group_id, exam_id=None, date_from=None, date_to=None):
+    """Cálculo en Python sobre filas crudas (algoritmo anterior)."""
+    from app.models import GroupMember
+    from app.models.partner import GroupExam
+    from app.models.result import Result
+    member_ids = [m.user_id for m in GroupMember.query.filter_by(group_id=group_id, status='active')]
+    exam_ids = {ge.exam_id for ge in GroupExam.query.filter_by(group_id=group_id, is_active=True)}
+    results = [r for r in Result.query.filter(Result.user_id.in_(member_ids)).all() if r.exam_id in exam_ids]
+    if exam_id:
+        results = [r for r in results if r.exam_id == exam_id]
+    if date_from:
+        results = [r for r in results if r.end_date and r.end_date >= date_from]
+    if date_to:
+        results = [r for r in results if r.end_date and r.end_date < date_to + timedelta(days=1)]
+    completed = [r for r in results if r.status == 1]
+    approved = [r for r in completed if r.result == 1]
+    bins = [0] * 10
+    for r in completed:
+        bins[min(r.score // 10, 9)] += 1
+    by_exam = defaultdict(lambda: [0, 0, 0])
+    for r in results:
+        by_exam[r.exam_id][0 if (r.status == 1 and r.result == 1) else 1 if r.status == 1 else 2] += 1
+    by_date = defaultdict(lambda: [0, 0])
+    for r in completed:
+        by_date[r.end_date.strftime('%Y-%m-%d')][0 if r.result == 1 else 1] += 1
+    status = defaultdict(int)
+    for uid in member_ids:
+        mine = [r for r in results if r.user_id == uid]
+        if any(r.status == 1 and r.result == 1 for r in mine):
+            status['certified'] += 1
+        elif any(r.status == 1 for r in mine):
+            status['failed'] += 1
+        elif any(r.status == 0 for r in mine):
+            status['in_progress'] += 1
+        else:
+            status['pending'] += 1
+    durations = [r.duration_seconds for r in completed if r.duration_seconds]
+    return {
+        'totals': (len(results), len(completed), len(approved), len(results) - len(completed)),
+        'avg_score': round(sum(r.score for r in completed) / len(completed), 1) if completed else 0,
+        'avg_duration_minutes': round(sum(durations) / len(durations) / 60, 1) if durations else 0,
+        'bins': bins,
+        'by_exam': {k: tuple(v) for k, v in by_exam.items()},
+        'by_date': {k: tuple(v) for k, v in by_date.items()},
+        'status': dict(status),
+        'basic_ready': sum(1 for r in approved if r.certificate_code),
+    }
+
+
+def _check(payload, ref):
+    res = payload['results']
+    assert (res['total'], res['completed'], res['approved'], res['in_progress']) == ref['totals']
+    assert res['avg_score'] == ref['avg_score']
+    assert res['avg_duration_minutes'] == ref['avg_duration_minutes']
+    assert [b['count'] for b in res['score_distribution']] == ref['bins']
+    assert {e['exam_id']: (e['approved'], e['failed'], e['in_progress']) for e in res['by_exam']} == ref['by_exam']
+    assert {d['date']: (d['approved'], d['failed']) for d in res['by_date']} == ref['by_date']
+    assert [d['date'] for d in res['by_date']] == sorted(ref['by_date'])
+    members = payload['members']
+    assert {k: members[k] for k in ('certified', 'failed', 'in_progress', 'pending') if members[k]} == ref['status']
+    assert payload['certificates']['tier_basic']['ready'] == ref['basic_ready']
+    assert payload['certificates']['digital_badge'] == res['approved']
+
+
+def test_aggregates_match_python_reference(app_and_db, catalog):
+    app, db = app_and_db
+    from app.models import CandidateGroup
+    from app.services.group_analytics import build_group_analytics
+    exam_a, exam_b, _ = catalog['exam_ids']
+    with app.app_context():
+        group_id = _make_group(db, catalog, 40)
+        group = CandidateGroup.query.get(group_id)
+
+        payload = build_group_analytics(group)
+        _check(payload, _reference(db, group_id))
+        assert payload['members']['total'] == 40
+        assert payload['members']['with_email'] == 30 and payload['members']['with_curp'] == 26
+        assert payload['exams']['assigned'] == 2
+        top = payload['top_performers']
+        assert len(top) == 10
+        assert [t['avg_score'] for t in top] == sorted((t['avg_score'] for t in top), reverse=True)
+        assert all(t['full_name'].startswith('Cand') for t in top)
+
+        _check(build_group_analytics(group, exam_id_filter=exam_b), _reference(db, group_id, exam_id=exam_b))
+        day = datetime(2026, 4, 3)
+        _check(build_group_analytics(group, date_from='2026-04-03', date_to='2026-04-04'),
+               _reference(db, group_id, date_from=day, date_to=day + timedelta(days=1)))
+        _check(build_group_analytics(group, date_from='no-es-fecha'), _reference(db, group_id))
+
+
+def test_materials_and_ecm_sections(app_and_db, catalog):
+    app, db = app_and_db
+    from app.models import CandidateGroup
+    from app.services.group_analytics import build_group_analytics
+    mats = catalog['material_ids']
+    exam_a, exam_b, _ = catalog['exam_ids']
+    with app.app_context():
+        group_id = _make_group(db, catalog, 9)
+        payload = build_group_analytics(CandidateGroup.query.get(group_id))
+
+    details = payload['materials']['details']
+    assert [(d['source'], d['material_name'], d['assigned_members']) for d in details] == [
+        ('direct', 'Material 0', 9),
+        ('direct', 'Material 1', 5),   # selected: miembros pares (incluye al inactivo como antes)
+        ('exam', 'Material 4', 9),     # personalizado del examen A (Material 0 ya estaba)
+        ('exam', 'Material 2', 9),     # vinculado al examen B (Material 3 no publicado)
+    ]
+    assert details[2]['id'] == f'exam-{exam_a}-{mats[4]}'
+    ecm = {d['ecm_id']: d['assignments'] for d in payload['ecm']['details']}
+    # k=0 por grupo (miembros 1,2,4,5,7,8) y k=1 por examen del grupo (miembros 2,5,8)
+    assert ecm == {catalog['standard_ids'][0]: 6, catalog['standard_ids'][1]: 3}
+    assert payload['ecm']['total_assignments'] == 9 and payload['ecm']['unique_ecms'] == 2
+
+
+def test_query_count_independent_of_group_size(app_and_db, catalog):
+    app, db = app_and_db
+    from app.models import CandidateGroup
+    from app.services.group_analytics import build_group_analytics
+    with app.app_context():
+        small, large = _make_group(db, catalog, 20), _make_group(db, catalog, 300)
+        counts = []
+        for group_id in (small, large):
+            group = CandidateGroup.query.get(group_id)
+            db.session.expire_all()
+            with QueryCounter(db.engine) as counter:
+                payload = build_group_analytics(group)
+            counts.append(len(counter.statements))
+        assert payload['members']['total'] == 300
+        assert counts[0] == counts[1]
+        assert counts[1] <= 20
+
+
+def test_endpoint_and_empty_group(app_and_db, catalog):
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models import CandidateGroup
+    with app.app_context():
+        group_id = _make_group(db, catalog, 5)
+        empty = CandidateGroup(campus_id=catalog['campus_id'], name='G-vacío')
+        db.session.add(empty)
+        db.session.commit()
+        empty_id = empty.id
+        headers = {'Authorization': f"Bearer {create_access_token(identity=catalog['admin_id'])}"}
+
+    client = app.test_client()
+    resp = client.get(f'/api/partners/groups/{group_id}/analytics?exam_id={catalog["exam_ids"][0]}',
+                      headers=headers)
+    assert resp.status_code == 200, resp.get_json()
+    body = resp.get_json()
+    assert body['group']['campus_name'] == 'Plantel Analítica'
+    assert {e['exam_id'] for e in body['results']['by_exam']} <= {catalog['exam_ids'][0]}
+
+    resp = client.get(f'/api/partners/groups/{empty_id}/analytics', headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()['members']['total'] == 0
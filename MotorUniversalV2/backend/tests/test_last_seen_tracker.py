@@ -0,0 +1,146 @@
+"""
+Tests del registro diferido de last_seen (app/services/last_seen_tracker.py):
+  - Los requests autenticados ya no escriben en users: marcan al usuario
+    (con throttle) y el flush escribe todo en un solo UPDATE por lote.
+  - El flush nunca retrocede un last_seen más reciente.
+  - Los lectores (effective_last_seen, resumen de usuario del chat de
+    soporte) ven la marca pendiente antes del flush.
+  - Con Redis las marcas se comparten entre réplicas (hash + drain atómico)
+    y sin Redis se usa el buffer en proceso.
+
+USO:
+  cd backend && python -m pytest tests/test_last_seen_tracker.py -v
+"""
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter, FakeRedis, NoRedis  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-last-seen'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+@pytest.fixture()
+def tracker(monkeypatch):
+    from app.services import last_seen_tracker as lst
+    monkeypatch.setattr(lst, '_recorded_at', {})
+    monkeypatch.setattr(lst, '_pending', {})
+    monkeypatch.setattr(lst, '_redis', NoRedis())
+    monkeypatch.setattr(lst, '_redis_retry_at', 0.0)
+    return lst
+
+
+def _users(db, n):
+    from app.models.user import User
+    users = []
+    for _ in range(n):
+        suffix = uuid.uuid4().hex[:8]
+        user = User(id=str(uuid.uuid4()), email=f'ls_{suffix}@evaluaasi.com', username=f'ls_{suffix}',
+                    name='Candidato', first_surname='Activo', role='candidato')
+        user.set_password('test1234')
+        db.session.add(user)
+        users.append(user)
+    db.session.commit()
+    return users
+
+
+def test_requests_do_not_write_users_until_flush(app_and_db, tracker):
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    with app.app_context():
+        users = _users(db, 3)
+        ids = [u.id for u in users]
+        tokens = [create_access_token(identity=uid) for uid in ids]
+
+    client = app.test_client()
+    with QueryCounter(db.engine) as counter:
+        for _ in range(5):
+            for token in tokens:
+                client.get('/api/_no_existe', headers={'Authorization': f'Bearer {token}'})
+    assert counter.matching('UPDATE users') == []
+    assert sorted(tracker._pending) == sorted(ids)  # una marca por usuario (throttle)
+
+    with app.app_context():
+        db.session.expire_all()
+        assert all(User.query.get(uid).last_seen is None for uid in ids)
+        with QueryCounter(db.engine) as counter:
+            assert tracker.flush_last_seen() == 3
+        assert len(counter.matching('UPDATE users')) == 1
+        assert len(counter.matching('UPDATE users', executemany=True)) == 1
+        db.session.expire_all()
+        seen = [User.query.get(uid).last_seen for uid in ids]
+        assert all(s and datetime.utcnow() - s < timedelta(minutes=1) for s in seen)
+        assert tracker.flush_last_seen() == 0
+
+
+def test_throttle_and_never_moves_backwards(app_and_db, tracker, monkeypatch):
+    app, db = app_and_db
+    from app.models.user import User
+    with app.app_context():
+        user = _users(db, 1)[0]
+        recent = datetime.utcnow()
+        user.last_seen = recent
+        db.session.commit()
+        uid = user.id
+
+        old = time.time() - 3600
+        assert tracker.record_last_seen(uid, now=old)
+        assert not tracker.record_last_seen(uid)  # dentro del throttle
+        tracker.flush_last_seen()
+        db.session.expire_all()
+        assert User.query.get(uid).last_seen == recent
+
+        monkeypatch.setattr(tracker, 'LAST_SEEN_THROTTLE_SECONDS', 0)
+        assert tracker.record_last_seen(uid)
+
+
+def test_readers_see_pending_value(app_and_db, tracker):
+    app, db = app_and_db
+    from app.routes.support_chat import _serialize_user_summary
+    with app.app_context():
+        user = _users(db, 1)[0]
+        user.last_seen = datetime.utcnow() - timedelta(hours=2)
+        db.session.commit()
+        before = tracker.effective_last_seen(user)
+        tracker.record_last_seen(user.id)
+        after = tracker.effective_last_seen(user)
+        assert after > before and datetime.utcnow() - after < timedelta(seconds=5)
+        assert _serialize_user_summary(user)['last_seen'] == after.isoformat()
+
+
+def test_redis_shared_buffer(app_and_db, tracker, monkeypatch):
+    app, db = app_and_db
+    from app.models.user import User
+    redis = FakeRedis()
+    monkeypatch.setattr(tracker, '_redis', redis)
+    with app.app_context():
+        users = _users(db, 2)
+        for u in users:
+            tracker.record_last_seen(u.id)
+        assert tracker._pending == {}
+        assert len(redis.hashes[tracker._PENDING_KEY]) == 2
+        assert set(tracker.pending_last_seen([u.id for u in users])) == {u.id for u in users}
+
+        assert tracker.flush_last_seen() == 2
+        assert tracker._PENDING_KEY not in redis.hashes
+        db.session.expire_all()
+        assert all(User.query.get(u.id).last_seen for u in users)
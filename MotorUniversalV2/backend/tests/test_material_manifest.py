@@ -0,0 +1,235 @@
+"""
+Tests del manifiesto versionado de materiales (material_structure_service):
+  - Cada sesión/tema del manifiesto es idéntico al `to_dict` del modelo
+    (incluye pasos, acciones, paquete SCORM y URLs transformadas al CDN).
+  - Construirlo cuesta una query por tabla, sin importar el tamaño del
+    material; con el manifiesto en cache las lecturas no tocan las tablas.
+  - Las rutas de lectura del candidato y la exportación SCORM leen de él, y
+    las rutas de edición (contenidos y paquetes SCORM) lo invalidan.
+
+USO:
+  cd backend && python -m pytest tests/test_material_manifest.py -v
+"""
+import io
+import os
+import sys
+import uuid
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+VIDEO_BLOB = 'https://evaluaasivideos.blob.core.windows.net/videos/intro.mp4'
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-material-manifest'
+    try:
+        from app import create_app, db as flask_db, cache
+        from flask_caching.backends import SimpleCache
+        app = create_app('testing')
+        # Backend en memoria en lugar de Redis (no disponible en CI)
+        app.extensions['cache'][cache] = SimpleCache()
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _user(db, role):
+    from app.models.user import User
+    suffix = uuid.uuid4().hex[:8]
+    user = User(id=str(uuid.uuid4()), email=f'{role}_{suffix}@evaluaasi.com', username=f'{role}_{suffix}',
+                name='Usuario', first_surname='Manifiesto', role=role)
+    user.set_password('test1234')
+    db.session.add(user)
+    return user
+
+
+def _build_material(db, admin, sessions=2, topics=3):
+    """Material con lecturas, videos, descargables, interactivos con pasos y
+    acciones y un paquete SCORM en el primer tema. Sesiones y temas se crean
+    en orden inverso para verificar el ordenamiento."""
+    from app.models.study_content import (
+        StudyMaterial, StudySession, StudyTopic, StudyReading, StudyVideo,
+        StudyDownloadableExercise, StudyInteractiveExercise,
+        StudyInteractiveExerciseStep, StudyInteractiveExerciseAction,
+    )
+    from app.models.study_scorm import StudyScormPackage
+    material = StudyMaterial(title='Material manifiesto', description='Descripción', created_by=admin.id)
+    db.session.add(material)
+    db.session.flush()
+    first = None
+    for s in range(sessions):
+        session = StudySession(material_id=material.id, session_number=sessions - s, title=f'Sesión {s}')
+        db.session.add(session)
+        db.session.flush()
+        for t in range(topics):
+            topic = StudyTopic(session_id=session.id, title=f'Tema {s}.{t}', order=topics - t)
+            db.session.add(topic)
+            db.session.flush()
+            if s == sessions - 1 and t == topics - 1:
+                first = (session, topic)  # primero tras ordenar por número/orden
+            db.session.add(StudyReading(topic_id=topic.id, title=f'Lectura {s}.{t}', content='<p>Hola&nbsp;mundo</p>'))
+            if t % 2 == 0:
+                db.session.add(StudyVideo(topic_id=topic.id, title='Video', video_url=VIDEO_BLOB))
+            if t == 1:
+                db.session.add(StudyDownloadableExercise(topic_id=topic.id, title='Desc', file_url='https://f',
+                                                         file_name='guia.pdf'))
+            exercise = StudyInteractiveExercise(id=str(uuid.uuid4()), topic_id=topic.id, title='Inter',
+                                                created_by=admin.id)
+            db.session.add(exercise)
+            for n in (2, 1):
+                step = StudyInteractiveExerciseStep(id=str(uuid.uuid4()), exercise_id=exercise.id,
+                                                    step_number=n, title=f'Paso {n}')
+                db.session.add(step)
+                for a in (2, 1):
+                    db.session.add(StudyInteractiveExerciseAction(
+                        id=str(uuid.uuid4()), step_id=step.id, action_number=a, action_type='text_input',
+                        position_x=0, position_y=0, width=10, height=10, label=f'Acción {a}',
+                        correct_answer='ok'))
+    db.session.add(StudyScormPackage(topic_id=first[1].id, title='Paquete', blob_prefix='scorm/x',
+                                     blob_base_url='https://blob/scorm/x', entry_point='index.html',
+                                     uploaded_by=admin.id))
+    db.session.commit()
+    return material.id, first[0].id, first[1].id
+
+
+@pytest.fixture(scope='module')
+def material(app_and_db):
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        admin, candidate = _user(db, 'admin'), _user(db, 'candidato')
+        db.session.flush()
+        material_id, session_id, topic_id = _build_material(db, admin)
+        return {
+            'material_id': material_id,
+            'session_id': session_id,
+            'topic_id': topic_id,
+            'admin_id': admin.id,
+            'candidate_token': create_access_token(identity=candidate.id),
+            'admin_token': create_access_token(identity=admin.id),
+        }
+
+
+def _legacy_sessions(material_id):
+    from app.models.study_content import StudyMaterial
+    return StudyMaterial.query.get(material_id).to_dict(include_sessions=True)['sessions']
+
+
+def test_manifest_matches_model_to_dict(app_and_db, material):
+    app, db = app_and_db
+    from app.services.material_structure_service import build_material_manifest
+    with app.app_context():
+        manifest = build_material_manifest(material['material_id'])
+        legacy = _legacy_sessions(material['material_id'])
+    assert manifest['sessions'] == legacy
+    topic = manifest['sessions'][0]['topics'][0]
+    assert topic['has_scorm'] and topic['scorm_package']['launch_url'] == 'https://blob/scorm/x/index.html'
+    assert [s['step_number'] for s in topic['interactive_exercise']['steps']] == [1, 2]
+    assert 'blob.core.windows.net' not in topic['video']['video_url']  # URL del CDN
+    assert build_material_manifest(999999) is None
+
+
+def test_build_cost_is_constant_and_cached_reads_skip_tables(app_and_db, material):
+    app, db = app_and_db
+    from app.services.material_structure_service import (
+        build_material_manifest, get_material_manifest, clear_local_material_structures,
+        invalidate_material_structure,
+    )
+    with app.app_context():
+        admin_id = material['admin_id']
+        from app.models.user import User
+        big_id, _, _ = _build_material(db, User.query.get(admin_id), sessions=4, topics=5)
+        with QueryCounter(db.engine) as small:
+            build_material_manifest(material['material_id'])
+        with QueryCounter(db.engine) as big:
+            build_material_manifest(big_id)
+
+        invalidate_material_structure(material['material_id'])
+        get_material_manifest(material['material_id'])
+        with QueryCounter(db.engine) as warm:
+            get_material_manifest(material['material_id'])
+        clear_local_material_structures()  # solo Redis (SimpleCache)
+        with QueryCounter(db.engine) as shared:
+            get_material_manifest(material['material_id'])
+    assert len(small.statements) == len(big.statements) == 10
+    assert warm.statements == [] and shared.statements == []
+
+
+def test_candidate_routes_read_manifest(app_and_db, material):
+    app, db = app_and_db
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {material['candidate_token']}"}
+    base = f"/api/study-contents/{material['material_id']}"
+    session_url = f"{base}/sessions/{material['session_id']}"
+    topic_url = f"{session_url}/topics/{material['topic_id']}"
+    with app.app_context():
+        legacy = _legacy_sessions(material['material_id'])
+
+    full = client.get(base, headers=headers)
+    assert full.status_code == 200 and full.get_json()['sessions'] == legacy
+    assert client.get(f'{base}/sessions', headers=headers).get_json() == legacy
+    assert client.get(session_url, headers=headers).get_json() == legacy[0]
+    assert client.get(f'{session_url}/topics', headers=headers).get_json() == legacy[0]['topics']
+    assert client.get(topic_url, headers=headers).get_json() == legacy[0]['topics'][0]
+    interactive = client.get(f'{topic_url}/interactive', headers=headers).get_json()
+    assert interactive['interactive_exercise'] == legacy[0]['topics'][0]['interactive_exercise']
+
+    with app.app_context():
+        with QueryCounter(db.engine) as counter:
+            assert client.get(topic_url, headers=headers).status_code == 200
+    assert not [s for s in counter.statements if 'study_' in s]
+
+    assert client.get(f'{session_url}/topics/999999', headers=headers).status_code == 404
+    assert client.get(f'{base}/sessions/999999', headers=headers).status_code == 404
+    assert client.get('/api/study-contents/999999/sessions', headers=headers).status_code == 404
+
+
+def test_edits_invalidate_manifest(app_and_db, material):
+    app, db = app_and_db
+    client = app.test_client()
+    candidate = {'Authorization': f"Bearer {material['candidate_token']}"}
+    admin = {'Authorization': f"Bearer {material['admin_token']}"}
+    topic_url = (f"/api/study-contents/{material['material_id']}/sessions/{material['session_id']}"
+                 f"/topics/{material['topic_id']}")
+
+    assert client.get(topic_url, headers=candidate).get_json()['reading']['title'] == 'Lectura 1.2'
+    updated = client.put(f'{topic_url}/reading', json={'title': 'Lectura editada'}, headers=admin)
+    assert updated.status_code == 200
+    assert client.get(topic_url, headers=candidate).get_json()['reading']['title'] == 'Lectura editada'
+
+    detached = client.post(f"/api/scorm/topics/{material['topic_id']}/detach", headers=admin)
+    assert detached.status_code == 200 and detached.get_json()['detached']
+    topic = client.get(topic_url, headers=candidate).get_json()
+    assert topic['has_scorm'] is False and topic['scorm_package'] is None
+
+
+def test_scorm_export_reads_manifest(app_and_db, material):
+    app, db = app_and_db
+    from app.models.study_content import StudyMaterial
+    from app.services.material_structure_service import get_material_manifest
+    from app.services.study_export_service import build_scorm_zip
+    with app.app_context():
+        mat = StudyMaterial.query.get(material['material_id'])
+        get_material_manifest(mat.id)
+        with QueryCounter(db.engine) as counter:
+            buf, file_count = build_scorm_zip(mat)
+    assert counter.statements == []
+
+    with zipfile.ZipFile(io.BytesIO(buf.getvalue())) as zf:
+        names = zf.namelist()
+        topics = [n for n in names if n.startswith('sesion_')]
+        assert len(topics) == 6 and file_count == len(names)
+        manifest_xml = zf.read('imsmanifest.xml').decode()
+        html = ''.join(zf.read(n).decode() for n in topics)
+    assert f"ITEM-T-{material['topic_id']}" in manifest_xml
+    assert 'Acción 1' in html and 'Paso 2' in html
+    assert 'azurefd.net/videos/intro.mp4' in html
@@ -0,0 +1,226 @@
+"""
+Tests del progreso por material set-based (material_structure_service,
+GET /api/study-contents/progress/material/<id>):
+  - El árbol coincide con el cálculo anterior (4 COUNT + 2 queries de
+    progreso por tema), incluyendo scores de interactivos no aprobados.
+  - Con la estructura en cache cada vista es una sola query de progreso;
+    en frío se construye el manifiesto (una query por tabla) sin importar
+    cuántos temas tenga el material.
+  - Las ediciones de contenido invalidan la estructura cacheada.
+
+USO:
+  cd backend && python -m pytest tests/test_material_progress.py -v
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-material-progress'
+    try:
+        from app import create_app, db as flask_db, cache
+        from flask_caching.backends import SimpleCache
+        app = create_app('testing')
+        # Backend en memoria en lugar de Redis (no disponible en CI)
+        app.extensions['cache'][cache] = SimpleCache()
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _user(db, role):
+    from app.models.user import User
+    suffix = uuid.uuid4().hex[:8]
+    user = User(id=str(uuid.uuid4()), email=f'{role}_{suffix}@evaluaasi.com', username=f'{role}_{suffix}',
+                name='Usuario', first_surname='Material', role=role)
+    user.set_password('test1234')
+    db.session.add(user)
+    return user
+
+
+@pytest.fixture(scope='module')
+def material(app_and_db):
+    """Material con 3 sesiones (una vacía) x 4 temas y contenidos variados,
+    más progreso del candidato en este y en otro material."""
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models.study_content import (
+        StudyMaterial, StudySession, StudyTopic, StudyReading, StudyVideo,
+        StudyDownloadableExercise, StudyInteractiveExercise,
+    )
+    from app.models.student_progress import StudentContentProgress
+    with app.app_context():
+        admin, candidate = _user(db, 'admin'), _user(db, 'candidato')
+        db.session.flush()
+        materials = [StudyMaterial(title=f'Material progreso {m}', created_by=admin.id) for m in range(2)]
+        db.session.add_all(materials)
+        db.session.flush()
+        topics = []
+        for m, mat in enumerate(materials):
+            for s in range(3 if m == 0 else 1):
+                session = StudySession(material_id=mat.id, session_number=3 - s, title=f'Sesión {s}')
+                db.session.add(session)
+                db.session.flush()
+                if s == 2:
+                    continue  # sesión sin temas
+                for t in range(4):
+                    topic = StudyTopic(session_id=session.id, title=f'Tema {s}.{t}', order=4 - t)
+                    db.session.add(topic)
+                    db.session.flush()
+                    topics.append((m, topic))
+                    if t != 3:
+                        db.session.add(StudyReading(topic_id=topic.id, title='Lectura'))
+                    if t % 2 == 0:
+                        db.session.add(StudyVideo(topic_id=topic.id, title='Video', video_url='https://v'))
+                    if t == 1:
+                        db.session.add(StudyDownloadableExercise(topic_id=topic.id, title='Desc', file_url='https://f'))
+                    if t != 2:
+                        db.session.add(StudyInteractiveExercise(id=str(uuid.uuid4()), topic_id=topic.id,
+                                                                title='Inter', created_by=admin.id))
+        db.session.flush()
+
+        for i, (m, topic) in enumerate(topics):
+            db.session.refresh(topic)
+            if topic.reading and i % 2 == 0:
+                db.session.add(StudentContentProgress(user_id=candidate.id, content_type='reading',
+                                                      content_id=str(topic.reading.id), topic_id=topic.id,
+                                                      is_completed=True))
+            if topic.video and i % 3 == 0:
+                db.session.add(StudentContentProgress(user_id=candidate.id, content_type='video',
+                                                      content_id=str(topic.video.id), topic_id=topic.id,
+                                                      is_completed=False))
+            if topic.interactive_exercise:
+                done = i % 3 == 1
+                db.session.add(StudentContentProgress(user_id=candidate.id, content_type='interactive',
+                                                      content_id=topic.interactive_exercise.id, topic_id=topic.id,
+                                                      is_completed=done, score=90.0 if done else 40.0 + i))
+        db.session.commit()
+        return {
+            'material_id': materials[0].id,
+            'session_id': topics[0][1].session_id,
+            'candidate_id': candidate.id,
+            'candidate_token': create_access_token(identity=candidate.id),
+            'admin_token': create_access_token(identity=admin.id),
+        }
+
+
+def _legacy_progress(material_id, user_id):
+    """Cálculo anterior: 4 COUNT + 2 queries de progreso por tema."""
+    from app.models.study_content import (
+        StudyMaterial, StudyReading, StudyVideo, StudyDownloadableExercise, StudyInteractiveExercise,
+    )
+    from app.models.student_progress import StudentContentProgress
+    material = StudyMaterial.query.get(material_id)
+    sessions, total, completed = [], 0, 0
+    for session in material.sessions.all():
+        topics = []
+        for topic in session.topics.all():
+            topic_total = sum(model.query.filter_by(topic_id=topic.id).count() for model in (
+                StudyReading, StudyVideo, StudyDownloadableExercise, StudyInteractiveExercise))
+            done = {'reading': [], 'video': [], 'downloadable': [], 'interactive': []}
+            scores = {}
+            for cp in StudentContentProgress.query.filter_by(user_id=user_id, topic_id=topic.id, is_completed=True):
+                done[cp.content_type].append(cp.content_id)
+                if cp.content_type == 'interactive' and cp.score is not None:
+                    scores[cp.content_id] = cp.score
+            for cp in StudentContentProgress.query.filter_by(
+                    user_id=user_id, topic_id=topic.id, content_type='interactive', is_completed=False
+            ).filter(StudentContentProgress.score.isnot(None)):
+                scores.setdefault(cp.content_id, cp.score)
+            count = sum(len(v) for v in done.values())
+            total += topic_total
+            completed += count
+            topics.append({'topic_id': topic.id, 'total': topic_total, 'completed': count,
+                           'done': done, 'scores': scores})
+        sessions.append({'session_id': session.id, 'topics': topics})
+    return {'total': total, 'completed': completed, 'sessions': sessions}
+
+
+def _shape(payload):
+    return {
+        'total': payload['total_contents'],
+        'completed': payload['completed_contents'],
+        'sessions': [{
+            'session_id': s['session_id'],
+            'topics': [{
+                'topic_id': t['topic_id'], 'total': t['progress']['total_contents'],
+                'completed': t['progress']['completed_contents'],
+                'done': t['completed_contents'], 'scores': t['interactive_scores'],
+            } for t in s['topics']],
+        } for s in payload['sessions']],
+    }
+
+
+def test_matches_legacy_tree(app_and_db, material):
+    app, db = app_and_db
+    from app.services.material_structure_service import build_material_progress, clear_local_material_structures
+    with app.app_context():
+        clear_local_material_structures()
+        payload = build_material_progress(material['material_id'], material['candidate_id'])
+        legacy = _legacy_progress(material['material_id'], material['candidate_id'])
+    assert _shape(payload) == legacy
+    assert [len(s['topics']) for s in payload['sessions']] == [0, 4, 4]  # session_number asc
+    assert payload['all_completed_contents']['reading']
+    assert any(score < 80 for score in payload['interactive_scores'].values())
+    assert payload['progress_percentage'] == payload['completed_contents'] / payload['total_contents'] * 100
+
+
+def test_cached_structure_means_one_query_per_view(app_and_db, material):
+    app, db = app_and_db
+    from app.services.material_structure_service import (
+        build_material_progress, clear_local_material_structures, invalidate_material_structure,
+    )
+    with app.app_context():
+        invalidate_material_structure(material['material_id'])
+        with QueryCounter(db.engine) as cold:
+            build_material_progress(material['material_id'], material['candidate_id'])
+        with QueryCounter(db.engine) as warm:
+            build_material_progress(material['material_id'], material['candidate_id'])
+        clear_local_material_structures()  # solo Redis (SimpleCache)
+        with QueryCounter(db.engine) as shared:
+            build_material_progress(material['material_id'], material['candidate_id'])
+    assert len(cold.statements) == 11  # 10 del manifiesto + 1 de progreso
+    assert len(warm.statements) == 1 and 'student_content_progress' in warm.statements[0]
+    assert len(shared.statements) == 1
+
+
+def test_endpoint_and_invalidation_on_edit(app_and_db, material):
+    app, db = app_and_db
+    client = app.test_client()
+    url = f"/api/study-contents/progress/material/{material['material_id']}"
+    candidate = {'Authorization': f"Bearer {material['candidate_token']}"}
+    admin = {'Authorization': f"Bearer {material['admin_token']}"}
+
+    before = client.get(url, headers=candidate)
+    assert before.status_code == 200
+    total = before.get_json()['total_contents']
+
+    created = client.post(
+        f"/api/study-contents/{material['material_id']}/sessions/{material['session_id']}/topics",
+        json={'title': 'Tema nuevo'}, headers=admin)
+    assert created.status_code == 201
+    topic_id = created.get_json()['topic']['id']
+    reading = client.post(
+        f"/api/study-contents/{material['material_id']}/sessions/{material['session_id']}/topics/{topic_id}/reading",
+        json={'title': 'Lectura nueva', 'content': '<p>x</p>'}, headers=admin)
+    assert reading.status_code == 200
+
+    after = client.get(url, headers=candidate).get_json()
+    assert after['total_contents'] == total + 1
+    topics = [t['topic_id'] for s in after['sessions'] for t in s['topics']]
+    assert topic_id in topics
+    with app.app_context():
+        assert _shape(after) == _legacy_progress(material['material_id'], material['candidate_id'])
+
+    assert client.get('/api/study-contents/progress/material/999999', headers=candidate).status_code == 404
@@ -0,0 +1,243 @@
+"""
+Tests de la descarga ZIP de certificados del partner
+(GET /partners/mi-partner/certificates/download-zip) y de
+app/utils/zip_stream.py:
+  - El ZIP se arma por streaming con reportes, certificados Eduit y CONOCER
+    organizados por carpeta de candidato; las rutas repetidas se omiten y
+    los archivos que fallan no detienen la descarga.
+  - El número de queries no depende del número de candidatos.
+  - stream_zip nunca tiene más de `window` archivos en vuelo.
+
+Las descargas (urllib y blob CONOCER) se sustituyen por stand-ins en memoria.
+
+USO:
+  cd backend && python -m pytest tests/test_mi_partner_zip_stream.py -v
+"""
+import io
+import os
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-mi-partner-zip'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _user(db, role, name='Usuario', curp=None):
+    from app.models.user import User
+    suffix = uuid.uuid4().hex[:8]
+    user = User(id=str(uuid.uuid4()), email=f'{role}_{suffix}@evaluaasi.com',
+                username=f'{role}_{suffix}', name=name, first_surname=suffix, role=role,
+                curp=curp)
+    user.set_password('test1234')
+    db.session.add(user)
+    return user
+
+
+def _partner(app, db, candidates):
+    """Partner con un grupo de `candidates` candidatos aprobados."""
+    from flask_jwt_extended import create_access_token
+    from app.models import Partner, Campus, CandidateGroup, GroupMember
+    from app.models.exam import Exam
+    from app.models.result import Result
+    from app.models.conocer_certificate import ConocerCertificate
+    with app.app_context():
+        admin = _user(db, 'admin')
+        coord = _user(db, 'coordinator')
+        db.session.flush()
+        partner = Partner(name='Partner Stream', coordinator_id=coord.id)
+        db.session.add(partner)
+        db.session.flush()
+        campus = Campus(partner_id=partner.id, name='Plantel Stream', code=f'ZS{uuid.uuid4().hex[:6]}',
+                        coordinator_id=coord.id)
+        db.session.add(campus)
+        db.session.flush()
+        group = CandidateGroup(campus_id=campus.id, coordinator_id=coord.id, name='Grupo Stream')
+        exam = Exam(name='Examen Stream', version='EC0001', stage_id=1, created_by=admin.id, is_published=True)
+        db.session.add_all([group, exam])
+        db.session.flush()
+        tag = uuid.uuid4().hex[:6].upper()
+        folders = []
+        for i in range(candidates):
+            curp = f'CURP{uuid.uuid4().hex[:14].upper()}'
+            user = _user(db, 'candidato', name=f'Nombre{i}', curp=curp)
+            db.session.flush()
+            db.session.add(GroupMember(group_id=group.id, user_id=user.id))
+            result = Result(id=str(uuid.uuid4()), user_id=user.id, exam_id=exam.id, group_id=group.id,
+                            score=90, status=1, result=1, certificate_code=f'RC{tag}{i:04d}',
+                            eduit_certificate_code=f'EC{tag}{i:04d}')
+            result.report_url = f'https://blob.example/{tag}/report_{i}.pdf'
+            result.certificate_url = f'https://blob.example/{tag}/eduit_{i}.pdf'
+            db.session.add(result)
+            db.session.add(ConocerCertificate(
+                user_id=user.id, certificate_number=f'CN{uuid.uuid4().hex[:10]}', curp=curp,
+                standard_code='EC0217', standard_name='Estándar', issue_date=date(2026, 1, 1),
+                blob_name=f'conocer/{user.id}.pdf'))
+            folders.append(f'Nombre{i} {user.first_surname}_{curp}')
+        db.session.commit()
+        return {
+            'partner_id': partner.id,
+            'tag': tag,
+            'folders': folders,
+            'headers': {'Authorization': f'Bearer {create_access_token(identity=admin.id)}'},
+        }
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self):
+        return self._data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture()
+def downloads(monkeypatch):
+    """urlopen y blob CONOCER en memoria; URLs en `fail` fallan."""
+    import urllib.request
+    from app.services import conocer_blob_service
+    state = {'urls': [], 'blobs': [], 'fail': set()}
+    lock = threading.Lock()
+
+    def fake_urlopen(req, timeout=None):
+        url = req.full_url
+        with lock:
+            state['urls'].append(url)
+        if url in state['fail']:
+            raise OSError('conexión rechazada')
+        return _FakeResponse(f'%PDF {url}'.encode())
+
+    class FakeBlobService:
+        def download_certificate(self, blob_name):
+            with lock:
+                state['blobs'].append(blob_name)
+            return f'%PDF {blob_name}'.encode(), {}
+
+    monkeypatch.setattr(urllib.request, 'urlopen', fake_urlopen)
+    monkeypatch.setattr(conocer_blob_service, 'get_conocer_blob_service', lambda: FakeBlobService())
+    return state
+
+
+def _download(app, data, **params):
+    client = app.test_client()
+    query = '&'.join(f'{k}={v}' for k, v in {'partner_id': data['partner_id'], **params}.items())
+    return client.get(f'/api/partners/mi-partner/certificates/download-zip?{query}',
+                      headers=data['headers'])
+
+
+def test_zip_contains_all_certificate_types(app_and_db, downloads):
+    app, db = app_and_db
+    data = _partner(app, db, 3)
+    resp = _download(app, data)
+    assert resp.status_code == 200, resp.data[:200]
+    assert resp.mimetype == 'application/zip'
+    assert 'attachment; filename="Certificados_Partner Stream_' in resp.headers['Content-Disposition']
+    tag = data['tag']
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert zf.testzip() is None
+        names = set(zf.namelist())
+        for i, folder in enumerate(data['folders']):
+            assert f'{folder}/Reporte_Evaluacion_RC{tag}{i:04d}.pdf' in names
+            assert f'{folder}/Certificado_Eduit_EC{tag}{i:04d}.pdf' in names
+            assert zf.read(f'{folder}/Reporte_Evaluacion_RC{tag}{i:04d}.pdf') == \
+                f'%PDF https://blob.example/{tag}/report_{i}.pdf'.encode()
+        assert sum(n.split('/')[1].startswith('CONOCER_EC0217_') for n in names) == 3
+        assert len(names) == 9
+    assert len(downloads['blobs']) == 3
+
+
+def test_failed_files_are_skipped(app_and_db, downloads):
+    app, db = app_and_db
+    data = _partner(app, db, 2)
+    failing = f"https://blob.example/{data['tag']}/eduit_1.pdf"
+    downloads['fail'].add(failing)
+    resp = _download(app, data, cert_type='certificado_eduit')
+    assert resp.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert zf.namelist() == [f"{data['folders'][0]}/Certificado_Eduit_EC{data['tag']}0000.pdf"]
+    # La descarga fallida se reintentó una vez
+    assert downloads['urls'].count(failing) == 2
+
+
+def test_query_count_does_not_grow_with_candidates(app_and_db, downloads):
+    app, db = app_and_db
+    small = _partner(app, db, 2)
+    large = _partner(app, db, 12)
+    counts = []
+    for data in (small, large):
+        with QueryCounter(db.engine) as counter:
+            resp = _download(app, data)
+            assert resp.status_code == 200
+            resp.get_data()
+        counts.append(len(counter.statements))
+    assert counts[0] == counts[1]
+
+
+def test_search_and_empty_filters(app_and_db, downloads):
+    app, db = app_and_db
+    data = _partner(app, db, 3)
+    resp = _download(app, data, search='Nombre1', cert_type='reporte_evaluacion')
+    assert resp.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert zf.namelist() == [f"{data['folders'][1]}/Reporte_Evaluacion_RC{data['tag']}0001.pdf"]
+    resp = _download(app, data, search='NoExiste')
+    assert resp.status_code == 404
+
+
+def test_stream_zip_bounds_inflight_and_skips_duplicates():
+    from app.utils.zip_stream import stream_zip
+    lock = threading.Lock()
+    state = {'active': 0, 'peak': 0, 'calls': 0}
+
+    def fetch(source):
+        with lock:
+            state['active'] += 1
+            state['calls'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        time.sleep(0.01)
+        with lock:
+            state['active'] -= 1
+        return source.encode()
+
+    entries = [(f'c{i % 20}/f.pdf', f'data{i}') for i in range(30)]
+    finished = []
+    stream = stream_zip(entries, fetch, on_finish=lambda w, e: finished.append((w, e)),
+                        workers=3, window=4)
+    chunks = [next(stream)]
+    # Mientras el cliente no consume, no se piden más de `window` archivos
+    time.sleep(0.1)
+    assert state['calls'] <= 4
+    chunks.extend(stream)
+    assert state['calls'] == 20
+    assert state['peak'] <= 3
+    assert finished == [(20, [])]
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert len(zf.namelist()) == 20
+        assert zf.read('c5/f.pdf') == b'data5'
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
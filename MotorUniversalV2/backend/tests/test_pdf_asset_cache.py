@@ -0,0 +1,210 @@
+"""
+Tests del cache de insumos para PDFs (app/utils/pdf_asset_cache.py) y su
+uso en app/utils/pdf_generator.py:
+  - Un lote de certificados del mismo ECM descarga y parsea la plantilla una
+    sola vez y consulta certificate_templates una sola vez.
+  - Editar la plantilla (PUT) invalida la config cacheada; la vista previa
+    reutiliza la plantilla ya parseada.
+  - El logo del reporte se decodifica una vez; un logo remoto que falla no
+    se vuelve a pedir en cada certificado.
+  - El LRU respeta el límite de entradas y la página cacheada se puede usar
+    desde varios threads.
+
+USO:
+  cd backend && python -m pytest tests/test_pdf_asset_cache.py -v
+"""
+import io
+import os
+import sys
+import threading
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'app', 'static', 'plantilla.pdf')
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-pdf-asset-cache'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+@pytest.fixture(scope='module')
+def template_data(app_and_db):
+    """Admin, ECM con plantilla personalizada y los bytes de la plantilla."""
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    from app.models.competency_standard import CompetencyStandard
+    from app.models.certificate_template import CertificateTemplate
+    with app.app_context():
+        admin = User(id=str(uuid.uuid4()), email=f'adm_{uuid.uuid4().hex[:6]}@evaluaasi.com',
+                     username=f'adm_{uuid.uuid4().hex[:6]}', name='Admin', first_surname='Cache',
+                     role='admin')
+        admin.set_password('test1234')
+        db.session.add(admin)
+        db.session.flush()
+        standard = CompetencyStandard(code=f'EC{uuid.uuid4().hex[:5].upper()}', name='Estándar cache',
+                                      created_by=admin.id)
+        db.session.add(standard)
+        db.session.flush()
+        template = CertificateTemplate(competency_standard_id=standard.id,
+                                       template_blob_url='https://blob.example/tpl/cache.pdf',
+                                       created_by=admin.id)
+        template.set_config(CertificateTemplate.DEFAULT_CONFIG)
+        db.session.add(template)
+        db.session.commit()
+        with open(TEMPLATE_PATH, 'rb') as fh:
+            pdf_bytes = fh.read()
+        return {
+            'standard_id': standard.id,
+            'blob_url': template.template_blob_url,
+            'pdf_bytes': pdf_bytes,
+            'headers': {'Authorization': f'Bearer {create_access_token(identity=admin.id)}'},
+        }
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    from app.utils.pdf_asset_cache import clear_pdf_asset_cache
+    clear_pdf_asset_cache()
+    yield
+    clear_pdf_asset_cache()
+
+
+@pytest.fixture()
+def downloads(monkeypatch, template_data):
+    from app.utils.azure_storage import azure_storage
+    calls = []
+
+    def fake_download(url):
+        calls.append(url)
+        return template_data['pdf_bytes']
+
+    monkeypatch.setattr(azure_storage, 'download_file', fake_download)
+    return calls
+
+
+def _candidate(i, standard_id=None):
+    result = SimpleNamespace(id=str(uuid.uuid4()), group_id=None, answers_data=None,
+                             certificate_code=None, eduit_certificate_code=f'EC{i:010d}',
+                             result=1, score=90, start_date=None)
+    exam = SimpleNamespace(id=1, name='Examen Cache', version='EC0001', passing_score=70,
+                           competency_standard_id=standard_id)
+    user = SimpleNamespace(name=f'Nombre{i}', first_surname='Apellido', second_surname=None,
+                           email=f'c{i}@evaluaasi.com')
+    return result, exam, user
+
+
+def test_batch_downloads_and_queries_template_once(app_and_db, template_data, downloads):
+    app, db = app_and_db
+    from pypdf import PdfReader
+    from app.utils.pdf_generator import generate_certificate_pdf
+    with app.app_context():
+        with QueryCounter(db.engine) as counter:
+            outputs = [generate_certificate_pdf(*_candidate(i, template_data['standard_id']))
+                       for i in range(6)]
+    assert downloads == [template_data['blob_url']]
+    assert sum('certificate_templates' in s for s in counter.statements) == 1
+    for i, buffer in enumerate(outputs):
+        text = PdfReader(buffer).pages[0].extract_text()
+        assert f'Nombre{i} Apellido' in text
+
+
+def test_template_routes_invalidate_config(app_and_db, template_data, downloads):
+    app, _ = app_and_db
+    from app.models.certificate_template import CertificateTemplate
+    from app.utils.pdf_asset_cache import get_certificate_template
+    client = app.test_client()
+    url = f"/api/competency-standards/{template_data['standard_id']}/certificate-template"
+    with app.app_context():
+        before = get_certificate_template(template_data['standard_id'])
+        assert before['config']['name_field']['maxFontSize'] == 36
+
+        config = CertificateTemplate.DEFAULT_CONFIG
+        new_config = {**config, 'name_field': {**config['name_field'], 'maxFontSize': 20}}
+        resp = client.put(url, json={'config': new_config}, headers=template_data['headers'])
+        assert resp.status_code == 200, resp.get_json()
+        after = get_certificate_template(template_data['standard_id'])
+        assert after['config']['name_field']['maxFontSize'] == 20
+        assert get_certificate_template(template_data['standard_id']) is after
+
+        # Preview reutiliza la plantilla ya parseada
+        for _ in range(2):
+            preview = client.get(f'{url}/preview', headers=template_data['headers'])
+            assert preview.status_code == 200
+            assert preview.mimetype == 'application/pdf'
+        assert downloads == [template_data['blob_url']]
+
+
+def test_remote_logo_failure_is_not_retried_per_certificate(app_and_db, monkeypatch):
+    import requests
+    from app.utils.pdf_asset_cache import get_remote_image, get_static_image
+    from app.utils.pdf_generator import STATIC_DIR
+    calls = []
+
+    def failing_get(url, timeout=None):
+        calls.append(url)
+        raise requests.ConnectionError('timeout')
+
+    monkeypatch.setattr(requests, 'get', failing_get)
+    assert get_remote_image('https://blob.example/logo.png') is None
+    assert get_remote_image('https://blob.example/logo.png') is None
+    assert calls == ['https://blob.example/logo.png']
+
+    logo = get_static_image(os.path.join(STATIC_DIR, 'logo.png'))
+    assert logo is not None
+    assert get_static_image(os.path.join(STATIC_DIR, 'logo.png')) is logo
+
+
+def test_lru_respects_entry_limit(monkeypatch):
+    from app.utils import pdf_asset_cache as cache_mod
+    monkeypatch.setattr(cache_mod, 'PDF_ASSET_CACHE_MAX_ENTRIES', 3)
+    for i in range(5):
+        cache_mod._get_or_load(('test', i), lambda i=i: (i, 10, 60))
+    assert list(cache_mod._entries) == [('test', 2), ('test', 3), ('test', 4)]
+    assert cache_mod._total_bytes == 30
+    # Un loader con ttl=0 no se guarda
+    cache_mod._get_or_load(('test', 'skip'), lambda: (None, 0, 0))
+    assert ('test', 'skip') not in cache_mod._entries
+
+
+def test_cached_template_is_thread_safe(app_and_db, template_data, downloads):
+    app, _ = app_and_db
+    from pypdf import PdfReader
+    from app.utils.pdf_generator import generate_certificate_pdf
+    with app.app_context():
+        generate_certificate_pdf(*_candidate(0, template_data['standard_id']))
+
+    outputs, errors = {}, []
+
+    def render(i):
+        try:
+            with app.app_context():
+                outputs[i] = generate_certificate_pdf(*_candidate(i, template_data['standard_id']))
+        except Exception as e:  # pragma: no cover - solo para reportar
+            errors.append(e)
+
+    threads = [threading.Thread(target=render, args=(i,)) for i in range(1, 9)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(downloads) == 1
+    for i, buffer in outputs.items():
+        assert f'Nombre{i} Apellido' in PdfReader(io.BytesIO(buffer.getvalue())).pages[0].extract_text()
@@ -0,0 +1,208 @@
+"""
+Tests + micro-benchmark del rate limiting (app/utils/rate_limit.py):
+  - Con requests concurrentes pasan exactamente `limit` (antes el
+    get + set dejaba pasar ráfagas).
+  - La ventana deslizante pondera la ventana anterior: no se puede gastar
+    el doble del límite en el cambio de ventana.
+  - Con Redis cada request es una sola llamada (script), y si Redis no
+    responde se usan contadores en proceso.
+  - Los decoradores devuelven X-RateLimit-* y Retry-After en el 429.
+  - increment_failed_login es atómico.
+  - Benchmark: costo por request del limiter.
+
+USO:
+  cd backend && python -m pytest tests/test_rate_limit.py -v -s
+"""
+import os
+import pickle
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import FakeRedis, NoRedis  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-rate-limit'
+    try:
+        from app import create_app
+        app = create_app('testing')
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+    app.config['RATE_LIMIT_ENABLED'] = True
+    from flask import jsonify
+    from app.utils.rate_limit import rate_limit, rate_limit_by_user
+
+    @app.route('/_test/rl')
+    @rate_limit(limit=3, window=60, key_prefix='rl_test')
+    def _limited():
+        return jsonify({'ok': True})
+
+    @app.route('/_test/rl-tuple')
+    @rate_limit_by_user(limit=2, window=60)
+    def _limited_tuple():
+        return jsonify({'created': True}), 201
+
+    return app
+
+
+def _sliding_window(redis, keys, args):
+    """Emulación en Python de _SLIDING_WINDOW_LUA."""
+    limit, window_ms, elapsed_ms = (int(a) for a in args)
+    current = int(redis.values.get(keys[0], b'0'))
+    previous = int(redis.values.get(keys[1], b'0'))
+    if previous * (window_ms - elapsed_ms) / window_ms + current + 1 > limit:
+        return [0, current, previous]
+    redis.values[keys[0]] = redis._b(current + 1)
+    return [1, current + 1, previous]
+
+
+def _scripted_redis():
+    redis = FakeRedis()
+    redis.on_script('PEXPIRE', _sliding_window)
+    return redis
+
+
+@pytest.fixture()
+def local_limiter(monkeypatch):
+    from app.utils import rate_limit as rl
+    limiter = rl.RateLimiter(redis_client=NoRedis())
+    monkeypatch.setattr(rl, '_limiter', limiter)
+    return limiter
+
+
+def test_concurrent_hits_never_exceed_limit():
+    from app.utils.rate_limit import RateLimiter
+    for client in (NoRedis(), _scripted_redis()):
+        limiter = RateLimiter(redis_client=client)
+        allowed = []
+        barrier = threading.Barrier(40)
+
+        def hit():
+            barrier.wait()
+            allowed.append(limiter.hit('rl:burst', limit=15, window=60).allowed)
+
+        threads = [threading.Thread(target=hit) for _ in range(40)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert allowed.count(True) == 15
+
+
+def test_sliding_window_weights_previous_window(monkeypatch):
+    from app.utils import rate_limit as rl
+    clock = {'now': 6000.0 + 59}  # segundo 59 de una ventana de 60 s
+    monkeypatch.setattr(rl.time, 'time', lambda: clock['now'])
+    limiter = rl.RateLimiter(redis_client=NoRedis())
+
+    results = [limiter.hit('rl:edge', limit=10, window=60) for _ in range(11)]
+    assert [r.allowed for r in results] == [True] * 10 + [False]
+    assert results[9].remaining == 0 and results[0].remaining == 9
+
+    clock['now'] = 6060.0 + 1  # recién cambió la ventana: la anterior pesa 59/60
+    blocked = limiter.hit('rl:edge', limit=10, window=60)
+    assert not blocked.allowed
+    assert blocked.reset == 5  # a los 6 s la anterior pesa 9/10 → cabe 1 más
+
+    clock['now'] = 6060.0 + 30  # a media ventana la anterior pesa 5
+    after = [limiter.hit('rl:edge', limit=10, window=60).allowed for _ in range(6)]
+    assert after == [True] * 5 + [False]
+
+
+def test_redis_path_is_one_call_and_falls_back(monkeypatch):
+    from app.utils import rate_limit as rl
+    redis = _scripted_redis()
+    limiter = rl.RateLimiter(redis_client=redis)
+    for _ in range(5):
+        limiter.hit('rl:one', limit=3, window=60)
+    assert redis.calls == 5 and limiter.backend == 'redis'
+    assert sorted(int(v) for v in redis.values.values()) == [3]
+
+    assert limiter.incr('failed_login:ana', 1800) == 1
+    assert limiter.incr('failed_login:ana', 1800) == 2
+    assert redis.calls == 7
+
+    limiter._redis = NoRedis()
+    limiter._script = None
+    assert limiter.hit('rl:one', limit=3, window=60).allowed
+    assert limiter.backend == 'local'
+    calls = redis.calls
+    limiter.hit('rl:one', limit=3, window=60)
+    assert redis.calls == calls  # no reintenta Redis hasta _REDIS_RETRY_SECONDS
+
+
+def test_decorators_return_rate_limit_headers(app, local_limiter):
+    client = app.test_client()
+    responses = [client.get('/_test/rl') for _ in range(4)]
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+    assert responses[0].headers['X-RateLimit-Limit'] == '3'
+    assert responses[0].headers['X-RateLimit-Remaining'] == '2'
+    assert int(responses[0].headers['X-RateLimit-Reset']) <= 60
+    blocked = responses[3]
+    assert blocked.headers['X-RateLimit-Remaining'] == '0'
+    assert blocked.headers['Retry-After'] == str(blocked.get_json()['retry_after'])
+    assert blocked.get_json()['error'] == 'Too Many Requests'
+
+    tuple_responses = [client.get('/_test/rl-tuple') for _ in range(3)]
+    assert [r.status_code for r in tuple_responses] == [201, 201, 429]
+    assert tuple_responses[1].headers['X-RateLimit-Remaining'] == '0'
+
+
+def test_failed_login_counter_is_atomic(app, local_limiter):
+    from app.utils.rate_limit import increment_failed_login, get_failed_login_count, reset_failed_login
+    with app.app_context():
+        counts = []
+        threads = [threading.Thread(target=lambda: counts.append(increment_failed_login('Ana.Ruiz')))
+                   for _ in range(30)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(counts) == list(range(1, 31))
+        assert get_failed_login_count('ana.ruiz') == 30
+        reset_failed_login('ANA.RUIZ')
+        assert get_failed_login_count('ana.ruiz') == 0
+
+
+def _bench(fn, n):
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        best = min(best, time.perf_counter() - start)
+    return best / n
+
+
+def test_benchmark_per_request_overhead():
+    from app.utils.rate_limit import RateLimiter
+    n = 5000
+
+    # Flujo anterior: get + set con pickle (dos round trips por request)
+    store = {}
+
+    def legacy(i):
+        raw = store.get('rl:legacy')
+        current = pickle.loads(raw[1:]) if raw else None
+        store['rl:legacy'] = b'!' + pickle.dumps((current or 0) + 1)
+
+    local = RateLimiter(redis_client=NoRedis())
+    redis = _scripted_redis()
+    scripted = RateLimiter(redis_client=redis)
+    timings = {
+        'legacy_get_set': _bench(legacy, n),
+        'local': _bench(lambda i: local.hit('rl:bench', limit=10 ** 9, window=60), n),
+        'redis_script': _bench(lambda i: scripted.hit('rl:bench', limit=10 ** 9, window=60), n),
+    }
+    print('\n  Costo por request (sin red, mejor de 3):')
+    for name, seconds in timings.items():
+        print(f'    {name:<16} {seconds * 1e6:8.2f} µs')
+    print(f'    round trips por request: antes 2, ahora {redis.calls / (3 * n):.0f}')
+    assert redis.calls == 3 * n
+    assert timings['local'] < 0.001
@@ -0,0 +1,344 @@
+"""
+Tests del pool de páginas Playwright para RENAPO
+(app/services/renapo_browser_pool.py) y de la validación en lote
+(renapo_service.validate_curps_batch):
+  - El pool reutiliza contextos tibios, respeta el tope de concurrencia y
+    recicla los que fallan, exceden sus usos o se cierran.
+  - validate_curps_batch resuelve primero desde curp_renapo_cache, consulta
+    cada CURP desconocida una sola vez y en paralelo, y conserva el orden.
+  - Sin sleep fijo: la pausa la dicta el circuit breaker y, con el circuito
+    abierto, las restantes no se consultan.
+  - Cada consulta de red del batch gasta un token del presupuesto global
+    (renapo_rate_budget); sin token la CURP no se consulta ni se cachea.
+  - Con Playwright instalado, una consulta completa contra una página HTML
+    local que imita gob.mx/curp reutiliza el mismo contexto.
+
+USO:
+  cd backend && python -m pytest tests/test_renapo_browser_pool.py -v
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-renapo-pool'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _curp(seq: int) -> str:
+    from app.services.renapo_service import _calcular_digito_verificador
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    base = f"LO{letters[seq // 26 % 26]}{letters[seq % 26]}8{seq % 10}0202MDFRRN0"
+    return base + str(_calcular_digito_verificador(base))
+
+
+# ---------------------------------------------------------------------------
+# Browser falso para el pool
+# ---------------------------------------------------------------------------
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def add_init_script(self, script):
+        pass
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.restarts = 0
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, user_agent=None):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+
+def _fake_pool(size=2, **kwargs):
+    from app.services.renapo_browser_pool import RenapoPagePool
+    browser = FakeBrowser()
+
+    async def factory(restart):
+        if restart:
+            browser.restarts += 1
+        return browser
+
+    return RenapoPagePool(size=size, browser_factory=factory, **kwargs), browser
+
+
+def test_pool_reuses_and_caps_concurrency():
+    from app.services.renapo_browser_pool import run_on_renapo_loop
+    pool, browser = _fake_pool(size=3)
+    state = {'active': 0, 'peak': 0}
+
+    async def use():
+        async with pool.page():
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.01)
+            state['active'] -= 1
+
+    async def run():
+        await asyncio.gather(*[use() for _ in range(20)])
+
+    run_on_renapo_loop(run(), timeout=10)
+    assert state['peak'] == 3
+    assert len(browser.contexts) == 3
+    assert pool.stats()['idle'] == 3 and pool.stats()['in_use'] == 0
+
+
+def test_pool_recycles_unhealthy_slots():
+    from app.services.renapo_browser_pool import run_on_renapo_loop
+    pool, browser = _fake_pool(size=1, max_uses=2)
+
+    async def run():
+        for _ in range(4):  # 2 usos por contexto → 2 contextos
+            async with pool.page():
+                pass
+        async with pool.page() as slot:
+            slot.page.closed = True  # página cerrada por el sitio
+        async with pool.page():
+            pass
+        with pytest.raises(RuntimeError):
+            async with pool.page():
+                raise RuntimeError('challenge no resuelto')
+        async with pool.page():
+            pass
+        await pool.reset(restart_browser=True)
+
+    run_on_renapo_loop(run(), timeout=10)
+    assert len(browser.contexts) == 5
+    assert all(c.closed for c in browser.contexts)
+    assert browser.restarts == 1
+    assert pool.stats()['idle'] == 0
+
+
+# ---------------------------------------------------------------------------
+# validate_curps_batch con un stand-in de RENAPO
+# ---------------------------------------------------------------------------
+
+@pytest.fixture()
+def standin(monkeypatch):
+    from app.services import renapo_service as rs
+    from app.services import renapo_browser_pool, renapo_rate_budget
+    pool, _ = _fake_pool(size=4)
+    monkeypatch.setattr(renapo_browser_pool, '_pool', pool)
+    monkeypatch.setattr(rs, '_recent_latencies', [])
+    monkeypatch.setattr(rs, '_consecutive_failures', 0)
+    monkeypatch.setattr(rs, '_circuit_opened_at', 0.0)
+    state = {'calls': [], 'active': 0, 'peak': 0, 'registry': {}, 'fail': False,
+             'tokens': None, 'granted': []}
+
+    class CountingBucket:
+        """Presupuesto RENAPO: ilimitado salvo que state['tokens'] lo acote."""
+        def acquire(self, max_wait=None, requested=1):
+            if state['tokens'] is not None and len(state['granted']) >= state['tokens']:
+                return False
+            state['granted'].append(requested)
+            return True
+
+    monkeypatch.setattr(renapo_rate_budget, '_bucket', CountingBucket())
+
+    async def consultar(curp):
+        async with pool.page():
+            state['calls'].append(curp)
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.05)
+            state['active'] -= 1
+        if state['fail']:
+            rs._record_renapo_failure()
+            return rs.RenapoValidationResult(curp=curp, valid=False, error='Error de conexión con RENAPO')
+        rs._record_renapo_success()
+        if curp in state['registry']:
+            return rs.RenapoValidationResult(curp=curp, valid=True, name=state['registry'][curp],
+                                             first_surname='LOPEZ')
+        return rs.RenapoValidationResult(curp=curp, valid=False, error='CURP no encontrada en RENAPO')
+
+    monkeypatch.setattr(rs, '_consultar_renapo_async', consultar)
+    return state
+
+
+def test_batch_uses_cache_first_and_runs_in_parallel(app_and_db, standin):
+    app, db = app_and_db
+    from app.models.curp_verification import CurpRenapoCache
+    from app.services.renapo_service import validate_curps_batch
+    unknown = [_curp(i) for i in range(12)]
+    cached = _curp(50)
+    standin['registry'][unknown[0]] = 'MARIA'
+    with app.app_context():
+        db.session.add(CurpRenapoCache(curp=cached, valid=True, payload_json='{"name": "ROSA"}',
+                                       expires_at=CurpRenapoCache.calc_expiry(True)))
+        db.session.commit()
+
+        curps = [cached, 'xexx010101hnexxxa4', 'NO-ES-CURP', ''] + unknown + [unknown[0].lower()]
+        progress = []
+        start = time.monotonic()
+        results = validate_curps_batch(curps, progress_callback=lambda d, t, r: progress.append((d, t)))
+        elapsed = time.monotonic() - start
+
+        assert [r.curp for r in results[4:-1]] == unknown
+        assert results[0].valid and results[0].name == 'ROSA'
+        assert results[1].valid and not results[2].valid and results[3].error == 'CURP vacía'
+        assert results[4].valid and results[-1].valid and results[-1].name == 'MARIA'
+        assert sorted(standin['calls']) == sorted(unknown)
+        assert len(standin['granted']) == len(unknown)  # un token por consulta de red
+        assert standin['peak'] == 4
+        # 12 consultas de 50 ms con 4 en paralelo, no 12 × (50 ms + 2 s)
+        assert elapsed < 0.5
+        assert progress[-1] == (len(curps), len(curps)) and len(progress) == len(curps)
+        # Los resultados nuevos quedan en cache
+        assert CurpRenapoCache.query.filter(CurpRenapoCache.curp.in_(unknown)).count() == 12
+
+
+def test_batch_pacing_follows_circuit_breaker(app_and_db, standin, monkeypatch):
+    app, _ = app_and_db
+    from app.services import renapo_service as rs
+    from app.services.renapo_service import validate_curps_batch
+    delays = []
+
+    def fake_delay(attempt):
+        delays.append(attempt)
+        return 0.01
+
+    monkeypatch.setattr(rs, '_calc_retry_delay', fake_delay)
+    monkeypatch.setattr(rs, '_CIRCUIT_THRESHOLD', 6)
+    standin['fail'] = True
+    curps = [_curp(100 + i) for i in range(10)]
+    with app.app_context():
+        results = validate_curps_batch(curps)
+    # Tras 6 fallos el circuito se abre y el resto no se consulta
+    assert len(standin['calls']) < len(curps)
+    assert sum('temporalmente no disponible' in (r.error or '') for r in results) >= len(curps) - len(standin['calls'])
+    assert delays  # hubo pausa por los fallos, no por un sleep fijo
+
+
+def test_batch_spends_global_budget(app_and_db, standin):
+    app, db = app_and_db
+    from app.models.curp_verification import CurpRenapoCache
+    from app.services.renapo_service import validate_curps_batch
+    curps = [_curp(150 + i) for i in range(5)]
+    standin['tokens'] = 3
+    with app.app_context():
+        results = validate_curps_batch(curps + curps[:2])
+        assert len(standin['granted']) == 3 and len(standin['calls']) == 3
+        denied = [r for r in results if 'Presupuesto' in (r.error or '')]
+        assert len(denied) == 2
+        # Sin token no hubo respuesta de RENAPO: no se cachea
+        assert CurpRenapoCache.query.filter(CurpRenapoCache.curp.in_(curps)).count() == 3
+
+
+# ---------------------------------------------------------------------------
+# Playwright real contra una página HTML local
+# ---------------------------------------------------------------------------
+
+_STANDIN_HTML = """<!doctype html>
+<html><head><title>Consulta CURP (local)</title></head><body>
+<label for="curp">Clave Única de Registro de Población (CURP)</label>
+<input id="curp" type="text">
+<button id="buscar" type="button"> Buscar</button>
+<script>
+document.getElementById('buscar').addEventListener('click', async () => {
+  const curp = document.getElementById('curp').value;
+  const resp = await fetch('/v1/renapoCURP/consulta', {
+    method: 'POST', headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({curp: curp})
+  });
+  document.body.insertAdjacentHTML('beforeend', '<pre>' + (await resp.text()) + '</pre>');
+});
+</script></body></html>"""
+
+
+class _StandinHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = _STANDIN_HTML.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        curp = json.loads(self.rfile.read(length) or b'{}').get('curp', '')
+        body = json.dumps({'codigo': '01', 'mensaje': 'OK', 'registros': [{
+            'curp': curp, 'nombres': 'ANA', 'primerApellido': 'PEREZ',
+            'segundoApellido': 'LOPEZ', 'sexo': 'MUJER',
+        }]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_playwright_against_local_standin(app_and_db, monkeypatch):
+    pytest.importorskip('playwright.async_api')
+    app, _ = app_and_db
+    from app.services import renapo_service as rs
+    from app.services import renapo_browser_pool
+    from app.services.renapo_browser_pool import RenapoPagePool, run_on_renapo_loop
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandinHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    pool = RenapoPagePool(size=1)
+    monkeypatch.setattr(renapo_browser_pool, '_pool', pool)
+    monkeypatch.setattr(rs, 'RENAPO_URL', f'{base}/curp/')
+    monkeypatch.setattr(rs, 'RENAPO_API_URL', f'{base}/v1/renapoCURP/consulta')
+    monkeypatch.setattr(rs, '_consecutive_failures', 0)
+    try:
+        try:
+            run_on_renapo_loop(rs._ensure_browser(), timeout=60)
+        except Exception as e:
+            pytest.skip(f'Chromium no disponible: {e}')
+        with app.app_context():
+            first = rs.validate_curp_renapo(_curp(200), use_cache=False)
+            second = rs.validate_curp_renapo(_curp(201), use_cache=False)
+        assert first.valid and first.name == 'ANA' and first.gender == 'F'
+        assert second.valid
+        assert pool.created == 1
+    finally:
+        run_on_renapo_loop(pool.close(), timeout=30)
+        run_on_renapo_loop(rs._close_browser(), timeout=30)
+        server.shutdown()
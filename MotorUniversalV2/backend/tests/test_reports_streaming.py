@@ -0,0 +1,272 @@
+"""
+Tests del motor de reportes por lotes (partners: _reports_scope,
+_iter_report_rows, _count_report_rows, /reports y /reports/export):
+  - El COUNT en SQL coincide con las filas generadas en todas las
+    combinaciones de categorías y filtros (incluye deduplicación).
+  - Paginación keyset: concatenar páginas por `next_cursor` (con lotes de
+    usuarios más chicos que una página) = reporte completo; `page` sigue
+    funcionando.
+  - Export CSV/XLSX en streaming con las mismas filas; el XLSX temporal se
+    borra al cerrar la respuesta o si falla antes de enviarla.
+
+USO:
+  cd backend && python -m pytest tests/test_reports_streaming.py -v
+"""
+import sys
+import os
+import csv
+import io
+import uuid
+from datetime import datetime, date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-reports-streaming'
+    try:
+        from app import create_app, db as flask_db
+        app = create_app('testing')
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+def _user(db, role, **kwargs):
+    from app.models.user import User
+    suffix = uuid.uuid4().hex[:8]
+    user = User(
+        id=str(uuid.uuid4()),
+        email=f'{role}_{suffix}@evaluaasi.com',
+        username=f'{role}_{suffix}',
+        name=kwargs.pop('name', 'Usuario'),
+        first_surname=kwargs.pop('first_surname', 'Prueba'),
+        role=role,
+        **kwargs,
+    )
+    user.set_password('test1234')
+    db.session.add(user)
+    return user
+
+
+@pytest.fixture(scope='module')
+def report_data(app_and_db):
+    """Partner con 2 planteles, 3 grupos, 23 candidatos (apellidos repetidos),
+    membresías múltiples, asignaciones ECM duplicadas y varios intentos."""
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models import Partner, Campus, CandidateGroup, GroupMember, SchoolCycle
+    from app.models.brand import Brand
+    from app.models.competency_standard import CompetencyStandard
+    from app.models.exam import Exam
+    from app.models.partner import EcmCandidateAssignment
+    from app.models.result import Result
+    with app.app_context():
+        admin = _user(db, 'admin')
+        db.session.flush()
+        partner = Partner(name='Partner Reportes')
+        db.session.add(partner)
+        db.session.flush()
+        campuses = []
+        for i in range(2):
+            campus = Campus(partner_id=partner.id, name=f'Plantel {i}', code=f'RPT{uuid.uuid4().hex[:6]}',
+                            state_name='Jalisco', city='Guadalajara', certification_cost=100 + i)
+            db.session.add(campus)
+            db.session.flush()
+            campuses.append(campus)
+        cycle = SchoolCycle(campus_id=campuses[0].id, name='2026', cycle_type='annual',
+                            start_date=date(2026, 1, 1), end_date=date(2026, 12, 31))
+        db.session.add(cycle)
+        db.session.flush()
+        groups = [
+            CandidateGroup(campus_id=campuses[0].id, name='G-A', school_cycle_id=cycle.id),
+            CandidateGroup(campus_id=campuses[0].id, name='G-B'),
+            CandidateGroup(campus_id=campuses[1].id, name='G-C'),
+        ]
+        db.session.add_all(groups)
+        db.session.flush()
+
+        brand = Brand(name=f'Marca {uuid.uuid4().hex[:4]}')
+        db.session.add(brand)
+        db.session.flush()
+        standards = [
+            CompetencyStandard(code=f'EC{uuid.uuid4().hex[:5]}', name=f'Estándar {i}',
+                               brand_id=brand.id if i == 0 else None, created_by=admin.id)
+            for i in range(2)
+        ]
+        db.session.add_all(standards)
+        db.session.flush()
+        exams = [Exam(name=f'Examen {i}', version='1.0', stage_id=1, created_by=admin.id,
+                      competency_standard_id=standards[i].id) for i in range(2)]
+        db.session.add_all(exams)
+        db.session.flush()
+
+        surnames = ['Álvarez', 'López', 'López', 'Zúñiga', 'Martínez']
+        base_time = datetime(2026, 3, 1, 10, 0, 0)
+        n = 0
+        for i in range(23):
+            cand = _user(db, 'candidato', name=f'Nombre{i % 4}', first_surname=surnames[i % len(surnames)],
+                         campus_id=campuses[i % 2].id)
+            db.session.flush()
+            member_groups = [groups[i % 3]] + ([groups[(i + 1) % 3]] if i % 4 == 0 else [])
+            for grp in member_groups:
+                db.session.add(GroupMember(group_id=grp.id, user_id=cand.id,
+                                           status='active' if i % 5 else 'inactive'))
+                if i % 3 == 2:
+                    continue  # sin asignación ECM en este grupo
+                for k in range(1 + (i % 2)):  # algunos con asignación repetida
+                    n += 1
+                    db.session.add(EcmCandidateAssignment(
+                        assignment_number=f'A{n:013d}', user_id=cand.id,
+                        competency_standard_id=standards[k].id, exam_id=exams[k].id,
+                        group_id=grp.id, assignment_source='bulk'))
+            for attempt in range(i % 4):
+                exam = exams[attempt % 2]
+                db.session.add(Result(
+                    id=str(uuid.uuid4()), user_id=cand.id, exam_id=exam.id,
+                    score=55 + attempt * 20, status=1, result=1 if attempt >= 1 else 0,
+                    mode='simulator' if attempt == 2 else 'exam',
+                    start_date=base_time + timedelta(days=attempt),
+                    end_date=base_time + timedelta(days=attempt, hours=1)))
+        db.session.commit()
+        return {
+            'token': create_access_token(identity=admin.id),
+            'admin_id': admin.id,
+            'standard_id': standards[0].id,
+            'brand_id': brand.id,
+            'group_id': groups[0].id,
+        }
+
+
+PARAM_SETS = [
+    {},
+    {'categories': 'usuario,organizacion'},
+    {'categories': 'usuario,organizacion,estandar'},
+    {'categories': 'estandar,certificacion'},
+    {'categories': 'resultado'},
+    {'categories': 'resultado,certificacion'},
+    {'categories': 'resultado', 'result': 'approved'},
+    {'categories': 'resultado', 'result': 'rejected'},
+    {'categories': 'resultado', 'result_mode': 'exam'},
+    {'categories': 'resultado', 'result_mode': 'simulator'},
+    {'categories': 'estandar', 'standard_id': 'STD'},
+    {'categories': 'resultado', 'brand_id': 'BRAND'},
+    {'categories': 'organizacion', 'group_id': 'GROUP', 'search': 'López'},
+    {'categories': 'usuario', 'is_active': '1', 'role': 'candidato'},
+]
+
+
+def _params(data, raw):
+    from werkzeug.datastructures import MultiDict
+    mapping = {'STD': data['standard_id'], 'BRAND': data['brand_id'], 'GROUP': data['group_id']}
+    return MultiDict({k: str(mapping.get(v, v)) for k, v in raw.items()})
+
+
+@pytest.mark.parametrize('raw', PARAM_SETS)
+def test_sql_count_matches_generated_rows(app_and_db, report_data, raw):
+    app, _ = app_and_db
+    from app.models.user import User
+    from app.routes.partners import _reports_scope, _iter_report_rows, _count_report_rows
+    with app.app_context():
+        admin = User.query.get(report_data['admin_id'])
+        ctx = _reports_scope(admin, _params(report_data, raw))
+        rows = [row for _k, _i, row in _iter_report_rows(ctx)]
+        assert _count_report_rows(ctx) == len(rows)
+        assert rows, raw
+
+
+def test_deduplication_rules(app_and_db, report_data):
+    app, _ = app_and_db
+    from app.models.user import User
+    from app.routes.partners import _reports_scope, _iter_report_rows
+    with app.app_context():
+        admin = User.query.get(report_data['admin_id'])
+        ctx = _reports_scope(admin, _params(report_data, {'categories': 'resultado'}))
+        rows = [row for _k, _i, row in _iter_report_rows(ctx)]
+    evaluated = [(r['user_id'], r['result_date'], r['exam_name']) for r in rows if r['result'] != 'Sin evaluar']
+    assert len(evaluated) == len(set(evaluated))
+    pending = [(r['user_id'], r['exam_name'], r['standard_code']) for r in rows
+               if r['result'] == 'Sin evaluar' and r['standard_code']]
+    assert len(pending) == len(set(pending))
+
+
+def test_keyset_pages_cover_full_report(app_and_db, report_data, monkeypatch):
+    app, _ = app_and_db
+    from app.routes import partners
+    monkeypatch.setattr(partners, '_REPORT_CHUNK_USERS', 4)
+    headers = {'Authorization': f"Bearer {report_data['token']}"}
+    query = 'categories=resultado,certificacion'
+    with app.test_client() as client:
+        full = client.get(f'/api/partners/reports?{query}&per_page=200', headers=headers).get_json()
+        assert full['total'] == len(full['rows']) and full['next_cursor'] is None
+
+        collected, cursor, pages = [], None, 0
+        while True:
+            url = f'/api/partners/reports?{query}&per_page=7' + (f'&cursor={cursor}' if cursor else '')
+            body = client.get(url, headers=headers).get_json()
+            assert body['total'] == full['total']
+            collected.extend(body['rows'])
+            pages += 1
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        assert collected == full['rows']
+        assert pages == body['pages']
+
+        page3 = client.get(f'/api/partners/reports?{query}&per_page=7&page=3', headers=headers).get_json()
+        assert page3['rows'] == full['rows'][14:21]
+
+        bad = client.get('/api/partners/reports?cursor=nope', headers=headers)
+        assert bad.status_code == 400
+
+
+def test_export_streams_same_rows(app_and_db, report_data):
+    app, _ = app_and_db
+    from openpyxl import load_workbook
+    headers = {'Authorization': f"Bearer {report_data['token']}"}
+    query = 'categories=usuario,organizacion,estandar&columns=full_name,group_name,standard_code'
+    with app.test_client() as client:
+        full = client.get(f'/api/partners/reports?{query}&per_page=200', headers=headers).get_json()
+
+        resp = client.get(f'/api/partners/reports/export?{query}&format=csv', headers=headers)
+        assert resp.status_code == 200 and resp.mimetype == 'text/csv'
+        reader = list(csv.reader(io.StringIO(resp.get_data(as_text=True).lstrip('﻿'))))
+        assert reader[0] == ['Nombre Completo', 'Grupo', 'Estándar (Código)']
+        assert len(reader) - 1 == full['total']
+
+        resp = client.get(f'/api/partners/reports/export?{query}', headers=headers)
+        assert resp.status_code == 200
+        ws = load_workbook(io.BytesIO(resp.get_data())).active
+        values = list(ws.iter_rows(values_only=True))
+        assert values[0] == ('Nombre Completo', 'Grupo', 'Estándar (Código)')
+        assert [v[0] for v in values[1:]] == [r['full_name'] for r in full['rows']]
+
+
+def test_xlsx_export_removes_temp_file(app_and_db, report_data, monkeypatch, tmp_path):
+    app, _ = app_and_db
+    import tempfile
+    from openpyxl import Workbook
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    headers = {'Authorization': f"Bearer {report_data['token']}"}
+    url = '/api/partners/reports/export?categories=usuario&columns=full_name'
+    with app.test_client() as client:
+        # Cliente que se desconecta antes del primer chunk
+        resp = client.get(url, headers=headers, buffered=False)
+        assert resp.status_code == 200
+        assert len(list(tmp_path.glob('reporte_*.xlsx'))) == 1
+        resp.close()
+        assert not list(tmp_path.glob('reporte_*.xlsx'))
+
+        def broken_save(self, filename):
+            open(filename, 'wb').close()
+            raise OSError('disco lleno')
+
+        monkeypatch.setattr(Workbook, 'save', broken_save)
+        assert client.get(url, headers=headers).status_code >= 500
+        assert not list(tmp_path.glob('reporte_*.xlsx'))
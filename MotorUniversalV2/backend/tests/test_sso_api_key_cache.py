@@ -0,0 +1,199 @@
+"""
+Tests + benchmark de carga del cache de API keys SSO verificadas
+(app/services/sso_api_key_cache.py, usado por find_campus_and_api_key):
+  - Con la key en cache no se ejecuta Argon2 y la resolución es una sola
+    query (key + plantel), tanto para keys multi-key como legacy.
+  - Una key rotada o desactivada nunca se acepta desde el cache, aunque no
+    se invalide; las rutas de rotar/revocar/desactivar rotan la generación.
+  - El fingerprint es un HMAC con llave del servidor, no un SHA-256 simple.
+  - Benchmark: /api/sso/generar_token con la key verificada en cada llamada
+    (cache vacío) vs resuelta desde cache.
+
+USO:
+  cd backend && python -m pytest tests/test_sso_api_key_cache.py -v -s
+"""
+import hashlib
+import os
+import sys
+import time
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from support import QueryCounter  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-sso-api-key-cache'
+    try:
+        from app import create_app, db as flask_db, cache
+        from flask_caching.backends import SimpleCache
+        app = create_app('testing')
+        # Backend en memoria en lugar de Redis (no disponible en CI)
+        app.extensions['cache'][cache] = SimpleCache()
+        app.config['RATE_LIMIT_ENABLED'] = False  # el benchmark rebasa 120/min
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+@pytest.fixture(scope='module')
+def setup(app_and_db):
+    app, db = app_and_db
+    from flask_jwt_extended import create_access_token
+    from app.models.user import User
+    from app.models.partner import Partner, Campus
+    with app.app_context():
+        admin = User(id=str(uuid.uuid4()), email='admin_keycache@evaluaasi.com', username='admin_keycache',
+                     name='Admin', first_surname='Cache', role='admin')
+        admin.set_password('admin12345')
+        db.session.add(admin)
+        db.session.flush()
+        partner = Partner(name='Partner SSO Cache', coordinator_id=admin.id)
+        db.session.add(partner)
+        db.session.flush()
+        campus = Campus(partner_id=partner.id, name='Plantel SSO Cache', code=f'SKC{uuid.uuid4().hex[:6]}',
+                        is_active=True, enable_sso_api=True)
+        db.session.add(campus)
+        db.session.commit()
+        return {
+            'campus_id': campus.id,
+            'headers': {'Authorization': f'Bearer {create_access_token(identity=admin.id)}'},
+        }
+
+
+def _multi_key(db, campus_id, description='Llave cache'):
+    from app.models.campus_api_key import CampusApiKey
+    raw = CampusApiKey.generate_raw()
+    key = CampusApiKey(campus_id=campus_id, description=description)
+    key.set_secret(raw)
+    db.session.add(key)
+    db.session.commit()
+    return key.id, raw
+
+
+@pytest.fixture
+def argon_calls(monkeypatch):
+    """Cuenta las verificaciones Argon2."""
+    from argon2 import PasswordHasher
+    calls = []
+    original = PasswordHasher.verify
+
+    def counting(self, hash, password):
+        calls.append(hash)
+        return original(self, hash, password)
+
+    monkeypatch.setattr(PasswordHasher, 'verify', counting)
+    return calls
+
+
+def test_warm_lookup_skips_argon2(app_and_db, setup, argon_calls):
+    app, db = app_and_db
+    from app.models.partner import Campus
+    from app.services.sso_service import find_campus_and_api_key
+    from app.services.sso_api_key_cache import clear_local_api_key_cache
+    with app.app_context():
+        key_id, raw = _multi_key(db, setup['campus_id'])
+        campus, api_key = find_campus_and_api_key(raw)
+        assert campus.id == setup['campus_id'] and api_key.id == key_id
+        assert len(argon_calls) == 1
+
+        db.session.remove()
+        with QueryCounter(db.engine) as warm:
+            campus, api_key = find_campus_and_api_key(raw)
+        assert api_key.id == key_id and len(argon_calls) == 1
+        assert len(warm.statements) == 1
+
+        clear_local_api_key_cache()  # solo Redis (SimpleCache)
+        assert find_campus_and_api_key(raw)[1].id == key_id and len(argon_calls) == 1
+
+        legacy_raw = Campus.query.get(setup['campus_id']).generate_api_key()
+        db.session.commit()
+        assert find_campus_and_api_key(legacy_raw) == (Campus.query.get(setup['campus_id']), None)
+        calls = len(argon_calls)
+        db.session.remove()
+        with QueryCounter(db.engine) as legacy_warm:
+            campus, api_key = find_campus_and_api_key(legacy_raw)
+        assert campus.id == setup['campus_id'] and api_key is None
+        assert len(argon_calls) == calls and len(legacy_warm.statements) == 1
+
+        assert find_campus_and_api_key(raw[:-1] + ('A' if raw[-1] != 'A' else 'B')) == (None, None)
+
+
+def test_rotated_or_inactive_keys_never_served_from_cache(app_and_db, setup):
+    app, db = app_and_db
+    from app.models.campus_api_key import CampusApiKey
+    from app.services.sso_service import find_campus_and_api_key
+    from app.services.sso_api_key_cache import _local_cache
+    client = app.test_client()
+    with app.app_context():
+        key_id, raw = _multi_key(db, setup['campus_id'])
+        assert find_campus_and_api_key(raw)[1].id == key_id
+
+        # Sin invalidar: el hash vigente ya no coincide con la entrada
+        key = CampusApiKey.query.get(key_id)
+        new_raw = key.rotate()
+        db.session.commit()
+        assert find_campus_and_api_key(raw) == (None, None)
+        assert find_campus_and_api_key(new_raw)[1].id == key_id
+
+        key.is_active = False
+        db.session.commit()
+        assert find_campus_and_api_key(new_raw) == (None, None)
+        key.is_active = True
+        db.session.commit()
+        assert find_campus_and_api_key(new_raw)[1].id == key_id
+
+    # Las rutas de gestión invalidan el cache
+    patched = client.patch(f'/api/sso/api-keys/{key_id}', json={'is_active': False}, headers=setup['headers'])
+    assert patched.status_code == 200
+    assert not _local_cache
+    denied = client.post('/api/sso/generar_token', json={
+        'apikey': new_raw, 'matricula': 'C001', 'nombre': 'Ana', 'apellido': 'Cache'})
+    assert denied.status_code == 401
+
+
+def test_fingerprint_is_keyed_hmac():
+    from app.utils.sso_crypto import api_key_fingerprint
+    raw = 'evk_' + 'x' * 48
+    assert api_key_fingerprint(raw) == api_key_fingerprint(raw)
+    assert api_key_fingerprint(raw) != hashlib.sha256(raw.encode()).hexdigest()
+    assert api_key_fingerprint(raw) != api_key_fingerprint(raw + 'y')
+
+
+def test_benchmark_token_issuance(app_and_db, setup):
+    app, db = app_and_db
+    from app.services.sso_api_key_cache import invalidate_api_key_cache
+    client = app.test_client()
+    with app.app_context():
+        _, raw = _multi_key(db, setup['campus_id'], description='Llave benchmark')
+    n = 15
+
+    def issue(i, tag):
+        r = client.post('/api/sso/generar_token', json={
+            'apikey': raw, 'matricula': f'{tag}{i % 5}', 'nombre': 'Alumno', 'apellido': 'Carga Prueba'})
+        assert r.status_code == 200, r.get_json()
+
+    def run(tag, cold):
+        start = time.perf_counter()
+        for i in range(n):
+            if cold:
+                invalidate_api_key_cache()
+            issue(i, tag)
+        return (time.perf_counter() - start) / n
+
+    issue(0, 'W')  # calentar rutas/usuarios
+    timings = {
+        'verificación Argon2': run('W', cold=True),
+        'key en cache': run('W', cold=False),
+    }
+    print(f'\n  /api/sso/generar_token ({n} llamadas, misma key):')
+    for name, seconds in timings.items():
+        print(f'    {name:<20} {seconds * 1e3:8.2f} ms/token  {1 / seconds:8.1f} tokens/s')
+    assert timings['key en cache'] < timings['verificación Argon2']
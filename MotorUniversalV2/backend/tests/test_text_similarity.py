@@ -0,0 +1,155 @@
+"""
+Tests + micro-benchmark del motor de similitud de texto (app/utils/text_similarity.py).
+
+Cubre:
+  1. Todos los motores dan EXACTAMENTE el mismo puntaje que la matriz
+     (n+1)x(m+1) original de calculate_text_similarity.
+  2. Early exit con min_score: nunca rechaza un par que sí alcanza el umbral.
+  3. batch_text_similarity = text_similarity par por par.
+  4. Benchmark: el motor por defecto es más rápido que la matriz original
+     con inputs del tamaño máximo (500 caracteres).
+
+USO:
+  cd backend && python -m pytest tests/test_text_similarity.py -v -s
+"""
+import sys
+import os
+import random
+import string
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils.text_similarity import (  # noqa: E402
+    text_similarity, batch_text_similarity, available_engines, MAX_INPUT_LENGTH,
+)
+
+
+def _legacy_similarity(user_answer, correct_answer, max_input=MAX_INPUT_LENGTH):
+    """Copia fiel de la implementación anterior (matriz completa)."""
+    if not user_answer or not correct_answer:
+        return 0.0
+    s1 = user_answer.lower().strip()
+    s2 = correct_answer.lower().strip()
+    if len(s1) > max_input:
+        s1 = s1[:max_input]
+    if len(s2) > max_input:
+        s2 = s2[:max_input]
+    if s1 == s2:
+        return 1.0
+    len1, len2 = len(s1), len(s2)
+    dp = [[0] * (len2 + 1) for _ in range(len1 + 1)]
+    for i in range(len1 + 1):
+        dp[i][0] = i
+    for j in range(len2 + 1):
+        dp[0][j] = j
+    for i in range(1, len1 + 1):
+        for j in range(1, len2 + 1):
+            if s1[i - 1] == s2[j - 1]:
+                dp[i][j] = dp[i - 1][j - 1]
+            else:
+                dp[i][j] = 1 + min(dp[i - 1][j], dp[i][j - 1], dp[i - 1][j - 1])
+    distance = dp[len1][len2]
+    max_len = max(len1, len2)
+    return 1.0 - (distance / max_len) if max_len > 0 else 1.0
+
+
+_ALPHABET = string.ascii_letters + 'áéíóúñÑ ' + '  '
+
+
+def _mutate(rng, text, edits):
+    chars = list(text)
+    for _ in range(edits):
+        op = rng.choice(('ins', 'del', 'sub'))
+        pos = rng.randrange(len(chars) + 1)
+        if op == 'ins' or not chars:
+            chars.insert(pos, rng.choice(_ALPHABET))
+        elif op == 'del':
+            del chars[min(pos, len(chars) - 1)]
+        else:
+            chars[min(pos, len(chars) - 1)] = rng.choice(_ALPHABET)
+    return ''.join(chars)
+
+
+def _random_pairs(seed=20260517, count=200):
+    rng = random.Random(seed)
+    pairs = [
+        ('', 'abc'), ('abc', ''), ('Hola', 'hola'), ('  hola  ', 'hola'),
+        ('a', 'b'), ('kitten', 'sitting'), ('x' * 700, 'x' * 650 + 'y' * 50),
+    ]
+    for _ in range(count):
+        length = rng.choice((1, 5, 20, 63, 64, 65, 130, 300, 520))
+        base = ''.join(rng.choice(_ALPHABET) for _ in range(length))
+        other = _mutate(rng, base, rng.randint(0, max(1, length // 3)))
+        pairs.append((other, base))
+    return pairs
+
+
+PAIRS = _random_pairs()
+
+
+@pytest.fixture(scope='module')
+def legacy_scores():
+    return {pair: _legacy_similarity(*pair) for pair in PAIRS}
+
+
+@pytest.mark.parametrize('engine', available_engines())
+def test_engines_match_legacy_scores(engine, legacy_scores):
+    for user, correct in PAIRS:
+        assert text_similarity(user, correct, engine=engine) == legacy_scores[(user, correct)], (user, correct)
+
+
+@pytest.mark.parametrize('engine', available_engines())
+def test_early_exit_never_rejects_passing_pairs(engine, legacy_scores):
+    for user, correct in PAIRS:
+        exact = legacy_scores[(user, correct)]
+        cut = text_similarity(user, correct, min_score=0.8, engine=engine)
+        if exact >= 0.8:
+            assert cut == exact
+        else:
+            assert cut == 0.0
+
+
+def test_batch_matches_single_calls():
+    scores = batch_text_similarity(PAIRS + PAIRS[:20])
+    assert len(scores) == len(set(PAIRS))
+    for pair in PAIRS:
+        assert scores[pair] == text_similarity(*pair)
+
+
+def test_calculate_text_similarity_delegates(legacy_scores):
+    from app.routes.exams import calculate_text_similarity
+    for pair in PAIRS:
+        assert calculate_text_similarity(*pair) == legacy_scores[pair]
+
+
+def _bench(fn, pairs, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for user, correct in pairs:
+            fn(user, correct)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_benchmark_max_length_inputs():
+    rng = random.Random(7)
+    pairs = []
+    for _ in range(10):
+        base = ''.join(rng.choice(_ALPHABET) for _ in range(MAX_INPUT_LENGTH))
+        pairs.append((_mutate(rng, base, 60), base))
+
+    legacy = _bench(_legacy_similarity, pairs, repeat=1)
+    timings = {'legacy_matrix': legacy}
+    for engine in available_engines():
+        timings[engine] = _bench(lambda u, c, e=engine: text_similarity(u, c, engine=e), pairs)
+    timings['myers_min_score'] = _bench(lambda u, c: text_similarity(u, c, min_score=0.8), pairs)
+
+    print('\n  Similitud 500x500 (10 pares, mejor de N):')
+    for name, seconds in timings.items():
+        print(f'    {name:<16} {seconds * 1000:8.2f} ms  (x{legacy / seconds:5.1f})')
+
+    assert timings['myers'] < legacy
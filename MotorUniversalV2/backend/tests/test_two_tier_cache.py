@@ -0,0 +1,164 @@
+"""
+Tests del cache de respuestas de dos niveles (cached_with_user):
+  - Hit en el LRU de proceso sin tocar el backend.
+  - Stale-while-revalidate: con el lock tomado se sirve la versión vencida.
+  - Single-flight: N requests concurrentes en frío recalculan una sola vez.
+  - Errores (>= 400) no se cachean.
+  - GET /api/health/cache-stats sólo para admin.
+
+USO:
+  cd backend && python -m pytest tests/test_two_tier_cache.py -v
+"""
+import sys
+import os
+import threading
+import time
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def app_and_db():
+    os.environ['JWT_SECRET_KEY'] = 'test-secret-two-tier-cache'
+    try:
+        from app import create_app, db as flask_db, cache
+        from flask_caching.backends import SimpleCache
+        app = create_app('testing')
+        # Backend en memoria en lugar de Redis (no disponible en CI)
+        app.extensions['cache'][cache] = SimpleCache()
+        with app.app_context():
+            flask_db.create_all()
+            yield app, flask_db
+            flask_db.drop_all()
+    except Exception as e:
+        pytest.skip(f'No se pudo crear la app Flask: {e}')
+
+
+@pytest.fixture(autouse=True)
+def _clean_local():
+    from app.utils.cache_utils import clear_local_cache
+    clear_local_cache()
+    yield
+
+
+def _make_user(db, role):
+    from app.models.user import User
+    from flask_jwt_extended import create_access_token
+    user = User(
+        id=str(uuid.uuid4()),
+        email=f'{role}_{uuid.uuid4().hex[:6]}@evaluaasi.com',
+        username=f'{role}_{uuid.uuid4().hex[:6]}',
+        name='Usuario',
+        first_surname='Prueba',
+        role=role,
+    )
+    user.set_password('test1234')
+    db.session.add(user)
+    db.session.commit()
+    return create_access_token(identity=user.id)
+
+
+def _counting_view(delay=0.0, status=200):
+    calls = {'n': 0}
+
+    def view():
+        calls['n'] += 1
+        if delay:
+            time.sleep(delay)
+        return {'n': calls['n']}, status
+    view.__name__ = f'view_{uuid.uuid4().hex[:6]}'
+    return view, calls
+
+
+def test_local_hit_skips_backend(app_and_db):
+    app, _ = app_and_db
+    from app import cache
+    from app.utils.cache_utils import cached_with_user, get_cache_stats
+    view, calls = _counting_view()
+    cached = cached_with_user(timeout=60)(view)
+    backend = app.extensions['cache'][cache]
+
+    with app.test_request_context('/api/partners/groups/1/analytics'):
+        assert cached()[0] == {'n': 1}
+        original_get = backend.get
+        backend.get = lambda *a, **k: pytest.fail('hit local no debe ir al backend')
+        try:
+            assert cached()[0] == {'n': 1}
+        finally:
+            backend.get = original_get
+
+    stats = get_cache_stats()['endpoints'][view.__name__]
+    assert stats['local_hits'] == 1 and stats['misses'] == 1
+    assert calls['n'] == 1
+
+
+def test_stale_served_while_other_request_rebuilds(app_and_db):
+    app, _ = app_and_db
+    from app import cache
+    from app.utils.cache_utils import cached_with_user, make_cache_key_with_user, get_cache_stats
+    view, calls = _counting_view()
+    # timeout=0: la respuesta queda vencida de inmediato pero vive stale_ttl en Redis
+    cached = cached_with_user(timeout=0, stale_ttl=60)(view)
+
+    with app.test_request_context('/api/partners/groups/2/analytics'):
+        assert cached()[0] == {'n': 1}
+        cache.add('flight:' + make_cache_key_with_user(), 1, timeout=30)
+        assert cached()[0] == {'n': 1}   # stale, otro worker recalcula
+        cache.delete('flight:' + make_cache_key_with_user())
+        assert cached()[0] == {'n': 2}   # lock libre: este request recalcula
+
+    stats = get_cache_stats()['endpoints'][view.__name__]
+    assert stats['stale_served'] == 1 and stats['misses'] == 2
+
+
+def test_single_flight_on_cold_key(app_and_db):
+    app, _ = app_and_db
+    from app.utils.cache_utils import cached_with_user, get_cache_stats
+    view, calls = _counting_view(delay=0.3)
+    cached = cached_with_user(timeout=60)(view)
+    results = []
+
+    def worker():
+        with app.test_request_context('/api/partners/groups/3/analytics'):
+            results.append(cached()[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls['n'] == 1
+    assert results == [{'n': 1}] * 6
+    stats = get_cache_stats()['endpoints'][view.__name__]
+    assert stats['coalesced'] + stats['local_hits'] + stats['redis_hits'] == 5
+
+
+def test_errors_are_not_cached(app_and_db):
+    app, _ = app_and_db
+    from app.utils.cache_utils import cached_with_user
+    view, calls = _counting_view(status=500)
+    cached = cached_with_user(timeout=60)(view)
+    with app.test_request_context('/api/partners/groups/4/analytics'):
+        cached()
+        cached()
+    assert calls['n'] == 2
+
+
+def test_cache_stats_endpoint_requires_admin(app_and_db):
+    app, db = app_and_db
+    with app.app_context():
+        admin_token = _make_user(db, 'admin')
+        cand_token = _make_user(db, 'candidato')
+    with app.test_client() as client:
+        client.get('/api/users/me/dashboard', headers={'Authorization': f'Bearer {cand_token}'})
+        denied = client.get('/api/health/cache-stats', headers={'Authorization': f'Bearer {cand_token}'})
+        assert denied.status_code == 403
+        resp = client.get('/api/health/cache-stats', headers={'Authorization': f'Bearer {admin_token}'})
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert body['endpoints']['get_dashboard']['misses'] == 1
+        assert body['local_max_entries'] > 0
@@ -0,0 +1,156 @@
+"""
+Tests de la ingesta de ZIPs por spool a disco (app/utils/zip_spool.py) y de
+su uso en scorm_service.extract_and_upload.
+
+Cubre:
+  1. El blob se descarga por chunks a un temporal idéntico al original.
+  2. max_bytes aborta la descarga y no deja temporales huérfanos.
+  3. extract_and_upload desde ruta sube lo mismo que desde bytes.
+  4. El pico de memoria al extraer desde disco queda acotado por las
+     entradas en vuelo, no por el tamaño del ZIP.
+
+USO:
+  cd backend && python -m pytest tests/test_zip_spool.py -v
+"""
+import os
+import sys
+import tracemalloc
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils import zip_spool  # noqa: E402
+from app.utils.zip_spool import (  # noqa: E402
+    remove_spool, spool_blob_to_tempfile, iter_zip_entries, read_zip_entry,
+)
+from app.services import scorm_service  # noqa: E402
+
+MB = 1024 * 1024
+
+MANIFEST = b"""<?xml version="1.0"?>
+<manifest identifier="m" xmlns="http://www.imsproject.org/xsd/imscp_rootv1p1p2"
+          xmlns:adlcp="http://www.adlnet.org/xsd/adlcp_rootv1p2">
+  <metadata><schemaversion>1.2</schemaversion></metadata>
+  <organizations default="o"><organization identifier="o"><title>Curso</title>
+    <item identifier="i1" identifierref="r1"><title>Tema</title></item>
+  </organization></organizations>
+  <resources><resource identifier="r1" type="webcontent" adlcp:scormtype="sco" href="index.html"/></resources>
+</manifest>"""
+
+
+class _FakeDownloader:
+    def __init__(self, path, chunk_size=256 * 1024):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.chunk_size = chunk_size
+
+    def chunks(self):
+        with open(self.path, 'rb') as fh:
+            while True:
+                chunk = fh.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class _FakeBlobClient:
+    def __init__(self, path):
+        self.path = path
+
+    def download_blob(self):
+        return _FakeDownloader(self.path)
+
+
+class _FakeStorage:
+    uploaded = {}
+
+    def _ensure_scorm_container(self):
+        return True
+
+    def upload_scorm_asset(self, data, blob_path, content_type):
+        _FakeStorage.uploaded[blob_path] = len(data)
+        return f'https://blob/{blob_path}'
+
+    def scorm_base_url(self, prefix):
+        return f'https://blob/{prefix}/'
+
+
+@pytest.fixture
+def scorm_zip(tmp_path):
+    path = str(tmp_path / 'paquete.zip')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+        zf.writestr('curso/imsmanifest.xml', MANIFEST)
+        zf.writestr('curso/index.html', b'<html></html>')
+        for i in range(16):
+            zf.writestr(f'curso/media/video_{i:02d}.mp4', os.urandom(MB))
+        zf.writestr('curso/tools/setup.exe', b'MZ')
+    return path
+
+
+@pytest.fixture
+def fake_storage(monkeypatch):
+    _FakeStorage.uploaded = {}
+    monkeypatch.setattr(scorm_service, 'AzureStorageService', _FakeStorage)
+    return _FakeStorage
+
+
+def test_spool_copies_blob_to_tempfile(scorm_zip, tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_spool, 'SPOOL_DIR', str(tmp_path))
+    path = spool_blob_to_tempfile(_FakeBlobClient(scorm_zip), prefix='t_')
+    try:
+        with open(path, 'rb') as a, open(scorm_zip, 'rb') as b:
+            assert a.read() == b.read()
+        with zipfile.ZipFile(path) as zf:
+            names = [i.filename for i in iter_zip_entries(zf)]
+            assert 'curso/imsmanifest.xml' in names
+            assert read_zip_entry(zf, 'curso/index.html') == b'<html></html>'
+            with pytest.raises(ValueError):
+                read_zip_entry(zf, 'curso/media/video_00.mp4', max_bytes=1024)
+    finally:
+        remove_spool(path)
+    assert not os.path.exists(path)
+
+
+def test_spool_max_bytes_leaves_no_tempfile(scorm_zip, tmp_path, monkeypatch):
+    spool_dir = tmp_path / 'spool'
+    spool_dir.mkdir()
+    monkeypatch.setattr(zip_spool, 'SPOOL_DIR', str(spool_dir))
+    with pytest.raises(ValueError):
+        spool_blob_to_tempfile(_FakeBlobClient(scorm_zip), max_bytes=2 * MB)
+    assert list(spool_dir.iterdir()) == []
+
+
+def test_extract_from_path_matches_bytes(scorm_zip, fake_storage):
+    from_path = scorm_service.extract_and_upload(scorm_zip, package_uuid='p1')
+    uploaded_path = {k.split('/', 1)[1]: v for k, v in fake_storage.uploaded.items()}
+
+    fake_storage.uploaded = {}
+    with open(scorm_zip, 'rb') as fh:
+        from_bytes = scorm_service.extract_and_upload(fh.read(), package_uuid='p1')
+    uploaded_bytes = {k.split('/', 1)[1]: v for k, v in fake_storage.uploaded.items()}
+
+    assert from_path == from_bytes
+    assert uploaded_path == uploaded_bytes
+    assert from_path['entry_point'] == 'index.html'
+    assert from_path['file_count'] == 18
+    assert from_path['rejected_count'] == 1
+    assert 'tools/setup.exe' not in uploaded_path
+
+
+def test_extract_from_path_memory_bounded_by_inflight_entries(scorm_zip, fake_storage, monkeypatch):
+    archive_size = os.path.getsize(scorm_zip)
+    assert archive_size > 16 * MB
+    # Subidas concurrentes: a lo más ~2 MB de entradas en vuelo
+    monkeypatch.setattr(scorm_service, 'SCORM_UPLOAD_MAX_INFLIGHT_BYTES', 2 * MB)
+
+    tracemalloc.start()
+    try:
+        scorm_service.extract_and_upload(scorm_zip, package_uuid='p2')
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Presupuesto de subida (2 MB) + buffers de zipfile, no el ZIP de 16 MB
+    assert peak < 5 * MB, peak
@@ -312,7 +312,7 @@ export default function BulkUploadModal({ isOpen, onClose, onSuccess }: BulkUplo
       updateNotification(notificationId, {
         type: 'error',
         title: 'Error al procesar archivo',
-        message: err.response?.data?.error || 'Error desconocido',
+        message: err.response?.data?.error || err.message || 'Error desconocido',
         dismissible: true,
         duration: 10000,
       });
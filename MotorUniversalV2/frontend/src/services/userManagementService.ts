@@ -568,11 +568,48 @@ export async function bulkUploadCandidates(file: File, groupId?: number, include
     formData.append('skip_row_numbers', JSON.stringify(skipRowNumbers));
   }
   
+  // El backend responde 202 con el batch en cola y lo procesa en segundo plano
   const response = await api.post('/user-management/candidates/bulk-upload', formData, {
     headers: {
       'Content-Type': 'multipart/form-data'
     }
   });
+  const batchId: number = response.data.batch_id;
+
+  const deadline = Date.now() + BULK_UPLOAD_MAX_WAIT_MS;
+  while (Date.now() < deadline) {
+    await new Promise(resolve => setTimeout(resolve, BULK_UPLOAD_POLL_MS));
+    const progress = await getBulkUploadProgress(batchId);
+    if (progress.status === 'completed' && progress.result) {
+      return progress.result;
+    }
+    if (progress.status === 'failed') {
+      throw new Error(progress.error_message || 'Error al procesar la carga masiva');
+    }
+  }
+  throw new Error(
+    'La carga masiva está tardando más de lo esperado. Sigue en proceso: consulta su estado en el historial de cargas.'
+  );
+}
+
+const BULK_UPLOAD_POLL_MS = 2000;
+// Tope de espera del cliente; el backend marca failed las cargas sin avance
+// (BULK_UPLOAD_STALE_MINUTES), así que normalmente termina antes.
+const BULK_UPLOAD_MAX_WAIT_MS = 60 * 60 * 1000;
+
+export interface BulkUploadProgress extends BulkUploadBatchSummary {
+  status: 'queued' | 'processing' | 'completed' | 'failed';
+  total_rows: number;
+  processed_rows: number;
+  progress_percentage: number;
+  started_at: string | null;
+  completed_at: string | null;
+  error_message: string | null;
+  result?: BulkUploadResult;
+}
+
+export async function getBulkUploadProgress(batchId: number): Promise<BulkUploadProgress> {
+  const response = await api.get(`/user-management/bulk-history/${batchId}/progress`);
   return response.data;
 }
 
@@ -661,6 +698,7 @@ export interface BulkUploadBatchSummary {
   emails_sent: number;
   emails_failed: number;
   original_filename: string | null;
+  status?: 'queued' | 'processing' | 'completed' | 'failed';
   created_at: string;
 }
 